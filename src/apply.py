@@ -0,0 +1,531 @@
+"""
+High-throughput application of a filter to large JSON record files.
+
+This module provides apply_filter, used by `jq-synth apply` to run a
+synthesized filter over NDJSON (one JSON text per line) or JSON text
+sequence (RFC 7464, each text preceded by an ASCII record separator) files.
+Files are memory-mapped and split at record boundaries into byte-range
+chunks; a pool of worker processes filters the chunks in parallel, each
+chunk through one jq process run by a JQExecutor with the caller's timeout
+and output limits. Output is written in input order or as chunks finish,
+and failed chunks (jq errors, timeouts, output over the limit) are reported
+without stopping the others.
+
+With the python engine, workers parse the records and run the filter
+compiled by src.compiler (column-wise over batches of objects where NumPy
+is installed) instead of spawning jq; the auto engine does so for filters
+the compiler supports and uses jq for the rest.
+"""
+
+import functools
+import json
+import logging
+import mmap
+import re
+import time
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from src.compiler import (
+    JQ_VERSION,
+    CompiledFilter,
+    FilterRuntimeError,
+    UnsupportedFilterError,
+    compile_filter,
+    to_json,
+)
+from src.executor import JQExecutor
+
+logger = logging.getLogger(__name__)
+
+# Input formats
+NDJSON = "ndjson"
+SEQ = "seq"
+INPUT_FORMATS = (NDJSON, SEQ)
+
+# Engines
+JQ_ENGINE = "jq"
+PYTHON_ENGINE = "python"
+AUTO_ENGINE = "auto"
+ENGINES = (JQ_ENGINE, PYTHON_ENGINE, AUTO_ENGINE)
+
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+DEFAULT_CHUNK_TIMEOUT_SEC = 60.0
+
+# Chunks submitted or buffered ahead of the output, per worker
+_CHUNKS_AHEAD_PER_WORKER = 4
+
+# Records the python engine filters between timeout and output limit checks
+_PYTHON_BATCH_RECORDS = 4096
+
+_RECORD_SEPARATOR = b"\x1e"
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*$", re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """
+    A byte range of an input file holding whole records.
+
+    Attributes:
+        index: Position among all chunks of the run (output order).
+        path: The input file.
+        start: Offset of the first byte.
+        end: Offset after the last byte.
+        fmt: NDJSON or SEQ.
+    """
+
+    index: int
+    path: str
+    start: int
+    end: int
+    fmt: str
+
+
+@dataclass(frozen=True)
+class ChunkResult:
+    """
+    The outcome of filtering one chunk.
+
+    Attributes:
+        chunk: The chunk.
+        records: Number of input records in the chunk.
+        output: Filter output (one compact JSON text per line, or RS-prefixed
+            for SEQ input); partial if the chunk failed part way.
+        exit_code: jq's exit code (2: invalid record, 5: filter error, 124:
+            timeout, 137: output over the limit); the python engine uses the
+            same codes.
+        error: jq's error output, empty on success. jq goes on after an error
+            in one record, and its exit code only reflects the last record,
+            so a chunk with any error output counts as failed.
+        elapsed_sec: Wall-clock time of the jq run.
+    """
+
+    chunk: Chunk
+    records: int
+    output: bytes
+    exit_code: int
+    error: str
+    elapsed_sec: float
+
+    @property
+    def ok(self) -> bool:
+        """Whether jq filtered every record of the chunk without error."""
+        return self.exit_code == 0 and not self.error
+
+
+@dataclass(frozen=True)
+class ApplyReport:
+    """
+    Totals of an apply run.
+
+    Attributes:
+        files: Input files.
+        chunks: Chunks filtered.
+        records: Input records read.
+        output_bytes: Bytes written.
+        elapsed_sec: Wall-clock time of the run.
+        workers: Worker processes used.
+        failures: Results of the chunks that failed, in input order.
+        engine: JQ_ENGINE or PYTHON_ENGINE, as chosen for the filter.
+    """
+
+    files: int
+    chunks: int
+    records: int
+    output_bytes: int
+    elapsed_sec: float
+    workers: int
+    failures: list[ChunkResult]
+    engine: str = JQ_ENGINE
+
+    @property
+    def records_per_sec(self) -> float:
+        """Input records filtered per second of wall-clock time."""
+        return self.records / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a byte size such as '4M', '512K', '1.5GiB' or '65536'.
+
+    Args:
+        text: Number with an optional K, M or G (binary) suffix.
+
+    Returns:
+        The size in bytes.
+
+    Raises:
+        ValueError: If the text is not a positive size.
+    """
+    match = _SIZE.match(text)
+    if match is None:
+        raise ValueError(f"Invalid size '{text}' (expected e.g. 65536, 512K, 4M or 1G)")
+    size = int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+    if size < 1:
+        raise ValueError(f"Size must be positive: '{text}'")
+    return size
+
+
+def detect_format(path: str | Path) -> str:
+    """
+    Tell NDJSON from a JSON text sequence by the first non-blank byte.
+
+    Args:
+        path: The input file.
+
+    Returns:
+        SEQ if the file starts with a record separator, NDJSON otherwise.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    with Path(path).open("rb") as f:
+        head = f.read(4096).lstrip()
+    return SEQ if head.startswith(_RECORD_SEPARATOR) else NDJSON
+
+
+def split_chunks(path: str | Path, fmt: str, chunk_bytes: int, first_index: int = 0) -> list[Chunk]:
+    """
+    Split a file into chunks of about chunk_bytes at record boundaries.
+
+    Chunks end after a newline (NDJSON) or before a record separator (SEQ),
+    so no record is cut; a record longer than chunk_bytes gets a chunk of
+    its own size.
+
+    Args:
+        path: The input file.
+        fmt: NDJSON or SEQ.
+        chunk_bytes: Target chunk size.
+        first_index: Index of the first chunk.
+
+    Returns:
+        The chunks, covering the file in order; none for an empty file.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    with Path(path).open("rb") as f:
+        size = Path(path).stat().st_size
+        if size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            chunks: list[Chunk] = []
+            start = 0
+            while start < size:
+                end = start + chunk_bytes
+                if end >= size:
+                    end = size
+                elif fmt == SEQ:
+                    boundary = mapped.find(_RECORD_SEPARATOR, end)
+                    end = size if boundary == -1 else boundary
+                else:
+                    boundary = mapped.find(b"\n", end - 1)
+                    end = size if boundary == -1 else boundary + 1
+                chunks.append(Chunk(first_index + len(chunks), str(path), start, end, fmt))
+                start = end
+    return chunks
+
+
+def count_records(data: bytes, fmt: str) -> int:
+    """Number of JSON texts in a chunk."""
+    if fmt == SEQ:
+        return data.count(_RECORD_SEPARATOR)
+    return sum(1 for line in data.split(b"\n") if line.strip())
+
+
+def run_chunk(
+    executor: JQExecutor, filter_code: str, chunk: Chunk, engine: str = JQ_ENGINE
+) -> ChunkResult:
+    """
+    Filter one chunk through one jq process, or in-process with the python engine.
+
+    Args:
+        executor: Executor whose timeout and output limit apply to the chunk.
+        filter_code: The jq filter.
+        chunk: The chunk to filter.
+        engine: JQ_ENGINE or PYTHON_ENGINE.
+
+    Returns:
+        The chunk's output and outcome.
+
+    Raises:
+        OSError: If the file cannot be read.
+        UnsupportedFilterError: If the python engine cannot compile the filter.
+    """
+    with (
+        Path(chunk.path).open("rb") as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+    ):
+        data = mapped[chunk.start : chunk.end]
+    start = time.perf_counter()
+    if engine == PYTHON_ENGINE:
+        output, exit_code, error = _run_compiled(executor, _compiled(filter_code), data, chunk.fmt)
+    else:
+        options = ["--seq"] if chunk.fmt == SEQ else []
+        result = executor.run_raw(filter_code, data, options)
+        output, exit_code, error = result.stdout.encode("utf-8"), result.exit_code, result.stderr
+        if output:
+            output += b"\n"
+    return ChunkResult(
+        chunk=chunk,
+        records=count_records(data, chunk.fmt),
+        output=output,
+        exit_code=exit_code,
+        error=error,
+        elapsed_sec=time.perf_counter() - start,
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _compiled(filter_code: str) -> CompiledFilter:
+    return compile_filter(filter_code)
+
+
+def _parse_records(data: bytes, fmt: str) -> tuple[list[Any], str]:
+    """Parse a chunk's records up to the first invalid one, with its error (or '')."""
+    # jq replaces invalid UTF-8 with U+FFFD as well
+    text = data.decode("utf-8", errors="replace")
+    records = text.split("\x1e" if fmt == SEQ else "\n")
+    values: list[Any] = []
+    for record in records:
+        if not record.strip():
+            continue
+        try:
+            values.append(json.loads(record))
+        except json.JSONDecodeError as e:
+            return values, f"parse error (at record {len(values) + 1}): {e}"
+    return values, ""
+
+
+def _run_compiled(
+    executor: JQExecutor, compiled: CompiledFilter, data: bytes, fmt: str
+) -> tuple[bytes, int, str]:
+    """Filter a chunk in-process, returning its output, jq-style exit code and errors."""
+    deadline = time.perf_counter() + executor.timeout_sec
+    values, parse_error = _parse_records(data, fmt)
+    prefix = "\x1e" if fmt == SEQ else ""
+    errors: list[str] = []
+    output = bytearray()
+    for start in range(0, len(values), _PYTHON_BATCH_RECORDS):
+        if time.perf_counter() > deadline:
+            return (
+                bytes(output),
+                124,
+                f"Execution timed out after {executor.timeout_sec} seconds",
+            )
+
+        def on_error(i: int, e: FilterRuntimeError, start: int = start) -> None:
+            errors.append(f"jq: error (at record {start + i + 1}): {e}")
+
+        batch = compiled.run_batch(values[start : start + _PYTHON_BATCH_RECORDS], on_error)
+        output += "".join(f"{prefix}{to_json(value)}\n" for value in batch).encode("utf-8")
+        if len(output) > executor.max_output_bytes:
+            return bytes(output[: executor.max_output_bytes]), 137, "Output too large"
+    if parse_error:
+        return bytes(output), 2, "\n".join([*errors, f"jq: error: {parse_error}"])
+    return bytes(output), 5 if errors else 0, "\n".join(errors)
+
+
+def resolve_engine(engine: str, filter_code: str, jq_version: str = JQ_VERSION) -> str:
+    """
+    Choose the engine that runs a filter.
+
+    The compiled filters match the output of JQ_VERSION only, so against
+    any other jq the python engine is refused and auto picks jq.
+
+    Args:
+        engine: JQ_ENGINE, PYTHON_ENGINE or AUTO_ENGINE (python if the
+            compiler supports the filter, jq otherwise).
+        filter_code: The jq filter.
+        jq_version: The configured jq binary's `jq --version` output.
+
+    Returns:
+        JQ_ENGINE or PYTHON_ENGINE.
+
+    Raises:
+        ValueError: If the engine is unknown, or the python engine was asked
+            for and the jq binary is not JQ_VERSION.
+        UnsupportedFilterError: If the python engine was asked for and the
+            compiler does not support the filter.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}' (expected one of {ENGINES})")
+    if engine == JQ_ENGINE:
+        return JQ_ENGINE
+    if jq_version != JQ_VERSION:
+        found = jq_version or "an unknown version"
+        if engine == PYTHON_ENGINE:
+            raise ValueError(
+                f"The python engine matches {JQ_VERSION} output, but jq is {found}; "
+                f"use --engine {JQ_ENGINE}"
+            )
+        logger.info("Applying with jq: the python engine matches %s, jq is %s", JQ_VERSION, found)
+        return JQ_ENGINE
+    try:
+        _compiled(filter_code)
+    except UnsupportedFilterError as e:
+        if engine == PYTHON_ENGINE:
+            raise
+        logger.info("Applying with jq: %s", e)
+        return JQ_ENGINE
+    return PYTHON_ENGINE
+
+
+class _Worker:
+    """Per-process executor of the pool workers."""
+
+    executor: JQExecutor | None = None
+
+
+def _init_worker(jq_path: str, timeout_sec: float, max_output_bytes: int) -> None:
+    _Worker.executor = JQExecutor(jq_path, timeout_sec, max_output_bytes)
+
+
+def _run_chunk_in_worker(filter_code: str, engine: str, chunk: Chunk) -> ChunkResult:
+    assert _Worker.executor is not None
+    return run_chunk(_Worker.executor, filter_code, chunk, engine)
+
+
+def apply_filter(
+    executor: JQExecutor,
+    filter_code: str,
+    paths: Sequence[str | Path],
+    out: BinaryIO,
+    *,
+    fmt: str | None = None,
+    workers: int = 1,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    ordered: bool = True,
+    on_chunk: Callable[[ChunkResult], None] | None = None,
+    engine: str = JQ_ENGINE,
+) -> ApplyReport:
+    """
+    Run a filter over record files and write the output.
+
+    Args:
+        executor: Its jq binary, timeout and output limit are used for every
+            chunk (each worker process builds an identical executor).
+        filter_code: The jq filter.
+        paths: Input files.
+        out: Binary stream the output is written to.
+        fmt: NDJSON or SEQ; None detects it per file.
+        workers: Worker processes; 1 filters the chunks in this process.
+        chunk_bytes: Target chunk size.
+        ordered: If True, output follows the input order; otherwise chunks
+            are written as they finish.
+        on_chunk: Optional callback receiving every chunk result, in the
+            order written.
+        engine: JQ_ENGINE, PYTHON_ENGINE or AUTO_ENGINE (see resolve_engine).
+            The python engine's output matches jq's (see src.compiler).
+
+    Returns:
+        The run's totals and failed chunks.
+
+    Raises:
+        ValueError: If the format or engine is unknown or workers or
+            chunk_bytes is not positive.
+        UnsupportedFilterError: If the python engine cannot compile the filter.
+        OSError: If an input file cannot be read or the output written.
+    """
+    if fmt is not None and fmt not in INPUT_FORMATS:
+        raise ValueError(f"Unknown input format '{fmt}' (expected one of {INPUT_FORMATS})")
+    if workers < 1 or chunk_bytes < 1:
+        raise ValueError("workers and chunk_bytes must be at least 1")
+    engine = resolve_engine(engine, filter_code, executor.version)
+
+    start = time.perf_counter()
+    chunks: list[Chunk] = []
+    for path in paths:
+        file_fmt = fmt or detect_format(path)
+        chunks += split_chunks(path, file_fmt, chunk_bytes, first_index=len(chunks))
+    logger.info("Applying filter to %d files in %d chunks with %s", len(paths), len(chunks), engine)
+
+    records = output_bytes = 0
+    failures: list[ChunkResult] = []
+    for result in _results(executor, filter_code, chunks, workers, ordered, engine=engine):
+        out.write(result.output)
+        records += result.records
+        output_bytes += len(result.output)
+        if not result.ok:
+            logger.info(
+                "Chunk %d (%s bytes %d-%d) failed with exit code %d",
+                result.chunk.index,
+                result.chunk.path,
+                result.chunk.start,
+                result.chunk.end,
+                result.exit_code,
+            )
+            failures.append(result)
+        if on_chunk is not None:
+            on_chunk(result)
+    out.flush()
+
+    failures.sort(key=lambda result: result.chunk.index)
+    return ApplyReport(
+        files=len(paths),
+        chunks=len(chunks),
+        records=records,
+        output_bytes=output_bytes,
+        elapsed_sec=time.perf_counter() - start,
+        workers=workers,
+        failures=failures,
+        engine=engine,
+    )
+
+
+def _results(
+    executor: JQExecutor,
+    filter_code: str,
+    chunks: list[Chunk],
+    workers: int,
+    ordered: bool,
+    *,
+    engine: str,
+) -> Iterator[ChunkResult]:
+    """Filter the chunks, yielding results in write order."""
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield run_chunk(executor, filter_code, chunk, engine)
+        return
+
+    # Bound the chunks in flight or waiting for an earlier one, so memory
+    # does not grow with the input when one chunk is slow
+    ahead = workers * _CHUNKS_AHEAD_PER_WORKER
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(executor.jq_path, executor.timeout_sec, executor.max_output_bytes),
+    )
+    with pool:
+        remaining = iter(chunks)
+        running: set[Future[ChunkResult]] = set()
+        finished: dict[int, ChunkResult] = {}
+        next_index = chunks[0].index
+
+        def submit() -> None:
+            while len(running) + len(finished) < ahead:
+                chunk = next(remaining, None)
+                if chunk is None:
+                    return
+                running.add(pool.submit(_run_chunk_in_worker, filter_code, engine, chunk))
+
+        submit()
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if ordered:
+                    finished[result.chunk.index] = result
+                else:
+                    yield result
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+            submit()
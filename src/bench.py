@@ -0,0 +1,275 @@
+"""
+Benchmarks over task suites.
+
+This module provides the building blocks of the `bench` subcommand: every
+task of one or more task files is solved in turn and measured (wall time,
+LLM requests and estimated tokens, jq spawns and time spent in jq), and the
+results are summarized per suite and overall as solve rate, time-per-task
+percentiles and cost per solved task. The report is plain JSON so runs on
+different commits can be stored and compared.
+
+The task files bundled with the repository are available as named suites
+(see SUITES), from the basic tasks up to ones no filter is expected to
+solve.
+"""
+
+import platform
+import subprocess
+import time
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timezone
+from typing import Any
+
+from src.domain import Solution, Task
+from src.executor import JQExecutor
+from src.generator import GenerationError
+from src.hedging import LatencyTracker
+from src.orchestrator import Orchestrator
+
+# Version of the JSON report layout
+REPORT_SCHEMA = 1
+
+# Task files bundled with the repository, by suite name, from its root
+SUITES = {
+    "basic": "data/tasks.json",
+    "hard": "hard_tasks.json",
+    "extreme": "extreme_tasks.json",
+    "impossible": "impossible_tasks.json",
+    "godmode": "godmode_tasks.json",
+    "ultimate": "ultimate_task.json",
+}
+DEFAULT_SUITE = "basic"
+
+# Suite name standing for every bundled suite
+ALL_SUITES = "all"
+
+
+def resolve_suites(suites: Sequence[str]) -> list[str]:
+    """
+    Map suite names to the task files they stand for.
+
+    Args:
+        suites: Suite names (keys of SUITES or ALL_SUITES) or task file
+            paths, which are kept as they are.
+
+    Returns:
+        The task files, without duplicates, in the order given.
+
+    Example:
+        >>> resolve_suites(["hard", "hard_tasks.json", "my_tasks.json"])
+        ['hard_tasks.json', 'my_tasks.json']
+    """
+    paths: list[str] = []
+    for suite in suites:
+        for path in SUITES.values() if suite == ALL_SUITES else [SUITES.get(suite, suite)]:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+@dataclass(frozen=True)
+class TaskRun:
+    """
+    Measurements of solving one task.
+
+    Attributes:
+        suite: Name of the task file the task came from.
+        task_id: The task's ID.
+        success: Whether a perfect filter was found.
+        best_score: Score of the best filter.
+        iterations: Iterations used.
+        time_sec: Wall-clock time to solve the task.
+        llm_requests: Filters requested from the generator (API or cache).
+        llm_api_calls: Requests that reached the provider.
+        prompt_tokens: Estimated prompt tokens sent.
+        response_tokens: Estimated response tokens received.
+        jq_spawns: jq processes started.
+        jq_time_sec: Time spent in jq processes.
+    """
+
+    suite: str
+    task_id: str
+    success: bool
+    best_score: float
+    iterations: int
+    time_sec: float
+    llm_requests: int
+    llm_api_calls: int
+    prompt_tokens: int
+    response_tokens: int
+    jq_spawns: int
+    jq_time_sec: float
+
+
+@dataclass(frozen=True)
+class BenchSummary:
+    """
+    Aggregate measurements over a set of task runs.
+
+    Per-solved-task figures divide the total cost (including failed tasks)
+    by the number of solved tasks, so they are None if nothing was solved.
+
+    Attributes:
+        tasks: Tasks run.
+        solved: Tasks solved.
+        solve_rate: Fraction of tasks solved.
+        total_time_sec: Sum of the per-task times.
+        time_p50_sec: Median time per task.
+        time_p95_sec: 95th percentile time per task.
+        time_p99_sec: 99th percentile time per task.
+        llm_requests_per_solved: LLM requests per solved task.
+        tokens_per_solved: Estimated prompt plus response tokens per solved task.
+        jq_spawns_per_task: Mean jq processes per task.
+        jq_time_sec: Total time spent in jq.
+        jq_time_per_task_sec: Mean time spent in jq per task.
+    """
+
+    tasks: int
+    solved: int
+    solve_rate: float
+    total_time_sec: float
+    time_p50_sec: float
+    time_p95_sec: float
+    time_p99_sec: float
+    llm_requests_per_solved: float | None
+    tokens_per_solved: float | None
+    jq_spawns_per_task: float
+    jq_time_sec: float
+    jq_time_per_task_sec: float
+
+
+def run_task(orchestrator: Orchestrator, executor: JQExecutor, suite: str, task: Task) -> TaskRun:
+    """
+    Solve one task and measure it.
+
+    LLM and jq figures are the change in the generator's and executor's
+    counters while the task was being solved, so tasks must run one at a time.
+
+    Args:
+        orchestrator: The orchestrator to solve with.
+        executor: The executor used by the orchestrator's reviewer.
+        suite: Name of the task's suite.
+        task: The task to solve.
+
+    Returns:
+        The task's measurements. A task whose generation failed counts as
+        unsolved.
+    """
+    generation_before = replace(orchestrator.generator.generation_stats)
+    jq_before = replace(executor.stats)
+    start = time.perf_counter()
+    try:
+        solution = orchestrator.solve(task)
+    except GenerationError:
+        solution = Solution(
+            task_id=task.id,
+            success=False,
+            best_filter="",
+            best_score=0.0,
+            iterations_used=0,
+            history=[],
+        )
+    elapsed = time.perf_counter() - start
+    generation = orchestrator.generator.generation_stats
+    jq = executor.stats
+
+    return TaskRun(
+        suite=suite,
+        task_id=task.id,
+        success=solution.success,
+        best_score=solution.best_score,
+        iterations=solution.iterations_used,
+        time_sec=elapsed,
+        llm_requests=generation.requests - generation_before.requests,
+        llm_api_calls=generation.api_calls - generation_before.api_calls,
+        prompt_tokens=generation.prompt_tokens - generation_before.prompt_tokens,
+        response_tokens=generation.response_tokens - generation_before.response_tokens,
+        jq_spawns=jq.spawns - jq_before.spawns,
+        jq_time_sec=jq.total_sec - jq_before.total_sec,
+    )
+
+
+def summarize(runs: Sequence[TaskRun]) -> BenchSummary:
+    """
+    Aggregate task runs.
+
+    Args:
+        runs: The runs to aggregate (may be empty).
+
+    Returns:
+        The summary; percentiles are nearest-rank.
+    """
+    count = len(runs)
+    solved = sum(1 for run in runs if run.success)
+    times = LatencyTracker(window=max(1, count))
+    for run in runs:
+        times.record(run.time_sec)
+    requests = sum(run.llm_requests for run in runs)
+    tokens = sum(run.prompt_tokens + run.response_tokens for run in runs)
+    jq_time = sum(run.jq_time_sec for run in runs)
+
+    return BenchSummary(
+        tasks=count,
+        solved=solved,
+        solve_rate=solved / count if count else 0.0,
+        total_time_sec=sum(run.time_sec for run in runs),
+        time_p50_sec=times.percentile(50),
+        time_p95_sec=times.percentile(95),
+        time_p99_sec=times.percentile(99),
+        llm_requests_per_solved=requests / solved if solved else None,
+        tokens_per_solved=tokens / solved if solved else None,
+        jq_spawns_per_task=sum(run.jq_spawns for run in runs) / count if count else 0.0,
+        jq_time_sec=jq_time,
+        jq_time_per_task_sec=jq_time / count if count else 0.0,
+    )
+
+
+def git_commit() -> str | None:
+    """The current git commit hash, or None outside a git checkout."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def build_report(
+    runs: Sequence[TaskRun],
+    *,
+    config: dict[str, Any],
+    label: str | None = None,
+) -> dict[str, Any]:
+    """
+    Build the JSON report of a benchmark.
+
+    Args:
+        runs: All task runs, in order.
+        config: Settings the results depend on (provider, model, mode, ...).
+        label: Optional free-form name for the run.
+
+    Returns:
+        A JSON-serializable report with the overall and per-suite summaries
+        and every task run.
+    """
+    suites: dict[str, list[TaskRun]] = {}
+    for run in runs:
+        suites.setdefault(run.suite, []).append(run)
+
+    return {
+        "schema": REPORT_SCHEMA,
+        "label": label,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": config,
+        "summary": asdict(summarize(runs)),
+        "suites": {name: asdict(summarize(suite_runs)) for name, suite_runs in suites.items()},
+        "tasks": [asdict(run) for run in runs],
+    }
@@ -0,0 +1,351 @@
+"""
+Content-addressed cache of LLM responses with record/replay support.
+
+This module provides the ResponseCache class used by the generator to avoid
+paying for identical LLM requests twice. Responses are keyed by a hash of
+everything that determines the completion (provider, endpoint, model,
+temperature, system prompt and user prompt), kept in an in-memory LRU and optionally
+persisted to an on-disk store with a TTL. Identical concurrent requests are
+coalesced so only one call goes out, and a strict replay mode turns every
+cache miss into an error so benchmarks can be re-run offline and
+deterministically.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a response is not in the cache."""
+
+    pass
+
+
+def make_cache_key(
+    *,
+    provider: str,
+    endpoint: str,
+    model: str,
+    temperature: float,
+    system_prompt: str,
+    prompt: str,
+) -> str:
+    """
+    Compute the content address of an LLM request.
+
+    Args:
+        provider: Provider name (e.g. 'OpenAIProvider').
+        endpoint: URL the request is sent to, so OpenAI-compatible servers
+            offering the same model name do not share responses.
+        model: Model identifier.
+        temperature: Sampling temperature.
+        system_prompt: The system prompt sent with the request.
+        prompt: The user prompt.
+
+    Returns:
+        A hex SHA-256 digest identifying the request.
+    """
+    material = json.dumps(
+        [provider, endpoint, model, temperature, system_prompt, prompt],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """
+    Counters describing cache effectiveness.
+
+    Attributes:
+        hits: Lookups answered from memory or disk.
+        misses: Lookups that required a real request.
+        coalesced: Requests that waited on an identical in-flight request.
+        writes: Responses stored in the cache.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    writes: int = 0
+
+
+class ResponseCache:
+    """
+    Two-level (memory LRU + disk) cache of LLM responses.
+
+    All methods are thread-safe.
+
+    Attributes:
+        directory: On-disk store location, or None for memory only.
+        max_entries: Maximum number of responses kept in memory.
+        ttl_sec: Age after which disk entries are ignored, or None to keep forever.
+        replay: If True, misses raise CacheMissError instead of calling the LLM.
+        stats: Hit/miss counters.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path | None = None,
+        max_entries: int = 1024,
+        ttl_sec: float | None = None,
+        replay: bool = False,
+    ) -> None:
+        """
+        Initialize the response cache.
+
+        Args:
+            directory: Directory for the on-disk store. Created if missing.
+                Defaults to None (memory only).
+            max_entries: Maximum number of in-memory entries. Defaults to 1024.
+            ttl_sec: Maximum age of disk entries in seconds. Ignored in replay
+                mode so recorded runs stay reproducible. Defaults to None.
+            replay: Strict replay mode. Defaults to False.
+
+        Raises:
+            ValueError: If replay mode is requested without a directory.
+        """
+        if replay and directory is None:
+            raise ValueError("Replay mode requires a cache directory")
+
+        self.directory = Path(directory) if directory is not None else None
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.replay = replay
+        self.stats = CacheStats()
+
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._inflight: dict[str, Future[str]] = {}
+        self._async_inflight: dict[tuple[int, str], asyncio.Future[str]] = {}
+        self._lock = threading.Lock()
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+        logger.debug(
+            "ResponseCache initialized: directory=%s, max_entries=%d, ttl_sec=%s, replay=%s",
+            self.directory,
+            max_entries,
+            ttl_sec,
+            replay,
+        )
+
+    def get(self, key: str) -> str | None:
+        """
+        Look up a cached response.
+
+        Args:
+            key: The request's content address.
+
+        Returns:
+            The cached response text, or None on a miss.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        response = self._read_disk(key)
+        if response is not None:
+            with self._lock:
+                self._remember(key, response)
+        return response
+
+    def put(self, key: str, response: str) -> None:
+        """
+        Store a response in memory and, if configured, on disk.
+
+        Args:
+            key: The request's content address.
+            response: The raw response text.
+        """
+        with self._lock:
+            self._remember(key, response)
+            self.stats.writes += 1
+        self._write_disk(key, response)
+
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> str:
+        """
+        Return the cached response, computing and storing it on a miss.
+
+        If another thread is already computing the same key, this call waits
+        for that result instead of issuing a duplicate request. Failures are
+        never cached; they propagate to every waiting caller.
+
+        Args:
+            key: The request's content address.
+            compute: Function performing the real request.
+
+        Returns:
+            The response text.
+
+        Raises:
+            CacheMissError: In replay mode, if the key is not cached.
+            Exception: Whatever compute() raises.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            with self._lock:
+                self.stats.hits += 1
+            logger.debug("Response cache hit: %s", key[:12])
+            return cached
+
+        if self.replay:
+            with self._lock:
+                self.stats.misses += 1
+            raise CacheMissError(f"No recorded response for request {key[:12]}")
+
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                self.stats.misses += 1
+            else:
+                self.stats.coalesced += 1
+
+        if not is_leader:
+            logger.debug("Coalescing with in-flight request: %s", key[:12])
+            return future.result()
+
+        try:
+            response = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.put(key, response)
+            future.set_result(response)
+            return response
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_compute_async(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """
+        Async counterpart of get_or_compute.
+
+        Identical requests from coroutines on the same event loop are
+        coalesced onto one in-flight computation.
+
+        Args:
+            key: The request's content address.
+            compute: Coroutine function performing the real request.
+
+        Returns:
+            The response text.
+
+        Raises:
+            CacheMissError: In replay mode, if the key is not cached.
+            Exception: Whatever compute() raises.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            with self._lock:
+                self.stats.hits += 1
+            logger.debug("Response cache hit: %s", key[:12])
+            return cached
+
+        if self.replay:
+            with self._lock:
+                self.stats.misses += 1
+            raise CacheMissError(f"No recorded response for request {key[:12]}")
+
+        loop = asyncio.get_running_loop()
+        inflight = self._async_inflight.get((id(loop), key))
+        if inflight is not None:
+            with self._lock:
+                self.stats.coalesced += 1
+            logger.debug("Coalescing with in-flight request: %s", key[:12])
+            return await asyncio.shield(inflight)
+
+        with self._lock:
+            self.stats.misses += 1
+        future: asyncio.Future[str] = loop.create_future()
+        self._async_inflight[(id(loop), key)] = future
+        try:
+            response = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            self.put(key, response)
+            future.set_result(response)
+            return response
+        finally:
+            self._async_inflight.pop((id(loop), key), None)
+
+    def _remember(self, key: str, response: str) -> None:
+        """Insert into the memory LRU (caller holds the lock)."""
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        """Location of a key in the on-disk store (sharded by prefix)."""
+        assert self.directory is not None
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> str | None:
+        """Read a non-expired entry from disk."""
+        if self.directory is None:
+            return None
+
+        path = self._path(key)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+            response = entry["response"]
+            created_at = float(entry["created_at"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring unreadable cache entry %s: %s", path.name, e)
+            return None
+
+        if not self.replay and self.ttl_sec is not None:
+            if time.time() - created_at > self.ttl_sec:
+                logger.debug("Cache entry expired: %s", key[:12])
+                return None
+
+        return str(response)
+
+    def _write_disk(self, key: str, response: str) -> None:
+        """Atomically write an entry to disk."""
+        if self.directory is None:
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"response": response, "created_at": time.time()}
+
+        # Write to a temp file and rename so readers never see partial entries
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            Path(tmp_name).replace(path)
+        except OSError as e:
+            logger.warning("Failed to write cache entry %s: %s", path.name, e)
+            Path(tmp_name).unlink(missing_ok=True)
@@ -0,0 +1,192 @@
+"""
+Model cascade: cheap models first, stronger models on stagnation.
+
+This module provides the ModelCascade class used by the orchestrator to start
+each task on a cheap, fast model and escalate to stronger ones only when the
+score stops improving or the same kind of error keeps coming back. Per-model
+statistics are collected so the escalation thresholds can be tuned from real
+runs, and can be accumulated across runs in a JSON file.
+"""
+
+import json
+import logging
+import threading
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from src.generator import JQGenerator
+from src.providers import provider_label
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CascadePolicy:
+    """
+    When a task escalates to the next model.
+
+    Attributes:
+        escalate_after: Iterations without score improvement on the current
+            model before escalating.
+        repeated_error_limit: Consecutive attempts with the same error type
+            (e.g. SYNTAX twice in a row) before escalating.
+    """
+
+    escalate_after: int = 2
+    repeated_error_limit: int = 2
+
+
+@dataclass
+class TierStats:
+    """
+    Outcomes of one model in the cascade.
+
+    Attributes:
+        tasks: Tasks that reached this model.
+        solved: Tasks solved while on this model.
+        attempts: Filters generated by this model.
+        escalations: Tasks that escalated away from this model.
+    """
+
+    tasks: int = 0
+    solved: int = 0
+    attempts: int = 0
+    escalations: int = 0
+
+    @property
+    def success_rate(self) -> float:
+        """Fraction of tasks reaching this model that it solved."""
+        return self.solved / self.tasks if self.tasks else 0.0
+
+
+class ModelCascade:
+    """
+    Ordered cheaper models tried before the orchestrator's own generator.
+
+    The orchestrator's generator is always the last (strongest) tier; the
+    generators given here come before it, cheapest first.
+
+    Attributes:
+        generators: Generators for the cheaper tiers, cheapest first.
+        policy: Escalation thresholds.
+        stats: Per-model outcomes, keyed by provider label (e.g. 'openai/gpt-4o-mini').
+    """
+
+    def __init__(
+        self,
+        generators: Sequence[JQGenerator],
+        policy: CascadePolicy | None = None,
+    ) -> None:
+        """
+        Initialize the cascade.
+
+        Args:
+            generators: Generators for the cheaper tiers, cheapest first.
+            policy: Escalation thresholds. Defaults to CascadePolicy().
+
+        Raises:
+            ValueError: If no generators are given.
+        """
+        if not generators:
+            raise ValueError("A model cascade needs at least one cheaper model")
+
+        self.generators = list(generators)
+        self.policy = policy or CascadePolicy()
+        self.stats: dict[str, TierStats] = {}
+        self._lock = threading.Lock()
+
+    def tiers(self, final: JQGenerator) -> list[JQGenerator]:
+        """
+        All tiers, cheapest first, ending with the given generator.
+
+        Args:
+            final: The strongest generator (the orchestrator's own).
+
+        Returns:
+            The ordered list of generators.
+        """
+        return [*self.generators, final]
+
+    def record(
+        self,
+        generator: JQGenerator,
+        *,
+        tasks: int = 0,
+        solved: int = 0,
+        attempts: int = 0,
+        escalations: int = 0,
+    ) -> None:
+        """
+        Add to a model's counters.
+
+        Args:
+            generator: The tier's generator.
+            tasks: Tasks that reached the model.
+            solved: Tasks solved on the model.
+            attempts: Filters generated.
+            escalations: Tasks escalated away from the model.
+        """
+        name = provider_label(generator.provider)
+        with self._lock:
+            stats = self.stats.setdefault(name, TierStats())
+            stats.tasks += tasks
+            stats.solved += solved
+            stats.attempts += attempts
+            stats.escalations += escalations
+
+    def save_stats(self, path: str | Path) -> None:
+        """
+        Merge this run's statistics into a JSON file.
+
+        Counts already in the file are added to, so repeated runs accumulate
+        data for tuning the escalation thresholds.
+
+        Args:
+            path: The JSON file to update (created if missing).
+
+        Raises:
+            OSError: If the file cannot be written.
+        """
+        path = Path(path)
+        totals: dict[str, TierStats] = {}
+        try:
+            existing = json.loads(path.read_text(encoding="utf-8"))
+            for name, counts in existing.get("models", {}).items():
+                totals[name] = TierStats(
+                    tasks=int(counts.get("tasks", 0)),
+                    solved=int(counts.get("solved", 0)),
+                    attempts=int(counts.get("attempts", 0)),
+                    escalations=int(counts.get("escalations", 0)),
+                )
+        except FileNotFoundError:
+            pass
+        except (ValueError, AttributeError, TypeError) as e:
+            logger.warning("Ignoring unreadable cascade stats in %s: %s", path, e)
+
+        with self._lock:
+            for name, stats in self.stats.items():
+                total = totals.setdefault(name, TierStats())
+                total.tasks += stats.tasks
+                total.solved += stats.solved
+                total.attempts += stats.attempts
+                total.escalations += stats.escalations
+
+        data = {
+            "policy": asdict(self.policy),
+            "models": {
+                name: {**asdict(stats), "success_rate": round(stats.success_rate, 4)}
+                for name, stats in totals.items()
+            },
+        }
+        path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+
+    def close(self) -> None:
+        """Release the cheaper tiers' pooled HTTP connections."""
+        for generator in self.generators:
+            generator.close()
+
+    async def aclose(self) -> None:
+        """Release the cheaper tiers' sync and async pooled HTTP connections."""
+        for generator in self.generators:
+            await generator.aclose()
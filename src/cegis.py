@@ -0,0 +1,92 @@
+"""
+Counterexample-guided example selection (CEGIS).
+
+Tasks with many examples pay for all of them in every prompt and every
+evaluation. In CEGIS mode the orchestrator starts from a small, structurally
+diverse subset of the examples: candidates are generated from and evaluated
+against that working set first, and only when a candidate passes all of it
+is it checked against the remaining examples. The first failing ones
+("counterexamples") join the working set for the next prompt, so prompt size
+and jq runs grow with the difficulty of the task rather than with its number
+of examples. A task is only solved once a candidate passes every example.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from src.compaction import infer_schema
+from src.domain import Example
+
+# Schema lines considered when comparing the structure of two examples
+_MAX_FEATURES = 200
+
+
+@dataclass(frozen=True)
+class CEGISPolicy:
+    """
+    How the working set of examples starts and grows.
+
+    Attributes:
+        initial_examples: Size of the starting working set.
+        counterexamples_per_round: Failing examples added to the working set
+            each time a candidate passes the working set but not the full set.
+    """
+
+    initial_examples: int = 2
+    counterexamples_per_round: int = 1
+
+
+def _features(example: Example) -> frozenset[str]:
+    """Structural fingerprint of an example: schema lines of input and output."""
+    return frozenset(
+        [f"in {line}" for line in infer_schema(example.input_data, _MAX_FEATURES)]
+        + [f"out {line}" for line in infer_schema(example.expected_output, _MAX_FEATURES)]
+    )
+
+
+def _distance(a: frozenset[str], b: frozenset[str]) -> float:
+    """Jaccard distance between two fingerprints."""
+    union = len(a | b)
+    return 1.0 - len(a & b) / union if union else 0.0
+
+
+def select_diverse(examples: Sequence[Example], count: int) -> list[int]:
+    """
+    Pick a small, structurally diverse subset of examples.
+
+    Starts from the structurally richest example and greedily adds the one
+    farthest from everything chosen so far (farthest-point sampling on the
+    Jaccard distance between schema fingerprints), so e.g. an example with an
+    empty array or a null field is picked before a near-duplicate of one
+    already chosen. Ties go to the earlier example.
+
+    Args:
+        examples: The task's examples.
+        count: Number of examples to pick.
+
+    Returns:
+        Indices of the chosen examples, in their original order.
+
+    Examples:
+        >>> select_diverse([Example({"a": 1}, 1), Example({"a": 2}, 2), Example({}, None)], 2)
+        [0, 2]
+    """
+    if count >= len(examples):
+        return list(range(len(examples)))
+    if count <= 0:
+        return []
+
+    features = [_features(example) for example in examples]
+    first = max(range(len(examples)), key=lambda i: (len(features[i]), -i))
+    chosen = [first]
+    nearest = [_distance(features[i], features[first]) for i in range(len(examples))]
+
+    while len(chosen) < count:
+        candidates = [i for i in range(len(examples)) if i not in chosen]
+        pick = max(candidates, key=lambda i: (nearest[i], -i))
+        chosen.append(pick)
+        nearest = [
+            min(nearest[i], _distance(features[i], features[pick])) for i in range(len(examples))
+        ]
+
+    return sorted(chosen)
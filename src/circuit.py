@@ -0,0 +1,200 @@
+"""
+Circuit breakers for LLM providers.
+
+This module provides the CircuitBreaker class used by the provider failover
+chain. A breaker watches the outcome of recent calls to one provider; when too
+many of them fail it opens and the provider is skipped, so requests go straight
+to the next healthy provider instead of burning retries on a degraded
+endpoint. After a cooldown a single probe request is let through (half-open):
+success closes the breaker again, failure reopens it.
+"""
+
+import enum
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerState(enum.Enum):
+    """State of a circuit breaker."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class BreakerPolicy:
+    """
+    When a circuit breaker opens and how long it stays open.
+
+    Attributes:
+        window: Number of recent calls considered.
+        failure_threshold: Fraction of failed calls in the window that opens
+            the breaker.
+        min_calls: Calls needed in the window before the breaker may open.
+        cooldown_sec: Time an open breaker waits before letting a probe through.
+    """
+
+    window: int = 20
+    failure_threshold: float = 0.5
+    min_calls: int = 5
+    cooldown_sec: float = 30.0
+
+
+@dataclass
+class BreakerStats:
+    """
+    Counters describing one provider's health.
+
+    Attributes:
+        calls: Completed calls (successful or failed).
+        failures: Failed calls.
+        rejected: Requests skipped because the breaker was open.
+        opened: Number of times the breaker opened.
+    """
+
+    calls: int = 0
+    failures: int = 0
+    rejected: int = 0
+    opened: int = 0
+
+
+StateListener = Callable[[str, BreakerState, BreakerState], None]
+
+
+class CircuitBreaker:
+    """
+    Thread-safe error-rate circuit breaker.
+
+    Callers ask allow_request() before each call and report the outcome with
+    record_success() or record_failure(). A call that ends without an outcome
+    (e.g. it was cancelled) must call release().
+
+    Attributes:
+        name: Label used in logs (e.g. 'openai/gpt-4o').
+        policy: Thresholds and cooldown.
+        stats: Call, failure and rejection counters.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        policy: BreakerPolicy | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_state_change: StateListener | None = None,
+    ) -> None:
+        """
+        Initialize a closed breaker.
+
+        Args:
+            name: Label used in logs.
+            policy: Thresholds and cooldown. Defaults to BreakerPolicy().
+            clock: Monotonic time source (injectable for tests).
+            on_state_change: Optional callback invoked as
+                (name, old_state, new_state) on every transition.
+        """
+        self.name = name
+        self.policy = policy or BreakerPolicy()
+        self.stats = BreakerStats()
+        self._clock = clock
+        self._on_state_change = on_state_change
+        self._state = BreakerState.CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=self.policy.window)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> BreakerState:
+        """Current state (an open breaker past its cooldown still reports OPEN)."""
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a request may be sent to the provider.
+
+        Returns:
+            True if the breaker is closed, or if it lets this request through
+            as the half-open probe.
+        """
+        with self._lock:
+            if self._state is BreakerState.CLOSED:
+                return True
+
+            if (
+                self._state is BreakerState.OPEN
+                and self._clock() - self._opened_at >= self.policy.cooldown_sec
+            ):
+                self._transition(BreakerState.HALF_OPEN)
+
+            if self._state is BreakerState.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self.stats.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        """Report a successful call."""
+        with self._lock:
+            self.stats.calls += 1
+            self._probe_in_flight = False
+            if self._state is not BreakerState.CLOSED:
+                self._outcomes.clear()
+                self._transition(BreakerState.CLOSED)
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        """Report a failed call, opening the breaker if the error rate is too high."""
+        with self._lock:
+            self.stats.calls += 1
+            self.stats.failures += 1
+            self._probe_in_flight = False
+
+            if self._state is BreakerState.HALF_OPEN:
+                self._open()
+                return
+
+            self._outcomes.append(False)
+            failed = self._outcomes.count(False)
+            if (
+                self._state is BreakerState.CLOSED
+                and len(self._outcomes) >= self.policy.min_calls
+                and failed / len(self._outcomes) >= self.policy.failure_threshold
+            ):
+                self._open()
+
+    def release(self) -> None:
+        """Give back a permit from allow_request() without reporting an outcome."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self) -> None:
+        """Open the breaker (caller holds the lock)."""
+        self._opened_at = self._clock()
+        self.stats.opened += 1
+        self._transition(BreakerState.OPEN)
+
+    def _transition(self, new_state: BreakerState) -> None:
+        """Change state, log it and notify the listener (caller holds the lock)."""
+        old_state, self._state = self._state, new_state
+        if new_state is BreakerState.OPEN:
+            logger.warning(
+                "Circuit breaker '%s' opened (%d/%d recent calls failed); skipping it for %.0fs",
+                self.name,
+                self._outcomes.count(False),
+                len(self._outcomes),
+                self.policy.cooldown_sec,
+            )
+        else:
+            logger.info("Circuit breaker '%s' is now %s", self.name, new_state.value)
+
+        if self._on_state_change is not None:
+            self._on_state_change(self.name, old_state, new_state)
@@ -6,20 +6,89 @@ both batch processing of task files and interactive single-example synthesis.
 """
 
 import argparse
+import asyncio
 import json
 import logging
+import os
+import sqlite3
 import sys
 import time
+from contextlib import ExitStack, nullcontext
+from dataclasses import asdict, replace
 from difflib import get_close_matches
 from pathlib import Path
 from typing import Any
 
+from src.apply import (
+    DEFAULT_CHUNK_TIMEOUT_SEC,
+    ENGINES,
+    INPUT_FORMATS,
+    JQ_ENGINE,
+    apply_filter,
+    parse_size,
+)
+from src.bench import (
+    ALL_SUITES,
+    DEFAULT_SUITE,
+    SUITES,
+    BenchSummary,
+    TaskRun,
+    build_report,
+    resolve_suites,
+    run_task,
+    summarize,
+)
+from src.cache import ResponseCache
+from src.cascade import CascadePolicy, ModelCascade
+from src.cegis import CEGISPolicy
 from src.colors import bold, cyan, dim, error, info, success, warning
-from src.domain import Example, Solution, Task
+from src.compaction import CompactionPolicy
+from src.domain import Example, OptimizationResult, ScalingResult, Solution, Task
 from src.executor import JQExecutor
 from src.generator import GenerationError, JQGenerator
+from src.hedging import HedgePolicy
+from src.matcher import StructuralMatcher
+from src.metrics import SynthMetrics, set_metrics
+from src.mockserver import LatencyProfile, MockLLMServer, load_script
+from src.optimizer import OptimizationPolicy
 from src.orchestrator import Orchestrator
+from src.perfhistory import (
+    DEFAULT_HISTORY_PATH,
+    IMPROVEMENT,
+    REGRESSION,
+    ComparePolicy,
+    PerfHistory,
+    compare_runs,
+    config_differences,
+    runs_from_report,
+    task_mismatch,
+)
+from src.profiling import DEFAULT_TOP, MODES, TaskProfiler
+from src.providers import (
+    FailoverProvider,
+    HTTPPoolConfig,
+    LLMProvider,
+    ProviderSpec,
+    create_member_provider,
+    create_provider,
+    prompt_cache_usage,
+    provider_label,
+)
+from src.ratelimit import RateLimiter, RetryPolicy, shared_rate_limiter
 from src.reviewer import AlgorithmicReviewer
+from src.scaling import ScalingPolicy
+from src.server import (
+    DEFAULT_FINISHED_TTL_SEC,
+    DEFAULT_MAX_FINISHED,
+    DEFAULT_MAX_QUEUE,
+    DEFAULT_WORKERS,
+    SynthesisServer,
+    SynthesisService,
+)
+from src.solutions import DEFAULT_SOLUTIONS_PATH, SolutionStore
+from src.templates import TemplateLibrary
+from src.timing import PHASES
+from src.tracing import CHROME, FORMATS, Tracer, set_tracer
 
 logger = logging.getLogger(__name__)
 
@@ -227,6 +296,20 @@ Examples:
 
   # Baseline (single-shot) mode
   jq-synth --task nested-field --baseline
+
+  # Benchmark task suites (see 'jq-synth bench --help')
+  jq-synth bench --suite basic --suite hard --replay --cache-dir .llm-cache --json bench.json
+
+  # Store benchmark runs and flag significant regressions between the last two
+  jq-synth bench --mock --mock-script responses.json --store
+  jq-synth compare previous latest
+
+  # Local synthesis service with an HTTP API (see 'jq-synth serve --help')
+  jq-synth serve --port 8765 --workers 4
+
+  # Apply a solved task's filter to large NDJSON files (see 'jq-synth apply --help')
+  jq-synth --task nested-field --save-solutions
+  jq-synth apply --task nested-field events-*.ndjson -o out.ndjson
 """,
     )
 
@@ -259,6 +342,65 @@ Examples:
         help="Single-shot mode (max_iterations=1)",
     )
 
+    parser.add_argument(
+        "--no-matcher",
+        action="store_true",
+        help="Always use the LLM, even for tasks solvable by structural path matching",
+    )
+
+    parser.add_argument(
+        "--no-templates",
+        action="store_true",
+        help="Skip the built-in library of common jq idioms before calling the LLM",
+    )
+
+    parser.add_argument(
+        "--cegis",
+        action="store_true",
+        help="Counterexample-guided mode: prompt with a few diverse examples and add "
+        "failing ones as needed; success still requires passing every example",
+    )
+
+    parser.add_argument(
+        "--cegis-initial",
+        type=int,
+        default=CEGISPolicy.initial_examples,
+        help=f"Examples in the initial CEGIS working set (default: {CEGISPolicy.initial_examples})",
+    )
+
+    parser.add_argument(
+        "--cegis-step",
+        type=int,
+        default=CEGISPolicy.counterexamples_per_round,
+        help="Counterexamples added to the working set per failed check "
+        f"(default: {CEGISPolicy.counterexamples_per_round})",
+    )
+
+    parser.add_argument(
+        "--scaling-review",
+        action="store_true",
+        help="Run filters that pass every example on inputs with arrays grown to "
+        f"{ScalingPolicy.sizes[0]} and {ScalingPolicy.sizes[1]} elements; superlinear ones are "
+        "penalized and the generator is asked for a faster filter",
+    )
+
+    parser.add_argument(
+        "--max-scaling-exponent",
+        type=float,
+        default=ScalingPolicy.max_exponent,
+        metavar="K",
+        help="Growth exponent of run time or output size above which a filter is superlinear "
+        f"(default: {ScalingPolicy.max_exponent})",
+    )
+
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="After a task is solved, look for a faster filter with the same output (rule-based "
+        "rewrites and one LLM proposal, checked on the examples and generated inputs and "
+        f"benchmarked with arrays grown to {OptimizationPolicy.size} elements)",
+    )
+
     # Interactive mode
     parser.add_argument(
         "-i",
@@ -299,7 +441,160 @@ Examples:
     parser.add_argument(
         "--base-url",
         type=str,
-        help="Base URL for OpenAI-compatible providers (default: from LLM_BASE_URL env)",
+        help="Base URL of an OpenAI- or Anthropic-compatible API, e.g. a local mock server "
+        "(default: from LLM_BASE_URL env for openai, ANTHROPIC_BASE_URL for anthropic)",
+    )
+
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Use HTTP/2 for LLM requests (requires: pip install 'jq-by-example[http2]')",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream LLM responses and stop reading at the first complete filter",
+    )
+
+    parser.add_argument(
+        "--max-prompt-tokens",
+        type=int,
+        default=CompactionPolicy.max_prompt_tokens,
+        help="Compact large examples (sampled arrays, schema summary) when a prompt's "
+        "task/example block is estimated above this many tokens; 0 always sends full examples "
+        f"(default: {CompactionPolicy.max_prompt_tokens})",
+    )
+
+    parser.add_argument(
+        "--prompt-cache",
+        action="store_true",
+        help="Mark the static task/example prompt prefix as cacheable (Anthropic "
+        "cache_control; OpenAI caches stable prefixes automatically)",
+    )
+
+    parser.add_argument(
+        "--conversation",
+        action="store_true",
+        help="Refine each task in one multi-turn conversation (previous filters as "
+        "assistant turns, feedback as user turns) instead of a fresh prompt per iteration",
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Solve up to N tasks at once on a single asyncio event loop (default: 1)",
+    )
+
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=HTTPPoolConfig.max_connections,
+        help=f"Maximum pooled HTTP connections per provider (default: {HTTPPoolConfig.max_connections})",
+    )
+
+    parser.add_argument(
+        "--fallback",
+        action="append",
+        metavar="PROVIDER[:MODEL][@BASE_URL]",
+        help="Fail over to this provider when the previous ones are unhealthy; "
+        "repeat to build an ordered chain (each provider gets a circuit breaker)",
+    )
+
+    # Model cascade
+    parser.add_argument(
+        "--cascade",
+        action="append",
+        metavar="PROVIDER[:MODEL][@BASE_URL]",
+        help="Start each task on this cheaper model and escalate to --model when it "
+        "gets stuck; repeat for several tiers, cheapest first",
+    )
+
+    parser.add_argument(
+        "--escalate-after",
+        type=int,
+        default=CascadePolicy.escalate_after,
+        help="Escalate after this many iterations without score improvement "
+        f"(default: {CascadePolicy.escalate_after})",
+    )
+
+    parser.add_argument(
+        "--escalate-on-repeat",
+        type=int,
+        default=CascadePolicy.repeated_error_limit,
+        help="Escalate when the same error type occurs this many times in a row "
+        f"(default: {CascadePolicy.repeated_error_limit})",
+    )
+
+    parser.add_argument(
+        "--cascade-stats",
+        type=str,
+        metavar="PATH",
+        help="Accumulate per-model cascade success rates in this JSON file",
+    )
+
+    # Hedged requests
+    parser.add_argument(
+        "--hedge-provider",
+        type=str,
+        choices=["openai", "anthropic"],
+        help="Send slow requests again to this provider and take the first answer "
+        "(default: same provider as --provider)",
+    )
+
+    parser.add_argument(
+        "--hedge-model",
+        type=str,
+        help="Model for hedge requests; setting this or --hedge-provider enables hedging",
+    )
+
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=HedgePolicy.percentile,
+        help="Hedge once the primary is slower than this percentile of its recent "
+        f"latencies (default: {HedgePolicy.percentile:g})",
+    )
+
+    # Retries and rate limiting
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=RetryPolicy.max_attempts,
+        help="Attempts per LLM request on 429/5xx/connection errors, with exponential "
+        f"backoff (default: {RetryPolicy.max_attempts})",
+    )
+
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        help="Client-side limit on LLM requests per minute, shared by all workers",
+    )
+
+    parser.add_argument(
+        "--tpm",
+        type=float,
+        help="Client-side limit on LLM tokens per minute, shared by all workers",
+    )
+
+    # Response caching
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Record LLM responses in this directory and reuse them for identical requests",
+    )
+
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        help="Ignore cached responses older than this many seconds (default: never expire)",
+    )
+
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Offline replay from --cache-dir; fail on any request that was not recorded",
     )
 
     # Output control
@@ -316,6 +611,72 @@ Examples:
         help="Enable debug logging (shows detailed internal state)",
     )
 
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Record time per phase (prompt build, API call, extraction, jq execution, "
+        "parsing, analysis) and show a breakdown",
+    )
+
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write spans (solve, iterations, generation, HTTP calls, jq runs) to a trace file",
+    )
+
+    parser.add_argument(
+        "--trace-format",
+        choices=FORMATS,
+        default=CHROME,
+        help="Trace file format: Chrome trace events for Perfetto/chrome://tracing, "
+        "or OTLP/JSON (default: chrome)",
+    )
+
+    parser.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        help="Write Prometheus metrics (jq spawns, LLM requests, tokens, cache hits, "
+        "iterations, solve rate) to a file when the run ends",
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="PORT",
+        help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics during the run",
+    )
+
+    parser.add_argument(
+        "--profile",
+        choices=MODES,
+        help="Profile each task's solve with cProfile (cpu, CPU time of the solving thread) or "
+        "tracemalloc (mem); tasks run one at a time",
+    )
+
+    parser.add_argument(
+        "--profile-dir",
+        default="profiles",
+        metavar="DIR",
+        help="Directory for per-task profiles and the merged report (default: profiles)",
+    )
+
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=DEFAULT_TOP,
+        metavar="N",
+        help=f"Functions or allocation sites listed in the reports (default: {DEFAULT_TOP})",
+    )
+
+    parser.add_argument(
+        "--save-solutions",
+        nargs="?",
+        const=DEFAULT_SOLUTIONS_PATH,
+        metavar="PATH",
+        help="Add the filters of solved tasks to this solution store, for 'jq-synth apply "
+        f"--task' (default: {DEFAULT_SOLUTIONS_PATH})",
+    )
+
     # Task management
     parser.add_argument(
         "--list-tasks",
@@ -326,191 +687,1182 @@ Examples:
     return parser.parse_args(args)
 
 
-def _setup_logging(verbose: bool, debug: bool) -> None:
+def _add_offline_provider_args(parser: argparse.ArgumentParser) -> None:
     """
-    Configure logging based on verbosity level.
+    Add the provider options of the bench and serve subcommands.
+
+    Besides a live provider, answers can come from a response cache
+    (--replay) or an in-process mock LLM server (--mock).
 
     Args:
-        verbose: If True, set level to INFO; otherwise WARNING.
-        debug: If True, set level to DEBUG (overrides verbose).
+        parser: Parser of the subcommand.
     """
-    if debug:
-        level = logging.DEBUG
-    elif verbose:
-        level = logging.INFO
-    else:
-        level = logging.WARNING
+    provider = parser.add_mutually_exclusive_group()
+    provider.add_argument(
+        "--replay",
+        action="store_true",
+        help="Answer only from responses recorded in --cache-dir (no API calls)",
+    )
+    provider.add_argument(
+        "--mock",
+        action="store_true",
+        help="Answer from an in-process mock LLM server (see --mock-script)",
+    )
+    parser.add_argument("--cache-dir", type=str, help="Response cache directory")
+    parser.add_argument(
+        "--mock-script",
+        metavar="PATH",
+        help="Scripted responses for --mock (JSON, see src/mockserver.py)",
+    )
+    parser.add_argument(
+        "--mock-latency",
+        default="fixed:0",
+        metavar="DIST:CENTER[,SPREAD]",
+        help="Latency distribution of the mock server (default: fixed:0)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the mock server")
+    parser.add_argument(
+        "--provider",
+        choices=["openai", "anthropic"],
+        help="LLM provider type (default: from LLM_PROVIDER env or 'openai')",
+    )
+    parser.add_argument("--model", type=str, help="Model identifier")
+    parser.add_argument("--base-url", type=str, help="Base URL of the provider's API")
 
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
+
+def _parse_bench_args(args: list[str]) -> argparse.Namespace:
+    """
+    Parse arguments of the bench subcommand.
+
+    Args:
+        args: Arguments after 'bench'.
+
+    Returns:
+        Parsed argument namespace.
+    """
+    parser = argparse.ArgumentParser(
+        prog="jq-synth bench",
+        description="Benchmark task suites: solve rate, time per task, LLM and jq cost",
+    )
+    parser.add_argument(
+        "--suite",
+        action="append",
+        metavar="NAME|TASKS_FILE",
+        help=f"Bundled suite ({', '.join(SUITES)} or '{ALL_SUITES}') or task file to benchmark; "
+        f"repeat for several suites (default: {DEFAULT_SUITE})",
+    )
+    parser.add_argument(
+        "-t",
+        "--task",
+        action="append",
+        metavar="ID",
+        help="Only run these task IDs; repeatable (default: all tasks)",
+    )
+    parser.add_argument(
+        "--max-iters", type=int, default=10, help="Maximum iterations per task (default: 10)"
     )
+    parser.add_argument("--no-matcher", action="store_true", help="Disable structural matching")
+    parser.add_argument("--no-templates", action="store_true", help="Disable the template library")
 
+    _add_offline_provider_args(parser)
 
-def _create_interactive_task(
-    input_json: str,
-    output_json: str,
-    description: str,
-) -> Task:
+    parser.add_argument(
+        "--json",
+        metavar="PATH",
+        help="Write the machine-readable report to PATH ('-' for stdout)",
+    )
+    parser.add_argument(
+        "--store",
+        nargs="?",
+        const=DEFAULT_HISTORY_PATH,
+        metavar="DB",
+        help=f"Add the results to this sqlite performance history (default: {DEFAULT_HISTORY_PATH})",
+    )
+    parser.add_argument("--label", type=str, help="Name stored with the report")
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    return parser.parse_args(args)
+
+
+def _parse_compare_args(args: list[str]) -> argparse.Namespace:
+    """
+    Parse arguments of the compare subcommand.
+
+    Args:
+        args: Arguments after 'compare'.
+
+    Returns:
+        Parsed argument namespace.
+    """
+    parser = argparse.ArgumentParser(
+        prog="jq-synth compare",
+        description=(
+            "Flag statistically significant regressions in latency, cost or solve rate "
+            "between two benchmark runs"
+        ),
+    )
+    parser.add_argument(
+        "baseline",
+        nargs="?",
+        default="previous",
+        help="Reference run: ID, label, commit prefix, 'latest', 'previous' or a bench "
+        "--json report file (default: previous)",
+    )
+    parser.add_argument(
+        "candidate",
+        nargs="?",
+        default="latest",
+        help="Run to check, in the same forms (default: latest)",
+    )
+    parser.add_argument(
+        "--store",
+        default=DEFAULT_HISTORY_PATH,
+        metavar="DB",
+        help=f"Performance history database (default: {DEFAULT_HISTORY_PATH})",
+    )
+    parser.add_argument("--list", action="store_true", help="List stored runs and exit")
+    parser.add_argument(
+        "--alpha", type=float, default=0.05, help="Significance level (default: 0.05)"
+    )
+    parser.add_argument(
+        "--min-effect",
+        type=float,
+        default=0.05,
+        help="Ignore changes smaller than this fraction of the baseline mean, or this "
+        "absolute solve rate difference (default: 0.05)",
+    )
+    parser.add_argument(
+        "--resamples", type=int, default=2000, help="Bootstrap resamples (default: 2000)"
+    )
+    parser.add_argument(
+        "--allow-mismatch",
+        action="store_true",
+        help="Compare the tasks both runs have even if their task sets differ",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    return parser.parse_args(args)
+
+
+def _parse_serve_args(args: list[str]) -> argparse.Namespace:
+    """
+    Parse arguments of the serve subcommand.
+
+    Args:
+        args: Arguments after 'serve'.
+
+    Returns:
+        Parsed argument namespace.
+    """
+    parser = argparse.ArgumentParser(
+        prog="jq-synth serve",
+        description="Run a local synthesis service: submit tasks over HTTP, follow their "
+        "progress as server-sent events",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Interface (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port (default: 8765)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Tasks solved at the same time (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=DEFAULT_MAX_QUEUE,
+        help=f"Waiting tasks accepted before refusing with 503 (default: {DEFAULT_MAX_QUEUE})",
+    )
+    parser.add_argument(
+        "--max-iters",
+        type=int,
+        default=10,
+        help="Default and maximum iterations per task (default: 10)",
+    )
+    parser.add_argument(
+        "--max-finished",
+        type=int,
+        default=DEFAULT_MAX_FINISHED,
+        metavar="N",
+        help="Finished jobs kept for GET /jobs/{id}; older ones answer 410 "
+        f"(default: {DEFAULT_MAX_FINISHED})",
+    )
+    parser.add_argument(
+        "--finished-ttl",
+        type=float,
+        default=DEFAULT_FINISHED_TTL_SEC,
+        metavar="SEC",
+        help="Seconds finished jobs are kept; 0 keeps them until --max-finished evicts them "
+        f"(default: {DEFAULT_FINISHED_TTL_SEC:g})",
+    )
+    parser.add_argument("--no-matcher", action="store_true", help="Disable structural matching")
+    parser.add_argument("--no-templates", action="store_true", help="Disable the template library")
+    _add_offline_provider_args(parser)
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log jobs as they run")
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    return parser.parse_args(args)
+
+
+def _parse_apply_args(args: list[str]) -> argparse.Namespace:
+    """
+    Parse arguments of the apply subcommand.
+
+    Args:
+        args: Arguments after 'apply'.
+
+    Returns:
+        Parsed argument namespace.
+    """
+    parser = argparse.ArgumentParser(
+        prog="jq-synth apply",
+        description="Run a filter over NDJSON or JSON text sequence files with a pool of worker "
+        "processes, through jq or compiled to Python",
+    )
+    parser.add_argument("files", nargs="+", metavar="FILE", help="Input files")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-f", "--filter", help="The jq filter to apply")
+    source.add_argument(
+        "-t", "--task", metavar="ID", help="Apply the stored filter of this task (see --solutions)"
+    )
+    parser.add_argument(
+        "--solutions",
+        default=DEFAULT_SOLUTIONS_PATH,
+        metavar="PATH",
+        help=f"Solution store written by --save-solutions (default: {DEFAULT_SOLUTIONS_PATH})",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["auto", *INPUT_FORMATS],
+        default="auto",
+        help="Input format; auto tells them apart by a leading record separator (default: auto)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=JQ_ENGINE,
+        help="Run the filter with jq, compiled to Python (for the supported jq subset; "
+        "column-wise with NumPy if installed; needs jq 1.6), or auto: Python where supported "
+        f"(default: {JQ_ENGINE})",
+    )
+    parser.add_argument("-o", "--output", metavar="PATH", help="Output file (default: stdout)")
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="Write chunks as they finish instead of in input order",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        default="4M",
+        metavar="SIZE",
+        help="Target bytes per chunk, e.g. 512K or 16M (default: 4M)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_CHUNK_TIMEOUT_SEC,
+        metavar="SEC",
+        help=f"jq time limit per chunk (default: {DEFAULT_CHUNK_TIMEOUT_SEC:g})",
+    )
+    parser.add_argument(
+        "--max-output",
+        default="256M",
+        metavar="SIZE",
+        help="jq output limit per chunk (default: 256M)",
+    )
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    return parser.parse_args(args)
+
+
+def _setup_logging(verbose: bool, debug: bool) -> None:
+    """
+    Configure logging based on verbosity level.
+
+    Args:
+        verbose: If True, set level to INFO; otherwise WARNING.
+        debug: If True, set level to DEBUG (overrides verbose).
+    """
+    if debug:
+        level = logging.DEBUG
+    elif verbose:
+        level = logging.INFO
+    else:
+        level = logging.WARNING
+
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+
+def _create_interactive_task(
+    input_json: str,
+    output_json: str,
+    description: str,
+) -> Task:
+    """
+    Create a Task from interactive mode arguments.
+
+    Args:
+        input_json: JSON string for input data.
+        output_json: JSON string for expected output.
+        description: Task description.
+
+    Returns:
+        Task with a single example.
+
+    Raises:
+        json.JSONDecodeError: If JSON strings are invalid.
+    """
+    input_data: Any = json.loads(input_json)
+    expected_output: Any = json.loads(output_json)
+
+    example = Example(input_data=input_data, expected_output=expected_output)
+
+    return Task(
+        id="interactive",
+        description=description,
+        examples=[example],
+    )
+
+
+def _format_score(score: float) -> str:
+    """Format score with color based on value."""
+    if score >= 0.999:  # Perfect score per domain model (Attempt.is_perfect)
+        return success(f"{score:.3f}")
+    elif score >= 0.8:
+        return warning(f"{score:.3f}")
+    else:
+        return error(f"{score:.3f}")
+
+
+def _print_solution(solution: Solution, verbose: bool = False) -> None:
+    """
+    Print a solution to stdout.
+
+    Args:
+        solution: The solution to print.
+        verbose: If True, print additional details.
+    """
+    status = success("✓") if solution.success else error("✗")
+    print(f"\n{status} Task: {bold(solution.task_id)}")
+    print(f"  Filter: {cyan(solution.best_filter)}")
+    print(f"  Score: {_format_score(solution.best_score)}")
+    print(f"  Iterations: {solution.iterations_used}")
+
+    if solution.timings:
+        print(f"  Phases: {_format_timings(solution.timings)}")
+
+    if solution.scaling is not None:
+        print(f"  Scaling: {_format_scaling(solution.scaling)}")
+
+    if solution.optimization is not None:
+        print(f"  Optimized: {_format_optimization(solution.optimization)}")
+
+    if verbose and solution.history:
+        print(f"  {dim('History:')}")
+        for attempt in solution.history:
+            score_str = _format_score(attempt.aggregated_score)
+            print(
+                f"    {dim(f'[{attempt.iteration}]')} score={score_str} "
+                f"error={attempt.primary_error.value} filter='{dim(attempt.filter_code)}'"
+            )
+            if attempt.timings:
+                print(f"        {dim(_format_timings(attempt.timings))}")
+
+
+def _format_scaling(scaling: ScalingResult) -> str:
+    """Format a scaling measurement as 'time ~n^1.0, output ~n^1.0 (n=200..800)'."""
+    if scaling.timed_out:
+        text = "timed out"
+    else:
+        time_exponent = scaling.time_exponent
+        output_exponent = scaling.output_exponent
+        text = (
+            f"time {'negligible' if time_exponent is None else f'~n^{time_exponent:.1f}'}, "
+            f"output {'empty' if output_exponent is None else f'~n^{output_exponent:.1f}'}"
+        )
+    text += f" (n={scaling.sizes[0]}..{scaling.sizes[1]})"
+    return warning(f"{text}, superlinear") if scaling.superlinear else text
+
+
+def _format_optimization(optimization: OptimizationResult) -> str:
+    """Format an optimizer run as '12.3x faster at n=1000 (map-fusion), was: <filter>'."""
+    if optimization.best_filter == optimization.original_filter:
+        return dim(
+            f"no faster equivalent among {optimization.candidates} alternatives "
+            f"({optimization.equivalent} equivalent)"
+        )
+    bound = ">=" if optimization.timed_out else ""
+    return (
+        f"{success(f'{bound}{optimization.speedup:.1f}x faster')} at n={optimization.size} "
+        f"({optimization.source}), was: {dim(optimization.original_filter)}"
+    )
+
+
+def _format_timings(timings: dict[str, float]) -> str:
+    """Format per-phase seconds as 'api_call 1.20s, execution 0.05s, ...'."""
+    return ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items())
+
+
+def _print_timing_breakdown(solutions: list[Solution], total_time_sec: float) -> None:
+    """
+    Print the time spent per phase, summed over all tasks.
+
+    Args:
+        solutions: Solutions with recorded timings.
+        total_time_sec: Wall-clock time of the run.
+    """
+    totals: dict[str, float] = {}
+    for solution in solutions:
+        for name, seconds in solution.timings.items():
+            totals[name] = totals.get(name, 0.0) + seconds
+    if not totals:
+        return
+
+    recorded = sum(totals.values())
+    count = len(solutions)
+    print("\n" + "=" * 60)
+    print(bold("Phase breakdown"))
+    print("=" * 60)
+    print(f"{'Phase':<16} {'Total':>10} {'Per task':>10} {'Share':>8}")
+    print("-" * 60)
+    for name in [*PHASES, *(n for n in totals if n not in PHASES)]:
+        if name not in totals:
+            continue
+        seconds = totals[name]
+        share = seconds / recorded if recorded > 0 else 0.0
+        print(f"{name:<16} {seconds:>9.3f}s {seconds / count:>9.3f}s {share:>8.1%}")
+    print("-" * 60)
+    # Concurrent tasks and examples overlap, so phases can exceed wall time
+    print(f"Recorded {recorded:.3f}s in phases, {total_time_sec:.3f}s wall clock")
+
+
+def _estimate_difficulty(task: Task) -> str:
+    """Estimate task difficulty based on heuristics."""
+    desc_lower = task.description.lower()
+
+    if any(word in desc_lower for word in ["group", "aggregate", "reduce", "sum all"]):
+        return "advanced"
+    elif any(word in desc_lower for word in ["filter", "select", "extract multiple", "skip"]):
+        return "intermediate"
+    else:
+        return "basic"
+
+
+def _list_tasks(tasks: list[Task]) -> None:
+    """
+    Display all available tasks in a formatted table.
+
+    Args:
+        tasks: List of Task objects to display.
+    """
+    print(f"\n{bold(f'Available Tasks ({len(tasks)})')}\n")
+
+    # Group by difficulty
+    basic = []
+    intermediate = []
+    advanced = []
+
+    for task in tasks:
+        difficulty = _estimate_difficulty(task)
+        if difficulty == "basic":
+            basic.append(task)
+        elif difficulty == "intermediate":
+            intermediate.append(task)
+        else:
+            advanced.append(task)
+
+    def print_group(name: str, tasks_list: list[Task]) -> None:
+        if not tasks_list:
+            return
+        print(f"{bold(name)} ({len(tasks_list)}):")
+        for task in tasks_list:
+            examples_text = f"{len(task.examples)} example"
+            if len(task.examples) != 1:
+                examples_text += "s"
+            # Truncate description if too long
+            desc = task.description[:60]
+            if len(task.description) > 60:
+                desc += "..."
+            print(f"  • {cyan(f'{task.id:<20}')} {desc} ({dim(examples_text)})")
+        print()
+
+    print_group("Basic", basic)
+    print_group("Intermediate", intermediate)
+    print_group("Advanced", advanced)
+
+    print(dim("Usage: jq-synth --task <task-id>"))
+    print(dim("Run all: jq-synth --task all"))
+    print()
+
+
+def _print_summary_table(solutions: list[Solution]) -> None:
+    """
+    Print a summary table for multiple solutions.
+
+    Args:
+        solutions: List of solutions to summarize.
+    """
+    if len(solutions) <= 1:
+        return
+
+    print("\n" + "=" * 60)
+    print(bold("Summary"))
+    print("=" * 60)
+
+    # Header
+    print(f"{'Task ID':<25} {'Status':<10} {'Score':<10} {'Iters':<10}")
+    print("-" * 60)
+
+    # Rows
+    for sol in solutions:
+        if sol.success:
+            status = success("PASS")
+        else:
+            status = error("FAIL")
+        score_str = _format_score(sol.best_score)
+        print(f"{sol.task_id:<25} {status:<20} {score_str:<20} {sol.iterations_used:<10}")
+
+    # Footer
+    print("-" * 60)
+    passed = sum(1 for s in solutions if s.success)
+    total = len(solutions)
+    pass_rate = 100 * passed / total if total > 0 else 0
+    if passed == total:
+        summary_str = success(f"{passed}/{total} passed ({pass_rate:.0f}%)")
+    elif passed == 0:
+        summary_str = error(f"{passed}/{total} passed ({pass_rate:.0f}%)")
+    else:
+        summary_str = warning(f"{passed}/{total} passed ({pass_rate:.0f}%)")
+    print(f"Total: {summary_str}")
+
+
+def _run_tasks(
+    orchestrator: Orchestrator,
+    tasks: list[Task],
+    max_iterations: int,
+    verbose: bool = False,
+    profiler: TaskProfiler | None = None,
+) -> tuple[list[Solution], float]:
+    """
+    Solve tasks one by one, printing each result.
+
+    Args:
+        orchestrator: The orchestrator used to solve each task.
+        tasks: Tasks to solve.
+        max_iterations: Iteration limit (for display only).
+        verbose: If True, print attempt history for each solution.
+        profiler: If given, each solve is profiled as one task.
+
+    Returns:
+        Tuple of (solutions in task order, total elapsed seconds).
+    """
+    solutions: list[Solution] = []
+    total_time_sec = 0.0
+
+    for task_num, task in enumerate(tasks, 1):
+        print(f"\n{'=' * 60}")
+        print(f"[{task_num}/{len(tasks)}] Solving: {task.id}")
+        print(f"Description: {task.description}")
+        print(f"Examples: {len(task.examples)}")
+        print(f"Max iterations: {max_iterations}")
+        print(f"{'=' * 60}")
+
+        start_time = time.perf_counter()
+
+        try:
+            with profiler.profile(task.id) if profiler is not None else nullcontext():
+                solution = orchestrator.solve(task, verbose=verbose)
+            solutions.append(solution)
+
+            elapsed = time.perf_counter() - start_time
+            total_time_sec += elapsed
+
+            _print_solution(solution, verbose=verbose)
+            print(f"  Time: {elapsed:.2f}s")
+
+        except GenerationError as e:
+            elapsed = time.perf_counter() - start_time
+            total_time_sec += elapsed
+
+            logger.error("Generation failed for task %s: %s", task.id, e)
+            print(f"\n✗ Error: {e}")
+
+            # Create a failed solution
+            solutions.append(
+                Solution(
+                    task_id=task.id,
+                    success=False,
+                    best_filter="",
+                    best_score=0.0,
+                    iterations_used=0,
+                    history=[],
+                )
+            )
+            _print_solution(solutions[-1], verbose=verbose)
+            print(f"  Time: {elapsed:.2f}s")
+
+    return solutions, total_time_sec
+
+
+async def _run_tasks_async(
+    orchestrator: Orchestrator,
+    generator: JQGenerator,
+    tasks: list[Task],
+    max_iterations: int,
+    *,
+    concurrency: int,
+    verbose: bool = False,
+    cascade: ModelCascade | None = None,
+) -> tuple[list[Solution], float]:
+    """
+    Solve tasks concurrently on one event loop, printing each result as it finishes.
+
+    Args:
+        orchestrator: The orchestrator used to solve each task.
+        generator: The generator whose async connections are closed at the end.
+        tasks: Tasks to solve.
+        max_iterations: Iteration limit (for display only).
+        concurrency: Maximum number of tasks solved at the same time.
+        verbose: If True, print attempt history for each solution.
+        cascade: Optional model cascade whose connections are closed at the end.
+
+    Returns:
+        Tuple of (solutions in task order, total wall-clock seconds).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    print(
+        f"Solving {len(tasks)} tasks with concurrency {concurrency} "
+        f"(max iterations: {max_iterations})"
+    )
+
+    async def solve_one(task_num: int, task: Task) -> Solution:
+        async with semaphore:
+            start_time = time.perf_counter()
+            try:
+                solution = await orchestrator.solve_async(task, verbose=verbose)
+            except GenerationError as e:
+                logger.error("Generation failed for task %s: %s", task.id, e)
+                solution = Solution(
+                    task_id=task.id,
+                    success=False,
+                    best_filter="",
+                    best_score=0.0,
+                    iterations_used=0,
+                    history=[],
+                )
+            elapsed = time.perf_counter() - start_time
+
+        print(f"\n{'=' * 60}")
+        print(f"[{task_num}/{len(tasks)}] Solved: {task.id}")
+        print(f"{'=' * 60}")
+        _print_solution(solution, verbose=verbose)
+        print(f"  Time: {elapsed:.2f}s")
+        return solution
+
+    start_time = time.perf_counter()
+    async with generator:
+        try:
+            solutions = await asyncio.gather(
+                *(solve_one(task_num, task) for task_num, task in enumerate(tasks, 1))
+            )
+        finally:
+            if cascade is not None:
+                await cascade.aclose()
+    return list(solutions), time.perf_counter() - start_time
+
+
+def _format_bench_summary(name: str, summary: BenchSummary) -> str:
+    """Format one line of the benchmark summary."""
+    if summary.llm_requests_per_solved is None or summary.tokens_per_solved is None:
+        cost = "nothing solved"
+    else:
+        cost = (
+            f"{summary.llm_requests_per_solved:.1f} LLM requests and "
+            f"{summary.tokens_per_solved:.0f} tokens per solved task"
+        )
+    return (
+        f"{name}: {summary.solved}/{summary.tasks} solved ({summary.solve_rate:.1%}); "
+        f"time per task p50 {summary.time_p50_sec:.2f}s, p95 {summary.time_p95_sec:.2f}s, "
+        f"p99 {summary.time_p99_sec:.2f}s; {cost}; "
+        f"{summary.jq_spawns_per_task:.1f} jq spawns per task, "
+        f"{summary.jq_time_sec:.2f}s in jq"
+    )
+
+
+def _start_offline_generator(
+    parsed: argparse.Namespace,
+) -> tuple[JQGenerator, MockLLMServer | None] | None:
+    """
+    Create the generator of bench or serve from their provider options.
+
+    Args:
+        parsed: Parsed options (see _add_offline_provider_args).
+
+    Returns:
+        The generator and the mock server it talks to (started; the caller
+        stops it), or None after printing an error.
+    """
+    server: MockLLMServer | None = None
+    try:
+        cache = None
+        if parsed.cache_dir or parsed.replay:
+            cache = ResponseCache(directory=parsed.cache_dir, replay=parsed.replay)
+        if parsed.mock:
+            rules, default = load_script(parsed.mock_script) if parsed.mock_script else ([], None)
+            server = MockLLMServer(
+                rules=rules,
+                default_response=default or ".",
+                latency=LatencyProfile.parse(parsed.mock_latency),
+                seed=parsed.seed,
+            ).start()
+        generator = JQGenerator(
+            provider_type=parsed.provider,
+            # Neither the mock nor replay checks credentials
+            api_key="mock" if parsed.mock else "replay" if parsed.replay else None,
+            model=parsed.model,
+            base_url=server.url if server is not None else parsed.base_url,
+            cache=cache,
+        )
+    except (ValueError, OSError) as e:
+        if server is not None:
+            server.stop()
+        if "api key" in str(e).lower():
+            print(_format_api_key_error(parsed.provider or "openai"), file=sys.stderr)
+        else:
+            print(error(f"Error: {e}"), file=sys.stderr)
+        return None
+    return generator, server
+
+
+def _bench(args: list[str]) -> int:
+    """
+    Run the bench subcommand.
+
+    Args:
+        args: Arguments after 'bench'.
+
+    Returns:
+        0 once the benchmark completed (whatever the solve rate), 1 on
+        invalid options or if the report cannot be written.
+    """
+    parsed = _parse_bench_args(args)
+    _setup_logging(False, parsed.debug)
+    # With the report on stdout, progress goes to stderr
+    out = sys.stderr if parsed.json == "-" else sys.stdout
+
+    suites: list[tuple[str, list[Task]]] = []
+    for path in resolve_suites(parsed.suite or [DEFAULT_SUITE]):
+        try:
+            tasks = load_tasks(path)
+        except FileNotFoundError:
+            print(error(f"Error: Tasks file not found: {path}"), file=sys.stderr)
+            return 1
+        except (json.JSONDecodeError, KeyError) as e:
+            print(error(f"Error: Invalid tasks file {path}: {e}"), file=sys.stderr)
+            return 1
+        if parsed.task:
+            tasks = [task for task in tasks if task.id in parsed.task]
+        suites.append((path, tasks))
+
+    try:
+        executor = JQExecutor()
+    except RuntimeError:
+        print(_format_jq_not_found_error(), file=sys.stderr)
+        return 1
+
+    started = _start_offline_generator(parsed)
+    if started is None:
+        return 1
+    generator, server = started
+
+    max_iterations = max(1, parsed.max_iters)
+    orchestrator = Orchestrator(
+        generator=generator,
+        reviewer=AlgorithmicReviewer(executor),
+        max_iterations=max_iterations,
+        matcher=None if parsed.no_matcher else StructuralMatcher(),
+        templates=None if parsed.no_templates else TemplateLibrary(),
+    )
+
+    runs: list[TaskRun] = []
+    try:
+        with generator:
+            for path, tasks in suites:
+                print(bold(f"Suite {path} ({len(tasks)} tasks)"), file=out)
+                for task in tasks:
+                    run = run_task(orchestrator, executor, path, task)
+                    runs.append(run)
+                    mark = success("✓") if run.success else error("✗")
+                    print(
+                        f"  {mark} {run.task_id}: {run.iterations} iterations, "
+                        f"{run.time_sec:.2f}s, {run.llm_requests} LLM requests, "
+                        f"{run.jq_spawns} jq spawns",
+                        file=out,
+                    )
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(f"\n{'=' * 60}", file=out)
+    print(bold("BENCHMARK SUMMARY"), file=out)
+    print(f"{'=' * 60}", file=out)
+    for path, _ in suites:
+        suite_runs = [run for run in runs if run.suite == path]
+        print(_format_bench_summary(path, summarize(suite_runs)), file=out)
+    if len(suites) > 1:
+        print(_format_bench_summary("overall", summarize(runs)), file=out)
+
+    if parsed.json or parsed.store:
+        mode = "mock" if parsed.mock else "replay" if parsed.replay else "live"
+        report = build_report(
+            runs,
+            label=parsed.label,
+            config={
+                "mode": mode,
+                "provider": provider_label(generator.provider),
+                "suites": [path for path, _ in suites],
+                "tasks": parsed.task,
+                "max_iterations": max_iterations,
+                "matcher": not parsed.no_matcher,
+                "templates": not parsed.no_templates,
+                "mock_latency": parsed.mock_latency if parsed.mock else None,
+                "seed": parsed.seed if parsed.mock else None,
+            },
+        )
+        text = json.dumps(report, indent=2)
+        if parsed.json == "-":
+            print(text)
+        elif parsed.json:
+            try:
+                Path(parsed.json).write_text(text + "\n", encoding="utf-8")
+            except OSError as e:
+                print(error(f"Error: could not write report: {e}"), file=sys.stderr)
+                return 1
+            print(f"Report written to {parsed.json}", file=out)
+        if parsed.store:
+            try:
+                with PerfHistory(parsed.store) as history:
+                    run_id = history.add(report)
+            except sqlite3.Error as e:
+                print(error(f"Error: could not store results: {e}"), file=sys.stderr)
+                return 1
+            print(f"Stored as run {run_id} in {parsed.store}", file=out)
+    return 0
+
+
+def _load_compare_runs(ref: str, store: str) -> tuple[str, dict[str, Any], list[TaskRun]]:
     """
-    Create a Task from interactive mode arguments.
+    Load the task runs a compare argument refers to.
 
     Args:
-        input_json: JSON string for input data.
-        output_json: JSON string for expected output.
-        description: Task description.
+        ref: Path of a bench --json report, or a reference to a stored run.
+        store: Performance history database.
 
     Returns:
-        Task with a single example.
+        A description of the run, its settings and its task runs.
 
     Raises:
-        json.JSONDecodeError: If JSON strings are invalid.
+        ValueError: If the report or the run cannot be found or read.
     """
-    input_data: Any = json.loads(input_json)
-    expected_output: Any = json.loads(output_json)
-
-    example = Example(input_data=input_data, expected_output=expected_output)
-
-    return Task(
-        id="interactive",
-        description=description,
-        examples=[example],
-    )
-
+    if ref.endswith(".json") and Path(ref).is_file():
+        try:
+            report = json.loads(Path(ref).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"Cannot read benchmark report {ref}: {e}") from e
+        config = report.get("config")
+        return ref, config if isinstance(config, dict) else {}, runs_from_report(report)
+
+    if not Path(store).is_file():
+        raise ValueError(f"No performance history at {store} (run 'bench --store' first)")
+    with PerfHistory(store) as history:
+        run_id = history.resolve(ref)
+        stored = next(run for run in history.list_runs() if run.id == run_id)
+        name = f"run {run_id}"
+        details = [d for d in (stored.label, stored.commit and stored.commit[:10]) if d]
+        if details:
+            name += f" ({', '.join(details)})"
+        return name, stored.config, history.task_runs(run_id)
+
+
+def _format_metric_value(metric: str, value: float) -> str:
+    """Format a metric mean for the comparison table."""
+    if metric == "solve_rate":
+        return f"{value:.1%}"
+    if metric.endswith("_sec"):
+        return f"{value:.3f}s"
+    return f"{value:.1f}"
+
+
+def _compare(args: list[str]) -> int:
+    """
+    Run the compare subcommand.
 
-def _format_score(score: float) -> str:
-    """Format score with color based on value."""
-    if score >= 0.999:  # Perfect score per domain model (Attempt.is_perfect)
-        return success(f"{score:.3f}")
-    elif score >= 0.8:
-        return warning(f"{score:.3f}")
-    else:
-        return error(f"{score:.3f}")
+    Args:
+        args: Arguments after 'compare'.
 
+    Runs with different task sets are only compared with --allow-mismatch
+    (on the tasks both have); differing settings are warned about.
 
-def _print_solution(solution: Solution, verbose: bool = False) -> None:
+    Returns:
+        0 if no metric regressed, 1 on a regression or an error.
     """
-    Print a solution to stdout.
+    parsed = _parse_compare_args(args)
 
-    Args:
-        solution: The solution to print.
-        verbose: If True, print additional details.
-    """
-    status = success("✓") if solution.success else error("✗")
-    print(f"\n{status} Task: {bold(solution.task_id)}")
-    print(f"  Filter: {cyan(solution.best_filter)}")
-    print(f"  Score: {_format_score(solution.best_score)}")
-    print(f"  Iterations: {solution.iterations_used}")
+    if parsed.list:
+        if not Path(parsed.store).is_file():
+            print(f"No performance history at {parsed.store}")
+            return 0
+        with PerfHistory(parsed.store) as history:
+            for run in history.list_runs():
+                print(
+                    f"{run.id:>4}  {run.created_at}  {(run.commit or '-')[:10]:<10}  "
+                    f"{run.solved}/{run.tasks} solved  {run.label or ''}".rstrip()
+                )
+        return 0
 
-    if verbose and solution.history:
-        print(f"  {dim('History:')}")
-        for attempt in solution.history:
-            score_str = _format_score(attempt.aggregated_score)
+    try:
+        baseline_name, baseline_config, baseline = _load_compare_runs(parsed.baseline, parsed.store)
+        candidate_name, candidate_config, candidate = _load_compare_runs(
+            parsed.candidate, parsed.store
+        )
+    except (ValueError, sqlite3.Error) as e:
+        print(error(f"Error: {e}"), file=sys.stderr)
+        return 1
+
+    only_baseline, only_candidate = task_mismatch(baseline, candidate)
+    if only_baseline or only_candidate:
+        mismatch = (
+            f"the runs have different tasks ({len(only_baseline)} only in the baseline, "
+            f"{len(only_candidate)} only in the candidate, e.g. "
+            f"{(only_baseline or only_candidate)[0]})"
+        )
+        if not parsed.allow_mismatch:
             print(
-                f"    {dim(f'[{attempt.iteration}]')} score={score_str} "
-                f"error={attempt.primary_error.value} filter='{dim(attempt.filter_code)}'"
+                error(f"Error: {mismatch}; pass --allow-mismatch to compare the shared tasks"),
+                file=sys.stderr,
             )
+            return 1
+        if len(only_baseline) == len(baseline):
+            print(error("Error: the runs have no tasks in common"), file=sys.stderr)
+            return 1
+        print(warning(f"Warning: {mismatch}; comparing the shared tasks"), file=sys.stderr)
+    differences = config_differences(baseline_config, candidate_config)
+    if differences:
+        print(
+            warning(f"Warning: the runs' settings differ: {', '.join(differences)}"),
+            file=sys.stderr,
+        )
 
+    policy = ComparePolicy(
+        alpha=parsed.alpha, min_effect=parsed.min_effect, resamples=parsed.resamples
+    )
+    comparisons = compare_runs(baseline, candidate, policy)
+    regressions = [c for c in comparisons if c.verdict == REGRESSION]
+
+    if parsed.json:
+        print(
+            json.dumps(
+                {
+                    "baseline": baseline_name,
+                    "candidate": candidate_name,
+                    "policy": asdict(policy),
+                    "config_differences": differences,
+                    "metrics": [asdict(c) for c in comparisons],
+                    "regressions": [c.metric for c in regressions],
+                },
+                indent=2,
+            )
+        )
+        return 1 if regressions else 0
+
+    print(bold(f"Baseline:  {baseline_name}, {len(baseline)} tasks"))
+    print(bold(f"Candidate: {candidate_name}, {len(candidate)} tasks"))
+    confidence = f"{1 - policy.alpha:.0%} CI of change"
+    print(
+        f"\n{'metric':<14}{'baseline':>11}{'candidate':>11}{'change':>9}  "
+        f"{confidence:<24}{'p':>7}  verdict"
+    )
+    for c in comparisons:
+        change = f"{c.change:+.1%}" if c.change is not None else "-"
+        p_value = f"{c.p_value:.3f}" if c.p_value is not None else "-"
+        interval = (
+            f"[{c.ci_low:+.3g}, {c.ci_high:+.3g}]"
+            if c.metric == "solve_rate"
+            else f"[{c.ci_low:+.1%}, {c.ci_high:+.1%}]"
+        )
+        verdict = {REGRESSION: error, IMPROVEMENT: success}.get(c.verdict, str)(c.verdict)
+        print(
+            f"{c.metric:<14}{_format_metric_value(c.metric, c.baseline):>11}"
+            f"{_format_metric_value(c.metric, c.candidate):>11}{change:>9}  "
+            f"{interval:<24}{p_value:>7}  {verdict}"
+        )
 
-def _estimate_difficulty(task: Task) -> str:
-    """Estimate task difficulty based on heuristics."""
-    desc_lower = task.description.lower()
-
-    if any(word in desc_lower for word in ["group", "aggregate", "reduce", "sum all"]):
-        return "advanced"
-    elif any(word in desc_lower for word in ["filter", "select", "extract multiple", "skip"]):
-        return "intermediate"
-    else:
-        return "basic"
+    if regressions:
+        names = ", ".join(c.metric for c in regressions)
+        print(error(f"\n{len(regressions)} significant regression(s): {names}"))
+        return 1
+    print(success("\nNo significant regressions"))
+    return 0
 
 
-def _list_tasks(tasks: list[Task]) -> None:
+def _serve(args: list[str]) -> int:
     """
-    Display all available tasks in a formatted table.
+    Run the serve subcommand until interrupted.
 
     Args:
-        tasks: List of Task objects to display.
-    """
-    print(f"\n{bold(f'Available Tasks ({len(tasks)})')}\n")
-
-    # Group by difficulty
-    basic = []
-    intermediate = []
-    advanced = []
-
-    for task in tasks:
-        difficulty = _estimate_difficulty(task)
-        if difficulty == "basic":
-            basic.append(task)
-        elif difficulty == "intermediate":
-            intermediate.append(task)
-        else:
-            advanced.append(task)
-
-    def print_group(name: str, tasks_list: list[Task]) -> None:
-        if not tasks_list:
-            return
-        print(f"{bold(name)} ({len(tasks_list)}):")
-        for task in tasks_list:
-            examples_text = f"{len(task.examples)} example"
-            if len(task.examples) != 1:
-                examples_text += "s"
-            # Truncate description if too long
-            desc = task.description[:60]
-            if len(task.description) > 60:
-                desc += "..."
-            print(f"  • {cyan(f'{task.id:<20}')} {desc} ({dim(examples_text)})")
-        print()
-
-    print_group("Basic", basic)
-    print_group("Intermediate", intermediate)
-    print_group("Advanced", advanced)
+        args: Arguments after 'serve'.
 
-    print(dim("Usage: jq-synth --task <task-id>"))
-    print(dim("Run all: jq-synth --task all"))
-    print()
+    Returns:
+        0 after Ctrl-C, 1 on invalid options or if the service cannot start.
+    """
+    parsed = _parse_serve_args(args)
+    _setup_logging(parsed.verbose, parsed.debug)
+    if min(parsed.workers, parsed.max_queue, parsed.max_iters) < 1:
+        print(
+            error("Error: --workers, --max-queue and --max-iters must be at least 1"),
+            file=sys.stderr,
+        )
+        return 1
+    if parsed.max_finished < 0 or not parsed.finished_ttl >= 0:
+        print(
+            error("Error: --max-finished and --finished-ttl must not be negative"),
+            file=sys.stderr,
+        )
+        return 1
 
+    try:
+        executor = JQExecutor()
+    except RuntimeError:
+        print(_format_jq_not_found_error(), file=sys.stderr)
+        return 1
 
-def _print_summary_table(solutions: list[Solution]) -> None:
+    started = _start_offline_generator(parsed)
+    if started is None:
+        return 1
+    generator, mock = started
+
+    service = SynthesisService(
+        generator,
+        AlgorithmicReviewer(executor),
+        matcher=None if parsed.no_matcher else StructuralMatcher(),
+        templates=None if parsed.no_templates else TemplateLibrary(),
+        workers=parsed.workers,
+        max_queue=parsed.max_queue,
+        max_iterations=parsed.max_iters,
+        max_finished=parsed.max_finished,
+        finished_ttl_sec=parsed.finished_ttl or None,
+    ).start()
+    set_metrics(SynthMetrics())
+    try:
+        try:
+            server = SynthesisServer(service, parsed.host, parsed.port)
+        except OSError as e:
+            print(
+                error(f"Error: could not listen on {parsed.host}:{parsed.port}: {e}"),
+                file=sys.stderr,
+            )
+            return 1
+        source = (
+            f"mock LLM at {mock.url}" if mock is not None else provider_label(generator.provider)
+        )
+        print(f"Serving on {server.url} ({parsed.workers} workers, {source}); Ctrl-C to stop")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nStopping")
+        finally:
+            server.stop()
+    finally:
+        service.stop()
+        set_metrics(None)
+        if mock is not None:
+            mock.stop()
+    return 0
+
+
+def _apply(args: list[str]) -> int:
     """
-    Print a summary table for multiple solutions.
+    Run the apply subcommand.
 
     Args:
-        solutions: List of solutions to summarize.
+        args: Arguments after 'apply'.
+
+    Returns:
+        0 if every chunk was filtered, 1 on invalid options, unreadable input,
+        a filter the python engine cannot compile, or failed chunks.
     """
-    if len(solutions) <= 1:
-        return
+    parsed = _parse_apply_args(args)
+    _setup_logging(False, parsed.debug)
 
-    print("\n" + "=" * 60)
-    print(bold("Summary"))
-    print("=" * 60)
+    try:
+        chunk_bytes = parse_size(parsed.chunk_size)
+        max_output_bytes = parse_size(parsed.max_output)
+        if parsed.workers < 1 or parsed.timeout <= 0:
+            raise ValueError("--workers and --timeout must be positive")
+        filter_code = parsed.filter
+        if filter_code is None:
+            stored = SolutionStore(parsed.solutions).get(parsed.task)
+            if stored is None:
+                raise ValueError(f"No stored filter for task '{parsed.task}' in {parsed.solutions}")
+            filter_code = stored.filter
+    except (OSError, ValueError) as e:
+        print(error(f"Error: {e}"), file=sys.stderr)
+        return 1
 
-    # Header
-    print(f"{'Task ID':<25} {'Status':<10} {'Score':<10} {'Iters':<10}")
-    print("-" * 60)
+    try:
+        executor = JQExecutor(timeout_sec=parsed.timeout, max_output_bytes=max_output_bytes)
+    except RuntimeError:
+        print(_format_jq_not_found_error(), file=sys.stderr)
+        return 1
 
-    # Rows
-    for sol in solutions:
-        if sol.success:
-            status = success("PASS")
-        else:
-            status = error("FAIL")
-        score_str = _format_score(sol.best_score)
-        print(f"{sol.task_id:<25} {status:<20} {score_str:<20} {sol.iterations_used:<10}")
+    try:
+        with ExitStack() as stack:
+            out = (
+                stack.enter_context(Path(parsed.output).open("wb"))
+                if parsed.output
+                else sys.stdout.buffer
+            )
+            report = apply_filter(
+                executor,
+                filter_code,
+                parsed.files,
+                out,
+                fmt=None if parsed.format == "auto" else parsed.format,
+                workers=parsed.workers,
+                chunk_bytes=chunk_bytes,
+                ordered=not parsed.unordered,
+                engine=parsed.engine,
+            )
+    except (OSError, ValueError) as e:
+        print(error(f"Error: {e}"), file=sys.stderr)
+        return 1
 
-    # Footer
-    print("-" * 60)
-    passed = sum(1 for s in solutions if s.success)
-    total = len(solutions)
-    pass_rate = 100 * passed / total if total > 0 else 0
-    if passed == total:
-        summary_str = success(f"{passed}/{total} passed ({pass_rate:.0f}%)")
-    elif passed == 0:
-        summary_str = error(f"{passed}/{total} passed ({pass_rate:.0f}%)")
-    else:
-        summary_str = warning(f"{passed}/{total} passed ({pass_rate:.0f}%)")
-    print(f"Total: {summary_str}")
+    # The output may be on stdout, so the report goes to stderr
+    print(
+        f"Applied {filter_code} to {report.records:,} records ({report.files} files, "
+        f"{report.chunks} chunks, {report.workers} workers, {report.engine}) in {report.elapsed_sec:.2f}s: "
+        f"{report.records_per_sec:,.0f} records/s",
+        file=sys.stderr,
+    )
+    if report.failures:
+        print(error(f"{len(report.failures)} chunk(s) failed:"), file=sys.stderr)
+        for failure in report.failures:
+            chunk = failure.chunk
+            message = failure.error.splitlines()[0] if failure.error else "no error output"
+            print(
+                f"  chunk {chunk.index} ({chunk.path} bytes {chunk.start}-{chunk.end}, "
+                f"{failure.records} records): exit {failure.exit_code}: {message}",
+                file=sys.stderr,
+            )
+        return 1
+    return 0
 
 
 def main(args: list[str] | None = None) -> int:
@@ -523,7 +1875,17 @@ def main(args: list[str] | None = None) -> int:
     Returns:
         0 if all tasks succeed, 1 otherwise.
     """
-    parsed = _parse_args(args)
+    argv = sys.argv[1:] if args is None else args
+    if argv and argv[0] == "bench":
+        return _bench(argv[1:])
+    if argv and argv[0] == "compare":
+        return _compare(argv[1:])
+    if argv and argv[0] == "serve":
+        return _serve(argv[1:])
+    if argv and argv[0] == "apply":
+        return _apply(argv[1:])
+
+    parsed = _parse_args(argv)
     _setup_logging(parsed.verbose, parsed.debug)
 
     # Handle --list-tasks flag
@@ -609,16 +1971,119 @@ def main(args: list[str] | None = None) -> int:
             print(error(f"Error: {e}"), file=sys.stderr)
         return 1
 
+    for flag, limit in (("--rpm", parsed.rpm), ("--tpm", parsed.tpm)):
+        if limit is not None and not limit > 0:
+            print(error(f"Error: {flag} must be a positive number"), file=sys.stderr)
+            return 1
+
+    if parsed.cache_ttl is not None and not parsed.cache_dir:
+        print(error("Error: --cache-ttl requires --cache-dir"), file=sys.stderr)
+        return 1
+
+    cache: ResponseCache | None = None
+    if parsed.cache_dir or parsed.replay:
+        try:
+            cache = ResponseCache(
+                directory=parsed.cache_dir,
+                ttl_sec=parsed.cache_ttl,
+                replay=parsed.replay,
+            )
+        except (ValueError, OSError) as e:
+            print(error(f"Error: {e}"), file=sys.stderr)
+            return 1
+
+    rate_limiter: RateLimiter | None = None
+    if parsed.rpm or parsed.tpm:
+        rate_limiter = shared_rate_limiter(
+            f"{parsed.provider or 'default'}:{parsed.base_url or ''}",
+            requests_per_minute=parsed.rpm,
+            tokens_per_minute=parsed.tpm,
+        )
+
+    pool_config = HTTPPoolConfig(
+        max_connections=parsed.max_connections,
+        max_keepalive_connections=min(
+            parsed.max_connections, HTTPPoolConfig.max_keepalive_connections
+        ),
+        http2=parsed.http2,
+    )
+    compaction = CompactionPolicy(max_prompt_tokens=parsed.max_prompt_tokens)
+
     try:
+        hedge_provider: LLMProvider | None = None
+        if parsed.hedge_provider or parsed.hedge_model:
+            if parsed.hedge_provider in (None, parsed.provider):
+                hedge_provider = create_provider(
+                    provider_type=parsed.provider,
+                    api_key="replay" if parsed.replay else None,
+                    model=parsed.hedge_model,
+                    base_url=parsed.base_url,
+                    pool_config=pool_config,
+                )
+            else:
+                hedge_spec = ProviderSpec(
+                    parsed.hedge_provider,
+                    model=parsed.hedge_model,
+                    api_key="replay" if parsed.replay else None,
+                )
+                hedge_provider = create_member_provider(hedge_spec, parsed.provider, pool_config)
+
+        fallbacks = [ProviderSpec.parse(spec) for spec in parsed.fallback or []]
+        if parsed.replay:
+            fallbacks = [replace(spec, api_key="replay") for spec in fallbacks]
+
         generator = JQGenerator(
             provider_type=parsed.provider,
+            # Replay never reaches the API, so it must not require credentials
+            api_key="replay" if parsed.replay else None,
             model=parsed.model,
             base_url=parsed.base_url,
+            pool_config=pool_config,
+            cache=cache,
+            retry_policy=RetryPolicy(max_attempts=max(1, parsed.max_retries)),
+            rate_limiter=rate_limiter,
+            stream=parsed.stream,
+            max_in_flight=parsed.max_connections,
+            compaction=compaction,
+            prompt_caching=parsed.prompt_cache,
+            conversation=parsed.conversation,
+            hedge_provider=hedge_provider,
+            hedge_policy=HedgePolicy(percentile=parsed.hedge_percentile),
+            fallbacks=fallbacks,
         )
+
+        cascade: ModelCascade | None = None
+        if parsed.cascade:
+            tiers = []
+            for spec in map(ProviderSpec.parse, parsed.cascade):
+                if parsed.replay:
+                    spec = replace(spec, api_key="replay")
+                tiers.append(
+                    JQGenerator(
+                        provider=create_member_provider(spec, parsed.provider, pool_config),
+                        cache=cache,
+                        retry_policy=RetryPolicy(max_attempts=max(1, parsed.max_retries)),
+                        rate_limiter=rate_limiter,
+                        stream=parsed.stream,
+                        max_in_flight=parsed.max_connections,
+                        compaction=compaction,
+                        prompt_caching=parsed.prompt_cache,
+                        conversation=parsed.conversation,
+                    )
+                )
+            cascade = ModelCascade(
+                tiers,
+                policy=CascadePolicy(
+                    escalate_after=parsed.escalate_after,
+                    repeated_error_limit=parsed.escalate_on_repeat,
+                ),
+            )
     except ValueError as e:
         error_str = str(e).lower()
         if "api key" in error_str or "api_key" in error_str:
             provider = parsed.provider or "openai"
+            if hedge_provider is None and parsed.hedge_provider:
+                provider = parsed.hedge_provider
             print(_format_api_key_error(provider), file=sys.stderr)
         else:
             print(error(f"Error: {e}"), file=sys.stderr)
@@ -633,55 +2098,130 @@ def main(args: list[str] | None = None) -> int:
         generator=generator,
         reviewer=reviewer,
         max_iterations=max_iterations,
+        matcher=None if parsed.no_matcher else StructuralMatcher(),
+        templates=None if parsed.no_templates else TemplateLibrary(),
+        cascade=cascade,
+        cegis=(
+            CEGISPolicy(
+                initial_examples=max(1, parsed.cegis_initial),
+                counterexamples_per_round=max(1, parsed.cegis_step),
+            )
+            if parsed.cegis
+            else None
+        ),
+        scaling=(
+            ScalingPolicy(max_exponent=parsed.max_scaling_exponent)
+            if parsed.scaling_review
+            else None
+        ),
+        optimization=OptimizationPolicy() if parsed.optimize else None,
+        timings=parsed.timings,
     )
 
-    # Run tasks
-    solutions: list[Solution] = []
-    total_time_sec = 0.0
-
-    for task_num, task in enumerate(tasks, 1):
-        print(f"\n{'=' * 60}")
-        print(f"[{task_num}/{len(tasks)}] Solving: {task.id}")
-        print(f"Description: {task.description}")
-        print(f"Examples: {len(task.examples)}")
-        print(f"Max iterations: {max_iterations}")
-        print(f"{'=' * 60}")
-
-        start_time = time.time()
+    profiler = None
+    if parsed.profile:
+        profiler = TaskProfiler(parsed.profile, parsed.profile_dir, top=max(1, parsed.profile_top))
+        try:
+            profiler.directory.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(error(f"Error: could not create profile directory: {e}"), file=sys.stderr)
+            return 1
+        if parsed.concurrency > 1 and len(tasks) > 1:
+            print(warning("Profiling runs tasks one at a time; ignoring --concurrency"))
 
+    tracer = Tracer() if parsed.trace else None
+    metrics = SynthMetrics() if parsed.metrics_file or parsed.metrics_port is not None else None
+    metrics_server = None
+    if metrics is not None and parsed.metrics_port is not None:
         try:
-            solution = orchestrator.solve(task, verbose=parsed.verbose)
-            solutions.append(solution)
+            metrics_server = metrics.registry.serve(port=parsed.metrics_port)
+        except OSError as e:
+            print(error(f"Error: could not serve metrics: {e}"), file=sys.stderr)
+            return 1
+        print(f"Serving metrics on {metrics_server.url}")
+    set_tracer(tracer)
+    set_metrics(metrics)
 
-            elapsed = time.time() - start_time
-            total_time_sec += elapsed
+    # Run tasks, releasing pooled LLM connections when done
+    try:
+        if parsed.concurrency > 1 and len(tasks) > 1 and profiler is None:
+            solutions, total_time_sec = asyncio.run(
+                _run_tasks_async(
+                    orchestrator,
+                    generator,
+                    tasks,
+                    max_iterations,
+                    concurrency=parsed.concurrency,
+                    verbose=parsed.verbose,
+                    cascade=cascade,
+                )
+            )
+        else:
+            try:
+                with generator:
+                    solutions, total_time_sec = _run_tasks(
+                        orchestrator,
+                        tasks,
+                        max_iterations,
+                        verbose=parsed.verbose,
+                        profiler=profiler,
+                    )
+            finally:
+                if cascade is not None:
+                    cascade.close()
+    finally:
+        set_tracer(None)
+        set_metrics(None)
+        if metrics_server is not None:
+            metrics_server.stop()
+
+    if tracer is not None:
+        try:
+            tracer.write(parsed.trace, parsed.trace_format)
+            print(f"Trace written to {parsed.trace} ({len(tracer.spans)} spans)")
+        except OSError as e:
+            print(error(f"Error: could not write trace: {e}"), file=sys.stderr)
 
-            _print_solution(solution, verbose=parsed.verbose)
-            print(f"  Time: {elapsed:.2f}s")
+    if profiler is not None:
+        try:
+            report_path = profiler.write_report()
+        except OSError as e:
+            print(error(f"Error: could not write profile report: {e}"), file=sys.stderr)
+        else:
+            print(f"\n{'=' * 60}")
+            print(bold("PROFILE"))
+            print(f"{'=' * 60}")
+            print(report_path.read_text(encoding="utf-8"), end="")
+            print(f"Per-task profiles and report written to {profiler.directory}/")
 
-        except GenerationError as e:
-            elapsed = time.time() - start_time
-            total_time_sec += elapsed
+    if metrics is not None and parsed.metrics_file:
+        try:
+            metrics.registry.write(parsed.metrics_file)
+        except OSError as e:
+            print(error(f"Error: could not write metrics: {e}"), file=sys.stderr)
 
-            logger.error("Generation failed for task %s: %s", task.id, e)
-            print(f"\n✗ Error: {e}")
+    if cascade is not None and parsed.cascade_stats:
+        try:
+            cascade.save_stats(parsed.cascade_stats)
+        except OSError as e:
+            print(error(f"Error: could not write cascade stats: {e}"), file=sys.stderr)
 
-            # Create a failed solution
-            solutions.append(
-                Solution(
-                    task_id=task.id,
-                    success=False,
-                    best_filter="",
-                    best_score=0.0,
-                    iterations_used=0,
-                    history=[],
-                )
-            )
-            _print_solution(solutions[-1], verbose=parsed.verbose)
-            print(f"  Time: {elapsed:.2f}s")
+    if parsed.save_solutions:
+        solved = [s for s in solutions if s.success]
+        try:
+            store = SolutionStore(parsed.save_solutions)
+            for solution in solved:
+                store.add(solution)
+            store.save()
+        except (OSError, ValueError) as e:
+            print(error(f"Error: could not save solutions: {e}"), file=sys.stderr)
+        else:
+            print(f"Saved {len(solved)} solution(s) to {parsed.save_solutions}")
 
     # Print summary for multi-task runs
     _print_summary_table(solutions)
+    if parsed.timings:
+        _print_timing_breakdown(solutions, total_time_sec)
 
     # Print overall summary
     if solutions:
@@ -703,6 +2243,50 @@ def main(args: list[str] | None = None) -> int:
         print(f"Total time: {cyan(f'{total_time_sec:.2f}s')}")
         if total_time_sec > 0:
             print(f"Average time per task: {cyan(f'{total_time_sec / total:.2f}s')}")
+        call_stats = list(generator.call_stats)
+        if call_stats:
+            avg_ttft = sum(c.ttft_sec for c in call_stats) / len(call_stats)
+            avg_latency = sum(c.latency_sec for c in call_stats) / len(call_stats)
+            print(
+                f"LLM latency: avg TTFT {cyan(f'{avg_ttft:.2f}s')}, "
+                f"avg total {cyan(f'{avg_latency:.2f}s')} ({len(call_stats)} calls)"
+            )
+        prompt_cache = prompt_cache_usage(generator.provider)
+        if prompt_cache.requests > 0:
+            print(
+                f"Prompt cache: {prompt_cache.cached_tokens} of {prompt_cache.input_tokens} "
+                "input tokens served from provider cache "
+                f"({cyan(f'{prompt_cache.cached_fraction:.1%}')})"
+            )
+        if hedge_provider is not None:
+            hedge_stats = generator.hedge_stats
+            print(
+                f"LLM hedging: {hedge_stats.hedge_rate:.1%} of requests hedged, "
+                f"{hedge_stats.hedge_wins} won by hedge "
+                f"(est. {cyan(f'{hedge_stats.saved_sec:.2f}s')} saved)"
+            )
+        if isinstance(generator.provider, FailoverProvider):
+            print(f"LLM failover: {generator.provider.failovers} requests served by a fallback")
+            for breaker in generator.provider.breakers:
+                health = breaker.stats
+                print(
+                    f"  {breaker.name}: {breaker.state.value}, {health.calls} calls, "
+                    f"{health.failures} failed, {health.rejected} skipped, "
+                    f"opened {health.opened}x"
+                )
+        if cascade is not None:
+            print("LLM cascade (tasks reaching model / solved there):")
+            for name, tier in cascade.stats.items():
+                print(
+                    f"  {name}: {tier.solved}/{tier.tasks} solved "
+                    f"({tier.success_rate:.0%}), {tier.attempts} attempts, "
+                    f"{tier.escalations} escalated"
+                )
+        if cache is not None:
+            stats = cache.stats
+            print(
+                f"LLM cache: {stats.hits} hits, {stats.misses} misses, {stats.coalesced} coalesced"
+            )
         print(f"{'=' * 60}")
 
     # Return code
@@ -0,0 +1,382 @@
+"""
+Token-budget-aware compaction of example data in prompts.
+
+Real-world example payloads can be hundreds of kilobytes, which makes prompts
+slow, expensive and sometimes too large for the model's context. This module
+shrinks an example for the prompt only: nested objects and arrays of the input
+that have nothing to do with the expected output are dropped, large arrays are
+replaced by a few representative items, long strings are truncated, and a schema summary inferred from the full input tells
+the model what was left out. The task itself is never modified, so filters are
+still evaluated against the full inputs.
+"""
+
+import json
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from src.domain import Example
+
+# A generalized path into a JSON value: object keys, with None standing for
+# "any array element" (so all items of an array share one path)
+JSONPath = tuple[str | None, ...]
+
+# Compaction levels, from mildest to most aggressive
+SAMPLE_LEVEL = 1
+SINGLE_ITEM_LEVEL = 2
+SCHEMA_ONLY_LEVEL = 3
+MAX_LEVEL = SCHEMA_ONLY_LEVEL
+
+
+@dataclass(frozen=True)
+class CompactionPolicy:
+    """
+    When and how example data in prompts is compacted.
+
+    Attributes:
+        max_prompt_tokens: Estimated size of a prompt's task and example
+            block above which the examples are compacted.
+        max_array_items: Items kept from each large array at the first level.
+        max_string_chars: Longer strings not needed for the expected output
+            are truncated to this length.
+        max_schema_lines: Maximum lines in each inferred schema summary.
+    """
+
+    max_prompt_tokens: int = 8000
+    max_array_items: int = 3
+    max_string_chars: int = 200
+    max_schema_lines: int = 40
+
+
+@dataclass(frozen=True)
+class CompactedExample:
+    """
+    Prompt representation of one example after compaction.
+
+    Attributes:
+        input_json: JSON text of the pruned and sampled input, or None if
+            only the schema is shown.
+        output_json: JSON text of the (possibly sampled) expected output.
+        schema: Schema summary lines inferred from the full input.
+        output_sampled: Whether arrays of the expected output were sampled.
+    """
+
+    input_json: str | None
+    output_json: str
+    schema: list[str]
+    output_sampled: bool = False
+
+
+def _type_name(value: Any) -> str:
+    """JSON type name of a decoded value."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int | float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    return "object"
+
+
+def _format_path(path: JSONPath) -> str:
+    """Render a generalized path in jq syntax (e.g. '.users[].name')."""
+    if not path:
+        return "."
+    parts: list[str] = []
+    for key in path:
+        if key is None:
+            parts.append("[]")
+        elif key.isidentifier():
+            parts.append(f".{key}")
+        else:
+            parts.append(f".{json.dumps(key)}")
+    rendered = "".join(parts)
+    return rendered if rendered.startswith(".") else f".{rendered}"
+
+
+def infer_schema(value: Any, max_lines: int = 40) -> list[str]:
+    """
+    Summarize the structure of a JSON value, one line per path.
+
+    Array items are merged, so '.users[].id: number' describes every user;
+    a field that is missing or has different types across items shows all of
+    them (e.g. 'string|null').
+
+    Args:
+        value: The decoded JSON value.
+        max_lines: Maximum lines returned; the rest is summarized in a final
+            '... N more paths' line.
+
+    Returns:
+        Lines like '.users: array (1000 items)'.
+
+    Examples:
+        >>> infer_schema({"a": [1, 2]})
+        ['.: object', '.a: array (2 items)', '.a[]: number']
+    """
+    types: dict[JSONPath, set[str]] = {}
+    lengths: dict[JSONPath, tuple[int, int]] = {}
+    stack: list[tuple[JSONPath, Any]] = [((), value)]
+
+    while stack:
+        path, node = stack.pop()
+        types.setdefault(path, set()).add(_type_name(node))
+        if isinstance(node, dict):
+            stack.extend(((*path, key), child) for key, child in node.items())
+        elif isinstance(node, list):
+            low, high = lengths.get(path, (len(node), len(node)))
+            lengths[path] = (min(low, len(node)), max(high, len(node)))
+            stack.extend(((*path, None), item) for item in node)
+
+    lines: list[str] = []
+    for path in sorted(types, key=lambda p: tuple("" if k is None else k for k in p)):
+        line = f"{_format_path(path)}: {'|'.join(sorted(types[path]))}"
+        if path in lengths:
+            low, high = lengths[path]
+            count = str(low) if low == high else f"{low}-{high}"
+            line += f" ({count} items)"
+        lines.append(line)
+
+    if len(lines) > max_lines:
+        hidden = len(lines) - max_lines + 1
+        lines = [*lines[: max_lines - 1], f"... {hidden} more paths"]
+    return lines
+
+
+def _scalars(value: Any) -> Iterator[Any]:
+    """Yield the string and number leaves of a JSON value."""
+    stack = [value]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, str | int | float) and not isinstance(node, bool):
+            yield node
+
+
+def _keys(value: Any) -> Iterator[str]:
+    """Yield every object key in a JSON value."""
+    stack = [value]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            yield from node
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+class _Relevance:
+    """Which parts of an input contribute to the expected output."""
+
+    def __init__(self, input_data: Any, expected_output: Any) -> None:
+        # Booleans and null are too common to say anything about relevance
+        self.targets = set(_scalars(expected_output))
+        target_keys = set(_keys(expected_output))
+        self.subtrees: set[JSONPath] = set()
+
+        stack: list[tuple[JSONPath, Any]] = [((), input_data)]
+        while stack:
+            path, node = stack.pop()
+            if isinstance(node, dict):
+                for key, child in node.items():
+                    child_path = (*path, key)
+                    if key in target_keys:
+                        self.subtrees.add(child_path)
+                    stack.append((child_path, child))
+            elif isinstance(node, list):
+                stack.extend(((*path, None), item) for item in node)
+            elif node in self.targets and not isinstance(node, bool):
+                self.subtrees.add(path)
+
+        self.prefixes = {p[:i] for p in self.subtrees for i in range(len(p) + 1)}
+
+    @property
+    def prunes(self) -> bool:
+        """Whether anything matched; if not, the whole input is kept."""
+        return bool(self.subtrees)
+
+    def contains_target(self, value: Any) -> bool:
+        """Whether a value has a leaf that appears in the expected output."""
+        return any(leaf in self.targets for leaf in _scalars(value))
+
+
+def _sample_indices(items: list[Any], limit: int, relevance: _Relevance | None) -> list[int]:
+    """Pick up to limit representative items, keeping their original order."""
+    chosen: list[int] = []
+    if relevance is not None and relevance.targets:
+        # Prefer items that show up in the output, but leave room for one that
+        # does not, so the model can see what distinguishes them
+        matching = [i for i, item in enumerate(items) if relevance.contains_target(item)]
+        chosen = matching[: max(1, limit - 1)] if limit > 1 else matching[:1]
+    for i in range(len(items)):
+        if len(chosen) >= limit:
+            break
+        if i not in chosen:
+            chosen.append(i)
+    return sorted(chosen)
+
+
+class _KeptItems:
+    """The items an input sample kept, so the expected output is sampled alike."""
+
+    def __init__(self) -> None:
+        # Kept indices by length of the sampled array, and the kept items' leaves
+        self.indices: dict[int, list[int]] = {}
+        self.leaves: set[Any] = set()
+
+    def record(self, items: list[Any], indices: list[int]) -> None:
+        """Note the items kept from one sampled input array."""
+        self.indices.setdefault(len(items), indices)
+        for i in indices:
+            self.leaves.update(_scalars(items[i]))
+
+    def output_indices(self, items: list[Any], limit: int) -> list[int]:
+        """
+        Pick the output items that come from the kept input items.
+
+        An output array as long as a sampled input array (as map makes) keeps
+        the same indices; otherwise (as select makes) the items sharing a leaf
+        with a kept input item are kept. Failing both, the first items are.
+        """
+        if len(items) in self.indices:
+            return self.indices[len(items)]
+        matching = [
+            i for i, item in enumerate(items) if any(x in self.leaves for x in _scalars(item))
+        ]
+        return matching[:limit] or list(range(limit))
+
+
+def _compact(
+    value: Any,
+    path: JSONPath,
+    *,
+    max_items: int,
+    pick: Callable[[list[Any]], list[int]],
+    max_chars: int | None,
+    relevance: _Relevance | None,
+    prune: bool,
+) -> Any:
+    """Recursively prune, sample and truncate a JSON value."""
+    if isinstance(value, dict):
+        result: dict[str, Any] = {}
+        for key, child in value.items():
+            child_path = (*path, key)
+            # Unrelated nested data is dropped, but scalar siblings are cheap
+            # and often carry the condition the filter selects on
+            if (
+                prune
+                and relevance is not None
+                and child_path not in relevance.prefixes
+                and isinstance(child, dict | list)
+            ):
+                continue
+            # Inside a relevant subtree everything is kept
+            child_prune = prune and (relevance is None or child_path not in relevance.subtrees)
+            result[key] = _compact(
+                child,
+                child_path,
+                max_items=max_items,
+                pick=pick,
+                max_chars=max_chars,
+                relevance=relevance,
+                prune=child_prune,
+            )
+        return result
+
+    if isinstance(value, list):
+        items = [value[i] for i in pick(value)] if len(value) > max_items else value
+        return [
+            _compact(
+                item,
+                (*path, None),
+                max_items=max_items,
+                pick=pick,
+                max_chars=max_chars,
+                relevance=relevance,
+                prune=prune,
+            )
+            for item in items
+        ]
+
+    if isinstance(value, str) and max_chars is not None and len(value) > max_chars:
+        if relevance is None or value not in relevance.targets:
+            return value[:max_chars] + "..."
+    return value
+
+
+def compact_example(example: Example, policy: CompactionPolicy, level: int) -> CompactedExample:
+    """
+    Shrink one example for the prompt.
+
+    Level 1 drops nested input data unrelated to the expected output (when
+    any relation can be identified; scalar fields next to related data are
+    kept, since filters often select on them) and samples large arrays down to
+    policy.max_array_items; level 2 keeps a single item per array; level 3
+    shows only the schema of the input. The expected output is never pruned
+    or truncated, but its large arrays are sampled to the items that come
+    from the input items kept, so the two samples stay consistent.
+
+    Args:
+        example: The example to compact (left unchanged).
+        policy: Sampling and truncation limits.
+        level: Compaction level, 1 (mildest) to MAX_LEVEL.
+
+    Returns:
+        The compacted prompt representation.
+
+    Raises:
+        ValueError: If level is out of range.
+    """
+    if not SAMPLE_LEVEL <= level <= MAX_LEVEL:
+        raise ValueError(f"Compaction level must be between 1 and {MAX_LEVEL}, got {level}")
+
+    max_items = policy.max_array_items if level == SAMPLE_LEVEL else 1
+    relevance = _Relevance(example.input_data, example.expected_output)
+    kept = _KeptItems()
+    output_sampled = False
+
+    def pick_input(items: list[Any]) -> list[int]:
+        indices = _sample_indices(items, max_items, relevance)
+        kept.record(items, indices)
+        return indices
+
+    def pick_output(items: list[Any]) -> list[int]:
+        nonlocal output_sampled
+        output_sampled = True
+        return kept.output_indices(items, max_items)
+
+    input_json: str | None = None
+    if level < SCHEMA_ONLY_LEVEL:
+        sample = _compact(
+            example.input_data,
+            (),
+            max_items=max_items,
+            pick=pick_input,
+            max_chars=policy.max_string_chars,
+            relevance=relevance,
+            prune=relevance.prunes,
+        )
+        input_json = json.dumps(sample, sort_keys=True)
+
+    output = _compact(
+        example.expected_output,
+        (),
+        max_items=max_items,
+        pick=pick_output,
+        max_chars=None,
+        relevance=None,
+        prune=False,
+    )
+    return CompactedExample(
+        input_json=input_json,
+        output_json=json.dumps(output, sort_keys=True),
+        schema=infer_schema(example.input_data, policy.max_schema_lines),
+        output_sampled=output_sampled,
+    )
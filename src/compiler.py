@@ -0,0 +1,1549 @@
+"""
+Compilation of jq filters to Python callables.
+
+This module provides compile_filter, which turns a filter written in a subset
+of jq into a CompiledFilter that runs in-process instead of spawning jq. The
+subset covers paths, iteration, pipes, commas, literals, array and object
+construction, arithmetic, comparisons, and/or, alternatives (//),
+if-then-else, optional (?) and the builtins select, map, length, keys,
+keys_unsorted, has, add, sort, not, type, tostring and empty. Anything else
+(variables, reductions, string interpolation, slices, assignment, other
+builtins) raises UnsupportedFilterError, and the filter should run with jq.
+
+Semantics follow jq 1.6, including its number formatting (to_json), so
+compiled output matches jq's output for the same input; tests check this
+differentially against the jq binary. One known difference: integers beyond
+2**53 are kept exact until they go through arithmetic or output, where jq
+rounds them when parsing. Other jq releases format numbers and word errors
+differently (jq 1.7 prints 1.0 and keeps large literals), so compiled output
+only stands in for a jq binary whose version is JQ_VERSION.
+
+Filters that run a row-wise body over many objects (a filter applied to each
+record of a batch, or map(...), [.[] | ...] or .[] | ... applied to an array
+of objects) are also planned column-wise: select stages followed by a
+projection of fields, literals, arithmetic and comparisons run as NumPy
+array operations over the fields' columns when NumPy is installed (pip
+install 'jq-by-example[numpy]'). Any row the columns cannot represent
+exactly (missing or mixed-type fields, a zero divisor) falls back to
+evaluating record by record.
+"""
+
+import functools
+import importlib
+import importlib.util
+import json
+import math
+import operator
+import re
+import sys
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from src.domain import Solution
+
+# Batches smaller than this are evaluated row by row; NumPy's per-call
+# overhead outweighs the vectorized work below it
+MIN_COLUMNAR_ROWS = 64
+
+# The jq release whose output compiled filters match (as `jq --version` prints it)
+JQ_VERSION = "jq-1.6"
+
+_Fn = Callable[[Any], Any]
+_Gen = Callable[[Any], Iterable[Any]]
+
+# Tokens of jq's syntax; string literals are cut by _string_end instead,
+# since interpolations may nest strings
+_TOKEN = re.compile(
+    r"""
+    (?P<space>\s+|\#[^\n]*)
+    |(?P<var>\$[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<field>\.[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    |(?P<ident>[A-Za-z_][A-Za-z0-9_]*(?:::[A-Za-z_][A-Za-z0-9_]*)*)
+    |(?P<op>\?//|\|=|\+=|-=|\*=|/=|%=|//=|==|!=|<=|>=|//|\.\.|[.\[\]{}()|,:;<>+\-*/%?=$@])
+    """,
+    re.VERBOSE,
+)
+
+_UNSUPPORTED_KEYWORDS = {
+    "as": "variable bindings",
+    "def": "function definitions",
+    "reduce": "reduce",
+    "foreach": "foreach",
+    "try": "try/catch",
+    "label": "label/break",
+    "import": "modules",
+    "include": "modules",
+}
+
+# Keywords that cannot start a term
+_RESERVED = {"then", "elif", "else", "end", "and", "or"}
+
+_COMPARISONS = ("==", "!=", "<", "<=", ">", ">=")
+_ARITHMETIC = ("+", "-", "*", "/", "%")
+
+# Builtins by name and arity
+_BUILTINS = {
+    ("empty", 0),
+    ("not", 0),
+    ("length", 0),
+    ("keys", 0),
+    ("keys_unsorted", 0),
+    ("add", 0),
+    ("sort", 0),
+    ("type", 0),
+    ("tostring", 0),
+    ("select", 1),
+    ("map", 1),
+    ("has", 1),
+}
+
+# Largest integer a double holds exactly; jq rounds integers beyond it
+_EXACT_INTEGER = 2**53
+
+# Longest value dump jq puts in an error message before truncating it
+_ERROR_VALUE_CHARS = 14
+
+
+class UnsupportedFilterError(ValueError):
+    """Raised when a filter uses jq features outside the compiled subset."""
+
+
+class FilterRuntimeError(RuntimeError):
+    """Raised when a compiled filter fails on an input, as jq would with an error."""
+
+
+class _Fallback(Exception):
+    """Raised when a fast path (columnar evaluation, json.dumps) cannot be exact."""
+
+
+class _Node:
+    """Base of the syntax tree nodes."""
+
+
+@dataclass(frozen=True)
+class _Identity(_Node):
+    pass
+
+
+@dataclass(frozen=True)
+class _Literal(_Node):
+    value: Any
+
+
+@dataclass(frozen=True)
+class _Index(_Node):
+    """target[key]; key is evaluated against the input, not the target."""
+
+    target: _Node
+    key: _Node
+
+
+@dataclass(frozen=True)
+class _Iterate(_Node):
+    """target[], or target[]? (optional) skipping values that cannot be iterated."""
+
+    target: _Node
+    optional: bool = False
+
+
+@dataclass(frozen=True)
+class _Try(_Node):
+    body: _Node
+
+
+@dataclass(frozen=True)
+class _Pipe(_Node):
+    left: _Node
+    right: _Node
+
+
+@dataclass(frozen=True)
+class _Comma(_Node):
+    left: _Node
+    right: _Node
+
+
+@dataclass(frozen=True)
+class _Collect(_Node):
+    body: _Node
+
+
+@dataclass(frozen=True)
+class _Object(_Node):
+    entries: tuple[tuple[_Node, _Node], ...]
+
+
+@dataclass(frozen=True)
+class _Negate(_Node):
+    body: _Node
+
+
+@dataclass(frozen=True)
+class _Binary(_Node):
+    op: str
+    left: _Node
+    right: _Node
+
+
+@dataclass(frozen=True)
+class _And(_Node):
+    left: _Node
+    right: _Node
+
+
+@dataclass(frozen=True)
+class _Or(_Node):
+    left: _Node
+    right: _Node
+
+
+@dataclass(frozen=True)
+class _Alternative(_Node):
+    left: _Node
+    right: _Node
+
+
+@dataclass(frozen=True)
+class _If(_Node):
+    cond: _Node
+    then: _Node
+    other: _Node
+
+
+@dataclass(frozen=True)
+class _Call(_Node):
+    name: str
+    args: tuple[_Node, ...]
+
+
+@dataclass(frozen=True)
+class Token:
+    """
+    A token of a jq filter.
+
+    Attributes:
+        kind: 'var', 'field', 'number', 'string', 'ident' or 'op'.
+        text: The token's source text.
+        start: Offset of its first character in the filter.
+        end: Offset just past its last character.
+    """
+
+    kind: str
+    text: str
+    start: int
+    end: int
+
+
+def _string_end(source: str, start: int) -> int:
+    """End of the string literal starting at start, past any interpolations."""
+    i = start + 1
+    while i < len(source):
+        char = source[i]
+        if char == '"':
+            return i + 1
+        if char == "\\" and source[i + 1 : i + 2] == "(":
+            depth = 1
+            i += 2
+            while depth and i < len(source):
+                if source[i] == '"':
+                    i = _string_end(source, i)
+                    continue
+                depth += {"(": 1, ")": -1}.get(source[i], 0)
+                i += 1
+            continue
+        i += 2 if char == "\\" else 1
+    raise UnsupportedFilterError(f"Unterminated string literal at {start}")
+
+
+def tokenize(source: str) -> list[Token]:
+    """
+    Split a jq filter into tokens, without whitespace and comments.
+
+    String literals are kept whole, interpolations included.
+
+    Args:
+        source: The filter.
+
+    Returns:
+        The tokens in order.
+
+    Raises:
+        UnsupportedFilterError: On a character no token starts with, or an
+            unterminated string literal.
+
+    Example:
+        >>> [token.text for token in tokenize('.a | "x\\(.b)" # note')]
+        ['.a', '|', '"x\\\\(.b)"']
+    """
+    tokens: list[Token] = []
+    pos = 0
+    while pos < len(source):
+        if source[pos] == '"':
+            end = _string_end(source, pos)
+            tokens.append(Token("string", source[pos:end], pos, end))
+            pos = end
+            continue
+        match = _TOKEN.match(source, pos)
+        if match is None:
+            raise UnsupportedFilterError(f"Unexpected character {source[pos]!r} at {pos}")
+        kind = match.lastgroup
+        assert kind is not None
+        if kind != "space":
+            tokens.append(Token(kind, match.group(), pos, match.end()))
+        pos = match.end()
+    return tokens
+
+
+def _tokenize(source: str) -> list[tuple[str, str]]:
+    """Split a filter into (kind, text) tokens, ending with ('end', '')."""
+    return [(token.kind, token.text) for token in tokenize(source)] + [("end", "")]
+
+
+class _Parser:
+    """Recursive-descent parser for the supported subset, with jq's precedence."""
+
+    def __init__(self, source: str) -> None:
+        self._tokens = _tokenize(source)
+        self._pos = 0
+
+    def parse(self) -> _Node:
+        node = self._pipe()
+        if self._tokens[self._pos][0] != "end":
+            self._unexpected()
+        return node
+
+    # Token helpers
+
+    def _at(self, *texts: str) -> bool:
+        kind, text = self._tokens[self._pos]
+        return kind in ("op", "ident") and text in texts
+
+    def _accept(self, text: str) -> bool:
+        if self._at(text):
+            self._pos += 1
+            return True
+        return False
+
+    def _expect(self, text: str) -> None:
+        if not self._accept(text):
+            self._unexpected(f"expected '{text}'")
+
+    def _next(self) -> tuple[str, str]:
+        token = self._tokens[self._pos]
+        self._pos += 1
+        return token
+
+    def _unexpected(self, detail: str = "") -> None:
+        kind, text = self._tokens[self._pos]
+        if kind == "ident" and text in _UNSUPPORTED_KEYWORDS:
+            raise UnsupportedFilterError(f"Unsupported jq feature: {_UNSUPPORTED_KEYWORDS[text]}")
+        found = "end of filter" if kind == "end" else f"'{text}'"
+        raise UnsupportedFilterError(f"Unexpected {found}" + (f" ({detail})" if detail else ""))
+
+    # Binary operators, lowest precedence first
+
+    def _pipe(self) -> _Node:
+        left = self._comma()
+        if self._accept("|"):
+            return _Pipe(left, self._pipe())
+        return left
+
+    def _comma(self) -> _Node:
+        node = self._alternative()
+        while self._accept(","):
+            node = _Comma(node, self._alternative())
+        return node
+
+    def _alternative(self) -> _Node:
+        left = self._or()
+        if self._at("=", "|=", "+=", "-=", "*=", "/=", "%=", "//="):
+            raise UnsupportedFilterError("Unsupported jq feature: assignment")
+        if self._accept("//"):
+            return _Alternative(left, self._alternative())
+        return left
+
+    def _or(self) -> _Node:
+        node = self._and()
+        while self._accept("or"):
+            node = _Or(node, self._and())
+        return node
+
+    def _and(self) -> _Node:
+        node = self._comparison()
+        while self._accept("and"):
+            node = _And(node, self._comparison())
+        return node
+
+    def _comparison(self) -> _Node:
+        node = self._additive()
+        if self._at(*_COMPARISONS):
+            op = self._next()[1]
+            node = _Binary(op, node, self._additive())
+            if self._at(*_COMPARISONS):
+                self._unexpected("comparisons do not chain")
+        return node
+
+    def _additive(self) -> _Node:
+        node = self._multiplicative()
+        while self._at("+", "-"):
+            op = self._next()[1]
+            node = _Binary(op, node, self._multiplicative())
+        return node
+
+    def _multiplicative(self) -> _Node:
+        node = self._unary()
+        while self._at("*", "/", "%"):
+            op = self._next()[1]
+            node = _Binary(op, node, self._unary())
+        return node
+
+    def _unary(self) -> _Node:
+        if self._accept("-"):
+            body = self._unary()
+            if isinstance(body, _Literal) and _is_number(body.value):
+                return _Literal(_negate(body.value))
+            return _Negate(body)
+        return self._postfix()
+
+    # Terms
+
+    def _postfix(self) -> _Node:
+        node = self._primary()
+        while True:
+            kind, text = self._tokens[self._pos]
+            if kind == "field":
+                self._pos += 1
+                node = _Index(node, _Literal(text[1:]))
+            elif self._at(".") and self._tokens[self._pos + 1][0] == "string":
+                self._pos += 1
+                node = _Index(node, _Literal(self._string(self._next()[1])))
+            elif self._accept("["):
+                node = self._bracket(node)
+            elif self._accept("?"):
+                # As in jq, []? only makes the iteration optional, while
+                # other terms (including the target of .a? and .[e]?) are
+                # wrapped whole
+                if isinstance(node, _Iterate) and not node.optional:
+                    node = _Iterate(node.target, optional=True)
+                else:
+                    node = _Try(node)
+            else:
+                return node
+
+    def _bracket(self, target: _Node) -> _Node:
+        if self._accept("]"):
+            return _Iterate(target)
+        if self._at(":"):
+            raise UnsupportedFilterError("Unsupported jq feature: slices")
+        key = self._pipe()
+        if self._at(":"):
+            raise UnsupportedFilterError("Unsupported jq feature: slices")
+        self._expect("]")
+        return _Index(target, key)
+
+    def _primary(self) -> _Node:
+        kind, text = self._next()
+        if kind == "field":
+            return _Index(_Identity(), _Literal(text[1:]))
+        if kind == "number":
+            value = float(text)
+            return _Literal(
+                int(value) if value.is_integer() and abs(value) < _EXACT_INTEGER else value
+            )
+        if kind == "string":
+            return _Literal(self._string(text))
+        if kind == "ident":
+            return self._identifier(text)
+        if text == ".":
+            if self._tokens[self._pos][0] == "string":
+                return _Index(_Identity(), _Literal(self._string(self._next()[1])))
+            return _Identity()
+        if text == "(":
+            node = self._pipe()
+            self._expect(")")
+            return node
+        if text == "[":
+            if self._accept("]"):
+                return _Collect(_Call("empty", ()))
+            node = self._pipe()
+            self._expect("]")
+            return _Collect(node)
+        if text == "{":
+            return self._object()
+        if text == "..":
+            raise UnsupportedFilterError("Unsupported jq feature: recursive descent (..)")
+        if kind == "var" or text == "$":
+            raise UnsupportedFilterError("Unsupported jq feature: variables")
+        if text == "@":
+            raise UnsupportedFilterError("Unsupported jq feature: formats (@...)")
+        self._pos -= 1
+        self._unexpected()
+        raise AssertionError  # pragma: no cover - _unexpected raises
+
+    def _identifier(self, name: str) -> _Node:
+        if name in ("true", "false", "null"):
+            return _Literal({"true": True, "false": False, "null": None}[name])
+        if name == "if":
+            return self._if()
+        if name in _UNSUPPORTED_KEYWORDS or name in _RESERVED:
+            self._pos -= 1
+            self._unexpected()
+        args: list[_Node] = []
+        if self._accept("("):
+            args.append(self._pipe())
+            while self._accept(";"):
+                args.append(self._pipe())
+            self._expect(")")
+        if (name, len(args)) not in _BUILTINS:
+            raise UnsupportedFilterError(f"Unsupported jq builtin: {name}/{len(args)}")
+        return _Call(name, tuple(args))
+
+    def _if(self) -> _Node:
+        cond = self._pipe()
+        self._expect("then")
+        then = self._pipe()
+        if self._accept("elif"):
+            return _If(cond, then, self._if())
+        other: _Node = _Identity()
+        if self._accept("else"):
+            other = self._pipe()
+        self._expect("end")
+        return _If(cond, then, other)
+
+    def _object(self) -> _Node:
+        entries: list[tuple[_Node, _Node]] = []
+        if self._accept("}"):
+            return _Object(())
+        while True:
+            kind, text = self._next()
+            key: _Node
+            if kind == "ident":
+                key = _Literal(text)
+            elif kind == "string":
+                key = _Literal(self._string(text))
+            elif text == "(":
+                key = self._pipe()
+                self._expect(")")
+            elif kind == "var" or text == "$":
+                raise UnsupportedFilterError("Unsupported jq feature: variables")
+            else:
+                self._pos -= 1
+                self._unexpected("expected an object key")
+            if self._accept(":"):
+                value = self._object_value()
+            elif isinstance(key, _Literal):
+                value = _Index(_Identity(), key)
+            else:
+                self._unexpected("expected ':'")
+            entries.append((key, value))
+            if self._accept("}"):
+                return _Object(tuple(entries))
+            self._expect(",")
+
+    def _object_value(self) -> _Node:
+        # jq only allows terms, pipes of terms and negation as object values
+        node = _Negate(self._object_value()) if self._accept("-") else self._postfix()
+        if self._accept("|"):
+            return _Pipe(node, self._object_value())
+        return node
+
+    @staticmethod
+    def _string(text: str) -> str:
+        if "\\(" in text:
+            raise UnsupportedFilterError("Unsupported jq feature: string interpolation")
+        try:
+            value: str = json.loads(text, strict=False)
+        except json.JSONDecodeError as e:
+            raise UnsupportedFilterError(f"Invalid string literal {text}: {e}") from e
+        return value
+
+
+def _is_number(value: Any) -> bool:
+    return type(value) is int or type(value) is float
+
+
+def _kind(value: Any) -> str:
+    """jq's type name of a value."""
+    if value is None:
+        return "null"
+    if value is True or value is False:
+        return "boolean"
+    if _is_number(value):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    return "object"
+
+
+def _describe(value: Any) -> str:
+    """A value as jq shows it in error messages, e.g. 'number (1)'."""
+    dump = to_json(value)
+    if len(dump) > _ERROR_VALUE_CHARS:
+        dump = dump[: _ERROR_VALUE_CHARS - 3] + "..."
+    return f"{_kind(value)} ({dump})"
+
+
+def _truthy(value: Any) -> bool:
+    return value is not None and value is not False
+
+
+def _to_float(value: int | float) -> float:
+    try:
+        return float(value)
+    except OverflowError:
+        return math.copysign(sys.float_info.max, value)
+
+
+def _rank(value: Any) -> int:
+    """Position of a value's type in jq's sort order."""
+    if value is None:
+        return 0
+    if value is False:
+        return 1
+    if value is True:
+        return 2
+    if _is_number(value):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, list):
+        return 5
+    return 6
+
+
+def _compare(a: Any, b: Any) -> int:
+    """Compare two values in jq's total order; negative, zero or positive."""
+    rank_a, rank_b = _rank(a), _rank(b)
+    if rank_a != rank_b:
+        return rank_a - rank_b
+    if rank_a == 3:
+        x, y = _to_float(a), _to_float(b)
+        return (x > y) - (x < y)
+    if rank_a == 4:
+        return int(a > b) - int(a < b)
+    if rank_a == 5:
+        for x, y in zip(a, b, strict=False):
+            order = _compare(x, y)
+            if order:
+                return order
+        return len(a) - len(b)
+    if rank_a == 6:
+        keys_a, keys_b = sorted(a), sorted(b)
+        if keys_a != keys_b:
+            return _compare(keys_a, keys_b)
+        for key in keys_a:
+            order = _compare(a[key], b[key])
+            if order:
+                return order
+    return 0
+
+
+def _index(target: Any, key: Any) -> Any:
+    if isinstance(key, str):
+        if isinstance(target, dict):
+            return target.get(key)
+        if target is None:
+            return None
+        raise FilterRuntimeError(f'Cannot index {_kind(target)} with string "{key}"')
+    if _is_number(key):
+        if isinstance(target, list):
+            if not float(key).is_integer():
+                return None  # jq 1.6 returns null for fractional indices
+            i = int(key)
+            if i < 0:
+                i += len(target)
+            return target[i] if 0 <= i < len(target) else None
+        if target is None:
+            return None
+        raise FilterRuntimeError(f"Cannot index {_kind(target)} with number")
+    if target is None and key is None:
+        return None
+    if isinstance(target, list) and isinstance(key, list):
+        raise UnsupportedFilterError("Unsupported jq feature: indexing an array by an array")
+    raise FilterRuntimeError(f"Cannot index {_kind(target)} with {_kind(key)}")
+
+
+def _iterate(value: Any) -> Iterable[Any]:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict):
+        return value.values()
+    raise FilterRuntimeError(f"Cannot iterate over {_describe(value)}")
+
+
+def _add(a: Any, b: Any) -> Any:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if _is_number(a) and _is_number(b):
+        return _to_float(a) + _to_float(b)
+    if isinstance(a, str) and isinstance(b, str):
+        return a + b
+    if isinstance(a, list) and isinstance(b, list):
+        return a + b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return {**a, **b}
+    raise FilterRuntimeError(f"{_describe(a)} and {_describe(b)} cannot be added")
+
+
+def _subtract(a: Any, b: Any) -> Any:
+    if _is_number(a) and _is_number(b):
+        return _to_float(a) - _to_float(b)
+    if isinstance(a, list) and isinstance(b, list):
+        return [x for x in a if not any(_compare(x, y) == 0 for y in b)]
+    raise FilterRuntimeError(f"{_describe(a)} and {_describe(b)} cannot be subtracted")
+
+
+def _multiply(a: Any, b: Any) -> Any:
+    if _is_number(a) and _is_number(b):
+        return _to_float(a) * _to_float(b)
+    if (isinstance(a, str) and _is_number(b)) or (_is_number(a) and isinstance(b, str)):
+        text, count = (a, b) if isinstance(a, str) else (b, a)
+        # jq 1.6 appends the string (int)(count - 1) times, or gives null below
+        # zero; counts beyond a C int convert to INT_MIN, so also give null
+        repeats = _to_float(count) - 1
+        if not -(2**31) <= repeats < 2**31 or repeats <= -1:
+            return None
+        return text * (math.trunc(repeats) + 1)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return _deep_merge(a, b)
+    raise FilterRuntimeError(f"{_describe(a)} and {_describe(b)} cannot be multiplied")
+
+
+def _deep_merge(a: dict[str, Any], b: dict[str, Any]) -> dict[str, Any]:
+    merged = dict(a)
+    for key, value in b.items():
+        if isinstance(merged.get(key), dict) and isinstance(value, dict):
+            merged[key] = _deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _divide(a: Any, b: Any) -> Any:
+    if _is_number(a) and _is_number(b):
+        if b == 0:
+            raise FilterRuntimeError(
+                f"{_describe(a)} and {_describe(b)} cannot be divided because the divisor is zero"
+            )
+        return _to_float(a) / _to_float(b)
+    if isinstance(a, str) and isinstance(b, str):
+        if not a:
+            return []
+        return a.split(b) if b else list(a)
+    raise FilterRuntimeError(f"{_describe(a)} and {_describe(b)} cannot be divided")
+
+
+def _modulo(a: Any, b: Any) -> Any:
+    if _is_number(a) and _is_number(b):
+        # jq 1.6 truncates both operands to integers and keeps C's sign rules
+        dividend, divisor = math.trunc(_to_float(a)), math.trunc(_to_float(b))
+        if divisor == 0:
+            raise FilterRuntimeError(
+                f"{_describe(a)} and {_describe(b)} cannot be divided (remainder) "
+                "because the divisor is zero"
+            )
+        remainder = abs(dividend) % abs(divisor)
+        return -remainder if dividend < 0 else remainder
+    raise FilterRuntimeError(f"{_describe(a)} and {_describe(b)} cannot be divided")
+
+
+_OPERATORS: dict[str, Callable[[Any, Any], Any]] = {
+    "+": _add,
+    "-": _subtract,
+    "*": _multiply,
+    "/": _divide,
+    "%": _modulo,
+    "==": lambda a, b: _compare(a, b) == 0,
+    "!=": lambda a, b: _compare(a, b) != 0,
+    "<": lambda a, b: _compare(a, b) < 0,
+    "<=": lambda a, b: _compare(a, b) <= 0,
+    ">": lambda a, b: _compare(a, b) > 0,
+    ">=": lambda a, b: _compare(a, b) >= 0,
+}
+
+
+def _negate(value: Any) -> Any:
+    if _is_number(value):
+        # Negating zero gives negative zero, which jq prints as -0
+        return -value if value else -_to_float(value)
+    raise FilterRuntimeError(f"{_describe(value)} cannot be negated")
+
+
+def _length(value: Any) -> Any:
+    if value is None:
+        return 0
+    if _is_number(value):
+        return abs(value)
+    if isinstance(value, (str, list, dict)):
+        return len(value)
+    raise FilterRuntimeError(f"{_describe(value)} has no length")
+
+
+def _keys(value: Any, *, ordered: bool = True) -> list[Any]:
+    if isinstance(value, dict):
+        return sorted(value) if ordered else list(value)
+    if isinstance(value, list):
+        return list(range(len(value)))
+    raise FilterRuntimeError(f"{_describe(value)} has no keys")
+
+
+def _add_all(value: Any) -> Any:
+    total = None
+    for item in _iterate(value):
+        total = _add(total, item)
+    return total
+
+
+def _sort(value: Any) -> list[Any]:
+    if isinstance(value, list):
+        return sorted(value, key=functools.cmp_to_key(_compare))
+    raise FilterRuntimeError(f"{_describe(value)} cannot be sorted, as it is not an array")
+
+
+def _tostring(value: Any) -> str:
+    return value if isinstance(value, str) else to_json(value)
+
+
+def _has(value: Any, key: Any) -> bool:
+    if value is None:
+        return False
+    if isinstance(value, dict) and isinstance(key, str):
+        return key in value
+    if isinstance(value, list) and _is_number(key):
+        return bool(0 <= key < len(value))
+    raise FilterRuntimeError(f"Cannot check whether {_kind(value)} has a {_kind(key)} key")
+
+
+_SCALAR_BUILTINS: dict[str, _Fn] = {
+    "not": lambda v: not _truthy(v),
+    "length": _length,
+    "keys": _keys,
+    "keys_unsorted": lambda v: _keys(v, ordered=False),
+    "add": _add_all,
+    "sort": _sort,
+    "type": _kind,
+    "tostring": _tostring,
+}
+
+
+class _NegativeZero:
+    """Stands for -0.0 in normalized output; json.dumps cannot print it as jq does."""
+
+
+_NEGATIVE_ZERO = _NegativeZero()
+
+
+def _jq_number(value: int | float) -> Any:
+    """A number as jq 1.6 prints it, as the int or float json.dumps prints that way."""
+    if type(value) is int and -_EXACT_INTEGER < value < _EXACT_INTEGER:
+        return value
+    number = _to_float(value)
+    if math.isnan(number):
+        return None
+    if math.isinf(number):
+        number = math.copysign(sys.float_info.max, number)
+    if not number.is_integer():
+        # Shortest round-trip digits, in exponent form below 1e-4: as jq
+        return number
+    if number == 0 and math.copysign(1, number) < 0:
+        return _NEGATIVE_ZERO
+    if abs(number) < 1e16:
+        return int(number)
+    # jq prints large integers in full unless that needs more than 15
+    # trailing zeros after the shortest round-trip digits
+    mantissa, _, exponent = repr(abs(number)).partition("e")
+    digits = mantissa.replace(".", "").rstrip("0")
+    point = int(exponent) + 1
+    if point > len(digits) + 15:
+        return number
+    magnitude = int(digits + "0" * (point - len(digits)))
+    return -magnitude if number < 0 else magnitude
+
+
+def _normalize(value: Any) -> Any:
+    kind = type(value)
+    if kind is int or kind is float:
+        return _jq_number(value)
+    if kind is list:
+        return [_normalize(item) for item in value]
+    if kind is dict:
+        return {key: _normalize(item) for key, item in value.items()}
+    return value
+
+
+def to_json(value: Any) -> str:
+    """
+    Serialize a value as compact JSON, the way `jq -c` prints it.
+
+    Args:
+        value: A JSON value, e.g. an output of a CompiledFilter.
+
+    Returns:
+        The JSON text, without a trailing newline.
+    """
+    normalized = _normalize(value)
+    try:
+        text = _ENCODER.encode(normalized)
+    except _Fallback:
+        text = _dump(normalized)
+    return text.replace("\x7f", "\\u007f")
+
+
+def _reject_negative_zero(value: Any) -> Any:
+    if value is _NEGATIVE_ZERO:
+        raise _Fallback
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Built once: json.dumps with options builds an encoder per call
+_ENCODER = json.JSONEncoder(
+    ensure_ascii=False, separators=(",", ":"), default=_reject_negative_zero
+)
+
+
+def _dump(value: Any) -> str:
+    """Serialize normalized output that holds negative zeros."""
+    if value is _NEGATIVE_ZERO:
+        return "-0"
+    if type(value) is list:
+        return "[" + ",".join(_dump(item) for item in value) + "]"
+    if type(value) is dict:
+        items = (
+            f"{json.dumps(key, ensure_ascii=False)}:{_dump(item)}" for key, item in value.items()
+        )
+        return "{" + ",".join(items) + "}"
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _single(node: _Node) -> _Fn | None:
+    """Compile a node that produces exactly one output per input, or None."""
+    if isinstance(node, _Identity):
+        return lambda v: v
+    if isinstance(node, _Literal):
+        value = node.value
+        return lambda _: value
+    if isinstance(node, _Index):
+        names = _path(node)
+        if names is not None:
+            return functools.partial(_get_path, names)
+        return _single_parts(node, node.target, node.key)
+    if isinstance(node, _Collect):
+        body = _compile(node.body)
+        return lambda v: list(body(v))
+    if isinstance(node, _Object):
+        return _single_object(node)
+    if isinstance(node, _Negate):
+        return _single_parts(node, node.body)
+    if isinstance(node, (_Binary, _And, _Or, _Alternative, _Pipe)):
+        return _single_parts(node, node.left, node.right)
+    if isinstance(node, _If):
+        return _single_parts(node, node.cond, node.then, node.other)
+    if isinstance(node, _Call):
+        return _single_call(node)
+    return None
+
+
+def _single_parts(node: _Node, *children: _Node) -> _Fn | None:
+    """Combine single-output children into a node's single-output function."""
+    parts = [_single(child) for child in children]
+    fns = [fn for fn in parts if fn is not None]
+    if len(fns) < len(parts):
+        return None
+    if isinstance(node, _Index):
+        target, key = fns
+        return lambda v: _index(target(v), key(v))
+    if isinstance(node, _Negate):
+        (body,) = fns
+        return lambda v: _negate(body(v))
+    if isinstance(node, _If):
+        cond, then, other = fns
+        return lambda v: then(v) if _truthy(cond(v)) else other(v)
+    left, right = fns
+    if isinstance(node, _And):
+        return lambda v: _truthy(left(v)) and _truthy(right(v))
+    if isinstance(node, _Or):
+        return lambda v: _truthy(left(v)) or _truthy(right(v))
+    if isinstance(node, _Alternative):
+        return lambda v: _alternative(left(v), right, v)
+    if isinstance(node, _Pipe):
+        return lambda v: right(left(v))
+    assert isinstance(node, _Binary), node
+    op = _OPERATORS[node.op]
+    return lambda v: op(left(v), right(v))
+
+
+def _path(node: _Node) -> tuple[str, ...] | None:
+    """Field names of a path such as .a.b.c from the input, or None."""
+    names: list[str] = []
+    while isinstance(node, _Index):
+        if not (isinstance(node.key, _Literal) and isinstance(node.key.value, str)):
+            return None
+        names.append(node.key.value)
+        node = node.target
+    if not isinstance(node, _Identity) or not names:
+        return None
+    return tuple(reversed(names))
+
+
+def _get_path(names: tuple[str, ...], value: Any) -> Any:
+    for name in names:
+        if isinstance(value, dict):
+            value = value.get(name)
+        elif value is not None:
+            raise FilterRuntimeError(f'Cannot index {_kind(value)} with string "{name}"')
+    return value
+
+
+def _single_object(node: _Object) -> _Fn | None:
+    if not all(isinstance(key, _Literal) and isinstance(key.value, str) for key, _ in node.entries):
+        return None
+    pairs: list[tuple[str, _Fn]] = []
+    for key, value in node.entries:
+        fn = _single(value)
+        if fn is None or not isinstance(key, _Literal):
+            return None
+        pairs.append((key.value, fn))
+    return lambda v: {key: fn(v) for key, fn in pairs}
+
+
+def _alternative(value: Any, right: _Fn, v: Any) -> Any:
+    return value if _truthy(value) else right(v)
+
+
+def _single_call(node: _Call) -> _Fn | None:
+    if node.name in _SCALAR_BUILTINS:
+        return _SCALAR_BUILTINS[node.name]
+    if node.name == "map":
+        body = _compile(node.args[0])
+        return lambda v: [out for item in _iterate(v) for out in body(item)]
+    if node.name == "has":
+        key = _single(node.args[0])
+        return None if key is None else (lambda v: _has(v, key(v)))
+    return None
+
+
+def _compile(node: _Node) -> _Gen:
+    """Compile a node to a function yielding its outputs for an input."""
+    single = _single(node)
+    if single is not None:
+        return lambda v: (single(v),)
+    if isinstance(node, _Index):
+        return _compile_index(node)
+    if isinstance(node, _Iterate):
+        target = _compile(node.target)
+        if node.optional:
+            return lambda v: (
+                item for t in target(v) if isinstance(t, (list, dict)) for item in _iterate(t)
+            )
+        return lambda v: (item for t in target(v) for item in _iterate(t))
+    if isinstance(node, _Try):
+        return _compile_try(node)
+    if isinstance(node, _Pipe):
+        left, right = _compile(node.left), _compile(node.right)
+        return lambda v: (out for x in left(v) for out in right(x))
+    if isinstance(node, _Comma):
+        return _compile_comma(node)
+    if isinstance(node, _Object):
+        return _compile_object(node)
+    if isinstance(node, _Negate):
+        body = _compile(node.body)
+        return lambda v: (_negate(x) for x in body(v))
+    if isinstance(node, _Binary):
+        return _compile_binary(node)
+    if isinstance(node, (_And, _Or)):
+        return _compile_logic(node)
+    if isinstance(node, _Alternative):
+        return _compile_alternative(node)
+    if isinstance(node, _If):
+        cond, then, other = _compile(node.cond), _compile(node.then), _compile(node.other)
+        return lambda v: (out for c in cond(v) for out in (then(v) if _truthy(c) else other(v)))
+    assert isinstance(node, _Call), node
+    return _compile_call(node)
+
+
+def _compile_index(node: _Index) -> _Gen:
+    target, key = _compile(node.target), _compile(node.key)
+    # jq loops over the keys outermost
+    return lambda v: (_index(t, k) for k in key(v) for t in target(v))
+
+
+def _compile_try(node: _Try) -> _Gen:
+    body = _compile(node.body)
+
+    def attempt(v: Any) -> Iterator[Any]:
+        try:
+            yield from body(v)
+        except FilterRuntimeError:
+            return
+
+    return attempt
+
+
+def _compile_comma(node: _Comma) -> _Gen:
+    first, second = _compile(node.left), _compile(node.right)
+
+    # Outputs of the left side are kept if the right side fails
+    def comma(v: Any) -> Iterator[Any]:
+        yield from first(v)
+        yield from second(v)
+
+    return comma
+
+
+def _compile_object(node: _Object) -> _Gen:
+    entries = [(_compile(key), _compile(value)) for key, value in node.entries]
+
+    def build(v: Any, i: int, partial: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        if i == len(entries):
+            yield partial
+            return
+        keys, values = entries[i]
+        for key in keys(v):
+            if not isinstance(key, str):
+                raise FilterRuntimeError(f"Object keys must be strings, not {_describe(key)}")
+            for value in values(v):
+                yield from build(v, i + 1, {**partial, key: value})
+
+    return lambda v: build(v, 0, {})
+
+
+def _compile_binary(node: _Binary) -> _Gen:
+    left, right = _compile(node.left), _compile(node.right)
+    op = _OPERATORS[node.op]
+    # jq loops over the right operand's outputs outermost
+    return lambda v: (op(a, b) for b in right(v) for a in left(v))
+
+
+def _compile_logic(node: _And | _Or) -> _Gen:
+    left, right = _compile(node.left), _compile(node.right)
+    short_circuit = isinstance(node, _Or)
+
+    def logic(v: Any) -> Iterator[bool]:
+        for a in left(v):
+            if _truthy(a) == short_circuit:
+                yield short_circuit
+            else:
+                for b in right(v):
+                    yield _truthy(b)
+
+    return logic
+
+
+def _compile_alternative(node: _Alternative) -> _Gen:
+    left, right = _compile(node.left), _compile(node.right)
+
+    # Unlike later versions, jq 1.6 lets errors on the left side through
+    def alternative(v: Any) -> Iterator[Any]:
+        found = False
+        for value in left(v):
+            if _truthy(value):
+                found = True
+                yield value
+        if not found:
+            yield from right(v)
+
+    return alternative
+
+
+def _compile_call(node: _Call) -> _Gen:
+    if node.name == "empty":
+        return lambda _: ()
+    if node.name == "select":
+        cond = _compile(node.args[0])
+        return lambda v: (v for c in cond(v) if _truthy(c))
+    assert node.name == "has", node
+    key = _compile(node.args[0])
+    return lambda v: (_has(v, k) for k in key(v))
+
+
+@functools.cache
+def _numpy() -> Any:
+    """The numpy module, or None if it is not installed."""
+    if importlib.util.find_spec("numpy") is None:
+        return None
+    return importlib.import_module("numpy")
+
+
+def numpy_available() -> bool:
+    """Whether NumPy is installed, enabling columnar evaluation."""
+    return _numpy() is not None
+
+
+def _pipeline(node: _Node) -> list[_Node]:
+    if isinstance(node, _Pipe):
+        return _pipeline(node.left) + _pipeline(node.right)
+    return [node]
+
+
+def _vectorizable(node: _Node) -> bool:
+    """Whether a node evaluates column-wise to one value per row."""
+    if isinstance(node, _Literal):
+        return node.value is None or isinstance(node.value, (bool, int, float, str))
+    if isinstance(node, _Index):
+        return _path(node) is not None
+    if isinstance(node, _Binary):
+        return _vectorizable(node.left) and _vectorizable(node.right) and node.op != "%"
+    if isinstance(node, (_And, _Or)):
+        return _vectorizable(node.left) and _vectorizable(node.right)
+    if isinstance(node, _Negate):
+        return _vectorizable(node.body)
+    if isinstance(node, _Pipe):
+        return node.right == _Call("not", ()) and _vectorizable(node.left)
+    return False
+
+
+@dataclass(frozen=True)
+class _ColumnarPlan:
+    """
+    A row-wise body as select stages followed by a projection.
+
+    Attributes:
+        predicates: Conditions of the select stages, in order.
+        projection: The output per selected row; _Identity for the row itself.
+    """
+
+    predicates: tuple[_Node, ...]
+    projection: _Node
+
+    @classmethod
+    def build(cls, body: _Node) -> "_ColumnarPlan | None":
+        stages = _pipeline(body)
+        predicates: list[_Node] = []
+        projection: _Node = _Identity()
+        for i, stage in enumerate(stages):
+            if isinstance(stage, _Call) and stage.name == "select":
+                if not _vectorizable(stage.args[0]):
+                    return None
+                predicates.append(stage.args[0])
+            elif i == len(stages) - 1 and cls._projectable(stage):
+                projection = stage
+            else:
+                return None
+        if not predicates and isinstance(projection, _Identity):
+            return None
+        return cls(tuple(predicates), projection)
+
+    @staticmethod
+    def _projectable(node: _Node) -> bool:
+        if isinstance(node, _Object):
+            return all(
+                isinstance(key, _Literal) and isinstance(key.value, str) and _vectorizable(value)
+                for key, value in node.entries
+            )
+        return _vectorizable(node)
+
+    def run(self, rows: list[dict[str, Any]]) -> list[Any]:
+        """
+        Evaluate the body over rows that are all objects.
+
+        Raises:
+            _Fallback: If a column cannot represent jq's result exactly.
+        """
+        np = _numpy()
+        for predicate in self.predicates:
+            mask = _Columns(np, rows).truth(predicate)
+            rows = [row for row, keep in zip(rows, mask.tolist(), strict=True) if keep]
+            if not rows:
+                return []
+        if isinstance(self.projection, _Identity):
+            return rows
+        columns = _Columns(np, rows)
+        if isinstance(self.projection, _Object):
+            keys = [key.value for key, _ in self.projection.entries if isinstance(key, _Literal)]
+            values = [columns.output(value) for _, value in self.projection.entries]
+            return [dict(zip(keys, row, strict=True)) for row in zip(*values, strict=True)]
+        return columns.output(self.projection)
+
+
+_ARRAY_COMPARISONS: dict[str, Callable[[Any, Any], Any]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class _Columns:
+    """Column-wise evaluation of vectorizable nodes over a list of objects."""
+
+    def __init__(self, np: Any, rows: list[dict[str, Any]]) -> None:
+        self.np = np
+        self.rows = rows
+        self._raw: dict[tuple[str, ...], list[Any]] = {}
+
+    def raw(self, names: tuple[str, ...]) -> list[Any]:
+        """A path's values per row, as jq reads them."""
+        if names not in self._raw:
+            column: list[Any] = []
+            for row in self.rows:
+                value: Any = row
+                for name in names:
+                    if isinstance(value, dict):
+                        value = value.get(name)
+                    elif value is not None:
+                        raise _Fallback
+                column.append(value)
+            self._raw[names] = column
+        return self._raw[names]
+
+    def numbers(self, node: _Node) -> Any:
+        """A node's values as float64 (array or scalar), like jq's doubles."""
+        np = self.np
+        if isinstance(node, _Literal):
+            if not _is_number(node.value):
+                raise _Fallback
+            return _to_float(node.value)
+        if isinstance(node, _Index):
+            column = self.raw(_path(node) or ())
+            if not all(type(x) is int or type(x) is float for x in column):
+                raise _Fallback
+            try:
+                return np.array(column, dtype=np.float64)
+            except OverflowError as e:
+                raise _Fallback from e
+        if isinstance(node, _Negate):
+            return -self.numbers(node.body)
+        if isinstance(node, _Binary) and node.op in _ARITHMETIC:
+            left, right = self.numbers(node.left), self.numbers(node.right)
+            if node.op == "/" and np.any(right == 0):
+                raise _Fallback
+            # Overflow to infinity (and inf - inf) is what jq computes too; the
+            # results are normalized on output, so NumPy need not warn about it
+            with np.errstate(over="ignore", invalid="ignore"):
+                if node.op == "+":
+                    return left + right
+                if node.op == "-":
+                    return left - right
+                if node.op == "*":
+                    return left * right
+                return left / right
+        raise _Fallback
+
+    def strings(self, node: _Node) -> Any:
+        """A node's values as a unicode array (or scalar)."""
+        if isinstance(node, _Literal) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, _Index):
+            column = self.raw(_path(node) or ())
+            # NumPy unicode arrays drop trailing NULs, which jq compares
+            if not all(type(x) is str and "\x00" not in x for x in column):
+                raise _Fallback
+            return self.np.array(column, dtype=str)
+        raise _Fallback
+
+    def compare(self, node: _Binary) -> Any:
+        np = self.np
+        for side, other in ((node.left, node.right), (node.right, node.left)):
+            if (
+                node.op in ("==", "!=")
+                and isinstance(other, _Literal)
+                and (other.value is None or isinstance(other.value, bool))
+                and isinstance(side, _Index)
+            ):
+                # Identity, not ==: jq never equates false with 0 or true with 1
+                matches = np.array([x is other.value for x in self.raw(_path(side) or ())])
+                return matches if node.op == "==" else ~matches
+        try:
+            left, right = self.numbers(node.left), self.numbers(node.right)
+        except _Fallback:
+            left, right = self.strings(node.left), self.strings(node.right)
+        result = _ARRAY_COMPARISONS[node.op](left, right)
+        return np.broadcast_to(result, (len(self.rows),))
+
+    def truth(self, node: _Node) -> Any:
+        """A boolean mask of the rows where a node's value is truthy."""
+        np = self.np
+        rows = len(self.rows)
+        if isinstance(node, _Binary) and node.op in _COMPARISONS:
+            return self.compare(node)
+        if isinstance(node, _And):
+            return self.truth(node.left) & self.truth(node.right)
+        if isinstance(node, _Or):
+            return self.truth(node.left) | self.truth(node.right)
+        if isinstance(node, _Pipe):  # X | not
+            return ~self.truth(node.left)
+        if isinstance(node, _Literal):
+            return np.full(rows, _truthy(node.value))
+        if isinstance(node, _Index):
+            return np.array([_truthy(x) for x in self.raw(_path(node) or ())], dtype=bool)
+        self.numbers(node)  # arithmetic: numbers are always truthy
+        return np.ones(rows, dtype=bool)
+
+    def output(self, node: _Node) -> list[Any]:
+        """A node's value per row, as Python values."""
+        rows = len(self.rows)
+        if isinstance(node, _Literal):
+            return [node.value] * rows
+        if isinstance(node, _Index):
+            return self.raw(_path(node) or ())
+        if isinstance(node, (_And, _Or, _Pipe)) or (
+            isinstance(node, _Binary) and node.op in _COMPARISONS
+        ):
+            values: list[Any] = self.truth(node).tolist()
+            return values
+        values = self.np.broadcast_to(self.numbers(node), (rows,)).tolist()
+        return values
+
+
+class CompiledFilter:
+    """
+    A jq filter compiled to Python.
+
+    Attributes:
+        source: The filter's jq source.
+        columnar: Whether batches (run_batch) or arrays of objects (calls
+            on map-style filters) can be evaluated column-wise with NumPy.
+    """
+
+    def __init__(self, source: str, tree: _Node, *, columnar: bool = True) -> None:
+        """
+        Compile a parsed filter.
+
+        Args:
+            source: The filter's jq source.
+            tree: Its syntax tree.
+            columnar: Plan column-wise evaluation if NumPy is installed.
+        """
+        self.source = source
+        self._run = _compile(tree)
+        self._row_plan: _ColumnarPlan | None = None
+        self._array_plan: _ColumnarPlan | None = None
+        self._array_collects = False
+        if columnar and numpy_available():
+            self._row_plan = _ColumnarPlan.build(tree)
+            body, self._array_collects = self._mapped_body(tree)
+            if body is not None:
+                self._array_plan = _ColumnarPlan.build(body)
+        self.columnar = self._row_plan is not None or self._array_plan is not None
+
+    @staticmethod
+    def _mapped_body(tree: _Node) -> tuple[_Node | None, bool]:
+        """The body applied to each element by map(f), [.[] | f] or .[] | f."""
+        if isinstance(tree, _Call) and tree.name == "map":
+            return tree.args[0], True
+        collects = isinstance(tree, _Collect)
+        stages = _pipeline(tree.body if isinstance(tree, _Collect) else tree)
+        if len(stages) > 1 and stages[0] == _Iterate(_Identity()):
+            body = stages[1]
+            for stage in stages[2:]:
+                body = _Pipe(body, stage)
+            return body, collects
+        return None, False
+
+    def __call__(self, value: Any) -> list[Any]:
+        """
+        Run the filter on one input.
+
+        Args:
+            value: The input JSON value (as parsed by json.loads).
+
+        Returns:
+            The filter's outputs, in order.
+
+        Raises:
+            FilterRuntimeError: If jq would fail on this input.
+        """
+        if (
+            self._array_plan is not None
+            and isinstance(value, list)
+            and len(value) >= MIN_COLUMNAR_ROWS
+            and all(type(item) is dict for item in value)
+        ):
+            try:
+                outputs = self._array_plan.run(value)
+            except _Fallback:
+                pass
+            else:
+                return [outputs] if self._array_collects else outputs
+        return list(self._run(value))
+
+    def run_batch(
+        self,
+        values: Sequence[Any],
+        on_error: Callable[[int, FilterRuntimeError], None] | None = None,
+    ) -> list[Any]:
+        """
+        Run the filter on each input in turn, as jq does over a stream.
+
+        Batches of objects are evaluated column-wise where the filter allows.
+
+        Args:
+            values: The inputs.
+            on_error: Optional callback receiving the position of an input
+                the filter failed on and the error; evaluation then goes on
+                with the next input, keeping the failed input's outputs
+                before the error, like jq. Without it the error is raised.
+
+        Returns:
+            The outputs of all inputs, in order.
+
+        Raises:
+            FilterRuntimeError: If the filter fails on an input and there is
+                no on_error callback.
+        """
+        if (
+            self._row_plan is not None
+            and len(values) >= MIN_COLUMNAR_ROWS
+            and all(type(value) is dict for value in values)
+        ):
+            try:
+                return self._row_plan.run(list(values))
+            except _Fallback:
+                pass
+        outputs: list[Any] = []
+        for i, value in enumerate(values):
+            try:
+                for output in self._run(value):
+                    outputs.append(output)
+            except FilterRuntimeError as e:
+                if on_error is None:
+                    raise
+                on_error(i, e)
+        return outputs
+
+
+def compile_filter(filter_code: str, *, columnar: bool = True) -> CompiledFilter:
+    """
+    Compile a jq filter to a Python callable.
+
+    Args:
+        filter_code: The jq filter.
+        columnar: Evaluate batches of objects column-wise with NumPy where
+            the filter allows it and NumPy is installed.
+
+    Returns:
+        The compiled filter.
+
+    Raises:
+        UnsupportedFilterError: If the filter uses jq features outside the
+            compiled subset (or is not valid jq).
+    """
+    return CompiledFilter(filter_code, _Parser(filter_code).parse(), columnar=columnar)
+
+
+def compile_solution(solution: Solution, *, columnar: bool = True) -> CompiledFilter:
+    """
+    Compile the filter of a solved task.
+
+    Args:
+        solution: A successful solution.
+        columnar: As for compile_filter.
+
+    Returns:
+        The compiled best filter.
+
+    Raises:
+        ValueError: If the solution was not successful.
+        UnsupportedFilterError: If its filter is outside the compiled subset.
+    """
+    if not solution.success:
+        raise ValueError(f"Task '{solution.task_id}' was not solved")
+    return compile_filter(solution.best_filter, columnar=columnar)
@@ -6,7 +6,7 @@ including error types, task definitions, execution results, and solution trackin
 All classes are frozen dataclasses to ensure immutability.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any
 
@@ -105,6 +105,75 @@ class ExampleResult:
     expected_output: Any
 
 
+@dataclass(frozen=True)
+class ScalingResult:
+    """
+    How a filter's jq run time and output grow on scaled-up inputs.
+
+    Measured by src.scaling.ScalingReviewer on an example input whose arrays
+    are grown to each of two lengths by replicating their elements.
+
+    Attributes:
+        sizes: The two array lengths measured.
+        seconds: Fastest wall-clock jq time at each size.
+        output_bytes: Output size at each size.
+        time_exponent: Fitted exponent k of the filter's own run time, without
+            jq's startup and parsing (1.0: linear, 2.0: quadratic), or None
+            if the run time was too short to measure.
+        output_exponent: Fitted exponent of the output size, or None if there
+            was no output.
+        timed_out: Whether jq timed out on a scaled input.
+        superlinear: Whether the filter grows faster than the policy allows
+            (or timed out).
+        feedback: What was measured, for the LLM; empty unless superlinear.
+    """
+
+    sizes: tuple[int, int]
+    seconds: tuple[float, float]
+    output_bytes: tuple[int, int]
+    time_exponent: float | None
+    output_exponent: float | None
+    timed_out: bool
+    superlinear: bool
+    feedback: str = ""
+
+
+@dataclass(frozen=True)
+class OptimizationResult:
+    """
+    Outcome of searching for a faster filter equivalent to a solution's.
+
+    Measured by src.optimizer.FilterOptimizer on an example input whose arrays
+    are grown to a benchmark size.
+
+    Attributes:
+        original_filter: The filter the solve found.
+        best_filter: The fastest equivalent filter, or original_filter if no
+            alternative was enough faster.
+        source: Where best_filter came from: the rewrite rules applied, "llm"
+            or "original".
+        size: Array length of the benchmark input.
+        seconds: The filter's own jq time (without startup and parsing) of
+            original_filter and best_filter on the benchmark input.
+        speedup: seconds[0] / seconds[1].
+        candidates: Alternatives proposed by the rewriter and the LLM.
+        equivalent: Alternatives with the same output as original_filter on
+            every checked input.
+        timed_out: Whether original_filter timed out on the benchmark input,
+            in which case seconds[0] and speedup are lower bounds.
+    """
+
+    original_filter: str
+    best_filter: str
+    source: str
+    size: int
+    seconds: tuple[float, float]
+    speedup: float
+    candidates: int
+    equivalent: int
+    timed_out: bool = False
+
+
 @dataclass(frozen=True)
 class Attempt:
     """
@@ -116,6 +185,11 @@ class Attempt:
         example_results: Results for each example in the task.
         aggregated_score: Average score across all examples.
         primary_error: The most significant error type encountered.
+        timings: Seconds spent per phase (see src/timing.py) generating and
+            evaluating this attempt; empty unless timings are recorded.
+        scaling: Growth on scaled-up inputs, measured for filters passing
+            every example when the scaling review is enabled; a superlinear
+            attempt's score is penalized.
     """
 
     iteration: int
@@ -123,6 +197,8 @@ class Attempt:
     example_results: list[ExampleResult]
     aggregated_score: float
     primary_error: ErrorType
+    timings: dict[str, float] = field(default_factory=dict)
+    scaling: ScalingResult | None = None
 
     @property
     def is_perfect(self) -> bool:
@@ -150,6 +226,14 @@ class Solution:
         best_score: The score of the best filter.
         iterations_used: Total number of iterations attempted.
         history: List of all attempts made during solving.
+        timings: Seconds spent per phase over the whole solve, including
+            failed generations and deterministic candidates; empty unless
+            timings are recorded.
+        scaling: Growth of best_filter on scaled-up inputs, if the scaling
+            review measured it. A superlinear filter is only returned when no
+            passing filter scaled within the policy.
+        optimization: The search for a faster equivalent filter, if the
+            optimizer ran; best_filter is then its best_filter.
     """
 
     task_id: str
@@ -158,3 +242,6 @@ class Solution:
     best_score: float
     iterations_used: int
     history: list[Attempt]
+    timings: dict[str, float] = field(default_factory=dict)
+    scaling: ScalingResult | None = None
+    optimization: OptimizationResult | None = None
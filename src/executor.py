@@ -6,19 +6,45 @@ subprocess environment with timeout and output size limits to prevent denial of
 service attacks and resource exhaustion.
 """
 
+import asyncio
+import functools
 import json
 import logging
 import shutil
 import subprocess
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
 from typing import Any
 
 from src.domain import ExecutionResult
+from src.metrics import get_metrics
+from src.timing import EXECUTION, add_phase
+from src.tracing import NoopSpan, Span, filter_hash, span
 
-__all__ = ["ExecutionResult", "JQExecutor"]
+__all__ = ["ExecutionResult", "ExecutorStats", "JQExecutor"]
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class ExecutorStats:
+    """
+    Counters over all jq processes spawned by an executor.
+
+    Attributes:
+        spawns: jq processes started.
+        timeouts: Processes killed after exceeding the timeout.
+        total_sec: Wall-clock seconds spent in jq processes (summed, so
+            concurrent runs count separately).
+    """
+
+    spawns: int = 0
+    timeouts: int = 0
+    total_sec: float = 0.0
+
+
 class JQExecutor:
     """
     Executes jq filters safely with resource limits.
@@ -32,8 +58,13 @@ class JQExecutor:
         jq_path: Resolved path to the jq binary.
         timeout_sec: Maximum execution time in seconds.
         max_output_bytes: Maximum output size in bytes.
+        stats: Spawn, timeout and run-time counters.
+        version: The binary's `jq --version` output, read on first use.
     """
 
+    # Upper bound on concurrent jq processes spawned by run_async per event loop
+    MAX_ASYNC_PROCESSES = 32
+
     def __init__(
         self,
         jq_path: str = "jq",
@@ -61,6 +92,10 @@ class JQExecutor:
         self.jq_path = resolved_path
         self.timeout_sec = timeout_sec
         self.max_output_bytes = max_output_bytes
+        self.stats = ExecutorStats()
+        self._stats_lock = threading.Lock()
+        self._semaphore: asyncio.Semaphore | None = None
+        self._semaphore_loop: asyncio.AbstractEventLoop | None = None
 
         logger.debug(
             "JQExecutor initialized: jq_path=%s, timeout_sec=%s, max_output_bytes=%s",
@@ -69,6 +104,22 @@ class JQExecutor:
             self.max_output_bytes,
         )
 
+    @functools.cached_property
+    def version(self) -> str:
+        """The binary's `jq --version` output (e.g. 'jq-1.6'), or '' if it cannot say."""
+        try:
+            proc = subprocess.run(
+                [self.jq_path, "--version"],
+                capture_output=True,
+                text=True,
+                timeout=max(self.timeout_sec, 5.0),
+                check=False,
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning("Failed to read the jq version: %s", e)
+            return ""
+        return proc.stdout.strip()
+
     def run(self, filter_code: str, input_data: Any) -> ExecutionResult:
         """
         Execute a jq filter on the given input data.
@@ -83,6 +134,13 @@ class JQExecutor:
             - 124: Execution timed out
             - 137: Output exceeded size limit (truncated)
         """
+        with span("JQExecutor.run") as trace:
+            result = self._run(filter_code, input_data)
+            self._annotate_span(trace, filter_code, result)
+        return result
+
+    def _run(self, filter_code: str, input_data: Any) -> ExecutionResult:
+        """Body of run(), outside its trace span."""
         # Serialize input data to JSON
         try:
             input_json = json.dumps(input_data)
@@ -95,70 +153,69 @@ class JQExecutor:
                 is_timeout=False,
             )
 
-        # SECURITY: Build command as list to prevent shell injection
-        # filter_code is passed as an argument, NOT through shell
-        cmd = [self.jq_path, "-M", "-c", filter_code]
-
         logger.debug(
             "Executing jq: filter='%s', input_size=%d bytes",
             filter_code,
             len(input_json),
         )
+        return self._spawn([filter_code], input_json.encode("utf-8"))
+
+    def run_raw(
+        self, filter_code: str, input_bytes: bytes, options: Sequence[str] = ()
+    ) -> ExecutionResult:
+        """
+        Execute a jq filter on input that is already serialized.
+
+        jq reads every JSON text in the input in turn, so one process can
+        filter many records (e.g. a chunk of an NDJSON file). The timeout and
+        output limit apply to the whole run.
+
+        Args:
+            filter_code: The jq filter expression to execute.
+            input_bytes: UTF-8 encoded JSON texts, as jq reads them from stdin.
+            options: Extra jq options placed before the filter, e.g. ['--seq'].
+
+        Returns:
+            ExecutionResult, with the same special exit codes as run().
+        """
+        with span("JQExecutor.run_raw") as trace:
+            logger.debug(
+                "Executing jq: filter='%s', raw input_size=%d bytes",
+                filter_code,
+                len(input_bytes),
+            )
+            result = self._spawn([*options, filter_code], input_bytes)
+            self._annotate_span(trace, filter_code, result)
+        return result
 
+    def _spawn(self, args: list[str], input_bytes: bytes) -> ExecutionResult:
+        """Run jq with the given arguments after the output options."""
+        # SECURITY: Build command as list to prevent shell injection
+        # filter_code is passed as an argument, NOT through shell
+        cmd = [self.jq_path, "-M", "-c", *args]
+
+        start = time.perf_counter()
         try:
             # SECURITY: subprocess.run with cmd as list (not shell=True)
             # prevents command injection even with malicious filter_code
             result = subprocess.run(
                 cmd,
-                input=input_json,
+                input=input_bytes,
                 capture_output=True,
-                text=True,
                 timeout=self.timeout_sec,
                 check=False,  # Don't raise on non-zero exit
                 # shell=False is default - explicitly avoiding shell injection
             )
 
-            stdout = result.stdout
-            stderr = result.stderr
-            exit_code = result.returncode
-
-            # Check output size limit
-            stdout_bytes = stdout.encode("utf-8")
-            if len(stdout_bytes) > self.max_output_bytes:
-                logger.warning(
-                    "Output exceeded size limit: %d > %d bytes",
-                    len(stdout_bytes),
-                    self.max_output_bytes,
-                )
-                # Truncate at byte boundary, handling potential mid-character cuts
-                truncated_bytes = stdout_bytes[: self.max_output_bytes]
-                truncated_stdout = truncated_bytes.decode("utf-8", errors="ignore")
-                return ExecutionResult(
-                    stdout=truncated_stdout,
-                    stderr="Output too large",
-                    exit_code=137,
-                    is_timeout=False,
-                )
-
-            # Strip trailing newlines for cleaner output comparison
-            stdout = stdout.rstrip("\n")
-            stderr = stderr.rstrip("\n")
-
-            logger.debug(
-                "jq execution completed: exit_code=%d, stdout_len=%d, stderr_len=%d",
-                exit_code,
-                len(stdout),
-                len(stderr),
-            )
-
-            return ExecutionResult(
-                stdout=stdout,
-                stderr=stderr,
-                exit_code=exit_code,
-                is_timeout=False,
+            self._record_spawn(time.perf_counter() - start, timed_out=False)
+            return self._result(
+                result.stdout.decode("utf-8", errors="replace"),
+                result.stderr.decode("utf-8", errors="replace"),
+                result.returncode,
             )
 
         except subprocess.TimeoutExpired:
+            self._record_spawn(time.perf_counter() - start, timed_out=True)
             logger.warning(
                 "jq execution timed out after %s seconds",
                 self.timeout_sec,
@@ -169,3 +226,167 @@ class JQExecutor:
                 exit_code=124,
                 is_timeout=True,
             )
+
+    async def run_async(self, filter_code: str, input_data: Any) -> ExecutionResult:
+        """
+        Execute a jq filter without blocking the event loop.
+
+        Behaves exactly like run(), but spawns jq with
+        asyncio.create_subprocess_exec. At most MAX_ASYNC_PROCESSES jq
+        processes run concurrently per event loop.
+
+        Args:
+            filter_code: The jq filter expression to execute.
+            input_data: The JSON-serializable input data to process.
+
+        Returns:
+            ExecutionResult, with the same special exit codes as run().
+        """
+        with span("JQExecutor.run") as trace:
+            result = await self._run_async(filter_code, input_data)
+            self._annotate_span(trace, filter_code, result)
+        return result
+
+    async def _run_async(self, filter_code: str, input_data: Any) -> ExecutionResult:
+        """Body of run_async(), outside its trace span."""
+        try:
+            input_json = json.dumps(input_data)
+        except (TypeError, ValueError) as e:
+            logger.warning("Failed to serialize input data: %s", e)
+            return ExecutionResult(
+                stdout="",
+                stderr=f"Failed to serialize input data: {e}",
+                exit_code=1,
+                is_timeout=False,
+            )
+
+        logger.debug(
+            "Executing jq (async): filter='%s', input_size=%d bytes",
+            filter_code,
+            len(input_json),
+        )
+
+        async with self._get_semaphore():
+            start = time.perf_counter()
+            # SECURITY: Arguments are passed as a list, never through a shell
+            proc = await asyncio.create_subprocess_exec(
+                self.jq_path,
+                "-M",
+                "-c",
+                filter_code,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout_bytes, stderr_bytes = await asyncio.wait_for(
+                    proc.communicate(input_json.encode("utf-8")), timeout=self.timeout_sec
+                )
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                self._record_spawn(time.perf_counter() - start, timed_out=True)
+                logger.warning(
+                    "jq execution timed out after %s seconds",
+                    self.timeout_sec,
+                )
+                return ExecutionResult(
+                    stdout="",
+                    stderr=f"Execution timed out after {self.timeout_sec} seconds",
+                    exit_code=124,
+                    is_timeout=True,
+                )
+            except BaseException:
+                # Cancelled (a cancelled job, a losing hedge, gather teardown):
+                # don't leave jq running without its timeout
+                if proc.returncode is None:
+                    proc.kill()
+                await proc.wait()
+                self._record_spawn(time.perf_counter() - start, timed_out=False)
+                raise
+            self._record_spawn(time.perf_counter() - start, timed_out=False)
+
+        return self._result(
+            stdout_bytes.decode("utf-8", errors="replace"),
+            stderr_bytes.decode("utf-8", errors="replace"),
+            proc.returncode if proc.returncode is not None else 1,
+        )
+
+    @staticmethod
+    def _annotate_span(trace: Span | NoopSpan, filter_code: str, result: ExecutionResult) -> None:
+        """Add the filter and outcome of a run to its trace span."""
+        if trace.recording:
+            trace.set_attribute("filter_hash", filter_hash(filter_code))
+            trace.set_attribute("exit_code", result.exit_code)
+            trace.set_attribute("timed_out", result.is_timeout)
+
+    def _record_spawn(self, elapsed_sec: float, *, timed_out: bool) -> None:
+        """Add one finished jq process to the stats, metrics and the execution phase."""
+        add_phase(EXECUTION, elapsed_sec)
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.record_jq_run(elapsed_sec, timed_out=timed_out)
+        with self._stats_lock:
+            self.stats.spawns += 1
+            self.stats.total_sec += elapsed_sec
+            if timed_out:
+                self.stats.timeouts += 1
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Return the process-count semaphore for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.MAX_ASYNC_PROCESSES)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _result(self, stdout: str, stderr: str, exit_code: int) -> ExecutionResult:
+        """
+        Apply the output size limit and build the ExecutionResult.
+
+        Args:
+            stdout: Decoded standard output.
+            stderr: Decoded standard error.
+            exit_code: The process exit code.
+
+        Returns:
+            ExecutionResult, truncated with exit code 137 if output is too large.
+        """
+        # Check output size limit
+        stdout_bytes = stdout.encode("utf-8")
+        if len(stdout_bytes) > self.max_output_bytes:
+            logger.warning(
+                "Output exceeded size limit: %d > %d bytes",
+                len(stdout_bytes),
+                self.max_output_bytes,
+            )
+            metrics = get_metrics()
+            if metrics is not None:
+                metrics.jq_output_limit_kills.inc()
+            # Truncate at byte boundary, handling potential mid-character cuts
+            truncated_bytes = stdout_bytes[: self.max_output_bytes]
+            truncated_stdout = truncated_bytes.decode("utf-8", errors="ignore")
+            return ExecutionResult(
+                stdout=truncated_stdout,
+                stderr="Output too large",
+                exit_code=137,
+                is_timeout=False,
+            )
+
+        # Strip trailing newlines for cleaner output comparison
+        stdout = stdout.rstrip("\n")
+        stderr = stderr.rstrip("\n")
+
+        logger.debug(
+            "jq execution completed: exit_code=%d, stdout_len=%d, stderr_len=%d",
+            exit_code,
+            len(stdout),
+            len(stderr),
+        )
+
+        return ExecutionResult(
+            stdout=stdout,
+            stderr=stderr,
+            exit_code=exit_code,
+            is_timeout=False,
+        )
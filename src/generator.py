@@ -6,19 +6,98 @@ This module provides the JQGenerator class that interfaces with various LLM APIs
 descriptions and input/output examples.
 """
 
+import asyncio
+import contextvars
 import hashlib
 import json
 import logging
 import re
+import threading
 import time
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from types import TracebackType
 
 import httpx
 
+from src.cache import CacheMissError, ResponseCache, make_cache_key
+from src.circuit import BreakerPolicy
+from src.compaction import MAX_LEVEL, CompactionPolicy, compact_example
 from src.domain import Attempt, Task
-from src.providers import LLMProvider, create_provider
+from src.hedging import HedgePolicy, HedgeStats, LatencyTracker
+from src.metrics import get_metrics
+from src.providers import (
+    ChatMessage,
+    HTTPPoolConfig,
+    LLMProvider,
+    Prompt,
+    ProviderSpec,
+    RequestAborter,
+    abortable_requests,
+    create_provider,
+    prompt_text,
+    provider_label,
+)
+from src.ratelimit import RateLimiter, RetryPolicy, estimate_tokens, parse_retry_after
+from src.timing import API_CALL, EXTRACTION, PROMPT_BUILD, phase
+from src.tracing import NoopSpan, Span, filter_hash, span
 
 logger = logging.getLogger(__name__)
 
+# A line that reads like English prose ("Here's the", "This filter", "You can")
+# rather than a jq expression; streams are never cut short on such lines
+_PROSE_LINE = re.compile(r"^[A-Za-z]+(?:['\u2019][A-Za-z]+)?,?\s+[A-Za-z]")
+
+# Intro phrases that may precede the filter, on its line or on their own
+_INTRO_PREFIXES = (
+    "here is the filter:",
+    "here is the jq filter:",
+    "the filter is:",
+    "the jq filter is:",
+    "filter:",
+    "jq filter:",
+)
+
+# Line openings that start an explanation rather than a filter
+_EXPLANATION_STARTERS = ("this ", "the ")
+
+
+def _filter_line(lines: Iterable[str]) -> str | None:
+    """
+    Find the line holding the filter in a response without a code block.
+
+    Blank lines and intro-only lines (a known intro phrase, or any line
+    ending in ':') are skipped. Scanning stops without a result at a comment
+    line (starting with '#') or at a line that starts an explanation.
+
+    Args:
+        lines: The response's lines, in order.
+
+    Returns:
+        The first code-like line, stripped, or None if there is none before
+        the scan stops.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            return None
+
+        line_lower = line.lower()
+        is_intro = any(line_lower.startswith(p) for p in _INTRO_PREFIXES)
+        if not is_intro and any(line_lower.startswith(p) for p in _EXPLANATION_STARTERS):
+            return None
+        if line.endswith(":"):
+            # Intro text only, such as "Here is the jq filter:"
+            continue
+        return line
+    return None
+
 
 class GenerationError(Exception):
     """Raised when filter generation fails."""
@@ -26,6 +105,50 @@ class GenerationError(Exception):
     pass
 
 
+@dataclass(frozen=True)
+class LLMCallStats:
+    """
+    Timing of a single successful LLM API call.
+
+    Attributes:
+        ttft_sec: Seconds until the first piece of the response arrived. For
+            non-streamed calls this equals latency_sec.
+        latency_sec: Seconds until the response was complete (or cut short).
+        streamed: Whether the response was streamed.
+        stopped_early: Whether the stream was closed as soon as a complete
+            filter was received, before the model finished.
+        response_chars: Length of the response text that was read.
+    """
+
+    ttft_sec: float
+    latency_sec: float
+    streamed: bool
+    stopped_early: bool
+    response_chars: int
+
+
+@dataclass
+class GenerationStats:
+    """
+    Totals over all filters a generator produced.
+
+    Token counts use the same chars/4 estimate as the rate limiter, so they
+    are comparable across providers and in replay runs.
+
+    Attributes:
+        requests: Filters generated (from the API or the response cache).
+        api_calls: Successful API calls; requests minus api_calls were cache
+            hits (hedged requests may add a second call).
+        prompt_tokens: Estimated prompt tokens of all requests.
+        response_tokens: Estimated tokens of all responses.
+    """
+
+    requests: int = 0
+    api_calls: int = 0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+
+
 class JQGenerator:
     """
     Generates jq filters using LLM providers.
@@ -34,13 +157,52 @@ class JQGenerator:
     jq filter expressions based on task descriptions and input/output examples. It
     supports iterative refinement by including previous attempt history in prompts.
 
+    The generator owns its provider's pooled HTTP connections; use it as a context
+    manager (or call close()) to release them when done.
+
+    When a ResponseCache is attached, identical requests (same provider, model,
+    temperature and prompts) are answered from the cache instead of the API.
+
+    When a hedge provider is attached, a request that the primary has not
+    answered within a percentile of its recent latencies is duplicated to the
+    hedge provider; the first valid response wins and the other is cancelled.
+
+    Prompts whose task/example block exceeds the compaction budget have their
+    examples compacted (irrelevant fields dropped, large arrays sampled, a
+    schema summary added); the task itself is untouched, so filters are still
+    evaluated against the full inputs.
+
+    Prompts always start with that block, which is identical on every
+    iteration, so providers can serve it from their prompt cache. With
+    prompt_caching it is also marked as a cache breakpoint (Anthropic
+    cache_control), and with conversation the refinements continue one
+    multi-turn conversation per task.
+
     Attributes:
         provider: The LLM provider instance.
+        cache: Optional response cache consulted before every API call.
+        retry_policy: Which failures are retried and how long to back off.
+        rate_limiter: Optional (typically process-wide) request/token budget.
+        stream: Whether responses are streamed and cut off at the first
+            complete filter.
+        call_stats: Timings of the most recent API calls (oldest first).
+        generation_stats: Request, API call and token totals.
+        max_in_flight: Concurrency limit for generate_async requests.
+        hedge_provider: Optional secondary provider (or model) for hedging.
+        hedge_policy: When hedge requests are sent.
+        hedge_stats: Hedge rate and estimated latency savings.
+        compaction: Prompt token budget and compaction limits (a
+            non-positive max_prompt_tokens always sends full examples).
+        prompt_caching: Whether the static prompt prefix is marked cacheable.
+        conversation: Whether refinements continue one conversation per task.
     """
 
     MAX_HISTORY_ATTEMPTS = 3
+    RETRY_REQUEST = "Please generate a better filter that addresses these issues."
+    FINAL_REQUEST = "Generate the jq filter:"
     MAX_RETRIES = 3
     RETRY_DELAY_SEC = 1.0
+    MAX_CALL_STATS = 1000
 
     def __init__(
         self,
@@ -49,6 +211,20 @@ class JQGenerator:
         api_key: str | None = None,
         model: str | None = None,
         base_url: str | None = None,
+        *,
+        pool_config: HTTPPoolConfig | None = None,
+        cache: ResponseCache | None = None,
+        retry_policy: RetryPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        stream: bool = False,
+        max_in_flight: int = 16,
+        hedge_provider: LLMProvider | None = None,
+        hedge_policy: HedgePolicy | None = None,
+        fallbacks: Sequence[ProviderSpec] | None = None,
+        breaker_policy: BreakerPolicy | None = None,
+        compaction: CompactionPolicy | None = None,
+        prompt_caching: bool = False,
+        conversation: bool = False,
     ) -> None:
         """
         Initialize the JQ generator.
@@ -60,6 +236,31 @@ class JQGenerator:
             api_key: API key for the provider.
             model: Model identifier.
             base_url: Base URL (only for OpenAI-compatible providers).
+            pool_config: HTTP connection pool settings for the provider.
+            cache: Response cache for record/replay. Defaults to None (no caching).
+            retry_policy: Retry/backoff policy. Defaults to MAX_RETRIES attempts
+                starting at RETRY_DELAY_SEC.
+            rate_limiter: Client-side rate limiter shared with other workers.
+                Defaults to None (no client-side limiting).
+            stream: Stream responses and close them as soon as a complete
+                filter line or code block has arrived. Defaults to False.
+            max_in_flight: Maximum concurrent requests issued by generate_async.
+                Defaults to 16.
+            hedge_provider: Secondary provider that receives a duplicate of any
+                request the primary is slow to answer. Defaults to None (no hedging).
+            hedge_policy: Hedge delay settings. Defaults to HedgePolicy().
+            fallbacks: Providers to fail over to when the primary is unhealthy.
+                Each provider in the chain gets a circuit breaker. Ignored if
+                a provider instance is given.
+            breaker_policy: Circuit breaker settings for the failover chain.
+            compaction: Prompt token budget above which examples are
+                compacted. Defaults to CompactionPolicy().
+            prompt_caching: Mark the static task/example prefix (and, in
+                conversation mode, the latest turn) as cacheable by the
+                provider. Defaults to False.
+            conversation: Send the refinement history as one multi-turn
+                conversation per task instead of a rebuilt single prompt.
+                Defaults to False.
 
         Raises:
             ValueError: If provider creation fails or required credentials are missing.
@@ -72,10 +273,71 @@ class JQGenerator:
                 api_key=api_key,
                 model=model,
                 base_url=base_url,
+                pool_config=pool_config,
+                fallbacks=fallbacks,
+                breaker_policy=breaker_policy,
             )
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=self.MAX_RETRIES, base_delay=self.RETRY_DELAY_SEC
+        )
+        self.rate_limiter = rate_limiter
+        self.stream = stream
+        self.call_stats: deque[LLMCallStats] = deque(maxlen=self.MAX_CALL_STATS)
+        self.generation_stats = GenerationStats()
+        self._stats_lock = threading.Lock()
+        self.max_in_flight = max_in_flight
+        self._semaphore: asyncio.Semaphore | None = None
+        self._semaphore_loop: asyncio.AbstractEventLoop | None = None
+        self.hedge_provider = hedge_provider
+        self.hedge_policy = hedge_policy or HedgePolicy()
+        self.hedge_stats = HedgeStats()
+        self._primary_latencies = LatencyTracker(self.hedge_policy.window)
+        self._hedge_pool: ThreadPoolExecutor | None = None
+        self._hedge_lock = threading.Lock()
+        self.compaction = compaction or CompactionPolicy()
+        self.prompt_caching = prompt_caching
+        self.conversation = conversation
 
         logger.debug("JQGenerator initialized with provider=%s", type(self.provider).__name__)
 
+    def close(self) -> None:
+        """Release the providers' pooled HTTP connections."""
+        self.provider.close()
+        if self.hedge_provider is not None:
+            self.hedge_provider.close()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
+
+    async def aclose(self) -> None:
+        """Release the providers' sync and async pooled HTTP connections."""
+        await self.provider.aclose()
+        if self.hedge_provider is not None:
+            await self.hedge_provider.aclose()
+
+    def __enter__(self) -> "JQGenerator":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "JQGenerator":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.aclose()
+
     def generate(self, task: Task, history: list[Attempt] | None = None) -> str:
         """
         Generate a jq filter for the given task.
@@ -93,22 +355,108 @@ class JQGenerator:
         """
         logger.info("Generating filter for task '%s'", task.id)
 
-        prompt = self._build_prompt(task, history)
+        with span("JQGenerator.generate", task_id=task.id) as trace:
+            with phase(PROMPT_BUILD):
+                prompt = self._prepare_prompt(task, history)
+            called_api = False
+
+            def call_api() -> str:
+                nonlocal called_api
+                called_api = True
+                return self._call_api_with_retry(prompt)
+
+            with self._translate_errors(), phase(API_CALL):
+                if self.cache is not None:
+                    response_text = self.cache.get_or_compute(self._cache_key(prompt), call_api)
+                else:
+                    response_text = call_api()
+
+            self._record_generation(prompt, response_text)
+            with phase(EXTRACTION):
+                filter_code = self._extract(response_text)
+            self._observe(trace, filter_code, cache_hit=not called_api)
+        logger.info("Generated filter: '%s'", filter_code)
+        return filter_code
+
+    async def generate_async(self, task: Task, history: list[Attempt] | None = None) -> str:
+        """
+        Generate a jq filter for the given task without blocking the event loop.
+
+        Same behavior as generate() (cache, retries, rate limiting, streaming),
+        built on the provider's async API. At most max_in_flight requests from
+        this generator are outstanding at once.
+
+        Args:
+            task: The task containing description and input/output examples.
+            history: Optional list of previous attempts for iterative refinement.
+
+        Returns:
+            A jq filter expression string.
+
+        Raises:
+            GenerationError: If the API call fails or returns an invalid response.
+        """
+        logger.info("Generating filter for task '%s' (async)", task.id)
+
+        with span("JQGenerator.generate", task_id=task.id) as trace:
+            with phase(PROMPT_BUILD):
+                prompt = self._prepare_prompt(task, history)
+            called_api = False
+
+            async def call_api() -> str:
+                nonlocal called_api
+                called_api = True
+                return await self._call_api_with_retry_async(prompt)
+
+            with self._translate_errors(), phase(API_CALL):
+                if self.cache is not None:
+                    response_text = await self.cache.get_or_compute_async(
+                        self._cache_key(prompt), call_api
+                    )
+                else:
+                    response_text = await call_api()
+
+            self._record_generation(prompt, response_text)
+            with phase(EXTRACTION):
+                filter_code = self._extract(response_text)
+            self._observe(trace, filter_code, cache_hit=not called_api)
+        logger.info("Generated filter: '%s'", filter_code)
+        return filter_code
+
+    def _observe(self, trace: Span | NoopSpan, filter_code: str, *, cache_hit: bool) -> None:
+        """Add the result of a generation to its trace span and the cache metrics."""
+        metrics = get_metrics()
+        if metrics is not None and self.cache is not None:
+            metrics.cache_lookups.inc(result="hit" if cache_hit else "miss")
+        if trace.recording:
+            trace.set_attribute("provider", provider_label(self.provider))
+            trace.set_attribute("cache_hit", cache_hit)
+            trace.set_attribute("filter_hash", filter_hash(filter_code))
+
+    def _prepare_prompt(self, task: Task, history: list[Attempt] | None) -> Prompt:
+        """Build the request prompt and log its size and hash."""
+        prompt = self._build_request(task, history)
 
         # SECURITY: Log only prompt length and hash, never the actual content
-        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        text = prompt_text(prompt)
+        prompt_hash = hashlib.sha256(text.encode()).hexdigest()[:12]
         logger.debug(
             "Built prompt: length=%d hash=%s",
-            len(prompt),
+            len(text),
             prompt_hash,
         )
+        return prompt
 
-        try:
-            response_text = self._call_api_with_retry(prompt)
-            filter_code = self._extract(response_text)
+    @contextmanager
+    def _translate_errors(self) -> Iterator[None]:
+        """
+        Convert transport, provider and cache errors into GenerationError.
 
-            logger.info("Generated filter: '%s'", filter_code)
-            return filter_code
+        Raises:
+            GenerationError: For any failure raised inside the block.
+        """
+        try:
+            yield
 
         except httpx.TimeoutException as e:
             logger.error("API request timed out: %s", e)
@@ -124,14 +472,46 @@ class JQGenerator:
             logger.error("API request failed: %s", e)
             raise GenerationError(f"API request failed: {e}") from e
 
+        except CacheMissError as e:
+            logger.error("Replay cache miss: %s", e)
+            raise GenerationError(f"Replay cache miss: {e}") from e
+
         except RuntimeError as e:
             logger.error("Provider error: %s", e)
             raise GenerationError(f"Provider error: {e}") from e
 
+    def _cache_key(self, prompt: Prompt) -> str:
+        """
+        Compute the content address of a request for this generator's provider.
+
+        Cache breakpoints do not change the response, so a prompt split for
+        prompt caching has the same key as the unsplit prompt.
+
+        Args:
+            prompt: The user prompt or chat messages.
+
+        Returns:
+            A hex SHA-256 digest over provider, endpoint, model, temperature
+            and prompts.
+        """
+        return make_cache_key(
+            provider=type(self.provider).__name__,
+            endpoint=self.provider.endpoint,
+            model=self.provider.model,
+            temperature=self.provider.TEMPERATURE,
+            system_prompt=self.provider.SYSTEM_PROMPT,
+            prompt=prompt_text(prompt),
+        )
+
     def _build_prompt(self, task: Task, history: list[Attempt] | None = None) -> str:
         """
         Build the user prompt for the API request.
 
+        The prompt starts with the task and example block, which does not
+        change between iterations, followed by the history of previous
+        attempts. Keeping the static part first lets providers reuse their
+        cached prefix on every refinement.
+
         Args:
             task: The task to generate a filter for.
             history: Optional list of previous attempts.
@@ -139,6 +519,90 @@ class JQGenerator:
         Returns:
             The formatted prompt string.
         """
+        return f"{self._build_prefix(task)}\n{self._render_history(history)}"
+
+    def _build_request(self, task: Task, history: list[Attempt] | None) -> Prompt:
+        """
+        Build what is sent to the provider.
+
+        By default this is the single prompt from _build_prompt. With prompt
+        caching, the same text is split into the task/example prefix, marked
+        cacheable, and the history suffix. In conversation mode, every earlier
+        attempt becomes an assistant turn followed by a user turn with its
+        feedback, so each request extends the previous one and the whole
+        conversation so far can be served from the provider's cache.
+
+        Args:
+            task: The task to generate a filter for.
+            history: Optional list of previous attempts.
+
+        Returns:
+            A prompt string or a list of chat messages.
+        """
+        if not self.prompt_caching and not self.conversation:
+            return self._build_prompt(task, history)
+
+        prefix = self._build_prefix(task)
+        if not self.conversation:
+            return [
+                ChatMessage("user", prefix, cache=True),
+                ChatMessage("user", self._render_history(history)),
+            ]
+
+        messages = [
+            ChatMessage(
+                "user", f"{prefix}\n{self._render_history(None)}", cache=self.prompt_caching
+            )
+        ]
+        for attempt in history or []:
+            feedback = [*self._attempt_lines(attempt), "", self.RETRY_REQUEST, self.FINAL_REQUEST]
+            messages.append(ChatMessage("assistant", attempt.filter_code))
+            messages.append(ChatMessage("user", "\n".join(feedback)))
+        if self.prompt_caching and len(messages) > 1:
+            # A second breakpoint at the newest turn lets the next request
+            # read everything up to here from the cache
+            messages[-1] = replace(messages[-1], cache=True)
+        return messages
+
+    def _build_prefix(self, task: Task) -> str:
+        """
+        Format the task and example block.
+
+        If it exceeds the compaction budget, the examples are compacted one
+        level at a time until it fits. The decision depends only on the task,
+        so the block stays identical across iterations.
+        """
+        prefix = self._render_prefix(task)
+        policy = self.compaction
+        if policy.max_prompt_tokens <= 0:
+            return prefix
+
+        full_tokens = estimate_tokens(prefix)
+        if full_tokens <= policy.max_prompt_tokens:
+            return prefix
+
+        for level in range(1, MAX_LEVEL + 1):
+            prefix = self._render_prefix(task, compaction_level=level)
+            if estimate_tokens(prefix) <= policy.max_prompt_tokens:
+                break
+        else:
+            logger.warning(
+                "Prompt for task '%s' exceeds the %d-token budget even when compacted",
+                task.id,
+                policy.max_prompt_tokens,
+            )
+
+        logger.info(
+            "Compacted prompt for task '%s': ~%d -> ~%d tokens (level %d)",
+            task.id,
+            full_tokens,
+            estimate_tokens(prefix),
+            level,
+        )
+        return prefix
+
+    def _render_prefix(self, task: Task, compaction_level: int = 0) -> str:
+        """Format the task and examples, compacted to the given level (0 = full)."""
         parts: list[str] = []
 
         # Task description
@@ -146,13 +610,41 @@ class JQGenerator:
         parts.append("")
 
         # Examples
+        if compaction_level:
+            parts.append(
+                "Note: the example data below is abbreviated to fit the prompt. "
+                "Fields unrelated to the expected output are omitted and large arrays "
+                "are sampled; a sampled expected output shows the items produced by the "
+                "sampled input items. The filter will run on the full inputs described by "
+                "each input schema."
+            )
+            parts.append("")
+
         for i, example in enumerate(task.examples, start=1):
             parts.append(f"Example {i}:")
-            parts.append(f"Input: {json.dumps(example.input_data, sort_keys=True)}")
-            parts.append(f"Expected Output: {json.dumps(example.expected_output, sort_keys=True)}")
+            if not compaction_level:
+                parts.append(f"Input: {json.dumps(example.input_data, sort_keys=True)}")
+                parts.append(
+                    f"Expected Output: {json.dumps(example.expected_output, sort_keys=True)}"
+                )
+            else:
+                compacted = compact_example(example, self.compaction, compaction_level)
+                parts.append("Input schema:")
+                parts.extend(f"  {line}" for line in compacted.schema)
+                if compacted.input_json is not None:
+                    parts.append(f"Input (sample): {compacted.input_json}")
+                label = (
+                    "Expected Output (sample)" if compacted.output_sampled else "Expected Output"
+                )
+                parts.append(f"{label}: {compacted.output_json}")
             parts.append("")
 
-        # Include history if provided (last N attempts)
+        return "\n".join(parts)
+
+    def _render_history(self, history: list[Attempt] | None) -> str:
+        """Format the previous attempts (last N) and the closing request."""
+        parts: list[str] = []
+
         if history:
             recent_history = history[-self.MAX_HISTORY_ATTEMPTS :]
 
@@ -161,28 +653,40 @@ class JQGenerator:
 
             for attempt in recent_history:
                 parts.append(f"- Filter: {attempt.filter_code}")
-                parts.append(f"  Score: {attempt.aggregated_score:.2f}")
-                parts.append(f"  Error Type: {attempt.primary_error.value}")
-
-                # Include feedback from first failing example
-                for result in attempt.example_results:
-                    if result.score < 1.0:
-                        parts.append(f"  Feedback: {result.feedback}")
-                        break
-
+                parts.extend(f"  {line}" for line in self._attempt_lines(attempt))
                 parts.append("")
 
-            parts.append("Please generate a better filter that addresses these issues.")
+            parts.append(self.RETRY_REQUEST)
             parts.append("")
 
-        parts.append("Generate the jq filter:")
+        parts.append(self.FINAL_REQUEST)
 
         return "\n".join(parts)
 
-    def _call_api_with_retry(self, prompt: str) -> str:
+    def _attempt_lines(self, attempt: Attempt) -> list[str]:
+        """Score, error type, first failing example's feedback and scaling problems of an attempt."""
+        lines = [
+            f"Score: {attempt.aggregated_score:.2f}",
+            f"Error Type: {attempt.primary_error.value}",
+        ]
+        for result in attempt.example_results:
+            if result.score < 1.0:
+                lines.append(f"Feedback: {result.feedback}")
+                break
+        if attempt.scaling is not None and attempt.scaling.superlinear:
+            lines.append(f"Performance: {attempt.scaling.feedback}")
+        return lines
+
+    def _call_api_with_retry(self, prompt: Prompt) -> str:
         """
         Make the API request with retry logic.
 
+        Connection errors and transient HTTP statuses (429, 5xx, ...) are
+        retried with exponential backoff and jitter; a Retry-After header from
+        the server takes precedence over the computed delay. If a rate limiter
+        is attached, every attempt first waits for room in the shared budget,
+        and a 429 pauses all workers sharing that limiter.
+
         Args:
             prompt: The user prompt to send.
 
@@ -191,75 +695,475 @@ class JQGenerator:
 
         Raises:
             httpx.TimeoutException: If the request times out.
-            httpx.HTTPStatusError: If the API returns an error status.
-            httpx.RequestError: If the request fails after retries.
-            GenerationError: If the response format is invalid.
+            httpx.HTTPStatusError: If the API returns a non-retryable error
+                status, or a retryable one on the last attempt.
+            GenerationError: If the request fails after all retries.
         """
         last_error: httpx.RequestError | None = None
 
-        for attempt in range(self.MAX_RETRIES):
-            try:
-                return self.provider.generate(prompt)
+        for attempt in range(self.retry_policy.max_attempts):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(self._estimate_tokens(prompt))
 
-            except httpx.ConnectError as e:
+            try:
+                return self._hedged_request(prompt)
+            except httpx.HTTPStatusError as e:
+                delay = self._retry_delay(e, attempt)
+            except httpx.RequestError as e:
                 last_error = e
-                error_msg = str(e)
-
-                # Provide helpful error messages for common connection issues
-                if (
-                    "nodename nor servname provided" in error_msg
-                    or "Name or service not known" in error_msg
-                ):
-                    logger.warning(
-                        "DNS resolution failed (attempt %d/%d). "
-                        "Verify the endpoint URL or set LLM_BASE_URL environment variable.",
-                        attempt + 1,
-                        self.MAX_RETRIES,
-                    )
-                else:
-                    logger.warning(
-                        "Connection failed (attempt %d/%d): %s",
-                        attempt + 1,
-                        self.MAX_RETRIES,
-                        error_msg,
-                    )
+                delay = self._retry_delay(e, attempt)
 
-                if attempt < self.MAX_RETRIES - 1:
-                    time.sleep(self.RETRY_DELAY_SEC)
-                continue
+            if delay is not None:
+                time.sleep(delay)
 
+        raise self._retries_exhausted(last_error)
+
+    async def _call_api_with_retry_async(self, prompt: Prompt) -> str:
+        """
+        Async counterpart of _call_api_with_retry (same retry policy).
+
+        Args:
+            prompt: The user prompt to send.
+
+        Returns:
+            The response content from the API.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns a non-retryable error
+                status, or a retryable one on the last attempt.
+            GenerationError: If the request fails after all retries.
+        """
+        last_error: httpx.RequestError | None = None
+
+        for attempt in range(self.retry_policy.max_attempts):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(self._estimate_tokens(prompt))
+
+            try:
+                async with self._get_semaphore():
+                    return await self._hedged_request_async(prompt)
+            except httpx.HTTPStatusError as e:
+                delay = self._retry_delay(e, attempt)
             except httpx.RequestError as e:
                 last_error = e
+                delay = self._retry_delay(e, attempt)
+
+            if delay is not None:
+                await asyncio.sleep(delay)
+
+        raise self._retries_exhausted(last_error)
+
+    def _estimate_tokens(self, prompt: Prompt) -> int:
+        """Estimate prompt plus completion tokens for the rate limiter."""
+        return (
+            estimate_tokens(self.provider.SYSTEM_PROMPT + prompt_text(prompt))
+            + self.provider.MAX_TOKENS
+        )
+
+    def _retry_delay(self, error: httpx.HTTPError, attempt: int) -> float | None:
+        """
+        Decide how to proceed after a failed attempt.
+
+        Args:
+            error: The status or transport error raised by the attempt.
+            attempt: Zero-based index of the failed attempt.
+
+        Returns:
+            Seconds to wait before the next attempt, or None if this was the
+            last attempt of a transport error (the caller then gives up).
+
+        Raises:
+            httpx.HTTPStatusError: If the status is not retryable or this was
+                the last attempt.
+        """
+        policy = self.retry_policy
+        is_last = attempt == policy.max_attempts - 1
+
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            if is_last or not policy.should_retry_status(status):
+                raise error
+
+            retry_after = parse_retry_after(error.response.headers.get("Retry-After"))
+            delay = policy.backoff(attempt, retry_after)
+            logger.warning(
+                "API returned %d (attempt %d/%d), retrying in %.2fs",
+                status,
+                attempt + 1,
+                policy.max_attempts,
+                delay,
+            )
+            if status == 429 and self.rate_limiter is not None:
+                self.rate_limiter.pause(delay)
+            return delay
+
+        error_msg = str(error)
+        if isinstance(error, httpx.ConnectError):
+            # Provide helpful error messages for common connection issues
+            if (
+                "nodename nor servname provided" in error_msg
+                or "Name or service not known" in error_msg
+            ):
+                logger.warning(
+                    "DNS resolution failed (attempt %d/%d). "
+                    "Verify the endpoint URL or set LLM_BASE_URL environment variable.",
+                    attempt + 1,
+                    policy.max_attempts,
+                )
+            else:
                 logger.warning(
-                    "Request error (attempt %d/%d): %s",
+                    "Connection failed (attempt %d/%d): %s",
                     attempt + 1,
-                    self.MAX_RETRIES,
-                    e,
+                    policy.max_attempts,
+                    error_msg,
                 )
+        else:
+            logger.warning(
+                "Request error (attempt %d/%d): %s",
+                attempt + 1,
+                policy.max_attempts,
+                error_msg,
+            )
+
+        return None if is_last else policy.backoff(attempt)
 
-                if attempt < self.MAX_RETRIES - 1:
-                    time.sleep(self.RETRY_DELAY_SEC)
-                continue
+    def _retries_exhausted(self, last_error: httpx.RequestError | None) -> GenerationError:
+        """Build the error raised once every attempt failed with a transport error."""
+        attempts = self.retry_policy.max_attempts
 
-        # All retries exhausted
         if isinstance(last_error, httpx.ConnectError):
             error_msg = str(last_error)
             if (
                 "nodename nor servname provided" in error_msg
                 or "Name or service not known" in error_msg
             ):
-                raise GenerationError(
+                error = GenerationError(
                     "DNS resolution failed. Please verify the endpoint URL is correct "
                     "or set LLM_BASE_URL environment variable to the correct endpoint."
-                ) from last_error
+                )
             else:
-                raise GenerationError(
-                    f"Connection failed after {self.MAX_RETRIES} attempts: {error_msg}"
-                ) from last_error
+                error = GenerationError(f"Connection failed after {attempts} attempts: {error_msg}")
+        else:
+            error = GenerationError(f"API request failed after {attempts} attempts: {last_error}")
+
+        error.__cause__ = last_error
+        return error
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Return the in-flight request semaphore for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._semaphore_loop = loop
+        return self._semaphore
 
-        raise GenerationError(
-            f"API request failed after {self.MAX_RETRIES} attempts: {last_error}"
-        ) from last_error
+    def _hedged_request(self, prompt: Prompt) -> str:
+        """
+        Make one API call, hedged to the secondary provider if it is slow.
+
+        The primary request runs in a worker thread. If it has not finished
+        within the hedge delay, the same prompt is sent to the hedge provider
+        and the first valid response is returned. The losing request is
+        aborted, so it does not keep a worker busy until it completes. Both
+        run in a copy of the caller's context, so their spans belong to the
+        caller's trace.
+
+        Args:
+            prompt: The user prompt to send.
+
+        Returns:
+            The winning response text.
+
+        Raises:
+            Exception: The primary's error if no request produced a valid response.
+        """
+        if self.hedge_provider is None:
+            return self._request(prompt)
+
+        delay = self.hedge_policy.delay(self._primary_latencies)
+        cancel = threading.Event()
+        start = time.perf_counter()
+        pool = self._get_hedge_pool()
+        aborters = [RequestAborter(), RequestAborter()]
+
+        def primary_call() -> str:
+            with abortable_requests(aborters[0]):
+                text = self._request(prompt, cancel=cancel)
+            # A request cut short because the hedge won says nothing about latency
+            if not cancel.is_set():
+                self._primary_latencies.record(time.perf_counter() - start)
+            return text
+
+        def secondary_call() -> str:
+            with abortable_requests(aborters[1]):
+                return self._request(prompt, self.hedge_provider, cancel)
+
+        primary = pool.submit(contextvars.copy_context().run, primary_call)
+        try:
+            text = primary.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+        else:
+            self._record_hedge(hedged=False)
+            return text
+
+        logger.debug("Primary slower than %.2fs, sending hedge request", delay)
+        # The hedge is a request of its own and counts against the budget too
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self._estimate_tokens(prompt))
+        secondary = pool.submit(contextvars.copy_context().run, secondary_call)
+        pending: set[Future[str]] = {primary, secondary}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None and future.result().strip():
+                        self._record_hedge(
+                            hedged=True,
+                            hedge_won=future is secondary,
+                            elapsed=time.perf_counter() - start,
+                        )
+                        return future.result()
+        finally:
+            # Stop whichever request is still running (a no-op for finished ones)
+            cancel.set()
+            for aborter in aborters:
+                aborter.abort()
+
+        self._record_hedge(hedged=True)
+        return primary.result()
+
+    async def _hedged_request_async(self, prompt: Prompt) -> str:
+        """
+        Async counterpart of _hedged_request; the losing request is cancelled.
+
+        Args:
+            prompt: The user prompt to send.
+
+        Returns:
+            The winning response text.
+
+        Raises:
+            Exception: The primary's error if no request produced a valid response.
+        """
+        if self.hedge_provider is None:
+            return await self._request_async(prompt)
+
+        delay = self.hedge_policy.delay(self._primary_latencies)
+        start = time.perf_counter()
+
+        primary = asyncio.ensure_future(self._request_async(prompt))
+        finished, _ = await asyncio.wait({primary}, timeout=delay)
+        if finished:
+            self._primary_latencies.record(time.perf_counter() - start)
+            self._record_hedge(hedged=False)
+            return primary.result()
+
+        logger.debug("Primary slower than %.2fs, sending hedge request", delay)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(self._estimate_tokens(prompt))
+        secondary = asyncio.ensure_future(self._request_async(prompt, self.hedge_provider))
+        pending: set[asyncio.Future[str]] = {primary, secondary}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future is primary and future.exception() is None:
+                        self._primary_latencies.record(time.perf_counter() - start)
+                    if future.exception() is None and future.result().strip():
+                        self._record_hedge(
+                            hedged=True,
+                            hedge_won=future is secondary,
+                            elapsed=time.perf_counter() - start,
+                        )
+                        return future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        self._record_hedge(hedged=True)
+        return primary.result()
+
+    def _get_hedge_pool(self) -> ThreadPoolExecutor:
+        """Return the worker pool used to race hedged requests."""
+        with self._hedge_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=2 * self.max_in_flight, thread_name_prefix="jq-hedge"
+                )
+            return self._hedge_pool
+
+    def _record_hedge(self, hedged: bool, hedge_won: bool = False, elapsed: float = 0.0) -> None:
+        """
+        Update the hedge counters for one request.
+
+        Args:
+            hedged: Whether a hedge request was sent.
+            hedge_won: Whether the hedge provider answered first.
+            elapsed: Seconds until the winning response arrived.
+        """
+        # Estimated from the primary's latency tail: how much longer a request
+        # still running after `elapsed` seconds would typically have taken
+        saved = self._primary_latencies.expected_remaining(elapsed) if hedge_won else 0.0
+        with self._hedge_lock:
+            self.hedge_stats.requests += 1
+            if hedged:
+                self.hedge_stats.hedged += 1
+            if hedge_won:
+                self.hedge_stats.hedge_wins += 1
+                self.hedge_stats.saved_sec += saved
+        if hedge_won:
+            logger.debug("Hedge request won after %.2fs (est. %.2fs saved)", elapsed, saved)
+
+    def _request(
+        self,
+        prompt: Prompt,
+        provider: LLMProvider | None = None,
+        cancel: threading.Event | None = None,
+    ) -> str:
+        """
+        Make one API call, streaming if enabled, and record its timing.
+
+        Args:
+            prompt: The user prompt to send.
+            provider: Provider to call. Defaults to the primary provider.
+            cancel: Optional event; a stream stops being read once it is set.
+
+        Returns:
+            The response text (possibly cut short after the first complete filter).
+        """
+        provider = provider or self.provider
+        start = time.perf_counter()
+
+        if not self.stream:
+            text = provider.generate(prompt)
+            latency = time.perf_counter() - start
+            self._record_call(LLMCallStats(latency, latency, False, False, len(text)))
+            return text
+
+        parts: list[str] = []
+        ttft: float | None = None
+        stopped_early = False
+        chunks = provider.generate_stream(prompt)
+        try:
+            for chunk in chunks:
+                if cancel is not None and cancel.is_set():
+                    break
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(chunk)
+                if self._has_complete_filter("".join(parts)):
+                    stopped_early = True
+                    break
+        finally:
+            # Closing the stream closes the HTTP response, so the server stops
+            # generating output tokens we would discard anyway
+            close = getattr(chunks, "close", None)
+            if callable(close):
+                close()
+
+        return self._finish_stream(parts, start, ttft, stopped_early)
+
+    async def _request_async(self, prompt: Prompt, provider: LLMProvider | None = None) -> str:
+        """
+        Async counterpart of _request.
+
+        Args:
+            prompt: The user prompt to send.
+            provider: Provider to call. Defaults to the primary provider.
+
+        Returns:
+            The response text (possibly cut short after the first complete filter).
+        """
+        provider = provider or self.provider
+        start = time.perf_counter()
+
+        if not self.stream:
+            text = await provider.agenerate(prompt)
+            latency = time.perf_counter() - start
+            self._record_call(LLMCallStats(latency, latency, False, False, len(text)))
+            return text
+
+        parts: list[str] = []
+        ttft: float | None = None
+        stopped_early = False
+        chunks = provider.agenerate_stream(prompt)
+        try:
+            async for chunk in chunks:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(chunk)
+                if self._has_complete_filter("".join(parts)):
+                    stopped_early = True
+                    break
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if callable(aclose):
+                await aclose()
+
+        return self._finish_stream(parts, start, ttft, stopped_early)
+
+    def _finish_stream(
+        self, parts: list[str], start: float, ttft: float | None, stopped_early: bool
+    ) -> str:
+        """Join streamed parts and record the call's timing."""
+        text = "".join(parts)
+        latency = time.perf_counter() - start
+        self._record_call(
+            LLMCallStats(
+                ttft if ttft is not None else latency, latency, True, stopped_early, len(text)
+            )
+        )
+        return text
+
+    def _record_generation(self, prompt: Prompt, response_text: str) -> None:
+        """Add one answered request to the generation stats."""
+        with self._stats_lock:
+            self.generation_stats.requests += 1
+            self.generation_stats.prompt_tokens += estimate_tokens(
+                self.provider.SYSTEM_PROMPT + prompt_text(prompt)
+            )
+            self.generation_stats.response_tokens += estimate_tokens(response_text)
+
+    def _record_call(self, stats: LLMCallStats) -> None:
+        """Store and log the timing of one API call."""
+        self.call_stats.append(stats)
+        with self._stats_lock:
+            self.generation_stats.api_calls += 1
+        logger.debug(
+            "LLM call: ttft=%.3fs latency=%.3fs streamed=%s stopped_early=%s chars=%d",
+            stats.ttft_sec,
+            stats.latency_sec,
+            stats.streamed,
+            stats.stopped_early,
+            stats.response_chars,
+        )
+
+    def _has_complete_filter(self, text: str) -> bool:
+        """
+        Check whether a partial response already contains the filter _extract would return.
+
+        A response is complete once it has a closed code block, or once the
+        newline-terminated lines hold the line _extract takes the filter from
+        (see _filter_line) and it looks like jq. If that line reads like prose,
+        or the lines stop at a comment or an explanation first, the response
+        is never considered complete early: a code block may still follow, and
+        otherwise extraction falls back to the full text.
+
+        Args:
+            text: The response received so far.
+
+        Returns:
+            True if reading further cannot change the extracted filter.
+        """
+        if "```" in text:
+            return text.count("```") >= 2
+
+        # The last element is a line still being received
+        line = _filter_line(text.split("\n")[:-1])
+        return line is not None and not _PROSE_LINE.match(line)
 
     def _extract(self, response: str) -> str:
         """
@@ -285,75 +1189,12 @@ class JQGenerator:
         if match:
             text = match.group(1).strip()
 
-        # Split into lines and process
-        lines = text.split("\n")
-        code_lines: list[str] = []
-
-        # Patterns for intro lines to skip (when they're on their own line)
-        skip_prefixes = (
-            "here is the filter:",
-            "here is the jq filter:",
-            "the filter is:",
-            "the jq filter is:",
-            "filter:",
-            "jq filter:",
-        )
-
-        # Patterns that indicate explanatory text (stop processing)
-        explanation_starters = ("this ", "the ")
-
-        for line in lines:
-            line = line.strip()
-
-            # Skip empty lines
-            if not line:
-                continue
-
-            # Stop at comment lines (lines starting with #)
-            if line.startswith("#"):
-                break
-
-            line_lower = line.lower()
-
-            # Stop at lines that look like explanations (unless they're our known filter prefixes)
-            is_filter_prefix = any(line_lower.startswith(p) for p in skip_prefixes)
-            is_explanation = any(line_lower.startswith(p) for p in explanation_starters)
-
-            if is_explanation and not is_filter_prefix:
-                # Line starts with "This " or "The " but not a known filter prefix
-                break
-
-            # Skip lines that are ONLY intro text (no filter content)
-            is_intro_only = False
-            for prefix in skip_prefixes:
-                if line_lower.startswith(prefix):
-                    remainder = line[len(prefix) :].strip()
-                    if not remainder:
-                        is_intro_only = True
-                        break
-
-            if is_intro_only:
-                continue
-
-            code_lines.append(line)
-
-        # Take the first code-like line
-        if code_lines:
-            text = code_lines[0]
-        else:
-            text = response.strip()
+        # Take the first code-like line, before any comment or explanation
+        text = _filter_line(text.split("\n")) or response.strip()
 
         # Remove common introductory phrases (case insensitive)
         text_lower = text.lower()
-        prefixes_to_remove = [
-            "here is the filter:",
-            "here is the jq filter:",
-            "the filter is:",
-            "the jq filter is:",
-            "filter:",
-            "jq filter:",
-            "jq ",
-        ]
+        prefixes_to_remove = [*_INTRO_PREFIXES, "jq "]
 
         for prefix in prefixes_to_remove:
             if text_lower.startswith(prefix):
@@ -0,0 +1,145 @@
+"""
+Hedged LLM requests to cut tail latency.
+
+This module provides the HedgePolicy class that decides how long to wait for
+the primary provider before sending a duplicate request to a secondary
+provider or model, the LatencyTracker that keeps a window of recent primary
+latencies so the delay can follow a percentile of the observed distribution,
+and the HedgeStats counters reported by the generator.
+"""
+
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """
+    When to send a hedge request.
+
+    Attributes:
+        percentile: Percentile of recent primary latencies after which the
+            hedge is sent (e.g. 95 hedges roughly the slowest 5% of calls).
+        initial_delay: Delay used until min_samples latencies were observed.
+        min_delay: Lower bound on the delay, so fast providers are not
+            hedged on every small fluctuation.
+        max_delay: Upper bound on the delay.
+        min_samples: Observations needed before the percentile is trusted.
+        window: Number of recent primary latencies kept.
+    """
+
+    percentile: float = 95.0
+    initial_delay: float = 2.0
+    min_delay: float = 0.25
+    max_delay: float = 10.0
+    min_samples: int = 20
+    window: int = 200
+
+    def delay(self, tracker: "LatencyTracker") -> float:
+        """
+        Compute the hedge delay from the observed latencies.
+
+        Args:
+            tracker: Recent primary latencies.
+
+        Returns:
+            Seconds to wait for the primary before hedging.
+        """
+        if len(tracker) < self.min_samples:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, tracker.percentile(self.percentile)))
+
+
+class LatencyTracker:
+    """
+    Thread-safe sliding window of request latencies.
+
+    Attributes:
+        window: Maximum number of observations kept.
+    """
+
+    def __init__(self, window: int = 200) -> None:
+        """
+        Initialize an empty tracker.
+
+        Args:
+            window: Maximum number of observations kept. Defaults to 200.
+        """
+        self.window = window
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def record(self, latency_sec: float) -> None:
+        """
+        Add one observation.
+
+        Args:
+            latency_sec: Observed latency in seconds.
+        """
+        with self._lock:
+            self._samples.append(latency_sec)
+
+    def percentile(self, p: float) -> float:
+        """
+        Nearest-rank percentile of the window.
+
+        Args:
+            p: Percentile in [0, 100].
+
+        Returns:
+            The latency below which p percent of observations fall, or 0.0
+            if nothing was recorded.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * len(samples)))
+        return samples[min(rank, len(samples)) - 1]
+
+    def expected_remaining(self, elapsed_sec: float) -> float:
+        """
+        Expected extra wait for a request still running after elapsed_sec.
+
+        Uses the empirical tail: the mean of (latency - elapsed) over the
+        observations slower than elapsed_sec.
+
+        Args:
+            elapsed_sec: How long the request has been running.
+
+        Returns:
+            Estimated remaining seconds, or 0.0 if no observation was slower.
+        """
+        with self._lock:
+            tail = [s - elapsed_sec for s in self._samples if s > elapsed_sec]
+        return sum(tail) / len(tail) if tail else 0.0
+
+
+@dataclass
+class HedgeStats:
+    """
+    Counters describing hedging effectiveness.
+
+    Attributes:
+        requests: Requests that were eligible for hedging.
+        hedged: Requests for which a hedge was sent.
+        hedge_wins: Hedged requests answered first by the secondary.
+        saved_sec: Estimated latency saved by hedge wins, from the primary's
+            observed latency tail.
+    """
+
+    requests: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    saved_sec: float = 0.0
+
+    @property
+    def hedge_rate(self) -> float:
+        """Fraction of requests that were hedged."""
+        return self.hedged / self.requests if self.requests else 0.0
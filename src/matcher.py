@@ -0,0 +1,319 @@
+"""
+Deterministic derivation of projection filters from path mappings.
+
+This module provides the StructuralMatcher class that derives jq filters for
+tasks whose expected outputs are assembled from values copied verbatim out of
+the inputs (nested-field, rename and pluck style tasks). Each example input is
+indexed by value, consistent path mappings are searched across all examples,
+and a jq object/array construction filter is emitted without calling an LLM.
+"""
+
+import json
+import logging
+import re
+from typing import Any
+
+from src.domain import Task
+
+logger = logging.getLogger(__name__)
+
+# A path into a JSON value: object keys (str) and array indices (int)
+Path = tuple[str | int, ...]
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class _ValueIndex:
+    """
+    Index of every node in a JSON value by its canonical serialization.
+
+    Attributes:
+        paths: Mapping from canonical JSON to all paths holding that value.
+        arrays: Mapping from array length to paths of arrays with that length.
+        node_count: Number of nodes visited while building the index.
+    """
+
+    def __init__(self, value: Any, max_nodes: int) -> None:
+        self.paths: dict[str, list[Path]] = {}
+        self.arrays: dict[int, list[Path]] = {}
+        self.node_count = 0
+        self._max_nodes = max_nodes
+        self._walk(value, ())
+
+    @property
+    def truncated(self) -> bool:
+        """Whether indexing stopped early because the node budget ran out."""
+        return self.node_count > self._max_nodes
+
+    def _walk(self, value: Any, path: Path) -> None:
+        """
+        Index a node and all of its descendants.
+
+        The walk keeps an explicit stack instead of recursing, so deeply nested
+        inputs cannot exhaust the interpreter's recursion limit. Nodes are
+        indexed children first, each with its canonical JSON built from the
+        canonical JSON of its children.
+        """
+        # (node, path, whether its children are already indexed)
+        stack: list[tuple[Any, Path, bool]] = [(value, path, False)]
+        # Canonical JSON of indexed nodes whose parent is not yet indexed
+        done: list[str] = []
+        while stack:
+            node, node_path, expanded = stack.pop()
+            if not expanded:
+                self.node_count += 1
+                if self.node_count > self._max_nodes:
+                    return
+                if isinstance(node, dict | list):
+                    keys = sorted(node) if isinstance(node, dict) else range(len(node))
+                    stack.append((node, node_path, True))
+                    stack.extend((node[key], (*node_path, key), False) for key in reversed(keys))
+                    continue
+                canonical = json.dumps(node)
+            else:
+                start = len(done) - len(node)
+                parts = done[start:]
+                del done[start:]
+                if isinstance(node, dict):
+                    fields = zip(sorted(node), parts, strict=True)
+                    canonical = "{" + ",".join(f"{json.dumps(k)}:{v}" for k, v in fields) + "}"
+                else:
+                    canonical = "[" + ",".join(parts) + "]"
+                    self.arrays.setdefault(len(node), []).append(node_path)
+
+            self.paths.setdefault(canonical, []).append(node_path)
+            done.append(canonical)
+
+
+def _canonical(value: Any) -> str:
+    """Serialize a value the same way _ValueIndex does."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def _lookup(value: Any, path: Path) -> Any:
+    """Follow a path into a value (the path is known to exist)."""
+    for part in path:
+        value = value[part]
+    return value
+
+
+def render_path(path: Path) -> str:
+    """
+    Render a path as a jq path expression.
+
+    Args:
+        path: Sequence of object keys and array indices.
+
+    Returns:
+        A jq expression such as '.user.name', '.items[0]' or '.["a b"]'.
+
+    Examples:
+        >>> render_path(())
+        '.'
+        >>> render_path(("user", "name"))
+        '.user.name'
+        >>> render_path(("items", 0, "first name"))
+        '.items[0]["first name"]'
+    """
+    suffix = _render_suffix(path)
+    return suffix if suffix.startswith(".") else "." + suffix
+
+
+def _render_suffix(path: Path) -> str:
+    """Render a path as a suffix that can be appended to another path ('.a[0]')."""
+    parts: list[str] = []
+    for part in path:
+        if isinstance(part, int):
+            parts.append(f"[{part}]")
+        elif _IDENTIFIER.match(part):
+            parts.append(f".{part}")
+        else:
+            parts.append(f"[{json.dumps(part)}]")
+    return "".join(parts)
+
+
+class StructuralMatcher:
+    """
+    Derives jq projection filters by locating output values in the inputs.
+
+    The matcher works recursively on (input, output) pairs gathered from all
+    examples:
+    1. If every output appears verbatim in its input at a common path, that
+       path is the filter.
+    2. If every output is an object with the same keys, each key is derived
+       separately and an object construction is emitted.
+    3. If every output is an array, it is either mapped from an input array
+       of the same length at a common path, or built position by position.
+
+    Anything else (computed values, constants, aggregations) is left to the LLM.
+
+    Attributes:
+        max_nodes: Maximum number of nodes indexed per example input. Larger
+            inputs are skipped so the matcher stays cheap on every task.
+        allow_indices: Whether paths may address fixed array positions such as
+            '.items[0]'. Off by default because positional paths usually just
+            memorize the examples instead of generalizing.
+    """
+
+    def __init__(self, max_nodes: int = 10_000, allow_indices: bool = False) -> None:
+        """
+        Initialize the structural matcher.
+
+        Args:
+            max_nodes: Maximum number of nodes indexed per example input.
+                Defaults to 10,000.
+            allow_indices: Whether derived paths may contain array indices.
+                Defaults to False.
+        """
+        self.max_nodes = max_nodes
+        self.allow_indices = allow_indices
+        self._indexes: dict[int, _ValueIndex] = {}
+
+    def derive(self, task: Task) -> str | None:
+        """
+        Derive a projection filter that maps every example input to its output.
+
+        The returned filter is only a candidate: it is consistent with the path
+        mappings but must still be verified by the reviewer.
+
+        Args:
+            task: The task whose examples are analyzed.
+
+        Returns:
+            A jq filter expression, or None if no consistent mapping exists.
+        """
+        if not task.examples:
+            return None
+
+        pairs = [(ex.input_data, ex.expected_output) for ex in task.examples]
+        self._indexes = {}
+        try:
+            filter_code = self._derive(pairs)
+        except _BudgetExceeded:
+            logger.debug("Structural matcher skipped task '%s': input too large", task.id)
+            return None
+        except RecursionError:
+            # Derivation recurses over the expected outputs
+            logger.debug("Structural matcher skipped task '%s': output nested too deeply", task.id)
+            return None
+        finally:
+            self._indexes = {}
+
+        if filter_code is not None:
+            logger.debug("Structural matcher derived '%s' for task '%s'", filter_code, task.id)
+        return filter_code
+
+    def _index(self, value: Any) -> _ValueIndex:
+        """Return the (memoized) value index for an input node."""
+        index = self._indexes.get(id(value))
+        if index is None:
+            index = _ValueIndex(value, self.max_nodes)
+            if index.truncated:
+                raise _BudgetExceeded
+            self._indexes[id(value)] = index
+        return index
+
+    def _usable(self, paths: list[Path] | tuple[()]) -> set[Path]:
+        """Drop positional paths unless array indices are allowed."""
+        if self.allow_indices:
+            return set(paths)
+        return {p for p in paths if not any(isinstance(part, int) for part in p)}
+
+    def _derive(self, pairs: list[tuple[Any, Any]]) -> str | None:
+        """Derive a filter for a list of (input, output) pairs."""
+        path = self._common_path(pairs)
+        if path is not None:
+            return render_path(path)
+
+        outputs = [out for _, out in pairs]
+
+        if all(isinstance(out, dict) for out in outputs):
+            return self._derive_object(pairs)
+
+        if all(isinstance(out, list) for out in outputs):
+            mapped = self._derive_map(pairs)
+            if mapped is not None:
+                return mapped
+            return self._derive_positional(pairs)
+
+        return None
+
+    def _common_path(self, pairs: list[tuple[Any, Any]]) -> Path | None:
+        """Find the simplest path at which every output occurs in its input."""
+        common: set[Path] | None = None
+        for inp, out in pairs:
+            found = self._usable(self._index(inp).paths.get(_canonical(out), ()))
+            common = found if common is None else common & found
+            if not common:
+                return None
+
+        if not common:
+            return None
+        return min(common, key=lambda p: (len(p), [str(part) for part in p]))
+
+    def _derive_object(self, pairs: list[tuple[Any, Any]]) -> str | None:
+        """Derive an object construction when all outputs share the same keys."""
+        keys = list(pairs[0][1].keys())
+        if not keys or any(set(out.keys()) != set(keys) for _, out in pairs):
+            return None
+
+        fields: list[str] = []
+        for key in keys:
+            value_filter = self._derive([(inp, out[key]) for inp, out in pairs])
+            if value_filter is None:
+                return None
+            fields.append(f"{json.dumps(key)}: {value_filter}")
+
+        return "{" + ", ".join(fields) + "}"
+
+    def _derive_map(self, pairs: list[tuple[Any, Any]]) -> str | None:
+        """Derive '[P[] | f]' when outputs map element-wise over an input array."""
+        common: set[Path] | None = None
+        for inp, out in pairs:
+            found = self._usable(self._index(inp).arrays.get(len(out), ()))
+            common = found if common is None else common & found
+            if not common:
+                return None
+
+        if not common:
+            return None
+
+        for array_path in sorted(common, key=lambda p: (len(p), [str(part) for part in p])):
+            element_pairs: list[tuple[Any, Any]] = []
+            for inp, out in pairs:
+                element_pairs.extend(zip(_lookup(inp, array_path), out, strict=True))
+            if not element_pairs:
+                # Every output is empty: nothing to learn the element mapping from
+                continue
+
+            element_path = self._common_path(element_pairs)
+            iterate = render_path(array_path).rstrip(".") + "[]"
+            if iterate == "[]":
+                iterate = ".[]"
+            if element_path is not None:
+                return f"[{iterate}{_render_suffix(element_path)}]"
+
+            element_filter = self._derive(element_pairs)
+            if element_filter is not None:
+                return f"[{iterate} | {element_filter}]"
+
+        return None
+
+    def _derive_positional(self, pairs: list[tuple[Any, Any]]) -> str | None:
+        """Derive '[f0, f1, ...]' when all outputs have the same fixed length."""
+        length = len(pairs[0][1])
+        if length == 0 or any(len(out) != length for _, out in pairs):
+            return None
+
+        items: list[str] = []
+        for position in range(length):
+            item_filter = self._derive([(inp, out[position]) for inp, out in pairs])
+            if item_filter is None:
+                return None
+            items.append(item_filter)
+
+        return "[" + ", ".join(items) + "]"
+
+
+class _BudgetExceeded(Exception):
+    """Raised internally when an input exceeds the matcher's node budget."""
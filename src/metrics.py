@@ -0,0 +1,509 @@
+"""
+Prometheus-format metrics.
+
+This module provides a small metrics registry (counters, gauges and
+histograms with labels) rendered in the Prometheus text exposition format,
+either to a file (for node_exporter's textfile collector) or from a local
+HTTP endpoint, plus SynthMetrics, the set of instruments updated by the
+executor, the providers, the generator, the reviewer and the orchestrator:
+jq spawns, timeouts and output-limit kills, LLM requests by status and
+their latency, tokens in and out, response cache lookups, evaluations by
+error type, iterations per task and solve rate.
+
+Metrics are off unless a SynthMetrics is installed with set_metrics();
+instrumented code then skips recording after one attribute lookup.
+"""
+
+import logging
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterator, Mapping, Sequence
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from src.domain import Solution
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram buckets (upper bounds; +Inf is implicit)
+JQ_DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+LLM_DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ITERATION_BUCKETS = (0, 1, 2, 3, 4, 5, 7, 10, 15, 20)
+
+_POLL_INTERVAL_SEC = 0.05
+
+LabelKey = tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value as Prometheus expects."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 2**53:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    """Format a label set, e.g. '{status="200"}' (empty for no labels)."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class _Metric(ABC):
+    """Common parts of the metric types: name, help text and label handling."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Mapping[str, Any]) -> LabelKey:
+        """The label values in declaration order."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric '{self.name}' takes labels {list(self.labelnames)}, got {sorted(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelKey, **extra: str) -> dict[str, str]:
+        labels = dict(zip(self.labelnames, key, strict=True))
+        labels.update(extra)
+        return labels
+
+    @abstractmethod
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        """Yield (sample name, labels, value) for the exposition."""
+
+    def render(self) -> str:
+        """The metric in the text exposition format."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(
+            f"{name}{_format_labels(labels)} {_format_value(value)}"
+            for name, labels, value in self.samples()
+        )
+        return "\n".join(lines) + "\n"
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[LabelKey, float] = {}
+        if not self.labelnames:
+            self._values[()] = 0.0
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        """
+        Increase the count.
+
+        Args:
+            amount: Non-negative increment.
+            **labels: One value per label name.
+
+        Raises:
+            ValueError: If the amount is negative or the labels do not match.
+        """
+        if amount < 0:
+            raise ValueError(f"Counter '{self.name}' cannot decrease")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        """Current count for a label set (0 if never incremented)."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, self._labels(key), value
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, per label set."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[LabelKey, float] = {}
+        if not self.labelnames:
+            self._values[()] = 0.0
+
+    def set(self, value: float, **labels: Any) -> None:
+        """Set the value for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: Any) -> float:
+        """Current value for a label set (0 if never set)."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, self._labels(key), value
+
+
+class Histogram(_Metric):
+    """Observations counted in cumulative buckets, per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        # Per label set: non-cumulative bucket counts (+Inf last), sum
+        self._counts: dict[LabelKey, list[int]] = {}
+        self._sums: dict[LabelKey, float] = {}
+        if not self.labelnames:
+            self._counts[()] = [0] * (len(self.buckets) + 1)
+            self._sums[()] = 0.0
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Record one observation."""
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), -1)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: Any) -> int:
+        """Number of observations for a label set."""
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def sum(self, **labels: Any) -> float:
+        """Sum of the observations for a label set."""
+        return self._sums.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            series = sorted(
+                (key, list(counts), self._sums[key]) for key, counts in self._counts.items()
+            )
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                le = "+Inf" if math.isinf(bound) else _format_value(bound)
+                yield f"{self.name}_bucket", self._labels(key, le=le), cumulative
+            yield f"{self.name}_sum", self._labels(key), total
+            yield f"{self.name}_count", self._labels(key), cumulative
+
+
+class MetricsRegistry:
+    """
+    A named set of metrics rendered together.
+
+    Attributes:
+        metrics: Registered metrics, by name, in registration order.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self.metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Register and return a counter (names should end in '_total')."""
+        counter: Counter = self._register(Counter(name, help_text, labelnames))
+        return counter
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Register and return a gauge."""
+        gauge: Gauge = self._register(Gauge(name, help_text, labelnames))
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = (),
+    ) -> Histogram:
+        """Register and return a histogram."""
+        histogram: Histogram = self._register(Histogram(name, help_text, buckets, labelnames))
+        return histogram
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return "".join(metric.render() for metric in metrics)
+
+    def write(self, path: str | Path) -> None:
+        """
+        Write the metrics to a file, replacing it atomically.
+
+        A scraper (e.g. node_exporter's textfile collector) never sees a
+        partially written file.
+
+        Args:
+            path: Output file, conventionally ending in '.prom'.
+
+        Raises:
+            OSError: If the file cannot be written.
+        """
+        target = Path(path)
+        temporary = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        try:
+            temporary.write_text(self.render(), encoding="utf-8")
+            temporary.replace(target)
+        finally:
+            temporary.unlink(missing_ok=True)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> "MetricsServer":
+        """
+        Serve the metrics over HTTP on a background thread.
+
+        Args:
+            host: Interface to listen on.
+            port: Port to listen on; 0 picks a free one.
+
+        Returns:
+            The started server; call stop() when done.
+
+        Raises:
+            OSError: If the socket cannot be bound.
+        """
+        return MetricsServer(self, host=host, port=port).start()
+
+
+class MetricsServer:
+    """
+    HTTP endpoint serving a registry at GET /metrics.
+
+    Attributes:
+        registry: The registry being served.
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        Create the server and bind its socket (call start()).
+
+        Args:
+            registry: The registry to serve.
+            host: Interface to listen on.
+            port: Port to listen on; 0 picks a free one.
+
+        Raises:
+            OSError: If the socket cannot be bound.
+        """
+        self.registry = registry
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(registry))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """URL of the metrics endpoint, e.g. 'http://127.0.0.1:9464/metrics'."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host!s}:{port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        """
+        Serve requests on a background thread.
+
+        Returns:
+            The server, for chaining.
+        """
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            kwargs={"poll_interval": _POLL_INTERVAL_SEC},
+            name="metrics-server",
+            daemon=True,
+        )
+        self._thread.start()
+        logger.info("Serving metrics on %s", self.url)
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MetricsServer":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+
+def _make_handler(registry: MetricsRegistry) -> type[BaseHTTPRequestHandler]:
+    """Build the request handler class bound to a registry."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] == "/metrics":
+                status, body, content_type = 200, registry.render().encode(), CONTENT_TYPE
+            else:
+                status, body, content_type = 404, b"Not found\n", "text/plain"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+class SynthMetrics:
+    """
+    The instruments updated while synthesizing filters.
+
+    Attributes:
+        registry: Registry holding the instruments.
+        jq_spawns: jq processes started.
+        jq_timeouts: jq processes killed after the timeout.
+        jq_output_limit_kills: jq runs whose output exceeded the size limit.
+        jq_duration: Seconds per jq process.
+        llm_requests: LLM HTTP requests by provider and status (HTTP status
+            code, 'timeout' or 'error').
+        llm_request_duration: Seconds per LLM HTTP request, by provider.
+        llm_tokens: Tokens reported by the providers, by provider and
+            direction ('in' for prompt, 'out' for completion).
+        cache_lookups: Response cache lookups by result ('hit' or 'miss').
+        evaluations: Evaluated filters by primary error type.
+        tasks: Finished tasks by outcome ('solved' or 'failed').
+        iterations: Iterations used per task.
+        solve_rate: Fraction of finished tasks that were solved.
+    """
+
+    def __init__(self, registry: MetricsRegistry | None = None, prefix: str = "jq_synth") -> None:
+        """
+        Register the instruments.
+
+        Args:
+            registry: Registry to register in (default: a new one).
+            prefix: Prefix of every metric name.
+        """
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.jq_spawns = r.counter(f"{prefix}_jq_spawns_total", "jq processes started.")
+        self.jq_timeouts = r.counter(
+            f"{prefix}_jq_timeouts_total", "jq processes killed after the timeout."
+        )
+        self.jq_output_limit_kills = r.counter(
+            f"{prefix}_jq_output_limit_kills_total",
+            "jq runs whose output exceeded the size limit.",
+        )
+        self.jq_duration = r.histogram(
+            f"{prefix}_jq_duration_seconds", "Seconds per jq process.", JQ_DURATION_BUCKETS
+        )
+        self.llm_requests = r.counter(
+            f"{prefix}_llm_requests_total",
+            "LLM HTTP requests by provider and status.",
+            ("provider", "status"),
+        )
+        self.llm_request_duration = r.histogram(
+            f"{prefix}_llm_request_duration_seconds",
+            "Seconds per LLM HTTP request.",
+            LLM_DURATION_BUCKETS,
+            ("provider",),
+        )
+        self.llm_tokens = r.counter(
+            f"{prefix}_llm_tokens_total",
+            "Tokens reported by the provider, by direction (in = prompt, out = completion).",
+            ("provider", "direction"),
+        )
+        self.cache_lookups = r.counter(
+            f"{prefix}_cache_lookups_total",
+            "Response cache lookups by result.",
+            ("result",),
+        )
+        self.evaluations = r.counter(
+            f"{prefix}_evaluations_total",
+            "Evaluated filters by primary error type.",
+            ("error_type",),
+        )
+        self.tasks = r.counter(f"{prefix}_tasks_total", "Finished tasks by outcome.", ("outcome",))
+        self.iterations = r.histogram(
+            f"{prefix}_iterations_per_task", "Iterations used per task.", ITERATION_BUCKETS
+        )
+        self.solve_rate = r.gauge(
+            f"{prefix}_solve_rate", "Fraction of finished tasks that were solved."
+        )
+        self._lock = threading.Lock()
+
+    def record_jq_run(self, elapsed_sec: float, *, timed_out: bool) -> None:
+        """Count a finished jq process."""
+        self.jq_spawns.inc()
+        self.jq_duration.observe(elapsed_sec)
+        if timed_out:
+            self.jq_timeouts.inc()
+
+    def record_llm_request(self, provider: str, status: str, elapsed_sec: float) -> None:
+        """Count a finished LLM HTTP request."""
+        self.llm_requests.inc(provider=provider, status=status)
+        self.llm_request_duration.observe(elapsed_sec, provider=provider)
+
+    def record_solution(self, solution: Solution) -> None:
+        """Count a finished task and update the solve rate."""
+        with self._lock:
+            self.tasks.inc(outcome="solved" if solution.success else "failed")
+            self.iterations.observe(solution.iterations_used)
+            solved = self.tasks.value(outcome="solved")
+            total = solved + self.tasks.value(outcome="failed")
+            self.solve_rate.set(solved / total)
+
+
+class _Installed:
+    """Holder of the process-wide metrics."""
+
+    metrics: SynthMetrics | None = None
+
+
+def set_metrics(metrics: SynthMetrics | None) -> None:
+    """
+    Install the process-wide metrics (None turns recording off).
+
+    Args:
+        metrics: The instruments updated from now on.
+    """
+    _Installed.metrics = metrics
+
+
+def get_metrics() -> SynthMetrics | None:
+    """The installed metrics, or None if recording is off."""
+    return _Installed.metrics
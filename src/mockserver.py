@@ -0,0 +1,819 @@
+"""
+Deterministic local mock of the OpenAI and Anthropic APIs.
+
+This module provides MockLLMServer, a small HTTP server that speaks the
+OpenAI chat completions and Anthropic Messages protocols (including SSE
+streaming), so the CLI can be pointed at it with --base-url for benchmarks,
+throughput and load tests without network access or cost. Answers come from
+scripted rules or from responses recorded in a response cache directory
+(--cache-dir of an earlier run); latency is drawn from a configurable
+distribution, and 429s, 500s, timeouts and malformed bodies are injected at
+set rates. Random draws are seeded per request, so the same seed and the
+same requests give the same faults and latencies however concurrent
+requests interleave.
+
+Run it with:
+
+    python -m src.mockserver --port 8080 --script responses.json --latency lognormal:0.8,0.5
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import sys
+import threading
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from src.cache import ResponseCache, make_cache_key
+from src.providers import AnthropicProvider, ChatMessage, LLMProvider, OpenAIProvider, prompt_text
+from src.ratelimit import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+OPENAI_PATH = "/v1/chat/completions"
+ANTHROPIC_PATH = "/v1/messages"
+
+# Characters per streamed delta
+_STREAM_CHUNK_CHARS = 8
+
+# How often the serve loop checks for stop()
+_POLL_INTERVAL_SEC = 0.05
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """
+    Distribution of the delay before each response.
+
+    Attributes:
+        distribution: 'fixed', 'uniform', 'normal', 'lognormal' or 'exponential'.
+        center_sec: The fixed delay, the middle of the uniform range, the mean
+            (normal, exponential) or the median (lognormal).
+        spread: Half-width of the uniform range or standard deviation of the
+            normal distribution, in seconds; shape (sigma) of the lognormal one.
+        max_sec: Upper bound applied to every draw.
+    """
+
+    distribution: str = "fixed"
+    center_sec: float = 0.0
+    spread: float = 0.0
+    max_sec: float = 30.0
+
+    DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+    @classmethod
+    def parse(cls, text: str) -> "LatencyProfile":
+        """
+        Parse a 'DISTRIBUTION:CENTER[,SPREAD]' string.
+
+        Args:
+            text: The specification, e.g. 'fixed:0.2' or 'lognormal:0.8,0.5'.
+
+        Returns:
+            The parsed LatencyProfile.
+
+        Raises:
+            ValueError: If the distribution is unknown or a parameter is not a
+                non-negative number.
+
+        Examples:
+            >>> LatencyProfile.parse("uniform:0.5,0.1")
+            LatencyProfile(distribution='uniform', center_sec=0.5, spread=0.1, max_sec=30.0)
+        """
+        distribution, _, params = text.partition(":")
+        distribution = distribution.strip().lower()
+        if distribution not in cls.DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown latency distribution '{distribution}'; "
+                f"expected one of {', '.join(cls.DISTRIBUTIONS)}"
+            )
+        center, _, spread = params.partition(",")
+        try:
+            center_sec = float(center) if center.strip() else 0.0
+            spread_value = float(spread) if spread.strip() else 0.0
+        except ValueError:
+            raise ValueError(f"Invalid latency specification: '{text}'") from None
+        if center_sec < 0 or spread_value < 0:
+            raise ValueError(f"Latency parameters must not be negative: '{text}'")
+        return cls(distribution=distribution, center_sec=center_sec, spread=spread_value)
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        Draw one delay.
+
+        Args:
+            rng: The random source.
+
+        Returns:
+            The delay in seconds, between 0 and max_sec.
+        """
+        if self.distribution == "uniform":
+            delay = rng.uniform(self.center_sec - self.spread, self.center_sec + self.spread)
+        elif self.distribution == "normal":
+            delay = rng.gauss(self.center_sec, self.spread)
+        elif self.distribution == "lognormal":
+            delay = self.center_sec * rng.lognormvariate(0.0, self.spread)
+        elif self.distribution == "exponential":
+            delay = rng.expovariate(1.0 / self.center_sec) if self.center_sec > 0 else 0.0
+        else:
+            delay = self.center_sec
+        return min(max(delay, 0.0), self.max_sec)
+
+
+@dataclass(frozen=True)
+class FaultProfile:
+    """
+    Rates at which requests fail instead of being answered.
+
+    At most one fault is injected per request; the rates are fractions of all
+    requests and must add up to at most 1.
+
+    Attributes:
+        rate_limit: Fraction answered with 429 and a Retry-After header.
+        server_error: Fraction answered with 500.
+        timeout: Fraction that never get an answer: the connection is held
+            for hang_sec and then closed.
+        malformed: Fraction answered with 200 and a truncated JSON body (or
+            an unparsable event in streams).
+        retry_after_sec: Retry-After value sent with 429s.
+        hang_sec: How long timed-out requests are held; longer than the
+            providers' client timeout by default.
+    """
+
+    rate_limit: float = 0.0
+    server_error: float = 0.0
+    timeout: float = 0.0
+    malformed: float = 0.0
+    retry_after_sec: float = 1.0
+    hang_sec: float = LLMProvider.TIMEOUT_SEC + 5.0
+
+    def pick(self, draw: float) -> str | None:
+        """
+        Map a uniform draw in [0, 1) to the injected fault, if any.
+
+        Args:
+            draw: A uniform random number.
+
+        Returns:
+            'rate_limit', 'server_error', 'timeout', 'malformed' or None.
+        """
+        threshold = 0.0
+        for name in ("rate_limit", "server_error", "timeout", "malformed"):
+            threshold += getattr(self, name)
+            if draw < threshold:
+                return name
+        return None
+
+
+@dataclass(frozen=True)
+class ScriptRule:
+    """
+    A scripted answer for prompts matching a pattern.
+
+    Attributes:
+        pattern: Regular expression searched for in the prompt text.
+        responses: Answers given to successive matching requests; the last one
+            repeats once the others are used up.
+    """
+
+    pattern: str
+    responses: tuple[str, ...]
+
+
+@dataclass
+class MockStats:
+    """
+    Counters of what the server answered.
+
+    Attributes:
+        requests: Completion requests received.
+        scripted: Answered from a script rule.
+        recorded: Answered from the recorded responses.
+        default: Answered with the default response.
+        rate_limited: Answered with an injected 429.
+        server_errors: Answered with an injected 500.
+        timeouts: Held until the client gave up.
+        malformed: Answered with an injected malformed body.
+        bad_requests: Rejected as invalid (unknown path or unreadable body).
+    """
+
+    requests: int = 0
+    scripted: int = 0
+    recorded: int = 0
+    default: int = 0
+    rate_limited: int = 0
+    server_errors: int = 0
+    timeouts: int = 0
+    malformed: int = 0
+    bad_requests: int = 0
+
+
+@dataclass(frozen=True)
+class MockRequest:
+    """
+    A completion request decoded from either API's body.
+
+    Attributes:
+        api: 'openai' or 'anthropic'.
+        model: The requested model.
+        system_prompt: The system prompt ('' if none).
+        messages: The conversation after the system prompt.
+        temperature: The sampling temperature.
+        stream: Whether an SSE stream was requested.
+    """
+
+    api: str
+    model: str
+    system_prompt: str
+    messages: tuple[ChatMessage, ...]
+    temperature: float
+    stream: bool
+
+    @property
+    def prompt(self) -> str:
+        """The prompt flattened the way the generator's cache keys see it."""
+        return prompt_text(self.messages)
+
+    def cache_key(self, base_url: str | None = None) -> str:
+        """
+        The response cache key the generator used for this request.
+
+        Args:
+            base_url: Base URL the generator sent the request to. Defaults to
+                the public API of the request's protocol.
+
+        Returns:
+            The key of the recorded response.
+        """
+        provider = OpenAIProvider if self.api == "openai" else AnthropicProvider
+        return make_cache_key(
+            provider=provider.__name__,
+            endpoint=provider.endpoint_url(base_url or provider.DEFAULT_BASE_URL),
+            model=self.model,
+            temperature=self.temperature,
+            system_prompt=self.system_prompt,
+            prompt=self.prompt,
+        )
+
+
+def _text(content: Any) -> str:
+    """Text of a message's content: a string or a list of text blocks."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(str(block.get("text", "")) for block in content if isinstance(block, dict))
+    raise ValueError("Message content must be a string or a list of blocks")
+
+
+def parse_request(path: str, body: bytes) -> MockRequest:
+    """
+    Decode a chat completions or Messages API request.
+
+    Args:
+        path: The request path (OPENAI_PATH or ANTHROPIC_PATH).
+        body: The raw JSON body.
+
+    Returns:
+        The decoded request.
+
+    Raises:
+        ValueError: If the path is unknown or the body is not a valid request.
+    """
+    if path not in (OPENAI_PATH, ANTHROPIC_PATH):
+        raise ValueError(f"Unknown endpoint: {path}")
+    data = json.loads(body)
+    if not isinstance(data, dict) or not isinstance(data.get("messages"), list):
+        raise ValueError("Request body must be an object with a 'messages' list")
+
+    system_prompt = _text(data.get("system", ""))
+    messages: list[ChatMessage] = []
+    for message in data["messages"]:
+        if not isinstance(message, dict):
+            raise ValueError("Each message must be an object")
+        role = str(message.get("role", "user"))
+        text = _text(message.get("content", ""))
+        if role == "system":
+            system_prompt = text
+        else:
+            messages.append(ChatMessage(role, text))
+
+    return MockRequest(
+        api="openai" if path == OPENAI_PATH else "anthropic",
+        model=str(data.get("model", "")),
+        system_prompt=system_prompt,
+        messages=tuple(messages),
+        temperature=float(data.get("temperature", 1.0)),
+        stream=bool(data.get("stream", False)),
+    )
+
+
+def load_script(path: str | Path) -> tuple[list[ScriptRule], str | None]:
+    """
+    Read scripted responses from a JSON file.
+
+    The file looks like::
+
+        {
+          "default": ".",
+          "rules": [
+            {"match": "active users", "response": "[.users[] | select(.active)]"},
+            {"match": "Extract x", "responses": [".y", ".x"]}
+          ]
+        }
+
+    Args:
+        path: The JSON script file.
+
+    Returns:
+        The rules in file order and the default response (None if not set).
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not a valid script.
+    """
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError("A mock script must be a JSON object")
+
+    rules: list[ScriptRule] = []
+    for rule in data.get("rules", []):
+        if not isinstance(rule, dict) or not isinstance(rule.get("match"), str):
+            raise ValueError("Each script rule needs a 'match' pattern")
+        responses = rule.get("responses", [rule.get("response")])
+        if not isinstance(responses, list) or not all(isinstance(r, str) for r in responses):
+            raise ValueError(f"Script rule '{rule['match']}' needs string responses")
+        if not responses:
+            raise ValueError(f"Script rule '{rule['match']}' has no responses")
+        re.compile(rule["match"])
+        rules.append(ScriptRule(pattern=rule["match"], responses=tuple(responses)))
+
+    default = data.get("default")
+    return rules, str(default) if default is not None else None
+
+
+class MockLLMServer:
+    """
+    OpenAI- and Anthropic-compatible HTTP server with canned answers.
+
+    Answers are looked up in order: the first matching script rule, then the
+    recorded responses, then the default response. Requests may be delayed
+    and may fail according to the latency and fault profiles; the random
+    draws for a request depend only on the seed, the request and how many
+    identical requests came before it.
+
+    Besides the two completion endpoints, GET /stats returns the counters as
+    JSON and GET /health returns 200.
+
+    Attributes:
+        rules: Scripted answers, tried in order.
+        recorded: Responses recorded by earlier runs, or None.
+        recorded_base_url: Base URL the recorded runs sent their requests to,
+            or None for the public OpenAI and Anthropic APIs.
+        default_response: Answer when nothing else matches.
+        latency: Delay before each response.
+        faults: Injected failure rates.
+        seed: Seed of all random draws.
+        stats: Counters of what was answered.
+    """
+
+    def __init__(
+        self,
+        *,
+        rules: Sequence[ScriptRule] = (),
+        recorded: ResponseCache | None = None,
+        recorded_base_url: str | None = None,
+        default_response: str = ".",
+        latency: LatencyProfile | None = None,
+        faults: FaultProfile | None = None,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """
+        Create the server and bind its socket (call start() or serve_forever()).
+
+        Args:
+            rules: Scripted answers, tried in order.
+            recorded: Responses recorded by earlier runs (e.g.
+                ResponseCache(directory, replay=True)).
+            recorded_base_url: Base URL the recorded runs sent their requests
+                to; cache keys include the endpoint. Defaults to the public
+                OpenAI and Anthropic APIs.
+            default_response: Answer when nothing else matches.
+            latency: Delay before each response. Defaults to no delay.
+            faults: Injected failure rates. Defaults to none.
+            seed: Seed of all random draws.
+            host: Interface to listen on.
+            port: Port to listen on; 0 picks a free one.
+
+        Raises:
+            ValueError: If a fault rate is negative or the rates add up to more than 1.
+            OSError: If the socket cannot be bound.
+        """
+        self.rules = list(rules)
+        self.recorded = recorded
+        self.recorded_base_url = recorded_base_url
+        self.default_response = default_response
+        self.latency = latency or LatencyProfile()
+        self.faults = faults or FaultProfile()
+        self.seed = seed
+        self.stats = MockStats()
+
+        rates = [self.faults.rate_limit, self.faults.server_error]
+        rates += [self.faults.timeout, self.faults.malformed]
+        if min(rates) < 0 or sum(rates) > 1:
+            raise ValueError("Fault rates must be non-negative and add up to at most 1")
+
+        self._patterns = [re.compile(rule.pattern) for rule in self.rules]
+        self._rule_uses = [0] * len(self.rules)
+        self._seen: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._serving = False
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server, e.g. 'http://127.0.0.1:8080'."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        """
+        Serve requests on a background thread.
+
+        Returns:
+            The server, for chaining.
+        """
+        self._serving = True
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            kwargs={"poll_interval": _POLL_INTERVAL_SEC},
+            name="mock-llm-server",
+            daemon=True,
+        )
+        self._thread.start()
+        logger.info("Mock LLM server listening on %s", self.url)
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until stop() or KeyboardInterrupt."""
+        self._serving = True
+        self._httpd.serve_forever(poll_interval=_POLL_INTERVAL_SEC)
+
+    def stop(self) -> None:
+        """Stop serving, release held (timed-out) requests and close the socket."""
+        self._stopping.set()
+        # shutdown() waits for the serve loop, so it must not be called if none ran
+        if self._serving:
+            self._httpd.shutdown()
+            self._serving = False
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def rng_for(self, request: MockRequest) -> random.Random:
+        """
+        Random source for one request.
+
+        Seeded from the seed, the request and the number of identical
+        requests seen before, so draws do not depend on request interleaving.
+
+        Args:
+            request: The decoded request.
+
+        Returns:
+            A random source for this request's fault and latency draws.
+        """
+        material = f"{request.api}\0{request.model}\0{request.system_prompt}\0{request.prompt}"
+        digest = hashlib.sha256(material.encode("utf-8")).hexdigest()
+        with self._lock:
+            occurrence = self._seen.get(digest, 0)
+            self._seen[digest] = occurrence + 1
+        return random.Random(f"{self.seed}:{digest}:{occurrence}")
+
+    def answer(self, request: MockRequest) -> str:
+        """
+        Look up the response text for a request and count its source.
+
+        Args:
+            request: The decoded request.
+
+        Returns:
+            The scripted, recorded or default response.
+        """
+        prompt = request.prompt
+        for i, pattern in enumerate(self._patterns):
+            if pattern.search(prompt):
+                with self._lock:
+                    responses = self.rules[i].responses
+                    response = responses[min(self._rule_uses[i], len(responses) - 1)]
+                    self._rule_uses[i] += 1
+                    self.stats.scripted += 1
+                return response
+
+        if self.recorded is not None:
+            recorded = self.recorded.get(request.cache_key(self.recorded_base_url))
+            if recorded is not None:
+                with self._lock:
+                    self.stats.recorded += 1
+                return recorded
+
+        with self._lock:
+            self.stats.default += 1
+        return self.default_response
+
+    def count(self, counter: str) -> None:
+        """Increment one of the stats counters."""
+        with self._lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+
+    def wait(self, seconds: float) -> bool:
+        """
+        Sleep unless the server is stopping.
+
+        Returns:
+            True if the server is stopping.
+        """
+        return self._stopping.wait(seconds)
+
+
+def _completion_body(request: MockRequest, text: str) -> dict[str, Any]:
+    """A non-streamed response in the request's API format."""
+    input_tokens = estimate_tokens(request.system_prompt + request.prompt)
+    output_tokens = estimate_tokens(text)
+    if request.api == "openai":
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "model": request.model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": input_tokens,
+                "completion_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+    return {
+        "id": "msg_mock",
+        "type": "message",
+        "role": "assistant",
+        "model": request.model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+    }
+
+
+def _stream_events(request: MockRequest, text: str) -> list[dict[str, Any]]:
+    """The SSE events of a streamed response, in the request's API format."""
+    chunks = [text[i : i + _STREAM_CHUNK_CHARS] for i in range(0, len(text), _STREAM_CHUNK_CHARS)]
+    if request.api == "openai":
+        events: list[dict[str, Any]] = [{"choices": [{"delta": {"role": "assistant"}}]}]
+        events += [{"choices": [{"delta": {"content": chunk}}]} for chunk in chunks]
+        events.append({"choices": [{"delta": {}, "finish_reason": "stop"}]})
+        return events
+
+    usage = {"input_tokens": estimate_tokens(request.system_prompt + request.prompt)}
+    events = [
+        {"type": "message_start", "message": {"model": request.model, "usage": usage}},
+        {"type": "content_block_start", "index": 0, "content_block": {"type": "text"}},
+    ]
+    events += [
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": c}}
+        for c in chunks
+    ]
+    events += [
+        {"type": "content_block_stop", "index": 0},
+        {"type": "message_delta", "delta": {"stop_reason": "end_turn"}},
+        {"type": "message_stop"},
+    ]
+    return events
+
+
+def _make_handler(server: MockLLMServer) -> type[BaseHTTPRequestHandler]:
+    """Build the request handler class bound to a server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, so pooled clients reuse connections as with real APIs
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif self.path == "/stats":
+                with server._lock:
+                    stats = asdict(server.stats)
+                self._send_json(200, stats)
+            else:
+                self._send_json(404, {"error": {"message": f"Not found: {self.path}"}})
+
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                request = parse_request(self.path, body)
+            except (ValueError, TypeError) as e:
+                server.count("bad_requests")
+                status = 404 if self.path not in (OPENAI_PATH, ANTHROPIC_PATH) else 400
+                self._send_json(status, {"error": {"message": str(e)}})
+                return
+
+            server.count("requests")
+            rng = server.rng_for(request)
+            fault = server.faults.pick(rng.random())
+            delay = server.latency.sample(rng)
+
+            if fault == "timeout":
+                server.count("timeouts")
+                server.wait(server.faults.hang_sec)
+                self.close_connection = True
+                return
+
+            if server.wait(delay):
+                self.close_connection = True
+                return
+
+            if fault == "rate_limit":
+                server.count("rate_limited")
+                retry_after = f"{server.faults.retry_after_sec:g}"
+                error = {"error": {"type": "rate_limit_error", "message": "Rate limited (mock)"}}
+                self._send_json(429, error, {"Retry-After": retry_after})
+            elif fault == "server_error":
+                server.count("server_errors")
+                error = {"error": {"type": "api_error", "message": "Internal error (mock)"}}
+                self._send_json(500, error)
+            elif fault == "malformed":
+                server.count("malformed")
+                if request.stream:
+                    self._send_stream([b"data: {not json\n\n"])
+                else:
+                    self._send(200, b'{"id": "mock", "choices": [', "application/json")
+            elif request.stream:
+                events = _stream_events(request, server.answer(request))
+                lines = [f"data: {json.dumps(e)}\n\n".encode() for e in events]
+                if request.api == "openai":
+                    lines.append(b"data: [DONE]\n\n")
+                self._send_stream(lines)
+            else:
+                self._send_json(200, _completion_body(request, server.answer(request)))
+
+        def _send(
+            self,
+            status: int,
+            body: bytes,
+            content_type: str,
+            headers: dict[str, str] | None = None,
+        ) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status: int, data: Any, headers: dict[str, str] | None = None) -> None:
+            self._send(status, json.dumps(data).encode(), "application/json", headers)
+
+        def _send_stream(self, lines: list[bytes]) -> None:
+            # The end of the stream is signalled by closing the connection
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for line in lines:
+                self.wfile.write(line)
+                self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def _parse_args(args: list[str] | None = None) -> argparse.Namespace:
+    """Parse command-line arguments for the mock server."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.mockserver",
+        description="Local OpenAI/Anthropic-compatible mock LLM server for benchmarks and "
+        "load tests",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Interface (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port (default: 8080)")
+    parser.add_argument(
+        "--script", metavar="PATH", help="JSON file with scripted responses (see load_script)"
+    )
+    parser.add_argument(
+        "--recorded",
+        metavar="CACHE_DIR",
+        help="Answer with responses recorded by a run with --cache-dir",
+    )
+    parser.add_argument(
+        "--recorded-base-url",
+        metavar="URL",
+        help="--base-url of the recorded run (default: the public OpenAI and Anthropic APIs)",
+    )
+    parser.add_argument(
+        "--default-response",
+        default=None,
+        help="Answer when no script rule or recording matches (default: '.')",
+    )
+    parser.add_argument(
+        "--latency",
+        default="fixed:0",
+        metavar="DIST:CENTER[,SPREAD]",
+        help="Response delay distribution: fixed, uniform, normal, lognormal or "
+        "exponential, e.g. 'lognormal:0.8,0.5' (default: fixed:0)",
+    )
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of 429s")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="Fraction of 500s")
+    parser.add_argument(
+        "--timeout-rate", type=float, default=0.0, help="Fraction of requests never answered"
+    )
+    parser.add_argument(
+        "--malformed-rate", type=float, default=0.0, help="Fraction of malformed bodies"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of all random draws")
+    parser.add_argument("--debug", action="store_true", help="Log every request")
+    return parser.parse_args(args)
+
+
+def main(args: list[str] | None = None) -> int:
+    """
+    Run the mock server until interrupted.
+
+    Args:
+        args: Optional list of command-line arguments. If None, uses sys.argv.
+
+    Returns:
+        Exit code: 0 after a clean shutdown, 1 on invalid options.
+    """
+    parsed = _parse_args(args)
+    logging.basicConfig(
+        level=logging.DEBUG if parsed.debug else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+    try:
+        rules: list[ScriptRule] = []
+        default = None
+        if parsed.script:
+            rules, default = load_script(parsed.script)
+        server = MockLLMServer(
+            rules=rules,
+            recorded=ResponseCache(parsed.recorded, replay=True) if parsed.recorded else None,
+            recorded_base_url=parsed.recorded_base_url,
+            default_response=parsed.default_response or default or ".",
+            latency=LatencyProfile.parse(parsed.latency),
+            faults=FaultProfile(
+                rate_limit=parsed.rate_limit_rate,
+                server_error=parsed.server_error_rate,
+                timeout=parsed.timeout_rate,
+                malformed=parsed.malformed_rate,
+            ),
+            seed=parsed.seed,
+            host=parsed.host,
+            port=parsed.port,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Mock LLM server listening on {server.url}")
+    print(f"  openai:    --base-url {server.url}/v1")
+    print(f"  anthropic: --provider anthropic --base-url {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    print(json.dumps(asdict(server.stats), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,696 @@
+"""
+Search for faster filters equivalent to a solved task's filter.
+
+The refinement loop stops at the first filter passing every example, which
+is often not the fastest way to produce that output: an invariant
+subexpression recomputed for every element of a map, a whole sort to pick a
+minimum, two maps where one would do. FilterOptimizer collects alternatives
+from a rule-based rewriter and, optionally, from the LLM, keeps those with
+the same output as the original on the examples and on generated inputs
+(arrays resized and reversed), benchmarks them on an example input scaled up
+with src.scaling.scale_input and returns the fastest with its speedup.
+
+The rewriter works on jq's tokens rather than a full syntax tree, so it
+handles any filter jq accepts but only rewrites the patterns it recognizes
+exactly:
+
+- collect-to-map: [.[] | f] to map(f)
+- map-fusion: map(f) | map(g) to map(f | g)
+- sort-to-min-max: sort | .[0] to min, sort_by(f) | last to max_by(f), ...
+- select-to-any: map(select(c)) | length > 0 to any(.[]; c) (and == 0 to
+  all(.[]; c | not))
+- hoist-invariant: a parenthesized or collected subexpression of map, any,
+  all, sort_by, reduce, ... that starts from a variable bound outside it,
+  e.g. map(. > ($all | add / length)), is bound once before the loop
+
+Rewrites are checked, not proven: an alternative replaces the original only
+if its outputs (or errors) match on every checked input.
+"""
+
+import json
+import logging
+import re
+from collections.abc import Callable, Iterator, Sequence
+from dataclasses import dataclass, replace
+from itertools import pairwise
+from typing import Any
+
+from src.compiler import tokenize
+from src.domain import ExecutionResult, OptimizationResult, Task
+from src.executor import JQExecutor
+from src.generator import GenerationError, JQGenerator
+from src.scaling import MIN_COST_SEC, FilterTimer, scalable_inputs, scale_input
+from src.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Rewrites applied to one filter before giving up on reaching a fixed point
+_MAX_REWRITES = 8
+
+_OPEN = {"(": ")", "[": "]", "{": "}"}
+
+# Keywords after which a parenthesis starts a group rather than arguments
+_KEYWORDS = {"if", "then", "elif", "else", "and", "or"}
+
+# Builtins whose argument runs once per element of their input
+_ITERATING = {
+    "map",
+    "map_values",
+    "any",
+    "all",
+    "sort_by",
+    "group_by",
+    "unique_by",
+    "min_by",
+    "max_by",
+    "with_entries",
+}
+
+# Builtins that may produce zero or several outputs
+_STREAMING = {
+    "empty",
+    "error",
+    "select",
+    "recurse",
+    "range",
+    "paths",
+    "leaf_paths",
+    "splits",
+    "scan",
+    "match",
+    "capture",
+    "limit",
+    "tostream",
+    "combinations",
+    "values",
+    "nulls",
+    "booleans",
+    "numbers",
+    "strings",
+    "arrays",
+    "objects",
+    "iterables",
+    "scalars",
+}
+
+# Builtins whose result depends on more than their input and variables
+_IMPURE = {
+    "input",
+    "inputs",
+    "input_line_number",
+    "input_filename",
+    "now",
+    "debug",
+    "stderr",
+    "halt",
+    "halt_error",
+    "def",
+    "label",
+    "break",
+}
+
+# Variables introduced by hoist-invariant
+_HOISTED = re.compile(r"\$_opt\d+")
+
+_ANY_LENGTHS = {"length>0", "length>=1", "length!=0"}
+_NONE_LENGTHS = {"length==0", "length<1"}
+_FIRST = {".[0]", "first"}
+_LAST = {".[-1]", "last"}
+
+
+@dataclass(frozen=True)
+class OptimizationPolicy:
+    """
+    How alternatives are checked and benchmarked.
+
+    Attributes:
+        size: Array length the largest example input is grown to for the
+            benchmark.
+        check_sizes: Array lengths of the generated inputs on which
+            alternatives must match the original, besides the examples and
+            their reversed arrays.
+        repeats: jq runs per benchmark; the fastest counts.
+        min_seconds: The original's own time on the benchmark input below
+            which it is not optimized (too small to measure reliably).
+        min_speedup: Speedup an alternative needs to replace the original.
+        llm_candidates: Alternatives asked from the LLM (0 for rules only).
+    """
+
+    size: int = 1000
+    check_sizes: tuple[int, ...] = (0, 1, 3)
+    repeats: int = 3
+    min_seconds: float = 0.01
+    min_speedup: float = 1.25
+    llm_candidates: int = 1
+
+
+class _Tokens:
+    """A tokenized filter with its matching brackets, and the span helpers rules use."""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.tokens = tokenize(source)
+        self.close: dict[int, int] = {}
+        stack: list[int] = []
+        for i, token in enumerate(self.tokens):
+            if token.kind != "op":
+                continue
+            if token.text in _OPEN:
+                stack.append(i)
+            elif token.text in _OPEN.values():
+                if not stack or _OPEN[self.tokens[stack[-1]].text] != token.text:
+                    raise ValueError("Unbalanced brackets")
+                self.close[stack.pop()] = i
+        if stack:
+            raise ValueError("Unbalanced brackets")
+
+    def is_op(self, i: int, *texts: str) -> bool:
+        return (
+            0 <= i < len(self.tokens)
+            and self.tokens[i].kind == "op"
+            and (self.tokens[i].text in texts)
+        )
+
+    def text(self, lo: int, hi: int) -> str:
+        """Source text of tokens lo to hi (exclusive)."""
+        return self.source[self.tokens[lo].start : self.tokens[hi - 1].end] if lo < hi else ""
+
+    def compact(self, lo: int, hi: int) -> str:
+        """Tokens lo to hi without whitespace, for comparing with fixed stages."""
+        return "".join(token.text for token in self.tokens[lo:hi])
+
+    def replace(self, lo: int, hi: int, text: str) -> str:
+        """The filter with tokens lo to hi replaced by text."""
+        return self.source[: self.tokens[lo].start] + text + self.source[self.tokens[hi - 1].end :]
+
+    def top_level(self, lo: int, hi: int) -> Iterator[int]:
+        """Indices of the tokens in lo..hi that are not inside brackets."""
+        i = lo
+        while i < hi:
+            yield i
+            i = self.close[i] + 1 if i in self.close else i + 1
+
+    def split(self, lo: int, hi: int, separator: str) -> list[tuple[int, int]]:
+        """Spans of lo..hi between top-level separators."""
+        spans: list[tuple[int, int]] = []
+        start = lo
+        for i in self.top_level(lo, hi):
+            if self.is_op(i, separator):
+                spans.append((start, i))
+                start = i + 1
+        spans.append((start, hi))
+        return spans
+
+    def pipelines(self) -> Iterator[list[tuple[int, int]]]:
+        """The stages of the whole filter and of every bracketed expression."""
+        regions = [(0, len(self.tokens))]
+        regions += [(i + 1, close) for i, close in self.close.items() if self.is_op(i, "(", "[")]
+        for lo, hi in regions:
+            for part in self.split(lo, hi, ";"):
+                yield self.split(*part, "|")
+
+    def call(self, lo: int, hi: int, name: str) -> tuple[int, int] | None:
+        """Argument span if lo..hi is exactly name(...), else None."""
+        if (
+            hi - lo >= 3
+            and self.tokens[lo].kind == "ident"
+            and self.tokens[lo].text == name
+            and self.is_op(lo + 1, "(")
+            and self.close[lo + 1] == hi - 1
+        ):
+            return lo + 2, hi - 1
+        return None
+
+    def binds(self, lo: int, hi: int) -> bool:
+        """Whether lo..hi binds a variable or function visible after it."""
+        return any(
+            self.tokens[i].kind == "ident" and self.tokens[i].text in ("as", "def", "label")
+            for i in self.top_level(lo, hi)
+        )
+
+    def constructs_array(self, i: int) -> bool:
+        """Whether the [ at i builds an array rather than indexing or iterating."""
+        if i == 0:
+            return True
+        previous = self.tokens[i - 1]
+        if previous.kind == "ident":
+            return previous.text in _KEYWORDS
+        return previous.kind == "op" and previous.text not in (".", "..", "?", ")", "]", "}")
+
+    def bound_variables(self, lo: int, hi: int) -> set[str]:
+        """Names bound by 'as' patterns and labels in lo..hi."""
+        names: set[str] = set()
+        for i in range(lo, hi):
+            token = self.tokens[i]
+            if token.kind != "ident" or token.text not in ("as", "label"):
+                continue
+            j = i + 1
+            while j < hi:
+                if self.tokens[j].kind == "var":
+                    names.add(self.tokens[j].text)
+                elif self.is_op(j, "[", "{"):
+                    names.update(t.text for t in self.tokens[j : self.close[j]] if t.kind == "var")
+                    j = self.close[j]
+                else:
+                    break
+                j += 1
+                if not self.is_op(j, "?//"):
+                    break
+                j += 1
+        return names
+
+    def loops(self) -> Iterator[tuple[int, int]]:
+        """Spans of the terms that run a body per element: map(...), reduce ... (...), ..."""
+        for i, token in enumerate(self.tokens):
+            if token.kind != "ident":
+                continue
+            if token.text in _ITERATING and self.is_op(i + 1, "("):
+                yield i, self.close[i + 1] + 1
+            elif token.text in ("reduce", "foreach"):
+                # The body is the first parenthesis after the 'as' pattern
+                pattern = False
+                for j in self.top_level(i + 1, len(self.tokens)):
+                    pattern = pattern or self.tokens[j].text == "as"
+                    if pattern and self.is_op(j, "("):
+                        yield i, self.close[j] + 1
+                        break
+
+    def variable_path(self, lo: int, hi: int, *, iterate: bool) -> bool:
+        """Whether lo..hi is exactly $name followed by fields and indices ([] if iterate)."""
+        if lo >= hi or self.tokens[lo].kind != "var":
+            return False
+        i = lo + 1
+        while i < hi:
+            token = self.tokens[i]
+            if token.kind == "field":
+                i += 1
+            elif token.text == "." and i + 1 < hi and self.tokens[i + 1].kind == "string":
+                i += 2
+            elif self.is_op(i, "[") and self.close[i] == i + 1 and iterate:
+                i += 2
+            elif (
+                self.is_op(i, "[")
+                and self.close[i] == i + 2
+                and self.tokens[i + 1].kind in ("string", "number")
+            ):
+                i += 3
+            else:
+                return False
+        return True
+
+    def may_stream(self, lo: int, hi: int) -> bool:
+        """Whether lo..hi may produce zero or several outputs at its top level."""
+        for i in self.top_level(lo, hi):
+            token = self.tokens[i]
+            if token.kind == "ident" and token.text in _STREAMING:
+                return True
+            if self.is_op(i, ",", ".."):
+                return True
+            if self.is_op(i, "[") and self.close[i] == i + 1:
+                return True
+        return False
+
+    def invariant(self, g: int, bound: set[str]) -> bool:
+        """
+        Whether the group opened at g can be evaluated once, outside its loop.
+
+        It must be a parenthesized expression (not call arguments) or an
+        array construction whose first stage is a path from a variable not
+        bound in the loop, do more than read that path, and use nothing that
+        depends on the loop.
+        """
+        close = self.close[g]
+        if self.is_op(close + 1, "?", "//"):
+            return False
+        previous = self.tokens[g - 1] if g else None
+        collects = self.tokens[g].text == "["
+        if collects and not self.constructs_array(g):
+            return False
+        if not collects and previous is not None and previous.kind == "ident":
+            if previous.text not in _KEYWORDS:
+                return False
+        stages = self.split(g + 1, close, "|")
+        if not self.variable_path(*stages[0], iterate=collects):
+            return False
+        if _HOISTED.fullmatch(self.tokens[g + 1].text):
+            return False  # already hoisted
+        if len(stages) == 1 and not (collects and self.may_stream(*stages[0])):
+            return False
+        inner = self.tokens[g + 1 : close]
+        if any(t.kind == "var" and t.text in bound for t in inner):
+            return False
+        return not any(t.kind == "ident" and t.text in _IMPURE for t in inner)
+
+
+def _collect_to_map(tokens: _Tokens) -> str | None:
+    """[.[] | f] -> map(f)."""
+    for i, close in tokens.close.items():
+        if not tokens.is_op(i, "[") or not tokens.constructs_array(i):
+            continue
+        stages = tokens.split(i + 1, close, "|")
+        if len(stages) > 1 and tokens.compact(*stages[0]) == ".[]":
+            return tokens.replace(i, close + 1, f"map({tokens.text(stages[1][0], close)})")
+    return None
+
+
+def _fuse_maps(tokens: _Tokens) -> str | None:
+    """map(f) | map(g) -> map(f | g)."""
+    for stages in tokens.pipelines():
+        for first, second in pairwise(stages):
+            inner = tokens.call(*first, "map")
+            outer = tokens.call(*second, "map")
+            if inner is not None and outer is not None and not tokens.binds(*inner):
+                fused = f"map({tokens.text(*inner)} | {tokens.text(*outer)})"
+                return tokens.replace(first[0], second[1], fused)
+    return None
+
+
+def _sort_to_min_max(tokens: _Tokens) -> str | None:
+    """sort | .[0] -> min, sort_by(f) | .[-1] -> max_by(f), ..."""
+    for stages in tokens.pipelines():
+        for first, second in pairwise(stages):
+            pick = tokens.compact(*second)
+            name = "min" if pick in _FIRST else "max" if pick in _LAST else None
+            if name is None:
+                continue
+            if tokens.compact(*first) == "sort":
+                return tokens.replace(first[0], second[1], name)
+            key = tokens.call(*first, "sort_by")
+            if key is not None:
+                return tokens.replace(first[0], second[1], f"{name}_by({tokens.text(*key)})")
+    return None
+
+
+def _select_to_any(tokens: _Tokens) -> str | None:
+    """map(select(c)) | length > 0 -> any(.[]; c), ... | length == 0 -> all(.[]; c | not)."""
+    for stages in tokens.pipelines():
+        for first, second in pairwise(stages):
+            body = tokens.call(*first, "map")
+            condition = tokens.call(*body, "select") if body is not None else None
+            if condition is None:
+                continue
+            test = tokens.compact(*second)
+            if test in _ANY_LENGTHS:
+                replacement = f"any(.[]; {tokens.text(*condition)})"
+            elif test in _NONE_LENGTHS:
+                replacement = f"all(.[]; {tokens.text(*condition)} | not)"
+            else:
+                continue
+            return tokens.replace(first[0], second[1], replacement)
+    return None
+
+
+def _hoist_invariant(tokens: _Tokens) -> str | None:
+    """
+    map(... ($v | f) ...) -> ((try [($v | f)] catch {error: .}) as $_opt0 | map(... ...)).
+
+    The group's outputs are collected once before the loop and replayed
+    where it was, so it still produces the same stream, and an error it
+    raises is only raised again if the loop reaches it (not, e.g., when
+    mapping an empty array).
+    """
+    for start, end in tokens.loops():
+        if any(t.kind == "ident" and t.text == "def" for t in tokens.tokens[start:end]):
+            continue
+        bound = tokens.bound_variables(start, end)
+        for g in range(start + 1, end - 1):
+            if not tokens.is_op(g, "(", "[") or not tokens.invariant(g, bound):
+                continue
+            name = _fresh_variable(tokens.source)
+            close = tokens.close[g]
+            source, spans = tokens.source, tokens.tokens
+            loop = (
+                source[spans[start].start : spans[g].start]
+                + f'({name} | if type == "array" then .[] else error(.error) end)'
+                + source[spans[close].end : spans[end - 1].end]
+            )
+            hoisted = f"((try [{tokens.text(g, close + 1)}] catch {{error: .}}) as {name} | {loop})"
+            return tokens.replace(start, end, hoisted)
+    return None
+
+
+def _fresh_variable(source: str) -> str:
+    """A variable name not used in source."""
+    n = 0
+    while re.search(rf"\$_opt{n}\b", source):
+        n += 1
+    return f"$_opt{n}"
+
+
+_RULES: tuple[tuple[str, Callable[[_Tokens], str | None]], ...] = (
+    ("collect-to-map", _collect_to_map),
+    ("map-fusion", _fuse_maps),
+    ("sort-to-min-max", _sort_to_min_max),
+    ("select-to-any", _select_to_any),
+    ("hoist-invariant", _hoist_invariant),
+)
+
+
+def _apply(
+    filter_code: str, rules: Sequence[tuple[str, Callable[[_Tokens], str | None]]]
+) -> tuple[str, list[str]]:
+    """Apply rules until none matches; returns the filter and the rules that did."""
+    applied: list[str] = []
+    for _ in range(_MAX_REWRITES):
+        try:
+            tokens = _Tokens(filter_code)
+        except ValueError:
+            break
+        for name, rule in rules:
+            rewritten = rule(tokens)
+            if rewritten is not None:
+                filter_code = rewritten
+                if name not in applied:
+                    applied.append(name)
+                break
+        else:
+            break
+    return filter_code, applied
+
+
+def rewrite(filter_code: str) -> list[tuple[str, str]]:
+    """
+    Rule-based alternatives to a filter.
+
+    Each rule is applied wherever it matches on its own, then all rules
+    together until none matches (so e.g. [.[] | f] | map(g) becomes
+    map(f | g)).
+
+    Args:
+        filter_code: The filter to rewrite.
+
+    Returns:
+        (rules applied, alternative) pairs, without duplicates or the filter
+        itself; empty if the filter cannot be tokenized.
+
+    Examples:
+        >>> rewrite("[.[] | .a] | map(. + 1)")[-1]
+        ('collect-to-map+map-fusion', 'map(.a | . + 1)')
+    """
+    alternatives: dict[str, str] = {}
+    for rule in [*((r,) for r in _RULES), _RULES]:
+        rewritten, applied = _apply(filter_code, rule)
+        if rewritten != filter_code and rewritten not in alternatives:
+            alternatives[rewritten] = "+".join(applied)
+    return [(source, alternative) for alternative, source in alternatives.items()]
+
+
+def _reverse_arrays(value: Any) -> Any:
+    """Reverse the arrays that scale_input would grow."""
+    if isinstance(value, list):
+        return value[::-1]
+    if isinstance(value, dict):
+        return {key: _reverse_arrays(item) for key, item in value.items()}
+    return value
+
+
+def equivalence_inputs(task: Task, sizes: Sequence[int]) -> list[Any]:
+    """
+    Inputs on which an alternative must behave like the original filter.
+
+    Args:
+        task: The task whose example inputs are varied.
+        sizes: Lengths the examples' arrays are resized to (see scale_input).
+
+    Returns:
+        The example inputs, then each with its arrays reversed and resized
+        to every size, without duplicates.
+    """
+    inputs = {json.dumps(e.input_data): e.input_data for e in task.examples}
+    for example in task.examples:
+        variants = [_reverse_arrays(example.input_data)]
+        variants += [scale_input(example.input_data, size) for size in sizes]
+        inputs.update((json.dumps(v), v) for v in variants)
+    return list(inputs.values())
+
+
+class FilterOptimizer:
+    """
+    Looks for a faster filter with the same output as a solution's.
+
+    Attributes:
+        executor: Runs jq for the equivalence checks and benchmarks; its
+            timeout bounds each run.
+        generator: Optional generator asked for alternatives.
+        policy: Benchmark size, checks and thresholds.
+        timer: Times the benchmark runs.
+    """
+
+    def __init__(
+        self,
+        executor: JQExecutor,
+        generator: JQGenerator | None = None,
+        policy: OptimizationPolicy | None = None,
+    ) -> None:
+        """
+        Initialize the optimizer.
+
+        Args:
+            executor: Executor for the jq runs.
+            generator: Generator asked for alternatives. Defaults to None
+                (rule-based rewrites only).
+            policy: Optimization policy. Defaults to OptimizationPolicy().
+        """
+        self.executor = executor
+        self.generator = generator
+        self.policy = policy or OptimizationPolicy()
+        self.timer = FilterTimer(executor)
+
+    def optimize(self, task: Task, filter_code: str) -> OptimizationResult | None:
+        """
+        Find the fastest filter equivalent to filter_code.
+
+        Args:
+            task: The solved task.
+            filter_code: A filter passing every example.
+
+        Returns:
+            The benchmark of the original and the fastest equivalent
+            alternative (the original itself if none was min_speedup faster),
+            or None if the original was not measured: no example input has an
+            array to grow, the original fails on the scaled input, or it is
+            too fast to measure.
+        """
+        inputs = scalable_inputs(task)
+        if not inputs:
+            logger.debug("No example input of task '%s' can be scaled", task.id)
+            return None
+
+        policy = self.policy
+        with span("FilterOptimizer.optimize", task_id=task.id):
+            large = json.dumps(scale_input(inputs[0], policy.size)).encode("utf-8")
+            baseline = self.timer.fastest("empty", large, policy.repeats)
+            seconds, reference = self._benchmark(filter_code, large)
+            timed_out = reference.is_timeout
+            if not (reference.is_success or timed_out):
+                logger.debug("'%s' fails on the scaled input; not optimized", filter_code)
+                return None
+            cost = max(seconds - baseline, MIN_COST_SEC)
+            if cost < policy.min_seconds and not timed_out:
+                logger.info(
+                    "'%s' takes %.4fs at n=%d; not optimized", filter_code, cost, policy.size
+                )
+                return None
+
+            checks = "\n".join(json.dumps(v) for v in equivalence_inputs(task, policy.check_sizes))
+            check_bytes = checks.encode("utf-8")
+            expected = self._outputs(filter_code, check_bytes)
+            if expected is None:
+                logger.debug("'%s' fails on the equivalence inputs; not optimized", filter_code)
+                return None
+
+            candidates = self._candidates(task, filter_code)
+            result = OptimizationResult(
+                original_filter=filter_code,
+                best_filter=filter_code,
+                source="original",
+                size=policy.size,
+                seconds=(cost, cost),
+                speedup=1.0,
+                candidates=len(candidates),
+                equivalent=0,
+                timed_out=timed_out,
+            )
+            for source, candidate in candidates:
+                if self._outputs(candidate, check_bytes) != expected:
+                    logger.debug("Rejected '%s' (%s): different output", candidate, source)
+                    continue
+                seconds, run = self._benchmark(candidate, large)
+                if not run.is_success or (not timed_out and run.stdout != reference.stdout):
+                    logger.debug(
+                        "Rejected '%s' (%s): differs on the scaled input", candidate, source
+                    )
+                    continue
+                candidate_cost = max(seconds - baseline, MIN_COST_SEC)
+                logger.debug("'%s' (%s) takes %.4fs", candidate, source, candidate_cost)
+                result = replace(result, equivalent=result.equivalent + 1)
+                if cost / candidate_cost >= max(policy.min_speedup, result.speedup):
+                    result = replace(
+                        result,
+                        best_filter=candidate,
+                        source=source,
+                        seconds=(cost, candidate_cost),
+                        speedup=cost / candidate_cost,
+                    )
+
+        if result.best_filter == filter_code:
+            logger.info(
+                "No faster equivalent of '%s' among %d alternatives", filter_code, len(candidates)
+            )
+        else:
+            logger.info(
+                "Optimized '%s' to '%s' (%s): %.1fx faster at n=%d",
+                filter_code,
+                result.best_filter,
+                result.source,
+                result.speedup,
+                policy.size,
+            )
+        return result
+
+    def _candidates(self, task: Task, filter_code: str) -> list[tuple[str, str]]:
+        """Rule-based alternatives, then the LLM's."""
+        candidates = rewrite(filter_code)
+        proposed: list[str] = []
+        for _ in range(self.policy.llm_candidates):
+            alternative = self._ask_llm(task, filter_code, proposed)
+            if alternative is None:
+                break
+            if alternative != filter_code and alternative not in proposed:
+                proposed.append(alternative)
+        known = {candidate for _, candidate in candidates}
+        return candidates + [("llm", f) for f in proposed if f not in known]
+
+    def _ask_llm(self, task: Task, filter_code: str, proposed: list[str]) -> str | None:
+        """Ask the generator for a faster filter with the same output."""
+        if self.generator is None:
+            return None
+        description = (
+            f"{task.description}\n\n"
+            f"This jq filter already produces the expected output for every example:\n"
+            f"{filter_code}\n"
+            "Write a different filter that produces exactly the same output for every input "
+            "but runs faster on large inputs, e.g. computing values that do not depend on the "
+            "current element once, outside map, select or reduce, and using min_by, any or "
+            "first instead of sorting or collecting everything."
+        )
+        if proposed:
+            description += "\nAlready proposed: " + "; ".join(proposed)
+        try:
+            return self.generator.generate(replace(task, description=description))
+        except GenerationError as e:
+            logger.warning("No alternative from the LLM: %s", e)
+            return None
+
+    def _outputs(self, filter_code: str, input_bytes: bytes) -> str | None:
+        """One line per input: the filter's outputs as an array, or null on error."""
+        result = self.executor.run_raw(f"try [({filter_code}\n)] catch null", input_bytes)
+        return result.stdout if result.is_success else None
+
+    def _benchmark(self, filter_code: str, input_bytes: bytes) -> tuple[float, ExecutionResult]:
+        """Fastest wall-clock time of the policy's repeats, and the first run's result."""
+        seconds, result = self.timer.time(filter_code, input_bytes)
+        if result.is_success:
+            runs = self.policy.repeats - 1
+            seconds = min(seconds, self.timer.fastest(filter_code, input_bytes, runs))
+        return seconds, result
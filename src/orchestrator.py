@@ -6,14 +6,28 @@ loop for jq filter synthesis, coordinating between the generator and reviewer
 components while implementing anti-stuck mechanisms.
 """
 
+import asyncio
 import logging
 import sys
-from dataclasses import replace
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, field, replace
+from statistics import mean
 
+from src.cascade import ModelCascade
+from src.cegis import CEGISPolicy, select_diverse
 from src.colors import dim, error, success, warning
-from src.domain import Attempt, Solution, Task
+from src.domain import Attempt, ErrorType, ExampleResult, Solution, Task
 from src.generator import JQGenerator
+from src.matcher import StructuralMatcher
+from src.metrics import get_metrics
+from src.optimizer import FilterOptimizer, OptimizationPolicy
+from src.providers import provider_label
 from src.reviewer import AlgorithmicReviewer
+from src.scaling import ScalingPolicy, ScalingReviewer
+from src.templates import TemplateLibrary
+from src.timing import PhaseTimer, recording
+from src.tracing import NoopSpan, Span, filter_hash, span
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +71,44 @@ def _print_progress_done(message: str) -> None:
     print(f"\r{' ' * 80}\r{message}")
 
 
+@dataclass
+class _SolveState:
+    """
+    Mutable bookkeeping for one run of the refinement loop.
+
+    Attributes:
+        show_progress: Whether per-iteration progress lines are printed.
+        history: Evaluated attempts, in order.
+        best: Highest-scoring attempt so far.
+        stagnation_counter: Consecutive iterations without improvement.
+        seen_filters: Normalized filters already generated.
+        tier: Index of the current model in the cascade.
+        last_error: Primary error of the latest attempt.
+        error_streak: Consecutive attempts with last_error.
+        working: Indices of the examples in the CEGIS working set, or None
+            when every example is used.
+        working_grew: Whether the latest evaluation added counterexamples.
+        slow: The first attempt that passed every example but scaled
+            superlinearly; returned if no passing filter scales better.
+    """
+
+    show_progress: bool
+    history: list[Attempt] = field(default_factory=list)
+    best: Attempt | None = None
+    stagnation_counter: int = 0
+    seen_filters: set[str] = field(default_factory=set)
+    tier: int = 0
+    last_error: ErrorType | None = None
+    error_streak: int = 0
+    working: list[int] | None = None
+    working_grew: bool = False
+    slow: Attempt | None = None
+
+    def history_for_prompt(self) -> list[Attempt] | None:
+        """Copy of the history to pass to the generator (None when empty)."""
+        return list(self.history) if self.history else None
+
+
 class Orchestrator:
     """
     Coordinates the iterative jq filter synthesis loop.
@@ -70,6 +122,18 @@ class Orchestrator:
         reviewer: The AlgorithmicReviewer instance for evaluating filters.
         max_iterations: Maximum number of generation attempts.
         stagnation_limit: Number of iterations without improvement before stopping.
+        matcher: Optional StructuralMatcher tried before the LLM loop.
+        templates: Optional TemplateLibrary of jq idioms tried before the LLM loop.
+        cascade: Optional ModelCascade of cheaper models tried before generator.
+        cegis: Optional CEGISPolicy; when set, prompts and first-pass
+            evaluation use a growing working set of examples.
+        scaling: Optional ScalingReviewer measuring LLM candidates that pass
+            every example on scaled-up inputs.
+        optimizer: Optional FilterOptimizer looking for a faster equivalent
+            of each successful solution's filter.
+        timings: Whether per-phase timings are recorded on attempts and
+            solutions.
+        on_attempt: Optional callback receiving each evaluated attempt.
     """
 
     def __init__(
@@ -78,6 +142,15 @@ class Orchestrator:
         reviewer: AlgorithmicReviewer,
         max_iterations: int = 10,
         stagnation_limit: int = 3,
+        *,
+        matcher: StructuralMatcher | None = None,
+        templates: TemplateLibrary | None = None,
+        cascade: ModelCascade | None = None,
+        cegis: CEGISPolicy | None = None,
+        scaling: ScalingPolicy | None = None,
+        optimization: OptimizationPolicy | None = None,
+        timings: bool = False,
+        on_attempt: Callable[[Task, Attempt], None] | None = None,
     ) -> None:
         """
         Initialize the orchestrator.
@@ -88,11 +161,55 @@ class Orchestrator:
             max_iterations: Maximum number of generation attempts. Defaults to 10.
             stagnation_limit: Number of iterations without improvement before stopping.
                 Defaults to 3.
+            matcher: Optional StructuralMatcher. When set, a projection filter is
+                derived from the examples first and the LLM is skipped if it
+                verifies perfectly. Defaults to None.
+            templates: Optional TemplateLibrary. When set, idioms matching the
+                examples' shapes are instantiated and batch-evaluated before
+                falling back to the LLM. Defaults to None.
+            cascade: Optional ModelCascade. When set, each task starts on the
+                cascade's cheapest model and escalates towards generator when
+                the score stagnates or an error type repeats. Defaults to None.
+            cegis: Optional CEGISPolicy. When set, the LLM loop starts from a
+                small, diverse subset of the examples; candidates passing it are
+                checked against the rest, and failing examples are added to the
+                subset for later prompts. Defaults to None (all examples).
+            scaling: Optional ScalingPolicy. When set, an LLM candidate passing
+                every example is also run on example inputs with their arrays
+                grown (see src/scaling.py). One whose run time or output grows
+                superlinearly has its score penalized and the measurements in
+                its feedback, and the loop goes on looking for a faster filter;
+                it is returned if none is found. Defaults to None.
+            optimization: Optional OptimizationPolicy. When set, a successful
+                solution's filter is rewritten by rule and by the generator,
+                and the fastest alternative with the same output on the
+                examples and generated inputs replaces it (see
+                src/optimizer.py). Defaults to None.
+            timings: If True, the time spent per phase (prompt build, API call,
+                extraction, jq execution, parsing, analysis) is recorded on
+                each Attempt and summed over the solve on the Solution.
+                Defaults to False, in which case instrumentation is a no-op.
+            on_attempt: Optional callback called with the task and each
+                evaluated attempt (numbered, before the stop checks), e.g. to
+                report progress. Defaults to None.
         """
         self.generator = generator
         self.reviewer = reviewer
         self.max_iterations = max_iterations
         self.stagnation_limit = stagnation_limit
+        self.matcher = matcher
+        self.templates = templates
+        self.cascade = cascade
+        self.cegis = cegis
+        self.scaling = ScalingReviewer(reviewer.executor, scaling) if scaling is not None else None
+        self.optimizer = (
+            FilterOptimizer(reviewer.executor, generator, optimization)
+            if optimization is not None
+            else None
+        )
+        self.timings = timings
+        self.on_attempt = on_attempt
+        self._tiers = cascade.tiers(generator) if cascade is not None else [generator]
 
         logger.debug(
             "Orchestrator initialized: max_iterations=%d, stagnation_limit=%d",
@@ -104,12 +221,19 @@ class Orchestrator:
         """
         Attempt to synthesize a jq filter for the given task.
 
-        Runs an iterative refinement loop that:
+        If a structural matcher or template library is configured, deterministic
+        candidates are verified first and returned without any LLM call when one
+        of them is perfect.
+
+        Otherwise runs an iterative refinement loop that:
         1. Generates a candidate filter using the LLM
         2. Evaluates the filter against task examples
         3. Checks for success or stagnation
         4. Continues with feedback until solution found or limits reached
 
+        With an optimization policy, the filter of a successful solution is
+        then replaced by the fastest equivalent alternative found, if any.
+
         Args:
             task: The task containing description and examples to solve.
             verbose: If True, logs additional information including errors.
@@ -121,68 +245,381 @@ class Orchestrator:
         """
         logger.info("Starting solve for task '%s'", task.id)
 
-        history: list[Attempt] = []
-        best: Attempt | None = None
-        stagnation_counter = 0
-        seen_filters: set[str] = set()
+        with span("Orchestrator.solve", task_id=task.id) as trace, self._recording() as timer:
+            solution = self._optimize(task, self._solve(task, verbose))
+            self._observe(trace, solution)
+        return solution if timer is None else replace(solution, timings=timer.snapshot())
+
+    def _solve(self, task: Task, verbose: bool) -> Solution:
+        """Body of solve(), run while the task's phase timer records."""
+        derived = self._solve_without_llm(task, show_progress=True)
+        if derived is not None:
+            return derived
+
+        state = self._start_loop(task, show_progress=True)
+
+        for iteration in range(1, self.max_iterations + 1):
+            self._begin_iteration(state, iteration)
+
+            with self._recording() as timer, span("Orchestrator.iteration", iteration=iteration):
+                # Generate a candidate filter
+                try:
+                    filter_code = self._tiers[state.tier].generate(
+                        self._working_task(task, state), state.history_for_prompt()
+                    )
+                except Exception as e:
+                    self._on_generation_failure(state, iteration, e, verbose)
+                    if self._should_stop(
+                        task, state, "Stagnation limit reached after generator failure"
+                    ):
+                        break
+                    continue
+
+                if not self._accept_candidate(state, iteration, filter_code):
+                    if self._should_stop(
+                        task, state, "Stagnation limit reached due to duplicate filters"
+                    ):
+                        break
+                    continue
+
+                # Evaluate the filter
+                attempt = self._review_scaling(task, self._evaluate(task, state, filter_code))
+
+            solution = self._on_attempt(task, state, iteration, self._timed(attempt, timer))
+            if solution is not None:
+                return solution
+            if self._should_stop(task, state):
+                break
+
+        partial = self._partially_scored_best(task, state)
+        if partial is not None:
+            full = self.reviewer.evaluate(task, partial.filter_code)
+            state.best = replace(full, iteration=partial.iteration, timings=partial.timings)
+        return self._finish(task, state)
+
+    async def solve_async(self, task: Task, verbose: bool = False) -> Solution:
+        """
+        Async counterpart of solve() for running many tasks on one event loop.
+
+        The refinement loop is identical, but LLM requests go through
+        JQGenerator.generate_async and jq runs through
+        AlgorithmicReviewer.evaluate_async, so other tasks make progress while
+        this one waits. The deterministic pre-pass runs in a worker thread.
+        Per-iteration progress lines are not printed, since concurrent tasks
+        would overwrite each other's line.
+
+        Args:
+            task: The task containing description and examples to solve.
+            verbose: If True, logs additional information including errors.
+                Defaults to False.
+
+        Returns:
+            Solution containing the best filter found, success status,
+            and complete attempt history.
+        """
+        logger.info("Starting async solve for task '%s'", task.id)
+
+        with span("Orchestrator.solve", task_id=task.id) as trace, self._recording() as timer:
+            solution = await self._solve_async(task, verbose)
+            solution = await asyncio.to_thread(self._optimize, task, solution)
+            self._observe(trace, solution)
+        return solution if timer is None else replace(solution, timings=timer.snapshot())
+
+    async def _solve_async(self, task: Task, verbose: bool) -> Solution:
+        """Body of solve_async(), run while the task's phase timer records."""
+        derived = await asyncio.to_thread(self._solve_without_llm, task, show_progress=False)
+        if derived is not None:
+            return derived
+
+        state = self._start_loop(task, show_progress=False)
 
         for iteration in range(1, self.max_iterations + 1):
-            logger.info("Iteration %d/%d", iteration, self.max_iterations)
+            self._begin_iteration(state, iteration)
+
+            with self._recording() as timer, span("Orchestrator.iteration", iteration=iteration):
+                try:
+                    filter_code = await self._tiers[state.tier].generate_async(
+                        self._working_task(task, state), state.history_for_prompt()
+                    )
+                except Exception as e:
+                    self._on_generation_failure(state, iteration, e, verbose)
+                    if self._should_stop(
+                        task, state, "Stagnation limit reached after generator failure"
+                    ):
+                        break
+                    continue
+
+                if not self._accept_candidate(state, iteration, filter_code):
+                    if self._should_stop(
+                        task, state, "Stagnation limit reached due to duplicate filters"
+                    ):
+                        break
+                    continue
+
+                attempt = await self._evaluate_async(task, state, filter_code)
+                attempt = await asyncio.to_thread(self._review_scaling, task, attempt)
+
+            solution = self._on_attempt(task, state, iteration, self._timed(attempt, timer))
+            if solution is not None:
+                return solution
+            if self._should_stop(task, state):
+                break
+
+        partial = self._partially_scored_best(task, state)
+        if partial is not None:
+            full = await self.reviewer.evaluate_async(task, partial.filter_code)
+            state.best = replace(full, iteration=partial.iteration, timings=partial.timings)
+        return self._finish(task, state)
+
+    def _recording(self) -> AbstractContextManager[PhaseTimer | None]:
+        """Record phase timings in a nested timer if enabled (yields None otherwise)."""
+        return recording() if self.timings else nullcontext()
+
+    def _timed(self, attempt: Attempt, timer: PhaseTimer | None) -> Attempt:
+        """Attach an iteration's phase timings to its attempt."""
+        return attempt if timer is None else replace(attempt, timings=timer.snapshot())
+
+    @staticmethod
+    def _observe(trace: Span | NoopSpan, solution: Solution) -> None:
+        """Add the outcome of a solve to its trace span and the metrics."""
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.record_solution(solution)
+        if trace.recording:
+            trace.set_attribute("success", solution.success)
+            trace.set_attribute("iterations", solution.iterations_used)
+            trace.set_attribute("best_score", solution.best_score)
+            trace.set_attribute("filter_hash", filter_hash(solution.best_filter))
+
+    def _start_loop(self, task: Task, show_progress: bool) -> "_SolveState":
+        """Create the loop state, starting on the cheapest model and CEGIS subset."""
+        if self.cascade is not None:
+            self.cascade.record(self._tiers[0], tasks=1)
+
+        state = _SolveState(show_progress=show_progress)
+        if self.cegis is not None and len(task.examples) > self.cegis.initial_examples:
+            state.working = select_diverse(task.examples, self.cegis.initial_examples)
+            logger.info(
+                "CEGIS: starting task '%s' with examples %s of %d",
+                task.id,
+                [i + 1 for i in state.working],
+                len(task.examples),
+            )
+        return state
+
+    def _working_task(self, task: Task, state: "_SolveState") -> Task:
+        """The task restricted to the CEGIS working set (or the task itself)."""
+        if state.working is None:
+            return task
+        return replace(task, examples=[task.examples[i] for i in state.working])
+
+    def _remaining_task(self, task: Task, state: "_SolveState") -> tuple[list[int], Task]:
+        """Indices and task of the examples outside the CEGIS working set."""
+        working = set(state.working or [])
+        rest = [i for i in range(len(task.examples)) if i not in working]
+        return rest, replace(task, examples=[task.examples[i] for i in rest])
+
+    def _evaluate(self, task: Task, state: "_SolveState", filter_code: str) -> Attempt:
+        """Evaluate a candidate on the working set, then look for counterexamples."""
+        if state.working is None or self.cegis is None:
+            return self.reviewer.evaluate(task, filter_code)
+
+        attempt = self.reviewer.evaluate(self._working_task(task, state), filter_code)
+        if not attempt.is_perfect:
+            return attempt
+
+        rest, rest_task = self._remaining_task(task, state)
+        results = self.reviewer.find_counterexamples(
+            rest_task,
+            filter_code,
+            self.cegis.counterexamples_per_round,
+        )
+        return self._merge_counterexamples(task, state, attempt, rest, results)
+
+    async def _evaluate_async(self, task: Task, state: "_SolveState", filter_code: str) -> Attempt:
+        """Async counterpart of _evaluate."""
+        if state.working is None or self.cegis is None:
+            return await self.reviewer.evaluate_async(task, filter_code)
+
+        attempt = await self.reviewer.evaluate_async(self._working_task(task, state), filter_code)
+        if not attempt.is_perfect:
+            return attempt
+
+        rest, rest_task = self._remaining_task(task, state)
+        results = await self.reviewer.find_counterexamples_async(
+            rest_task,
+            filter_code,
+            self.cegis.counterexamples_per_round,
+        )
+        return self._merge_counterexamples(task, state, attempt, rest, results)
+
+    def _review_scaling(self, task: Task, attempt: Attempt) -> Attempt:
+        """Measure a passing attempt on scaled inputs, penalizing superlinear growth."""
+        if self.scaling is None or not attempt.is_perfect:
+            return attempt
+        result = self.scaling.measure(task, attempt.filter_code)
+        if result is None:
+            return attempt
+        if not result.superlinear:
+            return replace(attempt, scaling=result)
+        logger.info("'%s' passes every example but scales superlinearly", attempt.filter_code)
+        return replace(
+            attempt,
+            scaling=result,
+            aggregated_score=attempt.aggregated_score * (1 - self.scaling.policy.penalty),
+        )
+
+    def _optimize(self, task: Task, solution: Solution) -> Solution:
+        """Replace a successful solution's filter with a faster equivalent, if found."""
+        if self.optimizer is None or not solution.success:
+            return solution
+        result = self.optimizer.optimize(task, solution.best_filter)
+        if result is None:
+            return solution
+        if result.best_filter == solution.best_filter:
+            return replace(solution, optimization=result)
+        scaling = solution.scaling
+        if scaling is not None and self.scaling is not None:
+            scaling = self.scaling.measure(task, result.best_filter)
+        return replace(
+            solution, best_filter=result.best_filter, optimization=result, scaling=scaling
+        )
+
+    def _merge_counterexamples(
+        self,
+        task: Task,
+        state: "_SolveState",
+        attempt: Attempt,
+        rest: list[int],
+        results: list[ExampleResult],
+    ) -> Attempt:
+        """
+        Combine a working-set pass with the check of the remaining examples.
 
+        If every remaining example passed, the returned attempt covers the full
+        task (and is perfect). Otherwise the failing examples join the working
+        set and the returned attempt covers the enlarged working set, so its
+        score and feedback match what the next prompt shows.
+        """
+        working = state.working or []
+        by_index = dict(zip(working, attempt.example_results, strict=True))
+        failing = [rest[i] for i, result in enumerate(results) if result.score < 1.0]
+
+        if not failing:
+            by_index.update(zip(rest, results, strict=True))
+            logger.info("CEGIS: '%s' passes all %d examples", attempt.filter_code, len(by_index))
+        else:
+            by_index.update(
+                (rest[i], result) for i, result in enumerate(results) if rest[i] in failing
+            )
+            state.working = sorted(by_index)
+            state.working_grew = True
+            logger.info(
+                "CEGIS: '%s' fails example(s) %s; working set is now %d of %d",
+                attempt.filter_code,
+                [i + 1 for i in failing],
+                len(state.working),
+                len(task.examples),
+            )
+
+        ordered = [by_index[i] for i in sorted(by_index)]
+        return self.reviewer.summarize(attempt.filter_code, ordered)
+
+    def _partially_scored_best(self, task: Task, state: "_SolveState") -> Attempt | None:
+        """
+        The best attempt if it was scored on only part of the examples.
+
+        Such an attempt is re-evaluated on the full task before the loop
+        returns, so the reported best score is comparable with non-CEGIS runs.
+        """
+        if (
+            state.slow is not None
+            or state.best is None
+            or len(state.best.example_results) == len(task.examples)
+        ):
+            return None
+        return state.best
+
+    def _begin_iteration(self, state: "_SolveState", iteration: int) -> None:
+        """Log the start of an iteration and show the generating status."""
+        logger.info("Iteration %d/%d", iteration, self.max_iterations)
+
+        if state.show_progress:
             # Show progress: generating filter
             _print_progress(
                 iteration, self.max_iterations, "🤖 Generating filter...", clear_line=True
             )
 
-            # Generate a candidate filter
-            try:
-                filter_code = self.generator.generate(task, list(history) if history else None)
-            except Exception as e:
-                if verbose:
-                    logger.warning("Generator failed on iteration %d: %s", iteration, e)
-                _print_progress_done(
-                    f"{error('❌')} Iteration {iteration}/{self.max_iterations} - Generation failed"
-                )
-                stagnation_counter += 1
-                if stagnation_counter >= self.stagnation_limit:
-                    logger.info("Stagnation limit reached after generator failure")
-                    break
-                continue
+    def _on_generation_failure(
+        self, state: "_SolveState", iteration: int, e: Exception, verbose: bool
+    ) -> None:
+        """Record a failed generation."""
+        if verbose:
+            logger.warning("Generator failed on iteration %d: %s", iteration, e)
+        if state.show_progress:
+            _print_progress_done(
+                f"{error('❌')} Iteration {iteration}/{self.max_iterations} - Generation failed"
+            )
+        state.stagnation_counter += 1
+
+    def _accept_candidate(self, state: "_SolveState", iteration: int, filter_code: str) -> bool:
+        """
+        Register a generated filter, rejecting duplicates of earlier candidates.
 
-            # Check for duplicates (normalized comparison)
-            normalized = self._normalize(filter_code)
-            if normalized in seen_filters:
-                logger.debug("Duplicate filter detected: '%s'", filter_code)
+        Returns:
+            True if the filter is new and should be evaluated.
+        """
+        # Check for duplicates (normalized comparison)
+        normalized = self._normalize(filter_code)
+        if normalized in state.seen_filters:
+            logger.debug("Duplicate filter detected: '%s'", filter_code)
+            if state.show_progress:
                 _print_progress_done(
                     f"{warning('⚠️')} Iteration {iteration}/{self.max_iterations} - Duplicate filter detected"
                 )
-                stagnation_counter += 1
-                if stagnation_counter >= self.stagnation_limit:
-                    logger.info("Stagnation limit reached due to duplicate filters")
-                    break
-                continue
+            state.stagnation_counter += 1
+            return False
 
-            seen_filters.add(normalized)
+        state.seen_filters.add(normalized)
 
+        if state.show_progress:
             # Show progress: testing filter
             truncated_filter = filter_code[:50] + "..." if len(filter_code) > 50 else filter_code
             _print_progress(iteration, self.max_iterations, f"⚙️  Testing: {dim(truncated_filter)}")
+        return True
 
-            # Evaluate the filter
-            attempt = self.reviewer.evaluate(task, filter_code)
-
-            # Update iteration number (reviewer returns iteration=0)
-            attempt = replace(attempt, iteration=iteration)
-            history.append(attempt)
+    def _on_attempt(
+        self, task: Task, state: "_SolveState", iteration: int, attempt: Attempt
+    ) -> Solution | None:
+        """
+        Record an evaluated attempt and update the best score.
 
-            logger.info(
-                "Attempt %d: score=%.3f, is_perfect=%s, error=%s",
-                iteration,
-                attempt.aggregated_score,
-                attempt.is_perfect,
-                attempt.primary_error.value,
-            )
+        Returns:
+            A successful Solution if the attempt is perfect, None otherwise.
+        """
+        # Update iteration number (reviewer returns iteration=0)
+        attempt = replace(attempt, iteration=iteration)
+        state.history.append(attempt)
+        if self.on_attempt is not None:
+            self.on_attempt(task, attempt)
+
+        if attempt.primary_error is state.last_error:
+            state.error_streak += 1
+        else:
+            state.last_error = attempt.primary_error
+            state.error_streak = 1
+        if self.cascade is not None:
+            self.cascade.record(self._tiers[state.tier], attempts=1, solved=int(attempt.is_perfect))
+
+        logger.info(
+            "Attempt %d: score=%.3f, is_perfect=%s, error=%s",
+            iteration,
+            attempt.aggregated_score,
+            attempt.is_perfect,
+            attempt.primary_error.value,
+        )
 
+        if state.show_progress:
             # Show progress: display score
             if attempt.is_perfect:
                 score_display = success("✓ Score: 1.000 - Perfect match!")
@@ -193,53 +630,125 @@ class Orchestrator:
 
             _print_progress_done(f"Iteration {iteration}/{self.max_iterations}  {score_display}")
 
-            # Check for perfect solution
-            if attempt.is_perfect:
-                logger.info("Perfect solution found on iteration %d", iteration)
-                return Solution(
-                    task_id=task.id,
-                    success=True,
-                    best_filter=attempt.filter_code,
-                    best_score=attempt.aggregated_score,
-                    iterations_used=len(history),
-                    history=history,
-                )
+        # Check for perfect solution
+        if attempt.is_perfect:
+            logger.info("Perfect solution found on iteration %d", iteration)
+            return Solution(
+                task_id=task.id,
+                success=True,
+                best_filter=attempt.filter_code,
+                best_score=attempt.aggregated_score,
+                iterations_used=len(state.history),
+                history=state.history,
+                scaling=attempt.scaling,
+            )
+        if attempt.scaling is not None and attempt.scaling.superlinear and state.slow is None:
+            state.slow = attempt
+
+        # Update best attempt and check for improvement. New counterexamples
+        # make the working set harder, so scores before and after are not
+        # comparable and the attempt that exposed them counts as progress.
+        grew, state.working_grew = state.working_grew, False
+        if grew or state.best is None or attempt.aggregated_score > state.best.aggregated_score:
+            state.best = attempt
+            state.stagnation_counter = 0
+            logger.debug("New best score: %.3f", state.best.aggregated_score)
+        else:
+            state.stagnation_counter += 1
+            logger.debug(
+                "No improvement, stagnation counter: %d/%d",
+                state.stagnation_counter,
+                self.stagnation_limit,
+            )
+        return None
 
-            # Update best attempt and check for improvement
-            if best is None or attempt.aggregated_score > best.aggregated_score:
-                best = attempt
-                stagnation_counter = 0
-                logger.debug("New best score: %.3f", best.aggregated_score)
-            else:
-                stagnation_counter += 1
-                logger.debug(
-                    "No improvement, stagnation counter: %d/%d",
-                    stagnation_counter,
-                    self.stagnation_limit,
-                )
+    def _should_stop(self, task: Task, state: "_SolveState", reason: str | None = None) -> bool:
+        """Escalate to a stronger model if due, then check the stagnation limit."""
+        self._maybe_escalate(task, state)
+        return self._stagnated(state, reason)
 
-            # Check stagnation limit after evaluation
-            if stagnation_counter >= self.stagnation_limit:
-                logger.info(
-                    "Stagnation limit reached after %d iterations without improvement",
-                    stagnation_counter,
-                )
-                break
+    def _maybe_escalate(self, task: Task, state: "_SolveState") -> None:
+        """
+        Move to the next model in the cascade when the current one is stuck.
+
+        Escalation happens when the score has not improved for the policy's
+        escalate_after iterations, or the same error type was seen
+        repeated_error_limit times in a row. The stagnation counter restarts so
+        the stronger model gets its own chance.
+        """
+        if self.cascade is None or state.tier >= len(self._tiers) - 1:
+            return
+
+        policy = self.cascade.policy
+        last_error = state.last_error
+        if state.stagnation_counter >= policy.escalate_after:
+            reason = f"no improvement for {state.stagnation_counter} iterations"
+        elif (
+            last_error is not None
+            and last_error is not ErrorType.NONE
+            and state.error_streak >= policy.repeated_error_limit
+        ):
+            reason = f"{last_error.value} error {state.error_streak} times in a row"
+        else:
+            return
+
+        current, stronger = self._tiers[state.tier], self._tiers[state.tier + 1]
+        self.cascade.record(current, escalations=1)
+        self.cascade.record(stronger, tasks=1)
+        state.tier += 1
+        state.stagnation_counter = 0
+        state.error_streak = 0
+        state.last_error = None
+
+        label = provider_label(stronger.provider)
+        logger.info("Escalating task '%s' to %s (%s)", task.id, label, reason)
+        if state.show_progress:
+            _print_progress_done(f"{warning('⬆')} Escalating to {label} ({reason})")
+
+    def _stagnated(self, state: "_SolveState", reason: str | None = None) -> bool:
+        """Check the stagnation limit, logging why the loop stops."""
+        if state.stagnation_counter < self.stagnation_limit:
+            return False
+
+        if reason is not None:
+            logger.info(reason)
+        else:
+            logger.info(
+                "Stagnation limit reached after %d iterations without improvement",
+                state.stagnation_counter,
+            )
+        return True
+
+    def _finish(self, task: Task, state: "_SolveState") -> Solution:
+        """Build the final Solution once the loop ends without a perfect match."""
+        if state.slow is not None:
+            logger.info(
+                "No faster filter found; returning superlinear '%s'", state.slow.filter_code
+            )
+            return Solution(
+                task_id=task.id,
+                success=True,
+                best_filter=state.slow.filter_code,
+                best_score=mean(result.score for result in state.slow.example_results),
+                iterations_used=len(state.history),
+                history=state.history,
+                scaling=state.slow.scaling,
+            )
 
         # Return best solution found (or failure if none)
-        if best is not None:
+        if state.best is not None:
             logger.info(
                 "Solve completed: success=False, best_score=%.3f, iterations=%d",
-                best.aggregated_score,
-                len(history),
+                state.best.aggregated_score,
+                len(state.history),
             )
             return Solution(
                 task_id=task.id,
                 success=False,
-                best_filter=best.filter_code,
-                best_score=best.aggregated_score,
-                iterations_used=len(history),
-                history=history,
+                best_filter=state.best.filter_code,
+                best_score=state.best.aggregated_score,
+                iterations_used=len(state.history),
+                history=state.history,
             )
 
         # No attempts succeeded at all (all generator failures)
@@ -250,7 +759,82 @@ class Orchestrator:
             best_filter="",
             best_score=0.0,
             iterations_used=0,
-            history=history,
+            history=state.history,
+        )
+
+    def _solve_without_llm(self, task: Task, show_progress: bool) -> Solution | None:
+        """
+        Try to solve the task deterministically, skipping the LLM.
+
+        The structural matcher is tried first, then the template library, whose
+        candidates are screened in batch by the reviewer.
+
+        Args:
+            task: The task to solve.
+            show_progress: Whether a solved task prints a progress line.
+
+        Returns:
+            A successful Solution if a deterministic filter passes every example,
+            None otherwise (including when neither source is configured).
+        """
+        if self.matcher is not None:
+            filter_code = self.matcher.derive(task)
+            if filter_code is not None:
+                solution = self._verify_shortcut(
+                    task, filter_code, "structural match", show_progress
+                )
+                if solution is not None:
+                    return solution
+
+        if self.templates is not None:
+            candidates = self.templates.instantiate(task)
+            if candidates:
+                passing = self.reviewer.screen(task, candidates)
+                logger.debug(
+                    "Template screening: %d/%d candidates passed", len(passing), len(candidates)
+                )
+                if passing:
+                    return self._verify_shortcut(task, passing[0], "template", show_progress)
+
+        return None
+
+    def _verify_shortcut(
+        self, task: Task, filter_code: str, source: str, show_progress: bool
+    ) -> Solution | None:
+        """
+        Evaluate a deterministically produced filter and wrap it in a Solution.
+
+        Args:
+            task: The task being solved.
+            filter_code: The candidate filter.
+            source: Where the candidate came from (for logs and progress output).
+            show_progress: Whether a perfect filter prints a progress line.
+
+        Returns:
+            A successful Solution if the filter is perfect, None otherwise.
+        """
+        with self._recording() as timer:
+            attempt = replace(self.reviewer.evaluate(task, filter_code), iteration=1)
+        attempt = self._timed(attempt, timer)
+        if not attempt.is_perfect:
+            logger.debug(
+                "Filter '%s' from %s failed verification (score=%.3f)",
+                filter_code,
+                source,
+                attempt.aggregated_score,
+            )
+            return None
+
+        logger.info("Task '%s' solved by %s without LLM", task.id, source)
+        if show_progress:
+            _print_progress_done(f"{success('✓')} Solved by {source} - Perfect match!")
+        return Solution(
+            task_id=task.id,
+            success=True,
+            best_filter=filter_code,
+            best_score=attempt.aggregated_score,
+            iterations_used=1,
+            history=[attempt],
         )
 
     def _normalize(self, filter_code: str) -> str:
@@ -0,0 +1,563 @@
+"""
+Performance history of benchmark runs with regression detection.
+
+This module provides PerfHistory, a local sqlite store of `bench` results
+(commit, settings and every task's measurements), and compare_runs, which
+decides whether a candidate run is significantly slower, costlier or solves
+fewer tasks than a baseline. Tasks differ in cost by orders of magnitude, so
+the runs are paired by task and each task is compared with itself: latency
+and cost metrics are tested on the per-task log-ratios candidate/baseline
+with a two-sided Wilcoxon signed-rank test, and every metric gets a
+bootstrap confidence interval of its mean paired change, which is the only
+test used for the solve rate (a binary outcome has too many ties for a rank
+test).
+"""
+
+import json
+import math
+import random
+import sqlite3
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any
+
+from src.bench import TaskRun
+
+# Default location of the history database
+DEFAULT_HISTORY_PATH = ".perf-history.sqlite"
+
+# Verdicts of a metric comparison
+REGRESSION = "regression"
+IMPROVEMENT = "improvement"
+UNCHANGED = "unchanged"
+
+_TASK_COLUMNS = tuple(f.name for f in fields(TaskRun))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT,
+    git_commit TEXT,
+    created_at TEXT NOT NULL,
+    config TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS task_runs (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    suite TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    best_score REAL NOT NULL,
+    iterations INTEGER NOT NULL,
+    time_sec REAL NOT NULL,
+    llm_requests INTEGER NOT NULL,
+    llm_api_calls INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    response_tokens INTEGER NOT NULL,
+    jq_spawns INTEGER NOT NULL,
+    jq_time_sec REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_runs_run_id ON task_runs(run_id);
+"""
+
+
+@dataclass(frozen=True)
+class StoredRun:
+    """
+    One benchmark run in the history.
+
+    Attributes:
+        id: Row ID, increasing with insertion order.
+        label: Free-form name given with --label, if any.
+        commit: Git commit the run was made on, if known.
+        created_at: ISO 8601 timestamp of the run.
+        config: Settings the results depend on.
+        tasks: Tasks run.
+        solved: Tasks solved.
+    """
+
+    id: int
+    label: str | None
+    commit: str | None
+    created_at: str
+    config: dict[str, Any]
+    tasks: int
+    solved: int
+
+
+@dataclass(frozen=True)
+class ComparePolicy:
+    """
+    When a difference between two runs counts as a regression.
+
+    A metric changes significantly when its test rejects "no difference" at
+    level alpha: the Wilcoxon p-value of the per-task log-ratios, the
+    bootstrap confidence interval excluding zero for the solve rate. Changes
+    smaller than min_effect (relative for per-task metrics, absolute for the
+    solve rate) are reported as unchanged even if significant.
+
+    Attributes:
+        alpha: Significance level; intervals are (1 - alpha) two-sided.
+        min_effect: Smallest change worth flagging.
+        resamples: Bootstrap resamples per metric.
+        seed: Seed of the bootstrap, so comparisons are reproducible.
+    """
+
+    alpha: float = 0.05
+    min_effect: float = 0.05
+    resamples: int = 2000
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class MetricComparison:
+    """
+    Comparison of one metric between a baseline and a candidate run.
+
+    Only tasks present in both runs are compared.
+
+    Attributes:
+        metric: Metric name (e.g. 'time_sec').
+        baseline: Baseline mean per task (fraction solved for solve_rate).
+        candidate: Candidate mean per task.
+        change: Typical relative change per task (geometric mean of the
+            candidate/baseline ratios, minus 1); for the solve rate the
+            relative change of the mean, or None if the baseline is 0.
+        ci_low: Lower bound of the bootstrap interval of the typical
+            relative change (of candidate - baseline for the solve rate).
+        ci_high: Upper bound of that interval.
+        p_value: Two-sided Wilcoxon signed-rank p-value of the per-task
+            log-ratios, or None for the solve rate.
+        verdict: REGRESSION, IMPROVEMENT or UNCHANGED.
+    """
+
+    metric: str
+    baseline: float
+    candidate: float
+    change: float | None
+    ci_low: float
+    ci_high: float
+    p_value: float | None
+    verdict: str
+
+
+@dataclass(frozen=True)
+class _Metric:
+    """
+    A per-task metric and which direction is worse.
+
+    floor is added to both values before taking their log-ratio, so tasks
+    with a zero count or an immeasurably short time do not dominate.
+    """
+
+    name: str
+    value: Callable[[TaskRun], float]
+    higher_is_worse: bool
+    rank_test: bool
+    floor: float = 1.0
+
+
+_METRICS = (
+    _Metric("solve_rate", lambda run: float(run.success), higher_is_worse=False, rank_test=False),
+    _Metric("time_sec", lambda run: run.time_sec, higher_is_worse=True, rank_test=True, floor=1e-3),
+    _Metric(
+        "llm_requests", lambda run: float(run.llm_requests), higher_is_worse=True, rank_test=True
+    ),
+    _Metric(
+        "tokens",
+        lambda run: float(run.prompt_tokens + run.response_tokens),
+        higher_is_worse=True,
+        rank_test=True,
+    ),
+    _Metric("jq_spawns", lambda run: float(run.jq_spawns), higher_is_worse=True, rank_test=True),
+    _Metric(
+        "jq_time_sec", lambda run: run.jq_time_sec, higher_is_worse=True, rank_test=True, floor=1e-3
+    ),
+)
+
+
+def wilcoxon_signed_rank(differences: Sequence[float]) -> float:
+    """
+    Two-sided Wilcoxon signed-rank test of paired differences.
+
+    Zero differences are dropped. Uses the normal approximation with tie and
+    continuity corrections, which is adequate from about ten pairs.
+
+    Args:
+        differences: candidate - baseline (or a log-ratio) per pair.
+
+    Returns:
+        The p-value of "the differences are symmetric around zero"; 1.0 if
+        every difference is zero.
+
+    Examples:
+        >>> round(wilcoxon_signed_rank(range(1, 11)), 4)
+        0.0059
+    """
+    nonzero = sorted((abs(d), d > 0) for d in differences if d != 0)
+    n = len(nonzero)
+    if n == 0:
+        return 1.0
+
+    positive_ranks = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and nonzero[j + 1][0] == nonzero[i][0]:
+            j += 1
+        # Tied magnitudes share the mean of their ranks (1-based)
+        mean_rank = (i + j) / 2 + 1
+        positive_ranks += mean_rank * sum(1 for k in range(i, j + 1) if nonzero[k][1])
+        ties = j - i + 1
+        tie_term += ties**3 - ties
+        i = j + 1
+
+    variance = n * (n + 1) * (2 * n + 1) / 24 - tie_term / 48
+    if variance <= 0:
+        return 1.0
+    z = (abs(positive_ranks - n * (n + 1) / 4) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+def bootstrap_mean(
+    values: Sequence[float],
+    *,
+    alpha: float = 0.05,
+    resamples: int = 2000,
+    rng: random.Random | None = None,
+) -> tuple[float, float]:
+    """
+    Percentile bootstrap interval for the mean of paired differences.
+
+    Args:
+        values: One difference (or log-ratio) per pair.
+        alpha: The interval covers 1 - alpha.
+        resamples: Number of bootstrap resamples.
+        rng: Random source (default: seeded with 0).
+
+    Returns:
+        (low, high) bounds of the interval; (0.0, 0.0) if there are no values.
+    """
+    if not values:
+        return (0.0, 0.0)
+    rng = rng or random.Random(0)
+
+    means = sorted(
+        sum(rng.choices(values, k=len(values))) / len(values) for _ in range(max(1, resamples))
+    )
+    low = means[int(alpha / 2 * (len(means) - 1))]
+    high = means[math.ceil((1 - alpha / 2) * (len(means) - 1))]
+    return (low, high)
+
+
+def pair_runs(
+    baseline: Sequence[TaskRun], candidate: Sequence[TaskRun]
+) -> list[tuple[TaskRun, TaskRun]]:
+    """
+    Match the task runs of two benchmarks by suite and task ID.
+
+    Args:
+        baseline: Task runs of the reference run.
+        candidate: Task runs of the run being checked.
+
+    Returns:
+        (baseline, candidate) pairs of the tasks in both runs, in baseline
+        order.
+    """
+    by_task = {(run.suite, run.task_id): run for run in candidate}
+    return [
+        (run, by_task[(run.suite, run.task_id)])
+        for run in baseline
+        if (run.suite, run.task_id) in by_task
+    ]
+
+
+def task_mismatch(
+    baseline: Sequence[TaskRun], candidate: Sequence[TaskRun]
+) -> tuple[list[str], list[str]]:
+    """
+    Tasks only one of two benchmark runs has.
+
+    Args:
+        baseline: Task runs of the reference run.
+        candidate: Task runs of the run being checked.
+
+    Returns:
+        'suite:task_id' names only in the baseline and only in the candidate.
+    """
+    before = {(run.suite, run.task_id) for run in baseline}
+    after = {(run.suite, run.task_id) for run in candidate}
+    return (
+        [f"{suite}:{task_id}" for suite, task_id in sorted(before - after)],
+        [f"{suite}:{task_id}" for suite, task_id in sorted(after - before)],
+    )
+
+
+def config_differences(baseline: dict[str, Any], candidate: dict[str, Any]) -> list[str]:
+    """
+    Settings that differ between two benchmark runs.
+
+    Args:
+        baseline: Config of the reference run.
+        candidate: Config of the run being checked.
+
+    Returns:
+        Sorted names of the settings with different (or missing) values.
+    """
+    return sorted(
+        key for key in baseline.keys() | candidate.keys() if baseline.get(key) != candidate.get(key)
+    )
+
+
+def compare_runs(
+    baseline: Sequence[TaskRun],
+    candidate: Sequence[TaskRun],
+    policy: ComparePolicy | None = None,
+) -> list[MetricComparison]:
+    """
+    Compare two benchmark runs metric by metric, task by task.
+
+    Tasks are paired by suite and task ID; tasks missing from either run
+    are left out (see task_mismatch).
+
+    Args:
+        baseline: Task runs of the reference run.
+        candidate: Task runs of the run being checked.
+        policy: Significance settings (default: ComparePolicy()).
+
+    Returns:
+        One comparison per metric: solve_rate, time_sec, llm_requests,
+        tokens, jq_spawns and jq_time_sec.
+    """
+    policy = policy or ComparePolicy()
+    rng = random.Random(policy.seed)
+    pairs = pair_runs(baseline, candidate)
+    results: list[MetricComparison] = []
+
+    for metric in _METRICS:
+        before = [metric.value(run) for run, _ in pairs]
+        after = [metric.value(run) for _, run in pairs]
+        before_mean = sum(before) / len(before) if before else 0.0
+        after_mean = sum(after) / len(after) if after else 0.0
+
+        p_value: float | None = None
+        if metric.rank_test:
+            log_ratios = [
+                math.log((a + metric.floor) / (b + metric.floor))
+                for b, a in zip(before, after, strict=True)
+            ]
+            p_value = wilcoxon_signed_rank(log_ratios)
+            low, high = bootstrap_mean(
+                log_ratios, alpha=policy.alpha, resamples=policy.resamples, rng=rng
+            )
+            mean_log_ratio = sum(log_ratios) / len(log_ratios) if log_ratios else 0.0
+            change: float | None = math.expm1(mean_log_ratio)
+            ci_low, ci_high = math.expm1(low), math.expm1(high)
+            shift = mean_log_ratio
+            significant = p_value < policy.alpha
+            large = abs(math.expm1(mean_log_ratio)) >= policy.min_effect
+        else:
+            ci_low, ci_high = bootstrap_mean(
+                [a - b for b, a in zip(before, after, strict=True)],
+                alpha=policy.alpha,
+                resamples=policy.resamples,
+                rng=rng,
+            )
+            change = (after_mean - before_mean) / before_mean if before_mean else None
+            shift = after_mean - before_mean
+            significant = ci_low > 0 or ci_high < 0
+            large = abs(shift) >= policy.min_effect
+
+        verdict = UNCHANGED
+        if significant and large and shift != 0:
+            worse = (shift > 0) == metric.higher_is_worse
+            verdict = REGRESSION if worse else IMPROVEMENT
+
+        results.append(
+            MetricComparison(
+                metric=metric.name,
+                baseline=before_mean,
+                candidate=after_mean,
+                change=change,
+                ci_low=ci_low,
+                ci_high=ci_high,
+                p_value=p_value,
+                verdict=verdict,
+            )
+        )
+    return results
+
+
+def runs_from_report(report: dict[str, Any]) -> list[TaskRun]:
+    """
+    Read the task runs of a `bench --json` report.
+
+    Args:
+        report: The decoded report.
+
+    Returns:
+        The report's task runs.
+
+    Raises:
+        ValueError: If the report has no valid task list.
+    """
+    tasks = report.get("tasks")
+    if not isinstance(tasks, list):
+        raise ValueError("Benchmark report has no 'tasks' list")
+    try:
+        return [TaskRun(**{name: task[name] for name in _TASK_COLUMNS}) for task in tasks]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid task entry in benchmark report: {e}") from e
+
+
+class PerfHistory:
+    """
+    Local sqlite store of benchmark runs.
+
+    Runs are referred to by ID, by label or by commit hash prefix (the most
+    recent match wins), or as 'latest' and 'previous'.
+
+    Attributes:
+        path: Location of the database file.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_HISTORY_PATH) -> None:
+        """
+        Open (and if needed create) the history database.
+
+        Args:
+            path: Database file; ':memory:' keeps it in memory.
+        """
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+    def __enter__(self) -> "PerfHistory":
+        """Enter a context that closes the database on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the database."""
+        self.close()
+
+    def add(self, report: dict[str, Any]) -> int:
+        """
+        Store a `bench` report.
+
+        Args:
+            report: A report built by src.bench.build_report.
+
+        Returns:
+            ID of the stored run.
+
+        Raises:
+            ValueError: If the report has no valid task list.
+        """
+        runs = runs_from_report(report)
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO runs (label, git_commit, created_at, config) VALUES (?, ?, ?, ?)",
+                (
+                    report.get("label"),
+                    report.get("commit"),
+                    report.get("created_at", ""),
+                    json.dumps(report.get("config", {}), sort_keys=True),
+                ),
+            )
+            run_id = cursor.lastrowid
+            assert run_id is not None
+            placeholders = ", ".join("?" * (len(_TASK_COLUMNS) + 1))
+            self._conn.executemany(
+                f"INSERT INTO task_runs (run_id, {', '.join(_TASK_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                [(run_id, *asdict(run).values()) for run in runs],
+            )
+        return run_id
+
+    def list_runs(self) -> list[StoredRun]:
+        """
+        List stored runs, oldest first.
+
+        Returns:
+            Every run with its task and solved counts.
+        """
+        rows = self._conn.execute(
+            "SELECT r.id, r.label, r.git_commit, r.created_at, r.config, "
+            "COUNT(t.run_id), COALESCE(SUM(t.success), 0) "
+            "FROM runs r LEFT JOIN task_runs t ON t.run_id = r.id "
+            "GROUP BY r.id ORDER BY r.id"
+        ).fetchall()
+        return [
+            StoredRun(
+                id=row[0],
+                label=row[1],
+                commit=row[2],
+                created_at=row[3],
+                config=json.loads(row[4]),
+                tasks=row[5],
+                solved=row[6],
+            )
+            for row in rows
+        ]
+
+    def resolve(self, ref: str) -> int:
+        """
+        Find the run a reference names.
+
+        Args:
+            ref: A run ID, 'latest', 'previous', a label or a commit prefix
+                (at least 4 characters).
+
+        Returns:
+            The run's ID.
+
+        Raises:
+            ValueError: If no run matches.
+        """
+        ids = [row[0] for row in self._conn.execute("SELECT id FROM runs ORDER BY id DESC")]
+        if ref == "latest" and ids:
+            return int(ids[0])
+        if ref == "previous" and len(ids) > 1:
+            return int(ids[1])
+        if ref.isdigit() and int(ref) in ids:
+            return int(ref)
+
+        row = self._conn.execute(
+            "SELECT id FROM runs WHERE label = ? ORDER BY id DESC LIMIT 1", (ref,)
+        ).fetchone()
+        if row is None and len(ref) >= 4:
+            row = self._conn.execute(
+                "SELECT id FROM runs WHERE git_commit LIKE ? ORDER BY id DESC LIMIT 1",
+                (ref.replace("%", "").replace("_", "") + "%",),
+            ).fetchone()
+        if row is None:
+            raise ValueError(f"No stored benchmark run matches '{ref}'")
+        return int(row[0])
+
+    def task_runs(self, run_id: int) -> list[TaskRun]:
+        """
+        Load the task measurements of a run.
+
+        Args:
+            run_id: ID of the run.
+
+        Returns:
+            The run's task runs, in their original order.
+        """
+        rows = self._conn.execute(
+            f"SELECT {', '.join(_TASK_COLUMNS)} FROM task_runs WHERE run_id = ? ORDER BY rowid",
+            (run_id,),
+        ).fetchall()
+        runs: list[TaskRun] = []
+        for row in rows:
+            values = dict(zip(_TASK_COLUMNS, row, strict=True))
+            # sqlite has no boolean type
+            values["success"] = bool(values["success"])
+            runs.append(TaskRun(**values))
+        return runs
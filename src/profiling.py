@@ -0,0 +1,326 @@
+"""
+Per-task CPU and memory profiling.
+
+This module provides TaskProfiler, used by the `--profile cpu|mem` CLI
+option to wrap each task's solve in cProfile or tracemalloc. CPU profiles
+measure the solving thread's CPU time rather than wall time, so time spent
+waiting for LLM responses or jq processes does not hide the Python hot
+spots (JSON parsing, diffing and scoring in AlgorithmicReviewer,
+serialization in JQExecutor). cProfile only sees the thread it was enabled
+in, so work done in other threads (e.g. hedged requests) is not profiled;
+the clock is per-thread too, since a process-wide one would charge that
+work to whatever frame the solving thread was waiting in.
+
+Memory profiles report the peak traced memory and the source lines of the
+memory allocated during the task that was alive at its peak. tracemalloc
+cannot snapshot at the exact peak, so a background thread samples the
+traced memory and takes a snapshot whenever it reaches a new high.
+
+Each task gets its own file in the output directory, and a merged report
+covers the whole batch.
+"""
+
+import cProfile
+import io
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Profiling modes
+CPU = "cpu"
+MEM = "mem"
+MODES = (CPU, MEM)
+
+DEFAULT_TOP = 20
+MERGED_PSTATS = "merged.pstats"
+REPORT_FILE = "report.txt"
+
+# Interval at which traced memory is sampled for the peak snapshot
+_PEAK_SAMPLE_SEC = 0.01
+
+# Growth over the last snapshot's usage that triggers a new snapshot
+_PEAK_GROWTH = 0.05
+
+# Allocations made by the profiler itself or by the import system
+_MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+@dataclass(frozen=True)
+class AllocationSite:
+    """
+    Memory allocated at one source line.
+
+    Attributes:
+        filename: Source file.
+        lineno: Line number.
+        size_bytes: Net bytes allocated during the task and alive at its peak.
+        count: Net number of allocated blocks at the peak.
+    """
+
+    filename: str
+    lineno: int
+    size_bytes: int
+    count: int
+
+
+@dataclass(frozen=True)
+class TaskProfile:
+    """
+    The profile of one task.
+
+    Attributes:
+        task_id: The task's ID.
+        path: File the profile was written to.
+        cpu_sec: CPU time of the solving thread (CPU mode).
+        peak_bytes: Peak traced memory while solving (memory mode).
+        sites: Allocation sites at the peak by net size, largest first
+            (memory mode).
+    """
+
+    task_id: str
+    path: Path
+    cpu_sec: float = 0.0
+    peak_bytes: int = 0
+    sites: list[AllocationSite] = field(default_factory=list)
+
+
+def _format_bytes(size: float) -> str:
+    """Human-readable size, e.g. '1.5 MiB'."""
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class _PeakSampler:
+    """Takes a tracemalloc snapshot each time traced memory reaches a new high."""
+
+    def __init__(self) -> None:
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self._high = tracemalloc.get_traced_memory()[0]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tracemalloc-peak", daemon=True)
+
+    def __enter__(self) -> "_PeakSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()  # the task may end at its high
+
+    def _run(self) -> None:
+        while not self._stop.wait(_PEAK_SAMPLE_SEC):
+            self._sample()
+
+    def _sample(self) -> None:
+        current = tracemalloc.get_traced_memory()[0]
+        if current > self._high * (1 + _PEAK_GROWTH):
+            self.snapshot = tracemalloc.take_snapshot()
+            self._high = current
+
+
+class TaskProfiler:
+    """
+    Profiles tasks one at a time and merges the results.
+
+    Tasks must not be profiled concurrently: cProfile and tracemalloc see
+    the whole process, so overlapping tasks would be attributed to each other.
+
+    Attributes:
+        mode: CPU or MEM.
+        directory: Output directory (created on first use).
+        top: Number of functions or allocation sites in the reports.
+        profiles: Profiles of the finished tasks, in order.
+    """
+
+    def __init__(self, mode: str, directory: str | Path, top: int = DEFAULT_TOP) -> None:
+        """
+        Initialize the profiler.
+
+        Args:
+            mode: CPU (cProfile) or MEM (tracemalloc).
+            directory: Directory for the per-task files and the merged report.
+            top: Number of functions or allocation sites in the reports.
+
+        Raises:
+            ValueError: If the mode is unknown or top is not positive.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (expected one of {MODES})")
+        if top < 1:
+            raise ValueError("top must be at least 1")
+        self.mode = mode
+        self.directory = Path(directory)
+        self.top = top
+        self.profiles: list[TaskProfile] = []
+
+    @contextmanager
+    def profile(self, task_id: str) -> Iterator[None]:
+        """
+        Profile the with block as one task and write its file.
+
+        Args:
+            task_id: The task's ID (used in the file name).
+
+        Raises:
+            OSError: If the profile cannot be written.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.mode == CPU:
+            with self._cpu(task_id):
+                yield
+        else:
+            with self._memory(task_id):
+                yield
+
+    def _path(self, task_id: str, suffix: str) -> Path:
+        """Per-task file name, numbered so repeated IDs do not collide."""
+        safe = re.sub(r"[^\w.-]", "_", task_id) or "task"
+        return self.directory / f"{len(self.profiles) + 1:03d}-{safe}{suffix}"
+
+    @contextmanager
+    def _cpu(self, task_id: str) -> Iterator[None]:
+        # CPU time of this thread: blocking on sockets and child processes is
+        # not counted, nor is CPU used by other threads meanwhile
+        profiler = cProfile.Profile(time.thread_time)
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = self._path(task_id, ".pstats")
+            profiler.dump_stats(path)
+            stats = pstats.Stats(profiler)
+            self.profiles.append(TaskProfile(task_id, path, cpu_sec=stats.total_tt))  # type: ignore[attr-defined]
+
+    @contextmanager
+    def _memory(self, task_id: str) -> Iterator[None]:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot().filter_traces(_MEMORY_FILTERS)
+        tracemalloc.reset_peak()
+        sampler = _PeakSampler()
+        try:
+            with sampler:
+                yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            at_peak = (sampler.snapshot or tracemalloc.take_snapshot()).filter_traces(
+                _MEMORY_FILTERS
+            )
+            if not was_tracing:
+                tracemalloc.stop()
+            sites = [
+                AllocationSite(
+                    stat.traceback[0].filename,
+                    stat.traceback[0].lineno,
+                    stat.size_diff,
+                    stat.count_diff,
+                )
+                for stat in at_peak.compare_to(before, "lineno")
+                if stat.size_diff > 0
+            ]
+            sites.sort(key=lambda site: site.size_bytes, reverse=True)
+            profile = TaskProfile(
+                task_id, self._path(task_id, ".mem.txt"), peak_bytes=peak, sites=sites
+            )
+            profile.path.write_text(self._memory_report([profile], sites), encoding="utf-8")
+            self.profiles.append(profile)
+
+    def report(self) -> str:
+        """
+        The merged report over all profiled tasks.
+
+        In CPU mode the per-task profiles are also merged into MERGED_PSTATS
+        in the output directory, for snakeviz or `python -m pstats`.
+
+        Returns:
+            Report text: per-task totals, then the top functions (CPU mode,
+            by own time) or allocation sites (memory mode) over all tasks.
+        """
+        if self.mode == CPU:
+            return self._cpu_report()
+        merged: dict[tuple[str, int], list[int]] = {}
+        for profile in self.profiles:
+            for site in profile.sites:
+                totals = merged.setdefault((site.filename, site.lineno), [0, 0])
+                totals[0] += site.size_bytes
+                totals[1] += site.count
+        sites = [
+            AllocationSite(filename, lineno, size, count)
+            for (filename, lineno), (size, count) in merged.items()
+        ]
+        sites.sort(key=lambda site: site.size_bytes, reverse=True)
+        return self._memory_report(self.profiles, sites)
+
+    def _cpu_report(self) -> str:
+        lines = [
+            f"CPU profile of {len(self.profiles)} task(s) "
+            "(CPU time of the solving thread; network and jq process waits excluded)",
+            "",
+            f"{'Task':<30} {'CPU time':>10}",
+        ]
+        lines += [f"{p.task_id:<30} {p.cpu_sec:>9.3f}s" for p in self.profiles]
+        lines.append(f"{'Total':<30} {sum(p.cpu_sec for p in self.profiles):>9.3f}s")
+        if not self.profiles:
+            return "\n".join(lines) + "\n"
+
+        stats = pstats.Stats(*(str(p.path) for p in self.profiles))
+        stats.dump_stats(self.directory / MERGED_PSTATS)
+        out = io.StringIO()
+        stats.stream = out  # type: ignore[attr-defined]
+        stats.files = []  # type: ignore[attr-defined]  # omit the list of input files
+        stats.strip_dirs().sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        lines += ["", f"Top {self.top} functions by own time, all tasks:", out.getvalue().strip()]
+        return "\n".join(lines) + "\n"
+
+    def _memory_report(self, profiles: list[TaskProfile], sites: list[AllocationSite]) -> str:
+        lines = [
+            f"Memory profile of {len(profiles)} task(s) (tracemalloc)",
+            "",
+            f"{'Task':<30} {'Peak':>12}",
+        ]
+        lines += [f"{p.task_id:<30} {_format_bytes(p.peak_bytes):>12}" for p in profiles]
+        lines += [
+            "",
+            f"Top {self.top} allocation sites by memory allocated during the task "
+            "and alive at its peak:",
+        ]
+        lines += [
+            f"{_format_bytes(site.size_bytes):>12} {site.count:>8} blocks  "
+            f"{site.filename}:{site.lineno}"
+            for site in sites[: self.top]
+        ]
+        if not sites:
+            lines.append("  (none)")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self) -> Path:
+        """
+        Write the merged report to REPORT_FILE in the output directory.
+
+        Returns:
+            The report's path.
+
+        Raises:
+            OSError: If the report cannot be written.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / REPORT_FILE
+        path.write_text(self.report(), encoding="utf-8")
+        return path
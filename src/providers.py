@@ -5,18 +5,351 @@ This module provides an abstraction layer for different LLM APIs (OpenAI, Anthro
 to generate jq filter expressions.
 """
 
+import asyncio
+import importlib.util
 import json
 import logging
 import os
+import socket
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Any
 
 import httpx
 
+from src.circuit import BreakerPolicy, CircuitBreaker, StateListener
+from src.metrics import get_metrics
+from src.ratelimit import RETRYABLE_STATUSES
+from src.tracing import KIND_CLIENT, span, start_span
+
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class HTTPPoolConfig:
+    """
+    Connection pool settings for a provider's long-lived HTTP client.
+
+    Attributes:
+        max_connections: Maximum number of concurrent connections.
+        max_keepalive_connections: Maximum number of idle connections kept open.
+        keepalive_expiry: Seconds an idle connection is kept before closing.
+        http2: Whether to negotiate HTTP/2, which multiplexes concurrent requests
+            over a single connection. Requires the optional 'h2' package.
+    """
+
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+
+    def limits(self) -> httpx.Limits:
+        """
+        Build the httpx pool limits for this configuration.
+
+        Returns:
+            An httpx.Limits instance.
+        """
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+def _check_http2_available() -> None:
+    """
+    Ensure the optional HTTP/2 dependency is installed.
+
+    Raises:
+        ValueError: If the 'h2' package is not available.
+    """
+    if importlib.util.find_spec("h2") is None:
+        raise ValueError(
+            "HTTP/2 requires the 'h2' package. Install it with: pip install 'jq-by-example[http2]'"
+        )
+
+
+@dataclass(frozen=True)
+class ChatMessage:
+    """
+    One turn of a multi-message prompt.
+
+    Attributes:
+        role: 'user' or 'assistant'.
+        content: The message text.
+        cache: Whether the request prefix ending with this message should be
+            cached by the provider (Anthropic cache_control breakpoint;
+            OpenAI caches stable prefixes automatically).
+    """
+
+    role: str
+    content: str
+    cache: bool = False
+
+
+# A request's user-side content: a single user message, or a conversation
+Prompt = str | Sequence[ChatMessage]
+
+
+def chat_messages(prompt: Prompt) -> list[ChatMessage]:
+    """
+    Normalize a prompt to a list of chat messages.
+
+    Args:
+        prompt: A plain user prompt or a sequence of messages.
+
+    Returns:
+        The messages (a plain prompt becomes one user message).
+    """
+    if isinstance(prompt, str):
+        return [ChatMessage("user", prompt)]
+    return list(prompt)
+
+
+def _merge_turns(prompt: Prompt) -> list[tuple[str, list[ChatMessage]]]:
+    """Group consecutive messages with the same role into one turn."""
+    turns: list[tuple[str, list[ChatMessage]]] = []
+    for message in chat_messages(prompt):
+        if turns and turns[-1][0] == message.role:
+            turns[-1][1].append(message)
+        else:
+            turns.append((message.role, [message]))
+    return turns
+
+
+def prompt_text(prompt: Prompt) -> str:
+    """
+    Flatten a prompt to text for token estimates, logging and cache keys.
+
+    Consecutive messages of one role are joined with newlines, so a
+    single-turn prompt split into a cacheable prefix and a suffix flattens to
+    the same text as the unsplit prompt.
+
+    Args:
+        prompt: A plain user prompt or a sequence of messages.
+
+    Returns:
+        The prompt text (JSON-encoded turns for multi-turn conversations).
+    """
+    if isinstance(prompt, str):
+        return prompt
+    turns = [(role, "\n".join(m.content for m in group)) for role, group in _merge_turns(prompt)]
+    if len(turns) == 1 and turns[0][0] == "user":
+        return turns[0][1]
+    return json.dumps(turns, ensure_ascii=False)
+
+
+@dataclass
+class PromptCacheStats:
+    """
+    Prompt caching reported by a provider's responses.
+
+    Usage is read from non-streamed responses and from the start event of
+    Anthropic streams (OpenAI streams do not report it).
+
+    Attributes:
+        requests: Responses that reported token usage.
+        input_tokens: Prompt tokens, including cached ones.
+        cached_tokens: Prompt tokens read from the provider's prompt cache.
+        cache_write_tokens: Prompt tokens written to the cache (Anthropic
+            bills these at a premium).
+    """
+
+    requests: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    @property
+    def cached_fraction(self) -> float:
+        """Fraction of prompt tokens served from the provider cache."""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+
+def _token_count(value: Any) -> int:
+    """A token count from a usage report, or 0 if absent or malformed."""
+    return value if isinstance(value, int) and not isinstance(value, bool) else 0
+
+
+def _sse_data(line: str) -> str | None:
+    """Return the payload of an SSE 'data:' line, or None for any other line."""
+    if not line.startswith("data:"):
+        return None  # 'event:' lines, comments and keep-alives
+    return line[len("data:") :].strip()
+
+
+def _decode_event(data: str) -> Any:
+    """
+    Decode the JSON payload of a server-sent event.
+
+    Raises:
+        RuntimeError: If the payload is not valid JSON.
+    """
+    try:
+        return json.loads(data)
+    except json.JSONDecodeError as e:
+        logger.error("Invalid streaming event: %s", e)
+        raise RuntimeError(f"Invalid streaming event: {e}") from e
+
+
+class _RequestMetrics:
+    """Times one HTTP call to an LLM API and counts it by status, if metrics are on."""
+
+    __slots__ = ("_provider", "_start", "status")
+
+    def __init__(self, provider: "LLMProvider") -> None:
+        self._provider = provider
+        self._start = time.perf_counter()
+        self.status: int | None = None
+
+    def __enter__(self) -> "_RequestMetrics":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        metrics = get_metrics()
+        if metrics is None:
+            return
+        if self.status is not None:
+            status = str(self.status)
+        elif isinstance(exc, httpx.TimeoutException):
+            status = "timeout"
+        else:
+            status = "error"
+        elapsed = time.perf_counter() - self._start
+        metrics.record_llm_request(provider_label(self._provider), status, elapsed)
+
+
+class RequestAborter:
+    """
+    Aborts the synchronous provider requests of one abortable_requests() block.
+
+    Attributes:
+        aborted: Whether abort() was called while the block ran.
+    """
+
+    def __init__(self) -> None:
+        self.aborted = False
+        self._lock = threading.Lock()
+        self._clients: list[_ThreadClient] = []
+        self._done = False
+
+    def abort(self) -> None:
+        """
+        Make the block's requests fail at once (callable from any thread).
+
+        A request in flight fails with an httpx transport error as its
+        connection is shut down; requests not yet sent fail before sending.
+        Does nothing once the block has ended.
+        """
+        with self._lock:
+            if self._done or self.aborted:
+                return
+            self.aborted = True
+            for thread_client in self._clients:
+                thread_client.shutdown()
+
+    def _use(self, thread_client: "_ThreadClient") -> None:
+        """Attach a thread client the block sends requests on."""
+        with self._lock:
+            thread_client.aborter = self
+            self._clients.append(thread_client)
+
+    def _trace(self, thread_client: "_ThreadClient", event: str, info: dict[str, Any]) -> None:
+        """Follow a request of the block through httpcore's trace events."""
+        with self._lock:
+            aborted = self.aborted and not self._done
+            if event == "connection.connect_tcp.complete":
+                thread_client.socket = info["return_value"].get_extra_info("socket")
+                if aborted:
+                    thread_client.shutdown()
+            elif aborted and event.endswith("send_request_headers.started"):
+                raise httpx.ReadError("Request aborted")
+
+
+class _ThreadClient:
+    """A provider's one-connection HTTP client, used by a single thread."""
+
+    def __init__(self, provider: "LLMProvider") -> None:
+        self.socket: socket.socket | None = None
+        self.aborter: RequestAborter | None = None
+        limits = httpx.Limits(
+            max_connections=1,
+            max_keepalive_connections=1,
+            keepalive_expiry=provider.pool_config.keepalive_expiry,
+        )
+        self.client = provider._new_client(limits, event_hooks={"request": [self._add_trace]})
+
+    def _add_trace(self, request: httpx.Request) -> None:
+        request.extensions["trace"] = self._trace
+
+    def _trace(self, event: str, info: dict[str, Any]) -> None:
+        if self.aborter is not None:
+            self.aborter._trace(self, event, info)
+
+    def shutdown(self) -> None:
+        """Shut down the connection, waking a thread blocked reading from it."""
+        if self.socket is not None:
+            with suppress(OSError):  # already closed
+                self.socket.shutdown(socket.SHUT_RDWR)
+
+
+# The aborter of the abortable_requests() block the context is in, if any
+_current_aborter: ContextVar[RequestAborter | None] = ContextVar("_current_aborter", default=None)
+
+
+@contextmanager
+def abortable_requests(aborter: RequestAborter) -> Iterator[None]:
+    """
+    Make the synchronous provider requests sent in the block abortable.
+
+    Closing an httpx client does not wake a thread blocked reading a
+    response, so inside the block providers send requests on a
+    one-connection client per thread instead of their shared pool, whose
+    connection aborter.abort() can shut down from another thread. The
+    client stays open with its connection warm for the thread's next block.
+
+    Args:
+        aborter: The aborter for the block's requests.
+
+    Yields:
+        Nothing; the block runs with its requests abortable.
+    """
+    token = _current_aborter.set(aborter)
+    try:
+        yield
+    finally:
+        _current_aborter.reset(token)
+        with aborter._lock:
+            aborter._done = True
+
+
+def _request_aborted() -> bool:
+    """Whether the context is in an abortable_requests() block that was aborted."""
+    aborter = _current_aborter.get()
+    return aborter is not None and aborter.aborted
+
+
 class LLMProvider(ABC):
-    """Abstract base class for LLM providers."""
+    """
+    Abstract base class for LLM providers.
+
+    Providers keep one long-lived httpx.Client so that consecutive requests reuse
+    pooled keep-alive connections instead of paying DNS, TCP and TLS setup on
+    every call. The client is created lazily on first use and released by
+    close(); providers can also be used as context managers.
+    """
 
     SYSTEM_PROMPT = """You are a jq filter expert. Generate a single jq filter expression that transforms the input JSON to produce the expected output.
 
@@ -36,13 +369,341 @@ Respond with just the filter, for example: .users[].name"""
     MAX_RETRIES = 3
     RETRY_DELAY_SEC = 1.0
 
+    model: str = ""
+    endpoint: str = ""
+    pool_config: HTTPPoolConfig = HTTPPoolConfig()
+    _client: httpx.Client | None = None
+    _client_lock: "threading.Lock | None" = None
+    _thread_clients: "dict[int, _ThreadClient] | None" = None
+    _async_client: httpx.AsyncClient | None = None
+    _async_client_loop: asyncio.AbstractEventLoop | None = None
+
+    def _init_pool(self, pool_config: HTTPPoolConfig | None) -> None:
+        """
+        Configure the connection pool (called from subclass constructors).
+
+        Args:
+            pool_config: Pool settings, or None for the defaults.
+
+        Raises:
+            ValueError: If HTTP/2 is requested but 'h2' is not installed.
+        """
+        self.pool_config = pool_config or HTTPPoolConfig()
+        if self.pool_config.http2:
+            _check_http2_available()
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._thread_clients = {}
+        self.cache_usage = PromptCacheStats()
+        self._usage_lock = threading.Lock()
+
+    def _record_usage(
+        self, input_tokens: int, cached_tokens: int, cache_write_tokens: int, output_tokens: int = 0
+    ) -> None:
+        """Add one response's token usage to cache_usage and the metrics."""
+        with self._usage_lock:
+            self.cache_usage.requests += 1
+            self.cache_usage.input_tokens += input_tokens
+            self.cache_usage.cached_tokens += cached_tokens
+            self.cache_usage.cache_write_tokens += cache_write_tokens
+        metrics = get_metrics()
+        if metrics is not None:
+            label = provider_label(self)
+            metrics.llm_tokens.inc(input_tokens, provider=label, direction="in")
+            metrics.llm_tokens.inc(output_tokens, provider=label, direction="out")
+
+    def _new_client(self, limits: httpx.Limits, **kwargs: Any) -> httpx.Client:
+        """Create an HTTP client with the provider's timeout and HTTP/2 setting."""
+        return httpx.Client(
+            timeout=self.TIMEOUT_SEC, limits=limits, http2=self.pool_config.http2, **kwargs
+        )
+
+    def _get_client(self) -> httpx.Client:
+        """
+        Return the provider's HTTP client, creating it on first use.
+
+        Inside abortable_requests(), this is the calling thread's own client.
+
+        Returns:
+            A shared httpx.Client with keep-alive connection pooling.
+        """
+        if self._client_lock is None:
+            self._client_lock = threading.Lock()
+
+        aborter = _current_aborter.get()
+        if aborter is not None:
+            with self._client_lock:
+                if self._thread_clients is None:
+                    self._thread_clients = {}
+                thread_client = self._thread_clients.get(threading.get_ident())
+                if thread_client is None:
+                    thread_client = _ThreadClient(self)
+                    self._thread_clients[threading.get_ident()] = thread_client
+            aborter._use(thread_client)
+            return thread_client.client
+
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._new_client(self.pool_config.limits())
+                logger.debug(
+                    "Created HTTP client for %s (http2=%s, max_connections=%d)",
+                    type(self).__name__,
+                    self.pool_config.http2,
+                    self.pool_config.max_connections,
+                )
+            return self._client
+
+    def _post(self, endpoint: str, headers: dict[str, str], payload: dict[str, Any]) -> Any:
+        """
+        POST a JSON payload on the pooled client and return the decoded body.
+
+        Args:
+            endpoint: The URL to post to.
+            headers: Request headers (contain credentials, never logged).
+            payload: The JSON request body.
+
+        Returns:
+            The decoded JSON response.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns an error status.
+            httpx.RequestError: If the request fails.
+            json.JSONDecodeError: If the response body is not JSON.
+        """
+        with (
+            span("http POST", kind=KIND_CLIENT, **self._span_attributes(endpoint)) as trace,
+            _RequestMetrics(self) as call,
+        ):
+            response = self._get_client().post(endpoint, headers=headers, json=payload)
+            call.status = response.status_code
+            trace.set_attribute("http.status_code", response.status_code)
+
+            # Handle HTTP errors with proper error message extraction
+            if response.status_code != 200:
+                self._raise_for_status(response)
+
+            return response.json()
+
+    def _stream_events(
+        self, endpoint: str, headers: dict[str, str], payload: dict[str, Any]
+    ) -> Iterator[Any]:
+        """
+        POST a JSON payload and yield the decoded server-sent events.
+
+        The response stays open while the caller iterates; closing the
+        iterator early (e.g. breaking out of a for loop) closes the response,
+        so the server stops generating tokens nobody will read.
+
+        Args:
+            endpoint: The URL to post to.
+            headers: Request headers (contain credentials, never logged).
+            payload: The JSON request body (with streaming enabled).
+
+        Yields:
+            The decoded JSON payload of each 'data:' event, until '[DONE]'.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns an error status.
+            httpx.RequestError: If the request fails.
+            RuntimeError: If an event is not valid JSON.
+        """
+        # Not a with-block span: the generator may be suspended across other
+        # spans, so it must not change the current span
+        trace = start_span("http POST", kind=KIND_CLIENT, **self._span_attributes(endpoint, True))
+        try:
+            client = self._get_client()
+            with (
+                _RequestMetrics(self) as call,
+                client.stream("POST", endpoint, headers=headers, json=payload) as response,
+            ):
+                call.status = response.status_code
+                trace.set_attribute("http.status_code", response.status_code)
+                if response.status_code != 200:
+                    response.read()
+                    self._raise_for_status(response)
+
+                for line in response.iter_lines():
+                    data = _sse_data(line)
+                    if data is None:
+                        continue
+                    if data == "[DONE]":
+                        return
+                    yield _decode_event(data)
+        except Exception as exc:
+            trace.record_error(exc)
+            raise
+        finally:
+            trace.end()
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """
+        Return the provider's async HTTP client for the running event loop.
+
+        Async connections are bound to the loop that opened them, so a new
+        client is created when the provider is used from a different loop.
+
+        Returns:
+            A shared httpx.AsyncClient with keep-alive connection pooling.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                timeout=self.TIMEOUT_SEC,
+                limits=self.pool_config.limits(),
+                http2=self.pool_config.http2,
+            )
+            self._async_client_loop = loop
+            logger.debug("Created async HTTP client for %s", type(self).__name__)
+        return self._async_client
+
+    async def _apost(self, endpoint: str, headers: dict[str, str], payload: dict[str, Any]) -> Any:
+        """
+        Async counterpart of _post.
+
+        Args:
+            endpoint: The URL to post to.
+            headers: Request headers (contain credentials, never logged).
+            payload: The JSON request body.
+
+        Returns:
+            The decoded JSON response.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns an error status.
+            httpx.RequestError: If the request fails.
+            json.JSONDecodeError: If the response body is not JSON.
+        """
+        with (
+            span("http POST", kind=KIND_CLIENT, **self._span_attributes(endpoint)) as trace,
+            _RequestMetrics(self) as call,
+        ):
+            response = await self._get_async_client().post(endpoint, headers=headers, json=payload)
+            call.status = response.status_code
+            trace.set_attribute("http.status_code", response.status_code)
+            if response.status_code != 200:
+                self._raise_for_status(response)
+            return response.json()
+
+    async def _astream_events(
+        self, endpoint: str, headers: dict[str, str], payload: dict[str, Any]
+    ) -> AsyncIterator[Any]:
+        """
+        Async counterpart of _stream_events.
+
+        Args:
+            endpoint: The URL to post to.
+            headers: Request headers (contain credentials, never logged).
+            payload: The JSON request body (with streaming enabled).
+
+        Yields:
+            The decoded JSON payload of each 'data:' event, until '[DONE]'.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns an error status.
+            httpx.RequestError: If the request fails.
+            RuntimeError: If an event is not valid JSON.
+        """
+        trace = start_span("http POST", kind=KIND_CLIENT, **self._span_attributes(endpoint, True))
+        try:
+            client = self._get_async_client()
+            with _RequestMetrics(self) as call:
+                async with client.stream(
+                    "POST", endpoint, headers=headers, json=payload
+                ) as response:
+                    call.status = response.status_code
+                    trace.set_attribute("http.status_code", response.status_code)
+                    if response.status_code != 200:
+                        await response.aread()
+                        self._raise_for_status(response)
+
+                    async for line in response.aiter_lines():
+                        data = _sse_data(line)
+                        if data is None:
+                            continue
+                        if data == "[DONE]":
+                            return
+                        yield _decode_event(data)
+        except Exception as exc:
+            trace.record_error(exc)
+            raise
+        finally:
+            trace.end()
+
+    def _span_attributes(self, endpoint: str, stream: bool = False) -> dict[str, Any]:
+        """Trace span attributes of an HTTP call (the URL without its query string)."""
+        return {
+            "http.url": endpoint.split("?", 1)[0],
+            "provider": provider_label(self),
+            "stream": stream,
+        }
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response) -> None:
+        """
+        Log the API's error message (never the full body) and raise.
+
+        Args:
+            response: A response with an error status.
+
+        Raises:
+            httpx.HTTPStatusError: Always, for error statuses.
+        """
+        error_msg = f"HTTP {response.status_code}"
+        try:
+            error_data = response.json()
+            # Extract error message without logging full response
+            if "error" in error_data:
+                if isinstance(error_data["error"], dict):
+                    error_msg = error_data["error"].get("message", error_msg)
+                else:
+                    error_msg = str(error_data["error"])
+        except Exception:
+            pass  # Use default error message if parsing fails
+
+        logger.error("API error: %s", error_msg)
+        response.raise_for_status()
+
+    def close(self) -> None:
+        """Close the pooled HTTP client and the per-thread ones, if any were created."""
+        client, self._client = self._client, None
+        if client is not None:
+            client.close()
+            logger.debug("Closed HTTP client for %s", type(self).__name__)
+        thread_clients, self._thread_clients = self._thread_clients or {}, {}
+        for thread_client in thread_clients.values():
+            thread_client.client.close()
+
+    async def aclose(self) -> None:
+        """Close both the sync and the async pooled HTTP clients."""
+        self.close()
+        client, self._async_client = self._async_client, None
+        self._async_client_loop = None
+        if client is not None:
+            await client.aclose()
+            logger.debug("Closed async HTTP client for %s", type(self).__name__)
+
+    def __enter__(self) -> "LLMProvider":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
     @abstractmethod
-    def generate(self, prompt: str) -> str:
+    def generate(self, prompt: Prompt) -> str:
         """
         Generate a response from the LLM.
 
         Args:
-            prompt: The user prompt to send.
+            prompt: The user prompt (or chat messages) to send.
 
         Returns:
             The response content from the LLM.
@@ -52,6 +713,56 @@ Respond with just the filter, for example: .users[].name"""
         """
         pass
 
+    def generate_stream(self, prompt: Prompt) -> Iterator[str]:
+        """
+        Stream a response from the LLM as text deltas.
+
+        Providers without streaming support yield the whole response at once.
+        Closing the iterator early aborts the request.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Yields:
+            Successive pieces of the response text.
+
+        Raises:
+            Exception: If the API call fails.
+        """
+        yield self.generate(prompt)
+
+    async def agenerate(self, prompt: Prompt) -> str:
+        """
+        Generate a response from the LLM without blocking the event loop.
+
+        Providers without native async support run generate() in a worker thread.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Returns:
+            The response content from the LLM.
+
+        Raises:
+            Exception: If the API call fails.
+        """
+        return await asyncio.to_thread(self.generate, prompt)
+
+    async def agenerate_stream(self, prompt: Prompt) -> AsyncIterator[str]:
+        """
+        Async counterpart of generate_stream.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Yields:
+            Successive pieces of the response text.
+
+        Raises:
+            Exception: If the API call fails.
+        """
+        yield await self.agenerate(prompt)
+
 
 class OpenAIProvider(LLMProvider):
     """
@@ -64,15 +775,19 @@ class OpenAIProvider(LLMProvider):
         api_key: The API key for authentication.
         model: The model identifier to use.
         base_url: The base URL for the API endpoint.
+        endpoint: The chat completions URL requests are sent to.
     """
 
     DEFAULT_MODEL = "gpt-4o"
+    DEFAULT_BASE_URL = "https://api.openai.com/v1"
 
     def __init__(
         self,
         api_key: str | None = None,
         model: str | None = None,
         base_url: str | None = None,
+        pool_config: HTTPPoolConfig | None = None,
+        shared_env: bool = True,
     ) -> None:
         """
         Initialize the OpenAI provider.
@@ -82,12 +797,17 @@ class OpenAIProvider(LLMProvider):
             model: Model identifier. If not provided, reads from LLM_MODEL or uses default.
             base_url: Base URL for API. If not provided, reads from LLM_BASE_URL or uses
                 OpenAI default.
+            pool_config: HTTP connection pool settings. Defaults to HTTPPoolConfig().
+            shared_env: Whether the generic LLM_API_KEY, LLM_MODEL and LLM_BASE_URL
+                variables apply. Defaults to True; see create_member_provider().
 
         Raises:
-            ValueError: If no API key is provided and environment variables are not set.
+            ValueError: If no API key is provided and environment variables are not set,
+                or if HTTP/2 is requested without the 'h2' package.
         """
         # Resolve API key
-        resolved_key = api_key or os.environ.get("LLM_API_KEY") or os.environ.get("OPENAI_API_KEY")
+        shared = os.environ if shared_env else {}
+        resolved_key = api_key or shared.get("LLM_API_KEY") or os.environ.get("OPENAI_API_KEY")
 
         if not resolved_key:
             raise ValueError(
@@ -99,16 +819,18 @@ class OpenAIProvider(LLMProvider):
         self.api_key = resolved_key
 
         # Resolve model
-        self.model = model or os.environ.get("LLM_MODEL") or self.DEFAULT_MODEL
+        self.model = model or shared.get("LLM_MODEL") or self.DEFAULT_MODEL
 
         # Resolve base URL
-        self.base_url = base_url or os.environ.get("LLM_BASE_URL") or "https://api.openai.com/v1"
+        self.base_url = base_url or shared.get("LLM_BASE_URL") or self.DEFAULT_BASE_URL
 
         # Ensure base_url ends with /v1 for compatibility
         if not self.base_url.endswith("/v1"):
             self.base_url = self.base_url.rstrip("/") + "/v1"
 
-        self.endpoint = f"{self.base_url}/chat/completions"
+        self.endpoint = self.endpoint_url(self.base_url)
+
+        self._init_pool(pool_config)
 
         logger.debug(
             "OpenAIProvider initialized with model=%s, endpoint=%s",
@@ -116,12 +838,30 @@ class OpenAIProvider(LLMProvider):
             self.endpoint,
         )
 
-    def generate(self, prompt: str) -> str:
+    @staticmethod
+    def endpoint_url(base_url: str) -> str:
+        """
+        Chat completions URL of an OpenAI-compatible API.
+
+        Args:
+            base_url: Base URL, with or without the /v1 suffix.
+
+        Returns:
+            The URL requests are posted to.
+
+        Examples:
+            >>> OpenAIProvider.endpoint_url("http://localhost:11434")
+            'http://localhost:11434/v1/chat/completions'
+        """
+        base = base_url if base_url.endswith("/v1") else base_url.rstrip("/") + "/v1"
+        return f"{base}/chat/completions"
+
+    def generate(self, prompt: Prompt) -> str:
         """
         Generate a response using OpenAI-compatible API.
 
         Args:
-            prompt: The user prompt to send.
+            prompt: The user prompt (or chat messages) to send.
 
         Returns:
             The response content from the API.
@@ -132,62 +872,154 @@ class OpenAIProvider(LLMProvider):
             httpx.RequestError: If the request fails.
             RuntimeError: If the response format is invalid.
         """
-        # SECURITY: API key used in headers but never logged
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+        logger.debug(
+            "Calling OpenAI-compatible API with model=%s, endpoint=%s",
+            self.model,
+            self.endpoint,
+        )
 
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": self.SYSTEM_PROMPT},
-                {"role": "user", "content": prompt},
-            ],
-            "temperature": self.TEMPERATURE,
-            "max_tokens": self.MAX_TOKENS,
-        }
+        # Send request on the pooled client and parse response
+        try:
+            data = self._post(self.endpoint, self._headers(), self._payload(prompt))
+        except json.JSONDecodeError as e:
+            logger.error("Invalid API response format: %s", e)
+            raise RuntimeError(f"Invalid API response format: {e}") from e
+        self._track_usage(data)
+        return self._content(data)
+
+    async def agenerate(self, prompt: Prompt) -> str:
+        """
+        Generate a response using the OpenAI-compatible API on an async client.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
 
+        Returns:
+            The response content from the API.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns an error status.
+            httpx.RequestError: If the request fails.
+            RuntimeError: If the response format is invalid.
+        """
+        try:
+            data = await self._apost(self.endpoint, self._headers(), self._payload(prompt))
+        except json.JSONDecodeError as e:
+            logger.error("Invalid API response format: %s", e)
+            raise RuntimeError(f"Invalid API response format: {e}") from e
+        self._track_usage(data)
+        return self._content(data)
+
+    def generate_stream(self, prompt: Prompt) -> Iterator[str]:
+        """
+        Stream a response from the OpenAI-compatible API.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Yields:
+            Content deltas in order.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns an error status.
+            httpx.RequestError: If the request fails.
+            RuntimeError: If an event has an invalid format.
+        """
         logger.debug(
-            "Calling OpenAI-compatible API with model=%s, endpoint=%s",
+            "Streaming from OpenAI-compatible API with model=%s, endpoint=%s",
             self.model,
             self.endpoint,
         )
 
-        with httpx.Client(timeout=self.TIMEOUT_SEC) as client:
-            response = client.post(
-                self.endpoint,
-                headers=headers,
-                json=payload,
-            )
+        payload = {**self._payload(prompt), "stream": True}
+        for event in self._stream_events(self.endpoint, self._headers(), payload):
+            delta = self._delta(event)
+            if delta:
+                yield delta
 
-            # Handle HTTP errors with proper error message extraction
-            if response.status_code != 200:
-                error_msg = f"HTTP {response.status_code}"
-                try:
-                    error_data = response.json()
-                    # Extract error message without logging full response
-                    if "error" in error_data:
-                        if isinstance(error_data["error"], dict):
-                            error_msg = error_data["error"].get("message", error_msg)
-                        else:
-                            error_msg = str(error_data["error"])
-                except Exception:
-                    pass  # Use default error message if parsing fails
-
-                logger.error("API error: %s", error_msg)
-                response.raise_for_status()
-
-        # Parse response
+    async def agenerate_stream(self, prompt: Prompt) -> AsyncIterator[str]:
+        """
+        Async counterpart of generate_stream.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Yields:
+            Content deltas in order.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns an error status.
+            httpx.RequestError: If the request fails.
+            RuntimeError: If an event has an invalid format.
+        """
+        payload = {**self._payload(prompt), "stream": True}
+        async for event in self._astream_events(self.endpoint, self._headers(), payload):
+            delta = self._delta(event)
+            if delta:
+                yield delta
+
+    @staticmethod
+    def _content(data: Any) -> str:
+        """Extract the completion text from a chat completions response."""
         try:
-            data = response.json()
             content: str = data["choices"][0]["message"]["content"]
-            logger.debug("API response received (%d chars)", len(content))
-            return content
-
-        except (KeyError, IndexError, json.JSONDecodeError) as e:
+        except (KeyError, IndexError, TypeError) as e:
             logger.error("Invalid API response format: %s", e)
             raise RuntimeError(f"Invalid API response format: {e}") from e
+        logger.debug("API response received (%d chars)", len(content))
+        return content
+
+    def _track_usage(self, data: Any) -> None:
+        """Record the prompt caching reported in a chat completions response."""
+        usage = data.get("usage") if isinstance(data, dict) else None
+        if not isinstance(usage, dict):
+            return
+        details = usage.get("prompt_tokens_details")
+        cached = details.get("cached_tokens") if isinstance(details, dict) else None
+        self._record_usage(
+            _token_count(usage.get("prompt_tokens")),
+            _token_count(cached),
+            0,
+            _token_count(usage.get("completion_tokens")),
+        )
+
+    @staticmethod
+    def _delta(event: Any) -> str | None:
+        """Extract the content delta from a streamed chat completion chunk."""
+        try:
+            choices = event["choices"]
+            delta: str | None = choices[0].get("delta", {}).get("content") if choices else None
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            logger.error("Invalid streaming event format: %s", e)
+            raise RuntimeError(f"Invalid streaming event format: {e}") from e
+        return delta
+
+    def _headers(self) -> dict[str, str]:
+        """Build request headers."""
+        # SECURITY: API key used in headers but never logged
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _payload(self, prompt: Prompt) -> dict[str, Any]:
+        """Build the chat completions request body."""
+        # Consecutive same-role messages are sent as one, so a prompt split
+        # into a cacheable prefix and a suffix is byte-identical to the
+        # unsplit prompt; OpenAI caches repeated prefixes automatically
+        messages = [
+            {"role": role, "content": "\n".join(m.content for m in group)}
+            for role, group in _merge_turns(prompt)
+        ]
+        return {
+            "model": self.model,
+            "messages": [{"role": "system", "content": self.SYSTEM_PROMPT}, *messages],
+            "temperature": self.TEMPERATURE,
+            "max_tokens": self.MAX_TOKENS,
+        }
 
 
 class AnthropicProvider(LLMProvider):
@@ -199,14 +1031,20 @@ class AnthropicProvider(LLMProvider):
     Attributes:
         api_key: The Anthropic API key.
         model: The model identifier to use.
+        base_url: The base URL of the API (without the /v1 path).
+        endpoint: The Messages API URL requests are sent to.
     """
 
     DEFAULT_MODEL = "claude-sonnet-4-20250514"
+    DEFAULT_BASE_URL = "https://api.anthropic.com"
 
     def __init__(
         self,
         api_key: str | None = None,
         model: str | None = None,
+        pool_config: HTTPPoolConfig | None = None,
+        base_url: str | None = None,
+        shared_env: bool = True,
     ) -> None:
         """
         Initialize the Anthropic provider.
@@ -215,14 +1053,20 @@ class AnthropicProvider(LLMProvider):
             api_key: Anthropic API key. If not provided, reads from LLM_API_KEY or
                 ANTHROPIC_API_KEY.
             model: Model identifier. If not provided, reads from LLM_MODEL or uses default.
+            pool_config: HTTP connection pool settings. Defaults to HTTPPoolConfig().
+            base_url: Base URL of a Messages API compatible server (e.g. a local
+                mock). If not provided, reads from ANTHROPIC_BASE_URL or uses the
+                Anthropic API.
+            shared_env: Whether the generic LLM_API_KEY and LLM_MODEL variables
+                apply. Defaults to True; see create_member_provider().
 
         Raises:
-            ValueError: If no API key is provided and environment variables are not set.
+            ValueError: If no API key is provided and environment variables are not set,
+                or if HTTP/2 is requested without the 'h2' package.
         """
         # Resolve API key
-        resolved_key = (
-            api_key or os.environ.get("LLM_API_KEY") or os.environ.get("ANTHROPIC_API_KEY")
-        )
+        shared = os.environ if shared_env else {}
+        resolved_key = api_key or shared.get("LLM_API_KEY") or os.environ.get("ANTHROPIC_API_KEY")
 
         if not resolved_key:
             raise ValueError(
@@ -234,9 +1078,14 @@ class AnthropicProvider(LLMProvider):
         self.api_key = resolved_key
 
         # Resolve model
-        self.model = model or os.environ.get("LLM_MODEL") or self.DEFAULT_MODEL
+        self.model = model or shared.get("LLM_MODEL") or self.DEFAULT_MODEL
+
+        # Accept the base URL with or without the /v1 suffix
+        base = base_url or os.environ.get("ANTHROPIC_BASE_URL") or self.DEFAULT_BASE_URL
+        self.base_url = base.rstrip("/").removesuffix("/v1")
+        self.endpoint = self.endpoint_url(self.base_url)
 
-        self.endpoint = "https://api.anthropic.com/v1/messages"
+        self._init_pool(pool_config)
 
         logger.debug(
             "AnthropicProvider initialized with model=%s, endpoint=%s",
@@ -244,12 +1093,60 @@ class AnthropicProvider(LLMProvider):
             self.endpoint,
         )
 
-    def generate(self, prompt: str) -> str:
+    @staticmethod
+    def endpoint_url(base_url: str) -> str:
+        """
+        Messages API URL of an Anthropic-compatible API.
+
+        Args:
+            base_url: Base URL, with or without the /v1 suffix.
+
+        Returns:
+            The URL requests are posted to.
+
+        Examples:
+            >>> AnthropicProvider.endpoint_url("https://api.anthropic.com/v1/")
+            'https://api.anthropic.com/v1/messages'
+        """
+        return f"{base_url.rstrip('/').removesuffix('/v1')}/v1/messages"
+
+    def generate(self, prompt: Prompt) -> str:
         """
         Generate a response using Anthropic Messages API.
 
         Args:
-            prompt: The user prompt to send.
+            prompt: The user prompt (or chat messages) to send.
+
+        Returns:
+            The response content from the API.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns an error status.
+            httpx.RequestError: If the request fails.
+            RuntimeError: If the response format is invalid.
+        """
+        logger.debug(
+            "Calling Anthropic API with model=%s, endpoint=%s",
+            self.model,
+            self.endpoint,
+        )
+
+        # Send request on the pooled client and parse response
+        try:
+            data = self._post(self.endpoint, self._headers(), self._payload(prompt))
+        except json.JSONDecodeError as e:
+            logger.error("Invalid API response format: %s", e)
+            raise RuntimeError(f"Invalid API response format: {e}") from e
+        self._track_usage(data)
+        return self._content(data)
+
+    async def agenerate(self, prompt: Prompt) -> str:
+        """
+        Generate a response using the Anthropic Messages API on an async client.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
 
         Returns:
             The response content from the API.
@@ -260,63 +1157,573 @@ class AnthropicProvider(LLMProvider):
             httpx.RequestError: If the request fails.
             RuntimeError: If the response format is invalid.
         """
+        try:
+            data = await self._apost(self.endpoint, self._headers(), self._payload(prompt))
+        except json.JSONDecodeError as e:
+            logger.error("Invalid API response format: %s", e)
+            raise RuntimeError(f"Invalid API response format: {e}") from e
+        self._track_usage(data)
+        return self._content(data)
+
+    def generate_stream(self, prompt: Prompt) -> Iterator[str]:
+        """
+        Stream a response from the Anthropic Messages API.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Yields:
+            Text deltas in order.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns an error status.
+            httpx.RequestError: If the request fails.
+            RuntimeError: If the stream reports an error or has an invalid format.
+        """
+        logger.debug(
+            "Streaming from Anthropic API with model=%s, endpoint=%s",
+            self.model,
+            self.endpoint,
+        )
+
+        payload = {**self._payload(prompt), "stream": True}
+        for event in self._stream_events(self.endpoint, self._headers(), payload):
+            if isinstance(event, dict) and event.get("type") == "message_start":
+                self._track_usage(event.get("message"))
+            text = self._delta(event)
+            if text:
+                yield text
+
+    async def agenerate_stream(self, prompt: Prompt) -> AsyncIterator[str]:
+        """
+        Async counterpart of generate_stream.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Yields:
+            Text deltas in order.
+
+        Raises:
+            httpx.TimeoutException: If the request times out.
+            httpx.HTTPStatusError: If the API returns an error status.
+            httpx.RequestError: If the request fails.
+            RuntimeError: If the stream reports an error or has an invalid format.
+        """
+        payload = {**self._payload(prompt), "stream": True}
+        async for event in self._astream_events(self.endpoint, self._headers(), payload):
+            if isinstance(event, dict) and event.get("type") == "message_start":
+                self._track_usage(event.get("message"))
+            text = self._delta(event)
+            if text:
+                yield text
+
+    @staticmethod
+    def _content(data: Any) -> str:
+        """Extract the completion text from a Messages API response."""
+        try:
+            content: str = data["content"][0]["text"]
+        except (KeyError, IndexError, TypeError) as e:
+            logger.error("Invalid API response format: %s", e)
+            raise RuntimeError(f"Invalid API response format: {e}") from e
+        logger.debug("API response received (%d chars)", len(content))
+        return content
+
+    def _track_usage(self, message: Any) -> None:
+        """Record the prompt caching reported in a Messages API response."""
+        usage = message.get("usage") if isinstance(message, dict) else None
+        if not isinstance(usage, dict):
+            return
+        read = _token_count(usage.get("cache_read_input_tokens"))
+        written = _token_count(usage.get("cache_creation_input_tokens"))
+        # input_tokens only counts the uncached part of the prompt
+        self._record_usage(
+            _token_count(usage.get("input_tokens")) + read + written,
+            read,
+            written,
+            _token_count(usage.get("output_tokens")),
+        )
+
+    @staticmethod
+    def _delta(event: Any) -> str | None:
+        """
+        Extract the text delta from a streamed Messages API event.
+
+        Raises:
+            RuntimeError: If the event reports an error.
+        """
+        event_type = event.get("type") if isinstance(event, dict) else None
+        if event_type == "content_block_delta":
+            text: str | None = event.get("delta", {}).get("text")
+            return text
+        if event_type == "error":
+            message = event.get("error", {}).get("message", "unknown error")
+            logger.error("API stream error: %s", message)
+            raise RuntimeError(f"API stream error: {message}")
+        return None
+
+    def _headers(self) -> dict[str, str]:
+        """Build request headers."""
         # SECURITY: API key used in headers but never logged
-        headers = {
+        return {
             "x-api-key": self.api_key,
             "Content-Type": "application/json",
             "anthropic-version": "2023-06-01",
         }
 
-        payload = {
+    def _payload(self, prompt: Prompt) -> dict[str, Any]:
+        """Build the Messages API request body."""
+        messages: list[dict[str, Any]] = []
+        for role, group in _merge_turns(prompt):
+            if len(group) == 1 and not group[0].cache:
+                messages.append({"role": role, "content": group[0].content})
+                continue
+            # Messages marked cacheable end a cache_control breakpoint: the
+            # system prompt and everything up to them is cached by the API
+            blocks: list[dict[str, Any]] = []
+            for message in group:
+                block: dict[str, Any] = {"type": "text", "text": message.content}
+                if message.cache:
+                    block["cache_control"] = {"type": "ephemeral"}
+                blocks.append(block)
+            messages.append({"role": role, "content": blocks})
+
+        return {
             "model": self.model,
             "max_tokens": self.MAX_TOKENS,
             "temperature": self.TEMPERATURE,
             "system": self.SYSTEM_PROMPT,
-            "messages": [
-                {"role": "user", "content": prompt},
-            ],
+            "messages": messages,
         }
 
-        logger.debug(
-            "Calling Anthropic API with model=%s, endpoint=%s",
-            self.model,
-            self.endpoint,
+
+class ProvidersUnavailableError(RuntimeError):
+    """Raised when every provider in a failover chain has an open circuit."""
+
+    pass
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """
+    Configuration of one provider in a failover chain.
+
+    Attributes:
+        provider_type: Provider type ('openai' or 'anthropic').
+        model: Model identifier, or None for the provider default.
+        base_url: Base URL of an OpenAI- or Anthropic-compatible API.
+        api_key: API key, or None to read it from the environment.
+    """
+
+    provider_type: str
+    model: str | None = None
+    base_url: str | None = None
+    api_key: str | None = None
+
+    @classmethod
+    def parse(cls, text: str) -> "ProviderSpec":
+        """
+        Parse a 'PROVIDER[:MODEL][@BASE_URL]' string.
+
+        Args:
+            text: The specification, e.g. 'anthropic:claude-3-5-haiku-latest'
+                or 'openai:llama3@http://localhost:11434/v1'.
+
+        Returns:
+            The parsed ProviderSpec.
+
+        Raises:
+            ValueError: If the provider type is missing.
+
+        Examples:
+            >>> ProviderSpec.parse("openai:gpt-4o-mini")
+            ProviderSpec(provider_type='openai', model='gpt-4o-mini', base_url=None, api_key=None)
+        """
+        head, _, base_url = text.partition("@")
+        provider_type, _, model = head.partition(":")
+        if not provider_type.strip():
+            raise ValueError(f"Invalid provider specification: '{text}'")
+        return cls(
+            provider_type=provider_type.strip().lower(),
+            model=model.strip() or None,
+            base_url=base_url.strip() or None,
         )
 
-        with httpx.Client(timeout=self.TIMEOUT_SEC) as client:
-            response = client.post(
-                self.endpoint,
-                headers=headers,
-                json=payload,
+
+def is_outage(error: BaseException) -> bool:
+    """
+    Whether an error means the provider is unavailable rather than the request invalid.
+
+    Args:
+        error: The error a provider call raised.
+
+    Returns:
+        True for transport errors, timeouts and transient error statuses
+        (429, 5xx and the others in RETRYABLE_STATUSES).
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status in RETRYABLE_STATUSES or status >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def provider_label(provider: LLMProvider) -> str:
+    """
+    Short name of a provider for logs and statistics.
+
+    Args:
+        provider: The provider to describe.
+
+    Returns:
+        The provider kind and model, e.g. 'openai/gpt-4o'.
+    """
+    kind = type(provider).__name__.removesuffix("Provider").lower()
+    return f"{kind}/{provider.model}" if provider.model else kind
+
+
+class FailoverProvider(LLMProvider):
+    """
+    Ordered chain of providers, each guarded by a circuit breaker.
+
+    Every request goes to the first provider whose breaker is closed (or that
+    is due for a half-open probe). If it fails, the failure is recorded and
+    the next provider is tried, so a partial outage costs one failed call per
+    request instead of the whole retry budget. Providers whose breaker is
+    open are skipped until their cooldown has passed.
+
+    Only signs of an outage (transport errors, timeouts, 429 and 5xx
+    responses) count against a breaker. Other error statuses (400, 401, 404,
+    ...) mean the request itself is wrong and would fail the same way on every
+    provider, so they are raised at once; any other error (e.g. a malformed
+    response) fails over without counting.
+
+    Attributes:
+        providers: The providers, in order of preference.
+        breakers: One circuit breaker per provider.
+        failovers: Requests served by a provider other than the first.
+    """
+
+    def __init__(
+        self,
+        providers: Sequence[LLMProvider],
+        policy: BreakerPolicy | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_state_change: StateListener | None = None,
+    ) -> None:
+        """
+        Initialize the failover chain.
+
+        Args:
+            providers: Providers in order of preference.
+            policy: Circuit breaker thresholds shared by all providers.
+                Defaults to BreakerPolicy().
+            clock: Monotonic time source for the breakers (injectable for tests).
+            on_state_change: Optional callback invoked as
+                (provider label, old_state, new_state) on breaker transitions.
+
+        Raises:
+            ValueError: If no providers are given.
+        """
+        if not providers:
+            raise ValueError("A failover chain needs at least one provider")
+
+        self.providers = list(providers)
+        self.breakers = [
+            CircuitBreaker(
+                provider_label(provider),
+                policy=policy,
+                clock=clock,
+                on_state_change=on_state_change,
             )
+            for provider in self.providers
+        ]
+        self.failovers = 0
+        self.model = "|".join(provider.model for provider in self.providers)
+        self.endpoint = "|".join(provider.endpoint for provider in self.providers)
+        self._init_pool(None)
+        self._lock = threading.Lock()
+
+        logger.debug("Created failover chain: %s", ", ".join(b.name for b in self.breakers))
+
+    def _route(self) -> Iterator[tuple[int, LLMProvider, CircuitBreaker]]:
+        """Yield the providers that may take a request, asking each breaker lazily."""
+        for index, (provider, breaker) in enumerate(
+            zip(self.providers, self.breakers, strict=True)
+        ):
+            if breaker.allow_request():
+                yield index, provider, breaker
+            else:
+                logger.debug("Skipping provider '%s' (circuit open)", breaker.name)
+
+    def _on_failure(self, breaker: CircuitBreaker, error: Exception) -> bool:
+        """
+        Record a failed call and decide whether to fail over.
 
-            # Handle HTTP errors with proper error message extraction
-            if response.status_code != 200:
-                error_msg = f"HTTP {response.status_code}"
+        Returns:
+            False if the error is a client error or the request was aborted
+            (see abortable_requests()), to raise at once.
+        """
+        if _request_aborted() or (
+            isinstance(error, httpx.HTTPStatusError) and not is_outage(error)
+        ):
+            breaker.release()
+            return False
+        if is_outage(error):
+            breaker.record_failure()
+        else:
+            breaker.release()
+        logger.warning("Provider '%s' failed: %s", breaker.name, error)
+        return True
+
+    def _on_success(self, index: int, breaker: CircuitBreaker) -> None:
+        """Record a successful call."""
+        breaker.record_success()
+        if index > 0:
+            with self._lock:
+                self.failovers += 1
+
+    def _unavailable(self, last_error: Exception | None) -> Exception:
+        """Error raised when no provider produced a response."""
+        if last_error is not None:
+            return last_error
+        return ProvidersUnavailableError(
+            "All providers are unavailable (circuit open): "
+            + ", ".join(b.name for b in self.breakers)
+        )
+
+    def generate(self, prompt: Prompt) -> str:
+        """
+        Generate a response from the first healthy provider.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Returns:
+            The response content.
+
+        Raises:
+            ProvidersUnavailableError: If every breaker is open.
+            httpx.HTTPStatusError: At once, for client error statuses.
+            Exception: The last provider's error if every attempted provider failed.
+        """
+        last_error: Exception | None = None
+        for index, provider, breaker in self._route():
+            try:
+                text = provider.generate(prompt)
+            except Exception as e:
+                if not self._on_failure(breaker, e):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            self._on_success(index, breaker)
+            return text
+        raise self._unavailable(last_error)
+
+    def generate_stream(self, prompt: Prompt) -> Iterator[str]:
+        """
+        Stream a response from the first healthy provider.
+
+        A provider counts as healthy once its first chunk arrives; errors
+        after that point are not retried on another provider.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Yields:
+            Successive pieces of the response text.
+
+        Raises:
+            ProvidersUnavailableError: If every breaker is open.
+            httpx.HTTPStatusError: At once, for client error statuses.
+            Exception: The last provider's error if every attempted provider failed.
+        """
+        last_error: Exception | None = None
+        for index, provider, breaker in self._route():
+            stream = provider.generate_stream(prompt)
+            try:
                 try:
-                    error_data = response.json()
-                    # Extract error message without logging full response
-                    if "error" in error_data:
-                        if isinstance(error_data["error"], dict):
-                            error_msg = error_data["error"].get("message", error_msg)
-                        else:
-                            error_msg = str(error_data["error"])
-                except Exception:
-                    pass  # Use default error message if parsing fails
-
-                logger.error("API error: %s", error_msg)
-                response.raise_for_status()
-
-        # Parse response
-        try:
-            data = response.json()
-            content: str = data["content"][0]["text"]
-            logger.debug("API response received (%d chars)", len(content))
-            return content
+                    first = next(stream)
+                except StopIteration:
+                    self._on_success(index, breaker)
+                    return
+                except Exception as e:
+                    if not self._on_failure(breaker, e):
+                        raise
+                    last_error = e
+                    continue
+                except BaseException:
+                    breaker.release()
+                    raise
+                self._on_success(index, breaker)
+                yield first
+                yield from stream
+                return
+            finally:
+                close = getattr(stream, "close", None)
+                if callable(close):
+                    close()
+        raise self._unavailable(last_error)
+
+    async def agenerate(self, prompt: Prompt) -> str:
+        """
+        Async counterpart of generate.
 
-        except (KeyError, IndexError, json.JSONDecodeError) as e:
-            logger.error("Invalid API response format: %s", e)
-            raise RuntimeError(f"Invalid API response format: {e}") from e
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Returns:
+            The response content.
+
+        Raises:
+            ProvidersUnavailableError: If every breaker is open.
+            httpx.HTTPStatusError: At once, for client error statuses.
+            Exception: The last provider's error if every attempted provider failed.
+        """
+        last_error: Exception | None = None
+        for index, provider, breaker in self._route():
+            try:
+                text = await provider.agenerate(prompt)
+            except Exception as e:
+                if not self._on_failure(breaker, e):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            self._on_success(index, breaker)
+            return text
+        raise self._unavailable(last_error)
+
+    async def agenerate_stream(self, prompt: Prompt) -> AsyncIterator[str]:
+        """
+        Async counterpart of generate_stream.
+
+        Args:
+            prompt: The user prompt (or chat messages) to send.
+
+        Yields:
+            Successive pieces of the response text.
+
+        Raises:
+            ProvidersUnavailableError: If every breaker is open.
+            httpx.HTTPStatusError: At once, for client error statuses.
+            Exception: The last provider's error if every attempted provider failed.
+        """
+        last_error: Exception | None = None
+        for index, provider, breaker in self._route():
+            stream = provider.agenerate_stream(prompt)
+            try:
+                try:
+                    first = await stream.__anext__()
+                except StopAsyncIteration:
+                    self._on_success(index, breaker)
+                    return
+                except Exception as e:
+                    if not self._on_failure(breaker, e):
+                        raise
+                    last_error = e
+                    continue
+                except BaseException:
+                    breaker.release()
+                    raise
+                self._on_success(index, breaker)
+                yield first
+                async for chunk in stream:
+                    yield chunk
+                return
+            finally:
+                aclose = getattr(stream, "aclose", None)
+                if callable(aclose):
+                    await aclose()
+        raise self._unavailable(last_error)
+
+    def close(self) -> None:
+        """Close every provider's pooled HTTP client."""
+        for provider in self.providers:
+            provider.close()
+
+    async def aclose(self) -> None:
+        """Close every provider's sync and async pooled HTTP clients."""
+        for provider in self.providers:
+            await provider.aclose()
+
+
+def prompt_cache_usage(provider: LLMProvider) -> PromptCacheStats:
+    """
+    Prompt caching reported to a provider, summed over a failover chain.
+
+    Args:
+        provider: The provider to inspect.
+
+    Returns:
+        The accumulated counters (empty for providers that do not track usage).
+    """
+    if isinstance(provider, FailoverProvider):
+        total = PromptCacheStats()
+        for child in provider.providers:
+            child_usage = prompt_cache_usage(child)
+            total.requests += child_usage.requests
+            total.input_tokens += child_usage.input_tokens
+            total.cached_tokens += child_usage.cached_tokens
+            total.cache_write_tokens += child_usage.cache_write_tokens
+        return total
+    usage = getattr(provider, "cache_usage", None)
+    return usage if isinstance(usage, PromptCacheStats) else PromptCacheStats()
+
+
+def resolve_provider_type(provider_type: str | None) -> str:
+    """
+    The provider type to use, defaulting to LLM_PROVIDER and then 'openai'.
+
+    Args:
+        provider_type: The requested provider type, or None.
+
+    Returns:
+        The lowercased provider type.
+    """
+    return (provider_type or os.environ.get("LLM_PROVIDER") or "openai").lower()
+
+
+def create_member_provider(
+    spec: ProviderSpec,
+    primary_type: str | None,
+    pool_config: HTTPPoolConfig | None = None,
+) -> LLMProvider:
+    """
+    Create a fallback, hedge or cascade provider alongside a primary provider.
+
+    The generic LLM_API_KEY, LLM_MODEL and LLM_BASE_URL variables configure
+    the primary provider, so they must not leak into a provider of another
+    type: an OpenAI key and model name would be sent to Anthropic and fail.
+    A member therefore reads its provider's own variables (OPENAI_API_KEY,
+    ANTHROPIC_API_KEY) and defaults to that provider's default model. Only a
+    member of the primary's provider type shares its endpoint and key.
+
+    Args:
+        spec: The member's provider, model, base URL and key.
+        primary_type: The primary provider's type, or None for the default.
+        pool_config: HTTP connection pool settings. Defaults to HTTPPoolConfig().
+
+    Returns:
+        An initialized LLMProvider instance.
+
+    Raises:
+        ValueError: If the provider type is invalid or its API key is missing.
+    """
+    member_type = resolve_provider_type(spec.provider_type)
+    api_key, base_url = spec.api_key, spec.base_url
+    if member_type == resolve_provider_type(primary_type):
+        api_key = api_key or os.environ.get("LLM_API_KEY")
+        if member_type == "openai":
+            base_url = base_url or os.environ.get("LLM_BASE_URL")
+    return create_provider(
+        member_type, api_key, spec.model, base_url, pool_config, shared_env=False
+    )
 
 
 def create_provider(
@@ -324,6 +1731,11 @@ def create_provider(
     api_key: str | None = None,
     model: str | None = None,
     base_url: str | None = None,
+    pool_config: HTTPPoolConfig | None = None,
+    *,
+    fallbacks: Sequence[ProviderSpec] | None = None,
+    breaker_policy: BreakerPolicy | None = None,
+    shared_env: bool = True,
 ) -> LLMProvider:
     """
     Factory function to create an LLM provider.
@@ -333,7 +1745,15 @@ def create_provider(
             reads from LLM_PROVIDER environment variable (default: 'openai').
         api_key: API key for the provider.
         model: Model identifier.
-        base_url: Base URL (only for OpenAI-compatible providers).
+        base_url: Base URL of an OpenAI- or Anthropic-compatible API.
+        pool_config: HTTP connection pool settings. Defaults to HTTPPoolConfig().
+        fallbacks: Further providers to fail over to, in order. When given, the
+            result is a FailoverProvider whose chain starts with the provider
+            described by the other arguments.
+        breaker_policy: Circuit breaker settings for the failover chain.
+        shared_env: Whether the generic LLM_API_KEY, LLM_MODEL and LLM_BASE_URL
+            variables apply. They configure the primary provider; fallbacks are
+            created with create_member_provider().
 
     Returns:
         An initialized LLMProvider instance.
@@ -341,12 +1761,29 @@ def create_provider(
     Raises:
         ValueError: If provider_type is invalid or required credentials are missing.
     """
-    resolved_type = (provider_type or os.environ.get("LLM_PROVIDER") or "openai").lower()
+    if fallbacks:
+        chain = [create_provider(provider_type, api_key, model, base_url, pool_config)]
+        chain.extend(create_member_provider(spec, provider_type, pool_config) for spec in fallbacks)
+        return FailoverProvider(chain, policy=breaker_policy)
+
+    resolved_type = resolve_provider_type(provider_type)
 
     if resolved_type == "openai":
-        return OpenAIProvider(api_key=api_key, model=model, base_url=base_url)
+        return OpenAIProvider(
+            api_key=api_key,
+            model=model,
+            base_url=base_url,
+            pool_config=pool_config,
+            shared_env=shared_env,
+        )
     elif resolved_type == "anthropic":
-        return AnthropicProvider(api_key=api_key, model=model)
+        return AnthropicProvider(
+            api_key=api_key,
+            model=model,
+            pool_config=pool_config,
+            base_url=base_url,
+            shared_env=shared_env,
+        )
     else:
         raise ValueError(
             f"Invalid provider type: {resolved_type}. Must be 'openai' or 'anthropic'."
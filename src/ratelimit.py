@@ -0,0 +1,334 @@
+"""
+Retry policies and client-side rate limiting for LLM requests.
+
+This module provides the RetryPolicy class that decides which failures are
+worth retrying and how long to back off (exponential with jitter, honoring
+Retry-After), and the RateLimiter class: token buckets on requests and tokens
+per minute that every worker in the process can share, so that concurrent
+runs stay just under the provider's limits instead of collapsing into storms
+of 429 responses.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used to estimate request size up front
+CHARS_PER_TOKEN = 4
+
+# Statuses that indicate a transient condition worth retrying:
+# 408 timeout, 409 conflict, 425 too early, 429 rate limited,
+# 5xx server errors, 529 Anthropic "overloaded"
+RETRYABLE_STATUSES = frozenset({408, 409, 425, 429, 500, 502, 503, 504, 529})
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a piece of text.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        An approximate token count (at least 1).
+    """
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value: Either a number of seconds or an HTTP date, or None.
+
+    Returns:
+        Seconds to wait (never negative), or None if absent or unparseable.
+
+    Examples:
+        >>> parse_retry_after("2")
+        2.0
+        >>> parse_retry_after(None) is None
+        True
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    When and how long to retry failed LLM requests.
+
+    Attributes:
+        max_attempts: Total attempts, including the first one.
+        base_delay: Backoff before the first retry, in seconds.
+        max_delay: Upper bound on any single backoff (including Retry-After).
+        multiplier: Growth factor of the backoff per attempt.
+        jitter: Fraction of each backoff that is randomized (0 disables
+            jitter, 1 is "full jitter"). Spreads out retries from concurrent
+            workers so they do not hit the provider in lockstep.
+        retry_statuses: HTTP status codes that are retried.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    retry_statuses: frozenset[int] = RETRYABLE_STATUSES
+
+    def should_retry_status(self, status_code: int) -> bool:
+        """
+        Check whether an HTTP status is transient.
+
+        Args:
+            status_code: The HTTP status code.
+
+        Returns:
+            True if a request failing with this status should be retried.
+        """
+        return status_code in self.retry_statuses
+
+    def backoff(
+        self,
+        attempt: int,
+        retry_after: float | None = None,
+        rng: random.Random | None = None,
+    ) -> float:
+        """
+        Compute how long to wait before the next attempt.
+
+        Args:
+            attempt: Zero-based index of the attempt that just failed.
+            retry_after: Server-requested delay (from Retry-After), which takes
+                precedence over the computed backoff.
+            rng: Random source for jitter. Defaults to the module RNG.
+
+        Returns:
+            Delay in seconds, at most max_delay.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+
+        delay = min(self.max_delay, self.base_delay * self.multiplier**attempt)
+        rand = (rng or random).random()
+        return delay * (1.0 - self.jitter * rand)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at a constant rate.
+
+    Callers reserve capacity up front and then sleep for the returned wait
+    outside the lock, so waiting workers are served in arrival order and never
+    block each other's bookkeeping.
+
+    Attributes:
+        rate_per_minute: Refill rate.
+        capacity: Maximum burst size.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        capacity: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate_per_minute: Units added per minute. Must be positive.
+            capacity: Maximum units held. Defaults to one minute's worth.
+            clock: Monotonic time source (injectable for tests).
+
+        Raises:
+            ValueError: If rate_per_minute is not positive.
+        """
+        if rate_per_minute <= 0:
+            raise ValueError(f"rate_per_minute must be positive, got {rate_per_minute}")
+
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._clock = clock
+        self._level = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Take units from the bucket, going into debt if necessary.
+
+        Args:
+            amount: Units to take. Requests larger than the capacity are
+                clamped so they can still proceed.
+
+        Returns:
+            Seconds the caller must wait before using the reservation.
+        """
+        amount = min(amount, self.capacity)
+        rate_per_sec = self.rate_per_minute / 60.0
+
+        with self._lock:
+            now = self._clock()
+            self._level = min(self.capacity, self._level + (now - self._updated) * rate_per_sec)
+            self._updated = now
+            self._level -= amount
+            if self._level >= 0:
+                return 0.0
+            return -self._level / rate_per_sec
+
+
+class RateLimiter:
+    """
+    Client-side limiter on requests and tokens per minute.
+
+    A limiter can be shared by every generator in the process (see
+    shared_rate_limiter) so that concurrent workers draw from one budget. When
+    the provider answers 429 anyway, pause() stops all workers for the
+    server-requested time instead of letting each one hammer the endpoint.
+
+    Attributes:
+        requests_per_minute: Request budget, or None for unlimited.
+        tokens_per_minute: Token budget, or None for unlimited.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        Initialize the rate limiter.
+
+        Args:
+            requests_per_minute: Maximum requests per minute. Defaults to None.
+            tokens_per_minute: Maximum tokens (prompt + completion) per minute.
+                Defaults to None.
+            clock: Monotonic time source (injectable for tests).
+            sleep: Sleep function (injectable for tests).
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = (
+            TokenBucket(requests_per_minute, clock=clock) if requests_per_minute else None
+        )
+        self._tokens = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute else None
+        self._clock = clock
+        self._sleep = sleep
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until one request of the given size fits in the budget.
+
+        Args:
+            tokens: Estimated tokens the request will consume.
+
+        Returns:
+            Seconds spent waiting.
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            logger.debug("Rate limiter: waiting %.2fs", wait)
+            self._sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """
+        Async counterpart of acquire: waits with asyncio.sleep.
+
+        Args:
+            tokens: Estimated tokens the request will consume.
+
+        Returns:
+            Seconds spent waiting.
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            logger.debug("Rate limiter: waiting %.2fs", wait)
+            await asyncio.sleep(wait)
+        return wait
+
+    def _reserve(self, tokens: int) -> float:
+        """Reserve one request of the given size and return the required wait."""
+        with self._lock:
+            wait = max(0.0, self._paused_until - self._clock())
+
+        if self._requests is not None:
+            wait = max(wait, self._requests.reserve(1))
+        if self._tokens is not None and tokens > 0:
+            wait = max(wait, self._tokens.reserve(tokens))
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold back all callers for the given time (e.g. after a 429).
+
+        Args:
+            seconds: Pause length, measured from now.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+_shared_limiters: dict[str, RateLimiter] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_rate_limiter(
+    key: str,
+    requests_per_minute: float | None = None,
+    tokens_per_minute: float | None = None,
+) -> RateLimiter:
+    """
+    Return the process-wide limiter for a key, creating it on first use.
+
+    Limits passed on later calls for an existing key are ignored, so every
+    worker talking to the same provider shares one budget.
+
+    Args:
+        key: Identifies the budget (e.g. provider name and endpoint).
+        requests_per_minute: Request budget for a new limiter.
+        tokens_per_minute: Token budget for a new limiter.
+
+    Returns:
+        The shared RateLimiter instance.
+    """
+    with _shared_lock:
+        limiter = _shared_limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+            _shared_limiters[key] = limiter
+            logger.debug(
+                "Created shared rate limiter '%s': rpm=%s tpm=%s",
+                key,
+                requests_per_minute,
+                tokens_per_minute,
+            )
+        return limiter
@@ -6,6 +6,7 @@ against expected results, calculating similarity scores and classifying error ty
 to provide actionable feedback for the LLM generator.
 """
 
+import asyncio
 import json
 import logging
 from collections import Counter
@@ -13,6 +14,8 @@ from typing import Any, ClassVar
 
 from src.domain import Attempt, ErrorType, ExampleResult, Task
 from src.executor import ExecutionResult, JQExecutor
+from src.metrics import get_metrics
+from src.timing import ANALYZE, PARSE, phase
 
 logger = logging.getLogger(__name__)
 
@@ -71,10 +74,48 @@ class AlgorithmicReviewer:
         """
         logger.info("Evaluating filter '%s' against task '%s'", filter_code, task.id)
 
+        exec_results = [self.executor.run(filter_code, ex.input_data) for ex in task.examples]
+        return self._build_attempt(task, filter_code, exec_results)
+
+    async def evaluate_async(self, task: Task, filter_code: str) -> Attempt:
+        """
+        Evaluate a jq filter against all examples without blocking the event loop.
+
+        The examples run concurrently via JQExecutor.run_async; the resulting
+        Attempt is identical to the one evaluate() returns.
+
+        Args:
+            task: The task containing examples to evaluate against.
+            filter_code: The jq filter expression to evaluate.
+
+        Returns:
+            Attempt containing results for each example, aggregated score,
+            and primary error type.
+        """
+        logger.info("Evaluating filter '%s' against task '%s' (async)", filter_code, task.id)
+
+        exec_results = await asyncio.gather(
+            *(self.executor.run_async(filter_code, ex.input_data) for ex in task.examples)
+        )
+        return self._build_attempt(task, filter_code, list(exec_results))
+
+    def _build_attempt(
+        self, task: Task, filter_code: str, exec_results: list[ExecutionResult]
+    ) -> Attempt:
+        """
+        Diagnose per-example execution results and aggregate them into an Attempt.
+
+        Args:
+            task: The task whose examples were executed.
+            filter_code: The evaluated filter.
+            exec_results: One execution result per example, in order.
+
+        Returns:
+            The Attempt (iteration=0; the orchestrator sets the real number).
+        """
         example_results: list[ExampleResult] = []
 
-        for i, example in enumerate(task.examples):
-            exec_result = self.executor.run(filter_code, example.input_data)
+        for i, (example, exec_result) in enumerate(zip(task.examples, exec_results, strict=True)):
             result = self._diagnose(exec_result, example.expected_output)
             example_results.append(result)
 
@@ -85,6 +126,23 @@ class AlgorithmicReviewer:
                 result.error_type.value,
             )
 
+        attempt = self.summarize(filter_code, example_results)
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.evaluations.inc(error_type=attempt.primary_error.value)
+        return attempt
+
+    def summarize(self, filter_code: str, example_results: list[ExampleResult]) -> Attempt:
+        """
+        Aggregate per-example results into an Attempt.
+
+        Args:
+            filter_code: The evaluated filter.
+            example_results: One result per evaluated example.
+
+        Returns:
+            The Attempt (iteration=0; the orchestrator sets the real number).
+        """
         # Calculate aggregated score (average)
         if example_results:
             aggregated_score = sum(r.score for r in example_results) / len(example_results)
@@ -112,6 +170,151 @@ class AlgorithmicReviewer:
 
         return attempt
 
+    def find_counterexamples(
+        self, task: Task, filter_code: str, limit: int = 1
+    ) -> list[ExampleResult]:
+        """
+        Check a filter against the examples in order, stopping at failures.
+
+        Unlike evaluate(), examples after the limit-th failing one are not
+        run, so verifying a wrong candidate usually costs only a few jq runs.
+
+        Args:
+            task: The task containing examples to check.
+            filter_code: The jq filter expression to check.
+            limit: Number of failing examples after which checking stops.
+
+        Returns:
+            Results for the examples that were run, in order; all of them
+            (and all passing) if the filter is correct on every example.
+        """
+        results: list[ExampleResult] = []
+        failures = 0
+        for example in task.examples:
+            exec_result = self.executor.run(filter_code, example.input_data)
+            results.append(self._diagnose(exec_result, example.expected_output))
+            failures += results[-1].score < 1.0
+            if failures >= limit:
+                break
+        return results
+
+    async def find_counterexamples_async(
+        self, task: Task, filter_code: str, limit: int = 1
+    ) -> list[ExampleResult]:
+        """
+        Async counterpart of find_counterexamples.
+
+        Examples run one after another (not concurrently) so that checking can
+        stop as soon as enough of them fail.
+
+        Args:
+            task: The task containing examples to check.
+            filter_code: The jq filter expression to check.
+            limit: Number of failing examples after which checking stops.
+
+        Returns:
+            Results for the examples that were run, in order.
+        """
+        results: list[ExampleResult] = []
+        failures = 0
+        for example in task.examples:
+            exec_result = await self.executor.run_async(filter_code, example.input_data)
+            results.append(self._diagnose(exec_result, example.expected_output))
+            failures += results[-1].score < 1.0
+            if failures >= limit:
+                break
+        return results
+
+    def screen(self, task: Task, filters: list[str]) -> list[str]:
+        """
+        Find the candidate filters that produce the expected output on every example.
+
+        Candidates are batch-evaluated: for each example, all surviving candidates
+        run inside a single jq process as '[(try [(f1)] catch null), ...]', so the
+        number of jq spawns scales with the number of examples rather than with the
+        number of candidates. Candidates that fail an example are dropped before
+        the next one. If a batch fails as a whole (a syntax error in one candidate,
+        a timeout or the output limit), the example is re-checked per candidate.
+
+        Args:
+            task: The task containing examples to check against.
+            filters: Candidate jq filters, in order of preference.
+
+        Returns:
+            The filters that match every example exactly, in their original order.
+        """
+        survivors = list(dict.fromkeys(filters))
+
+        for example in task.examples:
+            if not survivors:
+                break
+
+            outputs = self._run_batch(survivors, example.input_data)
+            if outputs is None:
+                outputs = [self._run_single(f, example.input_data) for f in survivors]
+
+            with phase(ANALYZE):
+                survivors = [
+                    f
+                    for f, actual in zip(survivors, outputs, strict=True)
+                    if actual is not _PARSE_ERROR
+                    and self._analyze(actual, example.expected_output)[0] >= 1.0
+                ]
+
+        logger.debug(
+            "Screened %d candidates against task '%s': %d passed",
+            len(filters),
+            task.id,
+            len(survivors),
+        )
+        return survivors
+
+    def _run_batch(self, filters: list[str], input_data: Any) -> list[Any] | None:
+        """
+        Run several filters on one input in a single jq process.
+
+        Args:
+            filters: The jq filters to run.
+            input_data: The JSON input passed to every filter.
+
+        Returns:
+            One parsed output per filter (or the _PARSE_ERROR sentinel when that
+            filter errored or produced nothing), or None if the batch itself failed.
+        """
+        program = "[" + ", ".join(f"(try [({f})] catch null)" for f in filters) + "]"
+        exec_result = self.executor.run(program, input_data)
+        if not exec_result.is_success:
+            return None
+
+        try:
+            with phase(PARSE):
+                batch = json.loads(exec_result.stdout)
+        except json.JSONDecodeError:
+            return None
+
+        if not isinstance(batch, list) or len(batch) != len(filters):
+            return None
+
+        outputs: list[Any] = []
+        for values in batch:
+            if not values:
+                # Error (null) or no output at all (empty list)
+                outputs.append(_PARSE_ERROR)
+            elif len(values) == 1:
+                outputs.append(values[0])
+            else:
+                # Multiple outputs are compared as a list, like _parse_jq_output
+                outputs.append(values)
+        return outputs
+
+    def _run_single(self, filter_code: str, input_data: Any) -> Any:
+        """Run one filter and parse its output (or return _PARSE_ERROR)."""
+        exec_result = self.executor.run(filter_code, input_data)
+        if not exec_result.is_success:
+            return _PARSE_ERROR
+        with phase(PARSE):
+            return self._parse_jq_output(exec_result.stdout)
+
     def _diagnose(self, exec_result: ExecutionResult, expected: Any) -> ExampleResult:
         """
         Diagnose a single execution result against expected output.
@@ -143,7 +346,8 @@ class AlgorithmicReviewer:
             )
 
         # Try to parse the output as JSON
-        actual = self._parse_jq_output(exec_result.stdout)
+        with phase(PARSE):
+            actual = self._parse_jq_output(exec_result.stdout)
 
         if actual is _PARSE_ERROR:
             return ExampleResult(
@@ -155,7 +359,8 @@ class AlgorithmicReviewer:
             )
 
         # Analyze the parsed output against expected
-        score, error_type, feedback = self._analyze(actual, expected)
+        with phase(ANALYZE):
+            score, error_type, feedback = self._analyze(actual, expected)
 
         return ExampleResult(
             score=score,
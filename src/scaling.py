@@ -0,0 +1,303 @@
+"""
+Performance review of passing filters on synthetically scaled inputs.
+
+A filter can pass a task's small examples and still be quadratic (e.g. an
+index or select over the whole input inside map) and blow the timeout on
+production-size data. ScalingReviewer grows an example input by replicating
+its array elements, runs the filter with jq at two array lengths and fits
+how its run time and output size grow with the length. jq's startup and
+input parsing are measured with the `empty` filter on the same input and
+subtracted, so only the filter's own work counts. Filters growing faster
+than the policy's exponent, or timing out, are flagged as superlinear; the
+orchestrator penalizes their score and shows the measurements to the
+generator, asking for a filter that scales linearly.
+"""
+
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from src.domain import ExecutionResult, ScalingResult, Task
+from src.executor import JQExecutor
+from src.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Measured cost below which a filter's own run time is taken as noise
+MIN_COST_SEC = 0.001
+
+
+@dataclass(frozen=True)
+class ScalingPolicy:
+    """
+    How filters are scaled up and when they are flagged.
+
+    Attributes:
+        sizes: Array lengths the inputs are grown to (smaller, larger).
+        max_exponent: Largest growth exponent of run time or output size
+            still accepted (1.0 is linear).
+        min_seconds: The filter's own time at the larger size below which
+            run time is not fitted (too small to measure reliably).
+        repeats: jq runs per measurement; the fastest counts.
+        max_examples: Largest example inputs measured; the worst counts.
+        penalty: Fraction of the score taken off superlinear attempts.
+    """
+
+    sizes: tuple[int, int] = (200, 800)
+    max_exponent: float = 1.5
+    min_seconds: float = 0.02
+    repeats: int = 3
+    max_examples: int = 2
+    penalty: float = 0.1
+
+
+def scale_input(value: Any, length: int) -> Any:
+    """
+    Grow a JSON value by replicating array elements.
+
+    Every non-empty array that is not inside another array is resized to
+    length elements by repeating its elements in order. Arrays inside arrays
+    are copied along with their element, so the input grows linearly with
+    length.
+
+    Args:
+        value: The JSON value.
+        length: Target length of its arrays.
+
+    Returns:
+        The scaled value.
+
+    Examples:
+        >>> scale_input({"a": [1, 2], "b": {"c": [[3]]}}, 3)
+        {'a': [1, 2, 1], 'b': {'c': [[3], [3], [3]]}}
+    """
+    if isinstance(value, list):
+        return [value[i % len(value)] for i in range(length)] if value else value
+    if isinstance(value, dict):
+        return {key: scale_input(item, length) for key, item in value.items()}
+    return value
+
+
+def _has_array(value: Any) -> bool:
+    """Whether scale_input would grow the value."""
+    if isinstance(value, list):
+        return bool(value)
+    if isinstance(value, dict):
+        return any(_has_array(item) for item in value.values())
+    return False
+
+
+def scalable_inputs(task: Task) -> list[Any]:
+    """
+    The task's example inputs that scale_input grows, largest first.
+
+    Args:
+        task: The task whose example inputs are considered.
+
+    Returns:
+        Inputs containing a non-empty array, by decreasing JSON size.
+    """
+    inputs = [e.input_data for e in task.examples if _has_array(e.input_data)]
+    inputs.sort(key=lambda value: len(json.dumps(value)), reverse=True)
+    return inputs
+
+
+def growth_exponent(small: float, large: float, ratio: float) -> float:
+    """
+    Exponent k with large = small * ratio**k.
+
+    Examples:
+        >>> growth_exponent(1.0, 16.0, 4.0)
+        2.0
+    """
+    return math.log(large / small) / math.log(ratio)
+
+
+class FilterTimer:
+    """
+    Times jq runs of filters by wall clock.
+
+    Shared by ScalingReviewer and the optimizer, so both measure filters the
+    same way (and tests can replace it with a fake clock).
+
+    Attributes:
+        executor: Runs jq.
+    """
+
+    def __init__(self, executor: JQExecutor) -> None:
+        self.executor = executor
+
+    def time(self, filter_code: str, input_bytes: bytes) -> tuple[float, ExecutionResult]:
+        """Run a filter once; return its wall-clock time and result."""
+        start = time.perf_counter()
+        result = self.executor.run_raw(filter_code, input_bytes)
+        return time.perf_counter() - start, result
+
+    def fastest(self, filter_code: str, input_bytes: bytes, runs: int) -> float:
+        """Fastest wall-clock time of some runs (infinite for none)."""
+        return min((self.time(filter_code, input_bytes)[0] for _ in range(runs)), default=math.inf)
+
+
+class ScalingReviewer:
+    """
+    Measures how passing filters scale on grown example inputs.
+
+    Attributes:
+        executor: Runs jq; its timeout bounds each scaled run.
+        policy: Sizes, thresholds and penalty.
+        timer: Times the scaled runs.
+    """
+
+    def __init__(self, executor: JQExecutor, policy: ScalingPolicy | None = None) -> None:
+        """
+        Initialize the reviewer.
+
+        Args:
+            executor: Executor for the jq runs.
+            policy: Scaling policy. Defaults to ScalingPolicy().
+        """
+        self.executor = executor
+        self.policy = policy or ScalingPolicy()
+        self.timer = FilterTimer(executor)
+
+    def measure(self, task: Task, filter_code: str) -> ScalingResult | None:
+        """
+        Measure a filter's growth on the task's largest example inputs.
+
+        Args:
+            task: The task whose examples are scaled.
+            filter_code: A filter passing the examples.
+
+        Returns:
+            The worst measurement, or None if no example input has an array
+            to grow or the filter fails on every scaled input (e.g. output
+            over the executor's limit).
+        """
+        inputs = scalable_inputs(task)
+        with span("ScalingReviewer.measure", task_id=task.id):
+            results = [
+                result
+                for value in inputs[: self.policy.max_examples]
+                if (result := self._measure_input(filter_code, value)) is not None
+            ]
+        if not results:
+            return None
+        worst = max(
+            results,
+            key=lambda r: (
+                r.timed_out,
+                r.superlinear,
+                r.time_exponent or 0,
+                r.output_exponent or 0,
+            ),
+        )
+        logger.info(
+            "Scaling of '%s': time exponent %s, output exponent %s%s",
+            filter_code,
+            _format_exponent(worst.time_exponent),
+            _format_exponent(worst.output_exponent),
+            " (superlinear)" if worst.superlinear else "",
+        )
+        return worst
+
+    def _measure_input(self, filter_code: str, value: Any) -> ScalingResult | None:
+        """Measure the filter on one input grown to both sizes."""
+        policy = self.policy
+        sizes = policy.sizes
+        ratio = sizes[1] / sizes[0]
+        small = json.dumps(scale_input(value, sizes[0])).encode("utf-8")
+        large = json.dumps(scale_input(value, sizes[1])).encode("utf-8")
+
+        # One run at the larger size settles most filters: fast enough not
+        # to fit the run time, or timed out
+        large_seconds, large_result = self.timer.time(filter_code, large)
+        if large_result.is_timeout:
+            return self._result(sizes, (0.0, large_seconds), (0, 0), None, None, timed_out_at=1)
+        small_seconds, small_result = self.timer.time(filter_code, small)
+        if small_result.is_timeout:
+            return self._result(sizes, (small_seconds, 0.0), (0, 0), None, None, timed_out_at=0)
+        if not (small_result.is_success and large_result.is_success):
+            logger.debug("Scaled run of '%s' failed; not measured", filter_code)
+            return None
+
+        output_bytes = (len(small_result.stdout.encode()), len(large_result.stdout.encode()))
+        output_exponent = (
+            growth_exponent(output_bytes[0], output_bytes[1], ratio) if all(output_bytes) else None
+        )
+        time_exponent = None
+        if large_seconds >= policy.min_seconds:
+            # Each filter run so far counts as one of the repeats
+            runs = policy.repeats - 1
+            small_seconds = min(small_seconds, self.timer.fastest(filter_code, small, runs))
+            large_seconds = min(large_seconds, self.timer.fastest(filter_code, large, runs))
+            costs = (
+                max(
+                    small_seconds - self.timer.fastest("empty", small, policy.repeats), MIN_COST_SEC
+                ),
+                large_seconds - self.timer.fastest("empty", large, policy.repeats),
+            )
+            if costs[1] >= policy.min_seconds:
+                time_exponent = growth_exponent(costs[0], costs[1], ratio)
+        return self._result(
+            sizes, (small_seconds, large_seconds), output_bytes, time_exponent, output_exponent
+        )
+
+    def _result(
+        self,
+        sizes: tuple[int, int],
+        seconds: tuple[float, float],
+        output_bytes: tuple[int, int],
+        time_exponent: float | None,
+        output_exponent: float | None,
+        *,
+        timed_out_at: int | None = None,
+    ) -> ScalingResult:
+        """
+        Judge a measurement against the policy and describe it for the LLM.
+
+        timed_out_at is the index of the size jq timed out at, if it did.
+        """
+        limit = self.policy.max_exponent
+        slow_time = time_exponent is not None and time_exponent > limit
+        slow_output = output_exponent is not None and output_exponent > limit
+        problems: list[str] = []
+        if timed_out_at is not None:
+            problems.append(
+                f"it timed out after {self.executor.timeout_sec:g}s at n={sizes[timed_out_at]}"
+            )
+        if slow_time:
+            problems.append(
+                f"its run time grows like n^{time_exponent:.1f} "
+                f"({seconds[0]:.3f}s at n={sizes[0]}, {seconds[1]:.3f}s at n={sizes[1]})"
+            )
+        if slow_output:
+            problems.append(
+                f"its output grows like n^{output_exponent:.1f} "
+                f"({output_bytes[0]:,} bytes at n={sizes[0]}, "
+                f"{output_bytes[1]:,} bytes at n={sizes[1]})"
+            )
+        feedback = ""
+        if problems:
+            feedback = (
+                "Correct on every example, but too slow on large inputs: when the input "
+                "arrays are grown to n elements, " + " and ".join(problems) + ". Rewrite it "
+                "so its work grows linearly with the input, e.g. without scanning the whole "
+                "input again for each element (index, select or any over . inside map)."
+            )
+        return ScalingResult(
+            sizes=sizes,
+            seconds=seconds,
+            output_bytes=output_bytes,
+            time_exponent=time_exponent,
+            output_exponent=output_exponent,
+            timed_out=timed_out_at is not None,
+            superlinear=bool(problems),
+            feedback=feedback,
+        )
+
+
+def _format_exponent(exponent: float | None) -> str:
+    return "-" if exponent is None else f"{exponent:.2f}"
@@ -0,0 +1,771 @@
+"""
+Long-running local synthesis service.
+
+This module provides SynthesisService, which keeps one jq executor, one
+generator (with its pooled provider connections and response cache) and the
+deterministic matchers warm across requests, queues submitted tasks by
+priority and solves a bounded number of them at a time on a background
+event loop; and SynthesisServer, which exposes the service as an HTTP/JSON
+API on localhost:
+
+    POST   /jobs              submit {"task": {...}, "priority": 0, "max_iters": 10}
+    GET    /jobs              list all jobs
+    GET    /jobs/{id}         status and result of one job (410 once evicted)
+    GET    /jobs/{id}/events  progress as server-sent events
+    DELETE /jobs/{id}         cancel a queued or running job
+    GET    /health            liveness and queue depth
+    GET    /metrics           Prometheus metrics, if recording is installed
+
+Start it with `jq-synth serve`; `--mock` answers from an in-process mock LLM
+server instead of a real provider.
+
+Finished jobs are kept for a limited time and number only: the oldest are
+evicted once more than max_finished have finished or when they are older
+than finished_ttl_sec, so a long-running service does not grow without
+bound.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import urlsplit
+
+from src.domain import Attempt, Example, Solution, Task
+from src.generator import JQGenerator
+from src.matcher import StructuralMatcher
+from src.metrics import CONTENT_TYPE, get_metrics
+from src.orchestrator import Orchestrator
+from src.reviewer import AlgorithmicReviewer
+from src.templates import TemplateLibrary
+
+logger = logging.getLogger(__name__)
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+SOLVED = "solved"
+FAILED = "failed"
+ERROR = "error"
+CANCELLED = "cancelled"
+TERMINAL = (SOLVED, FAILED, ERROR, CANCELLED)
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUE = 100
+DEFAULT_MAX_FINISHED = 1000
+DEFAULT_FINISHED_TTL_SEC = 3600.0
+
+# IDs of evicted jobs remembered to answer 410 rather than 404
+_MAX_EVICTED_IDS = 10_000
+
+# Idle time after which an event stream sends a keep-alive comment
+_KEEPALIVE_SEC = 15.0
+
+# How often the serve loop checks for stop()
+_POLL_INTERVAL_SEC = 0.05
+
+_JOB_PATH = re.compile(r"^/jobs/([\w-]+)(/events)?$")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at its limit."""
+
+
+@dataclass(frozen=True)
+class JobEvent:
+    """
+    One progress event of a job.
+
+    Attributes:
+        id: Position in the job's event list (the SSE event ID).
+        name: 'queued', 'started', 'attempt' or the final status.
+        data: JSON-serializable payload.
+    """
+
+    id: int
+    name: str
+    data: dict[str, Any]
+
+
+@dataclass
+class Job:
+    """
+    A submitted task and its progress.
+
+    Attributes:
+        id: Job ID.
+        task: The task to solve.
+        priority: Higher priorities are started first; ties in submission order.
+        max_iterations: Iteration limit of the solve.
+        status: One of QUEUED, RUNNING or the TERMINAL statuses.
+        submitted_at: Submission time (seconds since the epoch).
+        started_at: When a worker picked the job up, or None.
+        finished_at: When the job reached a final status, or None.
+        solution: The result once solved or failed.
+        error: Error message if the solve raised.
+        events: Progress events so far, in order.
+        cancel_requested: Whether cancel() interrupted the running solve.
+    """
+
+    id: str
+    task: Task
+    priority: int
+    max_iterations: int
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    solution: Solution | None = None
+    error: str | None = None
+    events: list[JobEvent] = field(default_factory=list)
+    cancel_requested: bool = False
+    _solving: "asyncio.Task[Solution] | None" = field(default=None, repr=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        """The job's status and result as JSON-serializable data."""
+        queue_end = self.started_at or self.finished_at
+        run_end = self.finished_at or time.time()
+        result = None
+        if self.solution is not None:
+            result = {
+                "success": self.solution.success,
+                "filter": self.solution.best_filter,
+                "score": self.solution.best_score,
+                "iterations": self.solution.iterations_used,
+            }
+        return {
+            "id": self.id,
+            "task_id": self.task.id,
+            "status": self.status,
+            "priority": self.priority,
+            "max_iterations": self.max_iterations,
+            "submitted_at": self.submitted_at,
+            "queue_sec": None if queue_end is None else round(queue_end - self.submitted_at, 3),
+            "run_sec": None if self.started_at is None else round(run_end - self.started_at, 3),
+            "result": result,
+            "error": self.error,
+        }
+
+
+def parse_task(data: Any, default_id: str) -> Task:
+    """
+    Build a task from its JSON form (as in the tasks file).
+
+    Args:
+        data: {"id": ..., "description": ..., "examples": [{"input": ...,
+            "expected_output": ...}, ...]}; the ID is optional.
+        default_id: ID used if the task has none.
+
+    Returns:
+        The parsed Task.
+
+    Raises:
+        ValueError: If a field is missing or has the wrong type.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("'task' must be an object")
+    description = data.get("description")
+    if not isinstance(description, str):
+        raise ValueError("'task.description' must be a string")
+    examples = data.get("examples")
+    if not isinstance(examples, list) or not examples:
+        raise ValueError("'task.examples' must be a non-empty list")
+    parsed: list[Example] = []
+    for example in examples:
+        if not isinstance(example, dict) or not {"input", "expected_output"} <= example.keys():
+            raise ValueError("Each example needs 'input' and 'expected_output'")
+        parsed.append(Example(example["input"], example["expected_output"]))
+    return Task(id=str(data.get("id") or default_id), description=description, examples=parsed)
+
+
+class SynthesisService:
+    """
+    Solves queued tasks with shared, warm components.
+
+    Jobs run on an event loop in a background thread via
+    Orchestrator.solve_async, so LLM requests and jq runs of concurrent jobs
+    interleave and the generator's pooled async connections stay open between
+    jobs. Methods other than those of the workers are thread-safe.
+
+    Attributes:
+        generator: Generator shared by all jobs.
+        reviewer: Reviewer (and its jq executor) shared by all jobs.
+        matcher: Optional structural matcher tried before the LLM.
+        templates: Optional template library tried before the LLM.
+        workers: Number of jobs solved at the same time.
+        max_queue: Number of queued (not yet started) jobs accepted.
+        max_iterations: Default and upper limit of a job's iterations.
+        max_finished: Finished jobs kept before the oldest are evicted.
+        finished_ttl_sec: Age after which finished jobs are evicted, or None.
+        jobs: Current and retained finished jobs by ID, in submission order.
+    """
+
+    def __init__(
+        self,
+        generator: JQGenerator,
+        reviewer: AlgorithmicReviewer,
+        *,
+        matcher: StructuralMatcher | None = None,
+        templates: TemplateLibrary | None = None,
+        workers: int = DEFAULT_WORKERS,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_iterations: int = 10,
+        max_finished: int = DEFAULT_MAX_FINISHED,
+        finished_ttl_sec: float | None = DEFAULT_FINISHED_TTL_SEC,
+    ) -> None:
+        """
+        Initialize the service (call start() before submitting).
+
+        Args:
+            generator: Generator shared by all jobs. Its connections are
+                closed by stop().
+            reviewer: Reviewer shared by all jobs.
+            matcher: Optional structural matcher tried before the LLM.
+            templates: Optional template library tried before the LLM.
+            workers: Number of jobs solved at the same time.
+            max_queue: Number of queued jobs accepted before submit() refuses.
+            max_iterations: Default and upper limit of a job's iterations.
+            max_finished: Finished (solved, failed, errored or cancelled)
+                jobs kept; the oldest are evicted beyond it.
+            finished_ttl_sec: Seconds a finished job is kept, or None to
+                keep it until max_finished evicts it.
+
+        Raises:
+            ValueError: If workers, max_queue or max_iterations is not
+                positive, max_finished is negative or finished_ttl_sec is
+                not positive.
+        """
+        if min(workers, max_queue, max_iterations) < 1:
+            raise ValueError("workers, max_queue and max_iterations must be at least 1")
+        if max_finished < 0 or (finished_ttl_sec is not None and not finished_ttl_sec > 0):
+            raise ValueError("max_finished must be at least 0 and finished_ttl_sec positive")
+        self.generator = generator
+        self.reviewer = reviewer
+        self.matcher = matcher
+        self.templates = templates
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_iterations = max_iterations
+        self.max_finished = max_finished
+        self.finished_ttl_sec = finished_ttl_sec
+        self.jobs: dict[str, Job] = {}
+        # Finished job IDs in the order they finished, and evicted ones
+        self._finished: OrderedDict[str, None] = OrderedDict()
+        self._evicted: OrderedDict[str, None] = OrderedDict()
+        self._changed = threading.Condition()
+        self._sequence = itertools.count()
+        self._stopped = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._queue: asyncio.PriorityQueue[tuple[int, int, str]] | None = None
+        self._workers: list[asyncio.Task[None]] = []
+
+    def start(self) -> "SynthesisService":
+        """
+        Start the event loop thread and the workers.
+
+        Returns:
+            The service, for chaining.
+        """
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        self._thread = threading.Thread(target=loop.run_forever, name="synth-service", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start_workers(), loop).result()
+        return self
+
+    async def _start_workers(self) -> None:
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def stop(self) -> None:
+        """Cancel running jobs, close the generator's connections and stop the loop."""
+        with self._changed:
+            self._stopped = True
+            self._changed.notify_all()
+        if self._loop is None or self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+
+    async def _shutdown(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await self.generator.aclose()
+
+    def __enter__(self) -> "SynthesisService":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def submit(self, task: Task, priority: int = 0, max_iterations: int | None = None) -> Job:
+        """
+        Queue a task.
+
+        Args:
+            task: The task to solve.
+            priority: Higher priorities are started first.
+            max_iterations: Iteration limit, capped at the service's
+                max_iterations (the default).
+
+        Returns:
+            The queued job.
+
+        Raises:
+            ValueError: If max_iterations is not positive.
+            QueueFullError: If max_queue jobs are already waiting.
+            RuntimeError: If the service is not running.
+        """
+        loop, queue = self._loop, self._queue
+        if loop is None or queue is None or self._stopped:
+            raise RuntimeError("The service is not running")
+        limit = self.max_iterations if max_iterations is None else max_iterations
+        if limit < 1:
+            raise ValueError("max_iterations must be at least 1")
+        with self._changed:
+            self._prune()
+            if self.queued() >= self.max_queue:
+                raise QueueFullError(f"The queue is full ({self.max_queue} jobs waiting)")
+            job = Job(
+                id=uuid.uuid4().hex[:12],
+                task=task,
+                priority=priority,
+                max_iterations=min(limit, self.max_iterations),
+            )
+            self.jobs[job.id] = job
+            self._event(job, QUEUED, {"task_id": task.id, "priority": priority})
+        loop.call_soon_threadsafe(queue.put_nowait, (-priority, next(self._sequence), job.id))
+        logger.info("Queued job %s (task '%s', priority %d)", job.id, task.id, priority)
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        """
+        Cancel a job.
+
+        Queued jobs are cancelled at once; running jobs are interrupted at
+        their next await (LLM request or jq run). Finished jobs are unchanged.
+
+        Args:
+            job_id: The job's ID.
+
+        Returns:
+            The job.
+
+        Raises:
+            KeyError: If there is no such job.
+        """
+        with self._changed:
+            job = self.jobs[job_id]
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED)
+            elif job.status == RUNNING and job._solving is not None and self._loop is not None:
+                job.cancel_requested = True
+                self._loop.call_soon_threadsafe(job._solving.cancel)
+        return job
+
+    def evicted(self, job_id: str) -> bool:
+        """
+        Whether a job finished and was evicted.
+
+        Args:
+            job_id: The job's ID.
+
+        Returns:
+            True if the job existed but is no longer kept (as far as the
+            last _MAX_EVICTED_IDS evictions go).
+        """
+        with self._changed:
+            self._prune()
+            return job_id in self._evicted
+
+    def prune(self) -> None:
+        """Evict finished jobs beyond max_finished or older than finished_ttl_sec."""
+        with self._changed:
+            self._prune()
+
+    def queued(self) -> int:
+        """Number of jobs waiting for a worker."""
+        with self._changed:
+            return sum(job.status == QUEUED for job in self.jobs.values())
+
+    def running(self) -> int:
+        """Number of jobs being solved."""
+        with self._changed:
+            return sum(job.status == RUNNING for job in self.jobs.values())
+
+    def events(self, job_id: str, start: int = 0, timeout: float | None = None) -> list[JobEvent]:
+        """
+        Wait for events of a job.
+
+        Args:
+            job_id: The job's ID.
+            start: Index of the first event wanted.
+            timeout: Seconds to wait for one; None waits until there is one
+                or the service stops.
+
+        Returns:
+            The job's events from start on; empty after a timeout or stop().
+
+        Raises:
+            KeyError: If there is no such job.
+        """
+        with self._changed:
+            return self.wait_events(self.jobs[job_id], start, timeout)
+
+    def wait_events(self, job: Job, start: int = 0, timeout: float | None = None) -> list[JobEvent]:
+        """
+        Wait for events of a job already looked up.
+
+        Unlike events(), this keeps working once the job has been evicted,
+        so a follower does not miss its final event.
+
+        Args:
+            job: The job.
+            start: Index of the first event wanted.
+            timeout: Seconds to wait for one; None waits until there is one
+                or the service stops.
+
+        Returns:
+            The job's events from start on; empty after a timeout or stop().
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: len(job.events) > start or self._stopped, timeout)
+            return job.events[start:]
+
+    def follow(self, job_id: str, start: int = 0) -> Iterator[JobEvent]:
+        """
+        Yield a job's events as they happen, up to its final event.
+
+        Args:
+            job_id: The job's ID.
+            start: Index of the first event wanted.
+
+        Yields:
+            Events in order; ends after the final one or on stop().
+
+        Raises:
+            KeyError: If there is no such job.
+        """
+        with self._changed:
+            job = self.jobs[job_id]
+        while True:
+            events = self.wait_events(job, start)
+            if not events:
+                return
+            yield from events
+            if events[-1].name in TERMINAL:
+                return
+            start = events[-1].id + 1
+
+    def _event(self, job: Job, name: str, data: dict[str, Any]) -> None:
+        """Append an event and wake up waiting streams (caller holds the lock)."""
+        job.events.append(JobEvent(len(job.events), name, data))
+        self._changed.notify_all()
+
+    def _finish(self, job: Job, status: str) -> None:
+        """Move a job to a final status (caller holds the lock)."""
+        job.status = status
+        job.finished_at = time.time()
+        job._solving = None
+        self._event(job, status, job.to_dict())
+        logger.info("Job %s %s", job.id, status)
+        self._finished[job.id] = None
+        self._prune()
+
+    def _prune(self) -> None:
+        """Evict the oldest finished jobs beyond the limits (caller holds the lock)."""
+        now = time.time()
+        ttl = self.finished_ttl_sec
+        while self._finished:
+            oldest = self.jobs[next(iter(self._finished))]
+            expired = ttl is not None and now - (oldest.finished_at or now) > ttl
+            if not expired and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[oldest.id]
+            del self.jobs[oldest.id]
+            self._evicted[oldest.id] = None
+            if len(self._evicted) > _MAX_EVICTED_IDS:
+                self._evicted.popitem(last=False)
+            logger.debug("Evicted finished job %s", oldest.id)
+
+    async def _work(self) -> None:
+        """Worker: take the highest-priority job and solve it, forever."""
+        assert self._queue is not None
+        while True:
+            _, _, job_id = await self._queue.get()
+            with self._changed:
+                job = self.jobs.get(job_id)
+                if job is None or job.status != QUEUED:  # cancelled (and evicted) while waiting
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+                job._solving = asyncio.ensure_future(self._solve(job))
+                queue_sec = round(job.started_at - job.submitted_at, 3)
+                self._event(job, "started", {"queue_sec": queue_sec})
+            solving = job._solving
+            try:
+                solution = await solving
+            except asyncio.CancelledError:
+                with self._changed:
+                    self._finish(job, CANCELLED)
+                if not job.cancel_requested:
+                    raise  # the service is stopping
+                continue
+            except Exception as e:
+                logger.exception("Job %s failed", job.id)
+                with self._changed:
+                    job.error = f"{type(e).__name__}: {e}"
+                    self._finish(job, ERROR)
+                continue
+            with self._changed:
+                job.solution = solution
+                self._finish(job, SOLVED if solution.success else FAILED)
+
+    async def _solve(self, job: Job) -> Solution:
+        def on_attempt(task: Task, attempt: Attempt) -> None:
+            data = {
+                "iteration": attempt.iteration,
+                "filter": attempt.filter_code,
+                "score": attempt.aggregated_score,
+                "error_type": attempt.primary_error.value,
+            }
+            with self._changed:
+                self._event(job, "attempt", data)
+
+        orchestrator = Orchestrator(
+            self.generator,
+            self.reviewer,
+            max_iterations=job.max_iterations,
+            matcher=self.matcher,
+            templates=self.templates,
+            on_attempt=on_attempt,
+        )
+        return await orchestrator.solve_async(job.task)
+
+
+class SynthesisServer:
+    """
+    HTTP/JSON API of a SynthesisService (see the module docstring).
+
+    Attributes:
+        service: The service behind the API.
+    """
+
+    def __init__(self, service: SynthesisService, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        Create the server and bind its socket (call start() or serve_forever()).
+
+        Args:
+            service: The (started) service behind the API.
+            host: Interface to listen on.
+            port: Port to listen on; 0 picks a free one.
+
+        Raises:
+            OSError: If the socket cannot be bound.
+        """
+        self.service = service
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(service))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+        self._serving = False
+
+    @property
+    def url(self) -> str:
+        """Base URL of the API, e.g. 'http://127.0.0.1:8765'."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> "SynthesisServer":
+        """
+        Serve requests on a background thread.
+
+        Returns:
+            The server, for chaining.
+        """
+        self._serving = True
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            kwargs={"poll_interval": _POLL_INTERVAL_SEC},
+            name="synth-server",
+            daemon=True,
+        )
+        self._thread.start()
+        logger.info("Synthesis service listening on %s", self.url)
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until stop() or KeyboardInterrupt."""
+        self._serving = True
+        self._httpd.serve_forever(poll_interval=_POLL_INTERVAL_SEC)
+
+    def stop(self) -> None:
+        """Stop serving and close the socket (the service keeps running)."""
+        # shutdown() waits for the serve loop, so it must not be called if none ran
+        if self._serving:
+            self._httpd.shutdown()
+            self._serving = False
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "SynthesisServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+
+def _make_handler(service: SynthesisService) -> type[BaseHTTPRequestHandler]:
+    """Build the request handler class bound to a service."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+        def do_GET(self) -> None:
+            path = urlsplit(self.path).path
+            match = _JOB_PATH.match(path)
+            metrics = get_metrics()
+            service.prune()
+            if path == "/health":
+                status = {"status": "ok", "queued": service.queued(), "running": service.running()}
+                self._send_json(200, status)
+            elif path == "/jobs":
+                with service._changed:
+                    jobs = [job.to_dict() for job in service.jobs.values()]
+                self._send_json(200, {"jobs": jobs})
+            elif path == "/metrics" and metrics is not None:
+                self._send(200, metrics.registry.render().encode(), CONTENT_TYPE)
+            elif match is None or match.group(1) not in service.jobs:
+                self._not_found(match is not None and service.evicted(match.group(1)))
+            elif match.group(2):
+                with service._changed:
+                    streamed = service.jobs.get(match.group(1))
+                if streamed is None:  # evicted since the check
+                    self._not_found(gone=True)
+                else:
+                    self._stream(streamed)
+            else:
+                with service._changed:
+                    job = service.jobs.get(match.group(1))
+                    data = None if job is None else job.to_dict()
+                if data is None:  # evicted since the check
+                    self._not_found(gone=True)
+                else:
+                    self._send_json(200, data)
+
+        def do_POST(self) -> None:
+            if urlsplit(self.path).path != "/jobs":
+                self._not_found()
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                request = json.loads(body)
+                if not isinstance(request, dict):
+                    raise ValueError("The body must be a JSON object")
+                priority = request.get("priority", 0)
+                max_iters = request.get("max_iters")
+                for name, value in (("priority", priority), ("max_iters", max_iters)):
+                    if value is not None and type(value) is not int:
+                        raise ValueError(f"'{name}' must be an integer")
+                task = parse_task(request.get("task"), default_id="job")
+                job = service.submit(task, priority, max_iters)
+            except ValueError as e:
+                self._send_json(400, {"error": {"message": str(e)}})
+            except QueueFullError as e:
+                self._send_json(503, {"error": {"message": str(e)}}, {"Retry-After": "1"})
+            else:
+                with service._changed:
+                    data = job.to_dict()
+                self._send_json(202, data, {"Location": f"/jobs/{job.id}"})
+
+        def do_DELETE(self) -> None:
+            match = _JOB_PATH.match(urlsplit(self.path).path)
+            service.prune()
+            if match is None or match.group(2) or match.group(1) not in service.jobs:
+                self._not_found(
+                    match is not None and not match.group(2) and service.evicted(match.group(1))
+                )
+                return
+            try:
+                job = service.cancel(match.group(1))
+            except KeyError:  # evicted since the check
+                self._not_found(gone=True)
+                return
+            with service._changed:
+                data = job.to_dict()
+            self._send_json(200 if data["status"] in TERMINAL else 202, data)
+
+        def _stream(self, job: Job) -> None:
+            # The end of the stream is signalled by closing the connection
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            last = self.headers.get("Last-Event-ID", "")
+            start = int(last) + 1 if last.isdigit() else 0
+            try:
+                while True:
+                    events = service.wait_events(job, start, timeout=_KEEPALIVE_SEC)
+                    if not events:
+                        if service._stopped:
+                            return
+                        self.wfile.write(b": keep-alive\n\n")
+                    for event in events:
+                        data = json.dumps(event.data)
+                        self.wfile.write(
+                            f"id: {event.id}\nevent: {event.name}\ndata: {data}\n\n".encode()
+                        )
+                    self.wfile.flush()
+                    if events and events[-1].name in TERMINAL:
+                        return
+                    start += len(events)
+            except (BrokenPipeError, ConnectionResetError):
+                logger.debug("Event stream of job %s closed by the client", job.id)
+
+        def _not_found(self, gone: bool = False) -> None:
+            if gone:
+                message = f"Expired: {self.path} finished and is no longer kept"
+                self._send_json(410, {"error": {"message": message}})
+            else:
+                self._send_json(404, {"error": {"message": f"Not found: {self.path}"}})
+
+        def _send(
+            self,
+            status: int,
+            body: bytes,
+            content_type: str,
+            headers: dict[str, str] | None = None,
+        ) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status: int, data: Any, headers: dict[str, str] | None = None) -> None:
+            self._send(status, json.dumps(data).encode(), "application/json", headers)
+
+    return Handler
@@ -0,0 +1,124 @@
+"""
+Store of synthesized filters by task ID.
+
+This module provides SolutionStore, a small JSON file mapping task IDs to
+the filters that solved them. The CLI adds solved tasks to it with
+`--save-solutions`, and `jq-synth apply --task ID` reads the filter back to
+run it over production data.
+"""
+
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.domain import Solution
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOLUTIONS_PATH = ".solutions.json"
+
+
+@dataclass(frozen=True)
+class StoredSolution:
+    """
+    A filter that solved a task.
+
+    Attributes:
+        task_id: The task's ID.
+        filter: The jq filter.
+        score: Its score on the task's examples.
+        iterations: Iterations it took to find.
+        saved_at: When it was stored (ISO 8601, UTC).
+    """
+
+    task_id: str
+    filter: str
+    score: float
+    iterations: int
+    saved_at: str
+
+
+class SolutionStore:
+    """
+    Filters by task ID, kept in a JSON file.
+
+    Attributes:
+        path: The store's file.
+        solutions: Stored solutions by task ID.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_SOLUTIONS_PATH) -> None:
+        """
+        Open a store, reading the file if it exists.
+
+        Args:
+            path: The store's file.
+
+        Raises:
+            ValueError: If the file exists but is not a valid store.
+            OSError: If the file cannot be read.
+        """
+        self.path = Path(path)
+        self.solutions: dict[str, StoredSolution] = {}
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            for task_id, entry in data["solutions"].items():
+                self.solutions[task_id] = StoredSolution(task_id=task_id, **entry)
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid solution store {self.path}: {e}") from e
+
+    def get(self, task_id: str) -> StoredSolution | None:
+        """Return the stored solution of a task, or None."""
+        return self.solutions.get(task_id)
+
+    def add(self, solution: Solution) -> StoredSolution:
+        """
+        Store a solution, replacing any earlier one of the same task.
+
+        Args:
+            solution: A successful solution.
+
+        Returns:
+            The stored entry.
+
+        Raises:
+            ValueError: If the solution was not successful.
+        """
+        if not solution.success:
+            raise ValueError(f"Task '{solution.task_id}' was not solved")
+        stored = StoredSolution(
+            task_id=solution.task_id,
+            filter=solution.best_filter,
+            score=solution.best_score,
+            iterations=solution.iterations_used,
+            saved_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        )
+        self.solutions[solution.task_id] = stored
+        return stored
+
+    def save(self) -> None:
+        """
+        Write the store, replacing the file atomically.
+
+        Raises:
+            OSError: If the file cannot be written.
+        """
+        entries = {}
+        for task_id, stored in sorted(self.solutions.items()):
+            entry = asdict(stored)
+            del entry["task_id"]
+            entries[task_id] = entry
+        temporary = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            temporary.write_text(
+                json.dumps({"solutions": entries}, indent=2) + "\n", encoding="utf-8"
+            )
+            temporary.replace(self.path)
+        finally:
+            temporary.unlink(missing_ok=True)
+        logger.debug("Saved %d solutions to %s", len(entries), self.path)
@@ -0,0 +1,384 @@
+"""
+Parameterized library of common jq idioms indexed by input/output shape.
+
+This module provides the TemplateLibrary class that instantiates recurring jq
+idioms (group-and-count, pivot {k,v} to object, flatten, dedupe-by-key, top-N,
+pluck, ...) with candidate field names pulled from task examples. Templates are
+indexed by the shape signatures of example inputs and outputs, so only the
+idioms that can possibly produce the expected output shape are tried.
+"""
+
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+from itertools import permutations
+from typing import Any
+
+from src.domain import Task
+
+logger = logging.getLogger(__name__)
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Signature of an empty array, compatible with every array<...> signature
+_EMPTY_ARRAY = "array"
+_ARRAY_SIGNATURES = ("array<object>", "array<array>", "array<scalar>", "array<mixed>")
+
+# Two-field templates pair only the most common fields: all ordered pairs of
+# a wide object would crowd out every other template
+_MAX_PAIR_FIELDS = 6
+
+
+def shape_signature(value: Any) -> str:
+    """
+    Classify a JSON value into a coarse shape signature.
+
+    Args:
+        value: Any JSON value.
+
+    Returns:
+        One of 'object', 'array' (empty), 'array<object>', 'array<array>',
+        'array<scalar>', 'array<mixed>', 'number', 'string', 'boolean' or 'null'.
+
+    Examples:
+        >>> shape_signature([{"a": 1}])
+        'array<object>'
+        >>> shape_signature([1, "x", None])
+        'array<scalar>'
+    """
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        if not value:
+            return _EMPTY_ARRAY
+        if all(isinstance(item, dict) for item in value):
+            return "array<object>"
+        if all(isinstance(item, list) for item in value):
+            return "array<array>"
+        if not any(isinstance(item, (dict, list)) for item in value):
+            return "array<scalar>"
+        return "array<mixed>"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return "null"
+
+
+@dataclass(frozen=True)
+class Template:
+    """
+    A parameterized jq idiom.
+
+    Placeholders in the pattern are substituted on instantiation:
+    - {{field}}, {{field2}}: distinct object keys found in the input array elements
+    - {{out_key}}: an object key of the expected output elements
+    - {{n}}: the length of the expected output array
+
+    Attributes:
+        name: Short identifier of the idiom.
+        pattern: jq filter with placeholders.
+        input_shapes: Input shape signatures the idiom applies to.
+        output_shapes: Output shape signatures the idiom can produce.
+    """
+
+    name: str
+    pattern: str
+    input_shapes: tuple[str, ...]
+    output_shapes: tuple[str, ...]
+
+    @property
+    def placeholders(self) -> set[str]:
+        """Names of the placeholders used by the pattern."""
+        return set(re.findall(r"\{\{(\w+)\}\}", self.pattern))
+
+
+_OBJECTS = ("array<object>",)
+_ARRAYS = _ARRAY_SIGNATURES
+_SCALAR_ARRAYS = ("array<scalar>", "array<mixed>")
+_NESTED = ("array<array>", "array<mixed>")
+
+DEFAULT_TEMPLATES: tuple[Template, ...] = (
+    # array of objects -> object
+    Template(
+        "group-count-object",
+        "reduce .[] as $x ({}; .[$x.{{field}} | tostring] += 1)",
+        _OBJECTS,
+        ("object",),
+    ),
+    Template(
+        "pivot-to-object",
+        "map({key: (.{{field}} | tostring), value: .{{field2}}}) | from_entries",
+        _OBJECTS,
+        ("object",),
+    ),
+    Template(
+        "index-by-key",
+        "map({key: (.{{field}} | tostring), value: .}) | from_entries",
+        _OBJECTS,
+        ("object",),
+    ),
+    Template(
+        "group-collect-object",
+        "reduce .[] as $x ({}; .[$x.{{field}} | tostring] += [$x.{{field2}}])",
+        _OBJECTS,
+        ("object",),
+    ),
+    # array of objects -> array of objects
+    Template(
+        "group-count-list",
+        'group_by(.{{field}}) | map({"{{field}}": .[0].{{field}}, "{{out_key}}": length})',
+        _OBJECTS,
+        ("array<object>",),
+    ),
+    Template("dedupe-by-key", "unique_by(.{{field}})", _OBJECTS, ("array<object>",)),
+    Template("sort-by-key", "sort_by(.{{field}})", _OBJECTS, ("array<object>",)),
+    Template(
+        "top-n-by-key",
+        "sort_by(.{{field}}) | reverse | .[:{{n}}]",
+        _OBJECTS,
+        ("array<object>",),
+    ),
+    Template(
+        "bottom-n-by-key",
+        "sort_by(.{{field}}) | .[:{{n}}]",
+        _OBJECTS,
+        ("array<object>",),
+    ),
+    Template("select-truthy", "map(select(.{{field}}))", _OBJECTS, ("array<object>",)),
+    Template("select-falsy", "map(select(.{{field}} | not))", _OBJECTS, ("array<object>",)),
+    # array of objects -> array of scalars
+    Template("pluck", "map(.{{field}})", _OBJECTS, _ARRAYS),
+    Template("pluck-present", "map(.{{field}} // empty)", _OBJECTS, _ARRAYS),
+    Template(
+        "pluck-has",
+        'map(select(has("{{field}}")) | .{{field}})',
+        _OBJECTS,
+        _ARRAYS,
+    ),
+    Template("pluck-unique", "map(.{{field}}) | unique", _OBJECTS, _ARRAYS),
+    Template(
+        "pluck-where",
+        "map(select(.{{field}}) | .{{field2}})",
+        _OBJECTS,
+        _ARRAYS,
+    ),
+    # array of objects -> number
+    Template("sum-field", "map(.{{field}}) | add", _OBJECTS, ("number",)),
+    Template("count-truthy", "map(select(.{{field}})) | length", _OBJECTS, ("number",)),
+    Template("count", "length", _ARRAYS, ("number",)),
+    # nested arrays -> flat arrays
+    Template("flatten", "flatten", _NESTED, _ARRAYS),
+    Template("concat", "add", _NESTED, _ARRAYS),
+    # arrays of scalars -> arrays
+    Template("dedupe", "unique", _SCALAR_ARRAYS, _ARRAYS),
+    Template("sort", "sort", _SCALAR_ARRAYS, _ARRAYS),
+    Template("reverse", "reverse", _ARRAYS, _ARRAYS),
+    Template("top-n", "sort | reverse | .[:{{n}}]", _SCALAR_ARRAYS, _ARRAYS),
+    Template("first-n", ".[:{{n}}]", _ARRAYS, _ARRAYS),
+    Template("numbers-only", "map(numbers)", _SCALAR_ARRAYS, _ARRAYS),
+    Template("strings-only", "map(strings)", _SCALAR_ARRAYS, _ARRAYS),
+    # arrays of scalars -> number
+    Template("sum-numbers", "map(numbers) | add", _SCALAR_ARRAYS, ("number",)),
+    Template("sum", "add", _SCALAR_ARRAYS, ("number", "string")),
+    Template("max", "max", _SCALAR_ARRAYS, ("number", "string")),
+    Template("min", "min", _SCALAR_ARRAYS, ("number", "string")),
+    # objects
+    Template("recursive-sum", "[.. | numbers] | add", ("object", *_ARRAYS), ("number",)),
+    Template("keys", "keys", ("object",), ("array<scalar>",)),
+    Template("values", "[.[]]", ("object",), _ARRAYS),
+)
+
+
+class TemplateLibrary:
+    """
+    Shape-indexed library of parameterized jq idioms.
+
+    Attributes:
+        templates: All templates in the library.
+        max_candidates: Upper bound on instantiated filters per task.
+    """
+
+    def __init__(
+        self,
+        templates: tuple[Template, ...] = DEFAULT_TEMPLATES,
+        max_candidates: int = 200,
+    ) -> None:
+        """
+        Initialize the template library.
+
+        Args:
+            templates: Templates to index. Defaults to DEFAULT_TEMPLATES.
+            max_candidates: Maximum number of filters returned by instantiate().
+                Defaults to 200.
+        """
+        self.templates = templates
+        self.max_candidates = max_candidates
+        self._index: dict[tuple[str, str], list[Template]] = {}
+
+        for template in templates:
+            for in_shape in template.input_shapes:
+                for out_shape in template.output_shapes:
+                    self._index.setdefault((in_shape, out_shape), []).append(template)
+
+        logger.debug(
+            "TemplateLibrary initialized: %d templates, %d shape signatures",
+            len(templates),
+            len(self._index),
+        )
+
+    def lookup(self, input_shape: str, output_shape: str) -> list[Template]:
+        """
+        Find templates applicable to the given shape signatures.
+
+        An empty array signature ('array') matches every array signature, and a
+        null output matches every output signature (idioms such as 'add' or a
+        missing field legitimately produce null).
+
+        Args:
+            input_shape: Shape signature of the example input.
+            output_shape: Shape signature of the expected output.
+
+        Returns:
+            Matching templates in library order, without duplicates.
+        """
+        in_shapes = _ARRAY_SIGNATURES if input_shape == _EMPTY_ARRAY else (input_shape,)
+        if output_shape == _EMPTY_ARRAY:
+            out_shapes: tuple[str, ...] = _ARRAY_SIGNATURES
+        elif output_shape == "null":
+            out_shapes = tuple({out for _, out in self._index})
+        else:
+            out_shapes = (output_shape,)
+
+        found: dict[str, Template] = {}
+        for in_shape in in_shapes:
+            for out_shape in out_shapes:
+                for template in self._index.get((in_shape, out_shape), []):
+                    found.setdefault(template.name, template)
+
+        order = {t.name: i for i, t in enumerate(self.templates)}
+        return sorted(found.values(), key=lambda t: order[t.name])
+
+    def instantiate(self, task: Task) -> list[str]:
+        """
+        Instantiate every applicable template for a task.
+
+        Templates are selected using the shape signatures of all examples (a
+        template must apply to each of them) and parameterized with field names
+        and lengths taken from the examples. When there are more than
+        max_candidates filters, the templates take turns contributing their
+        next parameterization, so every applicable idiom keeps its most likely
+        ones; the result stays in library order.
+
+        Args:
+            task: The task to generate candidate filters for.
+
+        Returns:
+            Distinct candidate jq filters, at most max_candidates of them.
+        """
+        if not task.examples:
+            return []
+
+        applicable: list[Template] | None = None
+        for example in task.examples:
+            templates = self.lookup(
+                shape_signature(example.input_data),
+                shape_signature(example.expected_output),
+            )
+            if applicable is None:
+                applicable = templates
+            else:
+                names = {t.name for t in templates}
+                applicable = [t for t in applicable if t.name in names]
+            if not applicable:
+                return []
+
+        params = _extract_params(task)
+        rendered = [_render(template, params) for template in applicable or []]
+
+        # Pick the kept filters round-robin, keyed by their position in library order
+        kept: dict[str, tuple[int, int]] = {}
+        for turn in range(max((len(r) for r in rendered), default=0)):
+            for position, filters in enumerate(rendered):
+                if len(kept) == self.max_candidates:
+                    break
+                if turn < len(filters):
+                    kept.setdefault(filters[turn], (position, turn))
+
+        logger.debug(
+            "Instantiated %d of %d template candidates for task '%s'",
+            len(kept),
+            sum(len(r) for r in rendered),
+            task.id,
+        )
+        return sorted(kept, key=kept.__getitem__)
+
+
+@dataclass(frozen=True)
+class _Params:
+    """Parameter values collected from task examples."""
+
+    fields: list[str]
+    out_keys: list[str]
+    lengths: list[int]
+
+
+def _extract_params(task: Task) -> _Params:
+    """Collect candidate field names and output lengths from task examples."""
+    field_counts: Counter[str] = Counter()
+    out_key_counts: Counter[str] = Counter()
+    lengths: list[int] = []
+
+    for example in task.examples:
+        if isinstance(example.input_data, list):
+            for item in example.input_data:
+                if isinstance(item, dict):
+                    field_counts.update(k for k in item if _IDENTIFIER.match(k))
+
+        output = example.expected_output
+        if isinstance(output, list):
+            if len(output) not in lengths:
+                lengths.append(len(output))
+            for item in output:
+                if isinstance(item, dict):
+                    out_key_counts.update(k for k in item if _IDENTIFIER.match(k))
+
+    # Most common first, ties broken alphabetically for determinism
+    def ranked(counts: Counter[str]) -> list[str]:
+        return [k for k, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))]
+
+    return _Params(fields=ranked(field_counts), out_keys=ranked(out_key_counts), lengths=lengths)
+
+
+def _render(template: Template, params: _Params) -> list[str]:
+    """Render all parameterizations of a template."""
+    used = template.placeholders
+    if not used:
+        return [template.pattern]
+
+    if "field2" in used:
+        field_choices = list(permutations(params.fields[:_MAX_PAIR_FIELDS], 2))
+    elif "field" in used:
+        field_choices = [(f, "") for f in params.fields]
+    else:
+        field_choices = [("", "")]
+
+    out_keys = params.out_keys if "out_key" in used else [""]
+    lengths = [str(n) for n in params.lengths] if "n" in used else [""]
+
+    rendered: list[str] = []
+    for field, field2 in field_choices:
+        for out_key in out_keys:
+            if "out_key" in used and out_key == field:
+                continue
+            for n in lengths:
+                rendered.append(
+                    template.pattern.replace("{{field}}", field)
+                    .replace("{{field2}}", field2)
+                    .replace("{{out_key}}", out_key)
+                    .replace("{{n}}", n)
+                )
+    return rendered
@@ -0,0 +1,135 @@
+"""
+Per-phase timing instrumentation.
+
+This module provides PhaseTimer and the phase() context manager used by the
+generator, reviewer and executor to attribute time to the phases of an
+iteration (prompt build, API call, extraction, jq execution, output parsing,
+analysis). Timers are activated with recording() and found through a
+context variable, so concurrent tasks on one event loop each record their
+own phases. When no timer is active, phase() returns a shared no-op context
+manager, so instrumentation costs one context variable lookup.
+"""
+
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from types import TracebackType
+
+# Phases of a refinement iteration, in pipeline order
+PROMPT_BUILD = "prompt_build"
+API_CALL = "api_call"
+EXTRACTION = "extraction"
+EXECUTION = "execution"
+PARSE = "parse"
+ANALYZE = "analyze"
+PHASES = (PROMPT_BUILD, API_CALL, EXTRACTION, EXECUTION, PARSE, ANALYZE)
+
+_NO_TIMING: AbstractContextManager[None] = nullcontext()
+
+
+class PhaseTimer:
+    """
+    Accumulated seconds per phase.
+
+    Timers nest: time added to a timer is also added to the timer that was
+    active when it started recording, so an iteration's timer and its task's
+    timer see the same measurements.
+
+    Attributes:
+        totals: Seconds per phase name.
+        parent: Enclosing timer, if any.
+    """
+
+    def __init__(self, parent: "PhaseTimer | None" = None) -> None:
+        """
+        Initialize an empty timer.
+
+        Args:
+            parent: Enclosing timer that also receives every measurement.
+        """
+        self.totals: dict[str, float] = {}
+        self.parent = parent
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add a measurement to this timer and its ancestors."""
+        timer: PhaseTimer | None = self
+        while timer is not None:
+            timer.totals[name] = timer.totals.get(name, 0.0) + seconds
+            timer = timer.parent
+
+    def snapshot(self) -> dict[str, float]:
+        """Copy of the totals, in PHASES order (other phases last)."""
+        ordered = {name: self.totals[name] for name in PHASES if name in self.totals}
+        ordered.update(self.totals)
+        return ordered
+
+
+_current: ContextVar[PhaseTimer | None] = ContextVar("phase_timer", default=None)
+
+
+class _Phase:
+    """Measures one interval with the monotonic clock."""
+
+    __slots__ = ("_name", "_start", "_timer")
+
+    def __init__(self, timer: PhaseTimer, name: str) -> None:
+        self._timer = timer
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._timer.add(self._name, time.perf_counter() - self._start)
+
+
+def phase(name: str) -> AbstractContextManager[None]:
+    """
+    Attribute the time spent in a with block to a phase.
+
+    Args:
+        name: The phase, normally one of PHASES.
+
+    Returns:
+        A context manager; a shared no-op when no timer is recording.
+    """
+    timer = _current.get()
+    if timer is None:
+        return _NO_TIMING
+    return _Phase(timer, name)
+
+
+def add_phase(name: str, seconds: float) -> None:
+    """
+    Attribute an interval that was already measured to a phase.
+
+    Args:
+        name: The phase, normally one of PHASES.
+        seconds: Duration of the interval.
+    """
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+@contextmanager
+def recording() -> Iterator[PhaseTimer]:
+    """
+    Record phases in a new timer for the duration of a with block.
+
+    Yields:
+        The timer, nested in the currently recording one (if any).
+    """
+    timer = PhaseTimer(parent=_current.get())
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
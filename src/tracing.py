@@ -0,0 +1,431 @@
+"""
+Span tracing of synthesis runs with file exporters.
+
+This module provides a small in-process tracer for deep dives into
+concurrency and tail latency. Spans are opened around Orchestrator.solve,
+each refinement iteration, JQGenerator.generate, every provider HTTP call
+and every JQExecutor.run, carrying the task ID, iteration, filter hash and
+cache-hit attributes. Finished spans are written to a local file, either as
+Chrome trace events (open in Perfetto or chrome://tracing) or as OTLP/JSON
+lines (the format of the OpenTelemetry collector's file exporter), so no
+collector service is needed.
+
+Tracing is off unless a Tracer is installed with set_tracer(); span() then
+returns a shared no-op span.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections.abc import Mapping
+from contextvars import ContextVar, Token
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+# Span kinds (OTLP numbering)
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+
+# Export formats
+CHROME = "chrome"
+OTLP = "otlp"
+FORMATS = (CHROME, OTLP)
+
+# Attributes copied from the parent span when a child does not set them
+_INHERITED_ATTRIBUTES = ("task_id", "iteration")
+
+SERVICE_NAME = "jq-synth"
+
+
+def filter_hash(filter_code: str) -> str:
+    """Short stable identifier of a filter, for span attributes."""
+    return hashlib.sha256(filter_code.encode("utf-8")).hexdigest()[:12]
+
+
+class Span:
+    """
+    A timed operation with attributes.
+
+    Attributes:
+        name: Operation name (e.g. 'JQExecutor.run').
+        trace_id: 128-bit ID shared by a root span and its descendants.
+        span_id: 64-bit ID of this span.
+        parent_id: span_id of the parent, or None for a root span.
+        kind: KIND_INTERNAL or KIND_CLIENT.
+        start_ns: Start time in nanoseconds since the epoch.
+        end_ns: End time, or None while the span is open.
+        attributes: Key/value annotations.
+        error: Description of the exception that ended the span, if any.
+        thread_id: Thread that started the span.
+    """
+
+    recording = True
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        parent: "Span | None",
+        kind: int,
+        attributes: Mapping[str, Any],
+    ) -> None:
+        self._tracer = tracer
+        self.name = name
+        self.parent_id: int | None = parent.span_id if parent is not None else None
+        self.trace_id: int = parent.trace_id if parent is not None else tracer.new_id(128)
+        self.span_id: int = tracer.new_id(64)
+        self.kind = kind
+        self.attributes: dict[str, Any] = {}
+        if parent is not None:
+            for key in _INHERITED_ATTRIBUTES:
+                if key in parent.attributes:
+                    self.attributes[key] = parent.attributes[key]
+        self.attributes.update(attributes)
+        self.error: str | None = None
+        self.thread_id = threading.get_ident()
+        self.start_ns = tracer.now_ns()
+        self.end_ns: int | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Add or replace an attribute."""
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        """Mark the span as failed."""
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        """Finish the span (later calls are ignored)."""
+        if self.end_ns is None:
+            self.end_ns = self._tracer.now_ns()
+            self._tracer._finish(self)
+
+    @property
+    def duration_ns(self) -> int:
+        """Duration in nanoseconds (0 while open)."""
+        return 0 if self.end_ns is None else self.end_ns - self.start_ns
+
+
+class NoopSpan:
+    """Stand-in used when tracing is off; also its own context manager."""
+
+    recording = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Ignore the attribute."""
+
+    def record_error(self, exc: BaseException) -> None:
+        """Ignore the error."""
+
+    def end(self) -> None:
+        """Nothing to finish."""
+
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        return None
+
+
+_NOOP_SPAN = NoopSpan()
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class _Installed:
+    """Holder of the process-wide tracer."""
+
+    tracer: "Tracer | None" = None
+
+
+class _ActiveSpan:
+    """Context manager that makes a span the parent of spans opened inside it."""
+
+    __slots__ = ("_span", "_token")
+
+    def __init__(self, span: Span) -> None:
+        self._span = span
+        self._token: Token[Span | None] | None = None
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc is not None:
+            self._span.record_error(exc)
+        self._span.end()
+        if self._token is not None:
+            _current_span.reset(self._token)
+
+
+class Tracer:
+    """
+    Collects finished spans and writes them to a file.
+
+    Timestamps come from the monotonic clock, anchored to the wall clock
+    once when the tracer is created, so durations are not affected by clock
+    adjustments.
+
+    Attributes:
+        spans: Finished spans, in the order they ended.
+    """
+
+    def __init__(self, seed: int | None = None) -> None:
+        """
+        Initialize an empty tracer.
+
+        Args:
+            seed: Seed for span and trace IDs (default: random).
+        """
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._epoch_ns = time.time_ns()
+        self._perf_ns = time.perf_counter_ns()
+
+    def now_ns(self) -> int:
+        """Current time in nanoseconds since the epoch, from the monotonic clock."""
+        return self._epoch_ns + time.perf_counter_ns() - self._perf_ns
+
+    def new_id(self, bits: int) -> int:
+        """A random non-zero ID."""
+        with self._lock:
+            return self._rng.getrandbits(bits) or 1
+
+    def start_span(
+        self, name: str, *, kind: int = KIND_INTERNAL, attributes: Mapping[str, Any] | None = None
+    ) -> Span:
+        """
+        Open a span without making it the current one.
+
+        Used for operations whose lifetime does not follow a with block (like
+        a streamed response being consumed); the caller must call end().
+
+        Args:
+            name: Operation name.
+            kind: KIND_INTERNAL or KIND_CLIENT.
+            attributes: Initial attributes.
+
+        Returns:
+            The open span, a child of the current span.
+        """
+        return Span(self, name, _current_span.get(), kind, attributes or {})
+
+    def _finish(self, span: Span) -> None:
+        """Store a finished span."""
+        with self._lock:
+            self.spans.append(span)
+
+    def write(self, path: str | Path, fmt: str = CHROME) -> None:
+        """
+        Write the finished spans to a file.
+
+        Args:
+            path: Output file.
+            fmt: CHROME (trace-event JSON) or OTLP (OTLP/JSON, one line).
+
+        Raises:
+            ValueError: If fmt is unknown.
+            OSError: If the file cannot be written.
+        """
+        if fmt == CHROME:
+            text = json.dumps(self.chrome_trace())
+        elif fmt == OTLP:
+            text = json.dumps(self.otlp(), separators=(",", ":")) + "\n"
+        else:
+            raise ValueError(f"Unknown trace format '{fmt}' (expected one of {FORMATS})")
+        Path(path).write_text(text, encoding="utf-8")
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """
+        The spans as Chrome trace events.
+
+        Each span becomes a complete ('X') event. Spans that overlap without
+        nesting (concurrent tasks, examples evaluated in parallel) are placed
+        on separate tracks, since trace viewers require the events of one
+        track to nest; a track is named after the task of its first span.
+
+        Returns:
+            A trace-event JSON object.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: (s.start_ns, -s.duration_ns))
+        origin = spans[0].start_ns if spans else 0
+        pid = os.getpid()
+
+        # Each track is a stack of the open spans placed on it
+        tracks: list[list[Span]] = []
+        track_of: dict[int, int] = {}
+        events: list[dict[str, Any]] = []
+        for span in spans:
+            candidates = list(range(len(tracks)))
+            parent_track = track_of.get(span.parent_id) if span.parent_id is not None else None
+            if parent_track is not None:
+                candidates.remove(parent_track)
+                candidates.insert(0, parent_track)
+            chosen = next((t for t in candidates if self._fits(tracks[t], span)), None)
+            if chosen is None:
+                chosen = len(tracks)
+                tracks.append([])
+                name = span.attributes.get("task_id", span.name)
+                events.append(
+                    {
+                        "ph": "M",
+                        "name": "thread_name",
+                        "pid": pid,
+                        "tid": chosen + 1,
+                        "args": {"name": f"{name} #{chosen + 1}"},
+                    }
+                )
+            tracks[chosen].append(span)
+            track_of[span.span_id] = chosen
+
+            args = dict(span.attributes)
+            if span.error is not None:
+                args["error"] = span.error
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": SERVICE_NAME,
+                    "ph": "X",
+                    "ts": (span.start_ns - origin) / 1000,
+                    "dur": span.duration_ns / 1000,
+                    "pid": pid,
+                    "tid": chosen + 1,
+                    "args": args,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    @staticmethod
+    def _fits(track: list[Span], span: Span) -> bool:
+        """Whether a span nests inside the spans still open on a track."""
+        while track and (track[-1].end_ns or 0) <= span.start_ns:
+            track.pop()
+        return not track or (track[-1].end_ns or 0) >= (span.end_ns or 0)
+
+    def otlp(self) -> dict[str, Any]:
+        """
+        The spans as an OTLP/JSON ExportTraceServiceRequest.
+
+        Returns:
+            A JSON object with one resource and one instrumentation scope.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": SERVICE_NAME},
+                            "spans": [_otlp_span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    """Encode an attribute value as an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64-bit integers are strings in the protobuf JSON mapping
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Mapping[str, Any]) -> list[dict[str, Any]]:
+    """Encode attributes as an OTLP KeyValue list."""
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def _otlp_span(span: Span) -> dict[str, Any]:
+    """Encode a span as an OTLP Span."""
+    encoded: dict[str, Any] = {
+        "traceId": f"{span.trace_id:032x}",
+        "spanId": f"{span.span_id:016x}",
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        # STATUS_CODE_ERROR = 2, STATUS_CODE_UNSET = 0
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+    }
+    if span.parent_id is not None:
+        encoded["parentSpanId"] = f"{span.parent_id:016x}"
+    return encoded
+
+
+def set_tracer(tracer: Tracer | None) -> None:
+    """
+    Install the process-wide tracer (None turns tracing off).
+
+    Args:
+        tracer: The tracer that receives spans from now on.
+    """
+    _Installed.tracer = tracer
+
+
+def get_tracer() -> Tracer | None:
+    """The installed tracer, or None if tracing is off."""
+    return _Installed.tracer
+
+
+def span(name: str, *, kind: int = KIND_INTERNAL, **attributes: Any) -> _ActiveSpan | NoopSpan:
+    """
+    Trace a with block as a span that is the parent of spans opened inside it.
+
+    Exceptions leaving the block are recorded on the span and re-raised.
+
+    Args:
+        name: Operation name.
+        kind: KIND_INTERNAL or KIND_CLIENT.
+        **attributes: Initial attributes.
+
+    Returns:
+        A context manager yielding the span; a shared no-op when tracing is
+        off (check span.recording before computing expensive attributes).
+    """
+    tracer = _Installed.tracer
+    if tracer is None:
+        return _NOOP_SPAN
+    return _ActiveSpan(tracer.start_span(name, kind=kind, attributes=attributes))
+
+
+def start_span(name: str, *, kind: int = KIND_INTERNAL, **attributes: Any) -> Span | NoopSpan:
+    """
+    Open a span that the caller ends explicitly (see Tracer.start_span).
+
+    Args:
+        name: Operation name.
+        kind: KIND_INTERNAL or KIND_CLIENT.
+        **attributes: Initial attributes.
+
+    Returns:
+        The open span, or the no-op span when tracing is off.
+    """
+    tracer = _Installed.tracer
+    if tracer is None:
+        return _NOOP_SPAN
+    return tracer.start_span(name, kind=kind, attributes=attributes)
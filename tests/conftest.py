@@ -2,17 +2,20 @@
 Shared pytest fixtures for all JQ-Synth tests.
 
 This module provides common fixtures used across the test suite, including
-executor instances, reviewer instances, and task factory helpers.
+executor instances, reviewer instances, task factory helpers and fakes.
 """
 
-from collections.abc import Callable
+from collections.abc import Callable, Iterator, Sequence
 from typing import Any
 
 import pytest
 
-from src.domain import Example, Task
+from src.domain import Example, ExecutionResult, Task
 from src.executor import JQExecutor
+from src.metrics import SynthMetrics, set_metrics
 from src.reviewer import AlgorithmicReviewer
+from src.scaling import FilterTimer
+from src.tracing import Tracer, set_tracer
 
 
 @pytest.fixture
@@ -47,40 +50,141 @@ def reviewer(executor: JQExecutor) -> AlgorithmicReviewer:
 
 
 @pytest.fixture
-def make_task() -> Callable[[Any, Any, str], Task]:
+def tracer() -> Iterator[Tracer]:
     """
-    Factory fixture for creating simple single-example Tasks.
+    Install a tracer for the duration of a test.
+
+    Yields:
+        The installed Tracer; tracing is turned off again afterwards.
+    """
+    installed = Tracer(seed=0)
+    set_tracer(installed)
+    try:
+        yield installed
+    finally:
+        set_tracer(None)
+
+
+@pytest.fixture
+def metrics() -> Iterator[SynthMetrics]:
+    """
+    Install fresh metrics for the duration of a test.
+
+    Yields:
+        The installed SynthMetrics; recording is turned off again afterwards.
+    """
+    installed = SynthMetrics()
+    set_metrics(installed)
+    try:
+        yield installed
+    finally:
+        set_metrics(None)
+
+
+@pytest.fixture
+def make_task() -> Callable[..., Task]:
+    """
+    Factory fixture for creating simple Tasks.
 
     Returns:
-        A callable that creates a Task with one example.
+        A callable that creates a Task with one example, plus any further
+        (input, expected_output) pairs given as more_examples.
 
     Example:
         def test_something(make_task):
             task = make_task({"x": 1}, 1)
             # task has id="test-task", one example with input {"x": 1}, expected 1
+            task = make_task({"x": 1}, 1, more_examples=[({"x": 2}, 2)], task_id="t2")
+            # task has id="t2" and two examples
     """
 
     def _make_task(
         input_data: Any,
         expected_output: Any,
         description: str = "Test task",
+        *,
+        task_id: str = "test-task",
+        more_examples: Sequence[tuple[Any, Any]] = (),
     ) -> Task:
         """
-        Create a Task with a single example.
+        Create a Task from its examples.
 
         Args:
-            input_data: The JSON input for the example.
-            expected_output: The expected JSON output for the example.
+            input_data: The JSON input for the first example.
+            expected_output: The expected JSON output for the first example.
             description: Optional task description. Defaults to "Test task".
+            task_id: Optional task id. Defaults to "test-task".
+            more_examples: Further (input, expected_output) pairs.
 
         Returns:
-            Task with id="test-task" and a single example.
+            Task with the first example followed by more_examples.
         """
-        example = Example(input_data=input_data, expected_output=expected_output)
+        pairs = [(input_data, expected_output), *more_examples]
         return Task(
-            id="test-task",
+            id=task_id,
             description=description,
-            examples=[example],
+            examples=[Example(input_data=i, expected_output=o) for i, o in pairs],
         )
 
     return _make_task
+
+
+class FakeClock:
+    """Manually advanced monotonic clock; sleep() advances it."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.slept: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    """
+    Create a fake monotonic clock starting at zero.
+
+    Returns:
+        A FakeClock; set clock.now or call clock.sleep() to advance it.
+    """
+    return FakeClock()
+
+
+class _ClockedTimer(FilterTimer):
+    """Timer whose runs take 10ms of jq startup plus a given cost ('empty' costs nothing)."""
+
+    def __init__(self, executor: JQExecutor, cost: Callable[[str, bytes], float]) -> None:
+        super().__init__(executor)
+        self.cost = cost
+
+    def time(self, filter_code: str, input_bytes: bytes) -> tuple[float, ExecutionResult]:
+        result = self.executor.run_raw(filter_code, input_bytes)
+        cost = 0.0 if filter_code == "empty" else self.cost(filter_code, input_bytes)
+        return 0.01 + cost, result
+
+
+@pytest.fixture
+def clocked_timer(executor: JQExecutor) -> Callable[[Callable[[str, bytes], float]], FilterTimer]:
+    """
+    Factory fixture for FilterTimers with a fake clock.
+
+    Returns:
+        A callable that creates a timer from cost(filter_code, input_bytes),
+        the seconds a run takes beyond jq's startup. Runs still go to jq for
+        their results.
+
+    Example:
+        def test_something(executor, clocked_timer):
+            reviewer = ScalingReviewer(executor)
+            reviewer.timer = clocked_timer(lambda _filter, data: 1e-4 * len(data))
+    """
+
+    def _make_timer(cost: Callable[[str, bytes], float]) -> FilterTimer:
+        return _ClockedTimer(executor, cost)
+
+    return _make_timer
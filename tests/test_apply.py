@@ -0,0 +1,279 @@
+"""
+Tests for applying a filter to large record files.
+
+This module tests byte-range chunking at record boundaries, format
+detection, per-chunk jq runs with their failures, ordered and unordered
+output, the worker process pool, and the python engine against jq.
+"""
+
+import io
+import itertools
+import json
+from pathlib import Path
+
+import pytest
+
+from src.apply import (
+    AUTO_ENGINE,
+    JQ_ENGINE,
+    NDJSON,
+    PYTHON_ENGINE,
+    SEQ,
+    ChunkResult,
+    apply_filter,
+    count_records,
+    detect_format,
+    parse_size,
+    split_chunks,
+)
+from src.compiler import UnsupportedFilterError
+from src.executor import JQExecutor
+
+
+def _ndjson(path: Path, count: int) -> Path:
+    path.write_text(
+        "".join(json.dumps({"id": i, "pad": "x" * (i % 7)}) + "\n" for i in range(count))
+    )
+    return path
+
+
+class TestParseSize:
+    """Tests for byte size options."""
+
+    @pytest.mark.parametrize(
+        ("text", "size"),
+        [("65536", 65536), ("512K", 512 * 1024), ("4m", 4 * 1024**2), ("1.5GiB", 3 * 1024**3 // 2)],
+    )
+    def test_valid(self, text: str, size: int):
+        """Plain numbers and binary K/M/G suffixes are accepted."""
+        assert parse_size(text) == size
+
+    @pytest.mark.parametrize("text", ["", "4X", "-1", "0"])
+    def test_invalid(self, text: str):
+        """Unknown suffixes and non-positive sizes are rejected."""
+        with pytest.raises(ValueError, match="ize"):
+            parse_size(text)
+
+
+class TestChunking:
+    """Tests for splitting files at record boundaries."""
+
+    def test_ndjson_chunks_cover_whole_lines(self, tmp_path: Path):
+        """Chunks are contiguous, end after a newline and hold every record once."""
+        path = _ndjson(tmp_path / "in.ndjson", 100)
+        data = path.read_bytes()
+
+        chunks = split_chunks(path, NDJSON, 200, first_index=3)
+
+        assert chunks[0].start == 0
+        assert chunks[-1].end == len(data)
+        assert [c.index for c in chunks] == list(range(3, 3 + len(chunks)))
+        for previous, chunk in itertools.pairwise(chunks):
+            assert previous.end == chunk.start
+            assert data[chunk.start - 1 : chunk.start] == b"\n"
+        assert sum(count_records(data[c.start : c.end], NDJSON) for c in chunks) == 100
+
+    def test_seq_chunks_start_at_separator(self, tmp_path: Path):
+        """JSON text sequence chunks begin with a record separator."""
+        path = tmp_path / "in.seq"
+        path.write_bytes(
+            b"".join(b"\x1e" + json.dumps({"id": i}).encode() + b"\n" for i in range(50))
+        )
+        data = path.read_bytes()
+
+        chunks = split_chunks(path, SEQ, 64)
+
+        assert len(chunks) > 1
+        assert all(data[c.start : c.start + 1] == b"\x1e" for c in chunks)
+        assert sum(count_records(data[c.start : c.end], SEQ) for c in chunks) == 50
+
+    def test_long_record_and_empty_file(self, tmp_path: Path):
+        """A record longer than the chunk size is kept whole; empty files have no chunks."""
+        path = tmp_path / "in.ndjson"
+        path.write_text('{"a": "' + "x" * 500 + '"}\n{"b": 1}')
+        (tmp_path / "empty.ndjson").write_text("")
+
+        chunks = split_chunks(path, NDJSON, 10)
+
+        assert [(c.start, c.end) for c in chunks] == [(0, 510), (510, 518)]
+        assert split_chunks(tmp_path / "empty.ndjson", NDJSON, 10) == []
+
+    def test_detect_format(self, tmp_path: Path):
+        """A leading record separator marks a JSON text sequence."""
+        (tmp_path / "a").write_bytes(b'\n \x1e{"a": 1}\n')
+        (tmp_path / "b").write_bytes(b'{"a": 1}\n')
+
+        assert detect_format(tmp_path / "a") == SEQ
+        assert detect_format(tmp_path / "b") == NDJSON
+
+
+class TestApplyFilter:
+    """Tests for running a filter over chunks."""
+
+    def test_ordered_output_matches_single_run(self, executor: JQExecutor, tmp_path: Path):
+        """Chunked output equals one jq run over the whole file."""
+        path = _ndjson(tmp_path / "in.ndjson", 300)
+        out = io.BytesIO()
+        seen: list[ChunkResult] = []
+
+        report = apply_filter(executor, ".id", [path], out, chunk_bytes=500, on_chunk=seen.append)
+
+        assert out.getvalue() == "".join(f"{i}\n" for i in range(300)).encode()
+        assert report.records == 300
+        assert report.chunks == len(seen) > 1
+        assert report.output_bytes == len(out.getvalue())
+        assert report.failures == []
+        assert report.records_per_sec > 0
+
+    def test_several_files_and_formats(self, executor: JQExecutor, tmp_path: Path):
+        """Files are read in order, each in its detected format."""
+        ndjson = _ndjson(tmp_path / "a.ndjson", 3)
+        seq = tmp_path / "b.seq"
+        seq.write_bytes(b'\x1e{"id": 10}\n\x1e{"id": 11}\n')
+        out = io.BytesIO()
+
+        report = apply_filter(executor, ".id", [ndjson, seq], out)
+
+        assert out.getvalue() == b"0\n1\n2\n\x1e10\n\x1e11\n"
+        assert (report.files, report.records) == (2, 5)
+
+    def test_failed_chunks_reported(self, executor: JQExecutor, tmp_path: Path):
+        """Errors fail their chunk only; the other chunks are still written."""
+        path = tmp_path / "in.ndjson"
+        path.write_text('{"a": 1}\n{"a": "x"}\n{"a": 3}\n{bad\n{"a": 5}\n')
+        out = io.BytesIO()
+
+        report = apply_filter(executor, ".a + 1", [path], out, chunk_bytes=10)
+
+        assert out.getvalue() == b"2\n4\n6\n"
+        assert [f.chunk.index for f in report.failures] == [0, 1]
+        assert "cannot be added" in report.failures[0].error
+        assert report.failures[1].exit_code != 0
+
+    def test_timeout_fails_chunk(self, tmp_path: Path):
+        """A chunk running past the executor's timeout fails."""
+        try:
+            executor = JQExecutor(timeout_sec=0.2)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+        path = _ndjson(tmp_path / "in.ndjson", 2)
+
+        report = apply_filter(executor, "def f: f; f", [path], io.BytesIO())
+
+        assert report.failures[0].exit_code == 124
+
+    @pytest.mark.parametrize(
+        ("ordered", "engine"), [(True, JQ_ENGINE), (False, JQ_ENGINE), (True, PYTHON_ENGINE)]
+    )
+    def test_process_pool(self, executor: JQExecutor, tmp_path: Path, ordered: bool, engine: str):
+        """Worker processes produce the same records, in order if asked."""
+        path = _ndjson(tmp_path / "in.ndjson", 2000)
+        out = io.BytesIO()
+
+        report = apply_filter(
+            executor,
+            ".id",
+            [path],
+            out,
+            workers=2,
+            chunk_bytes=2048,
+            ordered=ordered,
+            engine=engine,
+        )
+
+        lines = out.getvalue().decode().split()
+        expected = [str(i) for i in range(2000)]
+        assert (lines if ordered else sorted(lines, key=int)) == expected
+        assert report.workers == 2
+        assert report.chunks > 8  # more than the chunks kept in flight
+
+    def test_validation(self, executor: JQExecutor, tmp_path: Path):
+        """Unknown formats and non-positive limits are rejected."""
+        path = _ndjson(tmp_path / "in.ndjson", 1)
+
+        with pytest.raises(ValueError, match="Unknown input format"):
+            apply_filter(executor, ".", [path], io.BytesIO(), fmt="csv")
+        with pytest.raises(ValueError, match="at least 1"):
+            apply_filter(executor, ".", [path], io.BytesIO(), workers=0)
+        with pytest.raises(ValueError, match="Unknown engine"):
+            apply_filter(executor, ".", [path], io.BytesIO(), engine="js")
+        with pytest.raises(FileNotFoundError):
+            apply_filter(executor, ".", [tmp_path / "missing"], io.BytesIO())
+
+
+class TestPythonEngine:
+    """Tests for filtering chunks with the compiled filter instead of jq."""
+
+    @pytest.mark.parametrize("fmt", [NDJSON, SEQ])
+    def test_output_matches_jq(self, executor: JQExecutor, tmp_path: Path, fmt: str):
+        """The python engine writes what jq writes, in both formats."""
+        path = tmp_path / "in"
+        prefix = "\x1e" if fmt == SEQ else ""
+        path.write_text(
+            "".join(
+                f"{prefix}{json.dumps({'id': i, 'v': [0.5, -0.0, 1e17, None][i % 4]})}\n"
+                for i in range(300)
+            )
+        )
+        filter_code = "select(.id % 3 > 0) | {id, w: (.v // 0 | . * 2)}, .v"
+        outputs = {}
+
+        for engine in (JQ_ENGINE, PYTHON_ENGINE):
+            out = io.BytesIO()
+            report = apply_filter(
+                executor, filter_code, [path], out, chunk_bytes=1000, engine=engine
+            )
+            outputs[engine] = out.getvalue()
+            assert (report.engine, report.records, report.failures) == (engine, 300, [])
+
+        assert outputs[PYTHON_ENGINE] == outputs[JQ_ENGINE]
+
+    def test_failed_chunks_reported(self, executor: JQExecutor, tmp_path: Path):
+        """Filter errors and invalid records fail their chunk, as with jq."""
+        path = tmp_path / "in.ndjson"
+        path.write_text('{"a": 1}\n{"a": "x"}\n{"a": 3}\n{bad\n{"a": 5}\n')
+        out = io.BytesIO()
+
+        report = apply_filter(executor, ".a + 1", [path], out, chunk_bytes=10, engine=PYTHON_ENGINE)
+
+        assert out.getvalue() == b"2\n4\n6\n"
+        assert [(f.chunk.index, f.exit_code) for f in report.failures] == [(0, 5), (1, 2)]
+        assert "jq: error (at record 2): string" in report.failures[0].error
+        assert "parse error (at record 2)" in report.failures[1].error
+
+    def test_output_limit(self, tmp_path: Path):
+        """Output over the executor's limit is truncated and fails the chunk."""
+        try:
+            executor = JQExecutor(max_output_bytes=100)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+        path = _ndjson(tmp_path / "in.ndjson", 100)
+        out = io.BytesIO()
+
+        report = apply_filter(executor, ".", [path], out, engine=PYTHON_ENGINE)
+
+        assert len(out.getvalue()) == 100
+        assert report.failures[0].exit_code == 137
+
+    def test_auto_engine(self, executor: JQExecutor, tmp_path: Path):
+        """Auto uses python for supported filters and jq for the rest."""
+        path = _ndjson(tmp_path / "in.ndjson", 3)
+
+        compiled = apply_filter(executor, ".id", [path], io.BytesIO(), engine=AUTO_ENGINE)
+        spawned = apply_filter(executor, ".id as $i | $i", [path], io.BytesIO(), engine=AUTO_ENGINE)
+
+        assert (compiled.engine, spawned.engine) == (PYTHON_ENGINE, JQ_ENGINE)
+        with pytest.raises(UnsupportedFilterError, match="variable"):
+            apply_filter(executor, ".id as $i | $i", [path], io.BytesIO(), engine=PYTHON_ENGINE)
+
+    def test_other_jq_version(self, tmp_path: Path):
+        """Against a jq other than 1.6, python is refused and auto runs jq."""
+        path = _ndjson(tmp_path / "in.ndjson", 3)
+        executor = JQExecutor()
+        executor.version = "jq-1.7.1"
+
+        report = apply_filter(executor, ".id", [path], io.BytesIO(), engine=AUTO_ENGINE)
+
+        assert report.engine == JQ_ENGINE
+        with pytest.raises(ValueError, match="jq is jq-1"):
+            apply_filter(executor, ".id", [path], io.BytesIO(), engine=PYTHON_ENGINE)
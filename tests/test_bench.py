@@ -0,0 +1,219 @@
+"""
+Tests for the benchmark building blocks.
+
+This module tests per-task measurement, aggregation into summaries and the
+JSON report layout, with mocked orchestrators so no jq or LLM is needed.
+"""
+
+import json
+import subprocess
+from collections.abc import Callable
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.bench import (
+    REPORT_SCHEMA,
+    SUITES,
+    TaskRun,
+    build_report,
+    git_commit,
+    resolve_suites,
+    run_task,
+    summarize,
+)
+from src.cli import load_tasks
+from src.domain import Solution, Task
+from src.executor import ExecutorStats
+from src.generator import GenerationError, GenerationStats
+
+
+def _run(task_id: str = "t", *, success: bool = True, time_sec: float = 1.0, **kwargs) -> TaskRun:
+    fields = {
+        "suite": "suite.json",
+        "task_id": task_id,
+        "success": success,
+        "best_score": 1.0 if success else 0.5,
+        "iterations": 1,
+        "time_sec": time_sec,
+        "llm_requests": 2,
+        "llm_api_calls": 2,
+        "prompt_tokens": 100,
+        "response_tokens": 10,
+        "jq_spawns": 4,
+        "jq_time_sec": 0.1,
+    }
+    fields.update(kwargs)
+    return TaskRun(**fields)
+
+
+class TestRunTask:
+    """Tests for measuring one task."""
+
+    def _orchestrator(self, stats: GenerationStats, executor_stats: ExecutorStats) -> MagicMock:
+        orchestrator = MagicMock()
+        orchestrator.generator.generation_stats = stats
+
+        def solve(task: Task) -> Solution:
+            # Simulate the work done while solving
+            stats.requests += 3
+            stats.api_calls += 2
+            stats.prompt_tokens += 300
+            stats.response_tokens += 15
+            executor_stats.spawns += 5
+            executor_stats.total_sec += 0.25
+            return Solution(
+                task_id=task.id,
+                success=True,
+                best_filter=".x",
+                best_score=1.0,
+                iterations_used=2,
+                history=[],
+            )
+
+        orchestrator.solve.side_effect = solve
+        return orchestrator
+
+    def test_measures_counter_deltas(self, make_task: Callable[..., Task]):
+        """Only the work done for this task is attributed to it."""
+        stats = GenerationStats(requests=10, api_calls=10, prompt_tokens=1000, response_tokens=50)
+        executor = MagicMock()
+        executor.stats = ExecutorStats(spawns=7, total_sec=1.0)
+
+        run = run_task(
+            self._orchestrator(stats, executor.stats), executor, "s.json", make_task({"x": 1}, 1)
+        )
+
+        assert run.suite == "s.json"
+        assert run.task_id == "test-task"
+        assert run.success is True
+        assert run.iterations == 2
+        assert (run.llm_requests, run.llm_api_calls) == (3, 2)
+        assert (run.prompt_tokens, run.response_tokens) == (300, 15)
+        assert run.jq_spawns == 5
+        assert run.jq_time_sec == pytest.approx(0.25)
+        assert run.time_sec >= 0
+
+    def test_generation_error_counts_as_unsolved(self, make_task: Callable[..., Task]):
+        """A task whose generation failed is recorded instead of aborting the run."""
+        orchestrator = MagicMock()
+        orchestrator.generator.generation_stats = GenerationStats()
+        orchestrator.solve.side_effect = GenerationError("Replay cache miss")
+        executor = MagicMock()
+        executor.stats = ExecutorStats()
+
+        run = run_task(orchestrator, executor, "s.json", make_task({"x": 1}, 1))
+
+        assert run.success is False
+        assert run.best_score == 0.0
+        assert run.iterations == 0
+
+
+class TestSummarize:
+    """Tests for aggregating task runs."""
+
+    def test_solve_rate_and_percentiles(self):
+        """Percentiles are nearest-rank over the per-task times."""
+        runs = [_run(f"t{i}", time_sec=float(i), success=i % 2 == 0) for i in range(1, 101)]
+
+        summary = summarize(runs)
+
+        assert summary.tasks == 100
+        assert summary.solved == 50
+        assert summary.solve_rate == 0.5
+        assert summary.time_p50_sec == 50.0
+        assert summary.time_p95_sec == 95.0
+        assert summary.time_p99_sec == 99.0
+        assert summary.total_time_sec == sum(range(1, 101))
+
+    def test_cost_per_solved_includes_failed_tasks(self):
+        """Requests and tokens of failed tasks are charged to the solved ones."""
+        runs = [_run("a"), _run("b", success=False)]
+
+        summary = summarize(runs)
+
+        assert summary.llm_requests_per_solved == 4.0
+        assert summary.tokens_per_solved == 220.0
+        assert summary.jq_spawns_per_task == 4.0
+        assert summary.jq_time_sec == pytest.approx(0.2)
+        assert summary.jq_time_per_task_sec == pytest.approx(0.1)
+
+    def test_nothing_solved(self):
+        """Per-solved figures are None when nothing was solved."""
+        summary = summarize([_run(success=False)])
+
+        assert summary.solve_rate == 0.0
+        assert summary.llm_requests_per_solved is None
+        assert summary.tokens_per_solved is None
+
+    def test_empty(self):
+        """An empty run list summarizes to zeros."""
+        summary = summarize([])
+
+        assert summary.tasks == 0
+        assert summary.solve_rate == 0.0
+        assert summary.time_p99_sec == 0.0
+        assert summary.jq_spawns_per_task == 0.0
+
+
+class TestBuildReport:
+    """Tests for the JSON report."""
+
+    def test_layout(self):
+        """The report has the summaries, every run and the settings."""
+        runs = [_run("a"), replace(_run("b", success=False), suite="other.json")]
+
+        with patch("src.bench.git_commit", return_value="abc123"):
+            report = build_report(runs, config={"mode": "mock"}, label="baseline")
+
+        assert report["schema"] == REPORT_SCHEMA
+        assert report["label"] == "baseline"
+        assert report["commit"] == "abc123"
+        assert report["config"] == {"mode": "mock"}
+        assert report["summary"]["tasks"] == 2
+        assert set(report["suites"]) == {"suite.json", "other.json"}
+        assert report["suites"]["other.json"]["solved"] == 0
+        assert [task["task_id"] for task in report["tasks"]] == ["a", "b"]
+        assert json.loads(json.dumps(report)) == report
+
+
+class TestGitCommit:
+    """Tests for recording the current commit."""
+
+    def test_returns_hash(self):
+        """The output of git rev-parse is returned."""
+        result = subprocess.CompletedProcess([], 0, stdout="abc123\n", stderr="")
+        with patch("src.bench.subprocess.run", return_value=result):
+            assert git_commit() == "abc123"
+
+    def test_none_without_git(self):
+        """Outside a checkout (or without git) there is no commit."""
+        with patch("src.bench.subprocess.run", side_effect=FileNotFoundError):
+            assert git_commit() is None
+        error = subprocess.CalledProcessError(128, ["git"])
+        with patch("src.bench.subprocess.run", side_effect=error):
+            assert git_commit() is None
+
+
+class TestSuites:
+    """Tests for the named suites of bundled task files."""
+
+    @pytest.mark.parametrize("name", list(SUITES))
+    def test_bundled_files_load(self, name: str):
+        """Every named suite is a task file of the repository."""
+        root = Path(__file__).resolve().parent.parent
+
+        assert load_tasks(str(root / SUITES[name]))
+
+    def test_resolve(self):
+        """Names map to their files, paths are kept and duplicates dropped."""
+        assert resolve_suites(["hard", "my.json", "hard_tasks.json"]) == [
+            "hard_tasks.json",
+            "my.json",
+        ]
+
+    def test_all(self):
+        """'all' stands for every bundled suite."""
+        assert resolve_suites(["basic", "all"]) == list(SUITES.values())
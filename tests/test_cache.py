@@ -0,0 +1,278 @@
+"""
+Unit tests for the LLM response cache.
+
+This module tests the ResponseCache class: content addressing, the in-memory
+LRU, the on-disk store with TTL, coalescing of concurrent identical requests,
+and strict replay mode.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src.cache import CacheMissError, ResponseCache, make_cache_key
+
+REQUEST = {
+    "provider": "OpenAIProvider",
+    "endpoint": "https://api.openai.com/v1/chat/completions",
+    "model": "gpt-4o",
+    "temperature": 0.3,
+    "system_prompt": "sys",
+    "prompt": "prompt",
+}
+
+
+class TestMakeCacheKey:
+    """Tests for make_cache_key content addressing."""
+
+    def test_same_request_same_key(self):
+        """Identical requests hash to the same key."""
+        a = make_cache_key(**REQUEST)
+        b = make_cache_key(**REQUEST)
+        assert a == b
+        assert len(a) == 64
+
+    @pytest.mark.parametrize(
+        "changed",
+        [
+            {"provider": "AnthropicProvider"},
+            {"endpoint": "http://localhost:11434/v1/chat/completions"},
+            {"model": "gpt-4o-mini"},
+            {"temperature": 0.7},
+            {"system_prompt": "other"},
+            {"prompt": "prompt!"},
+        ],
+    )
+    def test_every_component_changes_key(self, changed: dict[str, object]):
+        """Changing any request component changes the key."""
+        assert make_cache_key(**{**REQUEST, **changed}) != make_cache_key(**REQUEST)
+
+    def test_components_do_not_collide_by_concatenation(self):
+        """Moving text between fields does not produce the same key."""
+        assert make_cache_key(**{**REQUEST, "system_prompt": "ab", "prompt": "c"}) != (
+            make_cache_key(**{**REQUEST, "system_prompt": "a", "prompt": "bc"})
+        )
+
+
+class TestMemoryCache:
+    """Tests for the in-memory LRU."""
+
+    def test_put_then_get(self):
+        """A stored response is returned by get()."""
+        cache = ResponseCache()
+        cache.put("k", ".x")
+        assert cache.get("k") == ".x"
+
+    def test_miss_returns_none(self):
+        """get() returns None for unknown keys."""
+        assert ResponseCache().get("missing") is None
+
+    def test_evicts_least_recently_used(self):
+        """The least recently used entry is evicted first."""
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert cache.get("c") == "3"
+
+
+class TestDiskCache:
+    """Tests for the on-disk store."""
+
+    def test_survives_new_instance(self, tmp_path: Path):
+        """Responses written by one cache are read by another on the same directory."""
+        ResponseCache(directory=tmp_path).put("abcdef", ".x")
+        assert ResponseCache(directory=tmp_path).get("abcdef") == ".x"
+
+    def test_entries_are_sharded_json(self, tmp_path: Path):
+        """Entries are stored as JSON under a two-character prefix directory."""
+        ResponseCache(directory=tmp_path).put("abcdef", ".x")
+        entry = json.loads((tmp_path / "ab" / "abcdef.json").read_text())
+        assert entry["response"] == ".x"
+        assert "created_at" in entry
+
+    def test_expired_entries_are_ignored(self, tmp_path: Path):
+        """Entries older than the TTL are treated as misses."""
+        ResponseCache(directory=tmp_path).put("abcdef", ".x")
+        path = tmp_path / "ab" / "abcdef.json"
+        path.write_text(json.dumps({"response": ".x", "created_at": time.time() - 100}))
+
+        assert ResponseCache(directory=tmp_path, ttl_sec=10).get("abcdef") is None
+        assert ResponseCache(directory=tmp_path, ttl_sec=1000).get("abcdef") == ".x"
+
+    def test_replay_ignores_ttl(self, tmp_path: Path):
+        """Recorded responses never expire in replay mode."""
+        path = tmp_path / "ab" / "abcdef.json"
+        path.parent.mkdir()
+        path.write_text(json.dumps({"response": ".x", "created_at": 0}))
+
+        cache = ResponseCache(directory=tmp_path, ttl_sec=1, replay=True)
+        assert cache.get("abcdef") == ".x"
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path: Path):
+        """Unreadable entries are ignored rather than raising."""
+        path = tmp_path / "ab" / "abcdef.json"
+        path.parent.mkdir()
+        path.write_text("{not json")
+
+        assert ResponseCache(directory=tmp_path).get("abcdef") is None
+
+
+class TestGetOrCompute:
+    """Tests for get_or_compute, coalescing and replay."""
+
+    def test_computes_once(self):
+        """The compute function runs only on the first request."""
+        cache = ResponseCache()
+        calls: list[int] = []
+
+        def compute() -> str:
+            calls.append(1)
+            return ".x"
+
+        assert cache.get_or_compute("k", compute) == ".x"
+        assert cache.get_or_compute("k", compute) == ".x"
+        assert len(calls) == 1
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 1
+
+    def test_failures_are_not_cached(self):
+        """An exception propagates and the next call retries."""
+        cache = ResponseCache()
+
+        def fail() -> str:
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_compute("k", fail)
+        assert cache.get_or_compute("k", lambda: ".x") == ".x"
+
+    def test_concurrent_identical_requests_are_coalesced(self):
+        """Concurrent requests for one key share a single computation."""
+        cache = ResponseCache()
+        started = threading.Event()
+        release = threading.Event()
+        calls: list[int] = []
+
+        def slow() -> str:
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return ".x"
+
+        results: list[str] = []
+        leader = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow)))
+        leader.start()
+        assert started.wait(timeout=5)
+
+        followers = [
+            threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow)))
+            for _ in range(3)
+        ]
+        for t in followers:
+            t.start()
+        # Give followers time to attach to the in-flight request
+        while cache.stats.coalesced < 3:
+            time.sleep(0.001)
+        release.set()
+
+        for t in [leader, *followers]:
+            t.join(timeout=5)
+
+        assert results == [".x"] * 4
+        assert len(calls) == 1
+        assert cache.stats.coalesced == 3
+
+    def test_replay_miss_raises(self, tmp_path: Path):
+        """Replay mode raises CacheMissError instead of computing."""
+        cache = ResponseCache(directory=tmp_path, replay=True)
+
+        with pytest.raises(CacheMissError):
+            cache.get_or_compute("k", lambda: pytest.fail("must not call the API"))
+
+    def test_record_then_replay(self, tmp_path: Path):
+        """Responses recorded in one run are replayed offline in the next."""
+        ResponseCache(directory=tmp_path).get_or_compute("abc", lambda: ".x")
+
+        replay = ResponseCache(directory=tmp_path, replay=True)
+        assert replay.get_or_compute("abc", lambda: pytest.fail("must not call the API")) == ".x"
+
+    def test_replay_requires_directory(self):
+        """Replay without a directory is rejected."""
+        with pytest.raises(ValueError, match="directory"):
+            ResponseCache(replay=True)
+
+
+class TestGetOrComputeAsync:
+    """Tests for the asyncio counterpart of get_or_compute."""
+
+    def test_coalesces_concurrent_coroutines(self):
+        """Identical concurrent requests on one loop share a single computation."""
+        cache = ResponseCache()
+        calls = 0
+
+        async def compute() -> str:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "r"
+
+        async def run() -> list[str]:
+            return await asyncio.gather(
+                *(cache.get_or_compute_async("k", compute) for _ in range(5))
+            )
+
+        assert asyncio.run(run()) == ["r"] * 5
+        assert calls == 1
+        assert cache.stats.misses == 1
+        assert cache.stats.coalesced == 4
+        assert cache.get("k") == "r"
+
+    def test_failure_propagates_and_is_not_cached(self):
+        """Errors reach every waiter and the next call retries."""
+        cache = ResponseCache()
+
+        async def fail() -> str:
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        async def run() -> list[object]:
+            return await asyncio.gather(
+                cache.get_or_compute_async("k", fail),
+                cache.get_or_compute_async("k", fail),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.get("k") is None
+
+    def test_replay_miss_raises(self, tmp_path: Path):
+        """Replay mode never awaits compute on a miss."""
+        cache = ResponseCache(directory=tmp_path, replay=True)
+
+        async def compute() -> str:
+            raise AssertionError("must not be called")
+
+        with pytest.raises(CacheMissError):
+            asyncio.run(cache.get_or_compute_async("k", compute))
+
+    def test_hit_skips_compute(self):
+        """Cached responses are returned without awaiting compute."""
+        cache = ResponseCache()
+        cache.put("k", "cached")
+
+        async def compute() -> str:
+            raise AssertionError("must not be called")
+
+        assert asyncio.run(cache.get_or_compute_async("k", compute)) == "cached"
+        assert cache.stats.hits == 1
@@ -0,0 +1,116 @@
+"""
+Unit tests for the model cascade.
+
+This module tests ModelCascade tier ordering, per-model statistics, and
+accumulating statistics across runs in a JSON file.
+"""
+
+import asyncio
+import json
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.cascade import CascadePolicy, ModelCascade, TierStats
+from src.generator import JQGenerator
+from src.providers import OpenAIProvider
+
+
+def _generator(model: str) -> MagicMock:
+    """Create a mock generator whose provider reports the given model."""
+    generator = MagicMock(spec=JQGenerator)
+    generator.provider = OpenAIProvider(api_key="test", model=model)
+    generator.aclose = AsyncMock()
+    return generator
+
+
+class TestModelCascade:
+    """Tests for tier ordering and counters."""
+
+    def test_requires_generators(self):
+        """An empty cascade is rejected."""
+        with pytest.raises(ValueError, match="at least one"):
+            ModelCascade([])
+
+    def test_tiers_end_with_final_generator(self):
+        """The orchestrator's generator is the last tier."""
+        cheap, strong = _generator("mini"), _generator("big")
+        cascade = ModelCascade([cheap])
+
+        assert cascade.tiers(strong) == [cheap, strong]
+        assert cascade.policy == CascadePolicy()
+
+    def test_record_by_provider_label(self):
+        """Counters are keyed by provider kind and model."""
+        cheap = _generator("mini")
+        cascade = ModelCascade([cheap])
+
+        cascade.record(cheap, tasks=1, attempts=2)
+        cascade.record(cheap, solved=1)
+
+        assert cascade.stats == {"openai/mini": TierStats(tasks=1, solved=1, attempts=2)}
+        assert cascade.stats["openai/mini"].success_rate == 1.0
+
+    def test_success_rate_without_tasks(self):
+        """A model that never received a task has a zero success rate."""
+        assert TierStats().success_rate == 0.0
+
+    def test_close_closes_tiers(self):
+        """Closing the cascade closes its generators."""
+        cheap = _generator("mini")
+        cascade = ModelCascade([cheap])
+
+        cascade.close()
+        asyncio.run(cascade.aclose())
+
+        cheap.close.assert_called_once()
+        cheap.aclose.assert_awaited_once()
+
+
+class TestSaveStats:
+    """Tests for accumulating statistics in a JSON file."""
+
+    def test_writes_new_file(self, tmp_path: Path):
+        """A missing file is created with the policy and per-model stats."""
+        cheap = _generator("mini")
+        cascade = ModelCascade([cheap], policy=CascadePolicy(escalate_after=3))
+        cascade.record(cheap, tasks=4, solved=3, attempts=6, escalations=1)
+        path = tmp_path / "cascade.json"
+
+        cascade.save_stats(path)
+
+        data = json.loads(path.read_text())
+        assert data["policy"] == {"escalate_after": 3, "repeated_error_limit": 2}
+        assert data["models"]["openai/mini"] == {
+            "tasks": 4,
+            "solved": 3,
+            "attempts": 6,
+            "escalations": 1,
+            "success_rate": 0.75,
+        }
+
+    def test_merges_with_previous_runs(self, tmp_path: Path):
+        """Counts already in the file are added to."""
+        cheap = _generator("mini")
+        path = tmp_path / "cascade.json"
+        for _ in range(2):
+            cascade = ModelCascade([cheap])
+            cascade.record(cheap, tasks=2, solved=1)
+            cascade.save_stats(path)
+
+        models = json.loads(path.read_text())["models"]
+        assert models["openai/mini"]["tasks"] == 4
+        assert models["openai/mini"]["success_rate"] == 0.5
+
+    def test_unreadable_file_is_replaced(self, tmp_path: Path):
+        """A corrupt stats file is ignored rather than failing the run."""
+        cheap = _generator("mini")
+        cascade = ModelCascade([cheap])
+        cascade.record(cheap, tasks=1)
+        path = tmp_path / "cascade.json"
+        path.write_text("{not json")
+
+        cascade.save_stats(path)
+
+        assert json.loads(path.read_text())["models"]["openai/mini"]["tasks"] == 1
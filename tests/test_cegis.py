@@ -0,0 +1,63 @@
+"""
+Unit tests for counterexample-guided example selection.
+
+This module tests the CEGIS policy defaults and the diverse selection of the
+initial working set.
+"""
+
+from src.cegis import CEGISPolicy, select_diverse
+from src.domain import Example
+
+
+class TestCEGISPolicy:
+    """Tests for policy defaults."""
+
+    def test_defaults(self):
+        """The working set starts small and grows one example at a time."""
+        policy = CEGISPolicy()
+
+        assert policy.initial_examples == 2
+        assert policy.counterexamples_per_round == 1
+
+
+class TestSelectDiverse:
+    """Tests for picking the initial working set."""
+
+    def test_all_examples_when_count_covers_them(self):
+        """Asking for at least as many examples as exist returns all of them."""
+        examples = [Example({"a": 1}, 1), Example({"a": 2}, 2)]
+
+        assert select_diverse(examples, 2) == [0, 1]
+        assert select_diverse(examples, 5) == [0, 1]
+
+    def test_zero_count(self):
+        """Asking for no examples returns none."""
+        assert select_diverse([Example({"a": 1}, 1)], 0) == []
+
+    def test_prefers_different_shapes(self):
+        """Structurally distinct examples are chosen over near-duplicates."""
+        examples = [
+            Example({"items": [1, 2]}, [1, 2]),
+            Example({"items": [3, 4]}, [3, 4]),
+            Example({"items": [5, 6]}, [5, 6]),
+            Example({"items": []}, []),
+            Example({"items": None}, None),
+        ]
+
+        assert select_diverse(examples, 3) == [0, 3, 4]
+
+    def test_starts_from_richest_example(self):
+        """The first pick is the example with the most structure."""
+        examples = [
+            Example({"a": 1}, 1),
+            Example({"a": 1, "b": {"c": [1]}}, 1),
+            Example({"a": 2}, 2),
+        ]
+
+        assert 1 in select_diverse(examples, 1)
+
+    def test_identical_shapes_keep_original_order(self):
+        """With no structural differences the earliest examples win."""
+        examples = [Example({"x": i}, i) for i in range(5)]
+
+        assert select_diverse(examples, 2) == [0, 1]
@@ -0,0 +1,131 @@
+"""
+Unit tests for provider circuit breakers.
+
+This module tests the CircuitBreaker state machine (closed, open, half-open)
+with a fake clock, its counters, and state change notifications.
+"""
+
+from src.circuit import BreakerPolicy, BreakerState, CircuitBreaker
+from tests.conftest import FakeClock
+
+POLICY = BreakerPolicy(window=4, failure_threshold=0.5, min_calls=2, cooldown_sec=10.0)
+
+
+class TestClosedState:
+    """Tests for the closed (healthy) state."""
+
+    def test_allows_requests(self):
+        """A new breaker is closed and lets requests through."""
+        breaker = CircuitBreaker("p", POLICY)
+        assert breaker.state is BreakerState.CLOSED
+        assert breaker.allow_request() is True
+
+    def test_needs_min_calls_before_opening(self):
+        """A single failure does not open the breaker."""
+        breaker = CircuitBreaker("p", POLICY)
+        breaker.record_failure()
+        assert breaker.state is BreakerState.CLOSED
+
+    def test_opens_at_failure_threshold(self):
+        """The breaker opens once the window's failure rate reaches the threshold."""
+        breaker = CircuitBreaker("p", POLICY)
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state is BreakerState.OPEN
+        assert breaker.stats.opened == 1
+
+    def test_old_outcomes_leave_window(self):
+        """Only the most recent calls count toward the error rate."""
+        breaker = CircuitBreaker("p", BreakerPolicy(window=4, failure_threshold=0.75))
+        for _ in range(4):
+            breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        assert breaker.state is BreakerState.CLOSED
+
+
+class TestOpenAndHalfOpen:
+    """Tests for open and half-open transitions."""
+
+    def _open_breaker(self, clock: FakeClock) -> CircuitBreaker:
+        breaker = CircuitBreaker("p", POLICY, clock=clock)
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state is BreakerState.OPEN
+        return breaker
+
+    def test_rejects_during_cooldown(self, clock: FakeClock):
+        """Open breakers reject requests until the cooldown passes."""
+        breaker = self._open_breaker(clock)
+
+        clock.now = 9.0
+        assert breaker.allow_request() is False
+        assert breaker.stats.rejected == 1
+
+    def test_single_probe_after_cooldown(self, clock: FakeClock):
+        """After the cooldown exactly one probe is let through."""
+        breaker = self._open_breaker(clock)
+
+        clock.now = 10.0
+        assert breaker.allow_request() is True
+        assert breaker.state is BreakerState.HALF_OPEN
+        assert breaker.allow_request() is False
+
+    def test_probe_success_closes(self, clock: FakeClock):
+        """A successful probe closes the breaker with a fresh window."""
+        breaker = self._open_breaker(clock)
+        clock.now = 10.0
+        breaker.allow_request()
+
+        breaker.record_success()
+
+        assert breaker.state is BreakerState.CLOSED
+        assert breaker.allow_request() is True
+
+    def test_probe_failure_reopens(self, clock: FakeClock):
+        """A failed probe reopens the breaker for another cooldown."""
+        breaker = self._open_breaker(clock)
+        clock.now = 10.0
+        breaker.allow_request()
+
+        breaker.record_failure()
+
+        assert breaker.state is BreakerState.OPEN
+        assert breaker.stats.opened == 2
+        clock.now = 15.0
+        assert breaker.allow_request() is False
+
+    def test_release_frees_probe(self, clock: FakeClock):
+        """A probe without an outcome can be retried by the next request."""
+        breaker = self._open_breaker(clock)
+        clock.now = 10.0
+        assert breaker.allow_request() is True
+
+        breaker.release()
+
+        assert breaker.allow_request() is True
+
+
+class TestStateListener:
+    """Tests for state change notifications."""
+
+    def test_reports_transitions(self, clock: FakeClock):
+        """Every transition is passed to the listener."""
+        changes: list[tuple[str, BreakerState, BreakerState]] = []
+        breaker = CircuitBreaker(
+            "openai/m", POLICY, clock=clock, on_state_change=lambda *c: changes.append(c)
+        )
+
+        breaker.record_failure()
+        breaker.record_failure()
+        clock.now = 10.0
+        breaker.allow_request()
+        breaker.record_success()
+
+        assert changes == [
+            ("openai/m", BreakerState.CLOSED, BreakerState.OPEN),
+            ("openai/m", BreakerState.OPEN, BreakerState.HALF_OPEN),
+            ("openai/m", BreakerState.HALF_OPEN, BreakerState.CLOSED),
+        ]
@@ -7,11 +7,19 @@ test task files and monkeypatch for environment variable manipulation.
 """
 
 import json
+import socket
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
 
+from src.apply import ApplyReport
+from src.bench import TaskRun, build_report
+from src.cache import ResponseCache
+from src.cascade import CascadePolicy, ModelCascade
+from src.cegis import CEGISPolicy
 from src.cli import (
     _create_interactive_task,
     _estimate_difficulty,
@@ -19,13 +27,32 @@ from src.cli import (
     _format_jq_not_found_error,
     _format_score,
     _format_task_not_found_error,
+    _parse_apply_args,
     _parse_args,
+    _parse_bench_args,
+    _parse_serve_args,
+    _print_solution,
+    _print_timing_breakdown,
     _setup_logging,
     _validate_json_string,
     load_tasks,
     main,
 )
-from src.domain import Solution, Task
+from src.compaction import CompactionPolicy
+from src.domain import OptimizationResult, ScalingResult, Solution, Task
+from src.generator import GenerationError
+from src.hedging import HedgeStats
+from src.matcher import StructuralMatcher
+from src.metrics import get_metrics
+from src.optimizer import OptimizationPolicy
+from src.perfhistory import PerfHistory
+from src.providers import OpenAIProvider, ProviderSpec
+from src.ratelimit import shared_rate_limiter
+from src.scaling import ScalingPolicy
+from src.server import SynthesisServer
+from src.solutions import DEFAULT_SOLUTIONS_PATH, SolutionStore
+from src.templates import TemplateLibrary
+from src.tracing import get_tracer, span
 
 
 class TestLoadTasksValidJSON:
@@ -529,6 +556,130 @@ class TestParseArgs:
         args = _parse_args(["--task", "all"])
         assert args.task == "all"
 
+    def test_no_matcher_default_false(self):
+        """Structural matching is enabled by default."""
+        args = _parse_args([])
+        assert args.no_matcher is False
+
+    def test_parses_no_matcher_flag(self):
+        """--no-matcher flag is correctly parsed."""
+        args = _parse_args(["--no-matcher"])
+        assert args.no_matcher is True
+
+    def test_parses_http2_flag(self):
+        """--http2 flag is correctly parsed."""
+        assert _parse_args([]).http2 is False
+        assert _parse_args(["--http2"]).http2 is True
+
+    def test_parses_stream_flag(self):
+        """--stream flag is correctly parsed."""
+        assert _parse_args([]).stream is False
+        assert _parse_args(["--stream"]).stream is True
+
+    def test_parses_hedge_options(self):
+        """Hedging is off by default and configured by its flags."""
+        parsed = _parse_args([])
+        assert parsed.hedge_provider is None
+        assert parsed.hedge_model is None
+        assert parsed.hedge_percentile == 95.0
+
+        parsed = _parse_args(
+            ["--hedge-provider", "anthropic", "--hedge-model", "m", "--hedge-percentile", "90"]
+        )
+        assert parsed.hedge_provider == "anthropic"
+        assert parsed.hedge_model == "m"
+        assert parsed.hedge_percentile == 90.0
+
+    def test_parses_fallback_chain(self):
+        """--fallback can be repeated to build an ordered chain."""
+        assert _parse_args([]).fallback is None
+        parsed = _parse_args(["--fallback", "anthropic", "--fallback", "openai:m@http://h/v1"])
+        assert parsed.fallback == ["anthropic", "openai:m@http://h/v1"]
+
+    def test_parses_cegis_options(self):
+        """--cegis enables counterexample-guided mode with configurable sizes."""
+        defaults = _parse_args([])
+        assert defaults.cegis is False
+        assert defaults.cegis_initial == CEGISPolicy.initial_examples
+        assert defaults.cegis_step == CEGISPolicy.counterexamples_per_round
+
+        parsed = _parse_args(["--cegis", "--cegis-initial", "3", "--cegis-step", "2"])
+        assert parsed.cegis is True
+        assert parsed.cegis_initial == 3
+        assert parsed.cegis_step == 2
+
+    def test_parses_max_prompt_tokens(self):
+        """--max-prompt-tokens sets the compaction budget."""
+        assert _parse_args([]).max_prompt_tokens == CompactionPolicy.max_prompt_tokens
+        assert _parse_args(["--max-prompt-tokens", "0"]).max_prompt_tokens == 0
+
+    def test_parses_prompt_cache_options(self):
+        """--prompt-cache and --conversation are off by default."""
+        parsed = _parse_args([])
+        assert parsed.prompt_cache is False
+        assert parsed.conversation is False
+
+        parsed = _parse_args(["--prompt-cache", "--conversation"])
+        assert parsed.prompt_cache is True
+        assert parsed.conversation is True
+
+    def test_parses_cascade_options(self):
+        """--cascade can be repeated and the escalation thresholds are configurable."""
+        defaults = _parse_args([])
+        assert defaults.cascade is None
+        assert defaults.escalate_after == CascadePolicy.escalate_after
+        assert defaults.escalate_on_repeat == CascadePolicy.repeated_error_limit
+        assert defaults.cascade_stats is None
+
+        parsed = _parse_args(
+            [
+                "--cascade",
+                "openai:gpt-4o-mini",
+                "--cascade",
+                "anthropic:claude-haiku",
+                "--escalate-after",
+                "3",
+                "--escalate-on-repeat",
+                "4",
+                "--cascade-stats",
+                "stats.json",
+            ]
+        )
+        assert parsed.cascade == ["openai:gpt-4o-mini", "anthropic:claude-haiku"]
+        assert parsed.escalate_after == 3
+        assert parsed.escalate_on_repeat == 4
+        assert parsed.cascade_stats == "stats.json"
+
+    def test_parses_concurrency(self):
+        """--concurrency defaults to 1 and is parsed as an integer."""
+        assert _parse_args([]).concurrency == 1
+        assert _parse_args(["--concurrency", "8"]).concurrency == 8
+
+    def test_parses_max_connections(self):
+        """--max-connections is parsed as an integer."""
+        assert _parse_args(["--max-connections", "4"]).max_connections == 4
+
+    def test_parses_no_templates_flag(self):
+        """--no-templates flag is correctly parsed."""
+        assert _parse_args([]).no_templates is False
+        assert _parse_args(["--no-templates"]).no_templates is True
+
+    def test_parses_cache_flags(self):
+        """--cache-dir, --cache-ttl and --replay are correctly parsed."""
+        args = _parse_args(["--cache-dir", "c", "--cache-ttl", "60", "--replay"])
+        assert args.cache_dir == "c"
+        assert args.cache_ttl == 60.0
+        assert args.replay is True
+        assert _parse_args([]).cache_dir is None
+
+    def test_parses_rate_limit_flags(self):
+        """--max-retries, --rpm and --tpm are correctly parsed."""
+        args = _parse_args(["--max-retries", "5", "--rpm", "60", "--tpm", "90000"])
+        assert args.max_retries == 5
+        assert args.rpm == 60.0
+        assert args.tpm == 90000.0
+        assert _parse_args([]).rpm is None
+
 
 class TestMainTaskFileMissing:
     """Tests for main handling missing task file."""
@@ -736,6 +887,7 @@ class TestMainBaselineMode:
                     best_score=1.0,
                     iterations_used=1,
                     history=[],
+                    optimization=None,
                 )
                 mock_orch_class.return_value = mock_orch
 
@@ -746,6 +898,244 @@ class TestMainBaselineMode:
                 assert call_kwargs["max_iterations"] == 1
 
 
+class TestMainMatcher:
+    """Tests for wiring the structural matcher into the orchestrator."""
+
+    def _run(self, tmp_path: Path, extra_args: list[str]) -> MagicMock:
+        tasks_data = {
+            "tasks": [
+                {
+                    "id": "test",
+                    "description": "Test",
+                    "examples": [{"input": {"x": 1}, "expected_output": 1}],
+                }
+            ]
+        }
+        tasks_file = tmp_path / "tasks.json"
+        tasks_file.write_text(json.dumps(tasks_data))
+
+        with patch("src.cli.JQExecutor"), patch("src.cli.JQGenerator"):
+            with patch("src.cli.Orchestrator") as mock_orch_class:
+                mock_orch = MagicMock()
+                mock_orch.solve.return_value = MagicMock(
+                    success=True,
+                    task_id="test",
+                    best_filter=".x",
+                    best_score=1.0,
+                    iterations_used=1,
+                    history=[],
+                    optimization=None,
+                )
+                mock_orch_class.return_value = mock_orch
+
+                main(["--task", "test", "--tasks-file", str(tasks_file), *extra_args])
+                return mock_orch_class
+
+    def test_matcher_enabled_by_default(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """The orchestrator receives a StructuralMatcher by default."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = self._run(tmp_path, [])
+
+        assert isinstance(mock_orch_class.call_args[1]["matcher"], StructuralMatcher)
+
+    def test_no_matcher_disables_matcher(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--no-matcher passes matcher=None."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = self._run(tmp_path, ["--no-matcher"])
+
+        assert mock_orch_class.call_args[1]["matcher"] is None
+
+    def test_templates_enabled_by_default(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """The orchestrator receives a TemplateLibrary by default."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = self._run(tmp_path, [])
+
+        assert isinstance(mock_orch_class.call_args[1]["templates"], TemplateLibrary)
+
+    def test_no_templates_disables_library(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--no-templates passes templates=None."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = self._run(tmp_path, ["--no-templates"])
+
+        assert mock_orch_class.call_args[1]["templates"] is None
+
+
+class TestMainCache:
+    """Tests for wiring the response cache into the generator."""
+
+    def _tasks_file(self, tmp_path: Path) -> Path:
+        tasks_file = tmp_path / "tasks.json"
+        tasks_file.write_text(
+            json.dumps(
+                {
+                    "tasks": [
+                        {
+                            "id": "test",
+                            "description": "Test",
+                            "examples": [{"input": {"x": 1}, "expected_output": 1}],
+                        }
+                    ]
+                }
+            )
+        )
+        return tasks_file
+
+    def _run(self, tmp_path: Path, extra_args: list[str]) -> tuple[int, MagicMock]:
+        tasks_file = self._tasks_file(tmp_path)
+        with patch("src.cli.JQExecutor"), patch("src.cli.JQGenerator") as mock_gen_class:
+            with patch("src.cli.Orchestrator") as mock_orch_class:
+                mock_orch_class.return_value.solve.return_value = MagicMock(
+                    success=True,
+                    task_id="test",
+                    best_filter=".x",
+                    best_score=1.0,
+                    iterations_used=1,
+                    history=[],
+                    optimization=None,
+                )
+                code = main(["--task", "test", "--tasks-file", str(tasks_file), *extra_args])
+                return code, mock_gen_class
+
+    def test_max_prompt_tokens_passed_to_generator(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """--max-prompt-tokens becomes the generator's compaction budget."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        _, mock_gen_class = self._run(tmp_path, ["--max-prompt-tokens", "500"])
+
+        assert mock_gen_class.call_args[1]["compaction"] == CompactionPolicy(max_prompt_tokens=500)
+
+    def test_prompt_cache_options_passed_to_generator(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """--prompt-cache and --conversation configure the generator."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        _, mock_gen_class = self._run(tmp_path, [])
+        assert mock_gen_class.call_args[1]["prompt_caching"] is False
+        assert mock_gen_class.call_args[1]["conversation"] is False
+
+        _, mock_gen_class = self._run(tmp_path, ["--prompt-cache", "--conversation"])
+        assert mock_gen_class.call_args[1]["prompt_caching"] is True
+        assert mock_gen_class.call_args[1]["conversation"] is True
+
+    def test_prompt_cache_usage_reported(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """The summary reports how much of the prompt was served from the provider cache."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        provider = OpenAIProvider(api_key="test-key")
+        provider._record_usage(1000, 750, 0)
+
+        with patch("src.cli.JQExecutor"), patch("src.cli.JQGenerator") as mock_gen_class:
+            mock_gen_class.return_value.provider = provider
+            with patch("src.cli.Orchestrator") as mock_orch_class:
+                mock_orch_class.return_value.solve.return_value = MagicMock(
+                    success=True,
+                    task_id="test",
+                    best_filter=".x",
+                    best_score=1.0,
+                    iterations_used=1,
+                    history=[],
+                    optimization=None,
+                )
+                main(["--task", "test", "--tasks-file", str(self._tasks_file(tmp_path))])
+
+        output = capsys.readouterr().out
+        assert "Prompt cache: 750 of 1000 input tokens" in output
+        assert "75.0%" in output
+
+    def test_no_cache_by_default(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Without --cache-dir the generator gets no cache."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        _, mock_gen_class = self._run(tmp_path, [])
+
+        assert mock_gen_class.call_args[1]["cache"] is None
+
+    def test_cache_dir_creates_cache(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--cache-dir attaches a disk-backed ResponseCache."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        cache_dir = tmp_path / "cache"
+
+        _, mock_gen_class = self._run(tmp_path, ["--cache-dir", str(cache_dir)])
+
+        cache = mock_gen_class.call_args[1]["cache"]
+        assert isinstance(cache, ResponseCache)
+        assert cache.directory == cache_dir
+        assert cache.replay is False
+
+    def test_replay_needs_no_api_key(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--replay runs without credentials."""
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        monkeypatch.delenv("LLM_API_KEY", raising=False)
+
+        code, mock_gen_class = self._run(
+            tmp_path, ["--cache-dir", str(tmp_path / "cache"), "--replay"]
+        )
+
+        assert code == 0
+        assert mock_gen_class.call_args[1]["api_key"] is not None
+        assert mock_gen_class.call_args[1]["cache"].replay is True
+
+    def test_rate_limits_create_shared_limiter(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """--rpm attaches a process-wide limiter and --max-retries sets the policy."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        _, mock_gen_class = self._run(
+            tmp_path, ["--rpm", "30", "--max-retries", "5", "--base-url", "http://cli-test"]
+        )
+
+        kwargs = mock_gen_class.call_args[1]
+        assert kwargs["rate_limiter"] is shared_rate_limiter("default:http://cli-test")
+        assert kwargs["rate_limiter"].requests_per_minute == 30
+        assert kwargs["retry_policy"].max_attempts == 5
+
+    def test_no_rate_limiter_by_default(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Without --rpm/--tpm no client-side limiter is used."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        _, mock_gen_class = self._run(tmp_path, [])
+
+        assert mock_gen_class.call_args[1]["rate_limiter"] is None
+
+    def test_replay_without_cache_dir_fails(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ):
+        """--replay without --cache-dir is an error."""
+        code, _ = self._run(tmp_path, ["--replay"])
+
+        assert code == 1
+        assert "cache directory" in capsys.readouterr().err
+
+    @pytest.mark.parametrize(("flag", "value"), [("--rpm", "-1"), ("--tpm", "0"), ("--rpm", "nan")])
+    def test_non_positive_rate_limit_fails(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture[str], flag: str, value: str
+    ):
+        """Rate limits must be positive; the error names the flag."""
+        code, mock_gen_class = self._run(tmp_path, [flag, value])
+
+        assert code == 1
+        assert f"{flag} must be a positive number" in capsys.readouterr().err
+        mock_gen_class.assert_not_called()
+
+    def test_cache_ttl_without_cache_dir_fails(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ):
+        """--cache-ttl would have no effect without an on-disk cache."""
+        code, _ = self._run(tmp_path, ["--cache-ttl", "60"])
+
+        assert code == 1
+        assert "--cache-ttl requires --cache-dir" in capsys.readouterr().err
+
+
 class TestMainMaxIters:
     """Tests for main with --max-iters flag."""
 
@@ -779,6 +1169,7 @@ class TestMainMaxIters:
                     best_score=1.0,
                     iterations_used=1,
                     history=[],
+                    optimization=None,
                 )
                 mock_orch_class.return_value = mock_orch
 
@@ -828,6 +1219,7 @@ class TestMainReturnCode:
                         best_score=1.0,
                         iterations_used=1,
                         history=[],
+                        optimization=None,
                     ),
                     MagicMock(
                         success=True,
@@ -836,6 +1228,7 @@ class TestMainReturnCode:
                         best_score=1.0,
                         iterations_used=1,
                         history=[],
+                        optimization=None,
                     ),
                 ]
                 mock_orch_class.return_value = mock_orch
@@ -881,6 +1274,7 @@ class TestMainReturnCode:
                         best_score=1.0,
                         iterations_used=1,
                         history=[],
+                        optimization=None,
                     ),
                     MagicMock(
                         success=False,
@@ -889,6 +1283,7 @@ class TestMainReturnCode:
                         best_score=0.5,
                         iterations_used=10,
                         history=[],
+                        optimization=None,
                     ),
                 ]
                 mock_orch_class.return_value = mock_orch
@@ -1568,3 +1963,1237 @@ class TestVerboseOutput:
 
         args = _parse_args(["--task", "test"])
         assert args.verbose is False
+
+
+class TestMainConcurrency:
+    """Tests for solving several tasks concurrently on one event loop."""
+
+    def _tasks_file(self, tmp_path: Path) -> Path:
+        tasks_file = tmp_path / "tasks.json"
+        tasks = [
+            {
+                "id": f"t{i}",
+                "description": "Extract x",
+                "examples": [{"input": {"x": i}, "expected_output": i}],
+            }
+            for i in range(3)
+        ]
+        tasks_file.write_text(json.dumps({"tasks": tasks}))
+        return tasks_file
+
+    def _run(self, tmp_path: Path, extra_args: list[str]) -> tuple[int, MagicMock, MagicMock]:
+        tasks_file = self._tasks_file(tmp_path)
+
+        async def solve_async(task: Task, verbose: bool = False) -> Solution:
+            return Solution(
+                task_id=task.id,
+                success=task.id != "t1",
+                best_filter=".x",
+                best_score=1.0,
+                iterations_used=1,
+                history=[],
+            )
+
+        with patch("src.cli.JQExecutor"), patch("src.cli.JQGenerator") as mock_gen_class:
+            mock_gen_class.return_value.call_stats = []
+            with patch("src.cli.Orchestrator") as mock_orch_class:
+                orchestrator = mock_orch_class.return_value
+                orchestrator.solve_async = AsyncMock(side_effect=solve_async)
+                code = main(["--task", "all", "--tasks-file", str(tasks_file), *extra_args])
+                return code, mock_gen_class, orchestrator
+
+    def test_concurrency_uses_solve_async(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """--concurrency > 1 solves every task with solve_async."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        code, mock_gen_class, orchestrator = self._run(tmp_path, ["--concurrency", "2"])
+
+        assert code == 1
+        assert orchestrator.solve_async.await_count == 3
+        orchestrator.solve.assert_not_called()
+        mock_gen_class.return_value.__aexit__.assert_awaited_once()
+        output = capsys.readouterr().out
+        assert "concurrency 2" in output
+        assert "2/3 passed" in output
+
+    def test_generation_error_becomes_failed_solution(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """A GenerationError fails only the affected task."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        tasks_file = self._tasks_file(tmp_path)
+
+        with patch("src.cli.JQExecutor"), patch("src.cli.JQGenerator") as mock_gen_class:
+            mock_gen_class.return_value.call_stats = []
+            with patch("src.cli.Orchestrator") as mock_orch_class:
+                mock_orch_class.return_value.solve_async = AsyncMock(
+                    side_effect=GenerationError("down")
+                )
+                code = main(
+                    ["--task", "all", "--tasks-file", str(tasks_file), "--concurrency", "3"]
+                )
+
+        assert code == 1
+
+    def test_max_connections_bounds_in_flight_requests(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """The generator's in-flight limit follows --max-connections."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        _, mock_gen_class, _ = self._run(tmp_path, ["--concurrency", "2", "--max-connections", "5"])
+
+        assert mock_gen_class.call_args[1]["max_in_flight"] == 5
+
+
+class TestMainHedging:
+    """Tests for wiring hedged requests into the generator."""
+
+    def _run(self, tmp_path: Path, extra_args: list[str]) -> tuple[int, MagicMock, MagicMock]:
+        tasks_file = TestMainCache()._tasks_file(tmp_path)
+        with patch("src.cli.JQExecutor"), patch("src.cli.JQGenerator") as mock_gen_class:
+            mock_gen_class.return_value.hedge_stats = HedgeStats(
+                requests=4, hedged=1, hedge_wins=1, saved_sec=1.5
+            )
+            with (
+                patch("src.cli.create_provider") as mock_create,
+                patch("src.cli.Orchestrator") as mock_orch_class,
+            ):
+                mock_orch_class.return_value.solve.return_value = MagicMock(
+                    success=True,
+                    task_id="test",
+                    best_filter=".x",
+                    best_score=1.0,
+                    iterations_used=1,
+                    history=[],
+                    optimization=None,
+                )
+                code = main(["--task", "test", "--tasks-file", str(tasks_file), *extra_args])
+                return code, mock_gen_class, mock_create
+
+    def test_no_hedging_by_default(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Without hedge flags no secondary provider is created."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        _, mock_gen_class, mock_create = self._run(tmp_path, [])
+
+        assert mock_gen_class.call_args[1]["hedge_provider"] is None
+        mock_create.assert_not_called()
+
+    def test_hedge_model_uses_same_provider(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """--hedge-model creates a secondary provider of the same type and endpoint."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        _, mock_gen_class, mock_create = self._run(
+            tmp_path,
+            [
+                "--base-url",
+                "http://localhost:1/v1",
+                "--hedge-model",
+                "small",
+                "--hedge-percentile",
+                "90",
+            ],
+        )
+
+        kwargs = mock_create.call_args[1]
+        assert kwargs["model"] == "small"
+        assert kwargs["base_url"] == "http://localhost:1/v1"
+        assert mock_gen_class.call_args[1]["hedge_provider"] is mock_create.return_value
+        assert mock_gen_class.call_args[1]["hedge_policy"].percentile == 90.0
+        assert "25.0% of requests hedged" in capsys.readouterr().out
+
+    def test_hedge_provider_of_other_type(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """A different hedge provider type inherits neither the primary's base URL nor model."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        with patch("src.cli.create_member_provider") as mock_member:
+            _, mock_gen_class, _ = self._run(
+                tmp_path,
+                [
+                    "--base-url",
+                    "http://localhost:1/v1",
+                    "--model",
+                    "gpt-4o",
+                    "--hedge-provider",
+                    "anthropic",
+                ],
+            )
+
+        spec, primary_type, _ = mock_member.call_args[0]
+        assert spec == ProviderSpec("anthropic")
+        assert primary_type is None
+        assert mock_gen_class.call_args[1]["hedge_provider"] is mock_member.return_value
+
+    def test_missing_hedge_key_reports_error(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """A hedge provider without credentials fails with the API key help."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        tasks_file = TestMainCache()._tasks_file(tmp_path)
+
+        with (
+            patch("src.cli.JQExecutor"),
+            patch("src.cli.create_member_provider", side_effect=ValueError("API key required")),
+        ):
+            code = main(
+                ["--task", "test", "--tasks-file", str(tasks_file), "--hedge-provider", "anthropic"]
+            )
+
+        assert code == 1
+        assert "ANTHROPIC_API_KEY" in capsys.readouterr().err
+
+
+class TestMainFailover:
+    """Tests for wiring the provider failover chain into the generator."""
+
+    def test_fallbacks_passed_to_generator(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Each --fallback becomes a ProviderSpec, in order."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        _, mock_gen_class = TestMainCache()._run(
+            tmp_path, ["--fallback", "anthropic:claude", "--fallback", "openai@http://h/v1"]
+        )
+
+        assert mock_gen_class.call_args[1]["fallbacks"] == [
+            ProviderSpec("anthropic", model="claude"),
+            ProviderSpec("openai", base_url="http://h/v1"),
+        ]
+
+    def test_replay_fallbacks_need_no_keys(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """In replay mode fallback providers get a placeholder key too."""
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+        _, mock_gen_class = TestMainCache()._run(
+            tmp_path, ["--cache-dir", str(tmp_path / "c"), "--replay", "--fallback", "anthropic"]
+        )
+
+        assert mock_gen_class.call_args[1]["fallbacks"][0].api_key == "replay"
+
+    def test_invalid_fallback_reports_error(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """A malformed --fallback fails with a readable error."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        code, _ = TestMainCache()._run(tmp_path, ["--fallback", ":model"])
+
+        assert code == 1
+        assert "Invalid provider specification" in capsys.readouterr().err
+
+    def test_summary_shows_breaker_health(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """The overall summary lists each provider's circuit breaker."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        tasks_file = TestMainCache()._tasks_file(tmp_path)
+
+        with patch("src.cli.JQExecutor"), patch("src.cli.Orchestrator") as mock_orch_class:
+            mock_orch_class.return_value.solve.return_value = MagicMock(
+                success=True,
+                task_id="test",
+                best_filter=".x",
+                best_score=1.0,
+                iterations_used=1,
+                history=[],
+                optimization=None,
+            )
+            main(
+                [
+                    "--task",
+                    "test",
+                    "--tasks-file",
+                    str(tasks_file),
+                    "--model",
+                    "gpt-4o",
+                    "--fallback",
+                    "anthropic:claude",
+                ]
+            )
+
+        output = capsys.readouterr().out
+        assert "LLM failover: 0 requests served by a fallback" in output
+        assert "openai/gpt-4o: closed, 0 calls" in output
+        assert "anthropic/claude: closed" in output
+
+
+class TestMainCEGIS:
+    """Tests for wiring counterexample-guided mode into the orchestrator."""
+
+    def test_disabled_by_default(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Without --cegis every prompt contains all examples."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = TestMainMatcher()._run(tmp_path, [])
+
+        assert mock_orch_class.call_args[1]["cegis"] is None
+
+    def test_policy_passed_to_orchestrator(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--cegis-initial and --cegis-step configure the policy."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = TestMainMatcher()._run(
+            tmp_path, ["--cegis", "--cegis-initial", "3", "--cegis-step", "0"]
+        )
+
+        assert mock_orch_class.call_args[1]["cegis"] == CEGISPolicy(
+            initial_examples=3, counterexamples_per_round=1
+        )
+
+
+class TestMainScalingReview:
+    """Tests for wiring the scaling review into the orchestrator."""
+
+    def test_disabled_by_default(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Without --scaling-review passing filters are not measured."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = TestMainMatcher()._run(tmp_path, [])
+
+        assert mock_orch_class.call_args[1]["scaling"] is None
+
+    def test_policy_passed_to_orchestrator(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--max-scaling-exponent sets the policy's threshold."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = TestMainMatcher()._run(
+            tmp_path, ["--scaling-review", "--max-scaling-exponent", "1.2"]
+        )
+
+        assert mock_orch_class.call_args[1]["scaling"] == ScalingPolicy(max_exponent=1.2)
+
+    @pytest.mark.parametrize(
+        ("timed_out", "superlinear", "expected"),
+        [
+            (False, False, "Scaling: time ~n^1.0, output empty (n=200..800)"),
+            (False, True, "time ~n^1.0, output empty (n=200..800), superlinear"),
+            (True, True, "Scaling: timed out (n=200..800), superlinear"),
+        ],
+    )
+    def test_printed_with_solution(
+        self,
+        capsys: pytest.CaptureFixture[str],
+        timed_out: bool,
+        superlinear: bool,
+        expected: str,
+    ):
+        """The measured growth of the solution is shown."""
+        scaling = ScalingResult((200, 800), (0.01, 0.04), (0, 0), 1.0, None, timed_out, superlinear)
+
+        _print_solution(Solution("t", True, ".x", 1.0, 1, [], scaling=scaling))
+
+        assert expected in capsys.readouterr().out
+
+
+class TestMainOptimize:
+    """Tests for wiring the filter optimizer into the orchestrator."""
+
+    def test_disabled_by_default(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Without --optimize solutions are not optimized."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = TestMainMatcher()._run(tmp_path, [])
+
+        assert mock_orch_class.call_args[1]["optimization"] is None
+
+    def test_policy_passed_to_orchestrator(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--optimize enables the default policy."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = TestMainMatcher()._run(tmp_path, ["--optimize"])
+
+        assert mock_orch_class.call_args[1]["optimization"] == OptimizationPolicy()
+
+    @pytest.mark.parametrize(
+        ("best_filter", "timed_out", "expected"),
+        [
+            ("map(.a | .b)", False, "Optimized: 4.0x faster at n=1000 (map-fusion), was: map(.a)"),
+            ("map(.a | .b)", True, "Optimized: >=4.0x faster"),
+            (
+                "map(.a) | map(.b)",
+                False,
+                "Optimized: no faster equivalent among 3 alternatives (2 equivalent)",
+            ),
+        ],
+    )
+    def test_printed_with_solution(
+        self,
+        capsys: pytest.CaptureFixture[str],
+        best_filter: str,
+        timed_out: bool,
+        expected: str,
+    ):
+        """The speedup and the original filter are shown."""
+        optimization = OptimizationResult(
+            "map(.a) | map(.b)", best_filter, "map-fusion", 1000, (0.4, 0.1), 4.0, 3, 2, timed_out
+        )
+
+        _print_solution(Solution("t", True, best_filter, 1.0, 1, [], optimization=optimization))
+
+        assert expected in capsys.readouterr().out
+
+
+class TestMainCascade:
+    """Tests for wiring the model cascade into the orchestrator."""
+
+    def test_no_cascade_by_default(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Without --cascade the orchestrator uses a single model."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = TestMainMatcher()._run(tmp_path, [])
+
+        assert mock_orch_class.call_args[1]["cascade"] is None
+
+    def test_cascade_passed_to_orchestrator(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Each --cascade model becomes a tier before the main generator."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        mock_orch_class = TestMainMatcher()._run(
+            tmp_path,
+            [
+                "--cascade",
+                "openai:gpt-4o-mini",
+                "--escalate-after",
+                "3",
+                "--escalate-on-repeat",
+                "1",
+            ],
+        )
+
+        cascade = mock_orch_class.call_args[1]["cascade"]
+        assert isinstance(cascade, ModelCascade)
+        assert len(cascade.generators) == 1
+        assert cascade.policy == CascadePolicy(escalate_after=3, repeated_error_limit=1)
+
+    def test_tier_generators_use_spec(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Tier generators are built from the provider specification."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        with patch("src.cli.create_member_provider") as mock_member:
+            _, mock_gen_class = TestMainCache()._run(
+                tmp_path, ["--cascade", "anthropic:claude-haiku@http://h/v1"]
+            )
+
+        spec, primary_type, _ = mock_member.call_args[0]
+        assert spec == ProviderSpec("anthropic", model="claude-haiku", base_url="http://h/v1")
+        assert primary_type is None
+        assert mock_gen_class.call_args_list[-1][1]["provider"] is mock_member.return_value
+
+    def test_invalid_cascade_reports_error(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """A malformed --cascade fails with a readable error."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        code, _ = TestMainCache()._run(tmp_path, ["--cascade", ":model"])
+
+        assert code == 1
+        assert "Invalid provider specification" in capsys.readouterr().err
+
+    def test_cascade_stats_written(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--cascade-stats writes the per-model statistics file."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        stats_path = tmp_path / "cascade.json"
+
+        TestMainCache()._run(
+            tmp_path, ["--cascade", "openai:gpt-4o-mini", "--cascade-stats", str(stats_path)]
+        )
+
+        data = json.loads(stats_path.read_text())
+        assert data["policy"] == {"escalate_after": 2, "repeated_error_limit": 2}
+        assert data["models"] == {}
+
+
+class TestMainBench:
+    """Tests for the bench subcommand."""
+
+    def _tasks_file(self, tmp_path: Path) -> Path:
+        tasks_file = tmp_path / "suite.json"
+        tasks_file.write_text(
+            json.dumps(
+                {
+                    "tasks": [
+                        {
+                            "id": "get-x",
+                            "description": "Extract x",
+                            "examples": [{"input": {"x": 1}, "expected_output": 1}],
+                        },
+                        {
+                            "id": "get-y",
+                            "description": "Extract y",
+                            "examples": [{"input": {"y": 2}, "expected_output": 2}],
+                        },
+                    ]
+                }
+            )
+        )
+        return tasks_file
+
+    def test_parse_defaults(self):
+        """The bench parser defaults to the basic suite and live mode."""
+        parsed = _parse_bench_args([])
+
+        assert parsed.suite is None
+        assert parsed.replay is False
+        assert parsed.mock is False
+        assert parsed.mock_latency == "fixed:0"
+        assert parsed.max_iters == 10
+
+    def test_replay_and_mock_exclusive(self):
+        """--replay and --mock cannot be combined."""
+        with pytest.raises(SystemExit):
+            _parse_bench_args(["--replay", "--mock"])
+
+    @pytest.mark.usefixtures("executor")
+    def test_mock_run_writes_report(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """A mock run solves scripted tasks and writes the JSON report."""
+        script = tmp_path / "script.json"
+        script.write_text(json.dumps({"rules": [{"match": "Extract x", "response": ".x"}]}))
+        report_path = tmp_path / "report.json"
+
+        code = main(
+            [
+                "bench",
+                "--mock",
+                "--mock-script",
+                str(script),
+                "--suite",
+                str(self._tasks_file(tmp_path)),
+                "--no-matcher",
+                "--no-templates",
+                "--max-iters",
+                "2",
+                "--json",
+                str(report_path),
+                "--label",
+                "test",
+            ]
+        )
+
+        assert code == 0
+        report = json.loads(report_path.read_text())
+        assert report["label"] == "test"
+        assert report["config"]["mode"] == "mock"
+        assert report["summary"]["tasks"] == 2
+        assert report["summary"]["solved"] == 1
+        solved = next(task for task in report["tasks"] if task["success"])
+        assert solved["task_id"] == "get-x"
+        assert solved["llm_requests"] == 1
+        assert solved["jq_spawns"] >= 1
+        assert "BENCHMARK SUMMARY" in capsys.readouterr().out
+
+    @pytest.mark.usefixtures("executor")
+    def test_report_on_stdout(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """With --json -, stdout holds only the report."""
+        code = main(
+            [
+                "bench",
+                "--mock",
+                "--suite",
+                str(self._tasks_file(tmp_path)),
+                "-t",
+                "get-x",
+                "--json",
+                "-",
+            ]
+        )
+
+        captured = capsys.readouterr()
+        assert code == 0
+        assert json.loads(captured.out)["config"]["tasks"] == ["get-x"]
+        assert "BENCHMARK SUMMARY" in captured.err
+
+    @pytest.mark.usefixtures("executor")
+    def test_replay_requires_cache_dir(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """Replay mode without a cache directory is rejected."""
+        code = main(["bench", "--replay", "--suite", str(self._tasks_file(tmp_path))])
+
+        assert code == 1
+        assert "directory" in capsys.readouterr().err
+
+    @pytest.mark.usefixtures("executor")
+    def test_named_suites(
+        self, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """Suite names select the task files bundled with the repository."""
+        monkeypatch.chdir(Path(__file__).resolve().parent.parent)
+
+        code = main(["bench", "--mock", "--suite", "hard", "--suite", "ultimate", "-t", "x"])
+
+        output = capsys.readouterr().out
+        assert code == 0
+        assert "hard_tasks.json" in output
+        assert "ultimate_task.json" in output
+
+    def test_missing_suite(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """A missing suite file is reported."""
+        code = main(["bench", "--mock", "--suite", str(tmp_path / "missing.json")])
+
+        assert code == 1
+        assert "not found" in capsys.readouterr().err
+
+    def test_invalid_suite(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """A malformed suite file is reported."""
+        suite = tmp_path / "bad.json"
+        suite.write_text("{")
+
+        code = main(["bench", "--mock", "--suite", str(suite)])
+
+        assert code == 1
+        assert "Invalid tasks file" in capsys.readouterr().err
+
+    def test_jq_not_found(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """A missing jq binary is reported."""
+        with patch("src.cli.JQExecutor", side_effect=RuntimeError("jq not found")):
+            code = main(["bench", "--mock", "--suite", str(self._tasks_file(tmp_path))])
+
+        assert code == 1
+        assert "jq" in capsys.readouterr().err
+
+    @pytest.mark.usefixtures("executor")
+    def test_unwritable_report(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """A report that cannot be written fails the run."""
+        code = main(
+            [
+                "bench",
+                "--mock",
+                "--suite",
+                str(self._tasks_file(tmp_path)),
+                "--json",
+                str(tmp_path / "missing" / "report.json"),
+            ]
+        )
+
+        assert code == 1
+        assert "could not write report" in capsys.readouterr().err
+
+
+class TestMainCompare:
+    """Tests for the performance history and the compare subcommand."""
+
+    def _report(
+        self, time_sec: float, label: str, *, tasks: int = 20, config: dict | None = None
+    ) -> dict:
+        runs = [
+            TaskRun(
+                suite="suite.json",
+                task_id=f"t{i}",
+                success=True,
+                best_score=1.0,
+                iterations=1,
+                time_sec=time_sec + i * 0.01,
+                llm_requests=1,
+                llm_api_calls=1,
+                prompt_tokens=100,
+                response_tokens=5,
+                jq_spawns=3,
+                jq_time_sec=0.05,
+            )
+            for i in range(tasks)
+        ]
+        return build_report(runs, config=config or {}, label=label)
+
+    def _store(self, tmp_path: Path) -> Path:
+        path = tmp_path / "perf.sqlite"
+        with PerfHistory(path) as history:
+            history.add(self._report(1.0, "base"))
+            history.add(self._report(2.0, "slow"))
+        return path
+
+    def test_regression_fails(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """A significant slowdown between the last two runs returns 1."""
+        code = main(["compare", "--store", str(self._store(tmp_path))])
+
+        out = capsys.readouterr().out
+        assert code == 1
+        assert "run 1 (base" in out
+        assert "significant regression(s): time_sec" in out
+
+    def test_no_regression(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """Comparing a run with itself finds nothing."""
+        code = main(["compare", "base", "base", "--store", str(self._store(tmp_path))])
+
+        assert code == 0
+        assert "No significant regressions" in capsys.readouterr().out
+
+    def test_json_output(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """--json prints every metric and the regressed ones."""
+        code = main(["compare", "base", "slow", "--store", str(self._store(tmp_path)), "--json"])
+
+        data = json.loads(capsys.readouterr().out)
+        assert code == 1
+        assert data["regressions"] == ["time_sec"]
+        assert {m["metric"] for m in data["metrics"]} >= {"solve_rate", "time_sec", "tokens"}
+
+    def test_report_files(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """bench --json reports can be compared without a history."""
+        baseline = tmp_path / "a.json"
+        candidate = tmp_path / "b.json"
+        baseline.write_text(json.dumps(self._report(2.0, "a")))
+        candidate.write_text(json.dumps(self._report(1.0, "b")))
+
+        code = main(["compare", str(baseline), str(candidate), "--store", str(tmp_path / "x")])
+
+        assert code == 0
+        assert "improvement" in capsys.readouterr().out
+
+    def test_list(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """--list shows every stored run."""
+        code = main(["compare", "--list", "--store", str(self._store(tmp_path))])
+
+        out = capsys.readouterr().out
+        assert code == 0
+        assert "20/20 solved  base" in out
+        assert "slow" in out
+
+    def test_missing_history(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """Comparing without a history is an error and does not create one."""
+        store = tmp_path / "missing.sqlite"
+
+        code = main(["compare", "--store", str(store)])
+
+        assert code == 1
+        assert "No performance history" in capsys.readouterr().err
+        assert not store.exists()
+
+    def _files(self, tmp_path: Path, baseline: dict, candidate: dict) -> list[str]:
+        paths = [tmp_path / "a.json", tmp_path / "b.json"]
+        for path, report in zip(paths, (baseline, candidate), strict=True):
+            path.write_text(json.dumps(report))
+        return [str(path) for path in paths]
+
+    def test_different_tasks_refused(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """Runs over different task sets are not compared by default."""
+        files = self._files(tmp_path, self._report(1.0, "a"), self._report(1.0, "b", tasks=15))
+
+        code = main(["compare", *files, "--store", str(tmp_path / "x")])
+
+        assert code == 1
+        assert "5 only in the baseline, 0 only in the candidate" in capsys.readouterr().err
+
+    def test_allow_mismatch(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """--allow-mismatch compares the shared tasks with a warning."""
+        files = self._files(tmp_path, self._report(1.0, "a"), self._report(2.0, "b", tasks=15))
+
+        code = main(["compare", *files, "--store", str(tmp_path / "x"), "--allow-mismatch"])
+
+        captured = capsys.readouterr()
+        assert code == 1
+        assert "comparing the shared tasks" in captured.err
+        assert "Candidate: " in captured.out
+        assert "significant regression(s): time_sec" in captured.out
+
+    def test_no_shared_tasks(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """Runs without a task in common cannot be compared."""
+        files = self._files(tmp_path, self._report(1.0, "a", tasks=0), self._report(1.0, "b"))
+
+        code = main(["compare", *files, "--store", str(tmp_path / "x"), "--allow-mismatch"])
+
+        assert code == 1
+        assert "no tasks in common" in capsys.readouterr().err
+
+    def test_different_settings_warned(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """Runs with different settings are compared with a warning naming them."""
+        files = self._files(
+            tmp_path,
+            self._report(1.0, "a", config={"mode": "mock", "max_iterations": 10}),
+            self._report(1.0, "b", config={"mode": "mock", "max_iterations": 5}),
+        )
+
+        code = main(["compare", *files, "--store", str(tmp_path / "x")])
+
+        assert code == 0
+        assert "settings differ: max_iterations" in capsys.readouterr().err
+
+    def test_unknown_run(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """An unknown run reference is reported."""
+        code = main(["compare", "base", "nope", "--store", str(self._store(tmp_path))])
+
+        assert code == 1
+        assert "No stored benchmark run matches 'nope'" in capsys.readouterr().err
+
+    @pytest.mark.usefixtures("executor")
+    def test_bench_store(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """bench --store adds the run to the history."""
+        store = tmp_path / "perf.sqlite"
+        suite = TestMainBench()._tasks_file(tmp_path)
+
+        code = main(["bench", "--mock", "--suite", str(suite), "--store", str(store)])
+
+        assert code == 0
+        assert "Stored as run 1" in capsys.readouterr().out
+        with PerfHistory(store) as history:
+            assert [run.tasks for run in history.list_runs()] == [2]
+
+
+class TestMainTimings:
+    """Tests for the per-phase timing breakdown."""
+
+    def _solution(self, task_id: str, timings: dict[str, float]) -> Solution:
+        return Solution(
+            task_id=task_id,
+            success=True,
+            best_filter=".x",
+            best_score=1.0,
+            iterations_used=1,
+            history=[],
+            timings=timings,
+        )
+
+    def test_parse_timings(self):
+        """--timings is off by default."""
+        assert _parse_args(["--task", "all"]).timings is False
+        assert _parse_args(["--task", "all", "--timings"]).timings is True
+
+    def test_orchestrator_receives_flag(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--timings enables recording in the orchestrator."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        assert TestMainMatcher()._run(tmp_path, []).call_args[1]["timings"] is False
+        mock_orch_class = TestMainMatcher()._run(tmp_path, ["--timings"])
+
+        assert mock_orch_class.call_args[1]["timings"] is True
+
+    def test_breakdown_table(self, capsys: pytest.CaptureFixture[str]):
+        """Phases are summed over tasks, in pipeline order, with shares."""
+        solutions = [
+            self._solution("a", {"execution": 1.0, "api_call": 2.0}),
+            self._solution("b", {"api_call": 1.0}),
+        ]
+
+        _print_timing_breakdown(solutions, 5.0)
+
+        out = capsys.readouterr().out
+        lines = [line for line in out.splitlines() if line.startswith(("api_call", "execution"))]
+        assert lines[0].split() == ["api_call", "3.000s", "1.500s", "75.0%"]
+        assert lines[1].split() == ["execution", "1.000s", "0.500s", "25.0%"]
+        assert "Recorded 4.000s in phases, 5.000s wall clock" in out
+
+    def test_no_table_without_timings(self, capsys: pytest.CaptureFixture[str]):
+        """Nothing is printed when no timings were recorded."""
+        _print_timing_breakdown([self._solution("a", {})], 1.0)
+
+        assert capsys.readouterr().out == ""
+
+    def test_solution_shows_phases(self, capsys: pytest.CaptureFixture[str]):
+        """Per-task output includes the phase line when timings exist."""
+        from src.cli import _print_solution
+
+        _print_solution(self._solution("a", {"api_call": 0.5}))
+
+        assert "Phases: api_call 0.500s" in capsys.readouterr().out
+
+
+class TestMainTrace:
+    """Tests for writing span traces."""
+
+    def _run(self, tmp_path: Path, extra_args: list[str]) -> int:
+        tasks_file = tmp_path / "tasks.json"
+        tasks_file.write_text(
+            json.dumps(
+                {
+                    "tasks": [
+                        {
+                            "id": "test",
+                            "description": "Test",
+                            "examples": [{"input": {"x": 1}, "expected_output": 1}],
+                        }
+                    ]
+                }
+            )
+        )
+        solution = Solution(
+            task_id="test",
+            success=True,
+            best_filter=".x",
+            best_score=1.0,
+            iterations_used=1,
+            history=[],
+        )
+
+        def solve(task: Task, verbose: bool = False) -> Solution:
+            with span("Orchestrator.solve", task_id=task.id):
+                return solution
+
+        with patch("src.cli.JQExecutor"), patch("src.cli.JQGenerator"):
+            with patch("src.cli.Orchestrator") as mock_orch_class:
+                mock_orch_class.return_value.solve.side_effect = solve
+                return main(["--task", "test", "--tasks-file", str(tasks_file), *extra_args])
+
+    def test_parse_trace(self):
+        """Tracing is off by default and writes Chrome traces."""
+        parsed = _parse_args(["--task", "all"])
+        assert parsed.trace is None
+        assert parsed.trace_format == "chrome"
+
+    def test_chrome_trace_written(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """--trace writes the spans of the run and turns tracing off again."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        trace_file = tmp_path / "trace.json"
+
+        assert self._run(tmp_path, ["--trace", str(trace_file)]) == 0
+
+        events = json.loads(trace_file.read_text())["traceEvents"]
+        assert [e["name"] for e in events if e["ph"] == "X"] == ["Orchestrator.solve"]
+        assert f"Trace written to {trace_file} (1 spans)" in capsys.readouterr().out
+        assert get_tracer() is None
+
+    def test_otlp_trace_written(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--trace-format otlp writes OTLP/JSON."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        trace_file = tmp_path / "trace.otlp.json"
+
+        self._run(tmp_path, ["--trace", str(trace_file), "--trace-format", "otlp"])
+
+        request = json.loads(trace_file.read_text())
+        spans = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert spans[0]["name"] == "Orchestrator.solve"
+
+    def test_unwritable_trace_reported(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """A trace that cannot be written is reported without failing the run."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        code = self._run(tmp_path, ["--trace", str(tmp_path / "missing" / "trace.json")])
+
+        assert code == 0
+        assert "could not write trace" in capsys.readouterr().err
+
+
+class TestMainMetrics:
+    """Tests for exporting Prometheus metrics."""
+
+    def test_parse_metrics(self):
+        """Metrics are off by default."""
+        parsed = _parse_args(["--task", "all"])
+        assert parsed.metrics_file is None
+        assert parsed.metrics_port is None
+
+    def test_metrics_file_written(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """--metrics-file writes the exposition and turns metrics off again."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        metrics_file = tmp_path / "synth.prom"
+
+        assert TestMainTrace()._run(tmp_path, ["--metrics-file", str(metrics_file)]) == 0
+
+        text = metrics_file.read_text()
+        assert "# TYPE jq_synth_tasks_total counter" in text
+        assert "jq_synth_jq_spawns_total 0" in text
+        assert get_metrics() is None
+
+    def test_metrics_served_during_run(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """--metrics-port serves the endpoint while tasks run."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        assert TestMainTrace()._run(tmp_path, ["--metrics-port", "0"]) == 0
+
+        assert "Serving metrics on http://127.0.0.1:" in capsys.readouterr().out
+
+    def test_port_in_use(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """A port that cannot be bound is an error before any task runs."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+        with socket.socket() as taken:
+            taken.bind(("127.0.0.1", 0))
+            taken.listen()
+            port = taken.getsockname()[1]
+            code = TestMainTrace()._run(tmp_path, ["--metrics-port", str(port)])
+
+        assert code == 1
+        assert "could not serve metrics" in capsys.readouterr().err
+
+
+class TestMainProfile:
+    """Tests for per-task profiling."""
+
+    def test_parse_profile(self):
+        """Profiling is off by default."""
+        parsed = _parse_args(["--task", "all"])
+        assert parsed.profile is None
+        assert parsed.profile_dir == "profiles"
+        assert _parse_args(["--task", "all", "--profile", "mem"]).profile == "mem"
+
+    def test_cpu_profile_written(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """--profile cpu writes a pstats file per task and prints the merged report."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        profile_dir = tmp_path / "profiles"
+
+        code = TestMainTrace()._run(
+            tmp_path, ["--profile", "cpu", "--profile-dir", str(profile_dir), "--concurrency", "4"]
+        )
+
+        assert code == 0
+        assert sorted(p.name for p in profile_dir.iterdir()) == [
+            "001-test.pstats",
+            "merged.pstats",
+            "report.txt",
+        ]
+        out = capsys.readouterr().out
+        assert "CPU profile of 1 task(s)" in out
+        assert f"Per-task profiles and report written to {profile_dir}/" in out
+
+    def test_concurrency_ignored(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """Profiled tasks run one at a time."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        tasks_file = tmp_path / "tasks.json"
+        tasks_file.write_text(
+            json.dumps(
+                {
+                    "tasks": [
+                        {
+                            "id": name,
+                            "description": "d",
+                            "examples": [{"input": 1, "expected_output": 1}],
+                        }
+                        for name in ("a", "b")
+                    ]
+                }
+            )
+        )
+
+        with (
+            patch("src.cli.JQExecutor"),
+            patch("src.cli.JQGenerator"),
+            patch("src.cli._run_tasks_async") as run_async,
+            patch("src.cli._run_tasks", return_value=([], 0.0)) as run_sync,
+        ):
+            main(
+                [
+                    "--task",
+                    "all",
+                    "--tasks-file",
+                    str(tasks_file),
+                    "--concurrency",
+                    "4",
+                    "--profile",
+                    "mem",
+                    "--profile-dir",
+                    str(tmp_path / "p"),
+                ]
+            )
+
+        run_async.assert_not_called()
+        assert run_sync.call_args[1]["profiler"].mode == "mem"
+        assert "ignoring --concurrency" in capsys.readouterr().out
+
+    def test_unusable_directory(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        """A profile directory that cannot be created is an error."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+
+        code = TestMainTrace()._run(
+            tmp_path, ["--profile", "cpu", "--profile-dir", str(blocker / "sub")]
+        )
+
+        assert code == 1
+        assert "could not create profile directory" in capsys.readouterr().err
+
+
+class TestMainServe:
+    """Tests for the serve subcommand."""
+
+    def test_parse_defaults(self):
+        """The service listens on localhost with bounded workers and queue."""
+        parsed = _parse_serve_args([])
+
+        assert (parsed.host, parsed.port) == ("127.0.0.1", 8765)
+        assert (parsed.workers, parsed.max_queue, parsed.max_iters) == (2, 100, 10)
+        assert (parsed.max_finished, parsed.finished_ttl) == (1000, 3600.0)
+        assert parsed.mock is False
+
+    def test_invalid_limits(self, capsys: pytest.CaptureFixture[str]):
+        """Worker, queue and iteration limits must be positive."""
+        assert main(["serve", "--workers", "0"]) == 1
+        assert "must be at least 1" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("args", [["--max-finished", "-1"], ["--finished-ttl", "-5"]])
+    def test_invalid_retention(self, args: list[str], capsys: pytest.CaptureFixture[str]):
+        """Finished-job retention limits must not be negative."""
+        assert main(["serve", *args]) == 1
+        assert "must not be negative" in capsys.readouterr().err
+
+    @pytest.mark.usefixtures("executor")
+    def test_mock_service(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """With --mock, submitted tasks are solved by the scripted stand-in provider."""
+        script = tmp_path / "script.json"
+        script.write_text(json.dumps({"rules": [{"match": "Extract x", "response": ".x"}]}))
+        results: list[dict[str, Any]] = []
+
+        def serve_forever(server: SynthesisServer) -> None:
+            server.start()
+            task = {
+                "description": "Extract x",
+                "examples": [{"input": {"x": 1}, "expected_output": 1}],
+            }
+            job = httpx.post(f"{server.url}/jobs", json={"task": task}).json()
+            httpx.get(f"{server.url}/jobs/{job['id']}/events", timeout=10)
+            results.append(httpx.get(f"{server.url}/jobs/{job['id']}").json())
+            raise KeyboardInterrupt
+
+        with patch.object(SynthesisServer, "serve_forever", serve_forever):
+            code = main(
+                [
+                    "serve",
+                    "--mock",
+                    "--mock-script",
+                    str(script),
+                    "--port",
+                    "0",
+                    "--no-matcher",
+                    "--no-templates",
+                ]
+            )
+
+        assert code == 0
+        assert results[0]["status"] == "solved"
+        assert results[0]["result"]["filter"] == ".x"
+        out = capsys.readouterr().out
+        assert "Serving on http://127.0.0.1:" in out
+        assert "mock LLM at" in out
+        assert get_metrics() is None
+
+    @pytest.mark.usefixtures("executor")
+    def test_port_in_use(self, capsys: pytest.CaptureFixture[str]):
+        """A port that cannot be bound is an error."""
+        with socket.socket() as taken:
+            taken.bind(("127.0.0.1", 0))
+            taken.listen()
+            port = taken.getsockname()[1]
+
+            code = main(["serve", "--mock", "--port", str(port)])
+
+        assert code == 1
+        assert "could not listen" in capsys.readouterr().err
+
+
+class TestMainApply:
+    """Tests for the apply subcommand and --save-solutions."""
+
+    def test_parse_defaults(self):
+        """Output is ordered, in auto-detected format, with 4M chunks."""
+        parsed = _parse_apply_args(["-f", ".", "in.ndjson"])
+
+        assert (parsed.format, parsed.unordered, parsed.chunk_size) == ("auto", False, "4M")
+        assert parsed.engine == "jq"
+        assert parsed.solutions == DEFAULT_SOLUTIONS_PATH
+        assert parsed.workers >= 1
+
+    def test_filter_or_task_required(self):
+        """Exactly one of --filter and --task is required."""
+        with pytest.raises(SystemExit):
+            _parse_apply_args(["in.ndjson"])
+        with pytest.raises(SystemExit):
+            _parse_apply_args(["-f", ".", "-t", "x", "in.ndjson"])
+
+    @pytest.mark.usefixtures("executor")
+    def test_apply_filter_to_file(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """The filter's output is written to --output and the throughput reported."""
+        source = tmp_path / "in.ndjson"
+        source.write_text("".join(json.dumps({"x": i}) + "\n" for i in range(50)))
+        output = tmp_path / "out.ndjson"
+
+        code = main(
+            ["apply", "-f", ".x", str(source), "-o", str(output), "-j", "2", "--chunk-size", "64"]
+        )
+
+        assert code == 0
+        assert output.read_text().split() == [str(i) for i in range(50)]
+        err = capsys.readouterr().err
+        assert "Applied .x to 50 records (1 files," in err
+        assert "2 workers" in err
+        assert "records/s" in err
+
+    @pytest.mark.usefixtures("executor")
+    def test_failed_chunks_reported(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """Failed chunks are listed with their byte range and jq's error."""
+        source = tmp_path / "in.ndjson"
+        source.write_text('{"x": 1}\n{"x": "a"}\n')
+
+        code = main(["apply", "-f", ".x + 1", str(source), "-j", "1"])
+
+        assert code == 1
+        captured = capsys.readouterr()
+        assert captured.out == "2\n"
+        assert "1 chunk(s) failed" in captured.err
+        assert "chunk 0 (" in captured.err
+        assert "bytes 0-20, 2 records): exit 5: jq: error" in captured.err
+
+    @pytest.mark.usefixtures("executor")
+    def test_engine_option(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """--engine python runs the compiled filter and rejects unsupported filters."""
+        source = tmp_path / "in.ndjson"
+        source.write_text('{"x": 1}\n{"x": 2}\n')
+
+        code = main(["apply", "-f", ".x * 2", "--engine", "python", str(source), "-j", "1"])
+        unsupported = main(["apply", "-f", ".x as $v | $v", "--engine", "python", str(source)])
+
+        assert (code, unsupported) == (0, 1)
+        captured = capsys.readouterr()
+        assert captured.out == "2\n4\n"
+        assert "1 workers, python)" in captured.err
+        assert "Unsupported jq feature: variable bindings" in captured.err
+
+    def test_save_and_apply_stored_solution(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ):
+        """--save-solutions stores solved filters that apply --task runs."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        store = tmp_path / "solutions.json"
+        source = tmp_path / "in.ndjson"
+        source.write_text('{"x": 7}\n')
+
+        TestMainMatcher()._run(tmp_path, ["--save-solutions", str(store)])
+
+        assert f"Saved 1 solution(s) to {store}" in capsys.readouterr().out
+        assert SolutionStore(store).get("test").filter == ".x"  # type: ignore[union-attr]
+        with patch("src.cli.apply_filter") as mock_apply:
+            mock_apply.return_value = ApplyReport(1, 1, 1, 2, 0.1, 1, [])
+            code = main(["apply", "-t", "test", "--solutions", str(store), str(source)])
+        assert code == 0
+        assert mock_apply.call_args[0][1] == ".x"
+
+    def test_unknown_task(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """A task without a stored filter is an error."""
+        code = main(["apply", "-t", "nope", "--solutions", str(tmp_path / "s.json"), "in"])
+
+        assert code == 1
+        assert "No stored filter for task 'nope'" in capsys.readouterr().err
+
+    @pytest.mark.parametrize(
+        ("option", "message"),
+        [(["--chunk-size", "4X"], "Invalid size"), (["-j", "0"], "must be positive")],
+    )
+    def test_invalid_options(
+        self, option: list[str], message: str, capsys: pytest.CaptureFixture[str]
+    ):
+        """Sizes and limits are validated before any file is read."""
+        assert main(["apply", "-f", ".", "in", *option]) == 1
+        assert message in capsys.readouterr().err
+
+    @pytest.mark.usefixtures("executor")
+    def test_missing_input(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+        """An unreadable input file is an error."""
+        assert main(["apply", "-f", ".", str(tmp_path / "missing.ndjson")]) == 1
+        assert "Error:" in capsys.readouterr().err
@@ -0,0 +1,204 @@
+"""
+Unit tests for prompt compaction.
+
+This module tests schema inference, relevance pruning, array sampling and
+the compaction levels applied to large examples.
+"""
+
+import json
+
+import pytest
+
+from src.compaction import (
+    MAX_LEVEL,
+    SCHEMA_ONLY_LEVEL,
+    SINGLE_ITEM_LEVEL,
+    CompactionPolicy,
+    compact_example,
+    infer_schema,
+)
+from src.domain import Example
+
+
+def _users(count: int) -> list[dict[str, object]]:
+    """Create a list of user records."""
+    return [
+        {"id": i, "name": f"user{i}", "active": i % 2 == 0, "tags": ["a", "b"]}
+        for i in range(count)
+    ]
+
+
+class TestInferSchema:
+    """Tests for schema summaries."""
+
+    def test_merges_array_items(self):
+        """Array items share one path and sizes are reported."""
+        schema = infer_schema({"users": _users(50)})
+
+        assert ".users: array (50 items)" in schema
+        assert ".users[].name: string" in schema
+        assert ".users[].active: boolean" in schema
+        assert ".users[].tags: array (2 items)" in schema
+
+    def test_mixed_types_and_lengths(self):
+        """Differing types and array lengths are all shown."""
+        schema = infer_schema([{"v": 1, "xs": []}, {"v": None, "xs": [1, 2]}])
+
+        assert ".[].v: null|number" in schema
+        assert ".[].xs: array (0-2 items)" in schema
+
+    def test_quotes_non_identifier_keys(self):
+        """Keys that are not identifiers use jq's quoted syntax."""
+        assert '."first name": string' in infer_schema({"first name": "Ann"})
+
+    def test_scalar_root(self):
+        """A scalar input has a single root line."""
+        assert infer_schema(42) == [".: number"]
+
+    def test_line_limit(self):
+        """Long schemas are cut off with a summary line."""
+        schema = infer_schema({f"k{i}": i for i in range(100)}, max_lines=10)
+
+        assert len(schema) == 10
+        assert schema[-1] == "... 92 more paths"
+
+
+class TestCompactExample:
+    """Tests for compacting one example."""
+
+    def _example(self) -> Example:
+        users = _users(1000)
+        return Example(
+            input_data={"users": users, "meta": {"source": "db", "version": 2}},
+            expected_output=[u["name"] for u in users if u["active"]],
+        )
+
+    def test_samples_arrays_and_prunes_unrelated_data(self):
+        """Unrelated nested data is dropped; related arrays are sampled."""
+        compacted = compact_example(self._example(), CompactionPolicy(), level=1)
+
+        sample = json.loads(compacted.input_json or "null")
+        assert set(sample) == {"users"}
+        assert len(sample["users"]) == 3
+        # Scalar siblings such as the selection condition are kept,
+        # nested unrelated data is not
+        assert set(sample["users"][0]) == {"id", "name", "active"}
+
+    def test_prefers_items_in_output_with_contrast(self):
+        """Sampled items include matching ones and one that does not match."""
+        compacted = compact_example(self._example(), CompactionPolicy(), level=1)
+
+        sample = json.loads(compacted.input_json or "null")
+        assert [u["active"] for u in sample["users"]] == [True, False, True]
+
+    def test_schema_describes_full_input(self):
+        """The schema still lists the pruned fields and the real array size."""
+        compacted = compact_example(self._example(), CompactionPolicy(), level=1)
+
+        assert ".users: array (1000 items)" in compacted.schema
+        assert ".meta.source: string" in compacted.schema
+        assert ".users[].tags[]: string" in compacted.schema
+
+    def test_expected_output_is_sampled(self):
+        """Large expected outputs keep only what the sampled input items produce."""
+        compacted = compact_example(self._example(), CompactionPolicy(), level=1)
+
+        # The input sample shows user0, user1 and user2; user1 is inactive
+        assert json.loads(compacted.output_json) == ["user0", "user2"]
+        assert compacted.output_sampled
+
+    def test_mapped_output_keeps_input_indices(self):
+        """An output as long as a sampled array keeps the same items."""
+        users = _users(1000)
+        example = Example(
+            input_data=users,
+            expected_output=[{"n": u["id"] * 10, "a": u["active"]} for u in users],
+        )
+
+        compacted = compact_example(example, CompactionPolicy(), level=1)
+
+        sample = json.loads(compacted.input_json or "null")
+        output = json.loads(compacted.output_json)
+        assert [o["n"] for o in output] == [u["id"] * 10 for u in sample]
+
+    def test_unrelated_output_keeps_first_items(self):
+        """Without any shared values the first output items are shown."""
+        example = Example(input_data=_users(1000), expected_output=list(range(-100, 0)))
+
+        compacted = compact_example(example, CompactionPolicy(), level=1)
+
+        assert json.loads(compacted.output_json) == [-100, -99, -98]
+
+    def test_small_output_not_sampled(self):
+        """Outputs within the item limit are shown whole and not labelled sampled."""
+        example = Example(input_data=_users(1000), expected_output=["user0"])
+
+        compacted = compact_example(example, CompactionPolicy(), level=1)
+
+        assert json.loads(compacted.output_json) == ["user0"]
+        assert not compacted.output_sampled
+
+    def test_single_item_level(self):
+        """Level 2 keeps one item per array."""
+        compacted = compact_example(self._example(), CompactionPolicy(), SINGLE_ITEM_LEVEL)
+
+        sample = json.loads(compacted.input_json or "null")
+        assert len(sample["users"]) == 1
+        assert json.loads(compacted.output_json) == ["user0"]
+
+    def test_schema_only_level(self):
+        """The last level omits the input sample."""
+        compacted = compact_example(self._example(), CompactionPolicy(), SCHEMA_ONLY_LEVEL)
+
+        assert compacted.input_json is None
+        assert compacted.schema
+
+    def test_no_relation_keeps_everything(self):
+        """If nothing in the input matches the output, nothing is pruned."""
+        example = Example(input_data={"items": _users(10), "meta": {"a": 1}}, expected_output=12345)
+
+        compacted = compact_example(example, CompactionPolicy(), level=1)
+
+        sample = json.loads(compacted.input_json or "null")
+        assert set(sample) == {"items", "meta"}
+        assert "tags" in sample["items"][0]
+
+    def test_output_keys_keep_subtrees(self):
+        """Keys that appear in the output keep their whole subtree."""
+        example = Example(
+            input_data={"config": {"db": {"host": "h"}}, "logs": [{"line": "x"}]},
+            expected_output={"config": {"db": {"host": "h"}}},
+        )
+
+        compacted = compact_example(example, CompactionPolicy(), level=1)
+
+        assert json.loads(compacted.input_json or "null") == {"config": {"db": {"host": "h"}}}
+
+    def test_truncates_long_unrelated_strings(self):
+        """Long strings are truncated unless they appear in the output."""
+        long_text = "x" * 500
+        example = Example(
+            input_data={"bio": long_text, "quote": "q" * 500},
+            expected_output="q" * 500,
+        )
+
+        compacted = compact_example(example, CompactionPolicy(max_string_chars=10), level=1)
+
+        sample = json.loads(compacted.input_json or "null")
+        assert sample["bio"] == "x" * 10 + "..."
+        assert sample["quote"] == "q" * 500
+
+    def test_example_is_not_modified(self):
+        """Compaction works on copies; the example keeps its full data."""
+        example = self._example()
+
+        compact_example(example, CompactionPolicy(), level=1)
+
+        assert len(example.input_data["users"]) == 1000
+        assert "tags" in example.input_data["users"][0]
+
+    @pytest.mark.parametrize("level", [0, MAX_LEVEL + 1])
+    def test_invalid_level(self, level: int):
+        """Levels outside 1..MAX_LEVEL are rejected."""
+        with pytest.raises(ValueError, match="Compaction level"):
+            compact_example(self._example(), CompactionPolicy(), level)
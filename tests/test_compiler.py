@@ -0,0 +1,384 @@
+"""
+Tests for compiling jq filters to Python.
+
+This module tests parsing of the supported subset and rejection of the rest,
+evaluation and runtime errors, jq's number formatting, compiled output
+against the jq binary (row by row and column-wise), and the NumPy
+column-wise plans and their fallback to rows.
+"""
+
+import json
+import math
+import random
+import warnings
+from typing import Any
+
+import pytest
+
+from src.compiler import (
+    MIN_COLUMNAR_ROWS,
+    FilterRuntimeError,
+    UnsupportedFilterError,
+    compile_filter,
+    compile_solution,
+    numpy_available,
+    to_json,
+    tokenize,
+)
+from src.domain import Solution
+from src.executor import JQExecutor
+
+# Filters checked against the jq binary
+DIFFERENTIAL_FILTERS = [
+    ".",
+    ".a.b",
+    ".n.m",
+    ".x[]?",
+    "[.x[]?]",
+    ".x | .[0]?",
+    ".x | length",
+    ".x | keys",
+    ".x | add",
+    ".x | sort",
+    ".x | tostring",
+    ".x | not",
+    "select(.a > 1) | {c}",
+    "select(.a >= 2 and .b < 5) | {a, c, s: (.a + .b)}",
+    'select(.c < "y") | {c, b}',
+    "select(.a == null)",
+    "select(.b * 2 > 3) | {d: (.b / 2), m: (.b * .b - 1), n: -.b}",
+    "select((.b > 1) | not)",
+    'select(.b > 1 or .c == "zz") | .c',
+    '{"k": .c, "v": [.a, .b]}',
+    "{(.c): .b}",
+    ".a + .b",
+    ".a - .b",
+    ".a / .b",
+    ".a % .b",
+    ".x + .x",
+    ".x * .x",
+    ".x < .x",
+    "[.x, .a] | sort",
+    '.x // "none"',
+    "(.a, .b) // 0",
+    'if .a == 1 then "one" elif .a == 2 then "two" else "many" end',
+    '.x | has("a")',
+    ".x | map(. + 1)",
+    '[.x[]? | select(type == "number")]',
+    ".x[-1]",
+    '.x["a"]',
+    "{x: (.a, .b), y: (.b, .c)}",
+    ".a and .b",
+    ".a or .x",
+    ".a, empty, .b",
+    '.c / ""',
+    ".c * 2",
+    ".b * 1e16",
+]
+
+# Input values of mixed types, for the fields x and a
+_VALUES: list[Any] = [
+    None,
+    True,
+    False,
+    0,
+    1,
+    -1,
+    2.5,
+    -0.5,
+    10,
+    1e16,
+    12345678901234567,
+    "a",
+    "",
+    "é\x7f",
+    0.1,
+    1.5e300,
+    [],
+    [1, "b", None],
+    [3, 1, 2],
+    {"a": 1, "b": [2]},
+    {},
+]
+
+
+# Homogeneous objects, planned column-wise
+_ROWS = [
+    {"id": i, "price": [0.5, 1, 2.25, 10][i % 4], "qty": i % 7, "name": "ab"[i % 2]}
+    for i in range(MIN_COLUMNAR_ROWS * 2)
+]
+
+
+def _records(count: int, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "a": rng.choice([1, 2, 3, 5.5, -2, 0, None, "s", True]),
+            "b": rng.choice([1, 2, 0, 10, -3, 4.25]),
+            "c": rng.choice(["x", "y", "zz", "", "é"]),
+            "x": rng.choice(_VALUES),
+            "n": {"m": rng.choice([1, 2, None])},
+        }
+        for _ in range(count)
+    ]
+
+
+def _run(filter_code: str, value: Any) -> list[Any]:
+    return compile_filter(filter_code, columnar=False)(value)
+
+
+class TestParse:
+    """Tests for the supported subset and its limits."""
+
+    @pytest.mark.parametrize(
+        ("filter_code", "message"),
+        [
+            (".a as $x | $x", "variable bindings"),
+            ("$x", "variables"),
+            (".a = 1", "assignment"),
+            (".[1:2]", "slices"),
+            ("..", "recursive descent"),
+            ("@base64", "formats"),
+            ('"\\(.a)"', "string interpolation"),
+            ('"\\("x")"', "string interpolation"),
+            ("{$x}", "variables"),
+            ("reduce .[] as $x (0; . + $x)", "reduce"),
+            ("try .a", "try/catch"),
+            ("ascii_downcase", "builtin: ascii_downcase/0"),
+            ("map(.; .)", "builtin: map/2"),
+        ],
+    )
+    def test_unsupported_features(self, filter_code: str, message: str):
+        """Features outside the subset are named in the error."""
+        with pytest.raises(UnsupportedFilterError, match=message):
+            compile_filter(filter_code)
+
+    @pytest.mark.parametrize(
+        "filter_code", ["", ".a |", "{a", "(.a", "1 < 2 < 3", ".a ]", "#", '"open']
+    )
+    def test_syntax_errors(self, filter_code: str):
+        """Invalid filters are rejected as unsupported (jq would reject them too)."""
+        with pytest.raises(UnsupportedFilterError):
+            compile_filter(filter_code)
+
+    def test_tokenize(self):
+        """Tokens carry their offsets; strings stay whole, nested interpolations included."""
+        tokens = tokenize('.a as $v | "x\\("y")" # comment')
+
+        assert [(t.kind, t.text) for t in tokens] == [
+            ("field", ".a"),
+            ("ident", "as"),
+            ("var", "$v"),
+            ("op", "|"),
+            ("string", '"x\\("y")"'),
+        ]
+        assert (tokens[2].start, tokens[2].end) == (6, 8)
+
+    def test_precedence(self):
+        """Pipe binds loosest, then comma, //, or, and, comparisons and arithmetic."""
+        assert _run("1 + 2 * 3, 4 | . - 1", None) == [6, 3]
+        assert _run(".a // 1 == 1", {}) == [True]
+        assert _run("true or false and false", None) == [True]
+        assert _run("-1 - -2", None) == [1]
+
+    def test_compile_solution(self):
+        """Solved tasks compile; unsolved ones are rejected."""
+        solution = Solution("t", True, ".a + 1", 1.0, 1, [])
+
+        assert compile_solution(solution)({"a": 1}) == [2]
+        with pytest.raises(ValueError, match="not solved"):
+            compile_solution(Solution("t", False, ".a", 0.5, 1, []))
+
+
+class TestEvaluate:
+    """Tests for evaluation of compiled filters."""
+
+    @pytest.mark.parametrize(
+        ("filter_code", "value", "expected"),
+        [
+            (".a.b", {"a": {"b": 1}}, [1]),
+            (".a", None, [None]),
+            (".[]", {"a": 1, "b": 2}, [1, 2]),
+            ("[.[] | . * 2]", [1, 2], [[2, 4]]),
+            ("map(select(. > 1))", [1, 2, 3], [[2, 3]]),
+            ("{a, b: .c}", {"a": 1, "c": 2}, [{"a": 1, "b": 2}]),
+            ("{(.k): .v}", {"k": "x", "v": 1}, [{"x": 1}]),
+            ("{a: (1, 2)}", None, [{"a": 1}, {"a": 2}]),
+            ("length", "héllo", [5]),
+            ("length", -3, [3]),
+            ("keys", {"b": 1, "a": 2}, [["a", "b"]]),
+            ("keys_unsorted", {"b": 1, "a": 2}, [["b", "a"]]),
+            ("add", [[1], [2]], [[1, 2]]),
+            ("add", [], [None]),
+            ("sort", [{"a": 1}, "b", 2, None, True, [0]], [[None, True, 2, "b", [0], {"a": 1}]]),
+            ("type", [], ["array"]),
+            ("tostring", {"a": 1}, ['{"a":1}']),
+            ("has(1)", [0, 1], [True]),
+            ('has("a")', None, [False]),
+            ("empty", 1, []),
+            (".a // .b", {"a": False, "b": 2}, [2]),
+            ("[.[] // 0]", [None, 1], [[1]]),
+            ("[.[] // 0]", [None, False], [[0]]),
+            ("if . then 1 end", False, [False]),
+            (".a?", 1, []),
+            ('"ab" * 3', None, ["ababab"]),
+            ('"ab" * 0', None, [None]),
+            ('"a,b" / ","', None, [["a", "b"]]),
+            ("{a: {b: 1}} * {a: {c: 2}}", None, [{"a": {"b": 1, "c": 2}}]),
+            ("[1, 2, 1] - [1]", None, [[2]]),
+            ("5 % -3, -5 % 3", None, [2, -2]),
+            ("1 / 4", None, [0.25]),
+        ],
+    )
+    def test_outputs(self, filter_code: str, value: Any, expected: list[Any]):
+        """Outputs follow jq."""
+        assert _run(filter_code, value) == expected
+
+    @pytest.mark.parametrize(
+        ("filter_code", "value", "message"),
+        [
+            (".a", [1], 'Cannot index array with string "a"'),
+            (".[0]", {}, "Cannot index object with number"),
+            (".[]", 1, r"Cannot iterate over number \(1\)"),
+            (".a + 1", {"a": "x"}, r'string \("x"\) and number \(1\) cannot be added'),
+            (". - 1", "abcdefghijklmnopq", r'string \("abcdefghij...\) and number'),
+            (". / 0", 1, "cannot be divided because the divisor is zero"),
+            (". % 0", 1, r"cannot be divided \(remainder\) because the divisor is zero"),
+            ("length", True, "boolean .* has no length"),
+            ("keys", 1, "has no keys"),
+        ],
+    )
+    def test_runtime_errors(self, filter_code: str, value: Any, message: str):
+        """Errors carry jq's message."""
+        with pytest.raises(FilterRuntimeError, match=message):
+            _run(filter_code, value)
+
+    def test_batch_keeps_outputs_before_errors(self):
+        """run_batch goes on after a failed input, keeping its earlier outputs, like jq."""
+        compiled = compile_filter(".a, .b + 1")
+        failed: list[int] = []
+
+        outputs = compiled.run_batch(
+            [{"a": 1, "b": 1}, {"a": 2, "b": "x"}, {"a": 3, "b": 3}],
+            lambda i, _: failed.append(i),
+        )
+
+        assert outputs == [1, 2, 2, 3, 4]
+        assert failed == [1]
+        with pytest.raises(FilterRuntimeError):
+            compiled.run_batch([{"b": "x"}])
+
+
+class TestToJson:
+    """Tests for jq's output formatting."""
+
+    @pytest.mark.parametrize(
+        ("value", "text"),
+        [
+            (1.0, "1"),
+            (-0.0, "-0"),
+            ([0.0, -0.0], "[0,-0]"),
+            (0.1, "0.1"),
+            (1e-5, "1e-05"),
+            (1e16, "1e+16"),
+            (12345678901234567, "12345678901234568"),
+            (2**70, "1180591620717411300000"),
+            (1e300 * 1e10, "1.7976931348623157e+308"),
+            (math.nan, "null"),
+            ({"é": "a\x7f"}, '{"é":"a\\u007f"}'),
+        ],
+    )
+    def test_formatting(self, value: Any, text: str):
+        """Numbers and strings print as `jq -c` prints them."""
+        assert to_json(value) == text
+
+
+class TestDifferential:
+    """Compiled output checked against the jq binary."""
+
+    @pytest.mark.parametrize("columnar", [False, True])
+    @pytest.mark.parametrize("filter_code", DIFFERENTIAL_FILTERS)
+    def test_matches_jq(self, executor: JQExecutor, filter_code: str, columnar: bool):
+        """Outputs and failed records equal jq's over a stream of records."""
+        records = _records(MIN_COLUMNAR_ROWS * 2)
+        failed: list[int] = []
+
+        outputs = compile_filter(filter_code, columnar=columnar).run_batch(
+            records, lambda i, _: failed.append(i)
+        )
+        result = executor.run_raw(
+            filter_code, "".join(json.dumps(r) + "\n" for r in records).encode()
+        )
+
+        assert "\n".join(to_json(output) for output in outputs) == result.stdout
+        assert len(failed) == result.stderr.count("jq: error")
+
+    @pytest.mark.parametrize("value", _VALUES)
+    def test_values_match_jq(self, executor: JQExecutor, value: Any):
+        """Values of every type are printed and compared as jq does."""
+        filter_code = "., tostring, length?, (. < 1), (. == 0), ([., 1] | sort)"
+
+        outputs = _run(filter_code, value)
+        result = executor.run_raw(filter_code, json.dumps(value).encode())
+
+        assert "\n".join(to_json(output) for output in outputs) == result.stdout
+
+
+@pytest.mark.skipif(not numpy_available(), reason="NumPy not installed")
+class TestColumnar:
+    """Tests for column-wise evaluation with NumPy."""
+
+    @pytest.mark.parametrize(
+        "filter_code",
+        [
+            "select(.price * .qty >= 5) | {id, total: (.price * .qty)}",
+            'select(.name == "a" and .qty != 3) | .price / (.qty + 1)',
+            "select((.qty > 4) | not) | {id, neg: -.price, big: (.price > .qty), k: null}",
+            ".qty > 4",
+        ],
+    )
+    def test_plans_match_rows(self, filter_code: str):
+        """Batches and mapped arrays give the same outputs column-wise as row by row."""
+        columnar = compile_filter(filter_code)
+        rows = compile_filter(filter_code, columnar=False)
+        mapped = compile_filter(f"map({filter_code})")
+
+        assert columnar.columnar
+        assert not rows.columnar
+        assert columnar.run_batch(_ROWS) == rows.run_batch(_ROWS)
+        assert mapped(_ROWS) == [rows.run_batch(_ROWS)]
+        assert compile_filter(f".[] | {filter_code}")(_ROWS) == rows.run_batch(_ROWS)
+
+    def test_fallback_to_rows(self):
+        """Rows the columns cannot represent (missing fields, zero divisors) fall back."""
+        rows = [*_ROWS, {"id": "x", "qty": 0}]
+        failed: list[int] = []
+
+        outputs = compile_filter("select(.qty > 1) | .id").run_batch(rows)
+        divided = compile_filter("{id, each: (.price / .qty)}").run_batch(
+            _ROWS, lambda i, _: failed.append(i)
+        )
+
+        assert outputs == [row["id"] for row in _ROWS if row["qty"] > 1]
+        assert failed == [i for i, row in enumerate(_ROWS) if row["qty"] == 0]
+        assert len(divided) == len(_ROWS) - len(failed)
+
+    def test_overflow_is_silent(self):
+        """Overflowing columns give infinities as jq does, without NumPy warnings."""
+        rows = [{"x": 1e308}] * MIN_COLUMNAR_ROWS
+        compiled = compile_filter("{a: (.x * 10), b: (.x * 10 - .x * 10)}")
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            outputs = compiled.run_batch(rows)
+
+        assert compiled.columnar
+        assert outputs[0]["a"] == math.inf
+        assert math.isnan(outputs[0]["b"])
+
+    def test_small_or_unplannable_inputs(self):
+        """Small batches run row by row; filters outside the plan are not columnar."""
+        assert compile_filter("map(.id)")(_ROWS[:3]) == [[0, 1, 2]]
+        assert compile_filter("select(.qty > 1)").run_batch(_ROWS[:3]) == [_ROWS[2]]
+        assert not compile_filter(".id | tostring").columnar
+        assert not compile_filter(".qty % 2").columnar
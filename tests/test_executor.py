@@ -5,9 +5,13 @@ This module tests the JQExecutor class for proper execution of jq filters,
 handling of various edge cases, and proper error reporting.
 """
 
+import asyncio
+
 import pytest
 
 from src.executor import JQExecutor
+from src.metrics import SynthMetrics
+from src.tracing import Tracer, filter_hash
 
 
 class TestJQExecutorInit:
@@ -27,6 +31,15 @@ class TestJQExecutorInit:
         assert executor.jq_path is not None
         assert len(executor.jq_path) > 0
 
+    def test_version(self, executor: JQExecutor, tmp_path):
+        """The binary's version is read once; a binary that cannot run gives ''."""
+        broken = JQExecutor()
+        broken.jq_path = str(tmp_path / "gone")
+
+        assert executor.version.startswith("jq-")
+        assert executor.version is executor.version
+        assert broken.version == ""
+
     def test_custom_timeout_accepted(self):
         """Custom timeout value is accepted and stored."""
         try:
@@ -447,3 +460,204 @@ class TestComplexFilters:
 
         assert result.is_success is True
         assert result.stdout == '"John Doe"'
+
+
+class TestRunAsync:
+    """Tests for non-blocking execution with asyncio subprocesses."""
+
+    def test_matches_sync_run(self, executor: JQExecutor):
+        """run_async returns the same result as run."""
+        data = {"items": [{"id": 1}, {"id": 2}]}
+
+        result = asyncio.run(executor.run_async("[.items[].id]", data))
+
+        assert result == executor.run("[.items[].id]", data)
+        assert result.stdout == "[1,2]"
+
+    def test_syntax_error(self, executor: JQExecutor):
+        """jq errors are reported through exit code and stderr."""
+        result = asyncio.run(executor.run_async(".[", {}))
+
+        assert result.exit_code != 0
+        assert result.stderr
+
+    def test_unserializable_input(self, executor: JQExecutor):
+        """Inputs that cannot be serialized fail without spawning jq."""
+        result = asyncio.run(executor.run_async(".", {"x": object()}))
+
+        assert result.exit_code == 1
+        assert "serialize" in result.stderr
+
+    def test_timeout_kills_process(self):
+        """A filter that never finishes is killed and reported as a timeout."""
+        try:
+            executor = JQExecutor(timeout_sec=0.2)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+
+        result = asyncio.run(executor.run_async("def f: f; f", None))
+
+        assert result.is_timeout is True
+        assert result.exit_code == 124
+
+    def test_cancel_kills_process(self, monkeypatch: pytest.MonkeyPatch):
+        """Cancelling a run kills its jq process instead of leaving it running."""
+        try:
+            executor = JQExecutor(timeout_sec=30)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+        spawned: list[asyncio.subprocess.Process] = []
+        create = asyncio.create_subprocess_exec
+
+        async def recording_create(*args, **kwargs) -> asyncio.subprocess.Process:
+            proc = await create(*args, **kwargs)
+            spawned.append(proc)
+            return proc
+
+        monkeypatch.setattr("src.executor.asyncio.create_subprocess_exec", recording_create)
+
+        async def cancel_run() -> None:
+            task = asyncio.create_task(executor.run_async("last(repeat(1))", 1))
+            while not spawned:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_run())
+
+        assert spawned[0].returncode is not None
+        assert executor.stats.spawns == 1
+
+    def test_output_limit(self):
+        """Oversized output is truncated like in run."""
+        try:
+            executor = JQExecutor(max_output_bytes=50)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+
+        result = asyncio.run(executor.run_async(".", {"a": "x" * 100}))
+
+        assert result.exit_code == 137
+
+    def test_concurrent_runs(self, executor: JQExecutor):
+        """Many runs can be awaited together and keep their order."""
+
+        async def run_all() -> list[str]:
+            results = await asyncio.gather(*(executor.run_async(".x", {"x": i}) for i in range(40)))
+            return [r.stdout for r in results]
+
+        assert asyncio.run(run_all()) == [str(i) for i in range(40)]
+
+
+class TestRunRaw:
+    """Tests for running jq over already-serialized input."""
+
+    def test_many_records(self, executor: JQExecutor):
+        """Every JSON text of the input is filtered by one process."""
+        result = executor.run_raw(".x", b'{"x": 1}\n{"x": 2}\n\n{"x": "a"}\n')
+
+        assert result.stdout == '1\n2\n"a"'
+        assert executor.stats.spawns == 1
+
+    def test_options(self, executor: JQExecutor):
+        """Extra options go before the filter."""
+        result = executor.run_raw(".x", b'\x1e{"x": 1}\n\x1e{"x": 2}\n', ["--seq"])
+
+        assert result.stdout == "\x1e1\n\x1e2"
+
+    def test_errors_and_limits(self):
+        """Record errors, timeouts and the output limit are reported like in run."""
+        try:
+            executor = JQExecutor(timeout_sec=0.2, max_output_bytes=50)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+
+        error = executor.run_raw(".x + 1", b'{"x": "a"}\n{"x": 1}\n')
+        timeout = executor.run_raw("def f: f; f", b"null")
+        too_large = executor.run_raw(".", b'"' + b"x" * 100 + b'"')
+
+        assert error.stdout == "2"
+        assert "cannot be added" in error.stderr
+        assert timeout.is_timeout
+        assert too_large.exit_code == 137
+
+
+class TestExecutorStats:
+    """Tests for the spawn counters."""
+
+    def test_counts_sync_and_async_runs(self, executor: JQExecutor):
+        """Every jq process is counted, whichever way it was run."""
+        executor.run(".", {"x": 1})
+        executor.run(".[", {})
+        asyncio.run(executor.run_async(".x", {"x": 1}))
+
+        assert executor.stats.spawns == 3
+        assert executor.stats.timeouts == 0
+        assert executor.stats.total_sec > 0
+
+    def test_unserializable_input_not_counted(self, executor: JQExecutor):
+        """Inputs rejected before spawning jq do not count as spawns."""
+        executor.run(".", {"x": object()})
+
+        assert executor.stats.spawns == 0
+
+    def test_timeouts_counted(self):
+        """Killed processes count as spawns and timeouts."""
+        try:
+            executor = JQExecutor(timeout_sec=0.2)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+
+        executor.run("def f: f; f", None)
+        asyncio.run(executor.run_async("def f: f; f", None))
+
+        assert executor.stats.spawns == 2
+        assert executor.stats.timeouts == 2
+
+
+class TestExecutorTracing:
+    """Tests for jq run spans."""
+
+    def test_run_spans(self, executor: JQExecutor, tracer: Tracer):
+        """Sync and async runs are traced with the filter hash and outcome."""
+        executor.run(".x", {"x": 1})
+        asyncio.run(executor.run_async(".[", {}))
+
+        ok, failed = tracer.spans
+        assert ok.name == failed.name == "JQExecutor.run"
+        assert ok.attributes == {
+            "filter_hash": filter_hash(".x"),
+            "exit_code": 0,
+            "timed_out": False,
+        }
+        assert failed.attributes["exit_code"] != 0
+
+
+class TestExecutorMetrics:
+    """Tests for jq metrics."""
+
+    def test_spawns_and_output_limit(self, metrics: SynthMetrics):
+        """Runs are counted and output-limit kills recorded."""
+        try:
+            executor = JQExecutor(max_output_bytes=50)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+
+        executor.run(".", {"a": 1})
+        asyncio.run(executor.run_async(".", {"a": "x" * 100}))
+
+        assert metrics.jq_spawns.value() == 2
+        assert metrics.jq_output_limit_kills.value() == 1
+        assert metrics.jq_duration.count() == 2
+
+    def test_timeouts(self, metrics: SynthMetrics):
+        """Killed processes count as timeouts."""
+        try:
+            executor = JQExecutor(timeout_sec=0.2)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+
+        executor.run("def f: f; f", None)
+
+        assert metrics.jq_timeouts.value() == 1
@@ -6,14 +6,27 @@ extracting clean jq filter expressions from LLM responses. All tests use
 mocked HTTP responses to avoid real API calls.
 """
 
+import asyncio
 import os
-from unittest.mock import MagicMock, patch
+import threading
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
 import pytest
 
-from src.domain import Attempt, ErrorType, Example, ExampleResult, Task
+from src.cache import ResponseCache
+from src.compaction import CompactionPolicy
+from src.domain import Attempt, ErrorType, Example, ExampleResult, ScalingResult, Task
 from src.generator import GenerationError, JQGenerator
+from src.hedging import HedgePolicy
+from src.metrics import SynthMetrics
+from src.mockserver import FaultProfile, LatencyProfile, MockLLMServer
+from src.providers import ChatMessage, HTTPPoolConfig, OpenAIProvider, prompt_text
+from src.ratelimit import RateLimiter, RetryPolicy, estimate_tokens
+from src.timing import API_CALL, EXTRACTION, PROMPT_BUILD, recording
+from src.tracing import Tracer, filter_hash
 
 
 class TestExtractMarkdownRemoval:
@@ -289,6 +302,12 @@ class TestExtractIntroductoryPhraseRemoval:
             result = generator._extract("HERE IS THE FILTER: .name")
             assert result == ".name"
 
+    def test_skips_other_intro_lines(self):
+        """Any line ending in ':' is taken as intro text, not as the filter."""
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            generator = JQGenerator()
+            assert generator._extract("Answer:\n.x") == ".x"
+
     def test_preserves_filter_content(self):
         """Filter content is not modified during prefix removal."""
         with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
@@ -418,6 +437,222 @@ class TestBuildPromptExamples:
             assert "Generate the jq filter:" in prompt
 
 
+class TestBuildPromptCompaction:
+    """Tests for compacting large examples to fit the prompt budget."""
+
+    def _task(self) -> Task:
+        users = [{"id": i, "name": f"user{i}", "active": i % 2 == 0} for i in range(2000)]
+        return Task(
+            id="big",
+            description="Names of active users",
+            examples=[
+                Example(
+                    input_data={"users": users},
+                    expected_output=[u["name"] for u in users if u["active"]],
+                )
+            ],
+        )
+
+    def test_small_prompt_unchanged(self):
+        """Prompts within the budget embed the full examples."""
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            generator = JQGenerator()
+            task = Task(
+                id="t",
+                description="Extract x",
+                examples=[Example(input_data={"x": [1, 2, 3, 4]}, expected_output=[1, 2, 3, 4])],
+            )
+
+            prompt = generator._build_prompt(task)
+
+            assert 'Input: {"x": [1, 2, 3, 4]}' in prompt
+            assert "Input schema:" not in prompt
+
+    def test_large_prompt_compacted(self):
+        """Over budget, examples show a schema and a sample."""
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            generator = JQGenerator()
+
+            prompt = generator._build_prompt(self._task())
+
+            assert len(prompt) < 4 * generator.compaction.max_prompt_tokens
+            assert "Input schema:" in prompt
+            assert "  .users: array (2000 items)" in prompt
+            assert "Input (sample):" in prompt
+            assert 'Expected Output (sample): ["user0", "user2"]' in prompt
+            assert "abbreviated" in prompt
+
+    def test_escalates_to_schema_only(self):
+        """A tight budget drops the input sample and keeps the schema."""
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            generator = JQGenerator(compaction=CompactionPolicy(max_prompt_tokens=100))
+
+            prompt = generator._build_prompt(self._task())
+
+            assert "Input (sample):" not in prompt
+            assert ".users[].active: boolean" in prompt
+
+    def test_zero_budget_disables_compaction(self):
+        """max_prompt_tokens=0 always sends full examples."""
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            generator = JQGenerator(compaction=CompactionPolicy(max_prompt_tokens=0))
+
+            prompt = generator._build_prompt(self._task())
+
+            assert '"user1999"' in prompt
+            assert "Input schema:" not in prompt
+
+    def test_task_keeps_full_inputs(self):
+        """Compaction never changes the task, so evaluation sees the full inputs."""
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            generator = JQGenerator()
+            task = self._task()
+
+            generator._build_prompt(task)
+
+            assert len(task.examples[0].input_data["users"]) == 2000
+            assert len(task.examples[0].expected_output) == 1000
+
+
+class TestPromptCaching:
+    """Tests for cacheable prompt prefixes and conversation mode."""
+
+    TASK = Task(
+        id="t",
+        description="Extract x",
+        examples=[Example(input_data={"x": 1}, expected_output=1)],
+    )
+
+    def _attempt(self, filter_code: str) -> Attempt:
+        result = ExampleResult(
+            score=0.0,
+            error_type=ErrorType.MISSING_EXTRA,
+            feedback="Wrong output",
+            actual_output=2,
+            expected_output=1,
+        )
+        return Attempt(
+            iteration=1,
+            filter_code=filter_code,
+            example_results=[result],
+            aggregated_score=0.0,
+            primary_error=ErrorType.MISSING_EXTRA,
+        )
+
+    def _generator(self, **kwargs) -> JQGenerator:
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            return JQGenerator(**kwargs)
+
+    def test_plain_prompt_by_default(self):
+        """Without the options the request is the plain prompt string."""
+        generator = self._generator()
+        history = [self._attempt(".y")]
+
+        assert generator._build_request(self.TASK, history) == generator._build_prompt(
+            self.TASK, history
+        )
+
+    def test_prompt_starts_with_task_block(self):
+        """The task/example block comes first and does not depend on the history."""
+        generator = self._generator()
+        prefix = generator._build_prefix(self.TASK)
+
+        assert generator._build_prompt(self.TASK).startswith(prefix)
+        assert generator._build_prompt(self.TASK, [self._attempt(".y")]).startswith(prefix)
+
+    def test_caching_splits_off_cacheable_prefix(self):
+        """With prompt caching the prefix is its own message, marked cacheable."""
+        generator = self._generator(prompt_caching=True)
+        history = [self._attempt(".y")]
+
+        request = generator._build_request(self.TASK, history)
+
+        assert isinstance(request, list)
+        assert request[0] == ChatMessage("user", generator._build_prefix(self.TASK), cache=True)
+        assert not request[1].cache
+        assert prompt_text(request) == generator._build_prompt(self.TASK, history)
+
+    def test_split_prompt_shares_response_cache_key(self):
+        """Cache breakpoints do not change the response cache key."""
+        generator = self._generator(prompt_caching=True)
+        history = [self._attempt(".y")]
+
+        assert generator._cache_key(
+            generator._build_request(self.TASK, history)
+        ) == generator._cache_key(generator._build_prompt(self.TASK, history))
+
+    def test_conversation_turns(self):
+        """Each earlier attempt becomes an assistant turn followed by its feedback."""
+        generator = self._generator(conversation=True)
+        history = [self._attempt(".y"), self._attempt(".z")]
+
+        request = generator._build_request(self.TASK, history)
+
+        assert isinstance(request, list)
+        assert [m.role for m in request] == ["user", "assistant", "user", "assistant", "user"]
+        assert request[0].content.startswith(generator._build_prefix(self.TASK))
+        assert request[0].content.endswith(JQGenerator.FINAL_REQUEST)
+        assert [request[1].content, request[3].content] == [".y", ".z"]
+        assert "Wrong output" in request[2].content
+        assert request[4].content.endswith(JQGenerator.FINAL_REQUEST)
+        assert not any(m.cache for m in request)
+
+    def test_conversation_extends_previous_request(self):
+        """Every request starts with the previous one, so it can be read from the cache."""
+        generator = self._generator(conversation=True)
+        history = [self._attempt(".y"), self._attempt(".z")]
+
+        first = generator._build_request(self.TASK, history[:1])
+        second = generator._build_request(self.TASK, history)
+
+        assert isinstance(first, list)
+        assert isinstance(second, list)
+        assert second[: len(first)] == first
+
+    def test_conversation_cache_breakpoints(self):
+        """With caching, the first and the newest turns are cache breakpoints."""
+        generator = self._generator(conversation=True, prompt_caching=True)
+
+        request = generator._build_request(self.TASK, [self._attempt(".y")])
+
+        assert isinstance(request, list)
+        assert [m.cache for m in request] == [True, False, True]
+
+    def test_first_conversation_turn_matches_plain_prompt(self):
+        """Without history the conversation is the plain first prompt."""
+        generator = self._generator(conversation=True)
+
+        assert prompt_text(generator._build_request(self.TASK, None)) == generator._build_prompt(
+            self.TASK
+        )
+
+    def test_compaction_decided_on_prefix(self):
+        """A long history does not change how the examples are compacted."""
+        users = [{"id": i, "name": f"user{i}"} for i in range(50)]
+        task = Task(
+            id="big",
+            description="Names",
+            examples=[Example(input_data={"users": users}, expected_output=["user0"])],
+        )
+        full_prefix = self._generator(compaction=CompactionPolicy(max_prompt_tokens=0))
+        budget = estimate_tokens(full_prefix._build_prefix(task))
+        generator = self._generator(compaction=CompactionPolicy(max_prompt_tokens=budget))
+        history = [self._attempt("." + "x" * 4000)]
+
+        assert "Input schema:" not in generator._build_prompt(task, history)
+
+    def test_generate_sends_messages(self):
+        """generate() passes the chat messages to the provider."""
+        generator = self._generator(prompt_caching=True)
+        generator.provider = MagicMock()
+        generator.provider.generate.return_value = ".x"
+
+        assert generator.generate(self.TASK) == ".x"
+        sent = generator.provider.generate.call_args[0][0]
+        assert isinstance(sent, list)
+        assert sent[0].cache
+
+
 class TestBuildPromptHistory:
     """Tests for _build_prompt method including history feedback."""
 
@@ -461,6 +696,34 @@ class TestBuildPromptHistory:
 
             assert "Previous attempts" in prompt
 
+    def test_includes_scaling_feedback(self):
+        """Superlinear scaling of a passing filter is reported with its measurements."""
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            generator = JQGenerator()
+            task = Task(
+                id="test-task",
+                description="Test",
+                examples=[Example(input_data={"x": 1}, expected_output=1)],
+            )
+            scaling = ScalingResult(
+                sizes=(200, 800),
+                seconds=(0.01, 0.16),
+                output_bytes=(1, 1),
+                time_exponent=2.0,
+                output_exponent=0.0,
+                timed_out=False,
+                superlinear=True,
+                feedback="its run time grows like n^2.0",
+            )
+            attempt = self._make_attempt(".slow", 1.0, ErrorType.NONE, "")
+            history = [
+                Attempt(1, ".slow", attempt.example_results, 0.9, ErrorType.NONE, scaling=scaling)
+            ]
+
+            prompt = generator._build_prompt(task, history)
+
+            assert "Performance: its run time grows like n^2.0" in prompt
+
     def test_includes_filter_code_in_history(self):
         """History includes the filter codes that were tried."""
         with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
@@ -700,7 +963,7 @@ class TestGenerateWithMockedAPI:
                 response=mock_response,
             )
 
-            with patch("httpx.Client") as mock_client_class:
+            with patch("httpx.Client") as mock_client_class, patch("src.generator.time.sleep"):
                 mock_client = MagicMock()
                 mock_client.__enter__ = MagicMock(return_value=mock_client)
                 mock_client.__exit__ = MagicMock(return_value=False)
@@ -945,3 +1208,731 @@ class TestGeneratorConstants:
     def test_retry_delay_reasonable(self):
         """Retry delay is reasonable."""
         assert JQGenerator.RETRY_DELAY_SEC >= 0
+
+
+class TestGeneratorLifecycle:
+    """Tests for releasing provider connections."""
+
+    def test_close_closes_provider(self):
+        """close() delegates to the provider."""
+        provider = MagicMock()
+        generator = JQGenerator(provider=provider)
+
+        generator.close()
+
+        provider.close.assert_called_once()
+
+    def test_context_manager_closes_provider(self):
+        """Leaving the with block closes the provider."""
+        provider = MagicMock()
+
+        with JQGenerator(provider=provider) as generator:
+            assert generator.provider is provider
+
+        provider.close.assert_called_once()
+
+    def test_pool_config_forwarded_to_provider(self):
+        """pool_config is passed through to the created provider."""
+        config = HTTPPoolConfig(max_connections=4)
+        generator = JQGenerator(api_key="test-key", pool_config=config)
+        assert generator.provider.pool_config is config
+
+
+class TestGeneratorCache:
+    """Tests for the optional response cache."""
+
+    def _provider(self, response: str = ".x") -> MagicMock:
+        provider = MagicMock()
+        provider.model = "test-model"
+        provider.endpoint = "https://llm.example/v1/chat/completions"
+        provider.TEMPERATURE = 0.3
+        provider.SYSTEM_PROMPT = "system"
+        provider.generate.return_value = response
+        return provider
+
+    def _task(self) -> Task:
+        return Task(
+            id="t",
+            description="Extract x",
+            examples=[Example(input_data={"x": 1}, expected_output=1)],
+        )
+
+    def test_identical_requests_hit_cache(self):
+        """A repeated prompt is served from the cache without calling the provider."""
+        provider = self._provider()
+        generator = JQGenerator(provider=provider, cache=ResponseCache())
+
+        assert generator.generate(self._task()) == ".x"
+        assert generator.generate(self._task()) == ".x"
+        provider.generate.assert_called_once()
+
+    def test_model_is_part_of_key(self):
+        """Changing the provider's model invalidates cached responses."""
+        provider = self._provider()
+        generator = JQGenerator(provider=provider, cache=ResponseCache())
+
+        generator.generate(self._task())
+        provider.model = "other-model"
+        generator.generate(self._task())
+
+        assert provider.generate.call_count == 2
+
+    def test_endpoint_is_part_of_key(self):
+        """Servers offering the same model name do not share cached responses."""
+        provider = self._provider()
+        generator = JQGenerator(provider=provider, cache=ResponseCache())
+
+        generator.generate(self._task())
+        provider.endpoint = "http://localhost:11434/v1/chat/completions"
+        generator.generate(self._task())
+
+        assert provider.generate.call_count == 2
+
+    def test_replay_miss_raises_generation_error(self, tmp_path: Path):
+        """A replay cache miss surfaces as GenerationError."""
+        provider = self._provider()
+        generator = JQGenerator(
+            provider=provider, cache=ResponseCache(directory=tmp_path, replay=True)
+        )
+
+        with pytest.raises(GenerationError, match="Replay cache miss"):
+            generator.generate(self._task())
+        provider.generate.assert_not_called()
+
+    def test_generation_stats_separate_cache_hits(self):
+        """Cache hits count as requests but not as API calls."""
+        provider = self._provider()
+        generator = JQGenerator(provider=provider, cache=ResponseCache())
+
+        generator.generate(self._task())
+        generator.generate(self._task())
+
+        stats = generator.generation_stats
+        assert stats.requests == 2
+        assert stats.api_calls == 1
+        assert stats.prompt_tokens > 0
+        assert stats.response_tokens == 2 * estimate_tokens(".x")
+
+    def test_generate_records_phases(self):
+        """Generation attributes time to prompt build, API call and extraction."""
+        generator = JQGenerator(provider=self._provider(), cache=ResponseCache())
+
+        with recording() as timer:
+            generator.generate(self._task())
+
+        assert list(timer.snapshot()) == [PROMPT_BUILD, API_CALL, EXTRACTION]
+
+    def test_generation_stats_async(self):
+        """generate_async updates the same counters."""
+        provider = self._provider()
+        provider.agenerate = AsyncMock(return_value=".x")
+        generator = JQGenerator(provider=provider)
+
+        asyncio.run(generator.generate_async(self._task()))
+
+        assert generator.generation_stats.requests == 1
+        assert generator.generation_stats.api_calls == 1
+
+
+class TestGeneratorRetries:
+    """Tests for status-aware retries and rate limiting."""
+
+    def _task(self) -> Task:
+        return Task(
+            id="t",
+            description="Extract x",
+            examples=[Example(input_data={"x": 1}, expected_output=1)],
+        )
+
+    def _status_error(self, status: int, headers: dict[str, str] | None = None):
+        response = httpx.Response(
+            status, headers=headers, request=httpx.Request("POST", "http://x")
+        )
+        return httpx.HTTPStatusError("error", request=response.request, response=response)
+
+    def _provider(self, *effects: object) -> MagicMock:
+        provider = MagicMock()
+        provider.SYSTEM_PROMPT = "system"
+        provider.MAX_TOKENS = 500
+        provider.generate.side_effect = list(effects)
+        return provider
+
+    def test_retries_429_then_succeeds(self):
+        """A 429 is retried and the eventual response is returned."""
+        provider = self._provider(self._status_error(429), ".x")
+        generator = JQGenerator(provider=provider)
+
+        with patch("src.generator.time.sleep") as mock_sleep:
+            assert generator.generate(self._task()) == ".x"
+
+        assert provider.generate.call_count == 2
+        mock_sleep.assert_called_once()
+
+    def test_honors_retry_after(self):
+        """The Retry-After header sets the backoff delay."""
+        provider = self._provider(self._status_error(503, {"Retry-After": "7"}), ".x")
+        generator = JQGenerator(provider=provider)
+
+        with patch("src.generator.time.sleep") as mock_sleep:
+            generator.generate(self._task())
+
+        mock_sleep.assert_called_once_with(7.0)
+
+    def test_client_errors_are_not_retried(self):
+        """A 401 fails immediately."""
+        provider = self._provider(self._status_error(401))
+        generator = JQGenerator(provider=provider)
+
+        with patch("src.generator.time.sleep") as mock_sleep:
+            with pytest.raises(GenerationError, match="401"):
+                generator.generate(self._task())
+
+        assert provider.generate.call_count == 1
+        mock_sleep.assert_not_called()
+
+    def test_gives_up_after_max_attempts(self):
+        """Persistent 5xx errors stop after the policy's attempt limit."""
+        provider = self._provider(*[self._status_error(500)] * 5)
+        generator = JQGenerator(provider=provider, retry_policy=RetryPolicy(max_attempts=4))
+
+        with patch("src.generator.time.sleep"):
+            with pytest.raises(GenerationError, match="500"):
+                generator.generate(self._task())
+
+        assert provider.generate.call_count == 4
+
+    def test_rate_limiter_acquired_per_attempt(self):
+        """Every attempt draws from the limiter, and a 429 pauses it."""
+        provider = self._provider(self._status_error(429, {"Retry-After": "2"}), ".x")
+        limiter = MagicMock()
+        generator = JQGenerator(provider=provider, rate_limiter=limiter)
+
+        with patch("src.generator.time.sleep"):
+            generator.generate(self._task())
+
+        assert limiter.acquire.call_count == 2
+        assert limiter.acquire.call_args[0][0] > 500
+        limiter.pause.assert_called_once_with(2.0)
+
+
+class TestGeneratorStreaming:
+    """Tests for streamed generation with early termination."""
+
+    def _task(self) -> Task:
+        return Task(
+            id="t",
+            description="Extract x",
+            examples=[Example(input_data={"x": 1}, expected_output=1)],
+        )
+
+    def _provider(self, *chunks: str) -> tuple[MagicMock, dict[str, int | bool]]:
+        state: dict[str, int | bool] = {"read": 0, "closed": False}
+
+        def stream(prompt: str):
+            try:
+                for chunk in chunks:
+                    state["read"] = int(state["read"]) + 1
+                    yield chunk
+            finally:
+                state["closed"] = True
+
+        provider = MagicMock()
+        provider.generate_stream.side_effect = stream
+        return provider, state
+
+    def test_stops_after_first_filter_line(self):
+        """The stream is closed once the first filter line is complete."""
+        provider, state = self._provider(".x", "\n", "This filter extracts x", " and more")
+        generator = JQGenerator(provider=provider, stream=True)
+
+        assert generator.generate(self._task()) == ".x"
+        assert state["closed"] is True
+        assert state["read"] == 2
+        assert generator.call_stats[-1].stopped_early is True
+        provider.generate.assert_not_called()
+
+    def test_stops_after_closed_code_block(self):
+        """A fenced code block is complete once the closing fence arrives."""
+        provider, state = self._provider("```jq\n.a", "\n```", "\nExplanation...")
+        generator = JQGenerator(provider=provider, stream=True)
+
+        assert generator.generate(self._task()) == ".a"
+        assert state["read"] == 2
+
+    def test_prose_first_line_reads_to_end(self):
+        """Responses that open with prose are read fully so extraction is unchanged."""
+        chunks = ("You can use\n", ".b\n", "to get b")
+        provider, state = self._provider(*chunks)
+        generator = JQGenerator(provider=provider, stream=True)
+
+        generator.generate(self._task())
+        assert state["read"] == 3
+        assert generator.call_stats[-1].stopped_early is False
+
+    def test_records_ttft_and_latency(self):
+        """Every call records time-to-first-token and total latency."""
+        provider, _ = self._provider(".x")
+        generator = JQGenerator(provider=provider, stream=True)
+
+        generator.generate(self._task())
+
+        stats = generator.call_stats[-1]
+        assert stats.streamed is True
+        assert 0 <= stats.ttft_sec <= stats.latency_sec
+        assert stats.response_chars == 2
+
+    def test_non_streamed_calls_are_recorded(self):
+        """Without streaming, TTFT equals total latency."""
+        provider = MagicMock()
+        provider.generate.return_value = ".x"
+        generator = JQGenerator(provider=provider)
+
+        generator.generate(self._task())
+
+        stats = generator.call_stats[-1]
+        assert stats.streamed is False
+        assert stats.ttft_sec == stats.latency_sec
+        provider.generate_stream.assert_not_called()
+
+    @pytest.mark.parametrize(
+        ("text", "complete"),
+        [
+            (".x", False),
+            (".x\n", True),
+            ("Filter: .x\n", True),
+            ("Here is the jq filter:\n", False),
+            ("Here is the jq filter:\n.x\n", True),
+            ("This filter extracts x\n", False),
+            ("```jq\n.x\n", False),
+            ("```\n.x\n```", True),
+            ("if .a then 1 else 2 end\n", True),
+            ("# extract x\n.x\n", False),
+            ("Answer:\n.x\n", True),
+        ],
+    )
+    def test_has_complete_filter(self, text: str, complete: bool):
+        """Completion detection agrees with what _extract would return."""
+        generator = JQGenerator(provider=MagicMock())
+        assert generator._has_complete_filter(text) is complete
+        if complete:
+            # Further lines do not change the extracted filter
+            assert generator._extract(text + "# note\n.y\n") == generator._extract(text)
+
+
+class TestGenerateAsync:
+    """Tests for the asyncio generation path."""
+
+    def _task(self, description: str = "Extract x") -> Task:
+        return Task(
+            id="t",
+            description=description,
+            examples=[Example(input_data={"x": 1}, expected_output=1)],
+        )
+
+    def _provider(self) -> MagicMock:
+        provider = MagicMock()
+        provider.model = "test-model"
+        provider.endpoint = "https://llm.example/v1/chat/completions"
+        provider.TEMPERATURE = 0.3
+        provider.SYSTEM_PROMPT = "system"
+        provider.MAX_TOKENS = 100
+        provider.agenerate = AsyncMock(return_value="```jq\n.x\n```")
+        provider.aclose = AsyncMock()
+        return provider
+
+    def test_extracts_filter(self):
+        """generate_async returns the extracted filter."""
+        provider = self._provider()
+        generator = JQGenerator(provider=provider)
+
+        assert asyncio.run(generator.generate_async(self._task())) == ".x"
+        provider.generate.assert_not_called()
+        assert generator.call_stats[-1].streamed is False
+
+    def test_retries_connection_errors(self):
+        """Transport errors are retried with asyncio.sleep backoff."""
+        provider = self._provider()
+        provider.agenerate.side_effect = [httpx.ConnectError("refused"), ".x"]
+        generator = JQGenerator(provider=provider)
+
+        with patch("src.generator.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            assert asyncio.run(generator.generate_async(self._task())) == ".x"
+
+        assert provider.agenerate.await_count == 2
+        mock_sleep.assert_awaited_once()
+
+    def test_errors_become_generation_error(self):
+        """Provider failures are translated like in the sync path."""
+        provider = self._provider()
+        provider.agenerate.side_effect = RuntimeError("Invalid API response format")
+        generator = JQGenerator(provider=provider)
+
+        with pytest.raises(GenerationError):
+            asyncio.run(generator.generate_async(self._task()))
+
+    def test_cache_coalesces_identical_requests(self):
+        """Concurrent identical prompts result in one provider call."""
+        provider = self._provider()
+
+        async def slow(prompt: str) -> str:
+            await asyncio.sleep(0.01)
+            return ".x"
+
+        provider.agenerate.side_effect = slow
+        generator = JQGenerator(provider=provider, cache=ResponseCache())
+
+        async def run() -> list[str]:
+            return await asyncio.gather(*(generator.generate_async(self._task()) for _ in range(3)))
+
+        assert asyncio.run(run()) == [".x"] * 3
+        assert provider.agenerate.await_count == 1
+
+    def test_max_in_flight_bounds_concurrency(self):
+        """No more than max_in_flight requests are outstanding at once."""
+        provider = self._provider()
+        state = {"active": 0, "peak": 0}
+
+        async def slow(prompt: str) -> str:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return ".x"
+
+        provider.agenerate.side_effect = slow
+        generator = JQGenerator(provider=provider, max_in_flight=2)
+
+        async def run() -> list[str]:
+            return await asyncio.gather(
+                *(generator.generate_async(self._task(f"task {i}")) for i in range(6))
+            )
+
+        assert asyncio.run(run()) == [".x"] * 6
+        assert state["peak"] == 2
+
+    def test_stream_stops_early(self):
+        """The async stream is closed after the first complete filter."""
+        provider = self._provider()
+        state = {"read": 0, "closed": False}
+
+        async def stream(prompt: str):
+            try:
+                for chunk in (".x", "\n", "This extracts x"):
+                    state["read"] += 1
+                    yield chunk
+            finally:
+                state["closed"] = True
+
+        provider.agenerate_stream = stream
+        generator = JQGenerator(provider=provider, stream=True)
+
+        assert asyncio.run(generator.generate_async(self._task())) == ".x"
+        assert state == {"read": 2, "closed": True}
+        assert generator.call_stats[-1].stopped_early is True
+
+    def test_async_context_manager_closes_provider(self):
+        """Leaving 'async with' closes the provider's connections."""
+        provider = self._provider()
+
+        async def run() -> None:
+            async with JQGenerator(provider=provider):
+                pass
+
+        asyncio.run(run())
+        provider.aclose.assert_awaited_once()
+
+
+class TestGeneratorHedging:
+    """Tests for hedging slow requests to a secondary provider."""
+
+    POLICY = HedgePolicy(initial_delay=0.05, min_delay=0.0)
+
+    def _task(self) -> Task:
+        return Task(
+            id="t",
+            description="Extract x",
+            examples=[Example(input_data={"x": 1}, expected_output=1)],
+        )
+
+    def _provider(self, response: str = ".x", delay: float = 0.0) -> MagicMock:
+        provider = MagicMock()
+        provider.SYSTEM_PROMPT = "system"
+        provider.MAX_TOKENS = 100
+
+        def generate(prompt: str) -> str:
+            time.sleep(delay)
+            return response
+
+        async def agenerate(prompt: str) -> str:
+            await asyncio.sleep(delay)
+            return response
+
+        provider.generate.side_effect = generate
+        provider.agenerate = AsyncMock(side_effect=agenerate)
+        provider.aclose = AsyncMock()
+        return provider
+
+    def test_fast_primary_is_not_hedged(self):
+        """Responses within the delay never touch the hedge provider."""
+        primary, secondary = self._provider(".a"), self._provider(".b")
+        generator = JQGenerator(
+            provider=primary, hedge_provider=secondary, hedge_policy=self.POLICY
+        )
+
+        with generator:
+            assert generator.generate(self._task()) == ".a"
+
+        secondary.generate.assert_not_called()
+        assert generator.hedge_stats.requests == 1
+        assert generator.hedge_stats.hedged == 0
+
+    def test_slow_primary_is_hedged(self):
+        """A slow primary is raced against the hedge provider, which wins."""
+        primary, secondary = self._provider(".a", delay=0.5), self._provider(".b")
+        generator = JQGenerator(
+            provider=primary, hedge_provider=secondary, hedge_policy=self.POLICY
+        )
+
+        with generator:
+            start = time.perf_counter()
+            assert generator.generate(self._task()) == ".b"
+            assert time.perf_counter() - start < 0.4
+
+        assert generator.hedge_stats.hedged == 1
+        assert generator.hedge_stats.hedge_wins == 1
+        assert generator.hedge_stats.hedge_rate == 1.0
+
+    def test_failed_hedge_falls_back_to_primary(self):
+        """An error from the hedge provider does not fail the request."""
+        primary = self._provider(".a", delay=0.1)
+        secondary = self._provider()
+        secondary.generate.side_effect = RuntimeError("Invalid API response format")
+        generator = JQGenerator(
+            provider=primary, hedge_provider=secondary, hedge_policy=self.POLICY
+        )
+
+        with generator:
+            assert generator.generate(self._task()) == ".a"
+
+        assert generator.hedge_stats.hedged == 1
+        assert generator.hedge_stats.hedge_wins == 0
+
+    def test_both_fail_raises_primary_error(self):
+        """When neither request succeeds the primary's error is reported."""
+        primary, secondary = self._provider(), self._provider()
+
+        def slow_fail(prompt: str) -> str:
+            time.sleep(0.1)
+            raise RuntimeError("primary down")
+
+        primary.generate.side_effect = slow_fail
+        secondary.generate.side_effect = RuntimeError("secondary down")
+        generator = JQGenerator(
+            provider=primary, hedge_provider=secondary, hedge_policy=self.POLICY
+        )
+
+        with generator, pytest.raises(GenerationError, match="primary down"):
+            generator.generate(self._task())
+
+    def test_losing_stream_is_closed(self):
+        """The losing stream stops being read once the hedge wins."""
+        primary, secondary = self._provider(), self._provider()
+        release = threading.Event()
+        state = {"read": 0}
+
+        def slow_stream(prompt: str):
+            release.wait(1.0)
+            for chunk in ("Here is\n", "more", "text"):
+                state["read"] += 1
+                yield chunk
+
+        primary.generate_stream.side_effect = slow_stream
+        secondary.generate_stream.return_value = iter([".b\n"])
+        generator = JQGenerator(
+            provider=primary, hedge_provider=secondary, hedge_policy=self.POLICY, stream=True
+        )
+
+        with generator:
+            assert generator.generate(self._task()) == ".b"
+            release.set()
+            time.sleep(0.05)
+
+        assert state["read"] <= 1
+        # The cut-short primary is not a latency sample
+        assert len(generator._primary_latencies) == 0
+
+    def test_hedge_request_is_rate_limited(self):
+        """The hedge request reserves its own rate limiter slot."""
+        primary, secondary = self._provider(".a", delay=0.5), self._provider(".b")
+        limiter = MagicMock(spec=RateLimiter)
+        generator = JQGenerator(
+            provider=primary,
+            hedge_provider=secondary,
+            hedge_policy=self.POLICY,
+            rate_limiter=limiter,
+        )
+
+        with generator:
+            assert generator.generate(self._task()) == ".b"
+
+        assert limiter.acquire.call_count == 2
+
+    def test_async_hedge_request_is_rate_limited(self):
+        """The async hedge request reserves its own rate limiter slot."""
+        primary, secondary = self._provider(".a", delay=0.5), self._provider(".b")
+        limiter = MagicMock(spec=RateLimiter)
+        generator = JQGenerator(
+            provider=primary,
+            hedge_provider=secondary,
+            hedge_policy=self.POLICY,
+            rate_limiter=limiter,
+        )
+
+        assert asyncio.run(generator.generate_async(self._task())) == ".b"
+        assert limiter.acquire_async.await_count == 2
+
+    def test_losing_request_is_aborted(self):
+        """A losing non-streamed request is aborted rather than holding its worker."""
+        with (
+            MockLLMServer(faults=FaultProfile(timeout=1.0, hang_sec=60.0)) as hanging,
+            MockLLMServer(default_response=".b") as fast,
+        ):
+            generator = JQGenerator(
+                provider=OpenAIProvider(api_key="test-key", base_url=hanging.url),
+                hedge_provider=OpenAIProvider(api_key="test-key", base_url=fast.url),
+                hedge_policy=self.POLICY,
+                max_in_flight=1,
+            )
+            with generator:
+                start = time.perf_counter()
+                # Two workers: a losing request left running would block the third
+                for _ in range(3):
+                    assert generator.generate(self._task()) == ".b"
+
+                assert time.perf_counter() - start < 10
+                assert generator.hedge_stats.hedge_wins == 3
+
+    def test_hedged_requests_traced_under_caller(self, tracer: Tracer):
+        """Both racing requests' HTTP spans belong to the generation's trace."""
+        with (
+            MockLLMServer(default_response=".a", latency=LatencyProfile(center_sec=0.3)) as slow,
+            MockLLMServer(default_response=".b") as fast,
+        ):
+            generator = JQGenerator(
+                provider=OpenAIProvider(api_key="test-key", base_url=slow.url),
+                hedge_provider=OpenAIProvider(api_key="test-key", base_url=fast.url),
+                hedge_policy=self.POLICY,
+            )
+            with generator:
+                assert generator.generate(self._task()) == ".b"
+
+        (root,) = [s for s in tracer.spans if s.name == "JQGenerator.generate"]
+        requests = [s for s in tracer.spans if s.name == "http POST"]
+        assert len(requests) == 2
+        assert all(s.trace_id == root.trace_id and s.parent_id is not None for s in requests)
+        assert all(s.attributes["task_id"] == "t" for s in requests)
+
+    def test_async_hedge_cancels_primary(self):
+        """In the async path the losing primary request is cancelled."""
+        primary, secondary = self._provider(".a", delay=5.0), self._provider(".b")
+        cancelled = []
+
+        async def slow(prompt: str) -> str:
+            try:
+                await asyncio.sleep(5.0)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return ".a"
+
+        primary.agenerate = AsyncMock(side_effect=slow)
+        generator = JQGenerator(
+            provider=primary, hedge_provider=secondary, hedge_policy=self.POLICY
+        )
+
+        assert asyncio.run(generator.generate_async(self._task())) == ".b"
+        assert cancelled == [True]
+        assert generator.hedge_stats.hedge_wins == 1
+
+    def test_async_fast_primary_records_latency(self):
+        """Primary latencies feed the percentile-based delay."""
+        primary, secondary = self._provider(".a"), self._provider(".b")
+        generator = JQGenerator(
+            provider=primary, hedge_provider=secondary, hedge_policy=self.POLICY
+        )
+
+        assert asyncio.run(generator.generate_async(self._task())) == ".a"
+        assert len(generator._primary_latencies) == 1
+        secondary.agenerate.assert_not_called()
+
+    def test_close_closes_hedge_provider(self):
+        """Closing the generator releases the hedge provider's connections."""
+        primary, secondary = self._provider(), self._provider()
+        generator = JQGenerator(provider=primary, hedge_provider=secondary)
+
+        generator.close()
+        asyncio.run(generator.aclose())
+
+        secondary.close.assert_called_once()
+        secondary.aclose.assert_awaited_once()
+
+
+class TestGeneratorTracing:
+    """Tests for generation spans."""
+
+    def _provider(self) -> MagicMock:
+        provider = MagicMock()
+        provider.model = "test-model"
+        provider.endpoint = "https://llm.example/v1/chat/completions"
+        provider.TEMPERATURE = 0.3
+        provider.SYSTEM_PROMPT = "system"
+        provider.generate.return_value = "```jq\n.x\n```"
+        provider.agenerate = AsyncMock(return_value=".x")
+        return provider
+
+    def _task(self) -> Task:
+        return Task(
+            id="t",
+            description="Extract x",
+            examples=[Example(input_data={"x": 1}, expected_output=1)],
+        )
+
+    def test_cache_hit_attribute(self, tracer: Tracer):
+        """Spans record the task, the filter and whether the cache answered."""
+        generator = JQGenerator(provider=self._provider(), cache=ResponseCache())
+
+        generator.generate(self._task())
+        generator.generate(self._task())
+
+        miss, hit = tracer.spans
+        assert miss.name == "JQGenerator.generate"
+        assert miss.attributes["task_id"] == "t"
+        assert miss.attributes["filter_hash"] == filter_hash(".x")
+        assert miss.attributes["cache_hit"] is False
+        assert hit.attributes["cache_hit"] is True
+
+    def test_async_without_cache(self, tracer: Tracer):
+        """Async generations are traced; without a cache nothing is a hit."""
+        generator = JQGenerator(provider=self._provider())
+
+        asyncio.run(generator.generate_async(self._task()))
+
+        assert tracer.spans[0].attributes["cache_hit"] is False
+        assert tracer.spans[0].attributes["provider"] == "magicmock/test-model"
+
+
+class TestGeneratorMetrics:
+    """Tests for response cache metrics."""
+
+    def test_cache_lookups(self, metrics: SynthMetrics):
+        """Cache hits and misses are counted; uncached generators count nothing."""
+        provider = TestGeneratorTracing()._provider()
+        task = TestGeneratorTracing()._task()
+        cached = JQGenerator(provider=provider, cache=ResponseCache())
+
+        cached.generate(task)
+        cached.generate(task)
+        JQGenerator(provider=provider).generate(task)
+
+        assert metrics.cache_lookups.value(result="miss") == 1
+        assert metrics.cache_lookups.value(result="hit") == 1
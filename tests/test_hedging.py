@@ -0,0 +1,89 @@
+"""
+Unit tests for hedged request policies.
+
+This module tests the HedgePolicy delay computation, the LatencyTracker
+percentile and tail estimates, and the HedgeStats counters.
+"""
+
+import pytest
+
+from src.hedging import HedgePolicy, HedgeStats, LatencyTracker
+
+
+class TestLatencyTracker:
+    """Tests for the sliding latency window."""
+
+    def test_empty_percentile(self):
+        """An empty tracker reports zero."""
+        assert LatencyTracker().percentile(95) == 0.0
+
+    def test_nearest_rank_percentile(self):
+        """Percentiles use the nearest-rank method."""
+        tracker = LatencyTracker()
+        for latency in range(1, 101):
+            tracker.record(float(latency))
+
+        assert tracker.percentile(50) == 50.0
+        assert tracker.percentile(95) == 95.0
+        assert tracker.percentile(100) == 100.0
+        assert tracker.percentile(0) == 1.0
+
+    def test_window_drops_oldest(self):
+        """Only the most recent observations are kept."""
+        tracker = LatencyTracker(window=3)
+        for latency in (10.0, 1.0, 2.0, 3.0):
+            tracker.record(latency)
+
+        assert len(tracker) == 3
+        assert tracker.percentile(100) == 3.0
+
+    def test_expected_remaining(self):
+        """The remaining wait is the mean excess over the slower observations."""
+        tracker = LatencyTracker()
+        for latency in (1.0, 2.0, 4.0, 6.0):
+            tracker.record(latency)
+
+        assert tracker.expected_remaining(3.0) == pytest.approx(2.0)
+        assert tracker.expected_remaining(10.0) == 0.0
+
+
+class TestHedgePolicy:
+    """Tests for the percentile-based hedge delay."""
+
+    def test_initial_delay_until_enough_samples(self):
+        """Too few observations fall back to initial_delay."""
+        policy = HedgePolicy(initial_delay=1.5, min_samples=5)
+        tracker = LatencyTracker()
+        tracker.record(0.1)
+
+        assert policy.delay(tracker) == 1.5
+
+    def test_follows_percentile(self):
+        """With enough samples the delay is the configured percentile."""
+        policy = HedgePolicy(percentile=90, min_samples=10, min_delay=0.0)
+        tracker = LatencyTracker()
+        for i in range(1, 11):
+            tracker.record(i / 10)
+
+        assert policy.delay(tracker) == pytest.approx(0.9)
+
+    def test_clamped(self):
+        """The delay stays within [min_delay, max_delay]."""
+        tracker = LatencyTracker()
+        for _ in range(5):
+            tracker.record(0.01)
+        assert HedgePolicy(min_samples=5, min_delay=0.2).delay(tracker) == 0.2
+
+        slow = LatencyTracker()
+        for _ in range(5):
+            slow.record(100.0)
+        assert HedgePolicy(min_samples=5, max_delay=3.0).delay(slow) == 3.0
+
+
+class TestHedgeStats:
+    """Tests for hedge counters."""
+
+    def test_hedge_rate(self):
+        """The hedge rate is hedged over total requests."""
+        assert HedgeStats().hedge_rate == 0.0
+        assert HedgeStats(requests=4, hedged=1).hedge_rate == 0.25
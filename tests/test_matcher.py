@@ -0,0 +1,196 @@
+"""
+Unit tests for the structural path matcher.
+
+This module tests the StructuralMatcher class for deriving projection filters
+from examples whose outputs are copied verbatim from their inputs, and checks
+that derived filters really pass when run through the reviewer.
+"""
+
+import time
+from collections.abc import Callable
+
+import pytest
+
+from src.domain import Task
+from src.matcher import StructuralMatcher, render_path
+from src.reviewer import AlgorithmicReviewer
+
+
+class TestRenderPath:
+    """Tests for render_path jq path rendering."""
+
+    def test_empty_path_is_identity(self):
+        """The empty path renders as the identity filter."""
+        assert render_path(()) == "."
+
+    def test_identifier_keys_use_dot_syntax(self):
+        """Identifier-safe keys render with dot access."""
+        assert render_path(("user", "name")) == ".user.name"
+
+    def test_non_identifier_keys_are_quoted(self):
+        """Keys with spaces or dashes use bracket string access."""
+        assert render_path(("first name",)) == '.["first name"]'
+        assert render_path(("a", "b-c")) == '.a["b-c"]'
+
+    def test_indices_use_brackets(self):
+        """Array indices render in brackets, with a leading dot at the root."""
+        assert render_path((0,)) == ".[0]"
+        assert render_path(("items", 1, "id")) == ".items[1].id"
+
+
+class TestDeriveSimplePaths:
+    """Tests for deriving single path filters."""
+
+    def test_nested_field(self, make_task: Callable[..., Task]):
+        """A nested scalar is found by its path."""
+        matcher = StructuralMatcher()
+        task = make_task({"user": {"name": "Alice", "age": 30}}, "Alice")
+        assert matcher.derive(task) == ".user.name"
+
+    def test_path_must_be_consistent_across_examples(self, make_task: Callable[..., Task]):
+        """The chosen path is the one shared by every example."""
+        matcher = StructuralMatcher()
+        task = make_task({"a": 1, "b": 1}, 1, more_examples=[({"a": 2, "b": 3}, 3)])
+        assert matcher.derive(task) == ".b"
+
+    def test_whole_subtree(self, make_task: Callable[..., Task]):
+        """An output object equal to an input subtree is returned as a path."""
+        matcher = StructuralMatcher()
+        task = make_task({"data": {"x": 1, "y": [2]}}, {"y": [2], "x": 1})
+        assert matcher.derive(task) == ".data"
+
+    def test_no_common_path_returns_none(self, make_task: Callable[..., Task]):
+        """Returns None when no single path matches all examples."""
+        matcher = StructuralMatcher()
+        task = make_task({"a": 1}, 1, more_examples=[({"b": 2}, 2)])
+        assert matcher.derive(task) is None
+
+    def test_computed_value_returns_none(self, make_task: Callable[..., Task]):
+        """Outputs that do not appear in the input are left to the LLM."""
+        matcher = StructuralMatcher()
+        task = make_task([1, 2, 3], 6)
+        assert matcher.derive(task) is None
+
+    def test_type_sensitive_matching(self, make_task: Callable[..., Task]):
+        """true is not confused with 1 and "1" is not confused with 1."""
+        matcher = StructuralMatcher()
+        task = make_task({"flag": True, "num": 1, "str": "1"}, 1)
+        assert matcher.derive(task) == ".num"
+
+    def test_empty_task_returns_none(self):
+        """A task without examples yields no filter."""
+        matcher = StructuralMatcher()
+        assert matcher.derive(Task(id="t", description="d", examples=[])) is None
+
+
+class TestDeriveConstructions:
+    """Tests for object and array constructions."""
+
+    def test_rename_builds_object(self, make_task: Callable[..., Task]):
+        """Renamed fields produce an object construction."""
+        matcher = StructuralMatcher()
+        task = make_task({"first": "Ada", "meta": {"born": 1815}}, {"name": "Ada", "year": 1815})
+        assert matcher.derive(task) == '{"name": .first, "year": .meta.born}'
+
+    def test_pluck_maps_over_array(self, make_task: Callable[..., Task]):
+        """A list of field values maps over the input array."""
+        matcher = StructuralMatcher()
+        task = make_task([{"name": "a", "x": 1}, {"name": "b", "x": 2}], ["a", "b"])
+        assert matcher.derive(task) == "[.[].name]"
+
+    def test_map_with_object_construction(self, make_task: Callable[..., Task]):
+        """Array elements can themselves be object constructions."""
+        matcher = StructuralMatcher()
+        task = make_task(
+            {"users": [{"n": "a", "e": {"m": 1}}, {"n": "b", "e": {"m": 2}}]},
+            [{"name": "a", "mail": 1}, {"name": "b", "mail": 2}],
+        )
+        assert matcher.derive(task) == '[.users[] | {"name": .n, "mail": .e.m}]'
+
+    def test_positional_array(self, make_task: Callable[..., Task]):
+        """Fixed-length outputs are built position by position."""
+        matcher = StructuralMatcher()
+        task = make_task({"x": 1, "y": 2}, [2, 1], more_examples=[({"x": 5, "y": 7}, [7, 5])])
+        assert matcher.derive(task) == "[.y, .x]"
+
+    def test_rejects_index_paths_by_default(self, make_task: Callable[..., Task]):
+        """Paths that address array positions are not used by default."""
+        matcher = StructuralMatcher()
+        task = make_task([{"id": 3}, {"id": 1}], [1, 3])
+        assert matcher.derive(task) is None
+
+    def test_allows_index_paths_when_enabled(self, make_task: Callable[..., Task]):
+        """allow_indices=True permits positional paths."""
+        matcher = StructuralMatcher(allow_indices=True)
+        task = make_task([{"id": 3}, {"id": 1}], [1, 3])
+        assert matcher.derive(task) == "[.[1].id, .[0].id]"
+
+
+class TestBudget:
+    """Tests for input size limits."""
+
+    def test_large_input_is_skipped(self, make_task: Callable[..., Task]):
+        """Inputs over the node budget are not analyzed."""
+        matcher = StructuralMatcher(max_nodes=10)
+        task = make_task({"items": list(range(100)), "x": 1}, 1)
+        assert matcher.derive(task) is None
+
+    def test_deeply_nested_input(self, make_task: Callable[..., Task]):
+        """Nesting far past the recursion limit is indexed without overflowing."""
+        deep: object = {"v": "leaf"}
+        for _ in range(1500):
+            deep = {"a": [deep]}
+        matcher = StructuralMatcher(max_nodes=100_000, allow_indices=True)
+
+        filter_code = matcher.derive(make_task(deep, "leaf"))
+
+        assert filter_code == ".a[0]" * 1500 + ".v"
+
+    def test_deeply_nested_output_is_skipped(self, make_task: Callable[..., Task]):
+        """Outputs nested past the recursion limit leave the task to the LLM."""
+        deep: object = "leaf"
+        for _ in range(5000):
+            deep = {"a": deep}
+        matcher = StructuralMatcher()
+
+        assert matcher.derive(make_task({"x": "leaf"}, deep)) is None
+
+    def test_typical_input_is_fast(self, make_task: Callable[..., Task]):
+        """Derivation on a typical example stays well under a millisecond."""
+        matcher = StructuralMatcher()
+        task = make_task({"user": {"name": "Alice", "tags": ["a", "b"], "age": 30}}, "Alice")
+        matcher.derive(task)  # warm up
+
+        start = time.perf_counter()
+        for _ in range(100):
+            matcher.derive(task)
+        per_call = (time.perf_counter() - start) / 100
+
+        assert per_call < 0.001
+
+
+class TestDerivedFiltersVerify:
+    """Tests that derived filters pass real jq evaluation."""
+
+    @pytest.mark.parametrize(
+        ("pairs"),
+        [
+            [({"user": {"name": "Alice"}}, "Alice")],
+            [([{"name": "a"}, {"name": "b"}], ["a", "b"]), ([], [])],
+            [({"a b": {"c": 1}}, {"renamed": 1})],
+            [({"items": [{"id": 1, "v": "x"}]}, [{"key": 1, "val": "x"}])],
+        ],
+    )
+    def test_derived_filter_is_perfect(
+        self,
+        reviewer: AlgorithmicReviewer,
+        pairs: list[tuple[object, object]],
+        make_task: Callable[..., Task],
+    ):
+        """Every derived filter scores perfectly on its own examples."""
+        task = make_task(*pairs[0], more_examples=pairs[1:])
+        filter_code = StructuralMatcher().derive(task)
+
+        assert filter_code is not None
+        attempt = reviewer.evaluate(task, filter_code)
+        assert attempt.is_perfect
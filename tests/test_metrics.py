@@ -0,0 +1,184 @@
+"""
+Tests for the Prometheus metrics registry and exporters.
+
+This module tests counters, gauges and histograms, the text exposition
+format, atomic file output, the HTTP endpoint and SynthMetrics' derived
+figures.
+"""
+
+from pathlib import Path
+
+import httpx
+import pytest
+
+from src.domain import Solution
+from src.metrics import CONTENT_TYPE, MetricsRegistry, SynthMetrics, get_metrics
+
+
+def _solution(success: bool, iterations: int) -> Solution:
+    return Solution(
+        task_id="t",
+        success=success,
+        best_filter=".x",
+        best_score=1.0 if success else 0.0,
+        iterations_used=iterations,
+        history=[],
+    )
+
+
+class TestInstruments:
+    """Tests for counters, gauges and histograms."""
+
+    def test_counter(self):
+        """Counters add up per label set and never decrease."""
+        counter = MetricsRegistry().counter("requests_total", "Requests.", ("status",))
+
+        counter.inc(status=200)
+        counter.inc(2, status="200")
+        counter.inc(status="429")
+
+        assert counter.value(status="200") == 3
+        assert counter.value(status="500") == 0
+        with pytest.raises(ValueError, match="cannot decrease"):
+            counter.inc(-1, status="200")
+
+    def test_labels_must_match(self):
+        """Missing or unknown labels are rejected."""
+        counter = MetricsRegistry().counter("requests_total", "Requests.", ("status",))
+
+        with pytest.raises(ValueError, match="takes labels"):
+            counter.inc()
+        with pytest.raises(ValueError, match="takes labels"):
+            counter.inc(status="200", provider="x")
+
+    def test_gauge(self):
+        """Gauges keep the last value."""
+        gauge = MetricsRegistry().gauge("rate", "Rate.")
+
+        gauge.set(0.5)
+        gauge.set(0.25)
+
+        assert gauge.value() == 0.25
+
+    def test_histogram(self):
+        """Observations land in the first bucket whose bound they do not exceed."""
+        histogram = MetricsRegistry().histogram("latency_seconds", "Latency.", (0.1, 1.0))
+
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        assert histogram.count() == 4
+        assert histogram.sum() == pytest.approx(3.65)
+        samples = {labels.get("le", name): value for name, labels, value in histogram.samples()}
+        assert samples == {
+            "0.1": 2,
+            "1": 3,
+            "+Inf": 4,
+            "latency_seconds_sum": pytest.approx(3.65),
+            "latency_seconds_count": 4,
+        }
+
+    def test_duplicate_name_rejected(self):
+        """A name can only be registered once."""
+        registry = MetricsRegistry()
+        registry.counter("a_total", "A.")
+
+        with pytest.raises(ValueError, match="already registered"):
+            registry.gauge("a_total", "A.")
+
+
+class TestExposition:
+    """Tests for the text exposition format."""
+
+    def test_render(self):
+        """Metrics render with HELP and TYPE lines, labels and histogram series."""
+        registry = MetricsRegistry()
+        registry.counter("spawns_total", "Processes started.").inc(3)
+        requests = registry.counter("requests_total", "Requests.", ("provider", "status"))
+        requests.inc(provider='a"b', status="200")
+        registry.histogram("latency_seconds", "Latency.", (0.5,)).observe(0.25)
+
+        assert registry.render() == (
+            "# HELP spawns_total Processes started.\n"
+            "# TYPE spawns_total counter\n"
+            "spawns_total 3\n"
+            "# HELP requests_total Requests.\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{provider="a\\"b",status="200"} 1\n'
+            "# HELP latency_seconds Latency.\n"
+            "# TYPE latency_seconds histogram\n"
+            'latency_seconds_bucket{le="0.5"} 1\n'
+            'latency_seconds_bucket{le="+Inf"} 1\n'
+            "latency_seconds_sum 0.25\n"
+            "latency_seconds_count 1\n"
+        )
+
+    def test_labelled_metric_without_samples(self):
+        """A labelled metric with no samples yet only has its metadata."""
+        registry = MetricsRegistry()
+        registry.counter("lookups_total", "Lookups.", ("result",))
+
+        assert registry.render().splitlines() == [
+            "# HELP lookups_total Lookups.",
+            "# TYPE lookups_total counter",
+        ]
+
+    def test_write(self, tmp_path: Path):
+        """The file is replaced atomically and no temporary file is left."""
+        registry = MetricsRegistry()
+        registry.counter("spawns_total", "Processes started.").inc()
+        path = tmp_path / "synth.prom"
+        path.write_text("old")
+
+        registry.write(path)
+
+        assert path.read_text() == registry.render()
+        assert [p.name for p in tmp_path.iterdir()] == ["synth.prom"]
+
+    def test_serve(self):
+        """GET /metrics returns the exposition; other paths are 404."""
+        registry = MetricsRegistry()
+        registry.counter("spawns_total", "Processes started.").inc(2)
+
+        with registry.serve() as server:
+            response = httpx.get(server.url)
+            missing = httpx.get(server.url.replace("/metrics", "/other"))
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == CONTENT_TYPE
+        assert "spawns_total 2" in response.text
+        assert missing.status_code == 404
+
+
+class TestSynthMetrics:
+    """Tests for the synthesis instruments."""
+
+    def test_off_by_default(self):
+        """Nothing is installed unless requested."""
+        assert get_metrics() is None
+
+    def test_record_solution(self, metrics: SynthMetrics):
+        """Finished tasks update the outcome counts, iterations and solve rate."""
+        metrics.record_solution(_solution(True, 2))
+        metrics.record_solution(_solution(False, 10))
+        metrics.record_solution(_solution(True, 1))
+
+        assert metrics.tasks.value(outcome="solved") == 2
+        assert metrics.solve_rate.value() == pytest.approx(2 / 3)
+        assert metrics.iterations.sum() == 13
+
+    def test_record_jq_run(self, metrics: SynthMetrics):
+        """jq runs are counted, timed and timeouts counted separately."""
+        metrics.record_jq_run(0.01, timed_out=False)
+        metrics.record_jq_run(1.0, timed_out=True)
+
+        assert metrics.jq_spawns.value() == 2
+        assert metrics.jq_timeouts.value() == 1
+        assert metrics.jq_duration.count() == 2
+
+    def test_metric_names(self):
+        """All metrics share the prefix."""
+        names = list(SynthMetrics(prefix="x").registry.metrics)
+
+        assert all(name.startswith("x_") for name in names)
+        assert "x_llm_requests_total" in names
@@ -0,0 +1,366 @@
+"""
+Unit tests for the local mock LLM server.
+
+This module tests request decoding, scripted and recorded answers, latency
+distributions and fault injection against the real provider clients.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from src.cache import ResponseCache
+from src.generator import JQGenerator
+from src.mockserver import (
+    ANTHROPIC_PATH,
+    OPENAI_PATH,
+    FaultProfile,
+    LatencyProfile,
+    MockLLMServer,
+    ScriptRule,
+    load_script,
+    main,
+    parse_request,
+)
+from src.providers import AnthropicProvider, ChatMessage, OpenAIProvider
+
+
+class TestLatencyProfile:
+    """Tests for parsing and sampling latency distributions."""
+
+    def test_parse(self):
+        """Distribution name, center and spread are parsed."""
+        assert LatencyProfile.parse("lognormal:0.8,0.5") == LatencyProfile(
+            distribution="lognormal", center_sec=0.8, spread=0.5
+        )
+        assert LatencyProfile.parse("fixed:0.2") == LatencyProfile(center_sec=0.2)
+
+    @pytest.mark.parametrize("text", ["gamma:1", "fixed:abc", "normal:-1,0.1"])
+    def test_parse_rejects_invalid(self, text: str):
+        """Unknown distributions and bad parameters are rejected."""
+        with pytest.raises(ValueError):
+            LatencyProfile.parse(text)
+
+    def test_fixed_sample(self):
+        """A fixed profile always returns its center."""
+        assert LatencyProfile(center_sec=0.3).sample(random.Random(1)) == 0.3
+
+    @pytest.mark.parametrize("distribution", LatencyProfile.DISTRIBUTIONS)
+    def test_samples_within_bounds(self, distribution: str):
+        """Draws are never negative or above max_sec."""
+        profile = LatencyProfile(distribution, center_sec=0.5, spread=0.4, max_sec=1.0)
+        rng = random.Random(7)
+
+        samples = [profile.sample(rng) for _ in range(500)]
+
+        assert all(0.0 <= s <= 1.0 for s in samples)
+
+    def test_uniform_range(self):
+        """Uniform draws stay within center ± spread."""
+        profile = LatencyProfile("uniform", center_sec=0.5, spread=0.1)
+        rng = random.Random(3)
+
+        assert all(0.4 <= profile.sample(rng) <= 0.6 for _ in range(200))
+
+
+class TestFaultProfile:
+    """Tests for mapping random draws to injected faults."""
+
+    def test_rates_are_cumulative(self):
+        """Each fault covers its own slice of [0, 1)."""
+        faults = FaultProfile(rate_limit=0.1, server_error=0.1, timeout=0.1, malformed=0.1)
+
+        assert faults.pick(0.05) == "rate_limit"
+        assert faults.pick(0.15) == "server_error"
+        assert faults.pick(0.25) == "timeout"
+        assert faults.pick(0.35) == "malformed"
+        assert faults.pick(0.45) is None
+
+    def test_no_faults_by_default(self):
+        """The default profile never injects anything."""
+        assert FaultProfile().pick(0.0) is None
+
+    def test_server_rejects_rates_above_one(self):
+        """Rates adding up to more than 1 are rejected."""
+        with pytest.raises(ValueError, match="at most 1"):
+            MockLLMServer(faults=FaultProfile(rate_limit=0.6, server_error=0.6))
+
+
+class TestParseRequest:
+    """Tests for decoding both APIs' request bodies."""
+
+    def test_openai_body(self):
+        """The system message is split off and the rest become chat messages."""
+        body = {
+            "model": "gpt-4o",
+            "temperature": 0.3,
+            "messages": [
+                {"role": "system", "content": "sys"},
+                {"role": "user", "content": "task"},
+                {"role": "assistant", "content": ".a"},
+            ],
+        }
+
+        request = parse_request(OPENAI_PATH, json.dumps(body).encode())
+
+        assert request.api == "openai"
+        assert request.system_prompt == "sys"
+        assert request.messages == (ChatMessage("user", "task"), ChatMessage("assistant", ".a"))
+        assert request.temperature == 0.3
+        assert not request.stream
+
+    def test_cache_key_matches_generator(self):
+        """The key is the one a generator talking to the recorded endpoint used."""
+        body = {
+            "model": "gpt-4o",
+            "temperature": 0.3,
+            "messages": [{"role": "user", "content": "p"}],
+        }
+        request = parse_request(OPENAI_PATH, json.dumps(body).encode())
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            public = JQGenerator(model="gpt-4o")
+            local = JQGenerator(model="gpt-4o", base_url="http://localhost:11434")
+        request = replace(request, system_prompt=public.provider.SYSTEM_PROMPT)
+
+        assert request.cache_key() == public._cache_key("p")
+        assert request.cache_key("http://localhost:11434") == local._cache_key("p")
+        assert request.cache_key() != local._cache_key("p")
+
+    def test_anthropic_blocks(self):
+        """Anthropic text blocks are joined like the generator's prompt text."""
+        provider = AnthropicProvider(api_key="test-key")
+        payload = provider._payload(
+            [ChatMessage("user", "prefix", cache=True), ChatMessage("user", "suffix")]
+        )
+
+        request = parse_request(ANTHROPIC_PATH, json.dumps(payload).encode())
+
+        assert request.api == "anthropic"
+        assert request.system_prompt == provider.SYSTEM_PROMPT
+        assert request.prompt == "prefix\nsuffix"
+
+    def test_unknown_path(self):
+        """Only the two completion endpoints are accepted."""
+        with pytest.raises(ValueError, match="Unknown endpoint"):
+            parse_request("/v1/embeddings", b"{}")
+
+    def test_invalid_body(self):
+        """Bodies without a messages list are rejected."""
+        with pytest.raises(ValueError):
+            parse_request(OPENAI_PATH, b'{"model": "x"}')
+
+
+class TestLoadScript:
+    """Tests for reading scripted responses."""
+
+    def test_reads_rules_and_default(self, tmp_path: Path):
+        """Single and multiple responses are both accepted."""
+        script = tmp_path / "script.json"
+        script.write_text(
+            json.dumps(
+                {
+                    "default": ".",
+                    "rules": [
+                        {"match": "names", "response": ".name"},
+                        {"match": "ids", "responses": [".idd", ".id"]},
+                    ],
+                }
+            )
+        )
+
+        rules, default = load_script(script)
+
+        assert rules == [ScriptRule("names", (".name",)), ScriptRule("ids", (".idd", ".id"))]
+        assert default == "."
+
+    def test_rejects_rule_without_response(self, tmp_path: Path):
+        """A rule needs at least one string response."""
+        script = tmp_path / "script.json"
+        script.write_text(json.dumps({"rules": [{"match": "x"}]}))
+
+        with pytest.raises(ValueError, match="string responses"):
+            load_script(script)
+
+
+class TestMockLLMServer:
+    """Tests for serving both APIs through the real provider clients."""
+
+    def test_openai_scripted_responses(self):
+        """Successive matching requests get the scripted responses in order."""
+        rules = [ScriptRule("Extract", (".a", ".b"))]
+        with (
+            MockLLMServer(rules=rules, default_response=".z") as server,
+            OpenAIProvider(api_key="test-key", base_url=f"{server.url}/v1") as provider,
+        ):
+            answers = [provider.generate("Extract x") for _ in range(3)]
+
+            assert answers == [".a", ".b", ".b"]
+            assert provider.generate("other") == ".z"
+            assert server.stats.scripted == 3
+            assert server.stats.default == 1
+
+    def test_anthropic_and_usage(self):
+        """The Messages API is served and reports token usage."""
+        with (
+            MockLLMServer(default_response=".x") as server,
+            AnthropicProvider(api_key="test-key", base_url=server.url) as provider,
+        ):
+            assert provider.generate("hello") == ".x"
+            assert provider.cache_usage.input_tokens > 0
+
+    @pytest.mark.parametrize("provider_class", [OpenAIProvider, AnthropicProvider])
+    def test_streaming(self, provider_class: type[OpenAIProvider | AnthropicProvider]):
+        """Streams are split into deltas in each API's event format."""
+        response = "[.users[] | select(.active) | .name]"
+        with (
+            MockLLMServer(default_response=response) as server,
+            provider_class(api_key="test-key", base_url=server.url) as provider,
+        ):
+            deltas = list(provider.generate_stream("p"))
+
+            assert len(deltas) > 1
+            assert "".join(deltas) == response
+
+    def test_recorded_responses(self, tmp_path: Path):
+        """Responses recorded by a generator's cache are replayed for the same prompt."""
+        with MockLLMServer(default_response=".fallback") as server:
+            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+                generator = JQGenerator(base_url=server.url)
+            with generator:
+                prompt = "Extract the name"
+                ResponseCache(tmp_path).put(generator._cache_key(prompt), ".name")
+                server.recorded = ResponseCache(tmp_path, replay=True)
+                server.recorded_base_url = server.url
+
+                assert generator.provider.generate(prompt) == ".name"
+                assert generator.provider.generate("unrecorded") == ".fallback"
+                assert server.stats.recorded == 1
+
+    @pytest.mark.parametrize(
+        ("faults", "status"),
+        [
+            (FaultProfile(rate_limit=1.0, retry_after_sec=2.0), 429),
+            (FaultProfile(server_error=1.0), 500),
+        ],
+    )
+    def test_injected_error_status(self, faults: FaultProfile, status: int):
+        """Injected errors use real status codes (429 with Retry-After)."""
+        with MockLLMServer(faults=faults) as server:
+            response = httpx.post(f"{server.url}{OPENAI_PATH}", json={"messages": []})
+
+            assert response.status_code == status
+            if status == 429:
+                assert response.headers["Retry-After"] == "2"
+
+    def test_injected_malformed_body(self):
+        """A malformed body surfaces as the provider's invalid-response error."""
+        with (
+            MockLLMServer(faults=FaultProfile(malformed=1.0)) as server,
+            OpenAIProvider(api_key="test-key", base_url=server.url) as provider,
+        ):
+            with pytest.raises(RuntimeError, match="Invalid API response"):
+                provider.generate("p")
+            with pytest.raises(RuntimeError, match="Invalid streaming event"):
+                list(provider.generate_stream("p"))
+            assert server.stats.malformed == 2
+
+    def test_injected_timeout(self):
+        """A timed-out request is held and then dropped without an answer."""
+        with (
+            MockLLMServer(faults=FaultProfile(timeout=1.0, hang_sec=0.1)) as server,
+            OpenAIProvider(api_key="test-key", base_url=server.url) as provider,
+        ):
+            with pytest.raises(httpx.RemoteProtocolError):
+                provider.generate("p")
+            assert server.stats.timeouts == 1
+
+    def test_stop_releases_held_requests(self):
+        """Stopping the server does not wait for held requests to time out."""
+        server = MockLLMServer(faults=FaultProfile(timeout=1.0, hang_sec=60.0)).start()
+        errors: list[Exception] = []
+
+        def call() -> None:
+            try:
+                httpx.post(f"{server.url}{OPENAI_PATH}", json={"messages": []}, timeout=10)
+            except httpx.HTTPError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        while server.stats.timeouts == 0:
+            time.sleep(0.01)
+
+        started = time.monotonic()
+        server.stop()
+        thread.join(timeout=5)
+
+        assert time.monotonic() - started < 5
+        assert errors
+
+    def test_latency_applied(self):
+        """Responses are delayed by the latency profile."""
+        with (
+            MockLLMServer(latency=LatencyProfile(center_sec=0.2)) as server,
+            OpenAIProvider(api_key="test-key", base_url=server.url) as provider,
+        ):
+            started = time.monotonic()
+            provider.generate("p")
+
+            assert time.monotonic() - started >= 0.2
+
+    def test_draws_deterministic_per_request(self):
+        """The same seed and requests give the same draws, whatever the order."""
+        body = json.dumps({"messages": [{"role": "user", "content": "a"}]}).encode()
+        other = json.dumps({"messages": [{"role": "user", "content": "b"}]}).encode()
+        first, second = MockLLMServer(seed=5), MockLLMServer(seed=5)
+        try:
+            a1 = first.rng_for(parse_request(OPENAI_PATH, body)).random()
+            first.rng_for(parse_request(OPENAI_PATH, other))
+            a2 = first.rng_for(parse_request(OPENAI_PATH, body)).random()
+
+            second.rng_for(parse_request(OPENAI_PATH, other))
+            assert second.rng_for(parse_request(OPENAI_PATH, body)).random() == a1
+            assert second.rng_for(parse_request(OPENAI_PATH, body)).random() == a2
+            assert a1 != a2
+        finally:
+            first.stop()
+            second.stop()
+
+    def test_stats_health_and_errors(self):
+        """GET /stats and /health work; bad requests are counted."""
+        with MockLLMServer() as server:
+            assert httpx.get(f"{server.url}/health").status_code == 200
+            assert httpx.post(f"{server.url}/v1/other", json={}).status_code == 404
+            assert httpx.post(f"{server.url}{OPENAI_PATH}", content=b"{").status_code == 400
+
+            stats = httpx.get(f"{server.url}/stats").json()
+
+            assert stats["bad_requests"] == 2
+            assert stats["requests"] == 0
+            assert httpx.get(f"{server.url}/other").status_code == 404
+
+
+class TestMain:
+    """Tests for the mock server's command line."""
+
+    def test_invalid_latency(self, capsys: pytest.CaptureFixture[str]):
+        """Invalid options exit with status 1."""
+        assert main(["--port", "0", "--latency", "gamma:1"]) == 1
+        assert "Unknown latency distribution" in capsys.readouterr().err
+
+    def test_serves_until_interrupted(self, capsys: pytest.CaptureFixture[str]):
+        """The server prints its URL and final stats."""
+        with patch.object(MockLLMServer, "serve_forever", side_effect=KeyboardInterrupt):
+            assert main(["--port", "0", "--rate-limit-rate", "0.1"]) == 0
+
+        output = capsys.readouterr().out
+        assert "--base-url http://127.0.0.1:" in output
+        assert '"requests": 0' in output
@@ -0,0 +1,284 @@
+"""
+Tests for the search for faster equivalent filters.
+
+This module tests the rule-based rewriter (each rule, the patterns it must
+leave alone, and that its rewrites behave like the original in jq), the
+generated equivalence inputs, and the optimizer's checks, benchmarks and
+choice of the fastest alternative.
+"""
+
+import json
+from collections.abc import Callable
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.domain import Task
+from src.executor import JQExecutor
+from src.generator import GenerationError, JQGenerator
+from src.optimizer import FilterOptimizer, OptimizationPolicy, equivalence_inputs, rewrite
+from src.scaling import FilterTimer
+
+# Filter whose average is recomputed for every item: quadratic in the items
+QUADRATIC = ". as $d | .items | map(select(.p > ($d.items | map(.p) | add / length)))"
+LINEAR = (
+    "(.items | map(.p) | if length > 0 then add / length else 0 end) as $avg"
+    " | .items | map(select(.p > $avg))"
+)
+
+ITEMS = {"items": [{"p": 1}, {"p": 5}, {"p": 3}]}
+
+
+class TestRewrite:
+    """Tests for the rule-based rewriter."""
+
+    @pytest.mark.parametrize(
+        ("filter_code", "source", "expected"),
+        [
+            ("[.[] | select(.ok)]", "collect-to-map", "map(select(.ok))"),
+            (".a | [.[] | .b, .c][0]", "collect-to-map", ".a | map(.b, .c)[0]"),
+            ("map(.a) | map(.b) | map(.c)", "map-fusion", "map(.a | .b | .c)"),
+            ("sort | .[0]", "sort-to-min-max", "min"),
+            ("sort_by(.age) | last", "sort-to-min-max", "max_by(.age)"),
+            ("map(select(.x > 1)) | length > 0", "select-to-any", "any(.[]; .x > 1)"),
+            ("map(select(.x)) | length == 0", "select-to-any", "all(.[]; .x | not)"),
+            (
+                ". as $d | .a | map(. > ($d.b | add))",
+                "hoist-invariant",
+                ". as $d | .a | ((try [($d.b | add)] catch {error: .}) as $_opt0 | "
+                'map(. > ($_opt0 | if type == "array" then .[] else error(.error) end)))',
+            ),
+            (
+                ". as $r | reduce .a[] as [$k] ({}; .[$k] = [$r.ids[]])",
+                "hoist-invariant",
+                ". as $r | ((try [[$r.ids[]]] catch {error: .}) as $_opt0 | "
+                "reduce .a[] as [$k] ({}; .[$k] = "
+                '($_opt0 | if type == "array" then .[] else error(.error) end)))',
+            ),
+        ],
+    )
+    def test_rule(self, filter_code: str, source: str, expected: str):
+        """Each rule rewrites the pattern it recognizes."""
+        assert (source, expected) in rewrite(filter_code)
+
+    def test_rules_combine(self):
+        """All rules together rewrite until none matches."""
+        assert rewrite("[.[] | select(.x)] | length > 0")[-1] == (
+            "collect-to-map+select-to-any",
+            "any(.[]; .x)",
+        )
+
+    @pytest.mark.parametrize(
+        "filter_code",
+        [
+            # The variable bound in the first map would be visible in the second
+            "map(. as $x | .a) | map($x)",
+            # Indexing with a stream, not an array construction
+            ".x[.[] | .a]",
+            # Not whole pipeline stages
+            "map(.a)? | map(.b)",
+            "1, sort | .[0]",
+            # Depends on a variable bound inside the loop
+            "map(. as $x | ($x.a | length))",
+            "reduce .[] as $x (0; . + ($x | length))",
+            # Only reads a path; nothing to save
+            ". as $d | map(. + ($d.a))",
+            # Call arguments rather than a group
+            ". as $d | map(select(IN($d.ids[])))",
+            '"unterminated',
+        ],
+    )
+    def test_no_rewrite(self, filter_code: str):
+        """Patterns that are not exactly matched are left alone."""
+        assert rewrite(filter_code) == []
+
+    def test_string_literals_are_opaque(self):
+        """Brackets and pipes inside strings, even interpolated ones, are not code."""
+        filter_code = '"[.[] | \\(.x | "(")]" as $s | map(.a) | map(.b)'
+
+        assert rewrite(filter_code) == [
+            ("map-fusion", '"[.[] | \\(.x | "(")]" as $s | map(.a | .b)')
+        ]
+
+    @pytest.mark.parametrize(
+        "filter_code",
+        [
+            "[.[] | select(.p > 1)] | map(.p)",
+            "sort_by(.p) | .[0], (sort_by(.q) | .[-1])",
+            "map(select(.p > 2)) | length > 0",
+            ". as $d | map(select(.p > ($d | map(.p) | add / length)))",
+            ". as $d | map([$d[].q] | index(.[0]))",
+        ],
+    )
+    def test_rewrites_behave_like_original(self, executor: JQExecutor, filter_code: str):
+        """jq gives every rewrite the same output and errors as the original."""
+        inputs = [
+            [{"p": 1, "q": 3}, {"p": 4, "q": 3}, {"p": 4, "q": 1}],
+            [],
+            [{"p": None, "q": "x"}],
+        ]
+        data = "\n".join(json.dumps(v) for v in inputs).encode()
+        alternatives = rewrite(filter_code)
+
+        def outputs(code: str) -> str:
+            return executor.run_raw(f"try [({code})] catch null", data).stdout
+
+        assert alternatives
+        for _, alternative in alternatives:
+            assert outputs(alternative) == outputs(filter_code)
+
+
+class TestEquivalenceInputs:
+    """Tests for the generated inputs alternatives are checked on."""
+
+    def test_examples_reversed_and_resized(self, make_task: Callable[..., Task]):
+        """Examples come first, then their arrays reversed and resized, without duplicates."""
+        task = make_task({"a": [1, 2]}, None, more_examples=[("s", None)])
+
+        assert equivalence_inputs(task, (0, 1, 3)) == [
+            {"a": [1, 2]},
+            "s",
+            {"a": [2, 1]},
+            {"a": []},
+            {"a": [1]},
+            {"a": [1, 2, 1]},
+        ]
+
+
+class TestFilterOptimizer:
+    """Tests for checking and benchmarking alternatives with jq."""
+
+    def test_hoisting_speeds_up_quadratic_filter(
+        self, executor: JQExecutor, make_task: Callable[..., Task]
+    ):
+        """The rewritten filter replaces the original with its measured speedup."""
+        optimizer = FilterOptimizer(executor, policy=OptimizationPolicy(size=400, repeats=1))
+
+        result = optimizer.optimize(make_task(ITEMS, None), QUADRATIC)
+
+        assert result is not None
+        assert (result.original_filter, result.source) == (QUADRATIC, "hoist-invariant")
+        assert result.best_filter != QUADRATIC
+        assert (result.size, result.candidates, result.equivalent) == (400, 1, 1)
+        assert result.speedup == pytest.approx(result.seconds[0] / result.seconds[1])
+        assert result.speedup > 3
+        assert result.timed_out is False
+
+    def test_timed_out_original(self, make_task: Callable[..., Task]):
+        """A timeout at the benchmark size still lets an alternative win, as a lower bound."""
+        try:
+            executor = JQExecutor(timeout_sec=0.2)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+
+        result = FilterOptimizer(executor, policy=OptimizationPolicy(repeats=1)).optimize(
+            make_task(ITEMS, None), QUADRATIC
+        )
+
+        assert result is not None
+        assert result.timed_out is True
+        assert result.best_filter != QUADRATIC
+
+    def test_llm_alternatives(self, executor: JQExecutor, make_task: Callable[..., Task]):
+        """The generator is asked for alternatives; wrong ones are rejected."""
+        generator = MagicMock(spec=JQGenerator)
+        generator.generate.side_effect = [".items", LINEAR]
+        optimizer = FilterOptimizer(
+            executor, generator, OptimizationPolicy(size=400, repeats=1, llm_candidates=2)
+        )
+
+        result = optimizer.optimize(make_task(ITEMS, None), QUADRATIC)
+
+        assert result is not None
+        assert (result.candidates, result.equivalent) == (3, 2)
+        first, second = (c.args[0] for c in generator.generate.call_args_list)
+        assert QUADRATIC in first.description
+        assert first.examples == make_task(ITEMS, None).examples
+        assert "Already proposed: .items" in second.description
+
+    def test_generation_error(self, executor: JQExecutor, make_task: Callable[..., Task]):
+        """A failed LLM request leaves the rule-based alternatives."""
+        generator = MagicMock(spec=JQGenerator)
+        generator.generate.side_effect = GenerationError("down")
+        optimizer = FilterOptimizer(executor, generator, OptimizationPolicy(size=400, repeats=1))
+
+        result = optimizer.optimize(make_task(ITEMS, None), QUADRATIC)
+
+        assert result is not None
+        assert (result.candidates, result.source) == (1, "hoist-invariant")
+
+    def _clocked(
+        self, executor: JQExecutor, timer: Callable[..., FilterTimer], costs: dict[str, float]
+    ) -> FilterOptimizer:
+        """Optimizer whose filter times are fixed per filter (in seconds)."""
+        optimizer = FilterOptimizer(executor, policy=OptimizationPolicy(repeats=1))
+        optimizer.timer = timer(lambda filter_code, _data: costs.get(filter_code, 0.0))
+        return optimizer
+
+    def test_fastest_alternative_wins(
+        self,
+        executor: JQExecutor,
+        clocked_timer: Callable[..., FilterTimer],
+        make_task: Callable[..., Task],
+    ):
+        """Of several equivalent alternatives the fastest is returned."""
+        costs = {"map(.a) | map(.b)": 0.4, "map(.a | .b)": 0.1, "[.[] | .a | .b]": 0.2}
+        generator = MagicMock(spec=JQGenerator)
+        generator.generate.return_value = "[.[] | .a | .b]"
+        optimizer = self._clocked(executor, clocked_timer, costs)
+        optimizer.generator = generator
+
+        result = optimizer.optimize(make_task([{"a": {"b": 1}}], None), "map(.a) | map(.b)")
+
+        assert result is not None
+        assert (result.best_filter, result.source) == ("map(.a | .b)", "map-fusion")
+        assert result.seconds == pytest.approx((0.4, 0.1))
+        assert result.speedup == pytest.approx(4.0)
+
+    def test_small_speedup_keeps_original(
+        self,
+        executor: JQExecutor,
+        clocked_timer: Callable[..., FilterTimer],
+        make_task: Callable[..., Task],
+    ):
+        """An alternative must be min_speedup faster to replace the original."""
+        costs = {"map(.a) | map(.b)": 0.11, "map(.a | .b)": 0.1}
+        optimizer = self._clocked(executor, clocked_timer, costs)
+
+        result = optimizer.optimize(make_task([{"a": {"b": 1}}], None), "map(.a) | map(.b)")
+
+        assert result is not None
+        assert (result.best_filter, result.source, result.speedup) == (
+            "map(.a) | map(.b)",
+            "original",
+            1.0,
+        )
+        assert result.equivalent == 1
+
+    @pytest.mark.parametrize(
+        ("filter_code", "input_data"),
+        [
+            # Too fast to be worth optimizing
+            (".items | length", ITEMS),
+            # No array to grow
+            (".a", {"a": 1}),
+            # Fails on the scaled input
+            (".items | error", ITEMS),
+        ],
+    )
+    def test_not_measured(
+        self,
+        executor: JQExecutor,
+        filter_code: str,
+        input_data: object,
+        make_task: Callable[..., Task],
+    ):
+        """Filters that cannot be benchmarked are not optimized."""
+        generator = MagicMock(spec=JQGenerator)
+
+        result = FilterOptimizer(executor, generator).optimize(
+            make_task(input_data, None), filter_code
+        )
+
+        assert result is None
+        generator.generate.assert_not_called()
@@ -6,17 +6,27 @@ stagnation detection, duplicate handling, and best solution tracking
 using mocked generators to simulate various scenarios.
 """
 
+import asyncio
 from collections.abc import Callable
 from typing import Any
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from src.domain import Example, Task
+from src.cascade import CascadePolicy, ModelCascade
+from src.cegis import CEGISPolicy
+from src.domain import Example, OptimizationResult, ScalingResult, Task
 from src.executor import JQExecutor
 from src.generator import JQGenerator
+from src.matcher import StructuralMatcher
+from src.metrics import SynthMetrics
+from src.optimizer import FilterOptimizer, OptimizationPolicy
 from src.orchestrator import Orchestrator
+from src.providers import OpenAIProvider
 from src.reviewer import AlgorithmicReviewer
+from src.scaling import ScalingPolicy, ScalingReviewer
+from src.templates import TemplateLibrary
+from src.tracing import Tracer, filter_hash
 
 
 @pytest.fixture
@@ -833,6 +843,142 @@ class TestEdgeCases:
         assert solution.success is True
 
 
+class TestStructuralMatcherShortcut:
+    """Tests for solving tasks with the structural matcher before the LLM."""
+
+    def test_skips_llm_when_derived_filter_is_perfect(
+        self, mock_generator: MagicMock, executor: JQExecutor
+    ):
+        """A verified structural match returns without calling the generator."""
+        orchestrator = Orchestrator(
+            generator=mock_generator,
+            reviewer=AlgorithmicReviewer(executor),
+            matcher=StructuralMatcher(),
+        )
+        task = Task(
+            id="pluck",
+            description="Extract names",
+            examples=[
+                Example(input_data=[{"name": "a"}, {"name": "b"}], expected_output=["a", "b"]),
+            ],
+        )
+
+        solution = orchestrator.solve(task)
+
+        assert solution.success is True
+        assert solution.best_filter == "[.[].name]"
+        assert solution.iterations_used == 1
+        assert solution.history[0].iteration == 1
+        mock_generator.generate.assert_not_called()
+
+    def test_falls_back_to_llm_when_no_match(self, mock_generator: MagicMock, executor: JQExecutor):
+        """Computed outputs fall through to the generator loop."""
+        mock_generator.generate.return_value = "add"
+        orchestrator = Orchestrator(
+            generator=mock_generator,
+            reviewer=AlgorithmicReviewer(executor),
+            matcher=StructuralMatcher(),
+        )
+        task = Task(
+            id="sum",
+            description="Sum numbers",
+            examples=[Example(input_data=[1, 2, 3], expected_output=6)],
+        )
+
+        solution = orchestrator.solve(task)
+
+        assert solution.success is True
+        assert solution.best_filter == "add"
+        mock_generator.generate.assert_called_once()
+
+    def test_falls_back_when_verification_fails(
+        self, mock_generator: MagicMock, executor: JQExecutor
+    ):
+        """A derived filter that fails verification is discarded."""
+        mock_generator.generate.return_value = ".x"
+        matcher = MagicMock(spec=StructuralMatcher)
+        matcher.derive.return_value = ".y"
+        orchestrator = Orchestrator(
+            generator=mock_generator,
+            reviewer=AlgorithmicReviewer(executor),
+            matcher=matcher,
+        )
+        task = Task(
+            id="t", description="d", examples=[Example(input_data={"x": 1}, expected_output=1)]
+        )
+
+        solution = orchestrator.solve(task)
+
+        assert solution.best_filter == ".x"
+        assert [a.filter_code for a in solution.history] == [".x"]
+        mock_generator.generate.assert_called_once()
+
+
+class TestTemplateShortcut:
+    """Tests for solving tasks with the template library before the LLM."""
+
+    def test_skips_llm_when_template_matches(self, mock_generator: MagicMock, executor: JQExecutor):
+        """A screened template solution returns without calling the generator."""
+        orchestrator = Orchestrator(
+            generator=mock_generator,
+            reviewer=AlgorithmicReviewer(executor),
+            templates=TemplateLibrary(),
+        )
+        task = Task(
+            id="flatten",
+            description="Flatten",
+            examples=[Example(input_data=[[1, [2]], 3], expected_output=[1, 2, 3])],
+        )
+
+        solution = orchestrator.solve(task)
+
+        assert solution.success is True
+        assert solution.best_filter == "flatten"
+        assert solution.iterations_used == 1
+        mock_generator.generate.assert_not_called()
+
+    def test_falls_back_to_llm_when_no_template_passes(
+        self, mock_generator: MagicMock, executor: JQExecutor
+    ):
+        """When no candidate survives screening, the LLM loop runs."""
+        mock_generator.generate.return_value = "map(. * 2)"
+        orchestrator = Orchestrator(
+            generator=mock_generator,
+            reviewer=AlgorithmicReviewer(executor),
+            templates=TemplateLibrary(),
+        )
+        task = Task(
+            id="double",
+            description="Double",
+            examples=[Example(input_data=[1, 2], expected_output=[2, 4])],
+        )
+
+        solution = orchestrator.solve(task)
+
+        assert solution.best_filter == "map(. * 2)"
+        mock_generator.generate.assert_called_once()
+
+    def test_matcher_is_tried_before_templates(
+        self, mock_generator: MagicMock, executor: JQExecutor
+    ):
+        """A structural match wins without screening templates."""
+        templates = MagicMock(spec=TemplateLibrary)
+        orchestrator = Orchestrator(
+            generator=mock_generator,
+            reviewer=AlgorithmicReviewer(executor),
+            matcher=StructuralMatcher(),
+            templates=templates,
+        )
+        task = Task(
+            id="t", description="d", examples=[Example(input_data={"x": 1}, expected_output=1)]
+        )
+
+        solution = orchestrator.solve(task)
+
+        assert solution.best_filter == ".x"
+        templates.instantiate.assert_not_called()
+
+
 class TestFilterNormalization:
     """Regression tests for filter normalization with string literals."""
 
@@ -958,3 +1104,721 @@ class TestFilterNormalization:
         # Should be same
         assert norm1 == norm2
         assert norm1 == ".[]|.x|.y"
+
+
+class TestSolveAsync:
+    """Tests for the asyncio refinement loop."""
+
+    def test_finds_solution_on_second_try(
+        self,
+        mock_generator: MagicMock,
+        orchestrator_factory: Callable[[MagicMock, int, int], Orchestrator],
+    ):
+        """solve_async refines with history exactly like solve."""
+        mock_generator.generate_async.side_effect = [".wrong", ".x"]
+        orchestrator = orchestrator_factory(mock_generator)
+        task = Task(
+            id="test-task",
+            description="Extract x",
+            examples=[Example(input_data={"x": 42}, expected_output=42)],
+        )
+
+        solution = asyncio.run(orchestrator.solve_async(task))
+
+        assert solution.success is True
+        assert solution.best_filter == ".x"
+        assert [a.iteration for a in solution.history] == [1, 2]
+        second_history = mock_generator.generate_async.call_args_list[1][0][1]
+        assert [a.filter_code for a in second_history] == [".wrong"]
+        mock_generator.generate.assert_not_called()
+
+    def test_stagnation_and_duplicates(
+        self,
+        mock_generator: MagicMock,
+        orchestrator_factory: Callable[[MagicMock, int, int], Orchestrator],
+    ):
+        """Duplicates and failures count toward the stagnation limit."""
+        mock_generator.generate_async.side_effect = [".y", ".y", RuntimeError("down"), ".z"]
+        orchestrator = orchestrator_factory(mock_generator, 10, 3)
+        task = Task(
+            id="t", description="d", examples=[Example(input_data={"x": 1}, expected_output=1)]
+        )
+
+        solution = asyncio.run(orchestrator.solve_async(task, verbose=True))
+
+        assert solution.success is False
+        assert [a.filter_code for a in solution.history] == [".y", ".z"]
+        assert mock_generator.generate_async.await_count == 4
+
+    def test_all_generation_failures(
+        self,
+        mock_generator: MagicMock,
+        orchestrator_factory: Callable[[MagicMock, int, int], Orchestrator],
+    ):
+        """A loop without any evaluated attempt returns an empty failure."""
+        mock_generator.generate_async.side_effect = RuntimeError("down")
+        orchestrator = orchestrator_factory(mock_generator, 10, 2)
+        task = Task(
+            id="t", description="d", examples=[Example(input_data={"x": 1}, expected_output=1)]
+        )
+
+        solution = asyncio.run(orchestrator.solve_async(task))
+
+        assert solution.success is False
+        assert solution.iterations_used == 0
+        assert solution.best_filter == ""
+
+    def test_matcher_shortcut(self, mock_generator: MagicMock, executor: JQExecutor):
+        """The deterministic pre-pass also runs before the async loop."""
+        orchestrator = Orchestrator(
+            generator=mock_generator,
+            reviewer=AlgorithmicReviewer(executor),
+            matcher=StructuralMatcher(),
+        )
+        task = Task(
+            id="pluck",
+            description="Extract names",
+            examples=[
+                Example(input_data=[{"name": "a"}, {"name": "b"}], expected_output=["a", "b"]),
+            ],
+        )
+
+        solution = asyncio.run(orchestrator.solve_async(task))
+
+        assert solution.success is True
+        mock_generator.generate_async.assert_not_called()
+
+    def test_matcher_shortcut_prints_nothing(
+        self,
+        mock_generator: MagicMock,
+        executor: JQExecutor,
+        make_task: Callable[..., Task],
+        capsys: pytest.CaptureFixture[str],
+    ):
+        """Tasks solved without the LLM print no progress line in async mode either."""
+        orchestrator = Orchestrator(
+            generator=mock_generator,
+            reviewer=AlgorithmicReviewer(executor),
+            matcher=StructuralMatcher(),
+        )
+        task = make_task({"x": 1}, 1)
+
+        with patch("src.orchestrator._should_show_progress", return_value=True):
+            assert asyncio.run(orchestrator.solve_async(task)).success is True
+            assert capsys.readouterr().out == ""
+            assert orchestrator.solve(task).success is True
+            assert "Solved by structural match" in capsys.readouterr().out
+
+    def test_tasks_run_concurrently(
+        self,
+        mock_generator: MagicMock,
+        orchestrator_factory: Callable[[MagicMock, int, int], Orchestrator],
+    ):
+        """Several tasks solved with gather overlap their LLM waits."""
+        state = {"active": 0, "peak": 0}
+
+        async def generate(task: Task, history: Any = None) -> str:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return ".x"
+
+        mock_generator.generate_async.side_effect = generate
+        orchestrator = orchestrator_factory(mock_generator)
+        tasks = [
+            Task(
+                id=f"t{i}",
+                description="Extract x",
+                examples=[Example(input_data={"x": i}, expected_output=i)],
+            )
+            for i in range(4)
+        ]
+
+        async def run() -> list[bool]:
+            solutions = await asyncio.gather(*(orchestrator.solve_async(t) for t in tasks))
+            return [s.success for s in solutions]
+
+        assert asyncio.run(run()) == [True] * 4
+        assert state["peak"] == 4
+
+
+class TestModelCascade:
+    """Tests for escalating from cheap to strong models."""
+
+    def _generator(self, model: str) -> MagicMock:
+        generator = MagicMock(spec=JQGenerator)
+        generator.provider = OpenAIProvider(api_key="test", model=model)
+        return generator
+
+    def _task(self) -> Task:
+        return Task(
+            id="t",
+            description="Extract x",
+            examples=[Example(input_data={"x": 1, "y": [1]}, expected_output=1)],
+        )
+
+    def _orchestrator(
+        self, executor: JQExecutor, cheap: MagicMock, strong: MagicMock, **policy: int
+    ) -> Orchestrator:
+        return Orchestrator(
+            generator=strong,
+            reviewer=AlgorithmicReviewer(executor),
+            max_iterations=10,
+            stagnation_limit=3,
+            cascade=ModelCascade([cheap], policy=CascadePolicy(**policy)),
+        )
+
+    def test_cheap_model_solves_without_escalation(self, executor: JQExecutor):
+        """Tasks the cheap model solves never reach the strong model."""
+        cheap, strong = self._generator("mini"), self._generator("big")
+        cheap.generate.return_value = ".x"
+        orchestrator = self._orchestrator(executor, cheap, strong)
+
+        solution = orchestrator.solve(self._task())
+
+        assert solution.success is True
+        strong.generate.assert_not_called()
+        stats = orchestrator.cascade.stats  # type: ignore[union-attr]
+        assert stats["openai/mini"].solved == 1
+        assert "openai/big" not in stats
+
+    def test_escalates_on_stagnation(self, executor: JQExecutor):
+        """No improvement for escalate_after iterations moves to the next model."""
+        cheap, strong = self._generator("mini"), self._generator("big")
+        cheap.generate.side_effect = [".y", ".y[0] + 5", "[.y]"]
+        strong.generate.return_value = ".x"
+        orchestrator = self._orchestrator(
+            executor, cheap, strong, escalate_after=2, repeated_error_limit=10
+        )
+
+        solution = orchestrator.solve(self._task())
+
+        assert solution.success is True
+        assert cheap.generate.call_count == 3
+        strong.generate.assert_called_once()
+        # The strong model sees the cheap model's attempts
+        assert len(strong.generate.call_args[0][1]) == 3
+        stats = orchestrator.cascade.stats  # type: ignore[union-attr]
+        assert stats["openai/mini"].escalations == 1
+        assert stats["openai/big"].tasks == 1
+        assert stats["openai/big"].solved == 1
+
+    def test_escalates_on_repeated_error(self, executor: JQExecutor):
+        """The same error type twice in a row escalates even while improving."""
+        cheap, strong = self._generator("mini"), self._generator("big")
+        cheap.generate.side_effect = [".[", ".x | ]"]
+        strong.generate.return_value = ".x"
+        orchestrator = self._orchestrator(
+            executor, cheap, strong, escalate_after=10, repeated_error_limit=2
+        )
+
+        solution = orchestrator.solve(self._task())
+
+        assert solution.success is True
+        assert cheap.generate.call_count == 2
+        strong.generate.assert_called_once()
+
+    def test_last_tier_stops_on_stagnation(self, executor: JQExecutor):
+        """The strongest model is subject to the normal stagnation limit."""
+        cheap, strong = self._generator("mini"), self._generator("big")
+        cheap.generate.side_effect = RuntimeError("down")
+        strong.generate.side_effect = RuntimeError("down")
+        orchestrator = self._orchestrator(executor, cheap, strong, escalate_after=1)
+
+        solution = orchestrator.solve(self._task())
+
+        assert solution.success is False
+        assert cheap.generate.call_count == 1
+        assert strong.generate.call_count == 3
+
+    def test_async_escalation(self, executor: JQExecutor):
+        """solve_async escalates the same way."""
+        cheap, strong = self._generator("mini"), self._generator("big")
+        cheap.generate_async.side_effect = RuntimeError("down")
+        strong.generate_async.return_value = ".x"
+        orchestrator = self._orchestrator(executor, cheap, strong, escalate_after=1)
+
+        solution = asyncio.run(orchestrator.solve_async(self._task()))
+
+        assert solution.success is True
+        strong.generate_async.assert_awaited_once()
+
+
+class TestCEGIS:
+    """Tests for counterexample-guided example selection."""
+
+    WRONG = "if .x < 3 then .x * 2 else 0 end"
+
+    def _task(self, count: int = 5) -> Task:
+        return Task(
+            id="double",
+            description="Double x",
+            examples=[
+                Example(input_data={"x": x}, expected_output=2 * x) for x in range(1, count + 1)
+            ],
+        )
+
+    def _orchestrator(
+        self, executor: JQExecutor, generator: MagicMock, **policy: int
+    ) -> Orchestrator:
+        return Orchestrator(
+            generator=generator,
+            reviewer=AlgorithmicReviewer(executor),
+            max_iterations=5,
+            cegis=CEGISPolicy(**policy),
+        )
+
+    def _prompt_sizes(self, generator: MagicMock) -> list[int]:
+        return [len(call.args[0].examples) for call in generator.generate.call_args_list]
+
+    def test_prompt_starts_with_subset(self, executor: JQExecutor, mock_generator: MagicMock):
+        """The first prompt only contains the initial working set."""
+        mock_generator.generate.return_value = ".x * 2"
+
+        solution = self._orchestrator(executor, mock_generator).solve(self._task())
+
+        assert solution.success is True
+        assert self._prompt_sizes(mock_generator) == [2]
+        # The successful attempt covers every example
+        assert len(solution.history[-1].example_results) == 5
+
+    def test_counterexample_added_to_next_prompt(
+        self, executor: JQExecutor, mock_generator: MagicMock
+    ):
+        """A candidate passing the subset but not the rest adds a counterexample."""
+        mock_generator.generate.side_effect = [self.WRONG, ".x * 2"]
+
+        solution = self._orchestrator(executor, mock_generator).solve(self._task())
+
+        assert solution.success is True
+        assert self._prompt_sizes(mock_generator) == [2, 3]
+        second_prompt = mock_generator.generate.call_args_list[1].args[0]
+        assert {"x": 3} in [ex.input_data for ex in second_prompt.examples]
+        # The recorded attempt is scored on the enlarged working set
+        first = solution.history[0]
+        assert len(first.example_results) == 3
+        assert first.is_perfect is False
+
+    def test_counterexamples_per_round(self, executor: JQExecutor, mock_generator: MagicMock):
+        """counterexamples_per_round controls how fast the working set grows."""
+        mock_generator.generate.side_effect = [self.WRONG, ".x * 2"]
+
+        self._orchestrator(executor, mock_generator, counterexamples_per_round=3).solve(
+            self._task()
+        )
+
+        assert self._prompt_sizes(mock_generator) == [2, 5]
+
+    def test_subset_failure_skips_remaining_examples(
+        self, executor: JQExecutor, mock_generator: MagicMock
+    ):
+        """A candidate failing the working set is not run on the rest."""
+        mock_generator.generate.side_effect = [".x", ".x * 2"]
+        orchestrator = self._orchestrator(executor, mock_generator)
+
+        solution = orchestrator.solve(self._task())
+
+        assert len(solution.history[0].example_results) == 2
+        assert self._prompt_sizes(mock_generator) == [2, 2]
+
+    def test_best_score_is_on_full_task(self, executor: JQExecutor, mock_generator: MagicMock):
+        """A failed run reports its best filter's score on every example."""
+        mock_generator.generate.side_effect = [".x * 2 + 1", ".x + 1", ".x", ".x - 1", "1"]
+
+        solution = self._orchestrator(executor, mock_generator).solve(self._task())
+
+        assert solution.success is False
+        full = AlgorithmicReviewer(executor).evaluate(self._task(), solution.best_filter)
+        assert solution.best_score == full.aggregated_score
+
+    def test_small_tasks_use_all_examples(self, executor: JQExecutor, mock_generator: MagicMock):
+        """Tasks with no more examples than the initial set are unaffected."""
+        mock_generator.generate.return_value = ".x * 2"
+
+        self._orchestrator(executor, mock_generator).solve(self._task(count=2))
+
+        assert self._prompt_sizes(mock_generator) == [2]
+
+    def test_async(self, executor: JQExecutor, mock_generator: MagicMock):
+        """solve_async grows the working set the same way."""
+        mock_generator.generate_async.side_effect = [self.WRONG, ".x * 2"]
+
+        solution = asyncio.run(
+            self._orchestrator(executor, mock_generator).solve_async(self._task())
+        )
+
+        assert solution.success is True
+        sizes = [
+            len(call.args[0].examples) for call in mock_generator.generate_async.call_args_list
+        ]
+        assert sizes == [2, 3]
+
+
+class TestScalingReview:
+    """Tests for penalizing filters that scale superlinearly."""
+
+    SLOW = ".xs | map(. as $x | 1) | length"
+    FAST = ".xs | length"
+    TASK = Task(
+        id="count",
+        description="Count xs",
+        examples=[Example(input_data={"xs": [1, 2, 3]}, expected_output=3)],
+    )
+
+    def _result(self, superlinear: bool) -> ScalingResult:
+        return ScalingResult(
+            sizes=(200, 800),
+            seconds=(0.01, 0.2 if superlinear else 0.04),
+            output_bytes=(1, 1),
+            time_exponent=2.0 if superlinear else 1.0,
+            output_exponent=0.0,
+            timed_out=False,
+            superlinear=superlinear,
+            feedback="grows like n^2.0" if superlinear else "",
+        )
+
+    def _orchestrator(self, executor: JQExecutor, generator: MagicMock) -> Orchestrator:
+        orchestrator = Orchestrator(
+            generator=generator,
+            reviewer=AlgorithmicReviewer(executor),
+            max_iterations=3,
+            scaling=ScalingPolicy(),
+        )
+        assert isinstance(orchestrator.scaling, ScalingReviewer)
+        scaling = MagicMock(spec=ScalingReviewer, policy=ScalingPolicy())
+        scaling.measure.side_effect = lambda _, code: self._result(code == self.SLOW)
+        orchestrator.scaling = scaling
+        return orchestrator
+
+    def test_superlinear_filter_is_penalized(self, executor: JQExecutor, mock_generator: MagicMock):
+        """A passing but superlinear filter is scored down and the loop asks for another."""
+        mock_generator.generate.side_effect = [self.SLOW, self.FAST]
+
+        solution = self._orchestrator(executor, mock_generator).solve(self.TASK)
+
+        assert (solution.success, solution.best_filter) == (True, self.FAST)
+        assert solution.scaling == self._result(False)
+        slow = solution.history[0]
+        assert slow.aggregated_score == pytest.approx(1 - ScalingPolicy.penalty)
+        assert slow.scaling == self._result(True)
+        second_history = mock_generator.generate.call_args_list[1].args[1]
+        assert [a.filter_code for a in second_history] == [self.SLOW]
+
+    def test_superlinear_filter_returned_without_faster_one(
+        self, executor: JQExecutor, mock_generator: MagicMock
+    ):
+        """If no faster filter passes, the superlinear one is the solution."""
+        mock_generator.generate.side_effect = [".xs", self.SLOW, ".xs[0]"]
+
+        solution = self._orchestrator(executor, mock_generator).solve(self.TASK)
+
+        assert (solution.success, solution.best_filter) == (True, self.SLOW)
+        assert solution.best_score == 1.0
+        assert solution.scaling is not None and solution.scaling.superlinear
+        assert solution.iterations_used == 3
+
+    def test_async(self, executor: JQExecutor, mock_generator: MagicMock):
+        """solve_async measures passing filters the same way."""
+        mock_generator.generate_async.side_effect = [self.SLOW, self.FAST]
+
+        solution = asyncio.run(self._orchestrator(executor, mock_generator).solve_async(self.TASK))
+
+        assert solution.best_filter == self.FAST
+        assert solution.history[0].scaling == self._result(True)
+
+    def test_real_measurement(self, executor: JQExecutor, mock_generator: MagicMock):
+        """Without a mocked reviewer, a linear filter is measured and accepted."""
+        mock_generator.generate.return_value = self.FAST
+        orchestrator = Orchestrator(
+            mock_generator, AlgorithmicReviewer(executor), scaling=ScalingPolicy()
+        )
+
+        solution = orchestrator.solve(self.TASK)
+
+        assert solution.success is True
+        assert solution.scaling is not None
+        assert solution.scaling.superlinear is False
+
+
+class TestOptimization:
+    """Tests for replacing solved filters with faster equivalents."""
+
+    TASK = TestScalingReview.TASK
+
+    def _result(self, best_filter: str) -> OptimizationResult:
+        return OptimizationResult(
+            original_filter=".xs | length",
+            best_filter=best_filter,
+            source="llm",
+            size=1000,
+            seconds=(0.4, 0.1),
+            speedup=4.0,
+            candidates=2,
+            equivalent=1,
+        )
+
+    def _orchestrator(
+        self, executor: JQExecutor, generator: MagicMock, result: OptimizationResult | None
+    ) -> tuple[Orchestrator, MagicMock]:
+        orchestrator = Orchestrator(
+            generator,
+            AlgorithmicReviewer(executor),
+            max_iterations=2,
+            optimization=OptimizationPolicy(),
+        )
+        assert isinstance(orchestrator.optimizer, FilterOptimizer)
+        assert orchestrator.optimizer.generator is generator
+        optimizer = MagicMock(spec=FilterOptimizer)
+        optimizer.optimize.return_value = result
+        orchestrator.optimizer = optimizer
+        return orchestrator, optimizer
+
+    def test_faster_filter_replaces_solution(self, executor: JQExecutor, mock_generator: MagicMock):
+        """The optimizer's best filter becomes the solution, with its measurements."""
+        mock_generator.generate.return_value = ".xs | length"
+        result = self._result("[.xs[]] | length")
+        orchestrator, optimizer = self._orchestrator(executor, mock_generator, result)
+
+        solution = orchestrator.solve(self.TASK)
+
+        optimizer.optimize.assert_called_once_with(self.TASK, ".xs | length")
+        assert (solution.best_filter, solution.optimization) == ("[.xs[]] | length", result)
+        assert solution.history[0].filter_code == ".xs | length"
+
+    def test_no_faster_filter(self, executor: JQExecutor, mock_generator: MagicMock):
+        """Without a faster alternative the filter stays and the search is recorded."""
+        mock_generator.generate.return_value = ".xs | length"
+        result = self._result(".xs | length")
+        orchestrator, _ = self._orchestrator(executor, mock_generator, result)
+
+        solution = orchestrator.solve(self.TASK)
+
+        assert (solution.best_filter, solution.optimization) == (".xs | length", result)
+
+    def test_not_measured(self, executor: JQExecutor, mock_generator: MagicMock):
+        """A filter the optimizer did not measure is returned as is."""
+        mock_generator.generate.return_value = ".xs | length"
+        orchestrator, _ = self._orchestrator(executor, mock_generator, None)
+
+        solution = orchestrator.solve(self.TASK)
+
+        assert (solution.best_filter, solution.optimization) == (".xs | length", None)
+
+    def test_failed_solve_not_optimized(self, executor: JQExecutor, mock_generator: MagicMock):
+        """Only successful solutions are optimized."""
+        mock_generator.generate.side_effect = [".xs", ".xs[0]"]
+        orchestrator, optimizer = self._orchestrator(executor, mock_generator, None)
+
+        solution = orchestrator.solve(self.TASK)
+
+        assert solution.success is False
+        optimizer.optimize.assert_not_called()
+
+    def test_async(self, executor: JQExecutor, mock_generator: MagicMock):
+        """solve_async optimizes successful solutions the same way."""
+        mock_generator.generate_async.return_value = ".xs | length"
+        result = self._result("[.xs[]] | length")
+        orchestrator, _ = self._orchestrator(executor, mock_generator, result)
+
+        solution = asyncio.run(orchestrator.solve_async(self.TASK))
+
+        assert solution.best_filter == "[.xs[]] | length"
+
+    def test_scaling_measured_again(self, executor: JQExecutor, mock_generator: MagicMock):
+        """With the scaling review on, the replacement filter's growth is reported."""
+        mock_generator.generate.return_value = ".xs | length"
+        orchestrator, _ = self._orchestrator(
+            executor, mock_generator, self._result("[.xs[]] | length")
+        )
+        scaling = MagicMock(spec=ScalingReviewer, policy=ScalingPolicy())
+        scaling.measure.side_effect = lambda _, code: TestScalingReview()._result(
+            code == ".xs | length"
+        )
+        orchestrator.scaling = scaling
+
+        solution = orchestrator.solve(self.TASK)
+
+        assert [c.args[1] for c in scaling.measure.call_args_list] == [
+            ".xs | length",
+            "[.xs[]] | length",
+        ]
+        assert solution.scaling is not None and solution.scaling.superlinear is False
+
+
+class TestPhaseTimings:
+    """Tests for per-phase timings on attempts and solutions."""
+
+    def _orchestrator(self, executor: JQExecutor, responses: list[str], **kwargs: Any):
+        provider = MagicMock()
+        provider.model = "test-model"
+        provider.TEMPERATURE = 0.3
+        provider.SYSTEM_PROMPT = "system"
+        provider.generate.side_effect = responses
+        provider.agenerate = AsyncMock(side_effect=responses)
+        generator = JQGenerator(provider=provider)
+        return Orchestrator(generator, AlgorithmicReviewer(executor), **kwargs)
+
+    def _task(self) -> Task:
+        return Task(
+            id="t",
+            description="Extract x",
+            examples=[
+                Example(input_data={"x": 1}, expected_output=1),
+                Example(input_data={"x": 2}, expected_output=2),
+            ],
+        )
+
+    def test_disabled_by_default(self, executor: JQExecutor):
+        """Without timings nothing is recorded."""
+        orchestrator = self._orchestrator(executor, [".x"])
+
+        solution = orchestrator.solve(self._task())
+
+        assert solution.timings == {}
+        assert solution.history[0].timings == {}
+
+    def test_attempt_and_solution_phases(self, executor: JQExecutor):
+        """Every attempt has its own phases; the solution sums them."""
+        orchestrator = self._orchestrator(executor, [".y", ".x"], timings=True)
+
+        solution = orchestrator.solve(self._task())
+
+        assert solution.success is True
+        for attempt in solution.history:
+            assert list(attempt.timings) == [
+                "prompt_build",
+                "api_call",
+                "extraction",
+                "execution",
+                "parse",
+                "analyze",
+            ]
+        api_total = sum(a.timings["api_call"] for a in solution.history)
+        assert solution.timings["api_call"] == pytest.approx(api_total)
+        assert solution.timings["execution"] > 0
+
+    def test_failed_generation_counted_on_solution(self, executor: JQExecutor):
+        """Time of iterations without an attempt still counts for the task."""
+        orchestrator = self._orchestrator(executor, [".x", ".x", ".x"], timings=True)
+        task = Task(
+            id="t",
+            description="d",
+            examples=[Example(input_data={"x": 1}, expected_output=2)],
+        )
+
+        solution = orchestrator.solve(task)
+
+        assert len(solution.history) == 1
+        assert solution.timings["api_call"] > solution.history[0].timings["api_call"]
+
+    def test_async(self, executor: JQExecutor):
+        """solve_async records the same phases."""
+        orchestrator = self._orchestrator(executor, [".x"], timings=True)
+
+        solution = asyncio.run(orchestrator.solve_async(self._task()))
+
+        assert set(solution.history[0].timings) >= {"api_call", "execution", "analyze"}
+        assert solution.timings["execution"] > 0
+
+    def test_shortcut(self, executor: JQExecutor):
+        """Deterministic solutions record the evaluation phases."""
+        orchestrator = self._orchestrator(executor, [], matcher=StructuralMatcher(), timings=True)
+
+        solution = orchestrator.solve(self._task())
+
+        assert solution.history[0].timings["execution"] > 0
+        assert "api_call" not in solution.timings
+
+
+class TestTracing:
+    """Tests for solve and iteration spans."""
+
+    def _orchestrator(self, executor: JQExecutor, responses: list[str]) -> Orchestrator:
+        provider = MagicMock()
+        provider.model = "test-model"
+        provider.TEMPERATURE = 0.3
+        provider.SYSTEM_PROMPT = "system"
+        provider.generate.side_effect = responses
+        provider.agenerate = AsyncMock(side_effect=responses)
+        return Orchestrator(JQGenerator(provider=provider), AlgorithmicReviewer(executor))
+
+    def _task(self) -> Task:
+        return Task(
+            id="t",
+            description="Extract x",
+            examples=[
+                Example(input_data={"x": 1}, expected_output=1),
+                Example(input_data={"x": 2}, expected_output=2),
+            ],
+        )
+
+    def _check_tree(self, tracer: Tracer) -> None:
+        spans = {s.span_id: s for s in tracer.spans}
+        (solve,) = (s for s in tracer.spans if s.name == "Orchestrator.solve")
+        iterations = [s for s in tracer.spans if s.name == "Orchestrator.iteration"]
+        runs = [s for s in tracer.spans if s.name == "JQExecutor.run"]
+
+        assert solve.attributes == {
+            "task_id": "t",
+            "success": True,
+            "iterations": 2,
+            "best_score": 1.0,
+            "filter_hash": filter_hash(".x"),
+        }
+        assert [s.attributes["iteration"] for s in iterations] == [1, 2]
+        assert all(s.parent_id == solve.span_id for s in iterations)
+        assert len(runs) == 4
+        for run in runs:
+            assert spans[run.parent_id or 0].name == "Orchestrator.iteration"
+            assert run.attributes["task_id"] == "t"
+        assert runs[-1].attributes["iteration"] == 2
+
+    def test_solve_span_tree(self, executor: JQExecutor, tracer: Tracer):
+        """A solve is a root span with one child per iteration."""
+        self._orchestrator(executor, [".y", ".x"]).solve(self._task())
+
+        self._check_tree(tracer)
+
+    def test_solve_async_span_tree(self, executor: JQExecutor, tracer: Tracer):
+        """solve_async produces the same span tree."""
+        asyncio.run(self._orchestrator(executor, [".y", ".x"]).solve_async(self._task()))
+
+        self._check_tree(tracer)
+
+
+class TestMetrics:
+    """Tests for task metrics."""
+
+    def test_solutions_recorded(self, executor: JQExecutor, metrics: SynthMetrics):
+        """Each solve (sync or async) counts once with its iterations."""
+        tracing = TestTracing()
+        tracing._orchestrator(executor, [".y", ".x"]).solve(tracing._task())
+        asyncio.run(tracing._orchestrator(executor, [".y"]).solve_async(tracing._task()))
+
+        assert metrics.tasks.value(outcome="solved") == 1
+        assert metrics.tasks.value(outcome="failed") == 1
+        assert metrics.solve_rate.value() == 0.5
+        assert metrics.iterations.count() == 2
+
+
+class TestOnAttempt:
+    """Tests for the per-attempt callback."""
+
+    def test_called_with_numbered_attempts(self, executor: JQExecutor):
+        """Every evaluated attempt is reported in order, sync and async."""
+        tracing = TestTracing()
+        for run_async in (False, True):
+            seen: list[tuple[str, int, str]] = []
+            orchestrator = tracing._orchestrator(executor, [".y", ".x"])
+            orchestrator.on_attempt = lambda task, attempt, seen=seen: seen.append(
+                (task.id, attempt.iteration, attempt.filter_code)
+            )
+            task = tracing._task()
+
+            if run_async:
+                asyncio.run(orchestrator.solve_async(task))
+            else:
+                orchestrator.solve(task)
+
+            assert seen == [("t", 1, ".y"), ("t", 2, ".x")]
@@ -0,0 +1,289 @@
+"""
+Tests for the benchmark performance history.
+
+This module tests the sqlite store, the statistical tests and the
+regression verdicts of compare_runs, using synthetic task runs.
+"""
+
+import random
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+from src.bench import TaskRun, build_report
+from src.perfhistory import (
+    IMPROVEMENT,
+    REGRESSION,
+    UNCHANGED,
+    ComparePolicy,
+    PerfHistory,
+    bootstrap_mean,
+    compare_runs,
+    config_differences,
+    pair_runs,
+    runs_from_report,
+    task_mismatch,
+    wilcoxon_signed_rank,
+)
+
+
+def _run(i: int, *, time_sec: float = 1.0, success: bool = True, tokens: int = 100) -> TaskRun:
+    return TaskRun(
+        suite="suite.json",
+        task_id=f"t{i}",
+        success=success,
+        best_score=1.0 if success else 0.5,
+        iterations=1,
+        time_sec=time_sec,
+        llm_requests=1,
+        llm_api_calls=1,
+        prompt_tokens=tokens,
+        response_tokens=0,
+        jq_spawns=3,
+        jq_time_sec=0.05,
+    )
+
+
+def _noisy_runs(count: int, *, time_sec: float, seed: int, **kwargs) -> list[TaskRun]:
+    rng = random.Random(seed)
+    return [_run(i, time_sec=time_sec * rng.uniform(0.9, 1.1), **kwargs) for i in range(count)]
+
+
+def _by_metric(comparisons):
+    return {c.metric: c for c in comparisons}
+
+
+class TestWilcoxonSignedRank:
+    """Tests for the paired rank test."""
+
+    def test_all_positive(self):
+        """Ten positive differences give the normal-approximation p-value."""
+        assert wilcoxon_signed_rank(range(1, 11)) == pytest.approx(0.00592, abs=1e-5)
+
+    def test_symmetric(self):
+        """Flipping the sign of every difference does not change the p-value."""
+        differences = [0.5, -0.2, 1.0, 0.3, -0.1, 0.8, 0.4, 0.6]
+
+        assert wilcoxon_signed_rank(differences) == pytest.approx(
+            wilcoxon_signed_rank([-d for d in differences])
+        )
+
+    def test_balanced_differences(self):
+        """Differences symmetric around zero are not significant."""
+        assert wilcoxon_signed_rank([1, -1, 2, -2, 3, -3]) == pytest.approx(1.0)
+
+    def test_degenerate(self):
+        """No pairs or only zero differences give p = 1."""
+        assert wilcoxon_signed_rank([]) == 1.0
+        assert wilcoxon_signed_rank([0.0, 0.0]) == 1.0
+
+
+class TestBootstrapMean:
+    """Tests for the bootstrap interval."""
+
+    def test_interval_contains_true_mean(self):
+        """The interval brackets a clear shift and excludes zero."""
+        rng = random.Random(1)
+        differences = [rng.gauss(2, 1) for _ in range(50)]
+
+        low, high = bootstrap_mean(differences)
+
+        assert 0 < low < 2 < high
+
+    def test_reproducible(self):
+        """The same seed gives the same interval."""
+        values = [1.0, 2.0, 3.0]
+
+        first = bootstrap_mean(values, rng=random.Random(5))
+
+        assert first == bootstrap_mean(values, rng=random.Random(5))
+
+    def test_empty(self):
+        """No values give a zero interval."""
+        assert bootstrap_mean([]) == (0.0, 0.0)
+
+
+class TestPairing:
+    """Tests for matching the tasks of two runs."""
+
+    def test_pairs_by_suite_and_task(self):
+        """Tasks are matched whatever their order; unmatched ones are left out."""
+        baseline = [_run(0), _run(1), _run(2)]
+        candidate = [_run(2, time_sec=2.0), _run(0, time_sec=3.0), _run(3)]
+
+        pairs = pair_runs(baseline, candidate)
+
+        assert [(b.task_id, a.time_sec) for b, a in pairs] == [("t0", 3.0), ("t2", 2.0)]
+        assert task_mismatch(baseline, candidate) == (["suite.json:t1"], ["suite.json:t3"])
+
+    def test_config_differences(self):
+        """Settings with different or missing values are named."""
+        assert config_differences(
+            {"mode": "mock", "seed": 0, "matcher": True}, {"mode": "mock", "seed": 1}
+        ) == ["matcher", "seed"]
+
+
+class TestCompareRuns:
+    """Tests for regression verdicts."""
+
+    def test_same_distribution_unchanged(self):
+        """Runs drawn from the same distribution show no regressions."""
+        baseline = _noisy_runs(30, time_sec=1.0, seed=1)
+        candidate = _noisy_runs(30, time_sec=1.0, seed=2)
+
+        results = compare_runs(baseline, candidate)
+
+        assert {c.verdict for c in results} == {UNCHANGED}
+
+    def test_slower_is_regression(self):
+        """A consistent slowdown is flagged with its relative change."""
+        baseline = _noisy_runs(30, time_sec=1.0, seed=1)
+        candidate = _noisy_runs(30, time_sec=1.5, seed=2)
+
+        time = _by_metric(compare_runs(baseline, candidate))["time_sec"]
+
+        assert time.verdict == REGRESSION
+        assert time.p_value is not None and time.p_value < 0.05
+        assert time.change == pytest.approx(0.5, abs=0.1)
+        assert time.ci_low > 0
+
+    def test_uniform_slowdown_of_heterogeneous_tasks(self):
+        """A 50% slowdown of every task is found although task costs differ a thousandfold."""
+        rng = random.Random(3)
+        costs = [10 ** rng.uniform(-1, 2) for _ in range(30)]
+        baseline = [_run(i, time_sec=cost * rng.uniform(0.9, 1.1)) for i, cost in enumerate(costs)]
+        candidate = [
+            _run(i, time_sec=1.5 * cost * rng.uniform(0.9, 1.1)) for i, cost in enumerate(costs)
+        ]
+
+        time = _by_metric(compare_runs(baseline, candidate))["time_sec"]
+
+        assert time.verdict == REGRESSION
+        assert time.p_value is not None and time.p_value < 0.001
+        assert time.change == pytest.approx(0.5, abs=0.05)
+        assert 0 < time.ci_low < 0.5 < time.ci_high
+
+    def test_only_shared_tasks_compared(self):
+        """Tasks missing from one run do not count."""
+        baseline = [_run(i) for i in range(20)]
+        candidate = [_run(i) for i in range(10)] + [_run(i, time_sec=100.0) for i in range(20, 30)]
+
+        results = compare_runs(baseline, candidate)
+
+        assert {c.verdict for c in results} == {UNCHANGED}
+        assert _by_metric(results)["time_sec"].candidate == 1.0
+
+    def test_faster_is_improvement(self):
+        """A consistent speedup is an improvement."""
+        baseline = _noisy_runs(30, time_sec=1.5, seed=1)
+        candidate = _noisy_runs(30, time_sec=1.0, seed=2)
+
+        assert _by_metric(compare_runs(baseline, candidate))["time_sec"].verdict == IMPROVEMENT
+
+    def test_more_tokens_is_regression(self):
+        """Higher cost per task is a regression."""
+        baseline = [_run(i, tokens=100 + i) for i in range(20)]
+        candidate = [_run(i, tokens=150 + i) for i in range(20)]
+
+        tokens = _by_metric(compare_runs(baseline, candidate))["tokens"]
+
+        assert tokens.verdict == REGRESSION
+
+    def test_solve_rate_drop_is_regression(self):
+        """Solving fewer tasks is flagged by the bootstrap interval."""
+        baseline = [_run(i) for i in range(40)]
+        candidate = [_run(i, success=i % 2 == 0) for i in range(40)]
+
+        solve_rate = _by_metric(compare_runs(baseline, candidate))["solve_rate"]
+
+        assert solve_rate.verdict == REGRESSION
+        assert solve_rate.p_value is None
+        assert solve_rate.candidate == 0.5
+        assert solve_rate.ci_high < 0
+
+    def test_small_effect_ignored(self):
+        """Significant but tiny changes are below min_effect."""
+        baseline = _noisy_runs(200, time_sec=1.0, seed=1)
+        candidate = [_run(i, time_sec=run.time_sec * 1.02) for i, run in enumerate(baseline)]
+
+        policy = ComparePolicy(min_effect=0.05, resamples=200)
+
+        time = _by_metric(compare_runs(baseline, candidate, policy))["time_sec"]
+
+        assert time.p_value is not None and time.p_value < 0.05
+        assert time.verdict == UNCHANGED
+
+
+class TestPerfHistory:
+    """Tests for the sqlite store."""
+
+    def _report(self, label: str, commit: str, time_sec: float = 1.0) -> dict:
+        report = build_report([_run(0, time_sec=time_sec), _run(1, success=False)], config={})
+        report.update(label=label, commit=commit)
+        return report
+
+    def test_round_trip(self, tmp_path: Path):
+        """Stored task runs are loaded back unchanged."""
+        report = self._report("base", "abcdef123")
+
+        with PerfHistory(tmp_path / "perf.sqlite") as history:
+            run_id = history.add(report)
+            loaded = history.task_runs(run_id)
+
+        assert loaded == runs_from_report(report)
+        assert loaded[1].success is False
+
+    def test_persists_across_opens(self, tmp_path: Path):
+        """Runs survive closing and reopening the database."""
+        path = tmp_path / "perf.sqlite"
+        with PerfHistory(path) as history:
+            history.add(self._report("base", "abcdef123"))
+
+        with PerfHistory(path) as history:
+            runs = history.list_runs()
+
+        assert len(runs) == 1
+        assert (runs[0].label, runs[0].commit) == ("base", "abcdef123")
+        assert (runs[0].tasks, runs[0].solved) == (2, 1)
+
+    def test_resolve(self):
+        """Runs are found by ID, label, commit prefix, latest and previous."""
+        with PerfHistory(":memory:") as history:
+            first = history.add(self._report("base", "abcdef123"))
+            second = history.add(self._report("new", "fedcba987"))
+
+            assert history.resolve(str(first)) == first
+            assert history.resolve("latest") == second
+            assert history.resolve("previous") == first
+            assert history.resolve("base") == first
+            assert history.resolve("fedc") == second
+            with pytest.raises(ValueError, match="No stored benchmark run"):
+                history.resolve("missing")
+            with pytest.raises(ValueError):
+                history.resolve("abc")
+
+    def test_previous_needs_two_runs(self):
+        """'previous' does not exist with a single run."""
+        with PerfHistory(":memory:") as history:
+            history.add(self._report("base", "abcdef123"))
+
+            with pytest.raises(ValueError):
+                history.resolve("previous")
+
+
+class TestRunsFromReport:
+    """Tests for reading bench reports."""
+
+    def test_reads_tasks(self):
+        """Task entries become TaskRuns."""
+        runs = [_run(0), _run(1)]
+
+        assert runs_from_report({"tasks": [asdict(run) for run in runs]}) == runs
+
+    def test_rejects_invalid_reports(self):
+        """Reports without a valid task list are rejected."""
+        with pytest.raises(ValueError, match="no 'tasks'"):
+            runs_from_report({})
+        with pytest.raises(ValueError, match="Invalid task entry"):
+            runs_from_report({"tasks": [{"suite": "s"}]})
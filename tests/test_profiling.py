@@ -0,0 +1,153 @@
+"""
+Tests for per-task CPU and memory profiling.
+
+This module tests that TaskProfiler writes one profile per task, measures
+the solving thread's CPU rather than wall time, attributes the allocations
+alive at a task's peak to their source lines and merges the per-task results
+into one report.
+"""
+
+import pstats
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from src.profiling import CPU, MEM, MERGED_PSTATS, REPORT_FILE, TaskProfiler
+
+
+def _busy(seconds: float) -> int:
+    """Burn CPU for about the given time."""
+    end = time.process_time() + seconds
+    total = 0
+    while time.process_time() < end:
+        total += sum(range(100))
+    return total
+
+
+class TestCPUProfile:
+    """Tests for cProfile mode."""
+
+    def test_per_task_files_and_merged_report(self, tmp_path: Path):
+        """Each task gets a pstats file; the report merges them."""
+        profiler = TaskProfiler(CPU, tmp_path, top=5)
+
+        with profiler.profile("a/b"):
+            _busy(0.02)
+        with profiler.profile("a/b"):
+            _busy(0.02)
+        report = profiler.write_report().read_text()
+
+        assert [p.path.name for p in profiler.profiles] == ["001-a_b.pstats", "002-a_b.pstats"]
+        assert all(p.cpu_sec > 0 for p in profiler.profiles)
+        assert "_busy" in report
+        assert "CPU profile of 2 task(s)" in report
+        merged = pstats.Stats(str(tmp_path / MERGED_PSTATS))
+        assert any(func[2] == "_busy" for func in merged.stats)  # type: ignore[attr-defined]
+        assert (tmp_path / REPORT_FILE).exists()
+
+    def test_waiting_excluded(self, tmp_path: Path):
+        """Time spent blocked (like waiting on the network) is not counted."""
+        profiler = TaskProfiler(CPU, tmp_path)
+
+        with profiler.profile("t"):
+            time.sleep(0.2)
+
+        assert profiler.profiles[0].cpu_sec < 0.1
+
+    def test_other_threads_excluded(self, tmp_path: Path):
+        """CPU burnt by another thread is not charged to the waiting task."""
+        profiler = TaskProfiler(CPU, tmp_path)
+        worker = threading.Thread(target=_busy, args=(0.3,))
+
+        with profiler.profile("t"):
+            worker.start()
+            worker.join()
+
+        assert profiler.profiles[0].cpu_sec < 0.1
+
+    def test_profile_written_on_error(self, tmp_path: Path):
+        """A task that raises is still profiled."""
+        profiler = TaskProfiler(CPU, tmp_path)
+
+        with pytest.raises(RuntimeError), profiler.profile("t"):
+            raise RuntimeError("boom")
+
+        assert profiler.profiles[0].path.exists()
+
+    def test_empty_report(self, tmp_path: Path):
+        """A report without tasks only has the header."""
+        assert "CPU profile of 0 task(s)" in TaskProfiler(CPU, tmp_path).report()
+
+
+class TestMemoryProfile:
+    """Tests for tracemalloc mode."""
+
+    def test_retained_allocations(self, tmp_path: Path):
+        """Memory still allocated after a task is attributed to its line."""
+        profiler = TaskProfiler(MEM, tmp_path, top=3)
+        retained: list[bytes] = []
+
+        with profiler.profile("t"):
+            retained.extend(bytes(1000) for _ in range(500))
+
+        profile = profiler.profiles[0]
+        assert profile.peak_bytes >= 500_000
+        assert profile.sites[0].filename == __file__
+        assert profile.sites[0].size_bytes >= 500_000
+        assert "test_profiling.py" in profile.path.read_text()
+        assert not tracemalloc.is_tracing()
+
+    def test_freed_allocations_at_peak(self, tmp_path: Path):
+        """Memory freed before the task ends is attributed to its line at the peak."""
+        profiler = TaskProfiler(MEM, tmp_path)
+
+        with profiler.profile("t"):
+            temporary = [bytes(1000) for _ in range(2000)]
+            time.sleep(0.1)
+            del temporary
+
+        profile = profiler.profiles[0]
+        assert profile.peak_bytes >= 2_000_000
+        assert profile.sites[0].filename == __file__
+        assert profile.sites[0].size_bytes >= 1_000_000
+
+    def test_merged_report(self, tmp_path: Path):
+        """Sites are summed over tasks; peaks are listed per task."""
+        profiler = TaskProfiler(MEM, tmp_path)
+        retained: list[bytes] = []
+
+        for task_id in ("a", "b"):
+            with profiler.profile(task_id):
+                retained.extend(bytes(1000) for _ in range(200))
+        report = profiler.report()
+
+        assert "Memory profile of 2 task(s)" in report
+        assert report.count("test_profiling.py") == 1
+        assert [p.task_id for p in profiler.profiles] == ["a", "b"]
+
+    def test_keeps_existing_tracing(self, tmp_path: Path):
+        """Tracing started by someone else is left running."""
+        tracemalloc.start()
+        try:
+            with TaskProfiler(MEM, tmp_path).profile("t"):
+                pass
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+
+
+class TestValidation:
+    """Tests for constructor validation."""
+
+    def test_unknown_mode(self, tmp_path: Path):
+        """Only cpu and mem are supported."""
+        with pytest.raises(ValueError, match="Unknown profile mode"):
+            TaskProfiler("io", tmp_path)
+
+    def test_top_must_be_positive(self, tmp_path: Path):
+        """At least one entry must be reported."""
+        with pytest.raises(ValueError, match="top"):
+            TaskProfiler(CPU, tmp_path, top=0)
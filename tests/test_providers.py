@@ -4,13 +4,43 @@ Unit tests for LLM providers.
 This module tests the provider abstraction layer for OpenAI and Anthropic APIs.
 """
 
+import asyncio
+import json
 import os
-from unittest.mock import MagicMock, patch
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
 import pytest
 
-from src.providers import AnthropicProvider, OpenAIProvider, create_provider
+from src.circuit import BreakerPolicy, BreakerState
+from src.metrics import SynthMetrics
+from src.mockserver import FaultProfile, MockLLMServer
+from src.providers import (
+    AnthropicProvider,
+    ChatMessage,
+    FailoverProvider,
+    HTTPPoolConfig,
+    LLMProvider,
+    OpenAIProvider,
+    PromptCacheStats,
+    ProviderSpec,
+    ProvidersUnavailableError,
+    RequestAborter,
+    abortable_requests,
+    create_provider,
+    prompt_cache_usage,
+    prompt_text,
+)
+from src.tracing import KIND_CLIENT, Tracer, span
+
+
+def _status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    return httpx.HTTPStatusError(
+        f"HTTP {status}", request=request, response=httpx.Response(status, request=request)
+    )
 
 
 class TestOpenAIProviderInit:
@@ -123,6 +153,29 @@ class TestAnthropicProviderInit:
             provider = AnthropicProvider()
             assert provider.model == "custom-model"
 
+    def test_uses_anthropic_endpoint_by_default(self):
+        """Without a base URL requests go to the Anthropic API."""
+        with patch.dict(os.environ, {}, clear=True):
+            provider = AnthropicProvider(api_key="test-key")
+        assert provider.endpoint == "https://api.anthropic.com/v1/messages"
+
+    def test_accepts_base_url(self):
+        """A compatible server can be used, with or without the /v1 suffix."""
+        for base_url in ("http://localhost:8080", "http://localhost:8080/v1/"):
+            provider = AnthropicProvider(api_key="test-key", base_url=base_url)
+            assert provider.endpoint == "http://localhost:8080/v1/messages"
+
+    def test_reads_base_url_from_env(self):
+        """Reads the base URL from ANTHROPIC_BASE_URL."""
+        with patch.dict(os.environ, {"ANTHROPIC_BASE_URL": "http://mock:9000"}):
+            provider = AnthropicProvider(api_key="test-key")
+        assert provider.endpoint == "http://mock:9000/v1/messages"
+
+    def test_create_provider_passes_base_url(self):
+        """create_provider forwards the base URL to Anthropic providers."""
+        provider = create_provider("anthropic", api_key="k", base_url="http://localhost:1")
+        assert provider.endpoint == "http://localhost:1/v1/messages"
+
 
 class TestOpenAIProviderGenerate:
     """Tests for OpenAIProvider.generate method."""
@@ -438,3 +491,956 @@ class TestAnthropicProviderErrorHandling:
 
             with pytest.raises(httpx.HTTPStatusError):
                 provider.generate("test")
+
+
+class TestConnectionPooling:
+    """Tests for the long-lived pooled HTTP client."""
+
+    def _mock_client(self, content: str = ".x") -> MagicMock:
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"choices": [{"message": {"content": content}}]}
+        mock_client = MagicMock()
+        mock_client.post.return_value = mock_response
+        return mock_client
+
+    def test_reuses_client_across_calls(self):
+        """Consecutive generate calls share one httpx.Client."""
+        provider = OpenAIProvider(api_key="test-key")
+
+        with patch("httpx.Client") as mock_client_class:
+            mock_client_class.return_value = self._mock_client()
+
+            provider.generate("first")
+            provider.generate("second")
+
+        assert mock_client_class.call_count == 1
+        assert mock_client_class.return_value.post.call_count == 2
+
+    def test_client_created_with_pool_limits(self):
+        """The client is configured from HTTPPoolConfig."""
+        provider = AnthropicProvider(
+            api_key="test-key",
+            pool_config=HTTPPoolConfig(max_connections=7, max_keepalive_connections=3),
+        )
+
+        with patch("httpx.Client") as mock_client_class:
+            provider._get_client()
+
+        kwargs = mock_client_class.call_args[1]
+        assert kwargs["limits"].max_connections == 7
+        assert kwargs["limits"].max_keepalive_connections == 3
+        assert kwargs["http2"] is False
+        assert kwargs["timeout"] == provider.TIMEOUT_SEC
+
+    def test_close_releases_client(self):
+        """close() closes the client and a later call opens a new one."""
+        provider = OpenAIProvider(api_key="test-key")
+
+        with patch("httpx.Client") as mock_client_class:
+            mock_client_class.return_value = self._mock_client()
+            provider.generate("first")
+            provider.close()
+
+            mock_client_class.return_value.close.assert_called_once()
+
+            provider.generate("second")
+
+        assert mock_client_class.call_count == 2
+
+    def test_close_without_client_is_noop(self):
+        """close() before any request does nothing."""
+        provider = OpenAIProvider(api_key="test-key")
+        provider.close()
+        assert provider._client is None
+
+    def test_context_manager_closes_client(self):
+        """Leaving the with block closes the pooled client."""
+        with patch("httpx.Client") as mock_client_class:
+            mock_client_class.return_value = self._mock_client()
+            with OpenAIProvider(api_key="test-key") as provider:
+                provider.generate("prompt")
+
+            mock_client_class.return_value.close.assert_called_once()
+
+    def test_http2_requires_h2_package(self):
+        """Requesting HTTP/2 without 'h2' installed raises ValueError."""
+        with patch("importlib.util.find_spec", return_value=None):
+            with pytest.raises(ValueError) as exc_info:
+                OpenAIProvider(api_key="test-key", pool_config=HTTPPoolConfig(http2=True))
+
+        assert "h2" in str(exc_info.value)
+
+    def test_http2_enabled_when_available(self):
+        """HTTP/2 is passed to the client when 'h2' is installed."""
+        with patch("importlib.util.find_spec", return_value=MagicMock()):
+            provider = OpenAIProvider(api_key="test-key", pool_config=HTTPPoolConfig(http2=True))
+
+        with patch("httpx.Client") as mock_client_class:
+            provider._get_client()
+
+        assert mock_client_class.call_args[1]["http2"] is True
+
+    def test_create_provider_passes_pool_config(self):
+        """create_provider forwards pool_config to the provider."""
+        config = HTTPPoolConfig(max_connections=2)
+        provider = create_provider(provider_type="openai", api_key="key", pool_config=config)
+        assert provider.pool_config is config
+
+
+class TestAbortableRequests:
+    """Tests for aborting blocked requests from another thread."""
+
+    def test_abort_wakes_blocked_request(self):
+        """A request waiting for its response fails as soon as it is aborted."""
+        aborter = RequestAborter()
+        errors: list[Exception] = []
+        with (
+            MockLLMServer(faults=FaultProfile(timeout=1.0, hang_sec=60.0)) as server,
+            OpenAIProvider(api_key="test-key", base_url=server.url) as provider,
+        ):
+
+            def call() -> None:
+                with abortable_requests(aborter):
+                    try:
+                        provider.generate("p")
+                    except httpx.TransportError as e:
+                        errors.append(e)
+
+            thread = threading.Thread(target=call)
+            thread.start()
+            while server.stats.timeouts == 0:
+                time.sleep(0.01)
+            started = time.monotonic()
+            aborter.abort()
+            thread.join(timeout=5)
+
+            assert time.monotonic() - started < 5
+            assert len(errors) == 1
+            assert aborter.aborted
+
+    def test_aborted_request_not_sent(self):
+        """Requests of an aborted block fail without reaching the server."""
+        aborter = RequestAborter()
+        with (
+            MockLLMServer(default_response=".x") as server,
+            OpenAIProvider(api_key="test-key", base_url=server.url) as provider,
+        ):
+            with abortable_requests(aborter):
+                assert provider.generate("p") == ".x"
+                aborter.abort()
+                with pytest.raises(httpx.ReadError, match="aborted"):
+                    provider.generate("p")
+
+            assert server.stats.requests == 1
+
+    def test_thread_client_kept_and_closed(self):
+        """A thread's client is reused by its next block and closed with the provider."""
+        with (
+            MockLLMServer(default_response=".x") as server,
+            OpenAIProvider(api_key="test-key", base_url=server.url) as provider,
+        ):
+            for _ in range(2):
+                aborter = RequestAborter()
+                with abortable_requests(aborter):
+                    provider.generate("p")
+                aborter.abort()  # after the block: no effect
+            provider.generate("p")
+
+            assert not aborter.aborted
+            assert len(provider._thread_clients or {}) == 1
+            assert provider._client is not None
+        assert provider._thread_clients == {}
+
+
+class TestStreaming:
+    """Tests for SSE streaming in both providers."""
+
+    def _attach(self, provider: OpenAIProvider | AnthropicProvider, body, status: int = 200):
+        """Serve a canned response body from an in-process transport."""
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if isinstance(body, httpx.SyncByteStream):
+                return httpx.Response(status, stream=body)
+            return httpx.Response(status, content=body)
+
+        provider._client = httpx.Client(transport=httpx.MockTransport(handler))
+        return requests
+
+    def test_openai_yields_content_deltas(self):
+        """OpenAI chat completion chunks are decoded into text deltas."""
+        provider = OpenAIProvider(api_key="test-key")
+        body = (
+            b'data: {"choices":[{"delta":{"role":"assistant"}}]}\n\n'
+            b'data: {"choices":[{"delta":{"content":".us"}}]}\n\n'
+            b": keep-alive\n\n"
+            b'data: {"choices":[{"delta":{"content":"ers"}}]}\n\n'
+            b"data: [DONE]\n\n"
+        )
+        requests = self._attach(provider, body)
+
+        assert list(provider.generate_stream("p")) == [".us", "ers"]
+        assert json.loads(requests[0].content)["stream"] is True
+
+    def test_anthropic_yields_text_deltas(self):
+        """Anthropic content_block_delta events are decoded into text deltas."""
+        provider = AnthropicProvider(api_key="test-key")
+        body = (
+            b"event: message_start\n"
+            b'data: {"type":"message_start","message":{}}\n\n'
+            b"event: content_block_delta\n"
+            b'data: {"type":"content_block_delta","delta":{"type":"text_delta","text":".a"}}\n\n'
+            b"event: message_stop\n"
+            b'data: {"type":"message_stop"}\n\n'
+        )
+        requests = self._attach(provider, body)
+
+        assert list(provider.generate_stream("p")) == [".a"]
+        assert json.loads(requests[0].content)["stream"] is True
+
+    def test_anthropic_stream_error_event(self):
+        """An error event in the stream raises RuntimeError."""
+        provider = AnthropicProvider(api_key="test-key")
+        self._attach(provider, b'data: {"type":"error","error":{"message":"Overloaded"}}\n\n')
+
+        with pytest.raises(RuntimeError, match="Overloaded"):
+            list(provider.generate_stream("p"))
+
+    def test_error_status_raises(self):
+        """An error status raises HTTPStatusError before any delta."""
+        provider = OpenAIProvider(api_key="test-key")
+        self._attach(provider, b'{"error": {"message": "Rate limited"}}', status=429)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            list(provider.generate_stream("p"))
+
+    def test_invalid_event_raises(self):
+        """Malformed event JSON raises RuntimeError."""
+        provider = OpenAIProvider(api_key="test-key")
+        self._attach(provider, b"data: {not json\n\n")
+
+        with pytest.raises(RuntimeError, match="Invalid streaming event"):
+            list(provider.generate_stream("p"))
+
+    def test_closing_iterator_closes_response(self):
+        """Closing the stream early stops reading the response body."""
+        provider = OpenAIProvider(api_key="test-key")
+        state = {"sent": 0, "closed": False}
+
+        class Body(httpx.SyncByteStream):
+            def __iter__(self):
+                for i in range(100):
+                    state["sent"] += 1
+                    yield f'data: {{"choices":[{{"delta":{{"content":"{i}"}}}}]}}\n\n'.encode()
+
+            def close(self) -> None:
+                state["closed"] = True
+
+        self._attach(provider, Body())
+
+        stream = provider.generate_stream("p")
+        assert next(stream) == "0"
+        stream.close()
+
+        assert state["closed"]
+        assert state["sent"] < 100
+
+    def test_default_stream_falls_back_to_generate(self):
+        """Providers without streaming yield the full response once."""
+        provider = OpenAIProvider(api_key="test-key")
+        with patch.object(OpenAIProvider, "generate", return_value=".x"):
+            assert list(LLMProvider.generate_stream(provider, "p")) == [".x"]
+
+
+class TestPromptCaching:
+    """Tests for message prompts, cache breakpoints and cache usage tracking."""
+
+    SPLIT = (ChatMessage("user", "task prefix", cache=True), ChatMessage("user", "history"))
+
+    def _attach(self, provider: OpenAIProvider | AnthropicProvider, response: dict):
+        """Serve a canned JSON response from an in-process transport."""
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json=response)
+
+        provider._client = httpx.Client(transport=httpx.MockTransport(handler))
+        return requests
+
+    def test_prompt_text_of_split_prompt_matches_unsplit(self):
+        """A single-turn prompt split into prefix and suffix flattens to the joined text."""
+        assert prompt_text(self.SPLIT) == "task prefix\nhistory"
+        assert prompt_text("plain") == "plain"
+
+    def test_prompt_text_of_conversation_keeps_roles(self):
+        """Multi-turn prompts flatten to their JSON-encoded turns."""
+        conversation = [
+            ChatMessage("user", "task"),
+            ChatMessage("assistant", ".a"),
+            ChatMessage("user", "feedback"),
+        ]
+        assert json.loads(prompt_text(conversation)) == [
+            ["user", "task"],
+            ["assistant", ".a"],
+            ["user", "feedback"],
+        ]
+
+    def test_openai_split_prompt_is_sent_unsplit(self):
+        """OpenAI receives a split prompt as the same single user message."""
+        provider = OpenAIProvider(api_key="test-key")
+
+        assert provider._payload(self.SPLIT) == provider._payload("task prefix\nhistory")
+
+    def test_openai_sends_assistant_turns(self):
+        """Conversation turns keep their roles after the system prompt."""
+        provider = OpenAIProvider(api_key="test-key")
+        payload = provider._payload(
+            [ChatMessage("user", "task"), ChatMessage("assistant", ".a"), ChatMessage("user", "x")]
+        )
+
+        assert [m["role"] for m in payload["messages"]] == ["system", "user", "assistant", "user"]
+        assert payload["messages"][2]["content"] == ".a"
+
+    def test_anthropic_marks_cache_breakpoint(self):
+        """Cacheable messages become text blocks with cache_control."""
+        provider = AnthropicProvider(api_key="test-key")
+        payload = provider._payload(self.SPLIT)
+
+        assert payload["messages"] == [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "task prefix", "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": "history"},
+                ],
+            }
+        ]
+
+    def test_anthropic_plain_prompt_unchanged(self):
+        """A plain prompt is still sent as string content."""
+        provider = AnthropicProvider(api_key="test-key")
+
+        assert provider._payload("p")["messages"] == [{"role": "user", "content": "p"}]
+
+    def test_openai_tracks_cached_tokens(self):
+        """Cached prompt tokens are read from the usage details."""
+        provider = OpenAIProvider(api_key="test-key")
+        self._attach(
+            provider,
+            {
+                "choices": [{"message": {"content": ".x"}}],
+                "usage": {"prompt_tokens": 2000, "prompt_tokens_details": {"cached_tokens": 1536}},
+            },
+        )
+
+        provider.generate("p")
+        provider.generate("p")
+
+        assert provider.cache_usage == PromptCacheStats(
+            requests=2, input_tokens=4000, cached_tokens=3072
+        )
+        assert provider.cache_usage.cached_fraction == pytest.approx(0.768)
+
+    def test_anthropic_tracks_cache_reads_and_writes(self):
+        """Anthropic input tokens are the sum of uncached, read and written tokens."""
+        provider = AnthropicProvider(api_key="test-key")
+        self._attach(
+            provider,
+            {
+                "content": [{"text": ".x"}],
+                "usage": {
+                    "input_tokens": 50,
+                    "cache_read_input_tokens": 900,
+                    "cache_creation_input_tokens": 50,
+                },
+            },
+        )
+
+        provider.generate(self.SPLIT)
+
+        assert provider.cache_usage == PromptCacheStats(
+            requests=1, input_tokens=1000, cached_tokens=900, cache_write_tokens=50
+        )
+
+    def test_anthropic_stream_tracks_usage_from_message_start(self):
+        """Streamed Anthropic responses report usage in their first event."""
+        provider = AnthropicProvider(api_key="test-key")
+        body = (
+            b'data: {"type":"message_start","message":{"usage":'
+            b'{"input_tokens":10,"cache_read_input_tokens":90}}}\n\n'
+            b'data: {"type":"content_block_delta","delta":{"type":"text_delta","text":".a"}}\n\n'
+        )
+        provider._client = httpx.Client(
+            transport=httpx.MockTransport(lambda _request: httpx.Response(200, content=body))
+        )
+
+        assert list(provider.generate_stream("p")) == [".a"]
+        assert provider.cache_usage.cached_tokens == 90
+        assert provider.cache_usage.input_tokens == 100
+
+    def test_missing_usage_is_ignored(self):
+        """Responses without usage leave the counters untouched."""
+        provider = OpenAIProvider(api_key="test-key")
+        self._attach(provider, {"choices": [{"message": {"content": ".x"}}]})
+
+        provider.generate("p")
+
+        assert provider.cache_usage.requests == 0
+
+    def test_usage_summed_over_failover_chain(self):
+        """prompt_cache_usage adds up every provider in a failover chain."""
+        first, second = OpenAIProvider(api_key="a"), AnthropicProvider(api_key="b")
+        first._record_usage(100, 80, 0)
+        second._record_usage(200, 100, 20)
+        chain = FailoverProvider([first, second])
+
+        assert prompt_cache_usage(chain) == PromptCacheStats(
+            requests=2, input_tokens=300, cached_tokens=180, cache_write_tokens=20
+        )
+        assert prompt_cache_usage(MagicMock(spec=LLMProvider)) == PromptCacheStats()
+
+
+class TestAsyncProviders:
+    """Tests for the native asyncio provider interface."""
+
+    def _attach(self, provider: OpenAIProvider | AnthropicProvider, body: bytes, status: int = 200):
+        """Serve a canned response from an in-process async transport (call inside the loop)."""
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(status, content=body)
+
+        provider._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        provider._async_client_loop = asyncio.get_running_loop()
+        return requests
+
+    def test_openai_agenerate(self):
+        """OpenAI agenerate posts the same payload as generate."""
+        provider = OpenAIProvider(api_key="test-key")
+
+        async def run() -> tuple[str, list[httpx.Request]]:
+            requests = self._attach(provider, b'{"choices":[{"message":{"content":".x"}}]}')
+            try:
+                return await provider.agenerate("p"), requests
+            finally:
+                await provider.aclose()
+
+        text, requests = asyncio.run(run())
+
+        assert text == ".x"
+        assert requests[0].headers["Authorization"] == "Bearer test-key"
+        assert json.loads(requests[0].content)["messages"][-1]["content"] == "p"
+
+    def test_anthropic_agenerate(self):
+        """Anthropic agenerate extracts the text content block."""
+        provider = AnthropicProvider(api_key="test-key")
+
+        async def run() -> str:
+            self._attach(provider, b'{"content":[{"type":"text","text":".y"}]}')
+            return await provider.agenerate("p")
+
+        assert asyncio.run(run()) == ".y"
+
+    def test_agenerate_error_status(self):
+        """Error statuses raise HTTPStatusError like the sync path."""
+        provider = OpenAIProvider(api_key="test-key")
+
+        async def run() -> str:
+            self._attach(provider, b'{"error":{"message":"Rate limited"}}', status=429)
+            return await provider.agenerate("p")
+
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(run())
+
+    def test_agenerate_stream(self):
+        """Async streaming yields the same deltas as the sync stream."""
+        provider = AnthropicProvider(api_key="test-key")
+        body = (
+            b'data: {"type":"content_block_delta","delta":{"type":"text_delta","text":".a"}}\n\n'
+            b'data: {"type":"content_block_delta","delta":{"type":"text_delta","text":".b"}}\n\n'
+            b'data: {"type":"message_stop"}\n\n'
+        )
+
+        async def run() -> list[str]:
+            self._attach(provider, body)
+            return [chunk async for chunk in provider.agenerate_stream("p")]
+
+        assert asyncio.run(run()) == [".a", ".b"]
+
+    def test_client_recreated_per_event_loop(self):
+        """Each event loop gets its own async client."""
+        provider = OpenAIProvider(api_key="test-key")
+
+        async def client() -> httpx.AsyncClient:
+            return provider._get_async_client()
+
+        first = asyncio.run(client())
+        second = asyncio.run(client())
+
+        assert first is not second
+
+    def test_default_agenerate_runs_generate_in_thread(self):
+        """Providers without native async fall back to generate in a worker thread."""
+        provider = OpenAIProvider(api_key="test-key")
+        with patch.object(OpenAIProvider, "generate", return_value=".x"):
+            assert asyncio.run(LLMProvider.agenerate(provider, "p")) == ".x"
+
+
+class TestProviderSpec:
+    """Tests for parsing failover chain entries."""
+
+    def test_provider_only(self):
+        """A bare provider type uses its defaults."""
+        assert ProviderSpec.parse("Anthropic") == ProviderSpec("anthropic")
+
+    def test_model_and_base_url(self):
+        """Model and base URL are split on the first ':' and '@'."""
+        spec = ProviderSpec.parse("openai:llama3:8b@http://localhost:11434/v1")
+
+        assert spec.provider_type == "openai"
+        assert spec.model == "llama3:8b"
+        assert spec.base_url == "http://localhost:11434/v1"
+
+    def test_missing_provider(self):
+        """A specification without a provider type is rejected."""
+        with pytest.raises(ValueError, match="Invalid provider specification"):
+            ProviderSpec.parse(":gpt-4o")
+
+
+class TestFailoverProvider:
+    """Tests for routing requests through a chain of circuit breakers."""
+
+    POLICY = BreakerPolicy(window=4, failure_threshold=0.5, min_calls=2, cooldown_sec=30.0)
+
+    def _provider(self, model: str, response: str = ".x") -> MagicMock:
+        provider = MagicMock(spec=OpenAIProvider)
+        provider.model = model
+        provider.endpoint = f"https://{model}.example/v1/chat/completions"
+        provider.generate.return_value = response
+        return provider
+
+    def test_requires_providers(self):
+        """An empty chain is rejected."""
+        with pytest.raises(ValueError, match="at least one provider"):
+            FailoverProvider([])
+
+    def test_uses_first_healthy_provider(self):
+        """Requests go to the first provider while it is healthy."""
+        first, second = self._provider("a", ".a"), self._provider("b", ".b")
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        assert chain.generate("p") == ".a"
+        second.generate.assert_not_called()
+        assert chain.failovers == 0
+        assert chain.model == "a|b"
+
+    def test_fails_over_on_error(self):
+        """A failing provider is skipped for the next one within the same request."""
+        first, second = self._provider("a"), self._provider("b", ".b")
+        first.generate.side_effect = httpx.ConnectError("refused")
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        assert chain.generate("p") == ".b"
+        assert chain.failovers == 1
+        assert chain.breakers[0].stats.failures == 1
+
+    @pytest.mark.parametrize("status", [429, 500, 503])
+    def test_fails_over_on_transient_status(self, status: int):
+        """Rate limits and server errors count against the breaker."""
+        first, second = self._provider("a"), self._provider("b", ".b")
+        first.generate.side_effect = _status_error(status)
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        assert chain.generate("p") == ".b"
+        assert chain.breakers[0].stats.failures == 1
+
+    @pytest.mark.parametrize("status", [400, 401, 403, 404])
+    def test_client_error_raised_at_once(self, status: int):
+        """A bad request or key fails without failing over or tripping a breaker."""
+        first, second = self._provider("a"), self._provider("b", ".b")
+        first.generate.side_effect = _status_error(status)
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        for _ in range(3):
+            with pytest.raises(httpx.HTTPStatusError):
+                chain.generate("p")
+
+        second.generate.assert_not_called()
+        assert chain.breakers[0].stats.failures == 0
+        assert chain.breakers[0].state is BreakerState.CLOSED
+
+    def test_aborted_request_raised_at_once(self):
+        """An aborted request neither fails over nor counts against the breaker."""
+        first, second = self._provider("a"), self._provider("b", ".b")
+        aborter = RequestAborter()
+
+        def aborted(prompt: str) -> str:
+            aborter.abort()
+            raise httpx.ReadError("Request aborted")
+
+        first.generate.side_effect = aborted
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        with abortable_requests(aborter), pytest.raises(httpx.ReadError):
+            chain.generate("p")
+
+        second.generate.assert_not_called()
+        assert chain.breakers[0].stats.failures == 0
+
+    def test_client_error_on_probe_releases_it(self):
+        """A half-open probe ending in a client error lets the next request probe."""
+        clock = [0.0]
+        only = self._provider("a")
+        only.generate.side_effect = httpx.ConnectError("x")
+        chain = FailoverProvider([only], policy=self.POLICY, clock=lambda: clock[0])
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                chain.generate("p")
+        clock[0] = 30.0
+        only.generate.side_effect = _status_error(400)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            chain.generate("p")
+
+        assert chain.breakers[0].allow_request() is True
+
+    def test_other_errors_fail_over_without_counting(self):
+        """A malformed response is tried elsewhere but is not an outage."""
+        first, second = self._provider("a"), self._provider("b", ".b")
+        first.generate.side_effect = RuntimeError("Invalid API response format")
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        assert chain.generate("p") == ".b"
+        assert chain.breakers[0].stats.failures == 0
+
+    def test_stream_and_async_raise_client_errors(self):
+        """Streaming and async requests treat client errors the same way."""
+        first, second = self._provider("a"), self._provider("b", ".b")
+
+        def rejected(prompt: str):
+            raise _status_error(401)
+            yield  # pragma: no cover
+
+        first.generate_stream.side_effect = rejected
+        first.agenerate = AsyncMock(side_effect=_status_error(401))
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            list(chain.generate_stream("p"))
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(chain.agenerate("p"))
+
+        second.generate_stream.assert_not_called()
+        assert chain.breakers[0].stats.failures == 0
+
+    def test_open_breaker_skips_provider(self):
+        """Once its breaker opens, the degraded provider is not called at all."""
+        first, second = self._provider("a"), self._provider("b", ".b")
+        first.generate.side_effect = httpx.ConnectError("refused")
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        for _ in range(4):
+            assert chain.generate("p") == ".b"
+
+        assert first.generate.call_count == 2
+        assert chain.breakers[0].state is BreakerState.OPEN
+        assert chain.breakers[0].stats.rejected == 2
+
+    def test_half_open_probe_restores_primary(self):
+        """After the cooldown a successful probe routes traffic back to the primary."""
+        clock = [0.0]
+        first, second = self._provider("a", ".a"), self._provider("b", ".b")
+        first.generate.side_effect = [httpx.ConnectError("x"), httpx.ConnectError("x"), ".a"]
+        chain = FailoverProvider([first, second], policy=self.POLICY, clock=lambda: clock[0])
+        chain.generate("p")
+        chain.generate("p")
+
+        clock[0] = 30.0
+
+        assert chain.generate("p") == ".a"
+        assert chain.breakers[0].state is BreakerState.CLOSED
+
+    def test_all_failed_raises_last_error(self):
+        """If every provider fails, the last error propagates unchanged."""
+        first, second = self._provider("a"), self._provider("b")
+        first.generate.side_effect = httpx.ConnectError("first")
+        second.generate.side_effect = RuntimeError("second")
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        with pytest.raises(RuntimeError, match="second"):
+            chain.generate("p")
+
+    def test_all_open_raises_unavailable(self):
+        """With every breaker open the request fails fast."""
+        only = self._provider("a")
+        only.generate.side_effect = httpx.ConnectError("refused")
+        chain = FailoverProvider([only], policy=self.POLICY)
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                chain.generate("p")
+
+        with pytest.raises(ProvidersUnavailableError, match="/a"):
+            chain.generate("p")
+        assert only.generate.call_count == 2
+
+    def test_stream_fails_over_before_first_chunk(self):
+        """Streams fail over if the provider errors before yielding anything."""
+        first, second = self._provider("a"), self._provider("b")
+
+        def broken(prompt: str):
+            raise httpx.ConnectError("refused")
+            yield  # pragma: no cover
+
+        first.generate_stream.side_effect = broken
+        second.generate_stream.return_value = iter([".b", "c"])
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        assert list(chain.generate_stream("p")) == [".b", "c"]
+        assert chain.failovers == 1
+
+    def test_async_fails_over(self):
+        """agenerate follows the same routing as generate."""
+        first, second = self._provider("a"), self._provider("b")
+        first.agenerate = AsyncMock(side_effect=httpx.ReadTimeout("slow"))
+        second.agenerate = AsyncMock(return_value=".b")
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        assert asyncio.run(chain.agenerate("p")) == ".b"
+        assert chain.breakers[0].stats.failures == 1
+
+    def test_async_stream_fails_over(self):
+        """agenerate_stream fails over before the first chunk."""
+        first, second = self._provider("a"), self._provider("b")
+
+        async def broken(prompt: str):
+            raise httpx.ConnectError("refused")
+            yield  # pragma: no cover
+
+        async def working(prompt: str):
+            for chunk in (".b", "c"):
+                yield chunk
+
+        first.agenerate_stream = broken
+        second.agenerate_stream = working
+        chain = FailoverProvider([first, second], policy=self.POLICY)
+
+        async def collect() -> list[str]:
+            return [chunk async for chunk in chain.agenerate_stream("p")]
+
+        assert asyncio.run(collect()) == [".b", "c"]
+
+    def test_cancelled_probe_is_released(self):
+        """A cancelled half-open probe does not block later probes."""
+        clock = [0.0]
+        only = self._provider("a")
+        only.agenerate = AsyncMock(side_effect=httpx.ConnectError("x"))
+        chain = FailoverProvider([only], policy=self.POLICY, clock=lambda: clock[0])
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                asyncio.run(chain.agenerate("p"))
+        clock[0] = 30.0
+        only.agenerate = AsyncMock(side_effect=asyncio.CancelledError())
+
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(chain.agenerate("p"))
+
+        assert chain.breakers[0].allow_request() is True
+
+    def test_close_closes_every_provider(self):
+        """Closing the chain closes all providers."""
+        first, second = self._provider("a"), self._provider("b")
+        chain = FailoverProvider([first, second])
+
+        chain.close()
+        asyncio.run(chain.aclose())
+
+        first.close.assert_called_once()
+        second.aclose.assert_awaited_once()
+
+    def test_create_provider_builds_chain(self, monkeypatch: pytest.MonkeyPatch):
+        """create_provider with fallbacks returns a FailoverProvider."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+
+        chain = create_provider(
+            "openai",
+            model="gpt-4o",
+            fallbacks=[ProviderSpec("anthropic", model="claude-3-5-haiku-latest")],
+            breaker_policy=self.POLICY,
+        )
+
+        assert isinstance(chain, FailoverProvider)
+        assert [b.name for b in chain.breakers] == [
+            "openai/gpt-4o",
+            "anthropic/claude-3-5-haiku-latest",
+        ]
+        assert chain.breakers[0].policy == self.POLICY
+
+    def test_fallback_of_other_type_ignores_generic_env(self, monkeypatch: pytest.MonkeyPatch):
+        """The primary's LLM_API_KEY, LLM_MODEL and LLM_BASE_URL never reach another provider."""
+        monkeypatch.setenv("LLM_API_KEY", "openai-key")
+        monkeypatch.setenv("LLM_MODEL", "gpt-4o")
+        monkeypatch.setenv("LLM_BASE_URL", "http://proxy/v1")
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "anthropic-key")
+
+        chain = create_provider("openai", fallbacks=[ProviderSpec("anthropic")])
+
+        assert isinstance(chain, FailoverProvider)
+        primary, fallback = chain.providers
+        assert isinstance(primary, OpenAIProvider)
+        assert (primary.api_key, primary.model) == ("openai-key", "gpt-4o")
+        assert isinstance(fallback, AnthropicProvider)
+        assert fallback.api_key == "anthropic-key"
+        assert fallback.model == AnthropicProvider.DEFAULT_MODEL
+
+    def test_fallback_of_same_type_shares_endpoint(self, monkeypatch: pytest.MonkeyPatch):
+        """A fallback of the primary's type uses its key and endpoint but its own model."""
+        monkeypatch.setenv("LLM_API_KEY", "proxy-key")
+        monkeypatch.setenv("LLM_MODEL", "big-model")
+        monkeypatch.setenv("LLM_BASE_URL", "http://proxy/v1")
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        monkeypatch.delenv("LLM_PROVIDER", raising=False)
+
+        chain = create_provider(fallbacks=[ProviderSpec("openai", model="small-model")])
+
+        assert isinstance(chain, FailoverProvider)
+        fallback = chain.providers[1]
+        assert isinstance(fallback, OpenAIProvider)
+        assert (fallback.api_key, fallback.model) == ("proxy-key", "small-model")
+        assert fallback.base_url == "http://proxy/v1"
+
+    def test_fallback_of_other_type_needs_its_own_key(self, monkeypatch: pytest.MonkeyPatch):
+        """Without its provider's key a fallback is refused rather than sent the primary's."""
+        monkeypatch.setenv("LLM_API_KEY", "openai-key")
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+
+        with pytest.raises(ValueError, match="API key required"):
+            create_provider("openai", fallbacks=[ProviderSpec("anthropic")])
+
+
+class TestProviderTracing:
+    """Tests for HTTP call spans."""
+
+    def test_post_span(self, tracer: Tracer):
+        """Each POST is a client span with the URL, provider and status."""
+        provider = OpenAIProvider(api_key="test-key", model="gpt-4o")
+        provider._client = httpx.Client(
+            transport=httpx.MockTransport(
+                lambda _request: httpx.Response(
+                    200, content=b'{"choices":[{"message":{"content":".x"}}]}'
+                )
+            )
+        )
+
+        with span("JQGenerator.generate", task_id="t"):
+            provider.generate("p")
+
+        http = tracer.spans[0]
+        assert http.name == "http POST"
+        assert http.kind == KIND_CLIENT
+        assert http.parent_id == tracer.spans[1].span_id
+        assert http.attributes == {
+            "task_id": "t",
+            "http.url": "https://api.openai.com/v1/chat/completions",
+            "provider": "openai/gpt-4o",
+            "stream": False,
+            "http.status_code": 200,
+        }
+
+    def test_stream_error_span(self, tracer: Tracer):
+        """A failed stream ends its span with the error."""
+        provider = OpenAIProvider(api_key="test-key")
+        provider._client = httpx.Client(
+            transport=httpx.MockTransport(
+                lambda _request: httpx.Response(429, content=b'{"error":{"message":"slow"}}')
+            )
+        )
+
+        with pytest.raises(httpx.HTTPStatusError):
+            list(provider.generate_stream("p"))
+
+        (http,) = tracer.spans
+        assert http.attributes["stream"] is True
+        assert http.attributes["http.status_code"] == 429
+        assert http.error is not None
+
+    def test_async_post_span(self, tracer: Tracer):
+        """Async POSTs are traced like sync ones."""
+        provider = AnthropicProvider(api_key="test-key")
+
+        async def run() -> None:
+            provider._async_client = httpx.AsyncClient(
+                transport=httpx.MockTransport(
+                    lambda _request: httpx.Response(
+                        200, content=b'{"content":[{"type":"text","text":".x"}]}'
+                    )
+                )
+            )
+            provider._async_client_loop = asyncio.get_running_loop()
+            try:
+                await provider.agenerate("p")
+            finally:
+                await provider.aclose()
+
+        asyncio.run(run())
+
+        assert tracer.spans[0].attributes["http.status_code"] == 200
+        assert tracer.spans[0].attributes["http.url"].endswith("/messages")
+
+
+class TestProviderMetrics:
+    """Tests for LLM request and token metrics."""
+
+    def _attach(self, provider: OpenAIProvider, handler) -> None:
+        provider._client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    def test_requests_by_status_and_tokens(self, metrics: SynthMetrics):
+        """Requests are counted by status; reported tokens by direction."""
+        provider = OpenAIProvider(api_key="test-key", model="gpt-4o")
+        responses = iter(
+            [
+                httpx.Response(429, content=b'{"error":{"message":"slow"}}'),
+                httpx.Response(
+                    200,
+                    content=json.dumps(
+                        {
+                            "choices": [{"message": {"content": ".x"}}],
+                            "usage": {"prompt_tokens": 120, "completion_tokens": 4},
+                        }
+                    ).encode(),
+                ),
+            ]
+        )
+        self._attach(provider, lambda _request: next(responses))
+
+        with pytest.raises(httpx.HTTPStatusError):
+            provider.generate("p")
+        provider.generate("p")
+
+        label = "openai/gpt-4o"
+        assert metrics.llm_requests.value(provider=label, status="429") == 1
+        assert metrics.llm_requests.value(provider=label, status="200") == 1
+        assert metrics.llm_request_duration.count(provider=label) == 2
+        assert metrics.llm_tokens.value(provider=label, direction="in") == 120
+        assert metrics.llm_tokens.value(provider=label, direction="out") == 4
+
+    def test_timeouts_and_errors(self, metrics: SynthMetrics):
+        """Requests without a response count as 'timeout' or 'error'."""
+        provider = OpenAIProvider(api_key="test-key", model="m")
+        failures = iter([httpx.ReadTimeout("slow"), httpx.ConnectError("refused")])
+
+        def handler(_request: httpx.Request) -> httpx.Response:
+            raise next(failures)
+
+        self._attach(provider, handler)
+
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPError):
+                list(provider.generate_stream("p"))
+
+        assert metrics.llm_requests.value(provider="openai/m", status="timeout") == 1
+        assert metrics.llm_requests.value(provider="openai/m", status="error") == 1
@@ -0,0 +1,195 @@
+"""
+Unit tests for retry policies and rate limiting.
+
+This module tests RetryPolicy backoff computation, Retry-After parsing, the
+TokenBucket and RateLimiter classes (with a fake clock), and the process-wide
+limiter registry.
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from src.ratelimit import (
+    RateLimiter,
+    RetryPolicy,
+    TokenBucket,
+    estimate_tokens,
+    parse_retry_after,
+    shared_rate_limiter,
+)
+from tests.conftest import FakeClock
+
+
+class TestParseRetryAfter:
+    """Tests for parse_retry_after."""
+
+    def test_seconds(self):
+        """Numeric values are seconds."""
+        assert parse_retry_after("3") == 3.0
+        assert parse_retry_after("0.5") == 0.5
+
+    def test_http_date(self):
+        """HTTP dates are converted to a delay from now."""
+        when = datetime.now(timezone.utc) + timedelta(seconds=30)
+        delay = parse_retry_after(format_datetime(when, usegmt=True))
+        assert delay is not None
+        assert 25 <= delay <= 30
+
+    def test_past_date_is_zero(self):
+        """Dates in the past mean retry immediately."""
+        when = datetime.now(timezone.utc) - timedelta(seconds=30)
+        assert parse_retry_after(format_datetime(when, usegmt=True)) == 0.0
+
+    @pytest.mark.parametrize("value", [None, "", "soon"])
+    def test_missing_or_invalid(self, value: str | None):
+        """Absent or unparseable values return None."""
+        assert parse_retry_after(value) is None
+
+
+class TestRetryPolicy:
+    """Tests for RetryPolicy."""
+
+    def test_retryable_statuses(self):
+        """Rate limits and server errors are retried; client errors are not."""
+        policy = RetryPolicy()
+        assert policy.should_retry_status(429)
+        assert policy.should_retry_status(503)
+        assert policy.should_retry_status(529)
+        assert not policy.should_retry_status(400)
+        assert not policy.should_retry_status(401)
+
+    def test_exponential_without_jitter(self):
+        """Delays double per attempt and are capped."""
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0, jitter=0.0)
+        assert [policy.backoff(i) for i in range(4)] == [1.0, 2.0, 4.0, 5.0]
+
+    def test_jitter_stays_in_range(self):
+        """Jittered delays lie between (1 - jitter) * delay and delay."""
+        policy = RetryPolicy(base_delay=2.0, jitter=0.5)
+        rng = random.Random(0)
+        delays = [policy.backoff(0, rng=rng) for _ in range(100)]
+        assert all(1.0 <= d <= 2.0 for d in delays)
+        assert len(set(delays)) > 1
+
+    def test_retry_after_takes_precedence(self):
+        """A server-provided delay overrides the computed backoff, up to max_delay."""
+        policy = RetryPolicy(max_delay=10.0)
+        assert policy.backoff(0, retry_after=7.0) == 7.0
+        assert policy.backoff(0, retry_after=100.0) == 10.0
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket."""
+
+    def test_burst_up_to_capacity(self, clock: FakeClock):
+        """A full bucket allows capacity units without waiting."""
+        bucket = TokenBucket(60, capacity=3, clock=clock)
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    def test_waits_for_refill(self, clock: FakeClock):
+        """Once empty, callers wait for the refill rate."""
+        bucket = TokenBucket(60, capacity=1, clock=clock)
+        bucket.reserve()
+        assert bucket.reserve() == pytest.approx(1.0)
+        # The next caller queues behind the previous reservation
+        assert bucket.reserve() == pytest.approx(2.0)
+
+    def test_refills_over_time(self, clock: FakeClock):
+        """Elapsed time restores capacity."""
+        bucket = TokenBucket(60, capacity=1, clock=clock)
+        bucket.reserve()
+        clock.now += 1.0
+        assert bucket.reserve() == 0.0
+
+    def test_oversized_request_is_clamped(self, clock: FakeClock):
+        """Requests above capacity do not wait forever."""
+        bucket = TokenBucket(60, capacity=10, clock=clock)
+        assert bucket.reserve(1000) == 0.0
+
+    def test_rejects_non_positive_rate(self):
+        """A zero rate is invalid."""
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+
+
+class TestRateLimiter:
+    """Tests for RateLimiter."""
+
+    def test_unlimited_never_waits(self, clock: FakeClock):
+        """Without limits, acquire() returns immediately."""
+        limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+        for _ in range(100):
+            limiter.acquire(10_000)
+        assert clock.slept == []
+
+    def test_requests_per_minute(self, clock: FakeClock):
+        """Throughput converges to the request limit."""
+        limiter = RateLimiter(requests_per_minute=60, clock=clock, sleep=clock.sleep)
+        for _ in range(120):
+            limiter.acquire()
+        # 60 burst, then one per second
+        assert clock.now == pytest.approx(60.0)
+
+    def test_tokens_per_minute(self, clock: FakeClock):
+        """Large requests are limited by the token budget."""
+        limiter = RateLimiter(tokens_per_minute=1000, clock=clock, sleep=clock.sleep)
+        limiter.acquire(1000)
+        waited = limiter.acquire(500)
+        assert waited == pytest.approx(30.0)
+
+    def test_pause_holds_back_callers(self, clock: FakeClock):
+        """pause() delays the next acquire even with budget available."""
+        limiter = RateLimiter(requests_per_minute=1000, clock=clock, sleep=clock.sleep)
+        limiter.pause(5.0)
+        assert limiter.acquire() == pytest.approx(5.0)
+        assert limiter.acquire() == 0.0
+
+
+class TestSharedRateLimiter:
+    """Tests for the process-wide limiter registry."""
+
+    def test_same_key_same_instance(self):
+        """All callers with one key share a limiter."""
+        a = shared_rate_limiter("test-shared", requests_per_minute=10)
+        b = shared_rate_limiter("test-shared", requests_per_minute=99)
+        assert a is b
+        assert b.requests_per_minute == 10
+
+    def test_different_keys_are_independent(self):
+        """Different keys get different limiters."""
+        assert shared_rate_limiter("test-a") is not shared_rate_limiter("test-b")
+
+
+def test_estimate_tokens():
+    """Token estimates scale with text length and are at least 1."""
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("x" * 400) == 100
+
+
+class TestRateLimiterAsync:
+    """Tests for RateLimiter.acquire_async."""
+
+    def test_waits_with_asyncio_sleep(self, clock: FakeClock, monkeypatch: pytest.MonkeyPatch):
+        """The async path waits on the event loop instead of blocking."""
+        limiter = RateLimiter(requests_per_minute=60, clock=clock, sleep=clock.sleep)
+        limiter._requests = TokenBucket(60, capacity=1, clock=clock)
+        slept: list[float] = []
+
+        async def fake_sleep(seconds: float) -> None:
+            slept.append(seconds)
+
+        monkeypatch.setattr("src.ratelimit.asyncio.sleep", fake_sleep)
+
+        async def run() -> list[float]:
+            return [await limiter.acquire_async(), await limiter.acquire_async()]
+
+        waits = asyncio.run(run())
+
+        assert waits[0] == 0.0
+        assert waits[1] == pytest.approx(1.0)
+        assert slept == [pytest.approx(1.0)]
+        assert clock.slept == []
@@ -6,11 +6,14 @@ score calculation, and feedback generation across various scenarios including
 perfect matches, syntax errors, shape mismatches, and partial matches.
 """
 
+import asyncio
 from collections.abc import Callable
 from typing import Any
 
 from src.domain import ErrorType, Example, Task
+from src.metrics import SynthMetrics
 from src.reviewer import AlgorithmicReviewer
+from src.timing import ANALYZE, EXECUTION, PARSE, recording
 
 
 class TestPerfectMatch:
@@ -756,3 +759,216 @@ class TestSpecialCases:
 
         assert attempt.aggregated_score == 1.0
         assert attempt.primary_error == ErrorType.NONE
+
+
+class TestScreen:
+    """Tests for batch screening of candidate filters."""
+
+    def test_returns_only_filters_matching_all_examples(self, reviewer: AlgorithmicReviewer):
+        """Only candidates correct on every example survive."""
+        task = Task(
+            id="screen",
+            description="Sum",
+            examples=[
+                Example(input_data=[1, 2, 3], expected_output=6),
+                Example(input_data=[4, "x"], expected_output=4),
+            ],
+        )
+
+        passing = reviewer.screen(task, ["add", "map(numbers) | add", "length", "max"])
+
+        assert passing == ["map(numbers) | add"]
+
+    def test_preserves_candidate_order_and_dedupes(self, reviewer: AlgorithmicReviewer):
+        """Survivors keep their original order without duplicates."""
+        task = Task(
+            id="screen",
+            description="Identity",
+            examples=[Example(input_data={"a": 1}, expected_output={"a": 1})],
+        )
+
+        passing = reviewer.screen(task, [".", "{a: .a}", ".", ".b"])
+
+        assert passing == [".", "{a: .a}"]
+
+    def test_multiple_outputs_compared_as_list(self, reviewer: AlgorithmicReviewer):
+        """A filter emitting several values is compared like evaluate() does."""
+        task = Task(
+            id="screen",
+            description="Values",
+            examples=[Example(input_data=[1, 2], expected_output=[1, 2])],
+        )
+
+        assert reviewer.screen(task, [".[]", "empty"]) == [".[]"]
+
+    def test_runtime_error_candidate_is_dropped(self, reviewer: AlgorithmicReviewer):
+        """A candidate raising a jq error does not break the batch."""
+        task = Task(
+            id="screen",
+            description="Length",
+            examples=[Example(input_data={"a": 1}, expected_output=1)],
+        )
+
+        assert reviewer.screen(task, [".a | error", ".a"]) == [".a"]
+
+    def test_syntax_error_falls_back_to_single_runs(self, reviewer: AlgorithmicReviewer):
+        """A candidate that does not compile forces per-candidate evaluation."""
+        task = Task(
+            id="screen",
+            description="Field",
+            examples=[Example(input_data={"a": 1}, expected_output=1)],
+        )
+
+        assert reviewer.screen(task, [".a |||", ".a"]) == [".a"]
+
+    def test_batch_uses_one_jq_run_per_example(self, reviewer: AlgorithmicReviewer):
+        """All candidates share one executor run per example."""
+        task = Task(
+            id="screen",
+            description="Field",
+            examples=[
+                Example(input_data={"a": 1, "b": 1}, expected_output=1),
+                Example(input_data={"a": 2, "b": 3}, expected_output=2),
+            ],
+        )
+        calls: list[str] = []
+        original_run = reviewer.executor.run
+
+        def counting_run(filter_code: str, input_data: Any) -> Any:
+            calls.append(filter_code)
+            return original_run(filter_code, input_data)
+
+        reviewer.executor.run = counting_run  # type: ignore[method-assign]
+
+        passing = reviewer.screen(task, [".a", ".b", ".c"])
+
+        assert passing == [".a"]
+        assert len(calls) == 2
+
+    def test_empty_candidates(self, reviewer: AlgorithmicReviewer):
+        """Screening nothing returns nothing without running jq."""
+        task = Task(
+            id="screen",
+            description="Field",
+            examples=[Example(input_data={"a": 1}, expected_output=1)],
+        )
+
+        assert reviewer.screen(task, []) == []
+
+
+class TestEvaluateAsync:
+    """Tests for the asyncio counterpart of evaluate."""
+
+    def test_matches_evaluate(self, reviewer: AlgorithmicReviewer):
+        """evaluate_async produces the same attempt as evaluate."""
+        task = Task(
+            id="t",
+            description="Extract x",
+            examples=[
+                Example(input_data={"x": 1}, expected_output=1),
+                Example(input_data={"x": 2}, expected_output=3),
+            ],
+        )
+
+        attempt = asyncio.run(reviewer.evaluate_async(task, ".x"))
+
+        assert attempt == reviewer.evaluate(task, ".x")
+        assert attempt.is_perfect is False
+        assert len(attempt.example_results) == 2
+
+
+class TestFindCounterexamples:
+    """Tests for checking examples in order until enough of them fail."""
+
+    def _task(self) -> Task:
+        return Task(
+            id="t",
+            description="Double x",
+            examples=[Example(input_data={"x": x}, expected_output=2 * x) for x in range(1, 6)],
+        )
+
+    def test_stops_at_first_failure(self, reviewer: AlgorithmicReviewer):
+        """Examples after the limit-th failure are not run."""
+        results = reviewer.find_counterexamples(self._task(), "if .x < 3 then .x * 2 else 0 end")
+
+        assert [r.score < 1.0 for r in results] == [False, False, True]
+
+    def test_limit_collects_more_failures(self, reviewer: AlgorithmicReviewer):
+        """A higher limit keeps checking until that many examples failed."""
+        results = reviewer.find_counterexamples(
+            self._task(), "if .x < 3 then .x * 2 else 0 end", limit=2
+        )
+
+        assert len(results) == 4
+
+    def test_correct_filter_checks_everything(self, reviewer: AlgorithmicReviewer):
+        """A correct filter is run on every example."""
+        results = reviewer.find_counterexamples(self._task(), ".x * 2")
+
+        assert len(results) == 5
+        assert all(r.score == 1.0 for r in results)
+
+    def test_async_matches_sync(self, reviewer: AlgorithmicReviewer):
+        """find_counterexamples_async returns the same results."""
+        task = self._task()
+        filter_code = "if .x < 3 then .x * 2 else 0 end"
+
+        results = asyncio.run(reviewer.find_counterexamples_async(task, filter_code))
+
+        assert results == reviewer.find_counterexamples(task, filter_code)
+
+    def test_summarize(self, reviewer: AlgorithmicReviewer):
+        """summarize aggregates results the same way evaluate does."""
+        task = self._task()
+        attempt = reviewer.evaluate(task, "if .x < 3 then .x * 2 else 0 end")
+
+        assert reviewer.summarize(attempt.filter_code, attempt.example_results) == attempt
+
+
+class TestPhaseTimings:
+    """Tests for the phases recorded during evaluation."""
+
+    def test_evaluate_records_phases(self, reviewer: AlgorithmicReviewer):
+        """Evaluation attributes time to jq execution, parsing and analysis."""
+        task = Task(
+            id="t",
+            description="d",
+            examples=[Example(input_data={"x": 1}, expected_output=1)],
+        )
+
+        with recording() as timer:
+            reviewer.evaluate(task, ".x")
+
+        assert list(timer.snapshot()) == [EXECUTION, PARSE, ANALYZE]
+
+    def test_screen_records_phases(self, reviewer: AlgorithmicReviewer):
+        """Batch screening is attributed to the same phases."""
+        task = Task(
+            id="t",
+            description="d",
+            examples=[Example(input_data={"x": 1}, expected_output=1)],
+        )
+
+        with recording() as timer:
+            reviewer.screen(task, [".x", ".y"])
+
+        assert set(timer.totals) == {EXECUTION, PARSE, ANALYZE}
+
+
+class TestEvaluationMetrics:
+    """Tests for evaluation metrics."""
+
+    def test_counted_by_primary_error(self, reviewer: AlgorithmicReviewer, metrics: SynthMetrics):
+        """Each evaluation is counted once under its primary error type."""
+        task = Task(
+            id="t",
+            description="d",
+            examples=[Example(input_data={"x": 1}, expected_output=1)],
+        )
+
+        reviewer.evaluate(task, ".x")
+        reviewer.evaluate(task, ".[")
+        asyncio.run(reviewer.evaluate_async(task, ".x"))
+
+        assert metrics.evaluations.value(error_type=ErrorType.NONE.value) == 2
+        assert metrics.evaluations.value(error_type=ErrorType.SYNTAX.value) == 1
@@ -0,0 +1,148 @@
+"""
+Tests for the performance review on scaled inputs.
+
+This module tests growing inputs by replicating array elements, fitting
+growth exponents, and measuring run time, output growth and timeouts of
+filters with jq.
+"""
+
+import json
+from collections.abc import Callable
+
+import pytest
+
+from src.domain import Task
+from src.executor import JQExecutor
+from src.scaling import (
+    FilterTimer,
+    ScalingPolicy,
+    ScalingReviewer,
+    growth_exponent,
+    scale_input,
+)
+
+RECORDS = [{"id": 1, "tags": ["a"]}, {"id": 2, "tags": []}]
+
+
+class TestScaleInput:
+    """Tests for growing inputs."""
+
+    def test_outer_arrays_grow(self):
+        """Arrays not inside arrays are resized by repeating their elements."""
+        value = {"a": [1, 2], "b": {"c": [[3], [4, 5]]}, "d": "x"}
+
+        assert scale_input(value, 5) == {
+            "a": [1, 2, 1, 2, 1],
+            "b": {"c": [[3], [4, 5], [3], [4, 5], [3]]},
+            "d": "x",
+        }
+
+    def test_scalars_and_empty_arrays_unchanged(self):
+        """Values without elements to replicate are kept."""
+        assert scale_input({"a": [], "b": 1}, 4) == {"a": [], "b": 1}
+        assert scale_input("s", 4) == "s"
+
+    def test_growth_exponent(self):
+        """The exponent relates the growth of a measure to the growth of n."""
+        assert growth_exponent(2.0, 8.0, 4.0) == pytest.approx(1.0)
+        assert growth_exponent(1.0, 64.0, 4.0) == pytest.approx(3.0)
+
+
+class TestScalingReviewer:
+    """Tests for measuring filters with jq."""
+
+    def test_linear_filter(self, executor: JQExecutor, make_task: Callable[..., Task]):
+        """A projection's output grows linearly and it is not flagged."""
+        result = ScalingReviewer(executor).measure(make_task(RECORDS, None), "map(.id)")
+
+        assert result is not None
+        assert result.sizes == ScalingPolicy.sizes
+        assert result.output_exponent == pytest.approx(1.0, abs=0.1)
+        assert (result.superlinear, result.timed_out, result.feedback) == (False, False, "")
+
+    def test_quadratic_output(self, executor: JQExecutor, make_task: Callable[..., Task]):
+        """Output growing with the square of the input is flagged."""
+        reviewer = ScalingReviewer(executor, ScalingPolicy(sizes=(10, 40)))
+
+        result = reviewer.measure(make_task(RECORDS, None), "[.[] as $a | .[] | [$a.id, .id]]")
+
+        assert result is not None
+        assert result.output_exponent == pytest.approx(2.0, abs=0.1)
+        assert result.superlinear is True
+        assert "its output grows like n^2.0" in result.feedback
+        assert "at n=40" in result.feedback
+
+    @pytest.mark.parametrize(
+        ("cost", "exponent"), [(lambda n: 1e-4 * n, 1.0), (lambda n: 1e-7 * n * n, 2.0)]
+    )
+    def test_time_exponent(
+        self,
+        executor: JQExecutor,
+        clocked_timer: Callable[..., FilterTimer],
+        cost: Callable[[int], float],
+        exponent: float,
+        make_task: Callable[..., Task],
+    ):
+        """Run time is fitted without jq's own startup and parsing time."""
+        reviewer = ScalingReviewer(executor)
+        reviewer.timer = clocked_timer(lambda _filter, data: cost(len(json.loads(data))))
+
+        result = reviewer.measure(make_task(RECORDS, None), ".")
+
+        assert result is not None
+        assert result.time_exponent == pytest.approx(exponent, abs=0.01)
+        assert result.superlinear is (exponent > ScalingPolicy.max_exponent)
+        assert ("run time grows like n^2.0" in result.feedback) is result.superlinear
+
+    def test_short_run_time_not_fitted(
+        self,
+        executor: JQExecutor,
+        clocked_timer: Callable[..., FilterTimer],
+        make_task: Callable[..., Task],
+    ):
+        """Filters taking less than min_seconds have no time exponent."""
+        reviewer = ScalingReviewer(executor)
+        reviewer.timer = clocked_timer(lambda _filter, data: 1e-12 * len(json.loads(data)) ** 3)
+
+        result = reviewer.measure(make_task(RECORDS, None), ".")
+
+        assert result is not None
+        assert result.time_exponent is None
+        assert result.superlinear is False
+
+    def test_timeout(self, make_task: Callable[..., Task]):
+        """A filter timing out on the scaled input is flagged."""
+        try:
+            executor = JQExecutor(timeout_sec=0.2)
+        except RuntimeError:
+            pytest.skip("jq binary not available")
+
+        result = ScalingReviewer(executor).measure(make_task(RECORDS, None), "def f: f; f")
+
+        assert result is not None
+        assert (result.timed_out, result.superlinear) == (True, True)
+        assert "timed out after 0.2s at n=800" in result.feedback
+
+    def test_not_measurable(self, executor: JQExecutor, make_task: Callable[..., Task]):
+        """Inputs without arrays and filters failing on scaled inputs give no result."""
+        reviewer = ScalingReviewer(executor)
+
+        assert (
+            reviewer.measure(
+                make_task({"a": 1}, None, more_examples=[([], None), ("x", None)]), "."
+            )
+            is None
+        )
+        assert reviewer.measure(make_task(RECORDS, None), "error") is None
+
+    def test_worst_example_counts(self, executor: JQExecutor, make_task: Callable[..., Task]):
+        """With several examples, the worst growth is reported."""
+        reviewer = ScalingReviewer(executor, ScalingPolicy(sizes=(10, 40)))
+        pairs = 'if type == "array" then [.[] as $a | .[] | 1] else [.xs[]] end'
+
+        result = reviewer.measure(
+            make_task({"xs": [1, 2, 3]}, None, more_examples=[(RECORDS, None)]), pairs
+        )
+
+        assert result is not None
+        assert result.output_exponent == pytest.approx(2.0, abs=0.1)
@@ -0,0 +1,407 @@
+"""
+Tests for the local synthesis service and its HTTP API.
+
+This module tests job solving with progress events, priority ordering,
+queue limits, cancellation of queued and running jobs, eviction of
+finished jobs, and the JSON and server-sent event endpoints.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+
+from src.domain import Example, Task
+from src.executor import JQExecutor
+from src.generator import JQGenerator
+from src.metrics import SynthMetrics
+from src.reviewer import AlgorithmicReviewer
+from src.server import (
+    CANCELLED,
+    ERROR,
+    FAILED,
+    SOLVED,
+    QueueFullError,
+    SynthesisServer,
+    SynthesisService,
+    parse_task,
+)
+
+TASK_JSON = {
+    "id": "get-x",
+    "description": "Extract x",
+    "examples": [
+        {"input": {"x": 1}, "expected_output": 1},
+        {"input": {"x": 2}, "expected_output": 2},
+    ],
+}
+
+
+@pytest.fixture
+def task(make_task: Callable[..., Task]) -> Task:
+    """A task solved by '.x'."""
+    return make_task({"x": 1}, 1, "Extract x", more_examples=[({"x": 2}, 2)])
+
+
+class _Provider:
+    """LLM stand-in answering in order; answers wait while the gate is closed."""
+
+    def __init__(self, answers: list[str]) -> None:
+        self.answers = answers
+        self.gate = threading.Event()
+        self.gate.set()
+        self.calls = 0
+
+    def mock(self) -> MagicMock:
+        provider = MagicMock()
+        provider.model = "test-model"
+        provider.TEMPERATURE = 0.3
+        provider.SYSTEM_PROMPT = "system"
+        provider.agenerate = self.agenerate
+        provider.aclose = AsyncMock()
+        return provider
+
+    async def agenerate(self, prompt: Any) -> str:
+        while not self.gate.is_set():
+            await asyncio.sleep(0.01)
+        answer = self.answers[min(self.calls, len(self.answers) - 1)]
+        self.calls += 1
+        return answer
+
+
+@contextmanager
+def _service(
+    executor: JQExecutor, provider: _Provider, **kwargs: Any
+) -> Iterator[SynthesisService]:
+    service = SynthesisService(
+        JQGenerator(provider=provider.mock()), AlgorithmicReviewer(executor), **kwargs
+    )
+    with service:
+        yield service
+
+
+def _wait(service: SynthesisService, job_id: str) -> str:
+    """Wait for a job's final event and return its status."""
+    return list(service.follow(job_id))[-1].name
+
+
+class TestParseTask:
+    """Tests for reading tasks from request bodies."""
+
+    def test_valid(self):
+        """The tasks-file format is accepted; the ID is optional."""
+        task = parse_task({k: v for k, v in TASK_JSON.items() if k != "id"}, "job")
+
+        assert task.id == "job"
+        assert task.examples[1] == Example({"x": 2}, 2)
+
+    @pytest.mark.parametrize(
+        ("data", "message"),
+        [
+            ([], "must be an object"),
+            ({"examples": []}, "description"),
+            ({"description": "d", "examples": []}, "non-empty"),
+            ({"description": "d", "examples": [{"input": 1}]}, "expected_output"),
+        ],
+    )
+    def test_invalid(self, data: Any, message: str):
+        """Missing or mistyped fields are rejected."""
+        with pytest.raises(ValueError, match=message):
+            parse_task(data, "job")
+
+
+class TestService:
+    """Tests for queueing, solving and cancelling jobs."""
+
+    def test_solves_with_progress(self, executor: JQExecutor, task: Task):
+        """A job reports each attempt, then its result."""
+        with _service(executor, _Provider([".y", ".x"])) as service:
+            job = service.submit(task)
+            events = list(service.follow(job.id))
+
+            assert [e.name for e in events] == ["queued", "started", "attempt", "attempt", SOLVED]
+            assert [e.id for e in events] == [0, 1, 2, 3, 4]
+            assert events[2].data["filter"] == ".y"
+            assert events[-1].data["result"] == {
+                "success": True,
+                "filter": ".x",
+                "score": 1.0,
+                "iterations": 2,
+            }
+            assert job.status == SOLVED
+
+    def test_unsolved_job_fails(self, executor: JQExecutor, task: Task):
+        """A job without a perfect filter ends as failed."""
+        with _service(executor, _Provider([".y"]), max_iterations=1) as service:
+            job = service.submit(task)
+
+            assert _wait(service, job.id) == FAILED
+            assert job.max_iterations == 1
+
+    def test_error(self, executor: JQExecutor, task: Task):
+        """An exception in the solve ends the job with its message."""
+        matcher = MagicMock()
+        matcher.derive.side_effect = RuntimeError("boom")
+        with _service(executor, _Provider([".x"]), matcher=matcher) as service:
+            job = service.submit(task)
+
+            assert _wait(service, job.id) == ERROR
+            assert job.error == "RuntimeError: boom"
+
+    def test_priority_order(self, executor: JQExecutor, make_task: Callable[..., Task]):
+        """Waiting jobs start by priority, then in submission order."""
+        provider = _Provider([".x"])
+        provider.gate.clear()
+        with _service(executor, provider, workers=1) as service:
+            blocker = service.submit(make_task({"x": 1}, 1, task_id="blocker"))
+            service.events(blocker.id, start=1, timeout=5)
+            low = service.submit(make_task({"x": 1}, 1, task_id="low"), priority=0)
+            high = service.submit(make_task({"x": 1}, 1, task_id="high"), priority=5)
+            low2 = service.submit(make_task({"x": 1}, 1, task_id="low2"), priority=0)
+            provider.gate.set()
+            for job in (blocker, low, high, low2):
+                _wait(service, job.id)
+
+            started = sorted((blocker, low, high, low2), key=lambda j: j.started_at or 0)
+            assert [j.task.id for j in started] == ["blocker", "high", "low", "low2"]
+
+    def test_queue_limit(self, executor: JQExecutor, task: Task):
+        """Submissions beyond max_queue waiting jobs are refused."""
+        provider = _Provider([".x"])
+        provider.gate.clear()
+        with _service(executor, provider, workers=1, max_queue=1) as service:
+            running = service.submit(task)
+            service.events(running.id, start=1, timeout=5)  # wait until started
+            service.submit(task)
+
+            with pytest.raises(QueueFullError):
+                service.submit(task)
+            assert (service.queued(), service.running()) == (1, 1)
+            provider.gate.set()
+
+    def test_cancel_queued(self, executor: JQExecutor, task: Task):
+        """A waiting job is cancelled at once and never started."""
+        provider = _Provider([".x"])
+        provider.gate.clear()
+        with _service(executor, provider, workers=1) as service:
+            service.submit(task)
+            waiting = service.submit(task)
+
+            assert service.cancel(waiting.id).status == CANCELLED
+            provider.gate.set()
+            assert [e.name for e in service.follow(waiting.id)] == ["queued", CANCELLED]
+            assert waiting.started_at is None
+
+    def test_cancel_running(self, executor: JQExecutor, task: Task):
+        """A running job is interrupted and the worker moves on."""
+        provider = _Provider([".x"])
+        provider.gate.clear()
+        with _service(executor, provider, workers=1) as service:
+            running = service.submit(task)
+            service.events(running.id, start=1, timeout=5)
+            service.cancel(running.id)
+
+            assert _wait(service, running.id) == CANCELLED
+            assert running.cancel_requested
+            provider.gate.set()
+            assert _wait(service, service.submit(task).id) == SOLVED
+
+    def test_stop_cancels_running(self, executor: JQExecutor, task: Task):
+        """Stopping the service cancels running jobs and closes the connections."""
+        provider = _Provider([".x"])
+        provider.gate.clear()
+        generator = JQGenerator(provider=provider.mock())
+        service = SynthesisService(generator, AlgorithmicReviewer(executor)).start()
+        job = service.submit(task)
+        service.events(job.id, start=1, timeout=5)
+
+        service.stop()
+
+        assert job.status == CANCELLED
+        generator.provider.aclose.assert_awaited()  # type: ignore[attr-defined]
+        with pytest.raises(RuntimeError, match="not running"):
+            service.submit(task)
+
+    def test_evicts_beyond_max_finished(self, executor: JQExecutor, make_task: Callable[..., Task]):
+        """Only the latest max_finished finished jobs are kept."""
+        with _service(executor, _Provider([".x"]), max_finished=1) as service:
+            first = service.submit(make_task({"x": 1}, 1, task_id="a"))
+            _wait(service, first.id)
+            second = service.submit(make_task({"x": 1}, 1, task_id="b"))
+            _wait(service, second.id)
+
+            assert list(service.jobs) == [second.id]
+            assert service.evicted(first.id)
+            assert not service.evicted(second.id)
+            with pytest.raises(KeyError):
+                service.events(first.id)
+
+    def test_evicts_after_ttl(self, executor: JQExecutor, task: Task):
+        """Finished jobs older than finished_ttl_sec are evicted."""
+        with _service(executor, _Provider([".x"]), finished_ttl_sec=0.05) as service:
+            job = service.submit(task)
+            _wait(service, job.id)
+            time.sleep(0.1)
+            service.prune()
+
+            assert service.jobs == {}
+            assert service.evicted(job.id)
+
+    def test_follower_gets_final_event_of_evicted_job(self, executor: JQExecutor, task: Task):
+        """A job evicted as soon as it finishes still reports its result to followers."""
+        with _service(executor, _Provider([".x"]), max_finished=0) as service:
+            job = service.submit(task)
+
+            assert _wait(service, job.id) == SOLVED
+            assert service.evicted(job.id)
+
+    def test_validation(self, executor: JQExecutor, task: Task):
+        """Limits must be positive."""
+        with pytest.raises(ValueError, match="at least 1"):
+            SynthesisService(MagicMock(), AlgorithmicReviewer(executor), workers=0)
+        for limits in ({"max_finished": -1}, {"finished_ttl_sec": 0}):
+            with pytest.raises(ValueError, match="max_finished"):
+                SynthesisService(MagicMock(), AlgorithmicReviewer(executor), **limits)
+        with _service(executor, _Provider([".x"])) as service:
+            with pytest.raises(ValueError, match="at least 1"):
+                service.submit(task, max_iterations=0)
+
+
+class TestServer:
+    """Tests for the HTTP API."""
+
+    @pytest.fixture
+    def provider(self) -> _Provider:
+        return _Provider([".y", ".x"])
+
+    @pytest.fixture
+    def server(self, executor: JQExecutor, provider: _Provider) -> Iterator[SynthesisServer]:
+        with _service(executor, provider, workers=1, max_queue=1) as service:
+            with SynthesisServer(service) as server:
+                yield server
+
+    def _events(self, response: httpx.Response) -> list[tuple[str, str, dict[str, Any]]]:
+        """Parse an SSE body into (id, event, data) triples."""
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in block.splitlines())
+            events.append((fields["id"], fields["event"], json.loads(fields["data"])))
+        return events
+
+    def test_submit_and_stream(self, server: SynthesisServer):
+        """A submitted job's progress streams as SSE until its result."""
+        submitted = httpx.post(f"{server.url}/jobs", json={"task": TASK_JSON, "priority": 2})
+        job_id = submitted.json()["id"]
+
+        stream = httpx.get(f"{server.url}/jobs/{job_id}/events", timeout=10)
+        job = httpx.get(f"{server.url}/jobs/{job_id}").json()
+
+        assert submitted.status_code == 202
+        assert submitted.headers["location"] == f"/jobs/{job_id}"
+        assert stream.headers["content-type"] == "text/event-stream"
+        events = self._events(stream)
+        assert [name for _, name, _ in events] == [
+            "queued",
+            "started",
+            "attempt",
+            "attempt",
+            SOLVED,
+        ]
+        assert events[-1][2]["result"]["filter"] == ".x"
+        assert job["status"] == SOLVED
+        assert job["task_id"] == "get-x"
+        assert job["priority"] == 2
+
+    def test_resume_after_last_event(self, server: SynthesisServer):
+        """Last-Event-ID skips the events already received."""
+        job_id = httpx.post(f"{server.url}/jobs", json={"task": TASK_JSON}).json()["id"]
+
+        stream = httpx.get(
+            f"{server.url}/jobs/{job_id}/events", headers={"Last-Event-ID": "2"}, timeout=10
+        )
+
+        assert [event_id for event_id, _, _ in self._events(stream)] == ["3", "4"]
+
+    def test_list_health_and_cancel(self, server: SynthesisServer, provider: _Provider):
+        """Jobs are listed, counted in /health and cancelled with DELETE."""
+        provider.gate.clear()
+        first = httpx.post(f"{server.url}/jobs", json={"task": TASK_JSON}).json()["id"]
+        server.service.events(first, start=1, timeout=5)
+        second = httpx.post(f"{server.url}/jobs", json={"task": TASK_JSON}).json()["id"]
+
+        health = httpx.get(f"{server.url}/health").json()
+        full = httpx.post(f"{server.url}/jobs", json={"task": TASK_JSON})
+        listed = httpx.get(f"{server.url}/jobs").json()["jobs"]
+        cancel_queued = httpx.delete(f"{server.url}/jobs/{second}")
+        cancel_running = httpx.delete(f"{server.url}/jobs/{first}")
+
+        assert health == {"status": "ok", "queued": 1, "running": 1}
+        assert full.status_code == 503
+        assert [job["id"] for job in listed] == [first, second]
+        assert (cancel_queued.status_code, cancel_queued.json()["status"]) == (200, CANCELLED)
+        assert cancel_running.status_code in (200, 202)
+        assert _wait(server.service, first) == CANCELLED
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            b"not json",
+            b"[]",
+            json.dumps({"task": {"description": "d"}}).encode(),
+            json.dumps({"task": TASK_JSON, "priority": "high"}).encode(),
+            json.dumps({"task": TASK_JSON, "max_iters": 0}).encode(),
+        ],
+    )
+    def test_bad_request(self, server: SynthesisServer, body: bytes):
+        """Invalid bodies are rejected with a message."""
+        response = httpx.post(f"{server.url}/jobs", content=body)
+
+        assert response.status_code == 400
+        assert response.json()["error"]["message"]
+
+    @pytest.mark.parametrize(
+        ("method", "path"),
+        [
+            ("GET", "/jobs/missing"),
+            ("GET", "/jobs/missing/events"),
+            ("GET", "/metrics"),
+            ("POST", "/other"),
+            ("DELETE", "/jobs/missing"),
+        ],
+    )
+    def test_not_found(self, server: SynthesisServer, method: str, path: str):
+        """Unknown paths and jobs are 404 (and /metrics without recording)."""
+        assert httpx.request(method, f"{server.url}{path}").status_code == 404
+
+    @pytest.mark.parametrize(
+        ("method", "suffix"), [("GET", ""), ("GET", "/events"), ("DELETE", "")]
+    )
+    def test_evicted_job_gone(self, executor: JQExecutor, method: str, suffix: str):
+        """Evicted jobs answer 410 rather than 404."""
+        with _service(executor, _Provider([".x"]), max_finished=0) as service:
+            with SynthesisServer(service) as server:
+                job_id = httpx.post(f"{server.url}/jobs", json={"task": TASK_JSON}).json()["id"]
+                _wait(service, job_id)
+
+                response = httpx.request(method, f"{server.url}/jobs/{job_id}{suffix}")
+
+        assert response.status_code == 410
+        assert "no longer kept" in response.json()["error"]["message"]
+
+    def test_metrics(self, server: SynthesisServer, metrics: SynthMetrics):
+        """Installed metrics are served at /metrics."""
+        job_id = httpx.post(f"{server.url}/jobs", json={"task": TASK_JSON}).json()["id"]
+        _wait(server.service, job_id)
+
+        response = httpx.get(f"{server.url}/metrics")
+
+        assert response.status_code == 200
+        assert 'jq_synth_tasks_total{outcome="solved"} 1' in response.text
+        assert metrics.tasks.value(outcome="solved") == 1
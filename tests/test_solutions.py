@@ -0,0 +1,62 @@
+"""
+Tests for the solution store.
+
+This module tests adding solved tasks, reading them back from the file and
+rejecting unsolved tasks and corrupt files.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from src.domain import Solution
+from src.solutions import SolutionStore
+
+
+def _solution(task_id: str, best_filter: str, success: bool = True) -> Solution:
+    return Solution(
+        task_id=task_id,
+        success=success,
+        best_filter=best_filter,
+        best_score=1.0 if success else 0.5,
+        iterations_used=2,
+        history=[],
+    )
+
+
+class TestSolutionStore:
+    """Tests for SolutionStore."""
+
+    def test_round_trip(self, tmp_path: Path):
+        """Saved filters are read back by task ID; later ones replace earlier ones."""
+        path = tmp_path / "solutions.json"
+        store = SolutionStore(path)
+        store.add(_solution("a", ".x"))
+        store.add(_solution("b", ".y"))
+        store.add(_solution("a", ".z"))
+        store.save()
+
+        loaded = SolutionStore(path)
+
+        assert loaded.get("a").filter == ".z"  # type: ignore[union-attr]
+        assert loaded.get("b").iterations == 2  # type: ignore[union-attr]
+        assert loaded.get("c") is None
+        assert [p.name for p in tmp_path.iterdir()] == ["solutions.json"]
+
+    def test_missing_file_is_empty(self, tmp_path: Path):
+        """A store that was never saved has no solutions."""
+        assert SolutionStore(tmp_path / "none.json").solutions == {}
+
+    def test_unsolved_rejected(self, tmp_path: Path):
+        """Only successful solutions are stored."""
+        with pytest.raises(ValueError, match="not solved"):
+            SolutionStore(tmp_path / "s.json").add(_solution("a", ".x", success=False))
+
+    @pytest.mark.parametrize("text", ["not json", "[]", '{"solutions": {"a": {"filter": 1}}}'])
+    def test_corrupt_file(self, tmp_path: Path, text: str):
+        """Files that are not a store are reported."""
+        path = tmp_path / "s.json"
+        path.write_text(text)
+
+        with pytest.raises(ValueError, match="Invalid solution store"):
+            SolutionStore(path)
@@ -0,0 +1,177 @@
+"""
+Unit tests for the jq idiom template library.
+
+This module tests shape signatures, shape-indexed template lookup and template
+instantiation with field names taken from task examples, and checks that the
+library solves the recurring idioms in the bundled task suites.
+"""
+
+from collections.abc import Callable
+
+import pytest
+
+from src.domain import Task
+from src.reviewer import AlgorithmicReviewer
+from src.templates import Template, TemplateLibrary, shape_signature
+
+
+class TestShapeSignature:
+    """Tests for shape_signature classification."""
+
+    @pytest.mark.parametrize(
+        ("value", "expected"),
+        [
+            ({"a": 1}, "object"),
+            ([], "array"),
+            ([{"a": 1}, {"b": 2}], "array<object>"),
+            ([[1], [2]], "array<array>"),
+            ([1, "x", None, True], "array<scalar>"),
+            ([1, [2]], "array<mixed>"),
+            (1.5, "number"),
+            ("x", "string"),
+            (True, "boolean"),
+            (None, "null"),
+        ],
+    )
+    def test_classifies_values(self, value: object, expected: str):
+        """Each JSON value maps to its coarse shape signature."""
+        assert shape_signature(value) == expected
+
+
+class TestLookup:
+    """Tests for shape-indexed template lookup."""
+
+    def test_finds_templates_for_exact_signature(self):
+        """Templates are returned for a matching (input, output) pair."""
+        library = TemplateLibrary()
+        names = [t.name for t in library.lookup("array<object>", "object")]
+        assert "group-count-object" in names
+        assert "pivot-to-object" in names
+        assert "flatten" not in names
+
+    def test_empty_array_matches_all_array_signatures(self):
+        """An empty input array is compatible with every array template."""
+        library = TemplateLibrary()
+        names = [t.name for t in library.lookup("array", "number")]
+        assert "sum-field" in names
+        assert "sum-numbers" in names
+
+    def test_null_output_matches_any_output(self):
+        """A null expected output does not rule templates out."""
+        library = TemplateLibrary()
+        names = [t.name for t in library.lookup("array<scalar>", "null")]
+        assert "sum-numbers" in names
+        assert "dedupe" in names
+
+    def test_unknown_signature_returns_empty(self):
+        """Signatures without templates yield no candidates."""
+        library = TemplateLibrary()
+        assert library.lookup("string", "boolean") == []
+
+
+class TestInstantiate:
+    """Tests for template instantiation."""
+
+    def test_substitutes_fields_from_examples(self, make_task: Callable[..., Task]):
+        """Field placeholders are filled with keys of the input elements."""
+        library = TemplateLibrary()
+        task = make_task([{"id": 1, "name": "a"}], ["a"])
+        candidates = library.instantiate(task)
+        assert "map(.name)" in candidates
+        assert "map(.id)" in candidates
+
+    def test_substitutes_output_length(self, make_task: Callable[..., Task]):
+        """The {{n}} placeholder uses the expected output length."""
+        library = TemplateLibrary()
+        task = make_task([3, 1, 2], [3, 2])
+        assert "sort | reverse | .[:2]" in library.instantiate(task)
+
+    def test_two_field_templates_use_distinct_fields(self, make_task: Callable[..., Task]):
+        """{{field}} and {{field2}} never receive the same key."""
+        library = TemplateLibrary()
+        task = make_task([{"k": "a", "v": 1}], {"a": 1})
+        candidates = library.instantiate(task)
+        assert "map({key: (.k | tostring), value: .v}) | from_entries" in candidates
+        assert "map({key: (.k | tostring), value: .k}) | from_entries" not in candidates
+
+    def test_skips_non_identifier_fields(self, make_task: Callable[..., Task]):
+        """Keys that cannot be written as .field are not used."""
+        library = TemplateLibrary()
+        task = make_task([{"first name": "a"}], ["a"])
+        assert not any("first name" in c for c in library.instantiate(task))
+
+    def test_template_must_fit_every_example(self, make_task: Callable[..., Task]):
+        """Templates are intersected across the signatures of all examples."""
+        library = TemplateLibrary()
+        task = make_task([1, 2], 3, more_examples=[([1, 2], [1, 2])])
+        assert library.instantiate(task) == []
+
+    def test_respects_max_candidates(self, make_task: Callable[..., Task]):
+        """No more than max_candidates filters are returned."""
+        library = TemplateLibrary(max_candidates=3)
+        task = make_task([{"a": 1, "b": 2, "c": 3}], [1])
+        assert len(library.instantiate(task)) == 3
+
+    def test_wide_objects_keep_every_template(self, make_task: Callable[..., Task]):
+        """Pairs of many fields do not crowd other templates out of max_candidates."""
+        items = [{f"f{i:02d}": f"{row}-{i}" for i in range(16)} for row in range(2)]
+        task = make_task(items, {item["f03"]: item for item in items})
+
+        candidates = TemplateLibrary().instantiate(task)
+
+        assert len(candidates) <= 200
+        assert "map({key: (.f03 | tostring), value: .}) | from_entries" in candidates
+        assert "map({key: (.f00 | tostring), value: .f01}) | from_entries" in candidates
+
+    def test_custom_templates(self, make_task: Callable[..., Task]):
+        """A library can be built from custom templates."""
+        library = TemplateLibrary(
+            templates=(Template("first", ".[0]", ("array<scalar>",), ("number",)),)
+        )
+        assert library.instantiate(make_task([5, 6], 5)) == [".[0]"]
+
+    def test_no_examples(self):
+        """Tasks without examples produce no candidates."""
+        library = TemplateLibrary()
+        assert library.instantiate(Task(id="t", description="d", examples=[])) == []
+
+
+class TestSolvesBundledIdioms:
+    """Tests that screened templates solve the recurring task idioms."""
+
+    @pytest.mark.parametrize(
+        ("pairs", "expected_filter"),
+        [
+            (
+                [
+                    (
+                        [{"category": "a", "n": 1}, {"category": "b", "n": 2}, {"category": "a"}],
+                        [{"category": "a", "count": 2}, {"category": "b", "count": 1}],
+                    )
+                ],
+                'group_by(.category) | map({"category": .[0].category, "count": length})',
+            ),
+            (
+                [([{"k": "a", "v": 1}, {"k": "b", "v": 2}], {"a": 1, "b": 2})],
+                "map({key: (.k | tostring), value: .v}) | from_entries",
+            ),
+            ([([[1, [2, [3]]], 4], [1, 2, 3, 4])], "flatten"),
+            (
+                [([{"id": 1, "v": "x"}, {"id": 1, "v": "y"}, {"id": 2, "v": "z"}], [1, 2])],
+                "map(.id) | unique",
+            ),
+            ([([5, 1, 9, 3], [9, 5])], "sort | reverse | .[:2]"),
+        ],
+    )
+    def test_first_passing_candidate(
+        self,
+        reviewer: AlgorithmicReviewer,
+        pairs: list[tuple[object, object]],
+        expected_filter: str,
+        make_task: Callable[..., Task],
+    ):
+        """The first screened survivor is the expected idiom."""
+        task = make_task(*pairs[0], more_examples=pairs[1:])
+        passing = reviewer.screen(task, TemplateLibrary().instantiate(task))
+        assert passing
+        assert passing[0] == expected_filter
@@ -0,0 +1,90 @@
+"""
+Tests for per-phase timing instrumentation.
+
+This module tests PhaseTimer accumulation and nesting, the no-op behavior of
+phase() outside recording(), and isolation between concurrent asyncio tasks.
+"""
+
+import asyncio
+
+from src.timing import (
+    ANALYZE,
+    API_CALL,
+    EXECUTION,
+    PROMPT_BUILD,
+    PhaseTimer,
+    add_phase,
+    phase,
+    recording,
+)
+
+
+class TestPhase:
+    """Tests for measuring phases."""
+
+    def test_no_op_without_recording(self):
+        """Outside recording() phases are not measured and share one no-op."""
+        assert phase(API_CALL) is phase(EXECUTION)
+        with phase(API_CALL):
+            pass
+        add_phase(API_CALL, 1.0)
+
+        with recording() as timer:
+            pass
+        assert timer.totals == {}
+
+    def test_accumulates(self):
+        """Repeated phases are summed."""
+        with recording() as timer:
+            add_phase(EXECUTION, 0.25)
+            add_phase(EXECUTION, 0.5)
+            with phase(ANALYZE):
+                pass
+
+        assert timer.totals[EXECUTION] == 0.75
+        assert timer.totals[ANALYZE] >= 0
+
+    def test_measured_even_on_error(self):
+        """A phase that raises is still recorded."""
+        with recording() as timer:
+            try:
+                with phase(API_CALL):
+                    raise RuntimeError("boom")
+            except RuntimeError:
+                pass
+
+        assert API_CALL in timer.totals
+
+    def test_nested_recordings(self):
+        """Inner timers also add to the enclosing timer."""
+        with recording() as outer:
+            add_phase(PROMPT_BUILD, 1.0)
+            with recording() as inner:
+                add_phase(EXECUTION, 2.0)
+
+        assert inner.totals == {EXECUTION: 2.0}
+        assert outer.totals == {PROMPT_BUILD: 1.0, EXECUTION: 2.0}
+
+    def test_snapshot_in_pipeline_order(self):
+        """Snapshots list the phases in pipeline order, unknown ones last."""
+        timer = PhaseTimer()
+        timer.add("custom", 1.0)
+        timer.add(EXECUTION, 1.0)
+        timer.add(PROMPT_BUILD, 1.0)
+
+        assert list(timer.snapshot()) == [PROMPT_BUILD, EXECUTION, "custom"]
+
+    def test_concurrent_tasks_isolated(self):
+        """Each asyncio task records into its own timer."""
+
+        async def work(seconds: float) -> dict[str, float]:
+            with recording() as timer:
+                await asyncio.sleep(0)
+                add_phase(EXECUTION, seconds)
+                await asyncio.sleep(0)
+            return timer.totals
+
+        async def run_all() -> list[dict[str, float]]:
+            return await asyncio.gather(work(1.0), work(2.0))
+
+        assert asyncio.run(run_all()) == [{EXECUTION: 1.0}, {EXECUTION: 2.0}]
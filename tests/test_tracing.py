@@ -0,0 +1,224 @@
+"""
+Tests for span tracing and the trace file exporters.
+
+This module tests the no-op behavior when tracing is off, span nesting and
+attribute inheritance, error recording, isolation between concurrent asyncio
+tasks, and the Chrome trace-event and OTLP/JSON encodings.
+"""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from src.tracing import (
+    CHROME,
+    KIND_CLIENT,
+    OTLP,
+    Span,
+    Tracer,
+    filter_hash,
+    get_tracer,
+    span,
+    start_span,
+)
+
+
+def _by_name(tracer: Tracer) -> dict[str, Span]:
+    return {s.name: s for s in tracer.spans}
+
+
+class TestSpans:
+    """Tests for opening and nesting spans."""
+
+    def test_no_op_without_tracer(self):
+        """With tracing off every span is the same non-recording no-op."""
+        assert get_tracer() is None
+        with span("a", task_id="t") as first:
+            first.set_attribute("x", 1)
+        assert first.recording is False
+        assert span("b") is first
+        assert start_span("c") is first
+
+    def test_nesting(self, tracer: Tracer):
+        """Spans opened inside a span are its children in the same trace."""
+        with span("parent", task_id="t", iteration=2):
+            with span("child", exit_code=0):
+                pass
+        with span("other"):
+            pass
+
+        spans = _by_name(tracer)
+        parent, child, other = spans["parent"], spans["child"], spans["other"]
+        assert [s.name for s in tracer.spans] == ["child", "parent", "other"]
+        assert child.parent_id == parent.span_id
+        assert child.trace_id == parent.trace_id
+        assert parent.parent_id is None
+        assert other.trace_id != parent.trace_id
+        assert parent.start_ns <= child.start_ns <= child.end_ns <= parent.end_ns
+
+    def test_inherits_task_and_iteration(self, tracer: Tracer):
+        """Children carry the task ID and iteration of their ancestors."""
+        with span("solve", task_id="t", success=True):
+            with span("iteration", iteration=3):
+                with span("run", exit_code=0):
+                    pass
+
+        assert _by_name(tracer)["run"].attributes == {
+            "task_id": "t",
+            "iteration": 3,
+            "exit_code": 0,
+        }
+
+    def test_error_recorded_and_reraised(self, tracer: Tracer):
+        """An exception leaving a span marks it as failed."""
+        with pytest.raises(ValueError, match="boom"), span("failing"):
+            raise ValueError("boom")
+
+        assert tracer.spans[0].error == "ValueError: boom"
+        assert tracer.spans[0].end_ns is not None
+
+    def test_start_span_is_not_current(self, tracer: Tracer):
+        """Explicit spans are children of the current span but not parents."""
+        with span("parent"):
+            stream = start_span("stream", kind=KIND_CLIENT)
+            with span("sibling"):
+                pass
+        stream.end()
+        stream.end()
+
+        spans = _by_name(tracer)
+        assert spans["stream"].parent_id == spans["parent"].span_id
+        assert spans["sibling"].parent_id == spans["parent"].span_id
+        assert len(tracer.spans) == 3
+
+    def test_asyncio_tasks_isolated(self, tracer: Tracer):
+        """Concurrent tasks each parent their own spans."""
+
+        async def solve(task_id: str) -> None:
+            with span("solve", task_id=task_id):
+                await asyncio.sleep(0.01)
+                with span("run"):
+                    await asyncio.sleep(0.01)
+
+        async def main() -> None:
+            await asyncio.gather(solve("a"), solve("b"))
+
+        asyncio.run(main())
+
+        solves = {s.attributes["task_id"]: s for s in tracer.spans if s.name == "solve"}
+        for run in (s for s in tracer.spans if s.name == "run"):
+            assert run.parent_id == solves[run.attributes["task_id"]].span_id
+
+    def test_filter_hash(self):
+        """Filter hashes are short and stable."""
+        assert filter_hash(".x") == filter_hash(".x")
+        assert filter_hash(".x") != filter_hash(".y")
+        assert len(filter_hash(".x")) == 12
+
+    def test_seeded_ids_reproducible(self):
+        """A seeded tracer generates the same IDs."""
+        assert Tracer(seed=1).new_id(64) == Tracer(seed=1).new_id(64)
+
+
+class TestChromeTrace:
+    """Tests for the Chrome trace-event encoding."""
+
+    def _finished(self, tracer: Tracer, name: str, start: int, end: int, **attrs) -> Span:
+        """A finished span with fixed times (microseconds from 0)."""
+        finished = tracer.start_span(name, attributes=attrs)
+        finished.start_ns = start * 1000
+        finished.end_ns = end * 1000
+        tracer.spans.append(finished)
+        return finished
+
+    def test_complete_events(self, tracer: Tracer):
+        """Spans become X events relative to the first span, in microseconds."""
+        self._finished(tracer, "solve", 100, 400, task_id="t")
+        self._finished(tracer, "run", 150, 250)
+
+        trace = tracer.chrome_trace()
+
+        events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        assert [(e["name"], e["ts"], e["dur"]) for e in events] == [
+            ("solve", 0, 300),
+            ("run", 50, 100),
+        ]
+        assert events[0]["tid"] == events[1]["tid"]
+        assert events[0]["args"] == {"task_id": "t"}
+        assert trace["displayTimeUnit"] == "ms"
+
+    def test_overlapping_spans_on_separate_tracks(self, tracer: Tracer):
+        """Spans that overlap without nesting go to different tracks."""
+        self._finished(tracer, "solve", 0, 100, task_id="a")
+        self._finished(tracer, "solve", 50, 150, task_id="b")
+        self._finished(tracer, "solve", 120, 200, task_id="c")
+
+        events = tracer.chrome_trace()["traceEvents"]
+
+        tids = [e["tid"] for e in events if e["ph"] == "X"]
+        assert tids == [1, 2, 1]
+        names = [e["args"]["name"] for e in events if e["ph"] == "M"]
+        assert names == ["a #1", "b #2"]
+
+    def test_error_in_args(self, tracer: Tracer):
+        """Failed spans show their error."""
+        failed = self._finished(tracer, "run", 0, 10)
+        failed.record_error(RuntimeError("x"))
+
+        event = tracer.chrome_trace()["traceEvents"][-1]
+
+        assert event["args"]["error"] == "RuntimeError: x"
+
+
+class TestOTLP:
+    """Tests for the OTLP/JSON encoding."""
+
+    def test_encoding(self, tracer: Tracer):
+        """Spans are encoded with hex IDs, string nanos and typed attributes."""
+        with span("solve", task_id="t", success=True, iterations=2, best_score=0.5):
+            with pytest.raises(RuntimeError), span("http POST", kind=KIND_CLIENT):
+                raise RuntimeError("down")
+
+        scope = tracer.otlp()["resourceSpans"][0]["scopeSpans"][0]
+        http, solve = scope["spans"]
+
+        assert scope["scope"] == {"name": "jq-synth"}
+        assert len(solve["traceId"]) == 32
+        assert len(solve["spanId"]) == 16
+        assert "parentSpanId" not in solve
+        assert http["parentSpanId"] == solve["spanId"]
+        assert http["kind"] == KIND_CLIENT
+        assert int(solve["endTimeUnixNano"]) >= int(solve["startTimeUnixNano"])
+        assert solve["attributes"] == [
+            {"key": "task_id", "value": {"stringValue": "t"}},
+            {"key": "success", "value": {"boolValue": True}},
+            {"key": "iterations", "value": {"intValue": "2"}},
+            {"key": "best_score", "value": {"doubleValue": 0.5}},
+        ]
+        assert solve["status"] == {"code": 0}
+        assert http["status"] == {"code": 2, "message": "RuntimeError: down"}
+
+
+class TestWrite:
+    """Tests for writing trace files."""
+
+    def test_formats(self, tracer: Tracer, tmp_path: Path):
+        """Both formats are written as JSON."""
+        with span("solve"):
+            pass
+
+        tracer.write(tmp_path / "trace.json", CHROME)
+        tracer.write(tmp_path / "trace.otlp.json", OTLP)
+
+        chrome = json.loads((tmp_path / "trace.json").read_text())
+        assert chrome["traceEvents"][-1]["name"] == "solve"
+        otlp_text = (tmp_path / "trace.otlp.json").read_text()
+        assert otlp_text.count("\n") == 1
+        assert "resourceSpans" in json.loads(otlp_text)
+
+    def test_unknown_format(self, tracer: Tracer, tmp_path: Path):
+        """Unknown formats are rejected."""
+        with pytest.raises(ValueError, match="Unknown trace format"):
+            tracer.write(tmp_path / "trace", "zipkin")